@@ -0,0 +1,52 @@
+"""add dialogue session messages table for incremental persistence
+
+Revision ID: 010_dialogue_session_messages
+Revises: 009_dialogue_sessions
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010_dialogue_session_messages'
+down_revision = '009_dialogue_sessions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """创建对话会话消息表，会话表增加增量持久化字段"""
+    op.create_table(
+        'dialogue_session_messages',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('session_id', sa.String(100), nullable=False, comment='会话唯一标识'),
+        sa.Column('seq', sa.Integer(), nullable=False, comment='会话内消息序号'),
+        sa.Column('level', sa.String(10), nullable=False, comment='历史层级：cloud/local'),
+        sa.Column('message_id', sa.String(100), nullable=False, comment='消息ID'),
+        sa.Column('message_type', sa.String(50), nullable=False, comment='消息类型'),
+        sa.Column('content', sa.Text(), nullable=True, comment='消息内容'),
+        sa.Column('payload', sa.JSON(), nullable=True, comment='元数据、查询结果和分析数据'),
+        sa.Column('token_count', sa.Integer(), default=0, comment='Token数'),
+        sa.Column('message_time', sa.DateTime(), nullable=False, comment='消息时间'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False, comment='写入时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('session_id', 'seq', name='uq_session_message_seq'),
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_unicode_ci',
+        comment='对话会话消息表'
+    )
+    op.create_index('idx_session_level_seq', 'dialogue_session_messages', ['session_id', 'level', 'seq'])
+
+    op.add_column('dialogue_sessions', sa.Column('compressed_context', sa.Text(), nullable=True, comment='压缩后的上下文'))
+    op.add_column('dialogue_sessions', sa.Column('persisted_message_seq', sa.Integer(), server_default='0', comment='已追加消息的最大序号'))
+    op.add_column('dialogue_sessions', sa.Column('persistence_watermark', sa.JSON(), nullable=True, comment='各层级已持久化的最后一条消息'))
+
+
+def downgrade():
+    """删除对话会话消息表和增量持久化字段"""
+    op.drop_column('dialogue_sessions', 'persistence_watermark')
+    op.drop_column('dialogue_sessions', 'persisted_message_seq')
+    op.drop_column('dialogue_sessions', 'compressed_context')
+    op.drop_index('idx_session_level_seq', table_name='dialogue_session_messages')
+    op.drop_table('dialogue_session_messages')
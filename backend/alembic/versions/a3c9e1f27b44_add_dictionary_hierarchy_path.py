@@ -0,0 +1,61 @@
+"""add dictionary hierarchy path
+
+Revision ID: a3c9e1f27b44
+Revises: 56aa2d976da9
+Create Date: 2026-10-18 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e1f27b44'
+down_revision: Union[str, Sequence[str], None] = '56aa2d976da9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """为字典表添加层级路径索引并回填现有数据"""
+    op.add_column('dictionaries',
+                  sa.Column('path', sa.String(length=760), nullable=True,
+                            comment='层级路径（/根字典ID/.../自身ID/）'))
+    op.add_column('dictionaries',
+                  sa.Column('depth', sa.Integer(), nullable=False, server_default='0',
+                            comment='层级深度（根字典为0）'))
+
+    # 按父字典链回填路径（父字典缺失或存在循环时作为根字典处理）
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("SELECT id, parent_id FROM dictionaries")).fetchall()
+    parents = {row[0]: row[1] for row in rows}
+    paths = {}
+
+    def resolve(dict_id, seen):
+        if dict_id in paths:
+            return paths[dict_id]
+        parent_id = parents.get(dict_id)
+        if parent_id in parents and parent_id not in seen:
+            path = f"{resolve(parent_id, seen | {dict_id})}{dict_id}/"
+        else:
+            path = f"/{dict_id}/"
+        paths[dict_id] = path
+        return path
+
+    for dict_id in parents:
+        path = resolve(dict_id, set())
+        connection.execute(
+            sa.text("UPDATE dictionaries SET path = :path, depth = :depth WHERE id = :id"),
+            {"path": path, "depth": path.count("/") - 2, "id": dict_id}
+        )
+
+    op.create_index('ix_dictionaries_path', 'dictionaries', ['path'])
+
+
+def downgrade() -> None:
+    """删除字典层级路径索引"""
+    op.drop_index('ix_dictionaries_path', table_name='dictionaries')
+    op.drop_column('dictionaries', 'depth')
+    op.drop_column('dictionaries', 'path')
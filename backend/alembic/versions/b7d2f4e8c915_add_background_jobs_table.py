@@ -0,0 +1,56 @@
+"""add background jobs table
+
+Revision ID: b7d2f4e8c915
+Revises: a3c9e1f27b44
+Create Date: 2026-10-18 14:05:27.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2f4e8c915'
+down_revision: Union[str, Sequence[str], None] = 'a3c9e1f27b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """创建后台任务表"""
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', sa.String(36), nullable=False, comment='任务ID（UUID）'),
+        sa.Column('job_type', sa.String(50), nullable=False, comment='任务类型，对应已注册的处理函数'),
+        sa.Column('status', sa.String(20), nullable=False, comment='任务状态'),
+        sa.Column('concurrency_key', sa.String(100), nullable=True, comment='并发分组（通常为数据源ID）'),
+        sa.Column('payload', sa.JSON(), nullable=True, comment='任务参数'),
+        sa.Column('progress', sa.Integer(), nullable=False, server_default='0', comment='进度（0-100）'),
+        sa.Column('message', sa.String(500), nullable=True, comment='进度说明'),
+        sa.Column('result', sa.JSON(), nullable=True, comment='执行结果'),
+        sa.Column('error', sa.Text(), nullable=True, comment='最近一次错误信息'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0', comment='已执行次数'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3', comment='最大执行次数'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false(),
+                  comment='是否已请求取消'),
+        sa.Column('next_run_at', sa.DateTime(), nullable=True, comment='下次执行时间（重试退避）'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='首次开始执行时间'),
+        sa.Column('ended_at', sa.DateTime(), nullable=True, comment='结束时间'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_unicode_ci',
+        comment='后台任务表'
+    )
+    op.create_index('idx_background_jobs_status', 'background_jobs', ['status', 'created_at'])
+    op.create_index('idx_background_jobs_type', 'background_jobs', ['job_type', 'created_at'])
+
+
+def downgrade() -> None:
+    """删除后台任务表"""
+    op.drop_index('idx_background_jobs_type', table_name='background_jobs')
+    op.drop_index('idx_background_jobs_status', table_name='background_jobs')
+    op.drop_table('background_jobs')
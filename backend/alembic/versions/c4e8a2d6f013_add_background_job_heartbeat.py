@@ -0,0 +1,32 @@
+"""add background job owner and heartbeat
+
+Revision ID: c4e8a2d6f013
+Revises: b7d2f4e8c915
+Create Date: 2026-10-18 17:42:10.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2d6f013'
+down_revision: Union[str, Sequence[str], None] = 'b7d2f4e8c915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """后台任务表增加执行器实例和心跳时间，恢复时只接管心跳超时的任务"""
+    op.add_column('background_jobs', sa.Column('owner', sa.String(100), nullable=True,
+                                               comment='执行中任务所属的执行器实例'))
+    op.add_column('background_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True,
+                                               comment='执行器最近一次心跳时间'))
+
+
+def downgrade() -> None:
+    """删除执行器实例和心跳时间"""
+    op.drop_column('background_jobs', 'heartbeat_at')
+    op.drop_column('background_jobs', 'owner')
@@ -0,0 +1,45 @@
+"""unique conversation message turn per session
+
+Revision ID: d5f1b3a9e724
+Revises: c4e8a2d6f013
+Create Date: 2026-10-18 20:16:43.902517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f1b3a9e724'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a2d6f013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """对话消息的 (session_id, turn) 改为唯一，已有重复turn的会话按 (turn, id) 重新编号"""
+    bind = op.get_bind()
+    duplicated = bind.execute(sa.text(
+        "SELECT DISTINCT session_id FROM conversation_messages "
+        "GROUP BY session_id, turn HAVING COUNT(*) > 1"
+    )).scalars().all()
+    for session_id in duplicated:
+        message_ids = bind.execute(sa.text(
+            "SELECT id FROM conversation_messages WHERE session_id = :session_id ORDER BY turn, id"
+        ), {"session_id": session_id}).scalars().all()
+        for turn, message_id in enumerate(message_ids, 1):
+            bind.execute(sa.text(
+                "UPDATE conversation_messages SET turn = :turn WHERE id = :id"
+            ), {"turn": turn, "id": message_id})
+
+    # 先建唯一约束再删旧索引，session_id上的外键始终有可用索引
+    op.create_unique_constraint('uq_conversation_session_turn', 'conversation_messages', ['session_id', 'turn'])
+    op.drop_index('idx_session_turn', table_name='conversation_messages')
+
+
+def downgrade() -> None:
+    """恢复非唯一的会话turn索引"""
+    op.create_index('idx_session_turn', 'conversation_messages', ['session_id', 'turn'], unique=False)
+    op.drop_constraint('uq_conversation_session_turn', 'conversation_messages', type_='unique')
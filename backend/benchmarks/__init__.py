@@ -0,0 +1,12 @@
+"""
+对话链路基准测试套件
+
+可复现的压测与剖析工具：
+
+- stub_llm: 实现BaseModelAdapter的桩模型适配器，按固定延迟返回确定性的响应
+- fixtures: 按随机种子生成的元数据库（数千张表、字段、关联、字典、知识条目）、
+  本地分析存储中的事实表以及合成问题集
+- harness: 通过ASGI直接驱动API，统计各阶段p50/p95/p99、吞吐、峰值RSS，并与基线比较
+
+命令行入口: python -m benchmarks --help
+"""
@@ -0,0 +1,134 @@
+"""
+基准测试命令行入口
+
+示例（在backend目录下执行）:
+    python -m benchmarks                                   # 默认规模，打印结果
+    python -m benchmarks --output reports/bench.json       # 保存报告
+    python -m benchmarks --baseline benchmarks/baseline.json             # 与基线比较，退化时退出码为1
+    python -m benchmarks --baseline benchmarks/baseline.json --update-baseline  # 更新基线
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# 基准测试使用自建的元数据库，测试模式下导入数据库模块时不会连接生产MySQL
+os.environ.setdefault("TEST_MODE", "true")
+
+from benchmarks.harness import (
+    SCENARIOS,
+    BenchmarkConfig,
+    RegressionThresholds,
+    compare_with_baseline,
+    format_report,
+    run_benchmark
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="对话链路基准测试")
+    parser.add_argument("--tables", type=int, default=defaults.tables, help="元数据表数量")
+    parser.add_argument("--fields-per-table", type=int, default=defaults.fields_per_table, help="每张表的字段数")
+    parser.add_argument("--relations", type=int, default=defaults.relations, help="表关联数量")
+    parser.add_argument("--dictionaries", type=int, default=defaults.dictionaries, help="字典数量")
+    parser.add_argument("--knowledge-items", type=int, default=defaults.knowledge_items, help="知识条目数量")
+    parser.add_argument("--olap-rows", type=int, default=defaults.olap_rows, help="每张事实表的行数")
+    parser.add_argument("--questions", type=int, default=defaults.questions, help="合成问题数量")
+    parser.add_argument("--requests", type=int, default=defaults.requests, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency, help="并发数")
+    parser.add_argument("--warmup", type=int, default=defaults.warmup, help="每个场景的预热请求数")
+    parser.add_argument("--llm-latency-ms", type=float, default=defaults.llm_latency_ms, help="桩模型固定延迟")
+    parser.add_argument("--llm-jitter-ms", type=float, default=defaults.llm_jitter_ms, help="桩模型延迟抖动")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="随机种子")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="执行的场景")
+    parser.add_argument("--database-url", help="元数据库URL（默认临时SQLite文件，数据会被清空重建）")
+    parser.add_argument("--work-dir", help="工作目录（默认临时目录，结束后删除）")
+    parser.add_argument("--output", help="报告输出路径")
+    parser.add_argument("--baseline", help="基线报告路径")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    parser.add_argument("--latency-tolerance", type=float, default=RegressionThresholds.latency, help="延迟增长容忍比例")
+    parser.add_argument("--throughput-tolerance", type=float, default=RegressionThresholds.throughput, help="吞吐下降容忍比例")
+    parser.add_argument("--memory-tolerance", type=float, default=RegressionThresholds.memory, help="峰值RSS增长容忍比例")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出服务日志")
+    return parser.parse_args(argv)
+
+
+def write_json(path: str, data) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # 被测服务的日志量很大，会显著拉低吞吐；错误已按场景汇总在报告的error_samples中
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, force=True)
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    config = BenchmarkConfig(
+        tables=args.tables,
+        fields_per_table=args.fields_per_table,
+        relations=args.relations,
+        dictionaries=args.dictionaries,
+        knowledge_items=args.knowledge_items,
+        olap_rows=args.olap_rows,
+        questions=args.questions,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        warmup=args.warmup,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        seed=args.seed,
+        scenarios=args.scenarios,
+        database_url=args.database_url,
+        work_dir=args.work_dir
+    )
+    report = run_benchmark(config)
+    print(format_report(report))
+
+    if args.output:
+        write_json(args.output, report)
+        print(f"报告已保存: {args.output}")
+
+    exit_code = 0
+    if args.baseline and args.update_baseline:
+        write_json(args.baseline, report)
+        print(f"基线已更新: {args.baseline}")
+    elif args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"基线不存在: {args.baseline}，使用 --update-baseline 创建")
+            return 2
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        thresholds = RegressionThresholds(
+            latency=args.latency_tolerance,
+            throughput=args.throughput_tolerance,
+            memory=args.memory_tolerance
+        )
+        regressions, notes = compare_with_baseline(report, baseline, thresholds)
+        for note in notes:
+            print(f"提示: {note}")
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能退化:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            exit_code = 1
+        else:
+            print("与基线相比未发现性能退化")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+SQL错误分类吞吐基准
+
+模拟两种负载，比较原始的逐个正则匹配与预编译匹配器（含/不含分类缓存）的吞吐：
+
+- storm：数据源宕机等错误风暴，少量不同的错误消息大量重复出现
+- diverse：每条错误消息都不相同（引号中的标识符、主机名、数字各不相同），缓存不起作用
+
+另外比较错误模式学习器按特征哈希查找与线性遍历的耗时。
+
+示例（在backend目录下执行）:
+    python -m benchmarks.error_classifier
+    python -m benchmarks.error_classifier --messages 50000 --distinct 20 --output reports/error_classifier.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.services.sql_error_classifier import ERROR_KEYWORD_RULES, SQLError, SQLErrorClassifier, SQLErrorType
+from src.services.sql_error_learning_service import ErrorPatternLearner
+
+# 错误消息模板：{name} 替换为随机标识符，{n} 替换为随机数字
+MESSAGE_TEMPLATES = (
+    "(pymysql.err.OperationalError) (2003, \"Can't connect to MySQL server on '{name}' ([Errno 111] Connection refused)\")",
+    "(pymysql.err.OperationalError) (1054, \"Unknown column '{name}' in 'field list'\")",
+    "(pymysql.err.ProgrammingError) (1146, \"Table 'analytics.{name}' doesn't exist\")",
+    "(pymysql.err.ProgrammingError) (1064, \"You have an error in your SQL syntax; check the manual near '{name}' at line {n}\")",
+    "(pyodbc.ProgrammingError) ('42S22', \"[SQL Server]Invalid column name '{name}'. (207)\")",
+    "(psycopg2.errors.UndefinedTable) relation \"{name}\" does not exist LINE {n}: SELECT * FROM {name}",
+    "(psycopg2.OperationalError) could not connect to server: Connection timed out after {n} ms",
+    "driver returned an unexpected status {n} while fetching rows for {name}",
+    "query canceled by resource governor {n} for workload {name}",
+)
+
+
+def generate_messages(count: int, distinct: int, seed: int = 42) -> List[str]:
+    """生成错误消息序列，distinct为不同消息的数量（0表示每条都不同）"""
+    rng = random.Random(seed)
+
+    def make_message() -> str:
+        template = rng.choice(MESSAGE_TEMPLATES)
+        return template.format(name=f"obj_{rng.randrange(10 ** 6)}", n=rng.randrange(1, 10 ** 4))
+
+    if distinct <= 0:
+        return [make_message() for _ in range(count)]
+    pool = [make_message() for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def sequential_classify(classifier: SQLErrorClassifier, error_message: str) -> SQLErrorType:
+    """原始实现：逐个模式执行 re.search，未命中时逐组检查关键词"""
+    for pattern in classifier.error_patterns:
+        if re.search(pattern.pattern, error_message, re.IGNORECASE):
+            return pattern.error_type
+    lowered = error_message.lower()
+    for error_type, keywords, _, _, _ in ERROR_KEYWORD_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return error_type
+    return SQLErrorType.UNKNOWN_ERROR
+
+
+def _throughput(messages: List[str], classify: Callable[[str], Any]) -> Dict[str, float]:
+    started = time.perf_counter()
+    for message in messages:
+        classify(message)
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 4),
+        "messages_per_second": round(len(messages) / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def run_classifier_benchmark(messages: List[str]) -> Dict[str, Any]:
+    """对同一组消息分别测量三种实现的吞吐"""
+    legacy_classifier = SQLErrorClassifier()
+    uncached = SQLErrorClassifier(cache_size=0)
+    cached = SQLErrorClassifier()
+
+    # 只测量分类决策本身，不包含创建错误对象和写历史记录的开销
+    results = {
+        "sequential": _throughput(messages, lambda message: sequential_classify(legacy_classifier, message)),
+        "compiled": _throughput(messages, uncached._classify_message),
+        "compiled_cached": _throughput(messages, cached._classify_message),
+    }
+
+    mismatches = sum(
+        1 for message in set(messages)
+        if sequential_classify(legacy_classifier, message) != _decision_type(cached, message)
+    )
+    baseline = results["sequential"]["messages_per_second"] or 1.0
+    for result in results.values():
+        result["speedup"] = round(result["messages_per_second"] / baseline, 2)
+
+    return {
+        "messages": len(messages),
+        "distinct_messages": len(set(messages)),
+        "results": results,
+        "classification_mismatches": mismatches,
+        "cache": cached._classification_cache.get_stats()
+    }
+
+
+def _decision_type(classifier: SQLErrorClassifier, message: str) -> SQLErrorType:
+    decision = classifier._classify_message(message)
+    if decision[0] == "pattern":
+        return classifier.error_patterns[decision[1]].error_type
+    if decision[0] == "keyword":
+        return ERROR_KEYWORD_RULES[decision[1]][0]
+    return SQLErrorType.UNKNOWN_ERROR
+
+
+def run_learner_benchmark(patterns: int, lookups: int, seed: int = 42) -> Dict[str, Any]:
+    """学习器中已有 patterns 个模式时，按特征哈希查找与线性遍历的耗时"""
+    rng = random.Random(seed)
+    learner = ErrorPatternLearner()
+    for index in range(patterns):
+        learner.learn_from_error(SQLError(
+            error_type=SQLErrorType.FIELD_NOT_EXISTS,
+            original_error=f"Unknown column 'c' in 'field list' variant_{index}",
+            error_message="字段不存在",
+            sql_statement="SELECT c FROM t"
+        ), {})
+
+    probes = [
+        {
+            "error_type": SQLErrorType.FIELD_NOT_EXISTS,
+            "error_message_pattern": f"Unknown column '<IDENTIFIER>' in '<IDENTIFIER>' variant_{rng.randrange(patterns * 2)}"
+        }
+        for _ in range(lookups)
+    ]
+
+    def linear(features):
+        for pattern in learner.error_patterns.values():
+            if (pattern.error_type == features["error_type"] and
+                    pattern.pattern_regex == features["error_message_pattern"]):
+                return pattern
+        return None
+
+    results = {
+        "linear": _throughput(probes, linear),
+        "indexed": _throughput(probes, learner._find_matching_pattern),
+    }
+    baseline = results["linear"]["messages_per_second"] or 1.0
+    for result in results.values():
+        result["speedup"] = round(result["messages_per_second"] / baseline, 2)
+    return {"patterns": patterns, "lookups": lookups, "results": results}
+
+
+def run_error_classifier_benchmark(
+    messages: int = 20000,
+    distinct: int = 20,
+    learner_patterns: int = 2000,
+    learner_lookups: int = 5000,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """运行全部错误分类基准"""
+    return {
+        "storm": run_classifier_benchmark(generate_messages(messages, distinct, seed)),
+        "diverse": run_classifier_benchmark(generate_messages(messages, 0, seed)),
+        "learner": run_learner_benchmark(learner_patterns, learner_lookups, seed)
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """格式化为终端表格"""
+    lines = [f"{'负载/实现':<28}{'消息数':>10}{'耗时(s)':>10}{'条/秒':>14}{'加速比':>9}"]
+    for workload in ("storm", "diverse", "learner"):
+        section = report[workload]
+        count = section.get("messages", section.get("lookups"))
+        for name, result in section["results"].items():
+            lines.append(
+                f"{workload + '/' + name:<28}{count:>10}{result['seconds']:>10.3f}"
+                f"{result['messages_per_second']:>14.1f}{result['speedup']:>9.2f}"
+            )
+    for workload in ("storm", "diverse"):
+        lines.append(f"{workload} 分类不一致: {report[workload]['classification_mismatches']}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="SQL错误分类吞吐基准")
+    parser.add_argument("--messages", type=int, default=20000, help="每种负载的错误消息数量")
+    parser.add_argument("--distinct", type=int, default=20, help="错误风暴中不同消息的数量")
+    parser.add_argument("--learner-patterns", type=int, default=2000, help="学习器中已有的模式数量")
+    parser.add_argument("--learner-lookups", type=int, default=5000, help="学习器查找次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", help="报告输出路径")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    report = run_error_classifier_benchmark(
+        messages=args.messages,
+        distinct=args.distinct,
+        learner_patterns=args.learner_patterns,
+        learner_lookups=args.learner_lookups,
+        seed=args.seed
+    )
+    print(format_report(report))
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存: {args.output}")
+
+    mismatches = report["storm"]["classification_mismatches"] + report["diverse"]["classification_mismatches"]
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
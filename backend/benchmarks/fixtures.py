@@ -0,0 +1,330 @@
+"""
+基准测试数据集
+
+按随机种子生成可复现的数据集：
+
+- 元数据库：数据源、数千张表及字段、表关联、数据字典、知识库条目。
+  默认写入临时SQLite文件，也可以指定MySQL兼容的数据库URL
+- 本地分析存储：若干张事实表，供SQL执行阶段查询
+- 合成问题集：由表名、字段名和业务词汇组合的问数/报告问题及对应SQL
+"""
+
+import os
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database_engine import Base
+from src.models.data_source_model import DataSource
+from src.models.data_preparation_model import DataTable, TableField, Dictionary, DictionaryItem, TableRelation
+from src.models.knowledge_base_model import KnowledgeBase
+from src.models.knowledge_item_model import KnowledgeItem
+from src.services.local_olap_store import LocalOLAPStore
+
+# 业务域：英文词干用于表名，中文用于描述和问题
+DOMAINS: List[Tuple[str, str]] = [
+    ("order", "订单"), ("user", "用户"), ("product", "商品"), ("store", "门店"),
+    ("inventory", "库存"), ("refund", "退款"), ("member", "会员"), ("supplier", "供应商"),
+    ("warehouse", "仓库"), ("channel", "渠道"), ("logistics", "物流"), ("payment", "支付"),
+    ("coupon", "优惠券"), ("review", "评价"), ("campaign", "营销活动"), ("finance", "财务"),
+    ("employee", "员工"), ("region", "区域")
+]
+
+TABLE_KINDS: List[Tuple[str, str]] = [
+    ("fact", "事实"), ("dim", "维度"), ("daily", "日汇总"), ("detail", "明细"), ("snapshot", "快照")
+]
+
+# 字段池：(字段名, 中文名, 类型)
+FIELD_POOL: List[Tuple[str, str, str]] = [
+    ("amount", "金额", "DECIMAL"), ("quantity", "数量", "INT"), ("price", "单价", "DECIMAL"),
+    ("status", "状态", "VARCHAR"), ("region_code", "区域编码", "VARCHAR"), ("channel_code", "渠道编码", "VARCHAR"),
+    ("user_id", "用户ID", "VARCHAR"), ("product_id", "商品ID", "VARCHAR"), ("store_id", "门店ID", "VARCHAR"),
+    ("created_at", "创建时间", "DATETIME"), ("updated_at", "更新时间", "DATETIME"), ("stat_date", "统计日期", "DATE"),
+    ("discount", "优惠金额", "DECIMAL"), ("cost", "成本", "DECIMAL"), ("level", "等级", "VARCHAR"),
+    ("category", "类目", "VARCHAR"), ("score", "评分", "DECIMAL"), ("remark", "备注", "TEXT")
+]
+
+# 本地分析存储中事实表的维度取值
+OLAP_DIMENSIONS = {
+    "region_code": ["east", "south", "west", "north", "central"],
+    "channel_code": ["app", "web", "store", "partner"],
+    "status": ["paid", "shipped", "finished", "refunded"]
+}
+
+QUESTION_TEMPLATES: List[Tuple[str, str, str]] = [
+    ("query", "查询各区域的{domain}{metric}总和", "SELECT region_code, SUM({metric}) AS total FROM {table} GROUP BY region_code"),
+    ("query", "统计最近{days}天各渠道的{domain}数量", "SELECT channel_code, COUNT(*) AS cnt FROM {table} WHERE stat_day <= {days} GROUP BY channel_code"),
+    ("query", "{domain}{metric}最高的前{top}条记录", "SELECT * FROM {table} ORDER BY {metric} DESC LIMIT {top}"),
+    ("query", "按状态查看{domain}的平均{metric}", "SELECT status, AVG({metric}) AS avg_value FROM {table} GROUP BY status"),
+    ("report", "生成{domain}{period}经营分析报告", "SELECT region_code, channel_code, SUM({metric}) AS total FROM {table} GROUP BY region_code, channel_code"),
+]
+
+METRICS: List[Tuple[str, str]] = [("amount", "金额"), ("quantity", "数量"), ("cost", "成本")]
+PERIODS = ["月度", "季度", "年度", "周度"]
+
+
+@dataclass
+class BenchmarkQuestion:
+    """合成问题"""
+    text: str
+    intent: str
+    sql: str
+    table_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BenchmarkDataset:
+    """基准测试数据集"""
+    engine: Engine
+    session_factory: Any
+    database_url: str
+    seed: int
+    data_source_id: str
+    file_source_id: str
+    table_ids_by_domain: Dict[str, List[str]]
+    olap_tables: Dict[str, str]
+    counts: Dict[str, int]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "database_url": self.database_url.split('@')[-1],
+            "seed": self.seed,
+            **self.counts
+        }
+
+
+def _make_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128)))
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int = 2000):
+    """按批次切分，并补齐缺失的列（executemany要求每行的列一致）"""
+    columns = set().union(*rows) if rows else set()
+    for i in range(0, len(rows), size):
+        yield [{column: row.get(column) for column in columns} for row in rows[i:i + size]]
+
+
+def build_metadata_database(
+    database_url: str,
+    tables: int = 2000,
+    fields_per_table: int = 8,
+    relations: int = 1000,
+    dictionaries: int = 100,
+    items_per_dictionary: int = 10,
+    knowledge_items: int = 2000,
+    seed: int = 42,
+    created_by: str = "benchmark"
+) -> BenchmarkDataset:
+    """
+    创建并填充元数据库
+
+    Args:
+        database_url: 数据库URL（SQLite或MySQL兼容），已有的同名表会被清空重建
+        tables: 表数量
+        fields_per_table: 每张表的字段数（不含主键）
+        relations: 表关联数量
+        dictionaries: 字典数量
+        items_per_dictionary: 每个字典的字典项数量
+        knowledge_items: 知识条目数量
+        seed: 随机种子
+        created_by: 创建人
+
+    Returns:
+        BenchmarkDataset: 数据集描述
+    """
+    rng = random.Random(seed)
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    data_source_id = _make_id(rng)
+    file_source_id = _make_id(rng)
+    data_source_rows = [
+        {"id": data_source_id, "name": "基准业务库", "source_type": "DATABASE", "db_type": "MySQL",
+         "host": "127.0.0.1", "port": 3306, "database_name": "benchmark", "status": True, "created_by": created_by},
+        {"id": file_source_id, "name": "基准上传文件", "source_type": "FILE", "status": True, "created_by": created_by}
+    ]
+
+    # 字典：字段按名称关联到同名字典
+    dictionary_rows, dictionary_item_rows = [], []
+    dictionary_ids_by_field: Dict[str, str] = {}
+    dictionary_fields = [name for name, _, data_type in FIELD_POOL if data_type == "VARCHAR"]
+    for i in range(dictionaries):
+        dictionary_id = _make_id(rng)
+        field_name = dictionary_fields[i % len(dictionary_fields)]
+        dictionary_ids_by_field.setdefault(field_name, dictionary_id)
+        dictionary_rows.append({
+            "id": dictionary_id, "code": f"dict_{field_name}_{i:04d}", "name": f"{field_name}字典{i}",
+            "dict_type": "static", "status": True, "created_by": created_by
+        })
+        for j in range(items_per_dictionary):
+            dictionary_item_rows.append({
+                "id": _make_id(rng), "dictionary_id": dictionary_id, "item_key": f"k{j}",
+                "item_value": f"{field_name}取值{j}", "sort_order": j, "status": True, "created_by": created_by
+            })
+
+    table_rows, field_rows = [], []
+    table_ids_by_domain: Dict[str, List[str]] = {}
+    fields_by_table: Dict[str, List[str]] = {}
+    for i in range(tables):
+        domain, domain_cn = DOMAINS[i % len(DOMAINS)]
+        kind, kind_cn = TABLE_KINDS[rng.randrange(len(TABLE_KINDS))]
+        table_id = _make_id(rng)
+        table_ids_by_domain.setdefault(domain, []).append(table_id)
+        table_rows.append({
+            "id": table_id, "data_source_id": data_source_id, "table_name": f"{domain}_{kind}_{i:04d}",
+            "display_name": f"{domain_cn}{kind_cn}表{i}", "description": f"{domain_cn}{kind_cn}数据，第{i}张",
+            "data_mode": "DIRECT_QUERY", "status": True, "field_count": fields_per_table + 1,
+            "row_count": rng.randint(1000, 5_000_000), "created_by": created_by
+        })
+
+        field_ids = [_make_id(rng)]
+        field_rows.append({
+            "id": field_ids[0], "table_id": table_id, "field_name": "id", "display_name": "主键",
+            "data_type": "BIGINT", "is_primary_key": True, "is_nullable": False, "sort_order": 0
+        })
+        for order, (name, name_cn, data_type) in enumerate(rng.sample(FIELD_POOL, min(fields_per_table, len(FIELD_POOL))), 1):
+            field_id = _make_id(rng)
+            field_ids.append(field_id)
+            field_rows.append({
+                "id": field_id, "table_id": table_id, "field_name": name, "display_name": name_cn,
+                "data_type": data_type, "description": f"{domain_cn}{name_cn}",
+                "dictionary_id": dictionary_ids_by_field.get(name), "sort_order": order
+            })
+        fields_by_table[table_id] = field_ids
+
+    table_ids = [row["id"] for row in table_rows]
+    relation_rows = []
+    for i in range(min(relations, max(len(table_ids) - 1, 0))):
+        primary_id, foreign_id = rng.sample(table_ids, 2)
+        relation_rows.append({
+            "id": _make_id(rng), "relation_name": f"rel_{i:05d}",
+            "primary_table_id": primary_id, "primary_field_id": fields_by_table[primary_id][0],
+            "foreign_table_id": foreign_id, "foreign_field_id": rng.choice(fields_by_table[foreign_id][1:] or fields_by_table[foreign_id]),
+            "join_type": "LEFT", "status": True, "created_by": created_by
+        })
+
+    knowledge_base_rows, knowledge_item_rows = [], []
+    knowledge_base_ids = {}
+    for knowledge_type in ("TERM", "LOGIC", "EVENT"):
+        knowledge_base_ids[knowledge_type] = _make_id(rng)
+        knowledge_base_rows.append({
+            "id": knowledge_base_ids[knowledge_type], "name": f"基准{knowledge_type}知识库",
+            "type": knowledge_type, "scope": "GLOBAL", "status": True
+        })
+    for i in range(knowledge_items):
+        knowledge_type = ("TERM", "LOGIC", "EVENT")[i % 3]
+        domain, domain_cn = DOMAINS[rng.randrange(len(DOMAINS))]
+        metric, metric_cn = METRICS[rng.randrange(len(METRICS))]
+        knowledge_item_rows.append({
+            "id": _make_id(rng), "knowledge_base_id": knowledge_base_ids[knowledge_type], "type": knowledge_type,
+            "name": f"{domain_cn}{metric_cn}口径{i}" if knowledge_type == "TERM" else None,
+            "explanation": f"{domain_cn}{metric_cn}按{rng.choice(PERIODS)}统计，剔除{rng.choice(['测试', '退款', '作废'])}数据",
+            "example_question": f"{domain_cn}的{metric_cn}是多少" if knowledge_type != "EVENT" else None
+        })
+
+    with engine.begin() as connection:
+        for model, rows in (
+            (DataSource, data_source_rows), (Dictionary, dictionary_rows), (DictionaryItem, dictionary_item_rows),
+            (DataTable, table_rows), (TableField, field_rows), (TableRelation, relation_rows),
+            (KnowledgeBase, knowledge_base_rows), (KnowledgeItem, knowledge_item_rows)
+        ):
+            for chunk in _chunks(rows):
+                connection.execute(insert(model), chunk)
+
+    return BenchmarkDataset(
+        engine=engine,
+        session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        database_url=database_url,
+        seed=seed,
+        data_source_id=data_source_id,
+        file_source_id=file_source_id,
+        table_ids_by_domain=table_ids_by_domain,
+        olap_tables={},
+        counts={
+            "tables": len(table_rows),
+            "fields": len(field_rows),
+            "relations": len(relation_rows),
+            "dictionaries": len(dictionary_rows),
+            "dictionary_items": len(dictionary_item_rows),
+            "knowledge_items": len(knowledge_item_rows)
+        }
+    )
+
+
+def build_olap_tables(
+    dataset: BenchmarkDataset,
+    store: LocalOLAPStore,
+    rows_per_table: int = 50000,
+    domains: int = 6
+) -> Dict[str, str]:
+    """
+    在本地分析存储中为前若干个业务域各生成一张事实表
+
+    Returns:
+        Dict[str, str]: 业务域 -> 事实表名
+    """
+    np_rng = np.random.default_rng(dataset.seed)
+    olap_tables = {}
+    for domain, _ in DOMAINS[:domains]:
+        table_name = f"{domain}_fact"
+        df = pd.DataFrame({
+            "id": np.arange(rows_per_table),
+            "region_code": np_rng.choice(OLAP_DIMENSIONS["region_code"], rows_per_table),
+            "channel_code": np_rng.choice(OLAP_DIMENSIONS["channel_code"], rows_per_table),
+            "status": np_rng.choice(OLAP_DIMENSIONS["status"], rows_per_table),
+            "stat_day": np_rng.integers(1, 366, rows_per_table),
+            "amount": np.round(np_rng.gamma(2.0, 150.0, rows_per_table), 2),
+            "quantity": np_rng.integers(1, 20, rows_per_table),
+            "cost": np.round(np_rng.gamma(2.0, 80.0, rows_per_table), 2)
+        })
+        store.ingest_dataframe(dataset.file_source_id, table_name, df)
+        olap_tables[domain] = table_name
+    dataset.olap_tables = olap_tables
+    return olap_tables
+
+
+def generate_questions(dataset: BenchmarkDataset, count: int = 200, seed: Optional[int] = None) -> List[BenchmarkQuestion]:
+    """
+    生成合成问题集
+
+    问题的业务域限定在本地分析存储中有事实表的域内，保证SQL可以执行；
+    table_ids取该域的若干张元数据表，供语义上下文聚合使用。
+    """
+    rng = random.Random(dataset.seed if seed is None else seed)
+    domain_names = dict(DOMAINS)
+    domains = list(dataset.olap_tables) or [name for name, _ in DOMAINS]
+    questions = []
+    for _ in range(count):
+        domain = rng.choice(domains)
+        intent, text_template, sql_template = rng.choice(QUESTION_TEMPLATES)
+        metric, metric_cn = rng.choice(METRICS)
+        values = {
+            "domain": domain_names[domain],
+            "metric": metric,
+            "days": rng.choice([7, 30, 90]),
+            "top": rng.choice([10, 20, 50]),
+            "period": rng.choice(PERIODS),
+            "table": dataset.olap_tables.get(domain, f"{domain}_fact")
+        }
+        candidates = dataset.table_ids_by_domain.get(domain, [])
+        questions.append(BenchmarkQuestion(
+            text=text_template.format(**{**values, "metric": metric_cn}),
+            intent=intent,
+            sql=sql_template.format(**values),
+            table_ids=rng.sample(candidates, min(3, len(candidates)))
+        ))
+    return questions
+
+
+def default_database_url(work_dir: str) -> str:
+    """默认的SQLite元数据库文件"""
+    return f"sqlite:///{os.path.join(work_dir, 'benchmark_metadata.db')}"
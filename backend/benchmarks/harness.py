@@ -0,0 +1,646 @@
+"""
+基准测试执行器
+
+在进程内构建只包含被测路由的FastAPI应用，通过ASGI传输直接驱动HTTP请求（不经过网络），
+用包装方法的方式记录各服务阶段的耗时，输出：
+
+- 每个场景的端到端延迟 p50/p95/p99、吞吐（请求/秒）、错误率
+- 每个阶段的延迟分布
+- 进程峰值RSS
+
+报告为JSON，可与已保存的基线报告比较，超过阈值的退化会被列出。
+"""
+
+import asyncio
+import functools
+import importlib
+import inspect
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from benchmarks.fixtures import (
+    BenchmarkDataset,
+    BenchmarkQuestion,
+    build_metadata_database,
+    build_olap_tables,
+    default_database_url,
+    generate_questions
+)
+from benchmarks.stub_llm import StubModelAdapter, install_stub_adapters
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖：psutil用于采样RSS，缺失时退化为getrusage的峰值
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+REPORT_VERSION = 1
+
+SCENARIOS = ("intent", "semantic_context", "sql_execute", "pipeline", "chat")
+
+# 阶段埋点：(模块, 类, 方法, 阶段名)。方法不存在时跳过
+DEFAULT_STAGE_HOOKS: List[Tuple[str, str, str, str]] = [
+    ("benchmarks.stub_llm", "StubModelAdapter", "generate", "llm.generate"),
+    ("src.services.intent_recognition_service", "IntentRecognitionService", "identify_intent", "intent.total"),
+    ("src.services.intent_recognition_service", "IntentRecognitionService", "_try_fast_path", "intent.fast_path"),
+    ("src.services.intent_recognition_service", "IntentRecognitionService", "_build_intent_prompt", "intent.build_prompt"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "aggregate_semantic_context", "context.total"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_initialize_semantic_modules", "context.init_modules"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_calculate_module_relevance", "context.relevance"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_optimize_context_selection", "context.optimize"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_load_selected_modules", "context.load_modules"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_pack_context_items", "context.pack"),
+    ("src.services.semantic_context_aggregator", "SemanticContextAggregator", "_generate_aggregated_context", "context.render"),
+    ("src.services.sql_executor_service", "SQLExecutorService", "execute_query", "sql.total"),
+    ("src.services.sql_executor_service", "SQLExecutorService", "_apply_cost_check", "sql.cost_check"),
+    ("src.services.sql_executor_service", "SQLExecutorService", "_execute_with_timeout", "sql.execute"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_recognize_intent", "chat.intent"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_select_tables", "chat.table_selection"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_generate_sql", "chat.sql_generation"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_check_query_cost", "chat.cost_check"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_execute_sql", "chat.sql_execution"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_analyze_data", "chat.analysis"),
+    ("src.services.chat_orchestrator", "ChatOrchestrator", "_present_results", "chat.presentation"),
+]
+
+
+def summarize_latencies(values_ms: List[float]) -> Dict[str, float]:
+    """计算延迟分布（毫秒）"""
+    if not values_ms:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    data = np.asarray(values_ms, dtype=float)
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {
+        "count": int(data.size),
+        "mean": round(float(data.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(data.max()), 3)
+    }
+
+
+class StageProfiler:
+    """通过包装类方法记录各阶段耗时"""
+
+    def __init__(self):
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+        self._patches: List[Tuple[type, str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, elapsed_ms: float):
+        with self._lock:
+            self._samples[stage].append(elapsed_ms)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {stage: summarize_latencies(values) for stage, values in sorted(samples.items())}
+
+    def instrument(self, owner: type, attr: str, stage: str) -> bool:
+        """包装owner.attr，返回是否成功"""
+        original = owner.__dict__.get(attr)
+        if original is None or not callable(original):
+            logger.warning(f"阶段埋点跳过，方法不存在: {owner.__name__}.{attr}")
+            return False
+
+        profiler = self
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    profiler.record(stage, (time.perf_counter() - started) * 1000)
+        else:
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    profiler.record(stage, (time.perf_counter() - started) * 1000)
+
+        setattr(owner, attr, wrapper)
+        self._patches.append((owner, attr, original))
+        return True
+
+    def instrument_defaults(self, hooks: List[Tuple[str, str, str, str]] = None):
+        for module_name, class_name, attr, stage in hooks or DEFAULT_STAGE_HOOKS:
+            owner = getattr(importlib.import_module(module_name), class_name, None)
+            if owner is None:
+                logger.warning(f"阶段埋点跳过，类不存在: {module_name}.{class_name}")
+                continue
+            self.instrument(owner, attr, stage)
+
+    def restore(self):
+        """恢复所有被包装的方法"""
+        while self._patches:
+            owner, attr, original = self._patches.pop()
+            setattr(owner, attr, original)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.restore()
+
+
+class MemorySampler:
+    """后台线程采样进程RSS，记录峰值"""
+
+    def __init__(self, interval_seconds: float = 0.05):
+        self.interval_seconds = interval_seconds
+        self.peak_rss_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = psutil.Process(os.getpid()) if PSUTIL_AVAILABLE else None
+
+    def sample(self) -> int:
+        if self._process is not None:
+            rss = self._process.memory_info().rss
+        else:
+            # Linux下ru_maxrss单位为KB，macOS下为字节
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss = maxrss if sys.platform == "darwin" else maxrss * 1024
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="benchmark-rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+        return self.peak_rss_bytes
+
+    @property
+    def peak_rss_mb(self) -> float:
+        return round(self.peak_rss_bytes / (1024 * 1024), 2)
+
+
+@dataclass
+class BenchmarkConfig:
+    """基准测试配置"""
+    tables: int = 2000
+    fields_per_table: int = 8
+    relations: int = 1000
+    dictionaries: int = 100
+    knowledge_items: int = 2000
+    olap_rows: int = 50000
+    questions: int = 200
+    requests: int = 200
+    concurrency: int = 16
+    warmup: int = 10
+    llm_latency_ms: float = 50.0
+    llm_jitter_ms: float = 20.0
+    seed: int = 42
+    scenarios: List[str] = field(default_factory=lambda: list(SCENARIOS))
+    database_url: Optional[str] = None
+    work_dir: Optional[str] = None
+
+    def workload(self) -> Dict[str, Any]:
+        """影响结果可比性的配置项"""
+        data = asdict(self)
+        data.pop("database_url")
+        data.pop("work_dir")
+        return data
+
+
+@dataclass
+class ScenarioResult:
+    """单个场景的结果"""
+    name: str
+    requests: int
+    errors: int
+    duration_seconds: float
+    latencies_ms: List[float]
+    stages: Dict[str, Dict[str, float]]
+    error_samples: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "rps": round(self.requests / self.duration_seconds, 2) if self.duration_seconds > 0 else 0.0,
+            "latency_ms": summarize_latencies(self.latencies_ms),
+            "stages": self.stages,
+            "error_samples": self.error_samples
+        }
+
+
+class BenchmarkEnvironment:
+    """
+    被测环境：数据集、桩模型、被测服务实例和进程内应用
+
+    进入上下文时绑定数据库会话工厂、本地分析存储和桩模型，退出时全部恢复。
+    """
+
+    def __init__(self, dataset: BenchmarkDataset, olap_store, stub: StubModelAdapter):
+        self.dataset = dataset
+        self.olap_store = olap_store
+        self.stub = stub
+        self._restore: List[Callable[[], None]] = []
+        self.app: Optional[FastAPI] = None
+
+    def __enter__(self):
+        from src import database
+        from src.services import local_olap_store, ai_model_service
+        from src.services.ai_model_service import init_ai_service
+        from src.services.chat_orchestrator import get_chat_orchestrator
+        from src.services.intent_fast_path import IntentFastPath
+        from src.services.intent_recognition_service import IntentRecognitionService
+        from src.services.sql_executor_service import SQLExecutorService
+
+        # 服务内部直接调用get_db()的路径也使用基准数据库
+        previous_bind = database.SessionLocal.kw.get("bind")
+        database.SessionLocal.configure(bind=self.dataset.engine)
+        self._restore.append(lambda: database.SessionLocal.configure(bind=previous_bind))
+
+        previous_store = local_olap_store._local_olap_store
+        local_olap_store._local_olap_store = self.olap_store
+        self._restore.append(lambda: setattr(local_olap_store, "_local_olap_store", previous_store))
+
+        previous_ai_service = ai_model_service._ai_service
+        ai_service = init_ai_service({"qwen_cloud": {"api_key": "benchmark"}, "openai_local": {"api_key": "benchmark"}})
+        install_stub_adapters(ai_service, self.stub)
+        self._restore.append(lambda: setattr(ai_model_service, "_ai_service", previous_ai_service))
+
+        file_source_id = self.dataset.file_source_id
+
+        class EmbeddedExecutorService(SQLExecutorService):
+            """把请求中的数据源配置替换为基准事实表所在的本地分析存储"""
+
+            async def execute_query(self, sql, data_source_config, use_cache=True, stream=False):
+                return await super().execute_query(
+                    sql, {"type": "embedded", "database": file_source_id}, use_cache, stream
+                )
+
+        self.executor = EmbeddedExecutorService()
+        self.intent_service = IntentRecognitionService(fast_path=IntentFastPath())
+
+        orchestrator = get_chat_orchestrator()
+        previous_orchestrator_state = (orchestrator.ai_service.adapters.copy(), orchestrator.sql_executor)
+        install_stub_adapters(orchestrator.ai_service, self.stub)
+        orchestrator.sql_executor = self.executor
+
+        def restore_orchestrator():
+            orchestrator.ai_service.adapters = previous_orchestrator_state[0]
+            orchestrator.sql_executor = previous_orchestrator_state[1]
+        self._restore.append(restore_orchestrator)
+
+        self.app = self.build_app()
+        return self
+
+    def __exit__(self, *exc):
+        while self._restore:
+            self._restore.pop()()
+
+    def build_app(self) -> FastAPI:
+        """只挂载被测路由，避免导入完整应用的全部依赖"""
+        from src.api import chat_orchestrator_api, intent_recognition_api, semantic_context_aggregator_api, sql_executor_api
+        from src.database import get_db
+
+        session_factory = self.dataset.session_factory
+
+        def get_benchmark_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI(title="ChatBI Benchmark")
+        for module in (chat_orchestrator_api, intent_recognition_api, semantic_context_aggregator_api, sql_executor_api):
+            app.include_router(module.router)
+        app.dependency_overrides[get_db] = get_benchmark_db
+        app.dependency_overrides[intent_recognition_api.get_intent_service] = lambda: self.intent_service
+        app.dependency_overrides[sql_executor_api.get_executor_service] = lambda: self.executor
+        return app
+
+
+def _check_response(response: httpx.Response) -> Optional[str]:
+    """返回错误描述，成功时返回None"""
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}: {response.text[:200]}"
+    body = response.json()
+    if isinstance(body, dict) and body.get("success") is False:
+        data = body.get("data") if isinstance(body.get("data"), dict) else {}
+        detail = f"{data.get('stage', '')} {data.get('error', '')}".strip() or body.get("message")
+        return f"success=false: {str(detail)[:200]}"
+    return None
+
+
+async def _call_intent(client: httpx.AsyncClient, question: BenchmarkQuestion, index: int) -> Optional[str]:
+    response = await client.post("/api/intent/recognize", json={"user_question": question.text})
+    return _check_response(response)
+
+
+async def _call_semantic_context(client: httpx.AsyncClient, question: BenchmarkQuestion, index: int) -> Optional[str]:
+    response = await client.post("/api/semantic-context/aggregate", json={
+        "user_question": question.text,
+        "table_ids": question.table_ids
+    })
+    return _check_response(response)
+
+
+async def _call_sql_execute(client: httpx.AsyncClient, question: BenchmarkQuestion, index: int) -> Optional[str]:
+    response = await client.post("/api/sql-executor/execute", json={
+        "sql": question.sql,
+        "data_source_id": 1,
+        "use_cache": False,
+        "max_rows": 1000
+    })
+    return _check_response(response)
+
+
+async def _call_chat(client: httpx.AsyncClient, question: BenchmarkQuestion, index: int) -> Optional[str]:
+    response = await client.post(f"/api/chat/start/bench-{index}", params={"user_question": question.text})
+    return _check_response(response)
+
+
+SCENARIO_CALLS = {
+    "intent": _call_intent,
+    "semantic_context": _call_semantic_context,
+    "sql_execute": _call_sql_execute,
+    "chat": _call_chat
+}
+
+
+def _make_pipeline_call(profiler: StageProfiler):
+    """问数链路：意图识别 -> 语义上下文聚合 -> SQL执行，依次调用各阶段API"""
+
+    async def call(client: httpx.AsyncClient, question: BenchmarkQuestion, index: int) -> Optional[str]:
+        for stage in ("intent", "semantic_context", "sql_execute"):
+            started = time.perf_counter()
+            error = await SCENARIO_CALLS[stage](client, question, index)
+            profiler.record(f"pipeline.{stage}", (time.perf_counter() - started) * 1000)
+            if error:
+                return f"{stage}: {error}"
+        return None
+
+    return call
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    call: Callable,
+    questions: List[BenchmarkQuestion],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    profiler: StageProfiler
+) -> ScenarioResult:
+    """以固定并发执行一个场景"""
+    for i in range(min(warmup, requests)):
+        await call(client, questions[i % len(questions)], -1 - i)
+    profiler.reset()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                error = await call(client, questions[index % len(questions)], index)
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)[:200]}"
+            latencies.append((time.perf_counter() - started) * 1000)
+            if error:
+                errors.append(error)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    duration = time.perf_counter() - started
+
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        errors=len(errors),
+        duration_seconds=duration,
+        latencies_ms=latencies,
+        stages=profiler.summary(),
+        error_samples=sorted(set(errors))[:5]
+    )
+
+
+async def _run_scenarios(env: BenchmarkEnvironment, config: BenchmarkConfig, questions, profiler) -> Dict[str, Any]:
+    results = {}
+    transport = httpx.ASGITransport(app=env.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120.0) as client:
+        for name in config.scenarios:
+            call = _make_pipeline_call(profiler) if name == "pipeline" else SCENARIO_CALLS[name]
+            logger.info(f"开始场景: {name}")
+            result = await run_scenario(
+                client, name, call, questions, config.requests, config.concurrency, config.warmup, profiler
+            )
+            results[name] = result.to_dict()
+    return results
+
+
+def run_benchmark(config: BenchmarkConfig) -> Dict[str, Any]:
+    """
+    执行基准测试
+
+    Returns:
+        Dict[str, Any]: 基准报告
+    """
+    from src.services.local_olap_store import LocalOLAPStore
+
+    unknown = [name for name in config.scenarios if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"未知场景: {unknown}，可选: {list(SCENARIOS)}")
+
+    temp_dir = None
+    work_dir = config.work_dir
+    if work_dir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="chatbi-bench-")
+        work_dir = temp_dir.name
+
+    sampler = MemorySampler()
+    sampler.start()
+    try:
+        setup_started = time.perf_counter()
+        dataset = build_metadata_database(
+            config.database_url or default_database_url(work_dir),
+            tables=config.tables,
+            fields_per_table=config.fields_per_table,
+            relations=config.relations,
+            dictionaries=config.dictionaries,
+            knowledge_items=config.knowledge_items,
+            seed=config.seed
+        )
+        olap_store = LocalOLAPStore(storage_dir=os.path.join(work_dir, "olap"))
+        build_olap_tables(dataset, olap_store, rows_per_table=config.olap_rows)
+        questions = generate_questions(dataset, config.questions)
+        setup_seconds = time.perf_counter() - setup_started
+
+        stub = StubModelAdapter({
+            "latency_ms": config.llm_latency_ms,
+            "jitter_ms": config.llm_jitter_ms,
+            "seed": config.seed
+        })
+        with StageProfiler() as profiler, BenchmarkEnvironment(dataset, olap_store, stub) as env:
+            profiler.instrument_defaults()
+            scenarios = asyncio.run(_run_scenarios(env, config, questions, profiler))
+
+        dataset.engine.dispose()
+    finally:
+        sampler.stop()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    return {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "olap_engine": olap_store.engine
+        },
+        "config": config.workload(),
+        "dataset": dataset.describe(),
+        "setup_seconds": round(setup_seconds, 3),
+        "scenarios": scenarios,
+        "llm": stub.get_statistics(),
+        "peak_rss_mb": sampler.peak_rss_mb
+    }
+
+
+@dataclass
+class RegressionThresholds:
+    """退化判定阈值"""
+    latency: float = 0.20               # 延迟增长比例
+    throughput: float = 0.15            # 吞吐下降比例
+    memory: float = 0.25                # 峰值RSS增长比例
+    error_rate: float = 0.01            # 错误率增加的绝对值
+    min_latency_delta_ms: float = 5.0   # 延迟增长的最小绝对值，过滤毫秒级阶段的噪声
+
+
+@dataclass
+class Regression:
+    """一项退化"""
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return (self.current - self.baseline) / self.baseline if self.baseline else float("inf")
+
+    def __str__(self) -> str:
+        return f"{self.scenario}.{self.metric}: {self.baseline} -> {self.current} ({self.change:+.1%})"
+
+
+def compare_with_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    thresholds: RegressionThresholds = None
+) -> Tuple[List[Regression], List[str]]:
+    """
+    与基线报告比较
+
+    Returns:
+        (退化列表, 提示信息列表)。两份报告的负载配置不同时结果仅供参考，会在提示中说明
+    """
+    thresholds = thresholds or RegressionThresholds()
+    regressions: List[Regression] = []
+    notes: List[str] = []
+
+    if report.get("config") != baseline.get("config"):
+        changed = sorted(
+            key for key in set(report.get("config", {})) | set(baseline.get("config", {}))
+            if report.get("config", {}).get(key) != baseline.get("config", {}).get(key)
+        )
+        notes.append(f"负载配置与基线不同: {changed}")
+
+    def check_latency(scenario: str, metric: str, base: Dict[str, float], current: Dict[str, float]):
+        for percentile in ("p50", "p95", "p99"):
+            if percentile not in base or percentile not in current:
+                continue
+            delta = current[percentile] - base[percentile]
+            if delta > thresholds.min_latency_delta_ms and current[percentile] > base[percentile] * (1 + thresholds.latency):
+                regressions.append(Regression(scenario, f"{metric}.{percentile}", base[percentile], current[percentile]))
+
+    for name, base in baseline.get("scenarios", {}).items():
+        current = report.get("scenarios", {}).get(name)
+        if current is None:
+            notes.append(f"场景 {name} 不在本次报告中")
+            continue
+        check_latency(name, "latency_ms", base["latency_ms"], current["latency_ms"])
+        if current["rps"] < base["rps"] * (1 - thresholds.throughput):
+            regressions.append(Regression(name, "rps", base["rps"], current["rps"]))
+        if current["error_rate"] > base["error_rate"] + thresholds.error_rate:
+            regressions.append(Regression(name, "error_rate", base["error_rate"], current["error_rate"]))
+        for stage, base_stage in base.get("stages", {}).items():
+            current_stage = current.get("stages", {}).get(stage)
+            if current_stage:
+                check_latency(name, f"stages.{stage}", base_stage, current_stage)
+
+    base_rss, current_rss = baseline.get("peak_rss_mb"), report.get("peak_rss_mb")
+    if base_rss and current_rss and current_rss > base_rss * (1 + thresholds.memory):
+        regressions.append(Regression("process", "peak_rss_mb", base_rss, current_rss))
+
+    return regressions, notes
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """格式化为终端表格"""
+    lines = [
+        f"数据集: {report['dataset']}",
+        f"准备耗时: {report['setup_seconds']}s  峰值RSS: {report['peak_rss_mb']}MB  模型调用: {report['llm']['calls']}",
+        ""
+    ]
+    header = f"{'场景/阶段':<36}{'次数':>8}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}{'rps':>9}{'错误率':>8}"
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        lines.append(header)
+        lines.append(
+            f"{name:<36}{result['requests']:>8}{latency['p50']:>11.2f}{latency['p95']:>11.2f}{latency['p99']:>11.2f}"
+            f"{result['rps']:>9.1f}{result['error_rate']:>8.1%}"
+        )
+        for stage, stats in result["stages"].items():
+            lines.append(f"  {stage:<34}{stats['count']:>8}{stats['p50']:>11.2f}{stats['p95']:>11.2f}{stats['p99']:>11.2f}")
+        for sample in result["error_samples"]:
+            lines.append(f"  ! {sample}")
+        lines.append("")
+    return "\n".join(lines)
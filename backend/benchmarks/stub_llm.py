@@ -0,0 +1,153 @@
+"""
+桩模型适配器
+
+实现BaseModelAdapter接口，不访问网络，按Prompt类型返回确定性的响应：
+
+- 意图识别Prompt：问题中包含“报告”时返回report，否则返回query
+- 选表Prompt：返回Prompt中出现的前几个候选表名
+- 其他Prompt：返回针对首个候选表的SQL代码块
+
+延迟由固定值加按随机种子生成的抖动组成，保证多次运行的负载一致。
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.services.ai_model_service import (
+    AIModelService,
+    BaseModelAdapter,
+    ModelResponse,
+    ModelType
+)
+
+_QUESTION_PATTERN = re.compile(r'用户问题[:：]\s*(.+)')
+_DEFAULT_TABLE_PATTERN = r'\b[a-z]+_[a-z]+_\d{4}\b'
+
+
+class StubModelAdapter(BaseModelAdapter):
+    """确定性的桩模型适配器"""
+
+    def __init__(self, config: Dict[str, Any] = None):
+        """
+        初始化桩适配器
+
+        Args:
+            config: 配置项
+                - latency_ms: 每次调用的固定延迟（毫秒），默认50
+                - jitter_ms: 延迟抖动上限（毫秒），默认0
+                - seed: 抖动的随机种子，默认42
+                - table_pattern: 从Prompt中识别候选表名的正则
+                - max_tables: 选表响应最多返回的表数，默认3
+        """
+        config = dict(config or {})
+        config.setdefault('retry_count', 0)
+        super().__init__(config)
+        self.model_type = ModelType.QWEN_CLOUD
+        self.latency_ms = float(config.get('latency_ms', 50.0))
+        self.jitter_ms = float(config.get('jitter_ms', 0.0))
+        self.max_tables = int(config.get('max_tables', 3))
+        self.table_pattern = re.compile(config.get('table_pattern', _DEFAULT_TABLE_PATTERN))
+        self._random = random.Random(config.get('seed', 42))
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "prompt_chars": 0,
+            "calls_by_kind": {}
+        }
+
+    async def generate(self, prompt: str, **kwargs) -> ModelResponse:
+        """生成确定性响应"""
+        started = time.perf_counter()
+        kind = self.classify_prompt(prompt)
+        with self._lock:
+            delay_ms = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0.0)
+            self.stats["calls"] += 1
+            self.stats["prompt_chars"] += len(prompt)
+            self.stats["calls_by_kind"][kind] = self.stats["calls_by_kind"].get(kind, 0) + 1
+
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+        content = self.build_response(kind, prompt)
+        return ModelResponse(
+            content=content,
+            model_type=self.model_type,
+            tokens_used=len(prompt) // 4 + len(content) // 4,
+            response_time=time.perf_counter() - started,
+            metadata={"stub": True, "kind": kind}
+        )
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """按固定大小分块返回响应"""
+        response = await self.generate(prompt, **kwargs)
+        for i in range(0, len(response.content), 16):
+            yield response.content[i:i + 16]
+
+    @staticmethod
+    def classify_prompt(prompt: str) -> str:
+        """识别Prompt类型：intent / table_selection / sql"""
+        if '"intent"' in prompt or '意图类型' in prompt:
+            return "intent"
+        if 'primary_tables' in prompt or '"tables"' in prompt:
+            return "table_selection"
+        return "sql"
+
+    def build_response(self, kind: str, prompt: str) -> str:
+        """构建响应内容"""
+        if kind == "intent":
+            question = self.extract_question(prompt)
+            intent = "report" if "报告" in question else "query"
+            return json.dumps({
+                "intent": intent,
+                "confidence": 0.96,
+                "reasoning": "桩模型按关键词判定"
+            }, ensure_ascii=False)
+
+        tables = self.extract_tables(prompt)
+        if kind == "table_selection":
+            return json.dumps({
+                "tables": tables,
+                "primary_tables": [{"table_name": name, "relevance_score": 0.9} for name in tables[:1]],
+                "related_tables": [{"table_name": name, "relevance_score": 0.6} for name in tables[1:]],
+                "reason": "桩模型选择首批候选表",
+                "needs_clarification": False,
+                "clarification_question": ""
+            }, ensure_ascii=False)
+
+        table = tables[0] if tables else "dual"
+        return f"```sql\nSELECT * FROM {table} LIMIT 100\n```"
+
+    @staticmethod
+    def extract_question(prompt: str) -> str:
+        match = _QUESTION_PATTERN.search(prompt)
+        return match.group(1).strip() if match else prompt
+
+    def extract_tables(self, prompt: str) -> List[str]:
+        tables = []
+        for name in self.table_pattern.findall(prompt):
+            if name not in tables:
+                tables.append(name)
+                if len(tables) >= self.max_tables:
+                    break
+        return tables
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.stats["calls"],
+                "prompt_chars": self.stats["prompt_chars"],
+                "calls_by_kind": dict(self.stats["calls_by_kind"])
+            }
+
+
+def install_stub_adapters(ai_service: AIModelService, adapter: Optional[StubModelAdapter] = None) -> StubModelAdapter:
+    """用桩适配器替换AI服务的云端和本地模型适配器"""
+    adapter = adapter or StubModelAdapter()
+    ai_service.adapters[ModelType.QWEN_CLOUD] = adapter
+    ai_service.adapters[ModelType.OPENAI_LOCAL] = adapter
+    return adapter
@@ -0,0 +1,66 @@
+"""
+后台任务 API
+查询、取消后台任务（表结构同步、动态字典刷新、Excel导入）以及查看执行指标
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, List, Optional
+import logging
+
+from src.services.job_runner import JobRunner
+from src.services.service_registry import get_service_registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/background-jobs", tags=["后台任务"])
+
+# 后台任务执行器在首次请求时才构造，通过依赖注入获取
+get_job_runner = get_service_registry().dependency("job_runner")
+
+
+@router.get("", response_model=List[Dict[str, Any]])
+async def list_background_jobs(
+    job_type: Optional[str] = Query(None, description="任务类型"),
+    status: Optional[str] = Query(None, description="任务状态"),
+    limit: int = Query(50, ge=1, le=500, description="返回数量"),
+    runner: JobRunner = Depends(get_job_runner)
+):
+    """按创建时间倒序列出后台任务"""
+    return runner.list_jobs(job_type=job_type, status=status, limit=limit)
+
+
+@router.get("/metrics", response_model=Dict[str, Any])
+async def get_background_job_metrics(runner: JobRunner = Depends(get_job_runner)):
+    """获取后台任务执行指标（并发、排队数量以及各任务类型的完成、失败、重试次数和耗时）"""
+    return runner.get_metrics()
+
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+async def get_background_job(job_id: str, runner: JobRunner = Depends(get_job_runner)):
+    """获取后台任务状态和进度"""
+    job = runner.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="后台任务不存在")
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=Dict[str, Any])
+async def cancel_background_job(job_id: str, runner: JobRunner = Depends(get_job_runner)):
+    """取消后台任务，执行中的任务在下一个检查点退出"""
+    job = runner.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="后台任务不存在")
+    if not runner.cancel(job_id):
+        return {"job_id": job_id, "status": job["status"], "message": "任务已结束，无需取消"}
+    logger.info(f"Background job {job_id} cancel requested")
+    return {"job_id": job_id, "status": "cancelling", "message": "已请求取消任务"}
+
+
+@router.delete("/{job_id}", response_model=Dict[str, Any])
+async def delete_background_job(job_id: str, runner: JobRunner = Depends(get_job_runner)):
+    """删除已结束的后台任务记录"""
+    if runner.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="后台任务不存在")
+    if not runner.delete_job(job_id):
+        raise HTTPException(status_code=400, detail="只能删除已结束的任务")
+    return {"job_id": job_id, "message": "任务记录已删除"}
@@ -19,6 +19,7 @@ from src.utils.encryption import encrypt_password, decrypt_password
 from src.database import get_db
 from datetime import datetime
 from src.services.table_discovery import TableDiscoveryService  # 导入表发现服务
+from src.services.local_olap_store import get_local_olap_store, LocalOLAPStoreError
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
@@ -366,6 +367,9 @@ async def delete_data_source(
             logger.warning(f"Data source with ID {source_id} not found for deletion")
             raise HTTPException(status_code=404, detail="数据源不存在")
         
+        # 清理文件数据源的本地分析存储
+        get_local_olap_store().drop_store(source_id)
+        
         logger.info(f"Data source {source_id} deleted successfully")
         
     except Exception as e:
@@ -545,6 +549,54 @@ async def get_data_source_tables(
         raise HTTPException(status_code=500, detail="查询表列表失败，请检查数据源配置和网络连接")
 
 
+# 新增：将文件数据源导入本地嵌入式分析存储
+@router.post("/{source_id}/local-store", response_model=dict)
+async def build_local_store(
+    source_id: str,
+    sheet_name: Optional[str] = Query(None, description="只导入指定Sheet，默认导入全部Sheet"),
+    db: Session = Depends(get_db)
+):
+    """
+    将Excel/CSV文件数据源导入本地嵌入式分析存储
+    
+    导入后该数据源的查询在进程内的列式引擎（未安装duckdb时为sqlite）上执行，
+    不再占用主数据库。重复调用会用文件内容替换已导入的表。
+    
+    返回格式：
+    {
+        "engine": "duckdb",
+        "path": "./data/olap/<source_id>.duckdb",
+        "tables": {"sheet1": 1000}
+    }
+    """
+    logger.info(f"Building local OLAP store for data source ID: {source_id}")
+    
+    try:
+        source = data_source_service.get_source_by_id(db, source_id)
+        
+        if not source:
+            logger.warning(f"Data source with ID {source_id} not found")
+            raise HTTPException(status_code=404, detail="数据源不存在")
+        
+        if source.source_type != 'FILE' or not source.file_path:
+            raise HTTPException(status_code=400, detail="仅文件类型的数据源支持导入本地分析存储")
+        
+        store = get_local_olap_store()
+        result = store.ingest_file(source_id, source.file_path, sheet_name=sheet_name)
+        
+        logger.info(f"Local OLAP store built for data source {source_id}: {result['tables']}")
+        return result
+        
+    except HTTPException:
+        raise
+    except LocalOLAPStoreError as e:
+        logger.error(f"Failed to build local OLAP store for data source {source_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to build local OLAP store for data source {source_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="导入本地分析存储失败")
+
+
 # 新增：连接池监控端点
 @router.get("/{source_id}/pool/stats", response_model=dict)
 async def get_connection_pool_stats(
@@ -570,7 +622,8 @@ async def get_connection_pool_stats(
         "status": "连接池状态",
         "last_check_time": 最后检查时间,
         "average_response_time": 平均响应时间,
-        "error_rate": 错误率
+        "error_rate": 错误率,
+        "circuit_breaker": 查询熔断器状态（尚未执行过查询时为null）
     }
     """
     logger.info(f"Getting connection pool stats for data source: {source_id}")
@@ -3,7 +3,7 @@
 实现数据表的CRUD功能
 """
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from pydantic import ValidationError
 from sqlalchemy.orm import Session
@@ -19,7 +19,10 @@ from src.schemas.data_table_schema import (
 from src.services.data_table_service import DataTableService
 from src.services.table_discovery_service import TableDiscoveryService
 from src.database import get_db
-from src.services.async_sync import task_manager, async_table_sync_task, SyncTaskStatus
+from src.services.async_sync import task_manager, SyncTaskStatus
+from src.services.sql_executor_service import SQLExecutorService, SQLExecutionError, DatabaseType, build_data_source_config
+from src.services.local_olap_store import get_local_olap_store
+from src.services.sql_limit_rewriter import quote_identifier
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
@@ -28,6 +31,7 @@ router = APIRouter(tags=["数据表管理"])
 
 data_table_service = DataTableService()
 table_discovery_service = TableDiscoveryService()
+sql_executor_service = SQLExecutorService()
 
 @router.get("/", response_model=DataTableListResponse)
 async def get_data_tables(
@@ -282,6 +286,70 @@ async def get_data_table_columns(
         raise HTTPException(status_code=500, detail="获取字段列表失败")
 
 
+# 新增：预览数据表数据
+@router.get("/{table_id}/preview", response_model=dict)
+async def preview_data_table(
+    table_id: str,
+    page_size: int = Query(50, ge=1, le=1000, description="每页行数，1-1000"),
+    cursor: Optional[str] = Query(None, description="上一页返回的游标（有主键时使用键集分页）"),
+    page: int = Query(1, ge=1, description="页码，无主键时使用OFFSET分页"),
+    db: Session = Depends(get_db)
+):
+    """
+    预览数据表数据
+    
+    表有主键时按主键做键集分页，通过next_cursor翻页，翻页代价与页深度无关；
+    没有主键时退化为OFFSET分页。
+    """
+    logger.info(f"Previewing data table ID: {table_id}, page_size: {page_size}, cursor: {bool(cursor)}, page: {page}")
+    
+    try:
+        table = data_table_service.get_table_by_id(db, table_id)
+        if not table:
+            logger.warning(f"Data table with ID {table_id} not found")
+            raise HTTPException(status_code=404, detail="数据表不存在")
+        
+        data_source = db.query(DataSource).filter(DataSource.id == table.data_source_id).first()
+        if not data_source:
+            raise HTTPException(status_code=404, detail="数据源不存在")
+        
+        data_source_config = build_data_source_config(data_source)
+        table_name = table.table_name
+        if data_source_config['type'] == DatabaseType.EMBEDDED.value:
+            # 文件数据源的表名在导入本地存储时经过规范化，按存储的名称映射查询
+            table_name = get_local_olap_store().resolve_table_name(data_source_config['database'], table.table_name)
+            if table_name is None:
+                raise HTTPException(status_code=400, detail="文件数据源尚未导入本地分析存储，或存储中没有该表")
+        sql = f"SELECT * FROM {quote_identifier(table_name, data_source_config['type'])}"
+        key_columns = data_table_service.get_key_columns(db, table_id)
+        
+        if key_columns:
+            result = await sql_executor_service.execute_query_keyset(
+                sql, data_source_config, key_columns, cursor=cursor, page_size=page_size
+            )
+        else:
+            result = await sql_executor_service.execute_query_paginated(
+                sql, data_source_config, page=page, page_size=page_size
+            )
+        
+        logger.info(f"Previewed {result.row_count} rows for data table {table_id}")
+        return {
+            "columns": result.columns,
+            "rows": result.rows,
+            "row_count": result.row_count,
+            "page_info": result.page_info
+        }
+        
+    except HTTPException:
+        raise
+    except SQLExecutionError as e:
+        logger.error(f"Failed to preview data table {table_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail={"error": str(e), "error_code": e.error_code})
+    except Exception as e:
+        logger.error(f"Failed to preview data table {table_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="预览数据表失败")
+
+
 # 新增：刷新数据表信息（从数据库中重新获取表结构）
 @router.post("/{table_id}/refresh", response_model=DataTableResponse)
 async def refresh_data_table(
@@ -334,8 +402,7 @@ async def refresh_data_table(
 @router.post("/{table_id}/sync", response_model=dict)
 async def sync_table_structure(
     table_id: str,
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None
+    db: Session = Depends(get_db)
 ):
     """
     异步同步数据表结构
@@ -355,13 +422,9 @@ async def sync_table_structure(
             logger.warning(f"Data table with ID {table_id} not found")
             raise HTTPException(status_code=404, detail="数据表不存在")
         
-        # 创建异步任务
+        # 提交到后台任务执行器（按数据源限制并发，任务状态持久化）
         task_id = task_manager.create_task(table_id)
         
-        # 将异步任务添加到后台任务中
-        if background_tasks:
-            background_tasks.add_task(async_table_sync_task, task_id, table_id)
-        
         logger.info(f"Created async sync task {task_id} for table {table_id}")
         return {"task_id": task_id, "message": "表结构同步任务已启动，将在后台执行"}
         
@@ -21,6 +21,7 @@ from src.schemas.data_preparation_schema import (
     DictionaryItemBatchCreate
 )
 from src.services.data_preparation_service import DictionaryService
+from src.services.dictionary_cache import dictionary_cache
 from src.database import get_db
 
 # 创建日志记录器
@@ -279,9 +280,11 @@ async def delete_dictionary(
     logger.info(f"Attempting to delete dictionary with ID: {dict_id}")
     
     try:
+        # 一次查询检查子字典、字段引用和动态字典配置
+        dependencies = dictionary_service.check_delete_dependencies(db, dict_id)
+        
         # 检查是否有子字典
-        has_children = dictionary_service.has_children(db, dict_id)
-        if has_children:
+        if dependencies["has_children"]:
             logger.warning(f"Cannot delete dictionary {dict_id}: has child dictionaries")
             raise HTTPException(
                 status_code=400, 
@@ -289,8 +292,7 @@ async def delete_dictionary(
             )
         
         # 检查是否有字段引用
-        has_field_references = dictionary_service.has_field_references(db, dict_id)
-        if has_field_references:
+        if dependencies["has_field_references"]:
             logger.warning(f"Cannot delete dictionary {dict_id}: has field references")
             raise HTTPException(
                 status_code=400, 
@@ -298,8 +300,7 @@ async def delete_dictionary(
             )
         
         # 检查是否有动态字典配置
-        has_dynamic_configs = dictionary_service.has_dynamic_configs(db, dict_id)
-        if has_dynamic_configs:
+        if dependencies["has_dynamic_configs"]:
             logger.warning(f"Cannot delete dictionary {dict_id}: has dynamic configurations")
             raise HTTPException(
                 status_code=400, 
@@ -754,6 +755,25 @@ async def get_cache_stats():
         raise HTTPException(status_code=500, detail="获取缓存状态失败")
 
 
+@router.post("/cache/warm-up", response_model=dict)
+def warm_up_cache(
+    dict_ids: Optional[List[str]] = Query(None, description="要预热的字典ID，为空时预热访问最多的字典"),
+    db: Session = Depends(get_db)
+):
+    """
+    预热字典缓存
+
+    加载字典树、字典列表首页和指定（或访问最多的）字典的字典项首页
+    """
+    logger.info(f"Warming up dictionary cache for {dict_ids or 'hot dictionaries'}")
+
+    try:
+        return dictionary_cache.warm_up_cache(dict_ids=dict_ids, db=db, dictionary_service=dictionary_service)
+    except Exception as e:
+        logger.error(f"Failed to warm up dictionary cache: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="预热缓存失败")
+
+
 # 新增：导入字典数据
 @router.post("/{dict_id}/import", response_model=dict)
 async def import_dictionary(
@@ -162,6 +162,29 @@ async def refresh_dynamic_dictionary(
         raise HTTPException(status_code=500, detail="刷新字典失败")
 
 
+@router.post("/{dictionary_id}/refresh-job", summary="提交动态字典后台刷新任务")
+async def submit_dynamic_dictionary_refresh_job(
+    dictionary_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    提交动态字典后台刷新任务
+
+    - **dictionary_id**: 字典ID
+
+    立即返回任务ID，通过 /api/background-jobs/{job_id} 查询进度
+    """
+    try:
+        service = DynamicDictionaryService(db)
+        job_id = service.submit_refresh_job(dictionary_id)
+        return {"job_id": job_id, "message": "字典刷新任务已提交"}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"提交动态字典刷新任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="提交刷新任务失败")
+
+
 @router.get("/", response_model=DynamicDictionaryListResponse, summary="获取动态字典配置列表")
 async def get_dynamic_dictionary_configs(
     page: int = Query(1, ge=1, description="页码"),
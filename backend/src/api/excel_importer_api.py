@@ -3,12 +3,13 @@ Excel 导入 API
 提供 Excel 文件导入相关的接口
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Depends, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Query, Depends, UploadFile, Form
 from typing import Dict, Any, Optional
 import logging
 from datetime import datetime
 from pydantic import BaseModel
 from src.services.excel_importer import ExcelImporter
+from src.services.job_runner import JobCancelled, JobContext, job_runner, register_job_handler
 from src.database import get_db
 from sqlalchemy.orm import Session
 import os
@@ -19,6 +20,8 @@ router = APIRouter(prefix="/api/data-tables", tags=["Excel导入"])
 # 创建日志记录器
 logger = logging.getLogger(__name__)
 
+EXCEL_IMPORT_JOB = "excel_import"
+
 # 响应模型
 class ImportJobResponse(BaseModel):
     job_id: str
@@ -40,38 +43,67 @@ class ImportStatusResponse(BaseModel):
     error_details: Optional[Dict[str, Any]] = None
 
 # 后台任务处理函数
-def process_excel_import(
-    job_id: str,
-    file_path: str,
-    table_name: str,
-    sheet_name: Optional[str],
-    header_row: int,
-    start_row: int,
-    data_type_mapping: Optional[Dict[str, str]],
-    create_table: bool,
-    replace_existing: bool,
-    db: Session
-):
+def process_excel_import(context: JobContext) -> Dict[str, Any]:
     """
-    处理 Excel 导入的后台任务
+    处理 Excel 导入的后台任务（由后台任务执行器调用，完成后删除临时文件）
     """
+    from src.database import SessionLocal
+    
+    job_id = context.job_id
+    payload = context.payload
+    file_path = payload["file_path"]
+    db = SessionLocal()
     try:
-        logger.info(f"Starting Excel import job {job_id}: {file_path} -> {table_name}")
+        logger.info(f"Starting Excel import job {job_id}: {file_path} -> {payload['table_name']}")
         
         # 创建 ExcelImporter 实例以执行导入操作
         excel_importer = ExcelImporter(db)
         result = excel_importer.import_excel_data(
             file_path=file_path,
-            table_name=table_name,
-            sheet_name=sheet_name,
+            table_name=payload["table_name"],
+            sheet_name=payload.get("sheet_name"),
             job_id=job_id
         )
+        
+        # import_excel_data 方法已自动处理失败状态，这里同步到任务表
+        status_info = excel_importer.get_import_progress(job_id) or {}
+        if status_info.get("status") == "cancelled":
+            raise JobCancelled(f"导入任务已取消: {job_id}")
+        if status_info.get("status") == "failed":
+            raise RuntimeError("; ".join(result.get("errors", [])[:3]) or "导入失败")
+        
         logger.info(f"Excel import job {job_id} completed successfully")
+        return result
         
+    except JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"Excel import job {job_id} failed: {str(e)}", exc_info=True)
-        # import_excel_data 方法已自动处理失败状态，无需手动更新
         raise
+    finally:
+        db.close()
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+
+
+# 导入不是幂等操作（失败前可能已写入部分批次），不自动重试
+register_job_handler(EXCEL_IMPORT_JOB, process_excel_import, max_attempts=1)
+
+
+def _get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """从后台任务表读取导入任务状态，转换为与导入进度相同的格式"""
+    job = job_runner.get_job(job_id)
+    if job is None or job["job_type"] != EXCEL_IMPORT_JOB:
+        return None
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "progress_percent": job["progress"],
+        "start_time": job["started_at"] or job["created_at"],
+        "end_time": job["ended_at"],
+        "result": job["result"],
+        "errors": [job["error"]] if job["error"] else []
+    }
 
 @router.post("/import-excel", response_model=ImportJobResponse)
 async def import_excel(
@@ -82,7 +114,6 @@ async def import_excel(
     start_row: Optional[int] = Form(2),
     create_table: Optional[bool] = Form(True),
     replace_existing: Optional[bool] = Form(False),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     db: Session = Depends(get_db)
 ):
     """
@@ -126,36 +157,18 @@ async def import_excel(
             tmp_file.write(content)
             tmp_file_path = tmp_file.name
         
-        # 创建 ExcelImporter 实例并直接调用导入方法
-        excel_importer = ExcelImporter(db)
-        job_id = f"import_{int(datetime.now().timestamp())}_{hash(tmp_file_path + table_name)}"
-        
-        # 直接调用 import_excel_data 方法，该方法会自动处理进度跟踪
-        result = excel_importer.import_excel_data(
-            file_path=tmp_file_path,
-            table_name=table_name,
-            sheet_name=sheet_name,
-            job_id=job_id
-        )
-        
-        # 添加后台任务以清理临时文件
-        background_tasks.add_task(
-            lambda: os.unlink(tmp_file_path)
-        )
-        
-        # 添加后台任务以处理导入（虽然我们已经直接调用了，但为了保持异步，仍保留）
-        background_tasks.add_task(
-            process_excel_import,
-            job_id,
-            tmp_file_path,
-            table_name,
-            sheet_name,
-            header_row,
-            start_row,
-            None,  # data_type_mapping 不再通过参数传递
-            create_table,
-            replace_existing,
-            db
+        # 提交到后台任务执行器，导入完成后由任务删除临时文件
+        job_id = job_runner.submit(
+            EXCEL_IMPORT_JOB,
+            {
+                "file_path": tmp_file_path,
+                "table_name": table_name,
+                "sheet_name": sheet_name,
+                "header_row": header_row,
+                "start_row": start_row,
+                "create_table": create_table,
+                "replace_existing": replace_existing
+            }
         )
         
         # 返回作业信息
@@ -195,9 +208,9 @@ async def get_import_status(
     """
     logger.info(f"API: Getting import status for job {job_id}")
     
-    # 获取作业状态
+    # 获取作业状态（排队中或服务重启后从后台任务表读取）
     excel_importer = ExcelImporter(db)
-    status_info = excel_importer.get_import_progress(job_id)
+    status_info = excel_importer.get_import_progress(job_id) or _get_job_status(job_id)
     
     if not status_info:
         logger.warning(f"Import job {job_id} not found")
@@ -252,7 +265,7 @@ async def cancel_import_job(
     try:
         # 检查任务是否存在（通过获取进度信息）
         excel_importer = ExcelImporter(db)
-        status_info = excel_importer.get_import_progress(job_id)
+        status_info = excel_importer.get_import_progress(job_id) or _get_job_status(job_id)
         
         if not status_info:
             logger.warning(f"Import job {job_id} not found for cancellation")
@@ -269,8 +282,9 @@ async def cancel_import_job(
                 detail=f"已完成或失败的任务无法取消: {job_id}"
             )
         
-        # 取消任务
-        success = excel_importer.cancel_job(job_id)
+        # 取消任务（排队中的任务由后台任务执行器直接取消，执行中的任务由导入循环检查取消状态）
+        success = job_runner.cancel(job_id)
+        success = excel_importer.cancel_job(job_id) or success
         
         if success:
             logger.info(f"Import job {job_id} cancelled successfully")
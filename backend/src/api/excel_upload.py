@@ -3,8 +3,8 @@ from typing import List, Dict, Any
 import os
 import logging
 from pydantic import BaseModel
-import pandas as pd
 from src.services.excel_service import ExcelService
+from src.services.workbook_scanner import get_workbook_scanner
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
@@ -61,15 +61,14 @@ async def upload_excel(file: UploadFile = File(...)):
         excel_service = ExcelService()
         file_path = excel_service.save_uploaded_file(file)
         
-        # 使用pandas读取Excel文件获取sheet信息
-        xls = pd.ExcelFile(file_path)
-        sheet_names = xls.sheet_names
+        # 单遍扫描获取sheet信息，结果按文件哈希缓存，后续的结构解析、预览和校验直接复用
+        scan = get_workbook_scanner().scan(file_path)
+        sheet_names = scan.sheet_names
         
         # 获取行数和列数（使用第一个sheet）
         if len(sheet_names) > 0:
-            df = pd.read_excel(file_path, sheet_name=sheet_names[0])
-            row_count = len(df)
-            column_count = len(df.columns)
+            row_count = scan.sheets[0].row_count
+            column_count = scan.sheets[0].column_count
         else:
             row_count = 0
             column_count = 0
@@ -15,14 +15,15 @@ from src.services.intelligent_table_selector import (
     TableCandidate,
     TableSelectionConfidence
 )
+from src.services.service_registry import lazy_service
 
 logger = logging.getLogger(__name__)
 
 # 创建路由器
 router = APIRouter(prefix="/api/intelligent-table-selector", tags=["智能表选择"])
 
-# 全局服务实例
-table_selector_service = IntelligentTableSelector()
+# 全局服务实例（首次请求时才构造）
+table_selector_service = lazy_service("intelligent_table_selector", IntelligentTableSelector)
 
 
 # 请求模型
@@ -169,6 +170,7 @@ class SelectionStatisticsResponse(BaseModel):
     success_rate: float
     average_processing_time: float
     average_relevance_score: float
+    pre_ranking: Optional[Dict[str, Any]] = None
     configuration: Dict[str, Any]
     
     class Config:
@@ -73,6 +73,10 @@ class IntentStatisticsResponse(BaseModel):
     avg_confidence: float = Field(..., description="平均置信度")
     avg_response_time: float = Field(..., description="平均响应时间")
     intent_distribution: Dict[str, float] = Field(..., description="意图分布")
+    cache_hits: int = Field(0, description="缓存命中数")
+    classifier_hits: int = Field(0, description="本地分类器命中数")
+    llm_calls: int = Field(0, description="云端模型调用数")
+    fast_path: Dict[str, Any] = Field(default_factory=dict, description="快速通道命中率与分类器状态")
     
     class Config:
         schema_extra = {
@@ -233,6 +233,7 @@ def delete_session(
         # 删除会话
         db.delete(session)
         db.commit()
+        multi_turn_handler.invalidate_session(session_id)
         
         return {"status": "deleted", "session_id": session_id}
         if not session:
@@ -244,6 +245,7 @@ def delete_session(
         # 删除会话
         db.delete(session)
         db.commit()
+        multi_turn_handler.invalidate_session(session_id)
         
         return {"status": "deleted", "session_id": session_id}
     except Exception as e:
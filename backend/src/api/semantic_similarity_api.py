@@ -15,19 +15,23 @@ from src.services.semantic_similarity_engine import (
     KeywordAnalysis,
     SemanticMatch
 )
+from src.services.service_registry import get_service_registry
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/semantic-similarity", tags=["语义相似度"])
 
-# 全局语义相似度引擎实例
-similarity_engine = SemanticSimilarityEngine()
+# 语义相似度引擎在首次请求时才构造（加载分词词典耗时较长），通过依赖注入获取
+service_registry = get_service_registry()
+service_registry.register("semantic_similarity_engine", SemanticSimilarityEngine)
+get_similarity_engine = service_registry.dependency("semantic_similarity_engine")
 
 
 @router.post("/analyze-question", response_model=Dict[str, Any])
 async def analyze_user_question(
     request: Dict[str, str],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     分析用户问题，提取关键词和语义信息
@@ -66,7 +70,8 @@ async def analyze_user_question(
 @router.post("/calculate-table-similarity", response_model=Dict[str, Any])
 async def calculate_table_similarity(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     计算表的语义相似度
@@ -145,7 +150,8 @@ async def calculate_table_similarity(
 @router.post("/calculate-field-similarity", response_model=Dict[str, Any])
 async def calculate_field_similarity(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     计算字段的语义相似度
@@ -211,7 +217,8 @@ async def calculate_field_similarity(
 @router.post("/business-term-mapping", response_model=Dict[str, Any])
 async def calculate_business_term_mapping(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     中文业务术语到技术字段的智能映射
@@ -275,7 +282,8 @@ async def calculate_business_term_mapping(
 @router.post("/knowledge-term-matching", response_model=Dict[str, Any])
 async def calculate_knowledge_term_matching(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     知识库术语的语义匹配和权重计算
@@ -339,7 +347,8 @@ async def calculate_knowledge_term_matching(
 @router.post("/comprehensive-similarity", response_model=Dict[str, Any])
 async def calculate_comprehensive_similarity(
     request: Dict[str, Any],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
 ):
     """
     综合语义相似度计算
@@ -439,7 +448,9 @@ async def calculate_comprehensive_similarity(
 
 
 @router.get("/statistics", response_model=Dict[str, Any])
-async def get_similarity_statistics():
+async def get_similarity_statistics(
+    similarity_engine: SemanticSimilarityEngine = Depends(get_similarity_engine)
+):
     """获取语义相似度引擎统计信息"""
     try:
         stats = similarity_engine.get_similarity_statistics()
@@ -121,6 +121,8 @@ async def execute_query_paginated(
     - **data_source_id**: 数据源ID
     - **page**: 页码（从1开始，默认1）
     - **page_size**: 每页大小（默认1000）
+    - **key_columns**: 唯一排序键，提供时使用键集分页
+    - **cursor**: 上一页返回的next_cursor（键集分页）
     """
     try:
         logger.info(f"收到分页SQL执行请求: data_source_id={request.data_source_id}, page={request.page}")
@@ -136,12 +138,21 @@ async def execute_query_paginated(
         }
         
         # 执行分页查询
-        result = await executor.execute_query_paginated(
-            sql=request.sql,
-            data_source_config=data_source_config,
-            page=request.page,
-            page_size=request.page_size
-        )
+        if request.key_columns:
+            result = await executor.execute_query_keyset(
+                sql=request.sql,
+                data_source_config=data_source_config,
+                key_columns=request.key_columns,
+                cursor=request.cursor,
+                page_size=request.page_size
+            )
+        else:
+            result = await executor.execute_query_paginated(
+                sql=request.sql,
+                data_source_config=data_source_config,
+                page=request.page,
+                page_size=request.page_size
+            )
         
         # 转换为响应格式
         return QueryResultResponse(
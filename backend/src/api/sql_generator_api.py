@@ -18,6 +18,7 @@ from src.services.sql_generator_service import (
 from src.schemas.sql_generator_schema import (
     SQLGenerationRequestSchema,
     SQLGenerationResultSchema,
+    SQLGenerationExecutionResponseSchema,
     BatchSQLGenerationRequestSchema,
     BatchSQLGenerationResponseSchema,
     GenerationStatisticsSchema,
@@ -25,14 +26,18 @@ from src.schemas.sql_generator_schema import (
     ValidationResultSchema,
     ValidationViolationSchema
 )
+from src.services.service_registry import lazy_service
+from src.services.sql_executor_service import SQLExecutorService, SQLExecutionError
+from src.schemas.sql_executor_schema import QueryResultResponse, PageInfo
+from src.api.sql_executor_api import get_executor_service
 
 logger = logging.getLogger(__name__)
 
 # 创建路由器
 router = APIRouter(prefix="/api/sql-generator", tags=["SQL生成"])
 
-# 全局服务实例
-sql_generator_service = SQLGeneratorService()
+# 全局服务实例（首次请求时才构造）
+sql_generator_service = lazy_service("sql_generator_service", SQLGeneratorService)
 
 
 # 辅助函数
@@ -58,6 +63,19 @@ def convert_validation_result_to_schema(validation_result: Dict[str, Any]) -> Va
     )
 
 
+def convert_generation_request(request: SQLGenerationRequestSchema) -> SQLGenerationRequest:
+    """将请求Schema转换为服务层请求"""
+    return SQLGenerationRequest(
+        user_question=request.user_question,
+        table_ids=request.table_ids,
+        data_source_id=request.data_source_id,
+        sql_dialect=SQLDialect(request.sql_dialect.value),
+        include_explanation=request.include_explanation,
+        max_rows=request.max_rows,
+        candidate_count=request.candidate_count
+    )
+
+
 def convert_generation_result_to_schema(result: SQLGenerationResult) -> SQLGenerationResultSchema:
     """将生成结果转换为Schema"""
     validation_schema = None
@@ -72,7 +90,8 @@ def convert_generation_result_to_schema(result: SQLGenerationResult) -> SQLGener
         confidence=result.confidence,
         generation_time=result.generation_time,
         semantic_context_used=result.semantic_context_used,
-        validation_result=validation_schema
+        validation_result=validation_schema,
+        candidates=result.candidates
     )
 
 
@@ -88,6 +107,7 @@ async def generate_sql(request: SQLGenerationRequestSchema):
     - **sql_dialect**: SQL方言类型（mysql/sqlserver/postgresql）
     - **include_explanation**: 是否包含解释
     - **max_rows**: 最大返回行数
+    - **candidate_count**: 候选SQL数量，大于1时并行生成多条候选，在本地验证和EXPLAIN试运行后返回评分最高的一条
     
     返回生成的SQL查询、解释、验证结果等信息。
     """
@@ -95,14 +115,7 @@ async def generate_sql(request: SQLGenerationRequestSchema):
         logger.info(f"收到SQL生成请求: {request.user_question}")
         
         # 转换请求
-        generation_request = SQLGenerationRequest(
-            user_question=request.user_question,
-            table_ids=request.table_ids,
-            data_source_id=request.data_source_id,
-            sql_dialect=SQLDialect(request.sql_dialect.value),
-            include_explanation=request.include_explanation,
-            max_rows=request.max_rows
-        )
+        generation_request = convert_generation_request(request)
         
         # 调用服务层生成SQL
         result = await sql_generator_service.generate_sql(generation_request)
@@ -121,6 +134,55 @@ async def generate_sql(request: SQLGenerationRequestSchema):
         )
 
 
+@router.post("/execute", response_model=SQLGenerationExecutionResponseSchema, summary="生成并执行SQL查询")
+async def generate_and_execute_sql(
+    request: SQLGenerationRequestSchema,
+    executor: SQLExecutorService = Depends(get_executor_service)
+):
+    """
+    生成SQL并在数据源上执行评分最高的有效候选
+    
+    参数同 /generate，必须指定 **data_source_id**。**candidate_count** 大于1时，
+    评分最高的候选执行失败后直接改用下一个有效候选，不再调用模型重新生成。
+    """
+    try:
+        logger.info(f"收到SQL生成并执行请求: {request.user_question}")
+        
+        result, query_result = await sql_generator_service.generate_and_execute(
+            convert_generation_request(request), executor
+        )
+        
+        return SQLGenerationExecutionResponseSchema(
+            generation=convert_generation_result_to_schema(result),
+            result=QueryResultResponse(
+                columns=query_result.columns,
+                rows=query_result.rows,
+                row_count=query_result.row_count,
+                execution_time=query_result.execution_time,
+                is_truncated=query_result.is_truncated,
+                has_more=query_result.has_more,
+                page_info=PageInfo(**query_result.page_info) if query_result.page_info else None,
+                metadata=query_result.metadata
+            )
+        )
+        
+    except SQLExecutionError as e:
+        logger.error(f"生成的SQL执行失败: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': str(e),
+                'error_code': e.error_code
+            }
+        )
+    except Exception as e:
+        logger.error(f"SQL生成并执行失败: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"SQL生成并执行过程中发生错误: {str(e)}"
+        )
+
+
 @router.post("/generate/batch", response_model=BatchSQLGenerationResponseSchema, summary="批量生成SQL查询")
 async def batch_generate_sql(request: BatchSQLGenerationRequestSchema):
     """
@@ -140,14 +202,7 @@ async def batch_generate_sql(request: BatchSQLGenerationRequestSchema):
         # 处理每个请求
         for req in request.requests:
             try:
-                generation_request = SQLGenerationRequest(
-                    user_question=req.user_question,
-                    table_ids=req.table_ids,
-                    data_source_id=req.data_source_id,
-                    sql_dialect=SQLDialect(req.sql_dialect.value),
-                    include_explanation=req.include_explanation,
-                    max_rows=req.max_rows
-                )
+                generation_request = convert_generation_request(req)
                 
                 result = await sql_generator_service.generate_sql(generation_request)
                 response = convert_generation_result_to_schema(result)
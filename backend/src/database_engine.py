@@ -20,6 +20,7 @@ from src.models.data_preparation_model import DataTable, TableField, Dictionary,
 from src.models.knowledge_base_model import KnowledgeBase
 from src.models.knowledge_item_model import KnowledgeItem
 from src.models.database_models import PromptConfig, SessionContext, ConversationMessage, TokenUsageStats
+from src.models.background_job_model import BackgroundJob
 
 # 从环境变量读取数据库配置
 DB_HOST = os.getenv('DB_HOST', '127.0.0.1')
@@ -1,3 +1,8 @@
+import time
+
+# 记录启动起点，用于启动耗时报告
+_startup_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -53,6 +58,9 @@ app.add_middleware(
 # 导入AI模型服务配置
 from src.config.ai_config import init_ai_config, get_ai_config, validate_ai_config, check_required_env_vars
 from src.services.ai_model_service import init_ai_service, get_ai_service
+from src.services.service_registry import get_service_registry
+
+service_registry = get_service_registry()
 
 # 导入路由
 from src.api.data_source_api import router as data_source_router
@@ -98,6 +106,7 @@ from src.api.sql_generator_api import router as sql_generator_router
 from src.api.sql_executor_api import router as sql_executor_router
 from src.api.dialogue_session_api import router as dialogue_session_router
 from src.api.local_data_analyzer_api import router as local_data_analyzer_router
+from src.api.background_jobs_api import router as background_jobs_router
 
 # 注意：很多路由器已经在定义时包含了前缀，不需要重复添加
 app.include_router(data_source_router)  # 已包含 /api/data-sources 前缀
@@ -143,6 +152,10 @@ app.include_router(sql_generator_router)  # 已包含 /api/sql-generator 前缀
 app.include_router(sql_executor_router)  # 已包含 /api/sql-executor 前缀
 app.include_router(dialogue_session_router)  # 已包含 /api/dialogue 前缀
 app.include_router(local_data_analyzer_router)  # 已包含 /api/local-analyzer 前缀
+app.include_router(background_jobs_router)  # 已包含 /api/background-jobs 前缀
+
+# 模块导入和路由注册耗时（重量级服务已改为首次使用时构造，不计入此阶段）
+service_registry.record_phase("import_and_routes", time.perf_counter() - _startup_started)
 
 # 导入数据准备模块的文档配置
 from src.api.docs import create_data_prep_openapi_schema
@@ -175,6 +188,14 @@ def database_health_check():
         logger.error(f"Database connection failed: {str(e)}")
         return {"status": "unhealthy", "error": str(e)}
 
+# 启动耗时报告
+@app.get("/health/startup")
+def startup_report():
+    """
+    返回启动各阶段耗时和各服务的构造状态
+    """
+    return service_registry.get_report()
+
 # 创建一个独立的函数来处理应用启动时的初始化
 async def startup_event_handler():
     """
@@ -240,16 +261,6 @@ async def startup_event_handler():
     except Exception as e:
         logger.error(f"Failed to initialize AI model service: {str(e)}")
         logger.warning("AI chat functionality will be disabled")
-    
-    # 打印所有注册的路由
-    logger.info("Registered routes:")
-    for route in app.routes:
-        # 检查路由类型，WebSocket路由没有methods属性
-        if hasattr(route, 'methods'):
-            logger.info(f"{route.methods} {route.path}")
-        else:
-            # WebSocket路由或其他类型的路由
-            logger.info(f"WebSocket {route.path}")
 
 # 应用启动时初始化数据库连接和其他服务
 @app.on_event("startup")
@@ -259,10 +270,12 @@ async def startup_event():
     1. 初始化数据库连接和创建表
     2. 初始化AI模型服务
     3. 设置自定义OpenAPI文档
-    4. 打印所有注册的路由用于调试
+    4. 校验路由路径格式（路由明细仅在DEBUG级别输出）
+    5. 开始接收请求后在后台预热服务
     """
     # 1. 数据库初始化
-    await startup_event_handler()
+    with service_registry.phase("startup_handler"):
+        await startup_event_handler()
     
     # 2. 设置自定义 OpenAPI 文档
     try:
@@ -272,23 +285,21 @@ async def startup_event():
         logger.error(f"Failed to setup OpenAPI schema: {str(e)}")
     
     # 3. 打印所有注册的路由用于调试
-    logger.info("Registered routes:")
     api_routes = []
     
     for route in app.routes:
         # 检查路由类型，WebSocket路由没有methods属性
         if hasattr(route, 'methods'):
-            logger.info(f"{route.methods} {route.path}")
+            logger.debug(f"{route.methods} {route.path}")
         else:
             # WebSocket路由或其他类型的路由
-            logger.info(f"WebSocket {route.path}")
+            logger.debug(f"WebSocket {route.path}")
         
         # 收集 API 路径进行验证
         if hasattr(route, 'path') and '/api/' in route.path:
             api_routes.append(route.path)
     
-    # 验证 API 路径格式
-    logger.info("Validating API path formats...")
+    # 4. 验证 API 路径格式
     for path in api_routes:
         # 检查重复前缀
         path_segments = path.split('/')
@@ -301,8 +312,6 @@ async def startup_event():
             # 检查知识库和知识项资源是否使用复数形式
             if resource_segment in ['knowledge-base', 'knowledge-item']:
                 logger.warning(f"⚠️  Resource should be plural: {resource_segment} in {path}")
-            elif resource_segment in ['knowledge-bases', 'knowledge-items']:
-                logger.info(f"✅ Correct plural resource naming: {resource_segment}")
         
         # 检查路径格式（kebab-case）
         for segment in path_segments:
@@ -310,7 +319,15 @@ async def startup_event():
                 logger.warning(f"⚠️  Path segment should use kebab-case instead of snake_case: {segment} in {path}")
     
     logger.info(f"API path validation completed. Total API routes: {len(api_routes)}")
-    logger.info("Application startup completed successfully")
+    
+    # 5. 后台预热：构造延迟初始化的服务，不阻塞启动
+    test_mode = os.getenv("TEST_MODE", "false").lower() == "true"
+    if os.getenv("SERVICE_WARMUP", "false" if test_mode else "true").lower() == "true":
+        service_registry.schedule_warm_up(delay=float(os.getenv("SERVICE_WARMUP_DELAY", "1.0")))
+    
+    service_registry.record_phase("startup_total", time.perf_counter() - _startup_started)
+    phases = service_registry.get_report()["phases_ms"]
+    logger.info(f"Application startup completed successfully: {phases}")
 
 # 应用关闭时清理数据库连接
 @app.on_event("shutdown")
@@ -320,6 +337,13 @@ async def shutdown_event():
     """
     logger.info("Shutting down application...")
     
+    # 停止尚未完成的预热任务
+    await service_registry.cancel_warm_up()
+    
+    # 停止后台任务执行器（未完成的任务保留在任务表中，下次启动时恢复）
+    if service_registry.is_initialized("job_runner"):
+        service_registry.get("job_runner").shutdown(wait=False)
+    
     # 关闭AI模型服务
     try:
         ai_service = get_ai_service()
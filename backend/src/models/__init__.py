@@ -9,6 +9,7 @@ from .data_preparation_model import DataTable, TableField, Dictionary, Dictionar
 from .knowledge_base_model import KnowledgeBase
 from .knowledge_item_model import KnowledgeItem
 from .database_models import PromptConfig, SessionContext, ConversationMessage, TokenUsageStats
+from .background_job_model import BackgroundJob
 
 # 导出Base以供其他模块使用
 __all__ = [
@@ -25,5 +26,6 @@ __all__ = [
     "PromptConfig",
     "SessionContext",
     "ConversationMessage",
-    "TokenUsageStats"
+    "TokenUsageStats",
+    "BackgroundJob"
 ]
@@ -0,0 +1,77 @@
+"""
+后台任务模型
+持久化后台任务执行器中的任务状态，服务重启后未完成的任务可以恢复执行
+"""
+from datetime import datetime
+from enum import Enum
+import uuid
+
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, JSON, Index
+
+from .base import Base
+
+
+class JobStatus(str, Enum):
+    """后台任务状态"""
+    PENDING = "pending"        # 排队中（包括等待重试）
+    RUNNING = "running"        # 执行中
+    COMPLETED = "completed"    # 已完成
+    FAILED = "failed"          # 失败（重试次数用尽）
+    CANCELLED = "cancelled"    # 已取消
+
+
+class BackgroundJob(Base):
+    """后台任务"""
+    __tablename__ = 'background_jobs'
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), comment='任务ID（UUID）')
+    job_type = Column(String(50), nullable=False, comment='任务类型，对应已注册的处理函数')
+    status = Column(String(20), nullable=False, default=JobStatus.PENDING.value, comment='任务状态')
+    concurrency_key = Column(String(100), nullable=True, comment='并发分组（通常为数据源ID）')
+    payload = Column(JSON, nullable=True, comment='任务参数')
+    progress = Column(Integer, nullable=False, default=0, comment='进度（0-100）')
+    message = Column(String(500), nullable=True, comment='进度说明')
+    result = Column(JSON, nullable=True, comment='执行结果')
+    error = Column(Text, nullable=True, comment='最近一次错误信息')
+    attempts = Column(Integer, nullable=False, default=0, comment='已执行次数')
+    max_attempts = Column(Integer, nullable=False, default=3, comment='最大执行次数')
+    cancel_requested = Column(Boolean, nullable=False, default=False, comment='是否已请求取消')
+    next_run_at = Column(DateTime, nullable=True, comment='下次执行时间（重试退避）')
+    owner = Column(String(100), nullable=True, comment='执行中任务所属的执行器实例')
+    heartbeat_at = Column(DateTime, nullable=True, comment='执行器最近一次心跳时间')
+    created_at = Column(DateTime, nullable=False, default=datetime.now, comment='创建时间')
+    started_at = Column(DateTime, nullable=True, comment='首次开始执行时间')
+    ended_at = Column(DateTime, nullable=True, comment='结束时间')
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
+    __table_args__ = (
+        Index('idx_background_jobs_status', 'status', 'created_at'),
+        Index('idx_background_jobs_type', 'job_type', 'created_at'),
+    )
+
+    def to_dict(self):
+        """转换为字典格式，便于序列化"""
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'concurrency_key': self.concurrency_key,
+            'payload': self.payload,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'cancel_requested': self.cancel_requested,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'owner': self.owner,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, job_type={self.job_type}, status={self.status})>"
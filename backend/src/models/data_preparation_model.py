@@ -146,6 +146,9 @@ class Dictionary(Base):
     code = Column(String(50), nullable=False, unique=True, index=True, comment='字典编码')
     name = Column(String(100), nullable=False, comment='字典名称')
     parent_id = Column(String(36), ForeignKey('dictionaries.id'), nullable=True, index=True, comment='父字典ID')
+    # 层级索引由 src.services.dictionary_hierarchy 的会话钩子在写入时维护
+    path = Column(String(760), nullable=True, index=True, comment='层级路径（/根字典ID/.../自身ID/）')
+    depth = Column(Integer(), nullable=False, default=0, comment='层级深度（根字典为0）')
     description = Column(Text(), nullable=True, comment='描述')
     dict_type = Column(String(50), nullable=True, comment='字典类型')
     status = Column(Boolean(), default=True, index=True, comment='是否启用')
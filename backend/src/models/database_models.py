@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, Enum, Boolean, DateTime, ForeignKey, Float, func
+from sqlalchemy import Column, Integer, String, Text, JSON, Enum, Boolean, DateTime, ForeignKey, Float, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 import enum
 from src.models.base import Base
@@ -65,7 +65,11 @@ class SessionContext(Base):
 
 class ConversationMessage(Base):
     __tablename__ = 'conversation_messages'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # turn由数据库按会话分配，唯一约束保证多进程并发写入同一会话时不会重复
+        UniqueConstraint('session_id', 'turn', name='uq_conversation_session_turn'),
+        {'extend_existing': True}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String(100), nullable=False)
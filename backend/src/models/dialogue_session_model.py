@@ -3,7 +3,7 @@
 实现会话状态的持久化存储
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum as SQLEnum, Boolean, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
@@ -38,6 +38,11 @@ class DialogueSession(Base):
     cloud_messages = Column(JSON, nullable=True, comment="云端历史消息")
     local_messages = Column(JSON, nullable=True, comment="本地历史消息")
     
+    # 增量持久化（消息逐条追加到dialogue_session_messages）
+    compressed_context = Column(Text, nullable=True, comment="压缩后的上下文")
+    persisted_message_seq = Column(Integer, default=0, comment="已追加消息的最大序号")
+    persistence_watermark = Column(JSON, nullable=True, comment="各层级已持久化的最后一条消息")
+    
     # 会话统计
     message_count = Column(Integer, default=0, comment="消息总数")
     total_tokens = Column(Integer, default=0, comment="Token总数")
@@ -77,3 +82,27 @@ class DialogueSession(Base):
             "auto_archive": self.auto_archive,
             "archive_after_days": self.archive_after_days
         }
+
+
+class DialogueSessionMessage(Base):
+    """对话会话消息模型（增量持久化，每条消息一行，只追加不修改）"""
+    __tablename__ = "dialogue_session_messages"
+    __table_args__ = (
+        UniqueConstraint("session_id", "seq", name="uq_session_message_seq"),
+        Index("idx_session_level_seq", "session_id", "level", "seq"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(100), nullable=False, comment="会话唯一标识")
+    seq = Column(Integer, nullable=False, comment="会话内消息序号")
+    level = Column(String(10), nullable=False, comment="历史层级：cloud/local")
+    message_id = Column(String(100), nullable=False, comment="消息ID")
+    message_type = Column(String(50), nullable=False, comment="消息类型")
+    content = Column(Text, nullable=True, comment="消息内容")
+    payload = Column(JSON, nullable=True, comment="元数据、查询结果和分析数据")
+    token_count = Column(Integer, default=0, comment="Token数")
+    message_time = Column(DateTime, nullable=False, comment="消息时间")
+    created_at = Column(DateTime, default=func.now(), nullable=False, comment="写入时间")
+    
+    def __repr__(self):
+        return f"<DialogueSessionMessage(session_id='{self.session_id}', seq={self.seq}, level='{self.level}')>"
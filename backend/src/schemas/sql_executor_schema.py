@@ -12,6 +12,7 @@ class DatabaseTypeEnum(str, Enum):
     MYSQL = "mysql"
     SQLSERVER = "sqlserver"
     POSTGRESQL = "postgresql"
+    EMBEDDED = "embedded"
 
 
 class ExecutionRequest(BaseModel):
@@ -47,6 +48,8 @@ class PaginatedExecutionRequest(BaseModel):
     data_source_id: int = Field(..., description="数据源ID")
     page: int = Field(default=1, ge=1, description="页码（从1开始）")
     page_size: int = Field(default=1000, ge=1, le=10000, description="每页大小")
+    key_columns: Optional[List[str]] = Field(None, description="唯一排序键，提供时使用键集分页")
+    cursor: Optional[str] = Field(None, description="上一页返回的游标（键集分页）")
     
     @validator('sql')
     def validate_sql(cls, v):
@@ -72,8 +75,10 @@ class PageInfo(BaseModel):
     """分页信息"""
     page: int = Field(..., description="当前页码")
     page_size: int = Field(..., description="每页大小")
-    offset: int = Field(..., description="偏移量")
+    offset: Optional[int] = Field(None, description="偏移量（键集分页时为空）")
     has_next: bool = Field(..., description="是否有下一页")
+    mode: str = Field(default="offset", description="分页模式：offset/keyset")
+    next_cursor: Optional[str] = Field(None, description="下一页游标（键集分页）")
 
 
 class QueryResultResponse(BaseModel):
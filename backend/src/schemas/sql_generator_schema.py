@@ -8,6 +8,8 @@ from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from enum import Enum
 
+from src.schemas.sql_executor_schema import QueryResultResponse
+
 
 class SQLDialectEnum(str, Enum):
     """SQL方言类型"""
@@ -24,6 +26,7 @@ class SQLGenerationRequestSchema(BaseModel):
     sql_dialect: SQLDialectEnum = Field(SQLDialectEnum.MYSQL, description="SQL方言类型")
     include_explanation: bool = Field(True, description="是否包含解释")
     max_rows: Optional[int] = Field(1000, ge=1, le=10000, description="最大返回行数")
+    candidate_count: int = Field(1, ge=1, le=4, description="候选SQL数量，大于1时并行生成多条候选并在本地验证择优")
     
     class Config:
         schema_extra = {
@@ -33,7 +36,8 @@ class SQLGenerationRequestSchema(BaseModel):
                 "data_source_id": "ds_001",
                 "sql_dialect": "mysql",
                 "include_explanation": True,
-                "max_rows": 1000
+                "max_rows": 1000,
+                "candidate_count": 1
             }
         }
 
@@ -64,6 +68,7 @@ class SQLGenerationResultSchema(BaseModel):
     generation_time: float = Field(0.0, ge=0.0, description="生成耗时（秒）")
     semantic_context_used: Dict[str, Any] = Field(default_factory=dict, description="使用的语义上下文")
     validation_result: Optional[ValidationResultSchema] = Field(None, description="验证结果")
+    candidates: Optional[List[Dict[str, Any]]] = Field(None, description="多候选模式下按评分排序的候选SQL")
     
     class Config:
         schema_extra = {
@@ -91,6 +96,12 @@ class SQLGenerationResultSchema(BaseModel):
         }
 
 
+class SQLGenerationExecutionResponseSchema(BaseModel):
+    """生成并执行SQL的响应Schema"""
+    generation: SQLGenerationResultSchema = Field(..., description="生成结果，sql为实际执行的候选")
+    result: QueryResultResponse = Field(..., description="查询结果")
+
+
 class BatchSQLGenerationRequestSchema(BaseModel):
     """批量SQL生成请求Schema"""
     requests: List[SQLGenerationRequestSchema] = Field(..., min_items=1, max_items=10, description="批量请求列表")
@@ -151,6 +162,7 @@ class GenerationStatisticsSchema(BaseModel):
     average_confidence: float = Field(..., ge=0.0, le=1.0, description="平均置信度")
     syntax_correctness_rate: float = Field(..., ge=0.0, le=1.0, description="语法正确率")
     semantic_accuracy_rate: float = Field(..., ge=0.0, le=1.0, description="语义准确率")
+    fast_path: Dict[str, Any] = Field(default_factory=dict, description="模板快速通道统计（命中率、耗时）")
     
     class Config:
         schema_extra = {
@@ -16,6 +16,14 @@ from abc import ABC, abstractmethod
 import httpx
 from openai import AsyncOpenAI
 
+from src.services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    get_circuit_breaker_registry,
+    model_breaker_key
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -52,6 +60,13 @@ class AIModelError(Exception):
         self.retry_count = retry_count
 
 
+class ModelCircuitOpenError(AIModelError):
+    """模型端点熔断中，请求被直接拒绝"""
+    def __init__(self, message: str, model_type: ModelType, retry_after: float = 0.0):
+        super().__init__(message, model_type)
+        self.retry_after = retry_after
+
+
 class BaseModelAdapter(ABC):
     """模型适配器基类"""
     
@@ -60,6 +75,9 @@ class BaseModelAdapter(ABC):
         self.retry_count = config.get('retry_count', 3)
         self.retry_delay = config.get('retry_delay', 1.0)
         
+        # 按模型端点熔断，端点不可用时不再逐个请求走完整的退避重试
+        self.circuit_breakers = get_circuit_breaker_registry()
+        
     @abstractmethod
     async def generate(self, prompt: str, **kwargs) -> ModelResponse:
         """生成响应"""
@@ -70,25 +88,66 @@ class BaseModelAdapter(ABC):
         """流式生成响应"""
         pass
     
+    def get_circuit_breaker(self) -> CircuitBreaker:
+        """获取当前模型端点的熔断器"""
+        return self.circuit_breakers.get(
+            model_breaker_key(getattr(self, 'base_url', ''), getattr(self, 'model_name', ''))
+        )
+    
+    @staticmethod
+    def _is_endpoint_failure(error: Exception) -> bool:
+        """判断异常是否说明端点不可用（4xx请求错误说明端点本身可用，限流和请求超时除外）"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status_code = error.response.status_code
+            return status_code >= 500 or status_code in (408, 429)
+        return True
+    
     async def _retry_with_backoff(self, operation, max_retries: int = None):
-        """带退避的重试机制"""
+        """带退避的重试机制（端点熔断中时直接失败，半开探测请求不重试）"""
         max_retries = max_retries or self.retry_count
         
-        for attempt in range(max_retries + 1):
-            try:
-                return await operation()
-            except Exception as e:
-                if attempt == max_retries:
-                    raise AIModelError(
-                        f"Failed after {max_retries} retries: {str(e)}",
-                        self.model_type,
-                        attempt
-                    )
-                
-                # 指数退避
-                delay = self.retry_delay * (2 ** attempt)
-                logger.warning(f"Attempt {attempt + 1} failed, retrying in {delay}s: {str(e)}")
-                await asyncio.sleep(delay)
+        breaker = self.get_circuit_breaker()
+        try:
+            state = breaker.acquire()
+        except CircuitOpenError as e:
+            raise ModelCircuitOpenError(
+                f"Model endpoint unavailable (circuit open): {breaker.name}",
+                self.model_type,
+                e.retry_after
+            )
+        if state == CircuitState.HALF_OPEN:
+            max_retries = 0
+        
+        recorded = False
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    result = await operation()
+                except Exception as e:
+                    # 重试期间其他请求已触发熔断时不再继续重试
+                    if attempt == max_retries or breaker.state == CircuitState.OPEN:
+                        if self._is_endpoint_failure(e):
+                            breaker.record_failure(e)
+                        else:
+                            breaker.record_success()
+                        recorded = True
+                        raise AIModelError(
+                            f"Failed after {attempt} retries: {str(e)}",
+                            self.model_type,
+                            attempt
+                        )
+                    
+                    # 指数退避
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.warning(f"Attempt {attempt + 1} failed, retrying in {delay}s: {str(e)}")
+                    await asyncio.sleep(delay)
+                else:
+                    breaker.record_success()
+                    recorded = True
+                    return result
+        finally:
+            if not recorded:
+                breaker.release()
 
 
 class QwenCloudAdapter(BaseModelAdapter):
@@ -761,7 +820,17 @@ class AIModelService:
             raise AIModelError("Qwen cloud model not configured", ModelType.QWEN_CLOUD)
         
         adapter = self.adapters[ModelType.QWEN_CLOUD]
-        response = await adapter.generate(prompt, **kwargs)
+        try:
+            response = await adapter.generate(prompt, **kwargs)
+        except ModelCircuitOpenError as e:
+            # 云端模型熔断中时降级到本地模型
+            fallback = self.adapters.get(ModelType.OPENAI_LOCAL)
+            if fallback is None:
+                raise
+            logger.warning(f"云端模型熔断中，降级到本地模型生成SQL: {str(e)}")
+            response = await fallback.generate(prompt, **kwargs)
+            response.metadata = response.metadata or {}
+            response.metadata['fallback_from'] = ModelType.QWEN_CLOUD.value
         
         # 尝试提取SQL
         if hasattr(adapter, 'extract_sql_from_response'):
@@ -829,6 +898,13 @@ class AIModelService:
         
         return {}
     
+    def get_circuit_breaker_status(self) -> Dict[str, Any]:
+        """获取各模型端点的熔断器状态"""
+        return {
+            model_type.value: adapter.get_circuit_breaker().get_status()
+            for model_type, adapter in self.adapters.items()
+        }
+    
     async def close(self):
         """关闭所有适配器"""
         for adapter in self.adapters.values():
@@ -16,6 +16,9 @@ from src.services.ai_model_service import AIModelService
 from src.services.semantic_context_aggregator import SemanticContextAggregator
 from src.services.websocket_stream_service import get_websocket_stream_service, StreamMessageType
 from src.services.sql_security_validator import SQLSecurityService
+from src.services.sql_executor_service import SQLExecutorService, DatabaseType, build_data_source_config
+from src.services.query_cost_estimator import CostAction
+from src.services.sql_fast_path import get_sql_fast_path
 from src.database import get_db
 from sqlalchemy.orm import Session
 
@@ -105,6 +108,8 @@ class ChatOrchestrator:
         self.semantic_aggregator = SemanticContextAggregator()
         self.websocket_service = get_websocket_stream_service()
         self.sql_security = SQLSecurityService()
+        self.sql_executor = SQLExecutorService()
+        self.sql_fast_path = get_sql_fast_path()
         self.active_contexts: Dict[str, ChatContext] = {}
         self.max_retry_count = 3
         self.max_error_count = 5
@@ -233,6 +238,11 @@ class ChatOrchestrator:
             
             context.generated_sql = sql_result["sql"]
             
+            # 执行前成本预估：代价过高时自动加限制或请求澄清
+            cost_result = await self._check_query_cost(context, data_source_id)
+            if cost_result.get("needs_clarification", False):
+                return await self._request_clarification(context, cost_result["clarification_question"])
+            
             # 阶段5: SQL执行
             context.update_stage(ChatStage.SQL_EXECUTION)
             await self.websocket_service.send_thinking_message(
@@ -415,6 +425,11 @@ class ChatOrchestrator:
     async def _generate_sql(self, context: ChatContext, user_question: str, data_source_id: Optional[int]) -> Dict[str, Any]:
         """生成SQL"""
         try:
+            # 常见聚合/趋势/Top-N问题先走模板快速通道，未命中再调用云端模型
+            fast_result = await self._generate_sql_fast_path(context, user_question, data_source_id)
+            if fast_result is not None:
+                return fast_result
+            
             # 获取完整语义上下文
             semantic_context = await self.semantic_aggregator.aggregate_context(
                 user_question=user_question,
@@ -481,6 +496,42 @@ class ChatOrchestrator:
                 "error": str(e)
             }
     
+    async def _generate_sql_fast_path(
+        self,
+        context: ChatContext,
+        user_question: str,
+        data_source_id: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        """用模板快速通道生成SQL，未命中或数据源不支持时返回None"""
+        if not data_source_id or not self.sql_fast_path.enabled:
+            return None
+        
+        try:
+            data_source_config = await asyncio.to_thread(self._get_data_source_config, data_source_id)
+        except Exception as e:
+            logger.warning(f"获取数据源配置失败，跳过SQL快速通道: {str(e)}")
+            return None
+        if not data_source_config:
+            return None
+        
+        fast_sql = await asyncio.to_thread(
+            self.sql_fast_path.generate,
+            user_question,
+            data_source_id=str(data_source_id),
+            table_names=context.selected_tables,
+            dialect=data_source_config["type"]
+        )
+        if fast_sql is None:
+            return None
+        
+        context.metadata["sql_source"] = "fast_path"
+        context.metadata["fast_path"] = fast_sql.to_dict()
+        return {
+            "success": True,
+            "sql": fast_sql.sql,
+            "source": "fast_path"
+        }
+    
     def _extract_sql_from_response(self, response: str) -> str:
         """从AI响应中提取SQL"""
         import re
@@ -500,6 +551,54 @@ class ChatOrchestrator:
         # 如果没有代码块，返回整个响应
         return response.strip()
     
+    async def _check_query_cost(self, context: ChatContext, data_source_id: Optional[int]) -> Dict[str, Any]:
+        """通过EXPLAIN预估查询成本，必要时自动添加行数限制或请求澄清"""
+        if not data_source_id or not context.generated_sql:
+            return {"success": True}
+        
+        try:
+            data_source_config = await asyncio.to_thread(self._get_data_source_config, data_source_id)
+            if not data_source_config:
+                return {"success": True}
+            
+            estimate = await self.sql_executor.estimate_query_cost(context.generated_sql, data_source_config)
+            context.metadata["cost_estimate"] = estimate.to_dict()
+            
+            if estimate.action == CostAction.ADD_LIMIT:
+                context.generated_sql = self.sql_executor.add_row_limit(
+                    context.generated_sql,
+                    estimate.suggested_limit,
+                    DatabaseType(data_source_config["type"])
+                )
+                logger.info(f"会话 {context.session_id} 查询预估结果过大，已自动添加行数限制")
+            elif estimate.action == CostAction.CLARIFY:
+                return {
+                    "success": True,
+                    "needs_clarification": True,
+                    "clarification_question": self.sql_executor.cost_estimator.build_clarification_question(estimate)
+                }
+            
+            return {"success": True}
+            
+        except Exception as e:
+            # 成本预估失败不阻塞查询
+            logger.warning(f"查询成本预估失败: {str(e)}")
+            return {"success": True}
+    
+    def _get_data_source_config(self, data_source_id: Any) -> Optional[Dict[str, Any]]:
+        """获取数据库类型数据源的连接配置"""
+        from src.models.data_source_model import DataSource
+        
+        db_gen = get_db()
+        db = next(db_gen)
+        try:
+            data_source = db.query(DataSource).filter(DataSource.id == str(data_source_id)).first()
+            if not data_source or data_source.source_type != 'DATABASE':
+                return None
+            return build_data_source_config(data_source)
+        finally:
+            db_gen.close()
+    
     async def _execute_sql(self, context: ChatContext, data_source_id: Optional[int]) -> Dict[str, Any]:
         """执行SQL"""
         try:
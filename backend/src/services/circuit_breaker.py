@@ -0,0 +1,241 @@
+"""
+熔断器
+
+按数据源和模型端点分别熔断。客户数据库或云端模型宕机时，每个请求原本都要等待
+连接超时（connect_timeout=10）或完整的退避重试才失败，期间占用线程池线程和
+SQL执行服务的并发名额。熔断后请求立即失败（或降级到其他模型），不再等待超时。
+
+状态转换：
+- CLOSED：正常放行，连续失败达到 failure_threshold 次后转为 OPEN
+- OPEN：直接拒绝，经过 recovery_timeout 秒后转为 HALF_OPEN
+- HALF_OPEN：最多放行 half_open_max_calls 个探测请求，探测成功转为 CLOSED，失败重新转为 OPEN
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """熔断器配置"""
+    failure_threshold: int = 5       # 连续失败多少次后熔断
+    recovery_timeout: float = 30.0   # 熔断多少秒后进入半开状态
+    half_open_max_calls: int = 1     # 半开状态下同时放行的探测请求数
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """单个数据源或模型端点的熔断器（线程安全）"""
+
+    def __init__(
+        self,
+        name: str,
+        config: CircuitBreakerConfig = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.config = config or CircuitBreakerConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+        # 统计信息
+        self.total_successes = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.open_count = 0
+        self.last_failure_time: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（打开超过 recovery_timeout 后视为半开）"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if (self._state == CircuitState.OPEN and
+                self._clock() - self._opened_at >= self.config.recovery_timeout):
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info(f"熔断器 {self.name} 进入半开状态，开始探测")
+        return self._state
+
+    def _retry_after(self) -> float:
+        if self._state == CircuitState.OPEN:
+            return max(self.config.recovery_timeout - (self._clock() - self._opened_at), 0.0)
+        return 0.0
+
+    def acquire(self) -> CircuitState:
+        """
+        请求放行检查
+
+        Returns:
+            CircuitState: 放行时的状态（HALF_OPEN表示本次请求是探测请求）
+
+        Raises:
+            CircuitOpenError: 熔断中，或半开状态下探测名额已满
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return state
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.config.half_open_max_calls:
+                self._half_open_calls += 1
+                return state
+            self.rejected_calls += 1
+            raise CircuitOpenError(self.name, self._retry_after())
+
+    def record_success(self):
+        """记录一次成功（半开状态下关闭熔断器）"""
+        with self._lock:
+            self.total_successes += 1
+            self._consecutive_failures = 0
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"熔断器 {self.name} 探测成功，恢复正常")
+            self._state = CircuitState.CLOSED
+            self._half_open_calls = 0
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        """记录一次失败（半开探测失败或连续失败达到阈值时打开熔断器）"""
+        with self._lock:
+            self.total_failures += 1
+            self._consecutive_failures += 1
+            self.last_failure_time = time.time()
+            if error is not None:
+                self.last_error = str(error)[:200]
+
+            state = self._current_state()
+            if state == CircuitState.HALF_OPEN or (
+                state == CircuitState.CLOSED and self._consecutive_failures >= self.config.failure_threshold
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+                self._half_open_calls = 0
+                self.open_count += 1
+                logger.warning(
+                    f"熔断器 {self.name} 已打开（连续失败 {self._consecutive_failures} 次），"
+                    f"{self.config.recovery_timeout:.0f}秒后探测: {self.last_error}"
+                )
+
+    def release(self):
+        """请求被取消、未记录结果时归还半开探测名额"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def reset(self):
+        """重置为关闭状态"""
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._consecutive_failures = 0
+            self._half_open_calls = 0
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取熔断器状态"""
+        with self._lock:
+            state = self._current_state()
+            return {
+                "name": self.name,
+                "state": state.value,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_after": round(self._retry_after(), 2),
+                "total_successes": self.total_successes,
+                "total_failures": self.total_failures,
+                "rejected_calls": self.rejected_calls,
+                "open_count": self.open_count,
+                "last_failure_time": self.last_failure_time,
+                "last_error": self.last_error
+            }
+
+
+class CircuitBreakerRegistry:
+    """按名称管理熔断器"""
+
+    def __init__(self, config: CircuitBreakerConfig = None, clock: Callable[[], float] = time.monotonic):
+        self.config = config or CircuitBreakerConfig()
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """获取（不存在时创建）熔断器"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, self.config, self._clock)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def get_status(self, name: str) -> Optional[Dict[str, Any]]:
+        """获取指定熔断器的状态，未创建时返回None"""
+        breaker = self._breakers.get(name)
+        return breaker.get_status() if breaker else None
+
+    def get_all_status(self, prefix: str = "") -> Dict[str, Dict[str, Any]]:
+        """获取名称以prefix开头的全部熔断器状态"""
+        with self._lock:
+            breakers = [b for name, b in self._breakers.items() if name.startswith(prefix)]
+        return {breaker.name: breaker.get_status() for breaker in breakers}
+
+    def reset(self):
+        """重置全部熔断器"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+
+
+def data_source_breaker_key(host: Any, port: Any, database: Any) -> str:
+    """数据源熔断器名称（同一数据库实例上的查询共用一个熔断器）"""
+    return f"data_source:{host or ''}:{port or ''}/{database or ''}"
+
+
+def model_breaker_key(base_url: str, model_name: str) -> str:
+    """模型端点熔断器名称"""
+    return f"model:{base_url}#{model_name}"
+
+
+# 全局实例
+_registry: Optional[CircuitBreakerRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breaker_registry() -> CircuitBreakerRegistry:
+    """获取熔断器注册表（CIRCUIT_BREAKER_FAILURE_THRESHOLD / CIRCUIT_BREAKER_RECOVERY_TIMEOUT 环境变量配置）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CircuitBreakerRegistry(CircuitBreakerConfig(
+                    failure_threshold=int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5')),
+                    recovery_timeout=float(os.getenv('CIRCUIT_BREAKER_RECOVERY_TIMEOUT', '30'))
+                ))
+    return _registry
@@ -312,6 +312,10 @@ class ConnectionPoolManager:
         """
         return self._pool_stats.get(pool_id)
     
+    def get_pool_config(self, pool_id: str) -> Optional[ConnectionPoolConfig]:
+        """获取连接池配置，不存在返回None"""
+        return self._pool_configs.get(pool_id)
+    
     def get_all_pool_stats(self) -> Dict[str, ConnectionPoolStats]:
         """获取所有连接池统计信息"""
         return self._pool_stats.copy()
@@ -0,0 +1,350 @@
+"""
+上下文打包服务
+
+把语义模块的内容拆成细粒度条目（表、字段、关联、字典项、知识条目等），
+按与用户问题的相关性打分，用项目的Token计数器计算每个条目的真实Token成本，
+再以0/1背包求解在Token预算内价值最大的条目组合。
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 模块内容中不参与拆分、始终保留的键
+_PASSTHROUGH_KEYS = {"module_type"}
+
+# 背包动态规划表的最大单元数，超过时按比例放大Token粒度
+_MAX_DP_CELLS = 400_000
+
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+_WORD_PATTERN = re.compile(r'[a-z0-9_]+')
+
+
+@dataclass
+class ContextItem:
+    """上下文条目"""
+    module_type: str
+    key: str                       # 条目在模块内容中的位置，如 "tables[2]"
+    field_name: str                # 所属的内容键
+    value: Any                     # 原始值，用于重建模块内容
+    text: str                      # 参与Token计数和相关性评分的文本
+    index: Optional[Any] = None    # 列表下标或字典键，整值条目为None
+    tokens: int = 0
+    relevance: float = 0.0
+    required: bool = False         # 必须保留的条目（不参与取舍，但占用预算）
+
+
+@dataclass
+class PackingResult:
+    """打包结果"""
+    selected: List[ContextItem] = field(default_factory=list)
+    dropped: List[ContextItem] = field(default_factory=list)
+    tokens_used: int = 0
+    total_value: float = 0.0
+    budget: int = 0
+
+    def to_summary(self) -> Dict[str, Any]:
+        """转换为统计摘要"""
+        return {
+            "items_total": len(self.selected) + len(self.dropped),
+            "items_selected": len(self.selected),
+            "items_dropped": len(self.dropped),
+            "tokens_used": self.tokens_used,
+            "budget": self.budget,
+            "total_value": round(self.total_value, 4)
+        }
+
+
+class ContextPacker:
+    """上下文打包器"""
+
+    def __init__(self, cache_size: int = 2048):
+        """
+        初始化上下文打包器
+
+        Args:
+            cache_size: Token计数缓存大小（同一张表、同一个字典项会在多次请求中反复出现）
+        """
+        self.cache_size = cache_size
+        self._token_cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._encoder = None
+        self._encoder_model_type = None
+        self._encoder_loaded = False
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    # ------------------------------------------------------------------
+    # Token计数
+    # ------------------------------------------------------------------
+
+    def count_tokens(self, text: str) -> int:
+        """计算文本的Token数量（带LRU缓存）"""
+        if not text:
+            return 0
+
+        with self._cache_lock:
+            if text in self._token_cache:
+                self._token_cache.move_to_end(text)
+                self.cache_stats["hits"] += 1
+                return self._token_cache[text]
+            self.cache_stats["misses"] += 1
+
+        tokens = self._count_uncached(text)
+
+        with self._cache_lock:
+            self._token_cache[text] = tokens
+            if len(self._token_cache) > self.cache_size:
+                self._token_cache.popitem(last=False)
+        return tokens
+
+    def count_content_tokens(self, content: Dict[str, Any]) -> int:
+        """计算模块内容序列化后的Token数量"""
+        if not content:
+            return 0
+        return self.count_tokens(json.dumps(content, ensure_ascii=False, default=str))
+
+    def _count_uncached(self, text: str) -> int:
+        encoder = self._get_encoder()
+        if encoder is not None:
+            try:
+                return encoder.count_text_tokens(text, self._encoder_model_type)
+            except Exception as e:
+                logger.warning(f"Token计数失败，使用近似估算: {str(e)}")
+        return self.approximate_tokens(text)
+
+    def _get_encoder(self):
+        """延迟加载项目的Token计数器，不可用时返回None"""
+        if not self._encoder_loaded:
+            self._encoder_loaded = True
+            try:
+                from src.services.token_manager import token_manager, ModelType
+                self._encoder = token_manager
+                self._encoder_model_type = ModelType.LOCAL
+            except Exception as e:
+                logger.warning(f"Token计数器不可用，上下文打包使用近似估算: {str(e)}")
+                self._encoder = None
+        return self._encoder
+
+    @staticmethod
+    def approximate_tokens(text: str) -> int:
+        """近似估算Token数量：中文按每字1个Token，其他字符按每4个字符1个Token"""
+        cjk_count = len(_CJK_PATTERN.findall(text))
+        return cjk_count + math.ceil((len(text) - cjk_count) / 4)
+
+    # ------------------------------------------------------------------
+    # 条目拆分与评分
+    # ------------------------------------------------------------------
+
+    def split_module(self, module_type: str, content: Dict[str, Any]) -> List[ContextItem]:
+        """
+        将模块内容拆分为细粒度条目
+
+        - 列表按元素拆分（表、关联、字段映射等）
+        - 字典按键拆分（字典项、语义值等）
+        - 多行文本按行拆分（知识条目等）
+        - 其他标量整体作为一个条目
+        """
+        items = []
+        for field_name, value in content.items():
+            if field_name in _PASSTHROUGH_KEYS:
+                continue
+
+            if isinstance(value, list):
+                for i, element in enumerate(value):
+                    items.append(self._make_item(module_type, f"{field_name}[{i}]", field_name, element, i))
+            elif isinstance(value, dict):
+                for dict_key, element in value.items():
+                    items.append(self._make_item(
+                        module_type, f"{field_name}.{dict_key}", field_name, element, dict_key,
+                        text=f"{dict_key}: {self._to_text(element)}"
+                    ))
+            elif isinstance(value, str) and "\n" in value.strip():
+                lines = [line for line in value.split("\n") if line.strip()]
+                for i, line in enumerate(lines):
+                    items.append(self._make_item(module_type, f"{field_name}#{i}", field_name, line, i))
+            else:
+                items.append(self._make_item(module_type, field_name, field_name, value, None))
+        return items
+
+    def _make_item(
+        self,
+        module_type: str,
+        key: str,
+        field_name: str,
+        value: Any,
+        index: Optional[Any],
+        text: Optional[str] = None
+    ) -> ContextItem:
+        item = ContextItem(
+            module_type=module_type,
+            key=key,
+            field_name=field_name,
+            value=value,
+            text=text if text is not None else self._to_text(value),
+            index=index
+        )
+        item.tokens = self.count_tokens(item.text)
+        return item
+
+    @staticmethod
+    def _to_text(value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def extract_terms(text: str) -> Set[str]:
+        """提取用于匹配的词项：英文/数字单词和中文二元组"""
+        text = str(text).lower()
+        terms = {word for word in _WORD_PATTERN.findall(text) if len(word) > 1}
+        for segment in re.findall(r'[\u4e00-\u9fff]+', text):
+            if len(segment) == 1:
+                terms.add(segment)
+            else:
+                terms.update(segment[i:i + 2] for i in range(len(segment) - 1))
+        return terms
+
+    def score_items(self, items: Iterable[ContextItem], question: str, module_relevance: float):
+        """
+        为条目打分：模块相关性 ×（1 + 与问题的词项重合度）
+
+        不与问题重合的条目保留模块的基础分，重合越多价值越高。
+        """
+        question_terms = self.extract_terms(question)
+        for item in items:
+            overlap = 0.0
+            if question_terms:
+                matched = question_terms & self.extract_terms(item.key + " " + item.text)
+                overlap = len(matched) / len(question_terms)
+            item.relevance = module_relevance * (1.0 + overlap)
+
+    # ------------------------------------------------------------------
+    # 背包选择
+    # ------------------------------------------------------------------
+
+    def pack(self, items: List[ContextItem], budget: int) -> PackingResult:
+        """
+        在Token预算内选择价值最大的条目组合
+
+        必须保留的条目优先占用预算；其余条目以相关性为价值、Token数为重量求解0/1背包。
+        """
+        budget = max(0, int(budget))
+        result = PackingResult(budget=budget)
+
+        required = [item for item in items if item.required]
+        optional = [item for item in items if not item.required]
+
+        remaining = budget
+        for item in required:
+            if item.tokens <= remaining:
+                result.selected.append(item)
+                remaining -= item.tokens
+            else:
+                logger.warning(f"必需条目 {item.module_type}/{item.key} 超出预算被丢弃")
+                result.dropped.append(item)
+
+        # 零成本条目直接选中
+        free = [item for item in optional if item.tokens <= 0]
+        candidates = [item for item in optional if item.tokens > 0 and item.tokens <= remaining]
+        oversized = [item for item in optional if item.tokens > remaining]
+
+        chosen = set(self._solve_knapsack(candidates, remaining))
+        for i, item in enumerate(candidates):
+            if i in chosen:
+                result.selected.append(item)
+        result.selected.extend(free)
+        result.dropped.extend(item for i, item in enumerate(candidates) if i not in chosen)
+        result.dropped.extend(oversized)
+
+        # 保持条目的原始顺序，便于重建内容
+        order = {id(item): i for i, item in enumerate(items)}
+        result.selected.sort(key=lambda item: order[id(item)])
+        result.dropped.sort(key=lambda item: order[id(item)])
+
+        result.tokens_used = sum(item.tokens for item in result.selected)
+        result.total_value = sum(item.relevance for item in result.selected)
+        return result
+
+    def _solve_knapsack(self, items: List[ContextItem], capacity: int) -> List[int]:
+        """0/1背包动态规划，返回选中条目的下标"""
+        if not items or capacity <= 0:
+            return []
+
+        if sum(item.tokens for item in items) <= capacity:
+            return list(range(len(items)))
+
+        # 条目过多时放大Token粒度，重量向上取整，保证不超预算
+        scale = max(1, math.ceil(len(items) * capacity / _MAX_DP_CELLS))
+        weights = [math.ceil(item.tokens / scale) for item in items]
+        slots = capacity // scale
+
+        best = [0.0] * (slots + 1)
+        keep = []
+        for weight, item in zip(weights, items):
+            taken = bytearray(slots + 1)
+            value = item.relevance
+            for w in range(slots, weight - 1, -1):
+                candidate = best[w - weight] + value
+                if candidate > best[w]:
+                    best[w] = candidate
+                    taken[w] = 1
+            keep.append(taken)
+
+        chosen = []
+        w = slots
+        for i in range(len(items) - 1, -1, -1):
+            if keep[i][w]:
+                chosen.append(i)
+                w -= weights[i]
+        chosen.reverse()
+        return chosen
+
+    # ------------------------------------------------------------------
+    # 内容重建
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def rebuild_content(original: Dict[str, Any], selected: List[ContextItem]) -> Dict[str, Any]:
+        """用选中的条目重建模块内容，保持原有的键和顺序"""
+        by_field: Dict[str, List[ContextItem]] = {}
+        for item in selected:
+            by_field.setdefault(item.field_name, []).append(item)
+
+        rebuilt: Dict[str, Any] = {}
+        for field_name, value in original.items():
+            if field_name in _PASSTHROUGH_KEYS:
+                rebuilt[field_name] = value
+                continue
+
+            field_items = by_field.get(field_name)
+            if not field_items:
+                continue
+
+            if isinstance(value, list):
+                rebuilt[field_name] = [item.value for item in field_items]
+            elif isinstance(value, dict):
+                rebuilt[field_name] = {item.index: item.value for item in field_items}
+            elif isinstance(value, str) and "\n" in value.strip():
+                rebuilt[field_name] = "\n".join(item.value for item in field_items)
+            else:
+                rebuilt[field_name] = value
+        return rebuilt
+
+
+# 全局实例
+_context_packer: Optional[ContextPacker] = None
+
+
+def get_context_packer() -> ContextPacker:
+    """获取上下文打包器实例"""
+    global _context_packer
+    if _context_packer is None:
+        _context_packer = ContextPacker()
+    return _context_packer
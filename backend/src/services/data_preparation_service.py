@@ -5,8 +5,9 @@
 import logging
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, exists
 from src.models.data_preparation_model import Dictionary, DictionaryItem, DataTable, TableField, DynamicDictionaryConfig
+from src.services.dictionary_hierarchy import DictionaryHierarchy, DictionaryHierarchyError, build_tree
 from src.schemas.data_preparation_schema import (
     DictionaryCreate,
     DictionaryUpdate,
@@ -20,6 +21,7 @@ from src.schemas.data_preparation_schema import (
 logger = logging.getLogger(__name__)
 
 # 尝试导入缓存服务，如果失败则使用空缓存
+# 字典、字典项的增删改由缓存模块注册的ORM钩子在事务提交后失效对应缓存，这里不再显式清除
 try:
     from src.services.dictionary_cache import dictionary_cache
 except ImportError as e:
@@ -44,27 +46,27 @@ class DictionaryService:
             return None
         return dictionary_cache.get_dictionaries(page, page_size, search, status, parent_id)
     
-    def _set_cached_dictionaries(self, data: Dict[str, Any]):
+    def _set_cached_dictionaries(self, data: Dict[str, Any], page: int = 1, page_size: int = 10, search: Optional[str] = None, status: Optional[bool] = None, parent_id: Optional[str] = None):
         """
         将字典列表设置到缓存中
         """
         if dictionary_cache is not None:
-            dictionary_cache.set_dictionaries(data)
+            dictionary_cache.set_dictionaries(data, page, page_size, search, status, parent_id)
     
-    def _get_cached_dictionaries_tree(self) -> Optional[List[Dict[str, Any]]]:
+    def _get_cached_dictionaries_tree(self, status: Optional[bool] = None) -> Optional[List[Dict[str, Any]]]:
         """
         从缓存中获取字典树形结构
         """
         if dictionary_cache is None:
             return None
-        return dictionary_cache.get_dictionaries_tree()
+        return dictionary_cache.get_dictionaries_tree(status)
     
-    def _set_cached_dictionaries_tree(self, data: List[Dict[str, Any]]):
+    def _set_cached_dictionaries_tree(self, data: List[Dict[str, Any]], status: Optional[bool] = None):
         """
         将字典树形结构设置到缓存中
         """
         if dictionary_cache is not None:
-            dictionary_cache.set_dictionaries_tree(data)
+            dictionary_cache.set_dictionaries_tree(data, status)
     
     def _get_cached_dictionary_items(self, dictionary_id: str, page: int = 1, page_size: int = 10, search: Optional[str] = None, status: Optional[bool] = None) -> Optional[Dict[str, Any]]:
         """
@@ -74,12 +76,12 @@ class DictionaryService:
             return None
         return dictionary_cache.get_dictionary_items(dictionary_id, page, page_size, search, status)
     
-    def _set_cached_dictionary_items(self, dictionary_id: str, data: Dict[str, Any]):
+    def _set_cached_dictionary_items(self, dictionary_id: str, data: Dict[str, Any], page: int = 1, page_size: int = 10, search: Optional[str] = None, status: Optional[bool] = None):
         """
         将字典项列表设置到缓存中
         """
         if dictionary_cache is not None:
-            dictionary_cache.set_dictionary_items(dictionary_id, data)
+            dictionary_cache.set_dictionary_items(dictionary_id, data, page, page_size, search, status)
     
     def _get_cached_dictionary(self, dict_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -111,12 +113,15 @@ class DictionaryService:
         if dictionary_cache is not None:
             dictionary_cache.set_dictionary_item(item_id, data)
     
-    def _clear_dictionary_cache(self, dict_id: str = None):
+    def _commit(self, db: Session):
         """
-        清除字典缓存
+        提交字典变更，层级结构错误（循环引用、层级过深）时回滚并抛出ValueError
         """
-        if dictionary_cache is not None:
-            dictionary_cache.clear_dictionary_cache(dict_id)
+        try:
+            db.commit()
+        except DictionaryHierarchyError:
+            db.rollback()
+            raise
     
     def get_all_dictionaries(
         self,
@@ -186,7 +191,7 @@ class DictionaryService:
         }
         
         # 缓存结果
-        self._set_cached_dictionaries(result)
+        self._set_cached_dictionaries(result, page, page_size, search, status, parent_id)
         
         return result
     
@@ -206,7 +211,7 @@ class DictionaryService:
         logger.info(f"Getting dictionaries tree with status filter: {status}")
         
         # 尝试从缓存获取
-        cached_data = self._get_cached_dictionaries_tree()
+        cached_data = self._get_cached_dictionaries_tree(status)
         if cached_data:
             logger.info("Returning dictionaries tree from cache")
             return cached_data
@@ -217,44 +222,34 @@ class DictionaryService:
         if status is not None:
             query = query.filter(Dictionary.status == status)
         
-        all_dicts = query.all()
-        
-        # 将字典转换为字典映射，便于查找
-        dict_map = {d.id: d.to_dict() for d in all_dicts}
-        
-        # 构建树形结构
-        tree = []
-        
-        # 遍历所有字典，构建树结构
-        for dict_id, dict_info in dict_map.items():
-            # 如果有父字典，将其添加到父字典的children中
-            if dict_info['parent_id'] and dict_info['parent_id'] in dict_map:
-                parent_info = dict_map[dict_info['parent_id']]
-                if 'children' not in parent_info:
-                    parent_info['children'] = []
-                parent_info['children'].append(dict_info)
-            else:
-                # 顶级字典
-                tree.append(dict_info)
-        
-        # 按排序顺序对每个节点的子节点进行排序
-        def sort_children(node):
-            if 'children' in node:
-                node['children'].sort(key=lambda x: (x['sort_order'], x['created_at']))
-                for child in node['children']:
-                    sort_children(child)
-        
-        # 对树中的每个节点递归排序
-        for node in tree:
-            sort_children(node)
+        # 构建树形结构（父字典不在结果中的字典作为顶级节点）
+        # 缓存命中后字典变化时只替换变化的子树，见 DictionaryCache.refresh_tree
+        tree = build_tree(d.to_dict() for d in query.all())
         
         logger.info(f"Built tree with {len(tree)} top-level nodes")
         
         # 缓存结果
-        self._set_cached_dictionaries_tree(tree)
+        self._set_cached_dictionaries_tree(tree, status)
         
         return tree
     
+    def get_dictionary_subtree(self, db: Session, dict_id: str, status: Optional[bool] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取以指定字典为根的子树（一次按层级路径前缀的查询）
+        
+        Args:
+            db: 数据库会话
+            dict_id: 子树根字典ID
+            status: 启用状态筛选（可选）
+            
+        Returns:
+            树形结构的字典列表，字典不存在时返回None
+        """
+        logger.info(f"Getting subtree of dictionary {dict_id} with status filter: {status}")
+        
+        rows = DictionaryHierarchy.get_subtree(db, dict_id, status)
+        return build_tree(rows) if rows is not None else None
+    
     def get_dictionary_by_id(self, db: Session, dict_id: str) -> Optional[Dictionary]:
         """
         根据ID获取字典
@@ -268,15 +263,7 @@ class DictionaryService:
         """
         logger.info(f"Getting dictionary by ID: {dict_id}")
         
-        # 尝试从缓存获取
-        cached_data = self._get_cached_dictionary(dict_id)
-        if cached_data:
-            logger.info("Returning dictionary from cache")
-            # 从缓存中获取的数据是字典格式，需要转换为Dictionary对象
-            # 由于我们只需要返回对象，这里直接从数据库获取
-            # 在实际应用中，可以考虑缓存完整的对象
-            pass
-        
+        # 调用方需要ORM对象，直接查询数据库
         return db.query(Dictionary).filter(Dictionary.id == dict_id).first()
     
     def get_dictionary_by_code(self, db: Session, code: str) -> Optional[Dictionary]:
@@ -322,14 +309,11 @@ class DictionaryService:
         )
         
         db.add(db_dict)
-        db.commit()
+        self._commit(db)
         db.refresh(db_dict)
         
         logger.info(f"Dictionary created successfully: {dict_data.name} (ID: {db_dict.id})")
         
-        # 清除相关缓存
-        self._clear_dictionary_cache()
-        
         return db_dict
     
     def update_dictionary(self, db: Session, dict_id: str, dict_data: DictionaryUpdate) -> Dictionary:
@@ -369,14 +353,12 @@ class DictionaryService:
         if dict_data.created_by is not None:
             db_dict.created_by = dict_data.created_by
         
-        db.commit()
+        # 修改父字典时由层级索引检查循环引用并更新后代路径
+        self._commit(db)
         db.refresh(db_dict)
         
         logger.info(f"Dictionary {dict_id} updated successfully")
         
-        # 清除相关缓存
-        self._clear_dictionary_cache(dict_id)
-        
         return db_dict
     
     def delete_dictionary(self, db: Session, dict_id: str) -> bool:
@@ -403,9 +385,6 @@ class DictionaryService:
         
         logger.info(f"Dictionary {dict_id} deleted successfully")
         
-        # 清除相关缓存
-        self._clear_dictionary_cache(dict_id)
-        
         return True
     
     def get_dictionary_items(
@@ -433,15 +412,17 @@ class DictionaryService:
         """
         logger.info(f"Getting dictionary items for {dictionary_id} with page={page}, page_size={page_size}, search={search}, status={status}")
         
+        # 尝试从缓存获取（字典删除时会失效其字典项缓存，命中即说明字典存在）
+        cached_data = self._get_cached_dictionary_items(dictionary_id, page, page_size, search, status)
+        if cached_data:
+            logger.info("Returning dictionary items from cache")
+            return cached_data
+        
         # 验证字典是否存在
         dictionary = db.query(Dictionary).filter(Dictionary.id == dictionary_id).first()
         if not dictionary:
             raise ValueError(f"字典不存在: {dictionary_id}")
         
-        # 🔧 CACHE FIX: Skip cache for now to ensure fresh data
-        # This fixes the issue where cached empty results prevent new dictionary items from being displayed
-        logger.info(f"🔧 CACHE FIX: Bypassing cache to get fresh dictionary items for {dictionary_id}")
-        
         # 构建查询
         query = db.query(DictionaryItem).filter(DictionaryItem.dictionary_id == dictionary_id)
         
@@ -461,7 +442,6 @@ class DictionaryService:
         
         # 计算总数
         total = query.count()
-        logger.info(f"🔧 CACHE FIX: Found {total} dictionary items in database for {dictionary_id}")
         
         # 应用分页
         offset = (page - 1) * page_size
@@ -469,15 +449,14 @@ class DictionaryService:
         
         # 转换为响应模型
         item_list = [item.to_dict() for item in items]
-        logger.info(f"🔧 CACHE FIX: Returning {len(item_list)} dictionary items for {dictionary_id}")
         
         result = {
             "items": item_list,
             "total": total
         }
         
-        # 🔧 CACHE FIX: Don't cache the result to ensure fresh data
-        # self._set_cached_dictionary_items(dictionary_id, result)
+        # 缓存结果
+        self._set_cached_dictionary_items(dictionary_id, result, page, page_size, search, status)
         
         return result
     
@@ -494,13 +473,7 @@ class DictionaryService:
         """
         logger.info(f"Getting dictionary item by ID: {item_id}")
         
-        # 尝试从缓存获取
-        cached_data = self._get_cached_dictionary_item(item_id)
-        if cached_data:
-            logger.info("Returning dictionary item from cache")
-            # 由于缓存是字典格式，这里直接从数据库获取对象
-            pass
-        
+        # 调用方需要ORM对象，直接查询数据库
         return db.query(DictionaryItem).filter(DictionaryItem.id == item_id).first()
     
     def get_dictionary_item_by_key(self, db: Session, dictionary_id: str, item_key: str) -> Optional[DictionaryItem]:
@@ -561,10 +534,6 @@ class DictionaryService:
         
         logger.info(f"Dictionary item created successfully: {item_data.item_key} (ID: {db_item.id})")
         
-        # 🔧 CACHE FIX: Clear all dictionary cache to ensure fresh data
-        logger.info(f"🔧 CACHE FIX: Clearing all dictionary cache after creating item for {dictionary_id}")
-        self._clear_dictionary_cache()  # Clear all cache, not just specific dictionary
-        
         return db_item
     
     def update_dictionary_item(self, db: Session, item_id: str, item_data: DictionaryItemUpdate) -> DictionaryItem:
@@ -605,11 +574,6 @@ class DictionaryService:
         
         logger.info(f"Dictionary item {item_id} updated successfully")
         
-        # 清除相关缓存
-        # 获取字典ID
-        dictionary_id = db_item.dictionary_id
-        self._clear_dictionary_cache(dictionary_id)
-        
         return db_item
     
     def delete_dictionary_item(self, db: Session, item_id: str) -> bool:
@@ -631,7 +595,7 @@ class DictionaryService:
             logger.warning(f"Dictionary item {item_id} not found for deletion")
             return False
         
-        # 记录字典ID用于清除缓存
+        # 记录字典ID用于日志
         dictionary_id = db_item.dictionary_id
         
         # 删除字典项
@@ -640,12 +604,32 @@ class DictionaryService:
         
         logger.info(f"Dictionary item {item_id} deleted successfully from dictionary {dictionary_id}")
         
-        # 🔧 CACHE FIX: Clear all dictionary cache after deletion
-        logger.info(f"🔧 CACHE FIX: Clearing all dictionary cache after deleting item {item_id}")
-        self._clear_dictionary_cache()  # Clear all cache, not just specific dictionary
-        
         return True
     
+    def check_delete_dependencies(self, db: Session, dict_id: str) -> Dict[str, bool]:
+        """
+        一次查询检查删除字典前的所有依赖
+        
+        Args:
+            db: 数据库会话
+            dict_id: 字典ID
+        
+        Returns:
+            包含has_children、has_field_references、has_dynamic_configs的字典
+        """
+        logger.info(f"Checking delete dependencies of dictionary {dict_id}")
+        
+        has_children, has_field_references, has_dynamic_configs = db.query(
+            exists().where(Dictionary.parent_id == dict_id),
+            exists().where(TableField.dictionary_id == dict_id),
+            exists().where(DynamicDictionaryConfig.dictionary_id == dict_id)
+        ).one()
+        return {
+            "has_children": bool(has_children),
+            "has_field_references": bool(has_field_references),
+            "has_dynamic_configs": bool(has_dynamic_configs)
+        }
+    
     def has_children(self, db: Session, dict_id: str) -> bool:
         """
         检查字典是否有子字典
@@ -653,14 +637,13 @@ class DictionaryService:
         Args:
             db: 数据库会话
             dict_id: 字典ID
-            
+        
         Returns:
             是否有子字典
         """
         logger.info(f"Checking if dictionary {dict_id} has children")
         
-        count = db.query(Dictionary).filter(Dictionary.parent_id == dict_id).count()
-        return count > 0
+        return db.query(exists().where(Dictionary.parent_id == dict_id)).scalar()
     
     def has_field_references(self, db: Session, dict_id: str) -> bool:
         """
@@ -669,14 +652,13 @@ class DictionaryService:
         Args:
             db: 数据库会话
             dict_id: 字典ID
-            
+        
         Returns:
             是否被字段引用
         """
         logger.info(f"Checking if dictionary {dict_id} has field references")
         
-        count = db.query(TableField).filter(TableField.dictionary_id == dict_id).count()
-        return count > 0
+        return db.query(exists().where(TableField.dictionary_id == dict_id)).scalar()
     
     def has_dynamic_configs(self, db: Session, dict_id: str) -> bool:
         """
@@ -685,45 +667,26 @@ class DictionaryService:
         Args:
             db: 数据库会话
             dict_id: 字典ID
-            
+        
         Returns:
             是否有关联的动态配置
         """
         logger.info(f"Checking if dictionary {dict_id} has dynamic configurations")
         
-        count = db.query(DynamicDictionaryConfig).filter(DynamicDictionaryConfig.dictionary_id == dict_id).count()
-        return count > 0
+        return db.query(exists().where(DynamicDictionaryConfig.dictionary_id == dict_id)).scalar()
     
     def is_ancestor(self, db: Session, ancestor_id: str, child_id: str) -> bool:
         """
-        检查一个字典是否是另一个字典的祖先（递归检查）
+        检查一个字典是否是另一个字典的祖先（基于层级路径，一次查询）
         
         Args:
             db: 数据库会话
             ancestor_id: 祖先字典ID
             child_id: 子字典ID
-            
+        
         Returns:
             是否是祖先
         """
         logger.info(f"Checking if {ancestor_id} is ancestor of {child_id}")
         
-        # 如果是直接父级，直接返回True
-        if child_id == ancestor_id:
-            return True
-        
-        # 获取当前字典的父字典
-        current_dict = db.query(Dictionary).filter(Dictionary.id == child_id).first()
-        if not current_dict:
-            return False
-        
-        # 如果父字典是目标祖先，返回True
-        if current_dict.parent_id == ancestor_id:
-            return True
-        
-        # 如果有父字典，递归检查父字典
-        if current_dict.parent_id:
-            return self.is_ancestor(db, ancestor_id, current_dict.parent_id)
-        
-        # 没有父字典或未找到祖先
-        return False
\ No newline at end of file
+        return DictionaryHierarchy.is_ancestor(db, ancestor_id, child_id)
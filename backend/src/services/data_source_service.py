@@ -10,6 +10,7 @@ from src.services.connection_pool_manager import (
     ConnectionPoolConfig, 
     ConnectionPoolStatus
 )
+from src.services.circuit_breaker import data_source_breaker_key, get_circuit_breaker_registry
 from src.utils.encryption import decrypt_password
 from datetime import datetime
 
@@ -390,6 +391,13 @@ class DataSourceService:
         try:
             stats = connection_pool_manager.get_pool_stats(source_id)
             if stats:
+                # 查询执行时按数据库实例熔断，与连接池一起返回熔断器状态
+                circuit_breaker = None
+                pool_config = connection_pool_manager.get_pool_config(source_id)
+                if pool_config:
+                    circuit_breaker = get_circuit_breaker_registry().get_status(data_source_breaker_key(
+                        pool_config.host, pool_config.port, pool_config.database_name
+                    ))
                 return {
                     "pool_id": stats.pool_id,
                     "db_type": stats.db_type,
@@ -400,7 +408,8 @@ class DataSourceService:
                     "status": stats.status.value,
                     "last_check_time": stats.last_check_time,
                     "average_response_time": stats.average_response_time,
-                    "error_rate": stats.error_rate
+                    "error_rate": stats.error_rate,
+                    "circuit_breaker": circuit_breaker
                 }
             return None
             
@@ -238,6 +238,22 @@ class DataTableService:
         """
         return db.query(TableField).filter(TableField.table_id == table_id).all()
     
+    def get_key_columns(self, db: Session, table_id: str) -> List[str]:
+        """
+        获取数据表的唯一排序键（主键字段，按字段顺序）
+        
+        Args:
+            db: 数据库会话
+            table_id: 数据表ID
+            
+        Returns:
+            List[str]: 主键字段名列表，没有主键时为空
+        """
+        fields = db.query(TableField.field_name).filter(
+            and_(TableField.table_id == table_id, TableField.is_primary_key == True)
+        ).order_by(TableField.sort_order).all()
+        return [field.field_name for field in fields]
+    
     def create_table_columns(self, db: Session, table_id: str, columns: List[dict]) -> List[TableField]:
         """
         创建数据表的字段
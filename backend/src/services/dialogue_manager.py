@@ -4,34 +4,53 @@
 """
 
 import logging
+import os
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 
-from src.models.dialogue_session_model import DialogueSession, SessionStatus
+from src.models.dialogue_session_model import DialogueSession, DialogueSessionMessage, SessionStatus
 from src.services.context_manager import (
     ContextManager, 
     get_context_manager,
     SessionContext,
     CloudHistoryMessage,
-    LocalHistoryMessage
+    LocalHistoryMessage,
+    MessageType,
+    HistoryLevel
 )
 from src.database import get_db
 
 
 logger = logging.getLogger(__name__)
 
+# 持久化模式
+PERSISTENCE_SNAPSHOT = "snapshot"        # 每次整体序列化全部历史到会话表的JSON列
+PERSISTENCE_INCREMENTAL = "incremental"  # 新消息逐条追加到消息表，按水位线只写增量
+
 
 class DialogueManager:
     """对话管理服务"""
     
-    def __init__(self, db: Session, context_manager: Optional[ContextManager] = None):
+    def __init__(
+        self,
+        db: Session,
+        context_manager: Optional[ContextManager] = None,
+        persistence_mode: Optional[str] = None,
+        restore_page_size: int = 20
+    ):
         self.db = db
         self.context_manager = context_manager or get_context_manager()
         self.default_archive_days = 30
         self.default_cleanup_days = 90
+        
+        self.persistence_mode = persistence_mode or os.getenv('DIALOGUE_PERSISTENCE_MODE', PERSISTENCE_INCREMENTAL)
+        if self.persistence_mode not in (PERSISTENCE_SNAPSHOT, PERSISTENCE_INCREMENTAL):
+            raise ValueError(f"不支持的持久化模式: {self.persistence_mode}")
+        # 恢复会话时每个层级加载的最近消息数，更早的消息按需分页读取
+        self.restore_page_size = restore_page_size
     
     def create_session(
         self, 
@@ -311,36 +330,44 @@ class DialogueManager:
                     "error": "数据库会话记录不存在"
                 }
             
-            # 持久化云端消息
-            cloud_messages = [msg.to_dict() for msg in context.cloud_messages]
-            db_session.cloud_messages = cloud_messages
-            
-            # 持久化本地消息
-            local_messages = [msg.to_dict() for msg in context.local_messages]
-            db_session.local_messages = local_messages
+            if self.persistence_mode == PERSISTENCE_INCREMENTAL:
+                appended_count = self._persist_incremental(context, db_session)
+            else:
+                appended_count = None
+                
+                # 持久化云端消息
+                cloud_messages = [msg.to_dict() for msg in context.cloud_messages]
+                db_session.cloud_messages = cloud_messages
+                
+                # 持久化本地消息
+                local_messages = [msg.to_dict() for msg in context.local_messages]
+                db_session.local_messages = local_messages
+                
+                # 更新统计信息
+                db_session.message_count = len(context.cloud_messages)
+                
+                # 持久化上下文数据
+                db_session.context_data = {
+                    'compressed_context': context.compressed_context,
+                    'created_at': context.created_at.isoformat(),
+                    'last_activity': context.last_activity.isoformat()
+                }
             
-            # 更新统计信息
-            db_session.message_count = len(context.cloud_messages)
             db_session.total_tokens = context.total_tokens
-            
-            # 持久化上下文数据
-            db_session.context_data = {
-                'compressed_context': context.compressed_context,
-                'created_at': context.created_at.isoformat(),
-                'last_activity': context.last_activity.isoformat()
-            }
-            
             db_session.updated_at = datetime.now()
             self.db.commit()
             
-            logger.info(f"持久化会话上下文: {session_id}")
+            logger.info(f"持久化会话上下文: {session_id}，模式: {self.persistence_mode}")
             
-            return {
+            result = {
                 "success": True,
                 "session_id": session_id,
                 "message_count": db_session.message_count,
                 "total_tokens": db_session.total_tokens
             }
+            if appended_count is not None:
+                result["appended_count"] = appended_count
+            return result
             
         except Exception as e:
             self.db.rollback()
@@ -350,10 +377,213 @@ class DialogueManager:
                 "error": str(e)
             }
     
+    def _persist_incremental(self, context: SessionContext, db_session: DialogueSession) -> int:
+        """
+        增量持久化：只追加水位线之后的新消息，压缩上下文单独存储
+        
+        Args:
+            context: 内存中的会话上下文
+            db_session: 数据库会话记录
+            
+        Returns:
+            本次追加的消息数
+        """
+        watermark = dict(db_session.persistence_watermark or {})
+        seq = db_session.persisted_message_seq or 0
+        
+        rows = []
+        for level, messages in (
+            (HistoryLevel.CLOUD, context.cloud_messages),
+            (HistoryLevel.LOCAL, context.local_messages)
+        ):
+            level_mark = watermark.get(level.value) or {}
+            new_messages = self._messages_after_watermark(messages, level_mark)
+            if not new_messages:
+                continue
+            
+            for message in new_messages:
+                seq += 1
+                rows.append(self._to_message_row(context.session_id, seq, level, message))
+            
+            last_message = new_messages[-1]
+            watermark[level.value] = {
+                'message_id': last_message.message_id,
+                'timestamp': last_message.timestamp.isoformat(),
+                'count': level_mark.get('count', 0) + len(new_messages)
+            }
+        
+        if rows:
+            self.db.add_all(rows)
+        
+        db_session.persisted_message_seq = seq
+        db_session.persistence_watermark = watermark
+        db_session.message_count = watermark.get(HistoryLevel.CLOUD.value, {}).get('count', 0)
+        db_session.compressed_context = context.compressed_context
+        db_session.context_data = {
+            **(db_session.context_data or {}),
+            'created_at': context.created_at.isoformat(),
+            'last_activity': context.last_activity.isoformat()
+        }
+        return len(rows)
+    
+    @staticmethod
+    def _messages_after_watermark(
+        messages: List[Union[CloudHistoryMessage, LocalHistoryMessage]],
+        level_mark: Dict[str, Any]
+    ) -> List[Union[CloudHistoryMessage, LocalHistoryMessage]]:
+        """
+        找出水位线之后的新消息
+        
+        消息按时间顺序追加，从末尾向前扫描到上次持久化的最后一条消息（或更早的消息）为止，
+        耗时只与新消息数有关。内存中的旧消息被裁剪后依然可以正确定位。
+        """
+        if not level_mark:
+            return list(messages)
+        
+        last_message_id = level_mark.get('message_id')
+        last_timestamp = datetime.fromisoformat(level_mark['timestamp'])
+        
+        start = len(messages)
+        while start > 0:
+            message = messages[start - 1]
+            if message.message_id == last_message_id or message.timestamp < last_timestamp:
+                break
+            start -= 1
+        return list(messages[start:])
+    
+    @staticmethod
+    def _to_message_row(
+        session_id: str,
+        seq: int,
+        level: HistoryLevel,
+        message: Union[CloudHistoryMessage, LocalHistoryMessage]
+    ) -> DialogueSessionMessage:
+        """将内存消息转换为消息表记录"""
+        payload = {'metadata': message.metadata}
+        if level == HistoryLevel.LOCAL:
+            payload['query_result'] = message.query_result
+            payload['analysis_data'] = message.analysis_data
+        
+        return DialogueSessionMessage(
+            session_id=session_id,
+            seq=seq,
+            level=level.value,
+            message_id=message.message_id,
+            message_type=message.message_type.value,
+            content=message.content,
+            payload=payload,
+            token_count=message.token_count,
+            message_time=message.timestamp
+        )
+    
+    @staticmethod
+    def _from_message_dict(
+        level: HistoryLevel,
+        data: Dict[str, Any]
+    ) -> Union[CloudHistoryMessage, LocalHistoryMessage]:
+        """由消息字典（消息表记录或旧版JSON列中的元素）重建内存消息"""
+        timestamp = data['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        
+        fields = {
+            'message_id': data['message_id'],
+            'session_id': data['session_id'],
+            'timestamp': timestamp,
+            'message_type': MessageType(data['message_type']),
+            'content': data.get('content') or '',
+            'metadata': data.get('metadata') or {},
+            'token_count': data.get('token_count') or 0
+        }
+        if level == HistoryLevel.LOCAL:
+            return LocalHistoryMessage(
+                query_result=data.get('query_result'),
+                analysis_data=data.get('analysis_data'),
+                **fields
+            )
+        return CloudHistoryMessage(**fields)
+    
+    def _query_message_rows(
+        self,
+        session_id: str,
+        level: HistoryLevel,
+        before_seq: Optional[int],
+        limit: int
+    ) -> List[DialogueSessionMessage]:
+        """按序号倒序读取一页消息（走(session_id, level, seq)索引），返回时间正序"""
+        query = self.db.query(DialogueSessionMessage).filter(
+            DialogueSessionMessage.session_id == session_id,
+            DialogueSessionMessage.level == level.value
+        )
+        if before_seq is not None:
+            query = query.filter(DialogueSessionMessage.seq < before_seq)
+        rows = query.order_by(DialogueSessionMessage.seq.desc()).limit(limit).all()
+        rows.reverse()
+        return rows
+    
+    def _row_to_message(self, row: DialogueSessionMessage) -> Union[CloudHistoryMessage, LocalHistoryMessage]:
+        payload = row.payload or {}
+        return self._from_message_dict(HistoryLevel(row.level), {
+            'message_id': row.message_id,
+            'session_id': row.session_id,
+            'timestamp': row.message_time,
+            'message_type': row.message_type,
+            'content': row.content,
+            'metadata': payload.get('metadata'),
+            'query_result': payload.get('query_result'),
+            'analysis_data': payload.get('analysis_data'),
+            'token_count': row.token_count
+        })
+    
+    def get_message_page(
+        self,
+        session_id: str,
+        level: HistoryLevel = HistoryLevel.CLOUD,
+        before_seq: Optional[int] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        分页读取已持久化的会话消息（从最近往前翻）
+        
+        Args:
+            session_id: 会话ID
+            level: 历史层级
+            before_seq: 只返回序号小于该值的消息，默认从最新消息开始
+            limit: 每页消息数
+            
+        Returns:
+            消息列表（时间正序）和下一页的before_seq
+        """
+        try:
+            rows = self._query_message_rows(session_id, level, before_seq, limit)
+            messages = []
+            for row in rows:
+                message = self._row_to_message(row).to_dict()
+                message['seq'] = row.seq
+                messages.append(message)
+            
+            return {
+                "success": True,
+                "session_id": session_id,
+                "level": level.value,
+                "messages": messages,
+                "next_before_seq": rows[0].seq if len(rows) == limit else None
+            }
+            
+        except Exception as e:
+            logger.error(f"读取会话消息失败: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "messages": []
+            }
+    
     def _restore_session_context(self, session_id: str, db_session: DialogueSession):
         """
         从数据库恢复会话上下文到内存
         
+        只加载每个层级最近的restore_page_size条消息，更早的历史通过get_message_page按需读取。
+        
         Args:
             session_id: 会话ID
             db_session: 数据库会话记录
@@ -362,22 +592,35 @@ class DialogueManager:
             # 创建新的会话上下文
             context = self.context_manager.create_session(session_id)
             
-            # 恢复云端消息
-            if db_session.cloud_messages:
-                for msg_dict in db_session.cloud_messages:
-                    # 重建CloudHistoryMessage对象
-                    # 这里简化处理，实际应该完整恢复对象
-                    pass
-            
-            # 恢复本地消息
-            if db_session.local_messages:
-                for msg_dict in db_session.local_messages:
-                    # 重建LocalHistoryMessage对象
-                    pass
-            
-            # 恢复上下文数据
-            if db_session.context_data:
-                context.compressed_context = db_session.context_data.get('compressed_context')
+            persisted_seq = db_session.persisted_message_seq
+            if isinstance(persisted_seq, int) and persisted_seq > 0:
+                # 增量持久化的会话：从消息表读取最近的消息
+                context.cloud_messages = [
+                    self._row_to_message(row)
+                    for row in self._query_message_rows(session_id, HistoryLevel.CLOUD, None, self.restore_page_size)
+                ]
+                context.local_messages = [
+                    self._row_to_message(row)
+                    for row in self._query_message_rows(session_id, HistoryLevel.LOCAL, None, self.restore_page_size)
+                ]
+                context.compressed_context = db_session.compressed_context
+            else:
+                # 快照持久化的会话：从JSON列恢复最近的消息
+                if db_session.cloud_messages:
+                    context.cloud_messages = [
+                        self._from_message_dict(HistoryLevel.CLOUD, msg_dict)
+                        for msg_dict in db_session.cloud_messages[-self.restore_page_size:]
+                    ]
+                
+                if db_session.local_messages:
+                    context.local_messages = [
+                        self._from_message_dict(HistoryLevel.LOCAL, msg_dict)
+                        for msg_dict in db_session.local_messages[-self.restore_page_size:]
+                    ]
+                
+                # 恢复上下文数据
+                if db_session.context_data:
+                    context.compressed_context = db_session.context_data.get('compressed_context')
             
             context.total_tokens = db_session.total_tokens
             
@@ -516,7 +759,13 @@ class DialogueManager:
             
             deleted_count = len(sessions)
             
-            # 删除会话
+            # 删除会话及其追加的消息
+            session_ids = [session.session_id for session in sessions]
+            if session_ids:
+                self.db.query(DialogueSessionMessage).filter(
+                    DialogueSessionMessage.session_id.in_(session_ids)
+                ).delete(synchronize_session=False)
+            
             for session in sessions:
                 self.db.delete(session)
             
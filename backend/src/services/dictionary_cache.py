@@ -1,40 +1,120 @@
 """
 字典缓存服务
-使用Redis实现字典数据的缓存机制，支持字典树结构缓存和批量缓存
+两级缓存：进程内LRU近端缓存在前，Redis共享缓存在后，支持字典树结构缓存和批量缓存
+
+- 近端缓存：命中时不访问Redis，条目数有上限并带TTL兜底
+- 缓存版本：本地缓存版本号，不再每次生成缓存键都访问Redis；
+  清除全部缓存时递增版本号并广播，未收到广播时按刷新间隔从Redis同步
+- 按标签失效：写入Redis时把键登记到标签集合（字典列表、字典树、单个字典、单个字典项），
+  失效时只删除相关标签下的键，不扫描整个键空间
+- 跨进程失效：失效消息通过Redis发布/订阅广播，其他进程的监听线程收到后清理近端缓存
+- ORM钩子：字典、字典项、动态字典配置的增删改在事务提交后自动失效对应标签，
+  不经过DictionaryService的写入（动态字典同步、版本回滚等）同样生效；
+  字典变化时已缓存的字典树按层级索引只替换变化的子树，不整体重建
 """
 import logging
 import json
 import time
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple
 from redis import Redis, ConnectionError
 from redis.exceptions import RedisError
-from src.models.data_preparation_model import Dictionary, DictionaryItem
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.data_preparation_model import Dictionary, DictionaryItem, DynamicDictionaryConfig
+from src.services.dictionary_hierarchy import DictionaryHierarchy, patch_tree
+from src.services.service_registry import lazy_service, get_service_registry
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
 
+# 标签
+TAG_LIST = "list"
+TAG_TREE = "tree"
+
+
+def dictionary_tag(dict_id: str) -> str:
+    return f"dict:{dict_id}"
+
+
+def item_tag(item_id: str) -> str:
+    return f"item:{item_id}"
+
+
 class DictionaryCache:
     """
     字典缓存服务类
-    使用Redis实现字典数据的缓存机制
+    进程内近端缓存 + Redis共享缓存
     """
-    
-    def __init__(self):
-        """初始化字典缓存服务"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        near_cache_size: Optional[int] = None,
+        near_cache_ttl: Optional[float] = None,
+        version_refresh_interval: Optional[float] = None,
+        subscribe: bool = True
+    ):
+        """
+        初始化字典缓存服务
+
+        Args:
+            redis_client: Redis连接，为空时按环境变量创建
+            near_cache_size: 近端缓存条目上限
+            near_cache_ttl: 近端缓存条目有效期（秒）
+            version_refresh_interval: 未收到广播时从Redis同步版本号的间隔（秒）
+            subscribe: 是否启动失效广播监听线程
+        """
         self.redis_client = None
         # 使用环境变量配置Redis
         self.is_enabled = os.getenv('DICTIONARY_CACHE_ENABLED', 'false').lower() == 'true'
         self.cache_ttl = int(os.getenv('DICTIONARY_CACHE_TTL', '3600'))  # 缓存过期时间（秒）
         self.cache_version_key = "dictionary:cache_version"  # 缓存版本控制键
-        self._connect()
-        
+        self.invalidation_channel = "dictionary:invalidation"  # 失效广播频道
+        self.hot_key = "dictionary:hot"  # 字典访问热度（有序集合）
+        self.tag_prefix = "dictionary:tag:"
+        self.tree_lock_key = "dictionary:tree_lock"  # 字典树增量更新锁
+        self.near_cache_size = near_cache_size if near_cache_size is not None else int(os.getenv('DICTIONARY_NEAR_CACHE_SIZE', '1000'))
+        self.near_cache_ttl = near_cache_ttl if near_cache_ttl is not None else float(os.getenv('DICTIONARY_NEAR_CACHE_TTL', '60'))
+        self.version_refresh_interval = version_refresh_interval if version_refresh_interval is not None else float(os.getenv('DICTIONARY_CACHE_VERSION_REFRESH', '5'))
+        self.instance_id = uuid.uuid4().hex
+
+        # 近端缓存：键 -> (过期时间, 标签, 缓存内容)
+        self._near_cache: "OrderedDict[str, Tuple[float, frozenset, str]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._version: Optional[str] = None
+        self._version_checked_at = 0.0
+        self._listener: Optional[threading.Thread] = None
+        self._listener_ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._hot_counts: Counter = Counter()
+        self.stats = {
+            "near_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "invalidations": 0,
+            "messages_received": 0
+        }
+
+        if redis_client is not None:
+            self.redis_client = redis_client
+            self.is_enabled = True
+        else:
+            self._connect()
+
+        if self.is_enabled and subscribe:
+            self._start_listener()
+
     def _connect(self):
         """连接Redis服务器"""
         if not self.is_enabled:
             logger.info("Dictionary cache is disabled")
             return
-        
+
         try:
             # 使用环境变量配置Redis连接
             self.redis_client = Redis(
@@ -58,424 +138,682 @@ class DictionaryCache:
             logger.error(f"Unexpected error connecting to Redis: {str(e)}")
             self.is_enabled = False
             self.redis_client = None
-    
+
+    # ------------------------------------------------------------------
+    # 失效广播
+    # ------------------------------------------------------------------
+
+    def _start_listener(self):
+        """启动失效广播监听线程"""
+        self._listener = threading.Thread(target=self._listen, name="dictionary-cache-invalidation", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        while not self._stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.invalidation_channel)
+                # 订阅期间可能错过消息，重新订阅后丢弃近端缓存并重新同步版本号
+                self._reset_local_state()
+                self._listener_ready.set()
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._handle_message(message.get("data"))
+            except Exception as e:
+                self._listener_ready.clear()
+                logger.warning(f"Dictionary cache invalidation listener error: {str(e)}")
+                self._stop_event.wait(self.version_refresh_interval)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+        self._listener_ready.clear()
+
+    def _handle_message(self, data: Any):
+        """处理其他进程广播的失效消息"""
+        try:
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed dictionary cache invalidation message: {data!r}")
+            return
+        if message.get("origin") == self.instance_id:
+            return
+
+        self.stats["messages_received"] += 1
+        if message.get("version") is not None:
+            with self._lock:
+                self._near_cache.clear()
+                self._version = str(message["version"])
+                self._version_checked_at = time.monotonic()
+        elif message.get("tags"):
+            self._drop_local_tags(set(message["tags"]))
+
+    def _publish(self, payload: Dict[str, Any]):
+        payload["origin"] = self.instance_id
+        try:
+            self.redis_client.publish(self.invalidation_channel, json.dumps(payload))
+        except RedisError as e:
+            logger.error(f"Error publishing dictionary cache invalidation: {str(e)}")
+
+    def _reset_local_state(self):
+        with self._lock:
+            self._near_cache.clear()
+            self._version = None
+
+    def close(self):
+        """停止监听线程"""
+        self._stop_event.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+
+    def wait_until_subscribed(self, timeout: float = 5.0) -> bool:
+        """等待监听线程完成订阅（测试和预热使用）"""
+        return self._listener_ready.wait(timeout)
+
+    # ------------------------------------------------------------------
+    # 缓存版本
+    # ------------------------------------------------------------------
+
     def _get_cache_key(self, key_type: str, key_id: str = None, version: str = None) -> str:
         """
         生成缓存键
-        
+
         Args:
             key_type: 缓存类型（dictionaries, tree, items, batch）
             key_id: 键ID（字典ID、字典项ID等）
             version: 缓存版本
-            
+
         Returns:
             缓存键字符串
         """
         if version is None:
             version = self.get_cache_version()
-        
+
         if key_id:
             return f"dictionary:{key_type}:{key_id}:v{version}"
         else:
             return f"dictionary:{key_type}:v{version}"
-    
+
     def get_cache_version(self) -> str:
         """
         获取当前缓存版本
-        
+
+        监听线程在线时版本变化会通过广播推送，直接使用本地版本号；
+        否则每隔 version_refresh_interval 秒从Redis同步一次
+
         Returns:
             缓存版本字符串
         """
         if not self.is_enabled:
             return "0"
-        
+
+        with self._lock:
+            if self._version is not None and (
+                self._listener_ready.is_set()
+                or time.monotonic() - self._version_checked_at < self.version_refresh_interval
+            ):
+                return self._version
+
         try:
             version = self.redis_client.get(self.cache_version_key)
             if version:
-                return version.decode('utf-8')
+                version = version.decode('utf-8')
             else:
-                # 如果版本不存在，初始化为1
-                self.redis_client.set(self.cache_version_key, "1", ex=self.cache_ttl)
-                return "1"
+                # 如果版本不存在，初始化为1（其他进程可能同时初始化，以Redis中的值为准）
+                self.redis_client.set(self.cache_version_key, "1", ex=self.cache_ttl, nx=True)
+                version = (self.redis_client.get(self.cache_version_key) or b"1").decode('utf-8')
         except RedisError as e:
             logger.error(f"Error getting cache version: {str(e)}")
             return "0"
-    
+
+        with self._lock:
+            if version != self._version:
+                self._near_cache.clear()
+            self._version = version
+            self._version_checked_at = time.monotonic()
+        return version
+
     def set_cache_version(self, version: str):
         """
         设置缓存版本
-        
+
         Args:
             version: 缓存版本字符串
         """
         if not self.is_enabled:
             return
-        
+
         try:
             self.redis_client.set(self.cache_version_key, version, ex=self.cache_ttl)
+            self._apply_version(str(version))
             logger.info(f"Cache version set to {version}")
         except RedisError as e:
             logger.error(f"Error setting cache version: {str(e)}")
-    
+
     def increment_cache_version(self) -> str:
         """
         增加缓存版本号
-        
+
         Returns:
             新的缓存版本字符串
         """
         if not self.is_enabled:
             return "0"
-        
+
         try:
             # 使用Redis的INCR命令原子性地增加版本号
             new_version = self.redis_client.incr(self.cache_version_key)
             # 设置过期时间
             self.redis_client.expire(self.cache_version_key, self.cache_ttl)
             new_version_str = str(new_version)
+            self._apply_version(new_version_str)
             logger.info(f"Cache version incremented to {new_version_str}")
             return new_version_str
         except RedisError as e:
             logger.error(f"Error incrementing cache version: {str(e)}")
             return "0"
-    
+
+    def _apply_version(self, version: str):
+        """本地切换到新版本并广播"""
+        with self._lock:
+            self._near_cache.clear()
+            self._version = version
+            self._version_checked_at = time.monotonic()
+        self._publish({"version": version})
+
+    # ------------------------------------------------------------------
+    # 两级读写
+    # ------------------------------------------------------------------
+
+    def _get(self, key_type: str, key_id: str = None, description: str = "Dictionary cache") -> Optional[Any]:
+        """依次读取近端缓存和Redis"""
+        if not self.is_enabled:
+            return None
+
+        cache_key = self._get_cache_key(key_type, key_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._near_cache.get(cache_key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._near_cache.move_to_end(cache_key)
+                    self.stats["near_hits"] += 1
+                    logger.debug(f"{description} near-cache hit for key: {cache_key}")
+                    return json.loads(entry[2])["data"]
+                del self._near_cache[cache_key]
+
+        try:
+            cached_data = self.redis_client.get(cache_key)
+        except RedisError as e:
+            logger.error(f"Error getting {description.lower()} from cache: {str(e)}")
+            return None
+
+        if not cached_data:
+            self.stats["misses"] += 1
+            logger.info(f"{description} cache miss for key: {cache_key}")
+            return None
+
+        payload = cached_data.decode('utf-8') if isinstance(cached_data, bytes) else cached_data
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            self.stats["misses"] += 1
+            return None
+        self.stats["redis_hits"] += 1
+        self._put_near(cache_key, payload, frozenset(envelope.get("tags", ())))
+        logger.info(f"{description} cache hit for key: {cache_key}")
+        return envelope["data"]
+
+    def _set(self, key_type: str, key_id: Optional[str], data: Any, tags: Iterable[str], description: str = "Dictionary cache"):
+        """写入Redis并登记标签，同时写入近端缓存"""
+        if not self.is_enabled:
+            return
+
+        cache_key = self._get_cache_key(key_type, key_id)
+        tags = frozenset(tags)
+        try:
+            # 标签随内容一起保存，Redis命中后写入近端缓存时不需要再查询标签
+            payload = json.dumps({"tags": sorted(tags), "data": data}, ensure_ascii=False)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(cache_key, self.cache_ttl, payload)
+            for tag in tags:
+                tag_key = f"{self.tag_prefix}{tag}"
+                pipe.sadd(tag_key, cache_key)
+                pipe.expire(tag_key, self.cache_ttl)
+            pipe.execute()
+        except (RedisError, TypeError) as e:
+            logger.error(f"Error setting {description.lower()} in cache: {str(e)}")
+            return
+
+        self.stats["sets"] += 1
+        self._put_near(cache_key, payload, tags)
+        logger.info(f"{description} cached successfully with key: {cache_key}")
+
+    def _put_near(self, cache_key: str, payload: str, tags: frozenset):
+        if self.near_cache_size <= 0:
+            return
+        with self._lock:
+            self._near_cache[cache_key] = (time.monotonic() + self.near_cache_ttl, tags, payload)
+            self._near_cache.move_to_end(cache_key)
+            while len(self._near_cache) > self.near_cache_size:
+                self._near_cache.popitem(last=False)
+
+    def _drop_local_tags(self, tags: Set[str]):
+        with self._lock:
+            stale = [key for key, entry in self._near_cache.items() if entry[1] & tags]
+            for key in stale:
+                del self._near_cache[key]
+
+    @staticmethod
+    def _params_key(**params) -> str:
+        return "_".join(f"{name}{'none' if value is None or value == '' else value}" for name, value in params.items())
+
+    def _record_access(self, dict_id: str):
+        """记录字典访问热度，供预热时选择热点字典"""
+        with self._lock:
+            self._hot_counts[dict_id] += 1
+        try:
+            self.redis_client.zincrby(self.hot_key, 1, dict_id)
+        except RedisError as e:
+            logger.debug(f"Error recording dictionary access: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # 字典列表、字典树、字典详情、字典项
+    # ------------------------------------------------------------------
+
     def get_dictionaries(self, page: int = 1, page_size: int = 10, search: str = None, status: bool = None, parent_id: str = None) -> Optional[Dict[str, Any]]:
         """
         获取字典列表（带缓存）
-        
+
         Args:
             page: 页码
             page_size: 每页数量
             search: 搜索关键词
             status: 启用状态
             parent_id: 父字典ID
-            
+
         Returns:
             缓存的字典列表或None（如果缓存未命中）
         """
-        if not self.is_enabled:
-            return None
-        
-        # 构建缓存键
-        cache_key = self._get_cache_key("dictionaries", version=self.get_cache_version())
-        
-        try:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                logger.info(f"Dictionary list cache hit for key: {cache_key}")
-                return json.loads(cached_data.decode('utf-8'))
-            else:
-                logger.info(f"Dictionary list cache miss for key: {cache_key}")
-                return None
-        except RedisError as e:
-            logger.error(f"Error getting dictionary list from cache: {str(e)}")
-            return None
-    
-    def set_dictionaries(self, data: Dict[str, Any]):
+        key_id = self._params_key(p=page, ps=page_size, s=search, st=status, pid=parent_id)
+        return self._get("dictionaries", key_id, "Dictionary list")
+
+    def set_dictionaries(self, data: Dict[str, Any], page: int = 1, page_size: int = 10, search: str = None, status: bool = None, parent_id: str = None):
         """
         设置字典列表缓存
-        
+
         Args:
             data: 字典列表数据
+            page: 页码
+            page_size: 每页数量
+            search: 搜索关键词
+            status: 启用状态
+            parent_id: 父字典ID
         """
-        if not self.is_enabled:
-            return
-        
-        cache_key = self._get_cache_key("dictionaries", version=self.get_cache_version())
-        
-        try:
-            # 序列化数据
-            json_data = json.dumps(data, ensure_ascii=False)
-            # 设置缓存，使用配置的过期时间
-            self.redis_client.setex(cache_key, self.cache_ttl, json_data)
-            logger.info(f"Dictionary list cached successfully with key: {cache_key}")
-        except (RedisError, TypeError) as e:
-            logger.error(f"Error setting dictionary list in cache: {str(e)}")
-    
-    def get_dictionaries_tree(self) -> Optional[List[Dict[str, Any]]]:
+        key_id = self._params_key(p=page, ps=page_size, s=search, st=status, pid=parent_id)
+        self._set("dictionaries", key_id, data, [TAG_LIST], "Dictionary list")
+
+    def get_dictionaries_tree(self, status: bool = None) -> Optional[List[Dict[str, Any]]]:
         """
         获取字典树形结构（带缓存）
-        
+
+        Args:
+            status: 启用状态筛选
+
         Returns:
             缓存的字典树或None（如果缓存未命中）
         """
-        if not self.is_enabled:
-            return None
-        
-        cache_key = self._get_cache_key("tree", version=self.get_cache_version())
-        
-        try:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                logger.info(f"Dictionary tree cache hit for key: {cache_key}")
-                return json.loads(cached_data.decode('utf-8'))
-            else:
-                logger.info(f"Dictionary tree cache miss for key: {cache_key}")
-                return None
-        except RedisError as e:
-            logger.error(f"Error getting dictionary tree from cache: {str(e)}")
-            return None
-    
-    def set_dictionaries_tree(self, data: List[Dict[str, Any]]):
+        return self._get("tree", self._params_key(st=status), "Dictionary tree")
+
+    def set_dictionaries_tree(self, data: List[Dict[str, Any]], status: bool = None):
         """
         设置字典树形结构缓存
-        
+
         Args:
             data: 字典树数据
+            status: 启用状态筛选
         """
-        if not self.is_enabled:
-            return
-        
-        cache_key = self._get_cache_key("tree", version=self.get_cache_version())
-        
-        try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            self.redis_client.setex(cache_key, self.cache_ttl, json_data)
-            logger.info(f"Dictionary tree cached successfully with key: {cache_key}")
-        except (RedisError, TypeError) as e:
-            logger.error(f"Error setting dictionary tree in cache: {str(e)}")
-    
+        self._set("tree", self._params_key(st=status), data, [TAG_TREE], "Dictionary tree")
+
     def get_dictionary_items(self, dictionary_id: str, page: int = 1, page_size: int = 10, search: str = None, status: bool = None) -> Optional[Dict[str, Any]]:
         """
         获取字典项列表（带缓存）
-        
+
         Args:
             dictionary_id: 字典ID
             page: 页码
             page_size: 每页数量
             search: 搜索关键词
             status: 启用状态
-            
+
         Returns:
             缓存的字典项列表或None（如果缓存未命中）
         """
         if not self.is_enabled:
             return None
-        
-        # 构建缓存键，包含所有查询参数
-        params = f"p{page}_ps{page_size}_s{search or 'none'}_st{status or 'none'}"
-        cache_key = self._get_cache_key("items", f"{dictionary_id}_{params}", version=self.get_cache_version())
-        
-        try:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                logger.info(f"Dictionary items cache hit for key: {cache_key}")
-                return json.loads(cached_data.decode('utf-8'))
-            else:
-                logger.info(f"Dictionary items cache miss for key: {cache_key}")
-                return None
-        except RedisError as e:
-            logger.error(f"Error getting dictionary items from cache: {str(e)}")
-            return None
-    
-    def set_dictionary_items(self, dictionary_id: str, data: Dict[str, Any]):
+
+        params = self._params_key(p=page, ps=page_size, s=search, st=status)
+        data = self._get("items", f"{dictionary_id}_{params}", "Dictionary items")
+        if data is None:
+            self._record_access(dictionary_id)
+        return data
+
+    def set_dictionary_items(self, dictionary_id: str, data: Dict[str, Any], page: int = 1, page_size: int = 10, search: str = None, status: bool = None):
         """
         设置字典项列表缓存
-        
+
         Args:
             dictionary_id: 字典ID
             data: 字典项列表数据
+            page: 页码
+            page_size: 每页数量
+            search: 搜索关键词
+            status: 启用状态
         """
-        if not self.is_enabled:
-            return
-        
-        # 构建缓存键，包含所有查询参数
-        # 注意：这里需要根据实际的查询参数来构建，但为了简化，我们假设是默认参数
-        # 在实际使用中，应该根据具体的查询参数来构建缓存键
-        cache_key = self._get_cache_key("items", f"{dictionary_id}_p1_ps10_snone_stnone", version=self.get_cache_version())
-        
-        try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            self.redis_client.setex(cache_key, self.cache_ttl, json_data)
-            logger.info(f"Dictionary items cached successfully with key: {cache_key}")
-        except (RedisError, TypeError) as e:
-            logger.error(f"Error setting dictionary items in cache: {str(e)}")
-    
+        params = self._params_key(p=page, ps=page_size, s=search, st=status)
+        self._set("items", f"{dictionary_id}_{params}", data, [dictionary_tag(dictionary_id)], "Dictionary items")
+
     def get_dictionary(self, dict_id: str) -> Optional[Dict[str, Any]]:
         """
         获取单个字典详情（带缓存）
-        
+
         Args:
             dict_id: 字典ID
-            
+
         Returns:
             缓存的字典详情或None（如果缓存未命中）
         """
-        if not self.is_enabled:
-            return None
-        
-        cache_key = self._get_cache_key("dict", dict_id, version=self.get_cache_version())
-        
-        try:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                logger.info(f"Dictionary cache hit for key: {cache_key}")
-                return json.loads(cached_data.decode('utf-8'))
-            else:
-                logger.info(f"Dictionary cache miss for key: {cache_key}")
-                return None
-        except RedisError as e:
-            logger.error(f"Error getting dictionary from cache: {str(e)}")
-            return None
-    
+        return self._get("dict", dict_id, "Dictionary")
+
     def set_dictionary(self, dict_id: str, data: Dict[str, Any]):
         """
         设置单个字典详情缓存
-        
+
         Args:
             dict_id: 字典ID
             data: 字典详情数据
         """
-        if not self.is_enabled:
-            return
-        
-        cache_key = self._get_cache_key("dict", dict_id, version=self.get_cache_version())
-        
-        try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            self.redis_client.setex(cache_key, self.cache_ttl, json_data)
-            logger.info(f"Dictionary cached successfully with key: {cache_key}")
-        except (RedisError, TypeError) as e:
-            logger.error(f"Error setting dictionary in cache: {str(e)}")
-    
+        self._set("dict", dict_id, data, [dictionary_tag(dict_id)], "Dictionary")
+
     def get_dictionary_item(self, item_id: str) -> Optional[Dict[str, Any]]:
         """
         获取单个字典项（带缓存）
-        
+
         Args:
             item_id: 字典项ID
-            
+
         Returns:
             缓存的字典项或None（如果缓存未命中）
         """
-        if not self.is_enabled:
-            return None
-        
-        cache_key = self._get_cache_key("item", item_id, version=self.get_cache_version())
-        
-        try:
-            cached_data = self.redis_client.get(cache_key)
-            if cached_data:
-                logger.info(f"Dictionary item cache hit for key: {cache_key}")
-                return json.loads(cached_data.decode('utf-8'))
-            else:
-                logger.info(f"Dictionary item cache miss for key: {cache_key}")
-                return None
-        except RedisError as e:
-            logger.error(f"Error getting dictionary item from cache: {str(e)}")
-            return None
-    
+        return self._get("item", item_id, "Dictionary item")
+
     def set_dictionary_item(self, item_id: str, data: Dict[str, Any]):
         """
         设置单个字典项缓存
-        
+
         Args:
             item_id: 字典项ID
             data: 字典项数据
         """
+        tags = [item_tag(item_id)]
+        if isinstance(data, dict) and data.get("dictionary_id"):
+            tags.append(dictionary_tag(data["dictionary_id"]))
+        self._set("item", item_id, data, tags, "Dictionary item")
+
+    # ------------------------------------------------------------------
+    # 失效
+    # ------------------------------------------------------------------
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        """
+        删除标签下的所有缓存键并广播失效消息
+
+        Args:
+            tags: 标签列表
+        """
         if not self.is_enabled:
             return
-        
-        cache_key = self._get_cache_key("item", item_id, version=self.get_cache_version())
-        
+
+        tags = sorted(set(tags))
+        if not tags:
+            return
+
+        self._drop_local_tags(set(tags))
+        tag_keys = [f"{self.tag_prefix}{tag}" for tag in tags]
         try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            self.redis_client.setex(cache_key, self.cache_ttl, json_data)
-            logger.info(f"Dictionary item cached successfully with key: {cache_key}")
-        except (RedisError, TypeError) as e:
-            logger.error(f"Error setting dictionary item in cache: {str(e)}")
-    
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = pipe.execute()
+
+            keys_to_delete = set(tag_keys)
+            for keys in members:
+                for key in keys or ():
+                    key = key.decode('utf-8') if isinstance(key, bytes) else key
+                    keys_to_delete.add(key)
+            self.redis_client.delete(*keys_to_delete)
+            self.stats["invalidations"] += 1
+            logger.info(f"Cleared {len(keys_to_delete) - len(tag_keys)} cache entries for tags {tags}")
+        except RedisError as e:
+            logger.error(f"Error clearing dictionary cache: {str(e)}")
+
+        self._publish({"tags": tags})
+
+    def invalidate_dictionaries(self, dict_ids: Iterable[str] = (), item_ids: Iterable[str] = ()):
+        """
+        失效字典和字典项相关的缓存（字典列表和字典树总是一并失效）
+
+        Args:
+            dict_ids: 变化的字典ID
+            item_ids: 变化的字典项ID
+        """
+        tags = {TAG_LIST, TAG_TREE}
+        tags.update(dictionary_tag(dict_id) for dict_id in dict_ids if dict_id)
+        tags.update(item_tag(item_id) for item_id in item_ids if item_id)
+        self.invalidate_tags(tags)
+
+    def refresh_tree(self, dict_ids: Iterable[str], bind) -> bool:
+        """
+        增量更新已缓存的字典树（各状态筛选条件分别更新）
+
+        只查询变化字典的子树并替换到缓存的树中；多个进程同时更新时通过Redis锁串行，
+        获取锁失败或更新出错时退回到失效字典树
+
+        Args:
+            dict_ids: 变化的字典ID
+            bind: 数据库引擎，用于查询已提交的数据
+
+        Returns:
+            是否完成增量更新
+        """
+        if not self.is_enabled:
+            return False
+
+        dict_ids = list(dict_ids)
+        token = uuid.uuid4().hex
+        try:
+            acquired = self._acquire_tree_lock(token)
+        except RedisError as e:
+            logger.error(f"Error acquiring dictionary tree lock: {str(e)}")
+            acquired = False
+        if not acquired:
+            self.invalidate_tags([TAG_TREE])
+            return False
+
+        try:
+            session = Session(bind=bind)
+            try:
+                for status in (None, True, False):
+                    cache_key = self._get_cache_key("tree", self._params_key(st=status))
+                    cached = self.redis_client.get(cache_key)
+                    if not cached:
+                        continue
+                    tree = json.loads(cached)["data"]
+                    tree = patch_tree(
+                        tree, dict_ids,
+                        lambda dict_id: DictionaryHierarchy.get_subtree(session, dict_id, status)
+                    )
+                    self.set_dictionaries_tree(tree, status)
+            finally:
+                session.close()
+        except Exception as e:
+            logger.error(f"Error refreshing dictionary tree cache: {str(e)}")
+            self.invalidate_tags([TAG_TREE])
+            return False
+        finally:
+            self._release_tree_lock(token)
+
+        # 其他进程丢弃近端缓存中的旧字典树，下次从Redis读取更新后的版本
+        self._publish({"tags": [TAG_TREE]})
+        logger.info(f"Dictionary tree cache refreshed for {len(dict_ids)} changed dictionaries")
+        return True
+
+    def _acquire_tree_lock(self, token: str, timeout: float = 2.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.redis_client.set(self.tree_lock_key, token, ex=10, nx=True):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+
+    def _release_tree_lock(self, token: str):
+        try:
+            current = self.redis_client.get(self.tree_lock_key)
+            if current is not None and (current.decode('utf-8') if isinstance(current, bytes) else current) == token:
+                self.redis_client.delete(self.tree_lock_key)
+        except RedisError as e:
+            logger.debug(f"Error releasing dictionary tree lock: {str(e)}")
+
     def clear_dictionary_cache(self, dict_id: str = None):
         """
         清除字典缓存
-        
+
         Args:
             dict_id: 字典ID，如果为None则清除所有字典相关缓存
         """
         if not self.is_enabled:
             return
-        
-        try:
-            if dict_id:
-                # 清除特定字典的缓存
-                keys_to_delete = []
-                
-                # 获取所有匹配的键
-                pattern = f"dictionary:*:{dict_id}:*"
-                for key in self.redis_client.scan_iter(pattern):
-                    keys_to_delete.append(key.decode('utf-8'))
-                
-                # 删除所有匹配的键
-                if keys_to_delete:
-                    self.redis_client.delete(*keys_to_delete)
-                    logger.info(f"Cleared {len(keys_to_delete)} cache entries for dictionary {dict_id}")
-                
-                # 清除字典树缓存（因为字典树包含所有字典）
-                tree_key = self._get_cache_key("tree", version=self.get_cache_version())
-                self.redis_client.delete(tree_key)
-                logger.info(f"Cleared dictionary tree cache")
-                
-                # 清除字典列表缓存
-                list_key = self._get_cache_key("dictionaries", version=self.get_cache_version())
-                self.redis_client.delete(list_key)
-                logger.info(f"Cleared dictionary list cache")
-                
-            else:
-                # 清除所有字典缓存
-                # 增加缓存版本号，这将使所有现有缓存失效
-                new_version = self.increment_cache_version()
-                logger.info(f"Cleared all dictionary caches by incrementing version to {new_version}")
-                
-        except RedisError as e:
-            logger.error(f"Error clearing dictionary cache: {str(e)}")
-    
+
+        if dict_id:
+            # 清除特定字典的缓存，以及包含所有字典的字典树和字典列表
+            self.invalidate_dictionaries([dict_id])
+        else:
+            # 增加缓存版本号，这将使所有现有缓存失效
+            new_version = self.increment_cache_version()
+            logger.info(f"Cleared all dictionary caches by incrementing version to {new_version}")
+
     def clear_all_cache(self):
         """
         清除所有字典缓存
         """
         if not self.is_enabled:
             return
-        
+
+        # 增加缓存版本号，这将使所有现有缓存失效
+        new_version = self.increment_cache_version()
+        logger.info(f"Cleared all dictionary caches by incrementing version to {new_version}")
+
+    # ------------------------------------------------------------------
+    # 预热
+    # ------------------------------------------------------------------
+
+    def get_hot_dictionaries(self, limit: int = 20) -> List[str]:
+        """
+        获取访问最多的字典ID（各进程共享Redis中的热度统计）
+
+        Args:
+            limit: 返回数量
+        """
+        if not self.is_enabled:
+            return []
         try:
-            # 增加缓存版本号，这将使所有现有缓存失效
-            new_version = self.increment_cache_version()
-            logger.info(f"Cleared all dictionary caches by incrementing version to {new_version}")
+            hot = self.redis_client.zrevrange(self.hot_key, 0, limit - 1)
+            return [dict_id.decode('utf-8') if isinstance(dict_id, bytes) else dict_id for dict_id in hot]
         except RedisError as e:
-            logger.error(f"Error clearing all dictionary caches: {str(e)}")
-    
-    def warm_up_cache(self, dict_ids: List[str] = None):
+            logger.error(f"Error getting hot dictionaries: {str(e)}")
+            with self._lock:
+                return [dict_id for dict_id, _ in self._hot_counts.most_common(limit)]
+
+    def warm_up_cache(self, dict_ids: List[str] = None, db: Session = None, dictionary_service=None, limit: int = None) -> Dict[str, Any]:
         """
         预热缓存
-        
+
+        通过DictionaryService加载字典树、字典列表首页和热点字典的字典项首页
+
         Args:
-            dict_ids: 要预热的字典ID列表，如果为None则预热所有字典
+            dict_ids: 要预热的字典ID列表，如果为None则预热访问最多的字典
+            db: 数据库会话，为空时新建
+            dictionary_service: 字典服务，为空时新建
+            limit: 未指定字典时预热的热点字典数量
+
+        Returns:
+            预热结果统计
         """
         if not self.is_enabled:
-            return
-        
+            return {"enabled": False}
+
+        from src import database
+        from src.services.data_preparation_service import DictionaryService
+
+        service = dictionary_service or DictionaryService()
+        own_session = db is None
+        session = database.SessionLocal() if own_session else db
+        start = time.perf_counter()
+        result = {"enabled": True, "tree": 0, "lists": 0, "dictionaries": 0, "failed": []}
         try:
-            if dict_ids:
-                # 预热指定的字典
-                for dict_id in dict_ids:
-                    # 预热字典详情
-                    # 这里需要调用实际的数据服务来获取数据
-                    # 由于缓存服务不应该直接依赖数据服务，所以这个方法需要在外部调用
-                    pass
-                logger.info(f"Warm-up initiated for {len(dict_ids)} dictionaries")
-            else:
-                # 预热所有字典
-                # 同样，需要外部调用数据服务获取数据
-                logger.info("Warm-up initiated for all dictionaries")
-        except RedisError as e:
+            service.get_dictionaries_tree(session)
+            result["tree"] = 1
+            service.get_all_dictionaries(session)
+            result["lists"] = 1
+
+            if dict_ids is None:
+                limit = limit or int(os.getenv('DICTIONARY_CACHE_WARMUP_LIMIT', '20'))
+                dict_ids = self.get_hot_dictionaries(limit)
+                if not dict_ids:
+                    # 尚无访问统计时按排序预热前若干个字典
+                    dict_ids = [d.id for d in session.query(Dictionary.id).order_by(Dictionary.sort_order, Dictionary.created_at).limit(limit)]
+
+            for dict_id in dict_ids:
+                try:
+                    service.get_dictionary_items(session, dict_id)
+                    result["dictionaries"] += 1
+                except ValueError:
+                    result["failed"].append(dict_id)
+        except Exception as e:
             logger.error(f"Error warming up cache: {str(e)}")
-    
+            result["error"] = str(e)
+        finally:
+            if own_session:
+                session.close()
+
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"Dictionary cache warm-up completed: {result}")
+        return result
+
     def get_cache_stats(self) -> Dict[str, Any]:
         """
         获取缓存统计信息
-        
+
         Returns:
             缓存统计信息字典
         """
+        with self._lock:
+            near_cache = {
+                **self.stats,
+                "size": len(self._near_cache),
+                "max_size": self.near_cache_size,
+                "ttl": self.near_cache_ttl,
+                "subscribed": self._listener_ready.is_set()
+            }
+
         if not self.is_enabled:
             return {
                 "enabled": False,
@@ -483,25 +821,26 @@ class DictionaryCache:
                 "cache_version": "0",
                 "total_keys": 0,
                 "hit_rate": 0,
-                "ttl": self.cache_ttl
+                "ttl": self.cache_ttl,
+                "near_cache": near_cache
             }
-        
+
         try:
             # 获取缓存版本
             cache_version = self.get_cache_version()
-            
+
             # 获取Redis统计信息
             info = self.redis_client.info()
-            
+
             # 计算命中率（如果可用）
             hits = int(info.get('keyspace_hits', 0))
             misses = int(info.get('keyspace_misses', 0))
             total = hits + misses
             hit_rate = (hits / total * 100) if total > 0 else 0
-            
+
             # 获取键数量
             key_count = self.redis_client.dbsize()
-            
+
             return {
                 "enabled": True,
                 "connected": True,
@@ -509,6 +848,7 @@ class DictionaryCache:
                 "total_keys": key_count,
                 "hit_rate": round(hit_rate, 2),
                 "ttl": self.cache_ttl,
+                "near_cache": near_cache,
                 "redis_info": {
                     "connected_clients": info.get('connected_clients'),
                     "used_memory": info.get('used_memory_human'),
@@ -524,8 +864,83 @@ class DictionaryCache:
                 "cache_version": "0",
                 "total_keys": 0,
                 "hit_rate": 0,
-                "ttl": self.cache_ttl
+                "ttl": self.cache_ttl,
+                "near_cache": near_cache
             }
 
-# 创建全局实例
-dictionary_cache = DictionaryCache()
+
+# ----------------------------------------------------------------------
+# ORM会话钩子：事务提交后失效变化的字典
+# ----------------------------------------------------------------------
+
+_PENDING_KEY = "dictionary_cache_changes"
+
+
+def _new_pending():
+    return {"dicts": set(), "items": set(), "tree": set(), "all": False}
+
+
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, _new_pending())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Dictionary):
+            pending["dicts"].add(obj.id)
+            pending["tree"].add(obj.id)
+        elif isinstance(obj, DictionaryItem):
+            pending["dicts"].add(obj.dictionary_id)
+            pending["items"].add(obj.id)
+        elif isinstance(obj, DynamicDictionaryConfig):
+            pending["dicts"].add(obj.dictionary_id)
+
+
+def _collect_bulk_changes(context):
+    mapper = getattr(context, "mapper", None)
+    if getattr(mapper, "class_", None) in (Dictionary, DictionaryItem, DynamicDictionaryConfig):
+        # 批量语句无法确定具体对象，失效全部缓存
+        pending = context.session.info.setdefault(_PENDING_KEY, _new_pending())
+        pending["all"] = True
+
+
+def _publish_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not (pending["all"] or pending["dicts"] or pending["items"]):
+        return
+    # 即使本进程尚未使用过缓存，Redis中也可能有其他进程写入的条目，因此总是执行失效
+    try:
+        if pending["all"]:
+            dictionary_cache.clear_all_cache()
+            return
+        # 字典列表和字典树只包含字典本身，字典项变化不影响
+        tags = {dictionary_tag(dict_id) for dict_id in pending["dicts"] if dict_id}
+        tags.update(item_tag(item_id) for item_id in pending["items"] if item_id)
+        if pending["tree"]:
+            tags.add(TAG_LIST)
+        dictionary_cache.invalidate_tags(tags)
+        if pending["tree"]:
+            dictionary_cache.refresh_tree(sorted(pending["tree"]), session.get_bind())
+    except Exception as e:
+        logger.error(f"Error invalidating dictionary cache after commit: {str(e)}")
+
+
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_session_hooks():
+    """注册ORM会话钩子（重复调用无副作用）"""
+    if event.contains(Session, "after_flush", _collect_changes):
+        return
+    event.listen(Session, "after_flush", _collect_changes)
+    event.listen(Session, "after_bulk_update", _collect_bulk_changes)
+    event.listen(Session, "after_bulk_delete", _collect_bulk_changes)
+    event.listen(Session, "after_commit", _publish_changes)
+    event.listen(Session, "after_rollback", _discard_changes)
+
+
+# 全局实例（首次使用时才连接Redis）
+dictionary_cache = lazy_service("dictionary_cache", DictionaryCache)
+
+install_session_hooks()
+
+# 服务开始接收请求后，后台预热字典树、字典列表和热点字典
+get_service_registry().add_warm_up_task("dictionary_cache", lambda: dictionary_cache.warm_up_cache())
@@ -0,0 +1,348 @@
+"""
+字典层级索引
+
+字典表的 path 列保存从根字典到自身的ID路径（如 ``/根ID/父ID/自身ID/``），depth 列保存层级深度。
+路径由会话钩子在 flush 前维护，创建、修改父字典（移动）时自动更新自身及所有后代的路径，
+不经过 DictionaryService 的写入同样生效。基于路径：
+
+- 祖先判断：一次按主键的查询
+- 子树查询：一次按路径前缀的索引查询
+- 循环引用检查：移动时检查新父字典的路径是否包含自身
+- 字典树缓存增量更新：只重新查询变化字典的子树并替换到已缓存的树中
+"""
+import logging
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, aliased
+
+from src.models.data_preparation_model import Dictionary
+
+# 创建日志记录器
+logger = logging.getLogger(__name__)
+
+# 路径列长度上限（每层占用 ID长度+1 个字符，UUID约支持20层）
+MAX_PATH_LENGTH = 760
+
+
+class DictionaryHierarchyError(ValueError):
+    """层级结构错误（循环引用、层级过深）"""
+
+
+def make_path(dict_id: str, parent_path: Optional[str] = None) -> str:
+    """根据父字典路径生成字典路径"""
+    return f"{parent_path or '/'}{dict_id}/"
+
+
+def path_depth(path: str) -> int:
+    """路径对应的层级深度（根字典为0）"""
+    return path.count("/") - 2
+
+
+def _sort_key(node: Dict[str, Any]):
+    return (node.get('sort_order') or 0, node.get('created_at') or '')
+
+
+def build_tree(nodes: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    将字典列表组装为树形结构
+
+    父字典不在列表中的字典（如被状态筛选排除）作为顶级节点
+
+    Args:
+        nodes: 字典数据（to_dict 结果），按排序顺序排列
+
+    Returns:
+        树形结构的字典列表
+    """
+    dict_map = {node['id']: node for node in nodes}
+    tree = []
+    for node in dict_map.values():
+        parent = dict_map.get(node.get('parent_id')) if node.get('parent_id') else None
+        if parent is not None:
+            parent.setdefault('children', []).append(node)
+        else:
+            tree.append(node)
+
+    def sort_children(node):
+        if 'children' in node:
+            node['children'].sort(key=_sort_key)
+            for child in node['children']:
+                sort_children(child)
+
+    for node in tree:
+        sort_children(node)
+    return tree
+
+
+def patch_tree(
+    tree: List[Dict[str, Any]],
+    changed_ids: Iterable[str],
+    fetch_subtree: Callable[[str], Optional[List[Dict[str, Any]]]]
+) -> List[Dict[str, Any]]:
+    """
+    增量更新已缓存的字典树
+
+    对每个变化的字典，从树中移除其旧节点，重新查询其子树后挂到新的父节点下。
+    已被前面的子树覆盖的字典不再重复查询。
+
+    Args:
+        tree: 已缓存的字典树（原地修改）
+        changed_ids: 变化的字典ID
+        fetch_subtree: 查询字典子树的函数，返回按排序顺序排列的字典数据，字典不存在时返回None
+
+    Returns:
+        更新后的字典树
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    containers: Dict[str, List[Dict[str, Any]]] = {}
+
+    def index_nodes(nodes: List[Dict[str, Any]]):
+        for node in nodes:
+            index[node['id']] = node
+            containers[node['id']] = nodes
+            index_nodes(node.get('children', []))
+
+    def remove(node_id: str):
+        node = index.get(node_id)
+        if node is None:
+            return
+        container = containers[node_id]
+        container.remove(node)
+        parent = index.get(node.get('parent_id'))
+        if parent is not None and parent.get('children') is container and not container:
+            del parent['children']
+        for descendant_id in _collect_ids([node]):
+            index.pop(descendant_id, None)
+            containers.pop(descendant_id, None)
+
+    index_nodes(tree)
+    covered = set()
+    for dict_id in changed_ids:
+        if dict_id in covered:
+            continue
+        rows = fetch_subtree(dict_id)
+        if rows is None:
+            # 字典已删除：移除节点，残留的子字典按完整构建的规则成为顶级节点
+            orphans = [child['id'] for child in index.get(dict_id, {}).get('children', [])]
+            remove(dict_id)
+            for orphan_id in orphans:
+                if orphan_id not in covered:
+                    rows = fetch_subtree(orphan_id) or []
+                    _attach(tree, index, containers, rows, remove)
+                    covered.update(row['id'] for row in rows)
+            continue
+        # 字典本身可能不再满足筛选条件，先移除旧节点
+        remove(dict_id)
+        _attach(tree, index, containers, rows, remove)
+        covered.update(row['id'] for row in rows)
+    return tree
+
+
+def _collect_ids(nodes: List[Dict[str, Any]]) -> List[str]:
+    ids = []
+    for node in nodes:
+        ids.append(node['id'])
+        ids.extend(_collect_ids(node.get('children', [])))
+    return ids
+
+
+def _attach(tree, index, containers, rows, remove):
+    """用查询到的子树替换树中的对应节点"""
+    for row in rows:
+        remove(row['id'])
+    for subtree_root in build_tree(rows):
+        parent = index.get(subtree_root.get('parent_id')) if subtree_root.get('parent_id') else None
+        container = parent.setdefault('children', []) if parent is not None else tree
+        container.append(subtree_root)
+        container.sort(key=_sort_key)
+
+        stack = [(subtree_root, container)]
+        while stack:
+            node, node_container = stack.pop()
+            index[node['id']] = node
+            containers[node['id']] = node_container
+            stack.extend((child, node['children']) for child in node.get('children', []))
+
+
+class DictionaryHierarchy:
+    """基于层级路径的字典查询"""
+
+    @staticmethod
+    def get_path(db: Session, dict_id: str) -> Optional[str]:
+        """获取字典路径，路径缺失时（如未迁移的历史数据）按父字典链补齐"""
+        dictionary = db.get(Dictionary, dict_id)
+        if dictionary is None:
+            return None
+        if dictionary.path is None:
+            _assign_path(db, dictionary, {})
+        return dictionary.path
+
+    @staticmethod
+    def is_ancestor(db: Session, ancestor_id: str, child_id: str) -> bool:
+        """
+        检查一个字典是否是另一个字典的祖先（字典视为自身的祖先）
+
+        Args:
+            db: 数据库会话
+            ancestor_id: 祖先字典ID
+            child_id: 子字典ID
+
+        Returns:
+            是否是祖先
+        """
+        if ancestor_id == child_id:
+            return True
+        path = DictionaryHierarchy.get_path(db, child_id)
+        return bool(path) and f"/{ancestor_id}/" in path
+
+    @staticmethod
+    def subtree_query(db: Session, dict_id: str, status: Optional[bool] = None):
+        """
+        字典及其所有后代的查询（一次按路径前缀的索引查询）
+
+        Args:
+            db: 数据库会话
+            dict_id: 子树根字典ID
+            status: 启用状态筛选
+        """
+        root = aliased(Dictionary)
+        query = db.query(Dictionary).join(root, root.id == dict_id).filter(
+            Dictionary.path.startswith(root.path)
+        )
+        if status is not None:
+            query = query.filter(Dictionary.status == status)
+        return query.order_by(Dictionary.sort_order, Dictionary.created_at)
+
+    @staticmethod
+    def get_subtree(db: Session, dict_id: str, status: Optional[bool] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取字典子树的扁平列表
+
+        Returns:
+            字典数据列表，字典不存在时返回None
+        """
+        rows = [d.to_dict() for d in DictionaryHierarchy.subtree_query(db, dict_id, status)]
+        if not rows and DictionaryHierarchy.get_path(db, dict_id) is None:
+            return None
+        return rows
+
+    @staticmethod
+    def rebuild_paths(db: Session) -> int:
+        """
+        重建所有字典的层级路径（数据修复用）
+
+        Returns:
+            更新的字典数量
+        """
+        dictionaries = {d.id: d for d in db.query(Dictionary)}
+        resolved: Dict[str, str] = {}
+
+        def resolve(dictionary: Dictionary, seen: set) -> str:
+            if dictionary.id in resolved:
+                return resolved[dictionary.id]
+            parent = dictionaries.get(dictionary.parent_id) if dictionary.parent_id else None
+            if parent is None or parent.id in seen:
+                path = make_path(dictionary.id)
+            else:
+                path = make_path(dictionary.id, resolve(parent, seen | {dictionary.id}))
+            resolved[dictionary.id] = path
+            return path
+
+        updated = 0
+        for dictionary in dictionaries.values():
+            path = resolve(dictionary, set())
+            if dictionary.path != path:
+                dictionary.path = path
+                dictionary.depth = path_depth(path)
+                updated += 1
+        db.flush()
+        logger.info(f"Rebuilt dictionary hierarchy paths: {updated} updated")
+        return updated
+
+
+# ----------------------------------------------------------------------
+# 会话钩子：flush 前维护层级路径
+# ----------------------------------------------------------------------
+
+def _assign_path(session: Session, dictionary: Dictionary, pending: Dict[str, Dictionary], visiting: Optional[set] = None):
+    """根据父字典计算路径，父字典可以是同一次 flush 中新建的字典"""
+    visiting = visiting or set()
+    if dictionary.id in visiting:
+        raise DictionaryHierarchyError("设置父字典会导致循环引用")
+    visiting.add(dictionary.id)
+
+    parent_path = None
+    if dictionary.parent_id:
+        parent = pending.get(dictionary.parent_id)
+        if parent is None:
+            with session.no_autoflush:
+                parent = session.get(Dictionary, dictionary.parent_id)
+        if parent is not None:
+            if parent.path is None or parent.id in pending:
+                _assign_path(session, parent, pending, visiting)
+            if f"/{dictionary.id}/" in parent.path:
+                raise DictionaryHierarchyError("设置父字典会导致循环引用")
+            parent_path = parent.path
+
+    path = make_path(dictionary.id, parent_path)
+    if len(path) > MAX_PATH_LENGTH:
+        raise DictionaryHierarchyError("字典层级过深")
+    dictionary.path = path
+    dictionary.depth = path_depth(path)
+    pending.pop(dictionary.id, None)
+
+
+def _move_subtree(session: Session, dictionary: Dictionary, old_path: Optional[str]):
+    """字典移动后更新所有后代的路径"""
+    if not old_path or old_path == dictionary.path:
+        return
+    with session.no_autoflush:
+        descendants = session.query(Dictionary).filter(
+            Dictionary.path.startswith(old_path, autoescape=True),
+            Dictionary.id != dictionary.id
+        ).all()
+    # 同一次 flush 中已移出该子树的后代不再跟随移动
+    descendants = [d for d in descendants if d.path and d.path.startswith(old_path)]
+    for descendant in descendants:
+        descendant.path = dictionary.path + descendant.path[len(old_path):]
+        if len(descendant.path) > MAX_PATH_LENGTH:
+            raise DictionaryHierarchyError("字典层级过深")
+        descendant.depth = path_depth(descendant.path)
+    if descendants:
+        logger.info(f"Moved {len(descendants)} descendants of dictionary {dictionary.id}")
+
+
+def _maintain_paths(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Dictionary)]
+    moved = []
+    for obj in session.dirty:
+        if isinstance(obj, Dictionary) and (obj.path is None or inspect(obj).attrs.parent_id.history.has_changes()):
+            moved.append(obj)
+    if not new and not moved:
+        return
+
+    for obj in new:
+        if obj.id is None:
+            obj.id = str(uuid.uuid4())
+    pending = {obj.id: obj for obj in new}
+
+    # 先处理移动（后代先于祖先，祖先移动时已在其子树中的后代随之移动），再处理新建字典
+    for obj in sorted(moved, key=lambda d: d.depth or 0, reverse=True):
+        old_path = obj.path
+        _assign_path(session, obj, pending)
+        _move_subtree(session, obj, old_path)
+    for obj in new:
+        if obj.id in pending:
+            _assign_path(session, obj, pending)
+
+
+def install_session_hooks():
+    """注册ORM会话钩子（重复调用无副作用）"""
+    if event.contains(Session, "before_flush", _maintain_paths):
+        return
+    event.listen(Session, "before_flush", _maintain_paths)
+
+
+install_session_hooks()
@@ -9,6 +9,7 @@ from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import text, create_engine
 from sqlalchemy.exc import SQLAlchemyError
+from fastapi.encoders import jsonable_encoder
 
 from ..models.data_preparation_model import DynamicDictionaryConfig, Dictionary, DictionaryItem
 from ..models.data_source_model import DataSource
@@ -20,9 +21,12 @@ from ..schemas.dynamic_dictionary_schema import (
     RefreshResult
 )
 from ..utils.encryption import decrypt_password
+from .job_runner import JobContext, job_runner, register_job_handler
 
 logger = logging.getLogger(__name__)
 
+DICTIONARY_REFRESH_JOB = "dictionary_refresh"
+
 
 class DynamicDictionaryService:
     """动态字典服务类"""
@@ -276,6 +280,20 @@ class DynamicDictionaryService:
                 execution_time_ms=execution_time
             )
 
+    def submit_refresh_job(self, dictionary_id: str) -> str:
+        """提交后台刷新任务，同一数据源的刷新任务受并发上限限制"""
+        config = self.get_config(dictionary_id)
+        if not config:
+            raise ValueError(f"字典 {dictionary_id} 的动态配置不存在")
+
+        job_id = job_runner.submit(
+            DICTIONARY_REFRESH_JOB,
+            {"dictionary_id": dictionary_id},
+            concurrency_key=config.data_source_id
+        )
+        logger.info(f"提交动态字典刷新任务: {dictionary_id}, 任务ID: {job_id}")
+        return job_id
+
     def get_configs_list(self, page: int = 1, page_size: int = 20) -> Tuple[List[DynamicDictionaryConfig], int]:
         """获取动态字典配置列表"""
         try:
@@ -342,4 +360,22 @@ class DynamicDictionaryService:
 
         except Exception as e:
             logger.error(f"检查刷新需求失败: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+
+def refresh_dictionary_job(context: JobContext) -> Dict[str, Any]:
+    """动态字典刷新任务主体，刷新失败时抛出异常以便按退避重试"""
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = DynamicDictionaryService(db).refresh_dictionary(context.payload["dictionary_id"])
+    finally:
+        db.close()
+
+    if not result.success:
+        raise RuntimeError(result.message)
+    return jsonable_encoder(result)
+
+
+register_job_handler(DICTIONARY_REFRESH_JOB, refresh_dictionary_job)
@@ -0,0 +1,661 @@
+"""
+元数据向量索引
+
+为表、字段描述、字典标签和知识条目建立稠密向量索引，弥补关键词重合匹配对同义表达的遗漏。
+
+- 向量模型可插拔：默认使用哈希n-gram向量（纯CPU，无需下载模型），
+  配置了本地模型目录 EMBEDDING_MODEL_PATH 且安装了 sentence-transformers 时使用本地模型
+- 向量矩阵保存在内存映射文件中，进程重启后直接映射，不重新计算
+- 条目数较少时暴力检索，超过阈值后使用IVF倒排聚类只检索最近的若干个簇
+- 按 updated_at 水位增量同步数据库中的元数据，只为文本变化的条目重新计算向量
+- 同步在后台线程执行（启动预热时完成首次全量建立），索引就绪前检索方只使用关键词匹配
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from src.services.service_registry import get_service_registry
+
+logger = logging.getLogger(__name__)
+
+# 可选的本地向量模型
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    logger.info("sentence-transformers not installed, embedding index uses hashed n-gram vectors")
+
+KIND_TABLE = "table"
+KIND_FIELD = "field"
+KIND_DICTIONARY = "dictionary"
+KIND_KNOWLEDGE = "knowledge"
+KINDS = (KIND_TABLE, KIND_FIELD, KIND_DICTIONARY, KIND_KNOWLEDGE)
+
+_VECTORS_FILE = "vectors.f32"
+_META_FILE = "meta.json"
+_MIN_CAPACITY = 1024
+
+_CAMEL_PATTERN = re.compile(r'([a-z0-9])([A-Z])')
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+_CJK_SEGMENT_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+
+class Embedder(ABC):
+    """向量模型接口"""
+
+    name: str = "base"
+    dim: int = 0
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """将文本批量转换为L2归一化的向量，形状为 (len(texts), dim)"""
+        pass
+
+
+class HashedNgramEmbedder(Embedder):
+    """
+    哈希n-gram向量
+
+    中文取单字和二元组，英文取单词和带边界的字符三元组（orders 与 order 共享大部分特征），
+    特征经CRC32哈希到固定维度并带符号，相同文本在任何进程中得到相同向量。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashed-ngram-{dim}"
+
+    def features(self, text: str) -> Dict[str, float]:
+        """提取加权特征"""
+        text = _CAMEL_PATTERN.sub(r'\1 \2', str(text or "")).lower()
+        weights: Dict[str, float] = {}
+
+        def add(feature: str, weight: float):
+            weights[feature] = weights.get(feature, 0.0) + weight
+
+        for word in _WORD_PATTERN.findall(text):
+            add(f"w:{word}", 1.0)
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                add(f"c:{padded[i:i + 3]}", 0.5)
+        for segment in _CJK_SEGMENT_PATTERN.findall(text):
+            for i, char in enumerate(segment):
+                add(f"u:{char}", 0.5)
+                if i + 1 < len(segment):
+                    add(f"b:{segment[i:i + 2]}", 1.0)
+        return weights
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self.features(text).items():
+                code = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if code & 0x80000000 else -1.0
+                vectors[row, code % self.dim] += sign * weight
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """本地句向量模型（只从本地目录加载，不联网下载）"""
+
+    def __init__(self, model_path: str):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise RuntimeError("sentence-transformers not installed")
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.name = f"st-{os.path.basename(os.path.normpath(model_path))}-{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def create_embedder() -> Embedder:
+    """根据配置创建向量模型，本地模型不可用时使用哈希n-gram向量"""
+    model_path = os.getenv("EMBEDDING_MODEL_PATH")
+    if model_path and SENTENCE_TRANSFORMERS_AVAILABLE and os.path.isdir(model_path):
+        try:
+            return SentenceTransformerEmbedder(model_path)
+        except Exception as e:
+            logger.warning(f"加载本地向量模型失败，使用哈希n-gram向量: {str(e)}")
+    return HashedNgramEmbedder(dim=int(os.getenv("EMBEDDING_HASH_DIM", "256")))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+@dataclass
+class IndexItem:
+    """索引条目"""
+    item_id: str
+    kind: str
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SearchHit:
+    """检索结果"""
+    item_id: str
+    kind: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class EmbeddingIndex:
+    """元数据向量索引"""
+
+    def __init__(
+        self,
+        storage_dir: Optional[str] = None,
+        embedder: Optional[Embedder] = None,
+        ivf_threshold: int = 20000,
+        nprobe: int = 8,
+        refresh_interval: float = 60.0
+    ):
+        """
+        初始化向量索引
+
+        Args:
+            storage_dir: 索引文件目录，默认读取环境变量EMBEDDING_INDEX_DIR
+            embedder: 向量模型，默认由 create_embedder 创建
+            ivf_threshold: 条目数达到该值时使用IVF检索
+            nprobe: IVF检索时探查的簇数量
+            refresh_interval: 两次数据库增量同步的最小间隔（秒）
+        """
+        self.embedder = embedder or create_embedder()
+        base_dir = storage_dir or os.getenv("EMBEDDING_INDEX_DIR", "./data/embeddings")
+        self.storage_dir = os.path.join(base_dir, self.embedder.name)
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._rows: Dict[str, int] = {}            # 条目ID -> 行号
+        self._entries: Dict[int, Dict[str, Any]] = {}  # 行号 -> {item_id, kind, hash, metadata}
+        self._free_rows: List[int] = []
+        self._kind_codes = np.full(0, -1, dtype=np.int8)
+        self._watermarks: Dict[str, str] = {}
+        self._last_refresh = 0.0
+        self._ready = False
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        # IVF倒排聚类
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.full(0, -1, dtype=np.int32)
+        self._ivf_trained_size = 0
+
+        self._stats = {"searches": 0, "ivf_searches": 0, "embedded": 0, "skipped": 0, "removed": 0}
+        self._load()
+        # 已有索引文件时直接可用，后续增量同步补齐变化
+        self._ready = self.size > 0
+
+    # ------------------------------------------------------------------
+    # 存储
+    # ------------------------------------------------------------------
+
+    @property
+    def size(self) -> int:
+        return len(self._rows)
+
+    @property
+    def ready(self) -> bool:
+        """索引是否可用于检索（已加载索引文件或完成过一次数据库同步）"""
+        return self._ready
+
+    def _vectors_path(self) -> str:
+        return os.path.join(self.storage_dir, _VECTORS_FILE)
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.storage_dir, _META_FILE)
+
+    def _load(self):
+        """加载已有的索引文件"""
+        if not (os.path.exists(self._meta_path()) and os.path.exists(self._vectors_path())):
+            return
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("dim") != self.embedder.dim:
+                logger.warning("向量索引维度与当前模型不一致，忽略已有索引")
+                return
+
+            self._capacity = int(meta["capacity"])
+            self._vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode="r+",
+                                      shape=(self._capacity, self.embedder.dim))
+            self._kind_codes = np.full(self._capacity, -1, dtype=np.int8)
+            self._assignments = np.full(self._capacity, -1, dtype=np.int32)
+            for row_key, entry in meta["entries"].items():
+                row = int(row_key)
+                self._entries[row] = entry
+                self._rows[entry["item_id"]] = row
+                self._kind_codes[row] = KINDS.index(entry["kind"])
+            self._free_rows = [row for row in range(self._capacity) if row not in self._entries]
+            self._free_rows.reverse()
+            self._watermarks = meta.get("watermarks", {})
+            logger.info(f"已加载向量索引: {self.storage_dir}，条目数: {self.size}")
+        except Exception as e:
+            logger.error(f"加载向量索引失败，重新建立: {str(e)}")
+            self._reset()
+
+    def _reset(self):
+        self._vectors = None
+        self._capacity = 0
+        self._rows = {}
+        self._entries = {}
+        self._free_rows = []
+        self._kind_codes = np.full(0, -1, dtype=np.int8)
+        self._assignments = np.full(0, -1, dtype=np.int32)
+        self._centroids = None
+        self._watermarks = {}
+
+    def _ensure_capacity(self, required: int):
+        """容量不足时按倍数扩容向量文件"""
+        if required <= self._capacity:
+            return
+
+        capacity = max(_MIN_CAPACITY, self._capacity * 2)
+        while capacity < required:
+            capacity *= 2
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        tmp_path = self._vectors_path() + ".tmp"
+        grown = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(capacity, self.embedder.dim))
+        if self._vectors is not None:
+            grown[:self._capacity] = self._vectors[:]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp_path, self._vectors_path())
+        self._vectors = np.memmap(self._vectors_path(), dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.embedder.dim))
+
+        self._free_rows = list(range(capacity - 1, self._capacity - 1, -1)) + self._free_rows
+        self._kind_codes = np.concatenate([self._kind_codes, np.full(capacity - self._capacity, -1, dtype=np.int8)])
+        self._assignments = np.concatenate([self._assignments, np.full(capacity - self._capacity, -1, dtype=np.int32)])
+        self._capacity = capacity
+
+    def save(self):
+        """将向量刷新到磁盘并原子写入元数据"""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            meta = {
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "capacity": self._capacity,
+                "entries": {str(row): entry for row, entry in self._entries.items()},
+                "watermarks": self._watermarks
+            }
+            tmp_path = self._meta_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, self._meta_path())
+
+    # ------------------------------------------------------------------
+    # 增删
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    def upsert(self, items: Iterable[IndexItem]) -> int:
+        """
+        新增或更新条目，文本未变化的条目只更新元数据
+
+        向量在锁外计算，锁只在比对哈希和写入新向量时持有，后台同步期间检索不被阻塞。
+
+        Returns:
+            int: 重新计算向量的条目数
+        """
+        with self._lock:
+            changed = []
+            for item in items:
+                if item.kind not in KINDS:
+                    raise ValueError(f"不支持的条目类型: {item.kind}")
+                text_hash = self._text_hash(item.text)
+                row = self._rows.get(item.item_id)
+                if row is not None and self._entries[row]["hash"] == text_hash:
+                    self._entries[row]["metadata"] = item.metadata
+                    self._stats["skipped"] += 1
+                    continue
+                # 记录计算向量前的哈希，写入时据此判断条目是否已被并发修改
+                changed.append((item, text_hash, self._entries[row]["hash"] if row is not None else None))
+
+        if not changed:
+            return 0
+
+        vectors = self.embedder.embed([item.text for item, _, _ in changed])
+
+        with self._lock:
+            applied = []
+            for (item, text_hash, seen_hash), vector in zip(changed, vectors):
+                row = self._rows.get(item.item_id)
+                if (self._entries[row]["hash"] if row is not None else None) != seen_hash:
+                    # 计算向量期间条目已被其他写入更新或删除，保留较新的状态
+                    self._stats["skipped"] += 1
+                    continue
+                applied.append((item, text_hash, vector))
+
+            new_count = sum(1 for item, _, _ in applied if item.item_id not in self._rows)
+            self._ensure_capacity(self.size + new_count)
+
+            for item, text_hash, vector in applied:
+                row = self._rows.get(item.item_id)
+                if row is None:
+                    row = self._free_rows.pop()
+                    self._rows[item.item_id] = row
+                self._vectors[row] = vector
+                self._entries[row] = {
+                    "item_id": item.item_id,
+                    "kind": item.kind,
+                    "hash": text_hash,
+                    "metadata": item.metadata
+                }
+                self._kind_codes[row] = KINDS.index(item.kind)
+                if self._centroids is not None:
+                    self._assignments[row] = int(np.argmax(self._centroids @ vector))
+
+            self._stats["embedded"] += len(applied)
+            return len(applied)
+
+    def remove(self, item_ids: Iterable[str]) -> int:
+        """删除条目，返回删除数量"""
+        removed = 0
+        with self._lock:
+            for item_id in item_ids:
+                row = self._rows.pop(item_id, None)
+                if row is None:
+                    continue
+                self._entries.pop(row, None)
+                self._vectors[row] = 0.0
+                self._kind_codes[row] = -1
+                self._assignments[row] = -1
+                self._free_rows.append(row)
+                removed += 1
+            self._stats["removed"] += removed
+        return removed
+
+    def item_ids(self, kind: Optional[str] = None) -> Set[str]:
+        """获取已索引的条目ID"""
+        with self._lock:
+            return {
+                entry["item_id"] for entry in self._entries.values()
+                if kind is None or entry["kind"] == kind
+            }
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        kinds: Optional[Iterable[str]] = None,
+        min_score: float = 0.0
+    ) -> List[SearchHit]:
+        """
+        检索与查询最相似的条目
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            kinds: 只检索指定类型的条目
+            min_score: 最低余弦相似度
+        """
+        if not query or not self._rows:
+            return []
+        query_vector = self.embedder.embed([query])[0]
+
+        with self._lock:
+            if not self._rows:
+                return []
+            self._stats["searches"] += 1
+
+            mask = self._kind_codes >= 0
+            if kinds is not None:
+                mask &= np.isin(self._kind_codes, [KINDS.index(kind) for kind in kinds])
+
+            if self.size >= self.ivf_threshold:
+                self._ensure_ivf()
+                probes = np.argsort(-(self._centroids @ query_vector))[:self.nprobe]
+                mask &= np.isin(self._assignments, probes)
+                self._stats["ivf_searches"] += 1
+
+            candidate_rows = np.flatnonzero(mask)
+            if candidate_rows.size == 0:
+                return []
+
+            scores = np.asarray(self._vectors[candidate_rows] @ query_vector)
+            k = min(top_k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            hits = []
+            for position in top:
+                score = float(scores[position])
+                if score < min_score:
+                    break
+                entry = self._entries[int(candidate_rows[position])]
+                hits.append(SearchHit(
+                    item_id=entry["item_id"],
+                    kind=entry["kind"],
+                    score=score,
+                    metadata=entry["metadata"]
+                ))
+            return hits
+
+    def _ensure_ivf(self):
+        """训练或重新训练IVF聚类（条目数比上次训练增长一倍后重新训练）"""
+        if self._centroids is not None and self.size < self._ivf_trained_size * 2:
+            return
+
+        rows = np.array(sorted(self._entries), dtype=np.int64)
+        vectors = np.asarray(self._vectors[rows])
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(rows), size=min(len(rows), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+
+        for _ in range(10):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self._centroids = centroids
+        self._assignments[:] = -1
+        for start in range(0, len(rows), 8192):
+            chunk = rows[start:start + 8192]
+            self._assignments[chunk] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        self._ivf_trained_size = len(rows)
+        logger.info(f"向量索引IVF聚类训练完成，簇数: {nlist}，条目数: {len(rows)}")
+
+    # ------------------------------------------------------------------
+    # 数据库同步
+    # ------------------------------------------------------------------
+
+    def refresh_from_database(self, db, force: bool = False) -> Dict[str, int]:
+        """
+        从数据库增量同步元数据
+
+        只读取 updated_at 不早于上次水位的行重新计算向量；已删除或停用的行通过ID比对移除。
+        距上次同步不足 refresh_interval 时直接返回（force=True 时强制同步）。
+
+        Returns:
+            Dict[str, int]: 各类型更新和移除的条目数
+        """
+        if not force and time.time() - self._last_refresh < self.refresh_interval:
+            return {}
+        self._last_refresh = time.time()
+
+        from src.models.data_preparation_model import DataTable, TableField, Dictionary, DictionaryItem
+        from src.models.knowledge_item_model import KnowledgeItem
+
+        summary = {}
+        sources = [
+            (KIND_TABLE, DataTable, lambda q: q.filter(DataTable.status == True), self._table_item),
+            (KIND_FIELD, TableField, lambda q: q, self._field_item),
+            (KIND_DICTIONARY, DictionaryItem,
+             lambda q: q.join(Dictionary, Dictionary.id == DictionaryItem.dictionary_id).filter(
+                 DictionaryItem.status == True, Dictionary.status == True),
+             self._dictionary_item),
+            (KIND_KNOWLEDGE, KnowledgeItem, lambda q: q, self._knowledge_item),
+        ]
+        try:
+            for kind, model, scope, to_item in sources:
+                summary[kind] = self._sync_source(db, kind, model, scope, to_item)
+            self.save()
+            self._ready = True
+        except Exception as e:
+            logger.error(f"向量索引增量同步失败: {str(e)}")
+        return summary
+
+    def refresh_if_stale(self, wait: bool = False) -> bool:
+        """
+        距上次同步超过 refresh_interval 时，在后台线程中使用独立的数据库会话增量同步
+
+        检索请求只触发同步、不等待同步完成；首次全量建立完成前 ready 为False。
+
+        Args:
+            wait: 等待同步完成（启动预热时使用）
+
+        Returns:
+            bool: 是否启动了新的同步
+        """
+        with self._lock:
+            thread = self._refresh_thread
+            started = False
+            if (thread is None or not thread.is_alive()) and \
+                    time.time() - self._last_refresh >= self.refresh_interval:
+                thread = threading.Thread(target=self._refresh_in_own_session, name="embedding-index-refresh",
+                                          daemon=True)
+                self._refresh_thread = thread
+                thread.start()
+                started = True
+        if wait and thread is not None:
+            thread.join()
+        return started
+
+    def _refresh_in_own_session(self):
+        from src.utils import get_db_session
+        db_gen = get_db_session()
+        db = next(db_gen)
+        try:
+            self.refresh_from_database(db)
+        except Exception as e:
+            logger.error(f"向量索引后台同步失败: {str(e)}")
+        finally:
+            db_gen.close()
+
+    def _sync_source(self, db, kind: str, model, scope, to_item) -> int:
+        watermark = self._watermarks.get(kind)
+        query = scope(db.query(model))
+        if watermark:
+            query = query.filter(model.updated_at >= datetime.fromisoformat(watermark))
+        rows = query.all()
+
+        items = [to_item(db, row) for row in rows]
+        changed = self.upsert(item for item in items if item is not None)
+
+        live_ids = {str(row_id) for (row_id,) in scope(db.query(model.id)).all()}
+        removed = self.remove(self.item_ids(kind) - live_ids)
+
+        timestamps = [row.updated_at for row in rows if row.updated_at]
+        if timestamps:
+            self._watermarks[kind] = max(timestamps).isoformat()
+        return changed + removed
+
+    @staticmethod
+    def _join_text(*parts: Any) -> str:
+        return " ".join(str(part) for part in parts if part)
+
+    def _table_item(self, db, table) -> IndexItem:
+        return IndexItem(
+            item_id=str(table.id), kind=KIND_TABLE,
+            text=self._join_text(table.table_name, table.display_name, table.description),
+            metadata={"table_id": str(table.id), "data_source_id": str(table.data_source_id)}
+        )
+
+    def _field_item(self, db, table_field) -> IndexItem:
+        return IndexItem(
+            item_id=str(table_field.id), kind=KIND_FIELD,
+            text=self._join_text(table_field.field_name, table_field.display_name, table_field.description),
+            metadata={"table_id": str(table_field.table_id), "field_name": table_field.field_name}
+        )
+
+    def _dictionary_item(self, db, item) -> IndexItem:
+        return IndexItem(
+            item_id=str(item.id), kind=KIND_DICTIONARY,
+            text=self._join_text(item.item_value, item.description),
+            metadata={"dictionary_id": str(item.dictionary_id), "item_key": item.item_key}
+        )
+
+    def _knowledge_item(self, db, item) -> IndexItem:
+        return IndexItem(
+            item_id=str(item.id), kind=KIND_KNOWLEDGE,
+            text=self._join_text(item.name, item.explanation, item.example_question),
+            metadata={"type": item.type, "knowledge_base_id": str(item.knowledge_base_id)}
+        )
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        with self._lock:
+            kinds = {kind: 0 for kind in KINDS}
+            for entry in self._entries.values():
+                kinds[entry["kind"]] += 1
+            return {
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "size": self.size,
+                "ready": self._ready,
+                "capacity": self._capacity,
+                "kinds": kinds,
+                "ivf_enabled": self._centroids is not None,
+                "watermarks": dict(self._watermarks),
+                **self._stats
+            }
+
+
+# 全局实例
+_embedding_index: Optional[EmbeddingIndex] = None
+_embedding_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """获取元数据向量索引实例"""
+    global _embedding_index
+    with _embedding_index_lock:
+        if _embedding_index is None:
+            _embedding_index = EmbeddingIndex()
+        return _embedding_index
+
+
+# 启动预热时建立索引，避免首个查询触发全量向量计算
+get_service_registry().add_warm_up_task("embedding_index", lambda: get_embedding_index().refresh_if_stale(wait=True))
@@ -263,6 +263,12 @@ class ExcelImporter:
             logger.info(f"Processing {len(data_records)} records in {total_batches} batches of {batch_size} records each")
             
             for batch_idx in range(total_batches):
+                # 任务已被取消时停止导入并回滚已写入的批次
+                if job_id and self._job_progress[job_id].get("status") == "cancelled":
+                    logger.info(f"Import job {job_id} cancelled, rolling back")
+                    self.db_session.rollback()
+                    return result
+                
                 start_idx = batch_idx * batch_size
                 end_idx = min((batch_idx + 1) * batch_size, len(data_records))
                 batch_data = data_records[start_idx:end_idx]
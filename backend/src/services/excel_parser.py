@@ -1,6 +1,7 @@
 from typing import Dict, List, Any, Optional
 import logging
 from .excel_service import ExcelService
+from .workbook_scanner import get_workbook_scanner
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +12,8 @@ class ExcelParser:
     
     def __init__(self):
         self.excel_service = ExcelService()
+        # 结构、预览、校验和表结构生成共用一次扫描结果，按文件内容哈希缓存
+        self.scanner = get_workbook_scanner()
         logger.info("ExcelParser initialized")
     
     def parse_file_structure(self, file_path: str) -> Dict[str, Any]:
@@ -21,13 +24,8 @@ class ExcelParser:
         logger.info(f"Parsing Excel file structure: {file_path}")
         
         try:
-            structure = self.excel_service.get_excel_structure(file_path)
-            
-            # 为每个 sheet 添加字段类型推断
-            for sheet in structure["sheets"]:
-                sheet_name = sheet["name"]
-                field_types = self.excel_service.infer_field_types(file_path, sheet_name)
-                sheet["field_types"] = field_types
+            # 单遍扫描同时得到每个 sheet 的结构和字段类型推断
+            structure = self.scanner.scan(file_path).to_structure()
             
             logger.info(f"Excel structure parsed successfully: {structure['sheet_count']} sheets")
             return structure
@@ -44,8 +42,8 @@ class ExcelParser:
         logger.info(f"Getting sheet preview: {file_path}, sheet: {sheet_name}, limit: {limit}")
         
         try:
-            sheet_data = self.excel_service.get_sheet_data(file_path, sheet_name, limit)
-            field_types = self.excel_service.infer_field_types(file_path, sheet_name)
+            sheet_data = self.scanner.get_sheet_data(file_path, sheet_name, limit)
+            field_types = self.scanner.scan(file_path).get_sheet(sheet_name).field_types
             
             result = {
                 **sheet_data,
@@ -69,16 +67,16 @@ class ExcelParser:
         logger.info(f"Validating sheet data: {file_path}, sheet: {sheet_name}")
         
         try:
-            field_types = self.excel_service.infer_field_types(file_path, sheet_name)
-            sheet_data = self.excel_service.get_sheet_data(file_path, sheet_name, limit=1000)  # 取样验证
+            sheet = self.scanner.scan(file_path).get_sheet(sheet_name)
+            field_types = sheet.field_types
             
             validation_result = {
                 "sheet_name": sheet_name,
-                "total_rows": sheet_data["row_count"],
-                "total_columns": sheet_data["column_count"],
+                "total_rows": sheet.row_count,
+                "total_columns": sheet.column_count,
                 "field_analysis": [],
                 "data_quality": {
-                    "has_empty_rows": False,
+                    "has_empty_rows": sheet.empty_row_count > 0,
                     "has_duplicate_headers": False,
                     "estimated_data_types": len(set(ft["data_type"] for ft in field_types))
                 }
@@ -89,7 +87,7 @@ class ExcelParser:
                 field_analysis = {
                     "field_name": field_type["field_name"],
                     "data_type": field_type["data_type"],
-                    "null_percentage": round((field_type["null_count"] / sheet_data["row_count"]) * 100, 2) if sheet_data["row_count"] > 0 else 0,
+                    "null_percentage": round((field_type["null_count"] / sheet.row_count) * 100, 2) if sheet.row_count > 0 else 0,
                     "unique_values": field_type["unique_count"],
                     "sample_values": field_type["sample_values"]
                 }
@@ -115,7 +113,7 @@ class ExcelParser:
         logger.info(f"Generating table schema: {file_path}, sheet: {sheet_name}, table: {table_name}")
         
         try:
-            field_types = self.excel_service.infer_field_types(file_path, sheet_name)
+            field_types = self.scanner.scan(file_path).get_sheet(sheet_name).field_types
             
             # 生成数据库字段定义
             fields = []
@@ -16,6 +16,7 @@ from collections import defaultdict, Counter
 import statistics
 
 from src.utils import logger
+from src.services.service_registry import lazy_service
 
 
 class SampleType(Enum):
@@ -615,8 +616,8 @@ class EnhancedFewShotManager:
         return removed_count
 
 
-# 全局实例
-enhanced_few_shot_manager = EnhancedFewShotManager()
+# 全局实例（首次使用时才加载样本文件）
+enhanced_few_shot_manager = lazy_service("enhanced_few_shot_manager", EnhancedFewShotManager)
 
 # 导出主要类和函数
 __all__ = [
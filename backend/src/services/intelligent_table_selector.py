@@ -7,8 +7,10 @@
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import asyncio
 import logging
 import json
+import random
 from datetime import datetime
 
 from src.services.ai_model_service import AIModelService
@@ -16,6 +18,8 @@ from src.services.semantic_context_aggregator import SemanticContextAggregator
 from src.services.semantic_similarity_engine import SemanticSimilarityEngine, KeywordAnalysis
 from src.services.multi_source_data_integration import MultiSourceDataIntegrationEngine
 from src.services.table_relation_semantic_injection import TableRelationSemanticInjectionService
+from src.services.table_pre_ranker import TablePreRanker
+from src.services.embedding_index import get_embedding_index, KIND_TABLE, KIND_FIELD
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +103,14 @@ class IntelligentTableSelector:
             "low": 0.3
         }
         
+        # 候选表预排序：只把按Token预算截取的短名单交给AI模型
+        self.table_token_budget = 2500  # Prompt中候选表部分的Token预算
+        self.recall_sample_rate = 0.1  # 抽样与全量相似度打分对比的比例，用于统计recall@k
+        self.pre_ranker = TablePreRanker()
+        self.embedding_index = get_embedding_index()
+        self.dense_top_k = 50  # 向量检索返回的表/字段条目数
+        self.dense_min_score = 0.2  # 向量检索的最低相似度
+        
         # 统计信息
         self.selection_stats = {
             "total_selections": 0,
@@ -139,22 +151,27 @@ class IntelligentTableSelector:
                 semantic_context, data_source_id
             )
             
-            # 3. 基于Qwen模型进行智能表选择
+            # 3. 本地预排序，裁剪为短名单
+            candidate_tables = await self._pre_rank_candidate_tables(
+                user_question, candidate_tables
+            )
+            
+            # 4. 基于Qwen模型进行智能表选择
             selection_result = await self._perform_ai_table_selection(
                 user_question, candidate_tables, semantic_context
             )
             
-            # 4. 分析表关联路径
+            # 5. 分析表关联路径
             selection_result = await self._analyze_table_relations(
                 selection_result, semantic_context
             )
             
-            # 5. 生成推荐JOIN语句
+            # 6. 生成推荐JOIN语句
             selection_result = await self._generate_recommended_joins(
                 selection_result, semantic_context
             )
             
-            # 6. 计算处理时间并更新统计
+            # 7. 计算处理时间并更新统计
             processing_time = (datetime.now() - start_time).total_seconds()
             selection_result.processing_time = processing_time
             
@@ -231,6 +248,99 @@ class IntelligentTableSelector:
             logger.error(f"获取候选表失败: {str(e)}")
             return []
     
+    async def _pre_rank_candidate_tables(
+        self,
+        user_question: str,
+        candidate_tables: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """本地预排序候选表，返回Token预算内的短名单"""
+        if not candidate_tables:
+            return candidate_tables
+        
+        try:
+            loop = asyncio.get_running_loop()
+            pre_ranking = await loop.run_in_executor(
+                None,
+                lambda: self.pre_ranker.shortlist(
+                    user_question,
+                    candidate_tables,
+                    self.table_token_budget,
+                    render=self._table_prompt_entry,
+                    term_mappings=self._get_term_mappings(),
+                    dense_scores=self._dense_table_scores(user_question)
+                )
+            )
+            
+            # 只有发生裁剪时召回率才有意义，抽样在后台用全量相似度打分作参照
+            if pre_ranking.pruned and random.random() < self.recall_sample_rate:
+                loop.run_in_executor(
+                    None, self._evaluate_shortlist_recall,
+                    user_question, candidate_tables, pre_ranking.shortlist
+                )
+            
+            return pre_ranking.shortlist
+            
+        except Exception as e:
+            logger.error(f"候选表预排序失败，使用全部候选表: {str(e)}")
+            return candidate_tables
+    
+    def _dense_table_scores(self, user_question: str) -> Dict[str, float]:
+        """从元数据向量索引检索相似的表和字段，按表聚合最高相似度"""
+        try:
+            self.embedding_index.refresh_if_stale()
+            if not self.embedding_index.ready:
+                # 索引在后台建立期间只使用关键词匹配
+                return {}
+            hits = self.embedding_index.search(
+                user_question,
+                top_k=self.dense_top_k,
+                kinds=(KIND_TABLE, KIND_FIELD),
+                min_score=self.dense_min_score
+            )
+            scores: Dict[str, float] = {}
+            for hit in hits:
+                table_id = str(hit.metadata.get("table_id", hit.item_id))
+                scores[table_id] = max(scores.get(table_id, 0.0), hit.score)
+            return scores
+            
+        except Exception as e:
+            logger.error(f"向量检索候选表失败: {str(e)}")
+            return {}
+    
+    def _get_term_mappings(self) -> Dict[str, List[str]]:
+        """获取用于扩展查询的业务术语和技术术语映射"""
+        term_mappings = {}
+        for attr in ("business_term_mappings", "technical_term_mappings"):
+            mappings = getattr(self.similarity_engine, attr, None)
+            if isinstance(mappings, dict):
+                term_mappings.update(mappings)
+        return term_mappings
+    
+    def _evaluate_shortlist_recall(
+        self,
+        user_question: str,
+        candidate_tables: List[Dict[str, Any]],
+        shortlist: List[Dict[str, Any]]
+    ) -> Optional[float]:
+        """以全量相似度打分选出的表为参照，计算短名单的recall@k"""
+        try:
+            keyword_analysis = self.similarity_engine.analyze_user_question(user_question)
+            scored = []
+            for table in candidate_tables:
+                match = self.similarity_engine.calculate_table_similarity(keyword_analysis, table)
+                if match.similarity_score >= self.min_relevance_threshold * 0.7:
+                    scored.append((match.similarity_score, table.get("id", "")))
+            scored.sort(key=lambda x: x[0], reverse=True)
+            
+            relevant_ids = [table_id for _, table_id in scored[:self.max_primary_tables + self.max_related_tables]]
+            return self.pre_ranker.record_recall(
+                [table.get("id", "") for table in shortlist], relevant_ids
+            )
+            
+        except Exception as e:
+            logger.error(f"计算短名单召回率失败: {str(e)}")
+            return None
+    
     async def _perform_ai_table_selection(
         self,
         user_question: str,
@@ -286,16 +396,11 @@ class IntelligentTableSelector:
         business_terms = semantic_context.get("modules", {}).get("data_dictionary", {})
         knowledge_items = semantic_context.get("modules", {}).get("knowledge_base", {})
         
-        # 构建候选表信息
-        tables_info = []
-        for table in candidate_tables[:20]:  # 限制表数量避免Token溢出
-            table_info = {
-                "id": table.get("id", ""),
-                "name": table.get("table_name", ""),
-                "comment": table.get("table_comment", ""),
-                "fields": [f.get("field_name", "") for f in table.get("fields", [])[:10]]
-            }
-            tables_info.append(table_info)
+        # 构建候选表信息（候选表已经过预排序裁剪，这里只做上限保护）
+        tables_info = [
+            self._table_prompt_entry(table)
+            for table in candidate_tables[:self.pre_ranker.max_shortlist_size]
+        ]
         
         prompt = f"""
 你是一个专业的数据分析师，需要根据用户问题智能选择最相关的数据表。
@@ -354,6 +459,16 @@ class IntelligentTableSelector:
         
         return prompt
     
+    @staticmethod
+    def _table_prompt_entry(table: Dict[str, Any]) -> Dict[str, Any]:
+        """候选表在Prompt中的内容"""
+        return {
+            "id": table.get("id", ""),
+            "name": table.get("table_name", ""),
+            "comment": table.get("table_comment", ""),
+            "fields": [f.get("field_name", "") for f in table.get("fields", [])[:10]]
+        }
+    
     def _parse_ai_selection_response(
         self,
         ai_response: str,
@@ -741,10 +856,13 @@ class IntelligentTableSelector:
             ),
             "average_processing_time": self.selection_stats["average_processing_time"],
             "average_relevance_score": self.selection_stats["average_relevance_score"],
+            "pre_ranking": self.pre_ranker.get_statistics(),
             "configuration": {
                 "max_primary_tables": self.max_primary_tables,
                 "max_related_tables": self.max_related_tables,
                 "min_relevance_threshold": self.min_relevance_threshold,
-                "confidence_thresholds": self.confidence_thresholds
+                "confidence_thresholds": self.confidence_thresholds,
+                "table_token_budget": self.table_token_budget,
+                "recall_sample_rate": self.recall_sample_rate
             }
         }
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+意图识别快速通道
+
+在调用云端模型之前依次尝试：
+
+1. 规范化问题缓存：全角/半角、大小写、空白、标点和数字差异归一后命中已识别过的问题
+2. 本地分类器：以字符n-gram为特征的多项式朴素贝叶斯，用云端模型的高置信度识别结果增量训练，
+   纯CPU计算，单次预测在毫秒以内
+
+两者都无法给出高置信度结论时才升级到云端模型。云端模型的识别结果由后台线程追加写入样本日志，
+日志超过上限时压缩为最新的样本，服务重启时从日志重新训练分类器。
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DIGITS_PATTERN = re.compile(r'\d+(\.\d+)?')
+_PUNCT_PATTERN = re.compile(r'[\s,.!?;:，。！？；：、"\'“”‘’()（）\[\]【】]+')
+_CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+_WORD_PATTERN = re.compile(r'[a-z_]+')
+
+
+def normalize_question(question: str) -> str:
+    """
+    规范化问题文本
+
+    NFKC统一全角/半角，转小写，数字统一为0（“最近3个月”与“最近6个月”意图相同），
+    去掉标点和空白。
+    """
+    text = unicodedata.normalize('NFKC', question or '').lower()
+    text = _DIGITS_PATTERN.sub('0', text)
+    return _PUNCT_PATTERN.sub(' ', text).strip()
+
+
+def extract_features(normalized: str) -> List[str]:
+    """提取分类特征：中文单字和二元组、英文单词"""
+    features = []
+    for run in _CJK_RUN_PATTERN.findall(normalized):
+        features.extend(run)
+        features.extend(run[i:i + 2] for i in range(len(run) - 1))
+    features.extend(f"w:{word}" for word in _WORD_PATTERN.findall(normalized))
+    return features
+
+
+@dataclass
+class FastPathDecision:
+    """快速通道判定结果"""
+    intent: str
+    confidence: float
+    source: str                 # cache / classifier
+    reasoning: str
+    elapsed_ms: float
+
+
+class LocalIntentClassifier:
+    """多项式朴素贝叶斯意图分类器（支持增量训练）"""
+
+    def __init__(self, alpha: float = 0.5, min_samples_per_class: int = 10):
+        """
+        初始化分类器
+
+        Args:
+            alpha: 拉普拉斯平滑系数
+            min_samples_per_class: 每个意图至少需要的样本数，不足时分类器不参与判定
+        """
+        self.alpha = alpha
+        self.min_samples_per_class = min_samples_per_class
+        self._doc_counts: Dict[str, int] = {}
+        self._feature_counts: Dict[str, Dict[str, int]] = {}
+        self._feature_totals: Dict[str, int] = {}
+        self._vocabulary: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self._doc_counts.values())
+
+    @property
+    def is_ready(self) -> bool:
+        """至少两个意图且每个意图样本充足时才可用"""
+        ready = [label for label, count in self._doc_counts.items() if count >= self.min_samples_per_class]
+        return len(ready) >= 2
+
+    def learn(self, question: str, intent: str):
+        """用一条已标注的问题增量训练"""
+        features = extract_features(normalize_question(question))
+        if not features:
+            return
+        with self._lock:
+            self._doc_counts[intent] = self._doc_counts.get(intent, 0) + 1
+            counts = self._feature_counts.setdefault(intent, {})
+            for feature in features:
+                counts[feature] = counts.get(feature, 0) + 1
+                self._vocabulary.add(feature)
+            self._feature_totals[intent] = self._feature_totals.get(intent, 0) + len(features)
+
+    def predict(self, question: str) -> Optional[Tuple[str, float]]:
+        """
+        预测意图
+
+        Returns:
+            (意图, 后验概率)；分类器未就绪或问题没有可用特征时返回None
+        """
+        features = extract_features(normalize_question(question))
+        if not features:
+            return None
+
+        with self._lock:
+            if not self.is_ready:
+                return None
+            total_docs = self.sample_count
+            vocabulary_size = len(self._vocabulary) + 1
+            log_scores = {}
+            for label, doc_count in self._doc_counts.items():
+                counts = self._feature_counts[label]
+                denominator = math.log(self._feature_totals[label] + self.alpha * vocabulary_size)
+                score = math.log(doc_count / total_docs)
+                for feature in features:
+                    score += math.log(counts.get(feature, 0) + self.alpha) - denominator
+                log_scores[label] = score
+
+        best_label = max(log_scores, key=log_scores.get)
+        best_score = log_scores[best_label]
+        normalizer = sum(math.exp(score - best_score) for score in log_scores.values())
+        return best_label, 1.0 / normalizer
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "samples": self.sample_count,
+                "samples_per_intent": dict(self._doc_counts),
+                "vocabulary_size": len(self._vocabulary),
+                "ready": self.is_ready
+            }
+
+
+class IntentFastPath:
+    """意图识别快速通道：规范化问题缓存 + 本地分类器"""
+
+    def __init__(
+        self,
+        cache_size: int = 4096,
+        classifier_threshold: float = 0.95,
+        sample_log_path: Optional[str] = None,
+        max_log_samples: int = 50000,
+        classifier: Optional[LocalIntentClassifier] = None
+    ):
+        """
+        初始化快速通道
+
+        Args:
+            cache_size: 问题缓存大小
+            classifier_threshold: 本地分类器直接作答所需的最低后验概率
+            sample_log_path: 样本日志路径（JSONL），为空时不持久化
+            max_log_samples: 样本日志保留的样本数上限（取最新的），同时是启动时加载的样本数
+            classifier: 本地分类器，默认新建
+        """
+        self.cache_size = cache_size
+        self.classifier_threshold = classifier_threshold
+        self.sample_log_path = sample_log_path
+        self.max_log_samples = max_log_samples
+        self.classifier = classifier or LocalIntentClassifier()
+        self._cache: "OrderedDict[str, Tuple[str, float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        # 日志写入放到单线程执行器，保证追加顺序且不阻塞事件循环
+        self._log_executor: Optional[ThreadPoolExecutor] = None
+        self._last_write: Optional[Future] = None
+        self._log_lines: Optional[int] = None
+
+        if sample_log_path:
+            self.train(self.load_samples())
+
+    @staticmethod
+    def cache_key(question: str, context_signature: str = "") -> str:
+        return f"{normalize_question(question)}\n{context_signature}"
+
+    def lookup(self, question: str, context_signature: str = "") -> Optional[FastPathDecision]:
+        """尝试快速判定，无法高置信度判定时返回None"""
+        started = time.perf_counter()
+        key = self.cache_key(question, context_signature)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            intent, confidence, reasoning = cached
+            return FastPathDecision(intent, confidence, "cache", reasoning,
+                                    (time.perf_counter() - started) * 1000)
+
+        prediction = self.classifier.predict(question)
+        if prediction is not None and prediction[1] >= self.classifier_threshold:
+            intent, probability = prediction
+            return FastPathDecision(
+                intent, probability, "classifier",
+                f"本地分类器判定（后验概率 {probability:.2f}）",
+                (time.perf_counter() - started) * 1000
+            )
+        return None
+
+    def record(self, question: str, intent: str, confidence: float, reasoning: str, context_signature: str = ""):
+        """记录云端模型的高置信度结果：写入缓存、训练分类器并追加样本日志"""
+        key = self.cache_key(question, context_signature)
+        with self._lock:
+            self._cache[key] = (intent, confidence, reasoning)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        self.classifier.learn(question, intent)
+        self._append_sample(question, intent, confidence)
+
+    def train(self, samples: Iterable[Dict[str, Any]]) -> int:
+        """用样本批量训练分类器，返回训练的样本数"""
+        trained = 0
+        for sample in samples:
+            question, intent = sample.get("question"), sample.get("intent")
+            if question and intent:
+                self.classifier.learn(question, intent)
+                trained += 1
+        return trained
+
+    def load_samples(self) -> List[Dict[str, Any]]:
+        """从样本日志读取最新的样本"""
+        if not self.sample_log_path or not os.path.exists(self.sample_log_path):
+            return []
+        samples = []
+        try:
+            with open(self.sample_log_path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        samples.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except OSError as e:
+            logger.error(f"读取意图样本日志失败: {str(e)}")
+        return samples[-self.max_log_samples:]
+
+    def flush(self, timeout: Optional[float] = None):
+        """等待已提交的样本写入日志"""
+        with self._log_lock:
+            pending = self._last_write
+        if pending is not None:
+            pending.result(timeout=timeout)
+
+    def _append_sample(self, question: str, intent: str, confidence: float):
+        if not self.sample_log_path:
+            return
+        record = json.dumps({
+            "question": question,
+            "intent": intent,
+            "confidence": round(confidence, 4),
+            "timestamp": time.time()
+        }, ensure_ascii=False)
+        with self._log_lock:
+            if self._log_executor is None:
+                self._log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent-sample-log")
+            self._last_write = self._log_executor.submit(self._write_sample, record)
+
+    def _write_sample(self, record: str):
+        """在日志线程中追加样本，超过上限时压缩为最新的max_log_samples条"""
+        try:
+            directory = os.path.dirname(self.sample_log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self._log_lines is None:
+                self._log_lines = self._count_log_lines()
+            with open(self.sample_log_path, 'a', encoding='utf-8') as f:
+                f.write(record + "\n")
+            self._log_lines += 1
+            # 留出10%余量，避免每条新样本都触发整文件重写
+            if self._log_lines > self.max_log_samples + max(1, self.max_log_samples // 10):
+                self._compact_log()
+        except OSError as e:
+            logger.error(f"写入意图样本日志失败: {str(e)}")
+
+    def _count_log_lines(self) -> int:
+        if not os.path.exists(self.sample_log_path):
+            return 0
+        with open(self.sample_log_path, encoding='utf-8') as f:
+            return sum(1 for _ in f)
+
+    def _compact_log(self):
+        with open(self.sample_log_path, encoding='utf-8') as f:
+            lines = f.readlines()[-self.max_log_samples:]
+        temp_path = f"{self.sample_log_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        os.replace(temp_path, self.sample_log_path)
+        self._log_lines = len(lines)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            cache_size = len(self._cache)
+        return {
+            "cache_size": cache_size,
+            "cache_capacity": self.cache_size,
+            "classifier_threshold": self.classifier_threshold,
+            "classifier": self.classifier.get_statistics()
+        }
+
+
+def create_intent_fast_path() -> IntentFastPath:
+    """按环境变量创建快速通道；测试模式下默认不写样本日志"""
+    default_log = '' if os.getenv('TEST_MODE', 'false').lower() == 'true' else './data/intent/samples.jsonl'
+    return IntentFastPath(
+        cache_size=int(os.getenv('INTENT_CACHE_SIZE', '4096')),
+        classifier_threshold=float(os.getenv('INTENT_CLASSIFIER_THRESHOLD', '0.95')),
+        sample_log_path=os.getenv('INTENT_SAMPLE_LOG', default_log) or None
+    )
@@ -1,5 +1,8 @@
 """
 意图识别服务 - 基于云端Qwen模型的智能意图识别
+
+识别分为三级：规范化问题缓存、本地分类器、云端模型。前两级能高置信度判定时直接返回，
+只有低置信度的问题才调用云端模型，云端结果再回灌缓存和本地分类器。
 """
 
 import json
@@ -10,6 +13,7 @@ from enum import Enum
 
 from .ai_model_service import get_ai_service, ModelType, AIModelError
 from .prompt_manager import prompt_manager, PromptType
+from .intent_fast_path import IntentFastPath, create_intent_fast_path
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +45,7 @@ class IntentRecognitionError(Exception):
 class IntentRecognitionService:
     """意图识别服务"""
     
-    def __init__(self):
+    def __init__(self, fast_path: Optional[IntentFastPath] = None):
         self.ai_service = get_ai_service()
         self.prompt_manager = prompt_manager
         
@@ -49,8 +53,15 @@ class IntentRecognitionService:
         self.confidence_threshold = 0.7  # 置信度阈值
         self.max_retries = 3  # 最大重试次数
         
+        # 快速通道（缓存 + 本地分类器）
+        self.fast_path = fast_path if fast_path is not None else create_intent_fast_path()
+        
         # 统计信息
-        self.stats = {
+        self.stats = self._empty_stats()
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
             'total_requests': 0,
             'successful_recognitions': 0,
             'failed_recognitions': 0,
@@ -58,7 +69,10 @@ class IntentRecognitionService:
             'report_intents': 0,
             'unknown_intents': 0,
             'avg_confidence': 0.0,
-            'avg_response_time': 0.0
+            'avg_response_time': 0.0,
+            'cache_hits': 0,
+            'classifier_hits': 0,
+            'llm_calls': 0
         }
     
     async def identify_intent(self, user_question: str, context: Dict[str, Any] = None) -> IntentResult:
@@ -81,16 +95,31 @@ class IntentRecognitionService:
         user_question = user_question.strip()
         self.stats['total_requests'] += 1
         
+        # 快速通道：缓存键包含提供给模型的上下文摘要，保证与云端判定条件一致
+        context_signature = self._format_context(context) if context else ""
+        fast_result = self._try_fast_path(user_question, context_signature)
+        if fast_result is not None:
+            return fast_result
+        
         try:
             # 构建意图识别prompt
             prompt = self._build_intent_prompt(user_question, context)
             
             # 调用云端Qwen模型
+            self.stats['llm_calls'] += 1
             response = await self.ai_service.generate_sql(prompt, temperature=0.1)
             
             # 解析意图识别结果
             intent_result = self._parse_intent_response(response.content, user_question)
             
+            # 高置信度结果回灌快速通道
+            if (intent_result.intent != IntentType.UNKNOWN
+                    and intent_result.confidence >= self.confidence_threshold):
+                self.fast_path.record(
+                    user_question, intent_result.intent.value, intent_result.confidence,
+                    intent_result.reasoning, context_signature
+                )
+            
             # 更新统计信息
             self._update_stats(intent_result, response.response_time)
             
@@ -107,6 +136,34 @@ class IntentRecognitionService:
             else:
                 raise IntentRecognitionError(f"意图识别失败: {str(e)}", user_question)
     
+    def _try_fast_path(self, user_question: str, context_signature: str) -> Optional[IntentResult]:
+        """尝试用缓存或本地分类器判定意图，无法高置信度判定时返回None"""
+        try:
+            decision = self.fast_path.lookup(user_question, context_signature)
+        except Exception as e:
+            logger.warning(f"Intent fast path failed, escalating to LLM: {str(e)}")
+            return None
+        if decision is None:
+            return None
+        
+        try:
+            intent = IntentType(decision.intent)
+        except ValueError:
+            return None
+        
+        self.stats['cache_hits' if decision.source == 'cache' else 'classifier_hits'] += 1
+        intent_result = IntentResult(
+            intent=intent,
+            confidence=decision.confidence,
+            reasoning=decision.reasoning,
+            original_question=user_question,
+            metadata={'source': decision.source, 'elapsed_ms': decision.elapsed_ms}
+        )
+        self._update_stats(intent_result, decision.elapsed_ms / 1000)
+        
+        logger.info(f"Intent identified by {decision.source}: {intent.value} (confidence: {decision.confidence:.2f}) in {decision.elapsed_ms:.3f}ms")
+        return intent_result
+    
     def _build_intent_prompt(self, user_question: str, context: Dict[str, Any] = None) -> str:
         """构建意图识别prompt"""
         try:
@@ -302,20 +359,23 @@ class IntentRecognitionService:
                 'unknown': 0.0
             }
         
+        # 快速通道命中率
+        fast_path_stats = self.fast_path.get_statistics()
+        if total_requests > 0:
+            fast_path_stats.update({
+                'cache_hit_rate': stats['cache_hits'] / total_requests,
+                'classifier_hit_rate': stats['classifier_hits'] / total_requests,
+                'llm_rate': stats['llm_calls'] / total_requests
+            })
+        else:
+            fast_path_stats.update({'cache_hit_rate': 0.0, 'classifier_hit_rate': 0.0, 'llm_rate': 0.0})
+        stats['fast_path'] = fast_path_stats
+        
         return stats
     
     def reset_statistics(self):
         """重置统计信息"""
-        self.stats = {
-            'total_requests': 0,
-            'successful_recognitions': 0,
-            'failed_recognitions': 0,
-            'query_intents': 0,
-            'report_intents': 0,
-            'unknown_intents': 0,
-            'avg_confidence': 0.0,
-            'avg_response_time': 0.0
-        }
+        self.stats = self._empty_stats()
         logger.info("Intent recognition statistics reset")
 
 
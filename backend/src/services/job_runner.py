@@ -0,0 +1,684 @@
+"""
+后台任务执行器
+
+表结构同步、动态字典刷新、Excel导入等耗时操作统一提交到后台任务执行器执行：
+
+- 有界工作线程池：同时执行的任务数不超过 max_workers，其余任务排队
+- 并发分组：同一分组（通常为数据源ID）同时执行的任务数不超过 per_key_limit，
+  批量同步时不会压垮单个数据源
+- 持久化：任务状态、进度和结果保存在 background_jobs 表中，服务重启后
+  通过 recover 将未完成的任务重新排队
+- 心跳：执行中的任务记录所属执行器实例并定期写入心跳，recover 只接管心跳超时的任务，
+  不会抢走其他仍在运行的进程中的任务；执行次数已用尽的中断任务标记为失败，不再执行
+- 取消：排队中的任务直接取消，执行中的任务由处理函数在检查点响应取消
+- 重试：处理函数抛出异常时按指数退避重试，执行次数用尽后标记为失败
+- 指标：按任务类型统计提交、完成、失败、取消、重试次数以及排队和执行耗时
+
+处理函数在模块导入时通过 register_job_handler 注册，接收 JobContext，返回可JSON序列化的结果。
+"""
+import itertools
+import logging
+import os
+import socket
+import threading
+import uuid
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from src.models.background_job_model import BackgroundJob, JobStatus
+from src.services.service_registry import get_service_registry, lazy_service
+
+# 创建日志记录器
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value)
+
+
+class JobCancelled(Exception):
+    """任务已被取消（处理函数在检查点抛出）"""
+
+
+@dataclass
+class JobHandler:
+    """已注册的任务处理函数"""
+    job_type: str
+    func: Callable[["JobContext"], Any]
+    max_attempts: int = 3
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(
+    job_type: str,
+    func: Callable[["JobContext"], Any],
+    max_attempts: int = 3,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+):
+    """
+    注册任务处理函数
+
+    Args:
+        job_type: 任务类型
+        func: 处理函数，接收 JobContext，返回可JSON序列化的结果
+        max_attempts: 默认最大执行次数（非幂等的任务应设为1）
+        retry_on: 需要重试的异常类型，其他异常直接失败
+    """
+    _handlers[job_type] = JobHandler(job_type, func, max_attempts, tuple(retry_on))
+    return func
+
+
+def get_job_handler(job_type: str) -> Optional[JobHandler]:
+    return _handlers.get(job_type)
+
+
+class JobContext:
+    """传给处理函数的任务上下文"""
+
+    def __init__(self, runner: "JobRunner", job_id: str, job_type: str, concurrency_key: Optional[str]):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.concurrency_key = concurrency_key
+        self.payload: Dict[str, Any] = {}
+        self.attempt = 0
+        self.progress = 0
+        self.message: Optional[str] = None
+        self._runner = runner
+        self._cancel_event = threading.Event()
+        self._last_flush = 0.0
+        self._waited = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """检查点：任务已被取消时抛出 JobCancelled"""
+        if self.cancelled:
+            raise JobCancelled(f"任务已取消: {self.job_id}")
+
+    def report_progress(self, progress: int, message: Optional[str] = None):
+        """
+        报告进度
+
+        进度按 progress_interval 节流写入数据库，写入时同时读取其他进程发出的取消请求
+        """
+        self.progress = max(0, min(100, int(progress)))
+        if message is not None:
+            self.message = message
+        self._runner._flush_progress(self)
+
+
+@dataclass(order=True)
+class _QueuedJob:
+    """排队中的任务（按可执行时间和提交顺序排序）"""
+    ready_at: float
+    seq: int
+    job_id: str = field(compare=False)
+    job_type: str = field(compare=False)
+    concurrency_key: Optional[str] = field(compare=False, default=None)
+
+
+def _new_type_metrics() -> Dict[str, Any]:
+    return {
+        "submitted": 0,
+        "completed": 0,
+        "failed": 0,
+        "cancelled": 0,
+        "retried": 0,
+        "runs": 0,
+        "total_run_ms": 0.0,
+        "total_wait_ms": 0.0
+    }
+
+
+class JobRunner:
+    """有界工作线程池 + 持久化任务表的后台任务执行器"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        max_workers: Optional[int] = None,
+        per_key_limit: Optional[int] = None,
+        retry_base_delay: Optional[float] = None,
+        retry_max_delay: float = 300.0,
+        progress_interval: float = 1.0,
+        heartbeat_interval: Optional[float] = None,
+        heartbeat_timeout: Optional[float] = None
+    ):
+        """
+        初始化后台任务执行器
+
+        Args:
+            session_factory: 数据库会话工厂，默认使用 src.database.SessionLocal
+            max_workers: 工作线程数（环境变量 JOB_RUNNER_MAX_WORKERS，默认4）
+            per_key_limit: 每个并发分组同时执行的任务数（环境变量 JOB_RUNNER_PER_SOURCE_LIMIT，默认2）
+            retry_base_delay: 首次重试的等待秒数，之后每次翻倍（环境变量 JOB_RUNNER_RETRY_DELAY，默认2秒）
+            retry_max_delay: 重试等待秒数上限
+            progress_interval: 进度写入数据库的最小间隔（秒）
+            heartbeat_interval: 执行中任务的心跳间隔（环境变量 JOB_RUNNER_HEARTBEAT_INTERVAL，默认30秒）
+            heartbeat_timeout: 心跳超过该秒数未更新的执行中任务视为进程已退出（默认为心跳间隔的3倍）
+        """
+        self._session_factory = session_factory
+        self.max_workers = max_workers or int(os.getenv("JOB_RUNNER_MAX_WORKERS", "4"))
+        self.per_key_limit = per_key_limit or int(os.getenv("JOB_RUNNER_PER_SOURCE_LIMIT", "2"))
+        self.retry_base_delay = (
+            retry_base_delay if retry_base_delay is not None
+            else float(os.getenv("JOB_RUNNER_RETRY_DELAY", "2.0"))
+        )
+        self.retry_max_delay = retry_max_delay
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = (
+            heartbeat_interval if heartbeat_interval is not None
+            else float(os.getenv("JOB_RUNNER_HEARTBEAT_INTERVAL", "30"))
+        )
+        self.heartbeat_timeout = heartbeat_timeout or self.heartbeat_interval * 3
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-runner")
+        self._lock = threading.Lock()
+        self._queue: List[_QueuedJob] = []
+        self._running: Dict[str, JobContext] = {}
+        self._running_per_key: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at: Optional[float] = None
+        self._shutdown = False
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="job-runner-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+        logger.info(f"Job runner initialized: max_workers={self.max_workers}, per_key_limit={self.per_key_limit}")
+
+    @contextmanager
+    def _session(self):
+        if self._session_factory is None:
+            from src.database import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _count(self, job_type: str, name: str, value: float = 1):
+        with self._lock:
+            metrics = self._metrics.setdefault(job_type, _new_type_metrics())
+            metrics[name] += value
+
+    # ------------------------------------------------------------------
+    # 提交与查询
+    # ------------------------------------------------------------------
+
+    def submit(
+        self,
+        job_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        concurrency_key: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ) -> str:
+        """
+        提交任务
+
+        Args:
+            job_type: 任务类型（必须已注册处理函数）
+            payload: 任务参数（可JSON序列化）
+            concurrency_key: 并发分组，同一分组的任务受 per_key_limit 限制
+            max_attempts: 最大执行次数，默认使用处理函数注册时的设置
+
+        Returns:
+            任务ID
+        """
+        handler = get_job_handler(job_type)
+        if handler is None:
+            raise ValueError(f"未注册的任务类型: {job_type}")
+        if self._shutdown:
+            raise RuntimeError("后台任务执行器已关闭")
+
+        with self._session() as db:
+            job = BackgroundJob(
+                job_type=job_type,
+                status=JobStatus.PENDING.value,
+                concurrency_key=concurrency_key,
+                payload=payload or {},
+                max_attempts=max_attempts or handler.max_attempts
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+
+        self._count(job_type, "submitted")
+        logger.info(f"Job submitted: {job_type} {job_id} (key={concurrency_key})")
+        self._enqueue(job_id, job_type, concurrency_key)
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态，执行中的任务返回内存中的最新进度"""
+        with self._session() as db:
+            job = db.get(BackgroundJob, job_id)
+            if job is None:
+                return None
+            data = job.to_dict()
+        context = self._running.get(job_id)
+        if context is not None and data["status"] == JobStatus.RUNNING.value:
+            data["progress"] = context.progress
+            data["message"] = context.message
+        return data
+
+    def list_jobs(
+        self,
+        job_type: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出任务"""
+        with self._session() as db:
+            query = db.query(BackgroundJob)
+            if job_type:
+                query = query.filter(BackgroundJob.job_type == job_type)
+            if status:
+                query = query.filter(BackgroundJob.status == status)
+            jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+            return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务
+
+        排队中的任务立即标记为已取消；执行中的任务设置取消标志，由处理函数在检查点退出
+
+        Returns:
+            任务存在且未结束时返回True
+        """
+        with self._lock:
+            queued = next((item for item in self._queue if item.job_id == job_id), None)
+            if queued is not None:
+                self._queue.remove(queued)
+            context = self._running.get(job_id)
+            if context is not None:
+                context._cancel_event.set()
+
+        with self._session() as db:
+            job = db.get(BackgroundJob, job_id)
+            if job is None or job.status in TERMINAL_STATUSES:
+                return False
+            job.cancel_requested = True
+            # 在其他进程中执行的任务只设置取消请求，由该进程在写入进度时读取
+            if context is None and job.status == JobStatus.PENDING.value:
+                job.status = JobStatus.CANCELLED.value
+                job.ended_at = datetime.now()
+                self._count(job.job_type, "cancelled")
+            db.commit()
+
+        logger.info(f"Job cancel requested: {job_id}")
+        return True
+
+    def delete_job(self, job_id: str) -> bool:
+        """删除已结束的任务记录"""
+        with self._session() as db:
+            job = db.get(BackgroundJob, job_id)
+            if job is None or job.status not in TERMINAL_STATUSES:
+                return False
+            db.delete(job)
+            db.commit()
+        return True
+
+    def recover(self) -> int:
+        """
+        服务启动时恢复未完成的任务
+
+        排队中的任务按原定时间重新排队。执行中的任务只有心跳超时（所属进程已退出）时才视为被中断：
+        执行次数未用尽的重置为排队中后重新执行，已用尽的（如只允许执行一次的Excel导入）标记为失败
+
+        Returns:
+            重新排队的任务数
+        """
+        with self._lock:
+            known = {item.job_id for item in self._queue} | set(self._running)
+
+        recovered = []
+        failed = []
+        with self._session() as db:
+            jobs = db.query(BackgroundJob).filter(
+                BackgroundJob.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value])
+            ).order_by(BackgroundJob.created_at).all()
+            now = datetime.now()
+            stale_before = now - timedelta(seconds=self.heartbeat_timeout)
+            for job in jobs:
+                if job.id in known:
+                    continue
+                if job.status == JobStatus.RUNNING.value:
+                    if job.owner == self.worker_id or (job.heartbeat_at and job.heartbeat_at >= stale_before):
+                        continue
+                    job.owner = None
+                    if (job.attempts or 0) >= job.max_attempts:
+                        job.status = JobStatus.FAILED.value
+                        job.error = "执行被中断且执行次数已用尽，未重新执行"
+                        job.ended_at = now
+                        failed.append(job.job_type)
+                        continue
+                    job.status = JobStatus.PENDING.value
+                    job.message = "服务重启后恢复执行"
+                delay = max(0.0, (job.next_run_at - now).total_seconds()) if job.next_run_at else 0.0
+                recovered.append((job.id, job.job_type, job.concurrency_key, delay))
+            db.commit()
+
+        for job_type in failed:
+            self._count(job_type, "failed")
+        if failed:
+            logger.warning(f"Marked {len(failed)} interrupted background jobs as failed (attempts exhausted)")
+        for job_id, job_type, concurrency_key, delay in recovered:
+            self._enqueue(job_id, job_type, concurrency_key, delay, dispatch=False)
+        self._dispatch()
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} unfinished background jobs")
+        return len(recovered)
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, job_id: str, job_type: str, concurrency_key: Optional[str],
+                 delay: float = 0.0, dispatch: bool = True):
+        item = _QueuedJob(time.monotonic() + delay, next(self._seq), job_id, job_type, concurrency_key)
+        with self._lock:
+            self._queue.append(item)
+        if dispatch:
+            self._dispatch()
+
+    def _dispatch(self):
+        """在空闲线程上启动可执行的任务：已到执行时间、并发分组未达上限"""
+        started = []
+        with self._lock:
+            if self._shutdown:
+                return
+            now = time.monotonic()
+            next_ready = None
+            for item in sorted(self._queue):
+                if len(self._running) >= self.max_workers:
+                    break
+                if item.ready_at > now:
+                    next_ready = item.ready_at if next_ready is None else min(next_ready, item.ready_at)
+                    continue
+                key = item.concurrency_key
+                if key is not None and self._running_per_key.get(key, 0) >= self.per_key_limit:
+                    continue
+                self._queue.remove(item)
+                context = JobContext(self, item.job_id, item.job_type, key)
+                self._running[item.job_id] = context
+                if key is not None:
+                    self._running_per_key[key] = self._running_per_key.get(key, 0) + 1
+                context._waited = max(0.0, now - item.ready_at)
+                started.append(context)
+            self._schedule_timer(next_ready)
+
+        for context in started:
+            self._executor.submit(self._execute, context)
+
+    def _schedule_timer(self, ready_at: Optional[float]):
+        """为等待重试的任务设置唤醒定时器（调用方持有锁）"""
+        if ready_at is None or (self._timer_at is not None and self._timer_at <= ready_at):
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_at = ready_at
+        self._timer = threading.Timer(max(0.0, ready_at - time.monotonic()) + 0.01, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._timer_at = None
+        self._dispatch()
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def _claim(self, context: JobContext) -> Optional[int]:
+        """
+        将任务标记为执行中并加载参数
+
+        使用带状态和执行次数条件的更新，多个进程同时恢复同一任务时只有一个能执行，
+        执行次数已用尽的任务不会再次执行
+
+        Returns:
+            最大执行次数，任务无需执行时返回None
+        """
+        with self._session() as db:
+            job = db.get(BackgroundJob, context.job_id)
+            if job is None or job.status != JobStatus.PENDING.value:
+                return None
+            if (job.attempts or 0) >= job.max_attempts:
+                job.status = JobStatus.FAILED.value
+                job.error = job.error or "执行次数已用尽"
+                job.ended_at = datetime.now()
+                db.commit()
+                self._count(context.job_type, "failed")
+                return None
+            if job.cancel_requested:
+                context._cancel_event.set()
+            if context.cancelled:
+                job.status = JobStatus.CANCELLED.value
+                job.ended_at = datetime.now()
+                db.commit()
+                self._count(context.job_type, "cancelled")
+                return None
+
+            attempts = (job.attempts or 0) + 1
+            payload = dict(job.payload or {})
+            progress = job.progress or 0
+            max_attempts = job.max_attempts
+            now = datetime.now()
+            claimed = db.query(BackgroundJob).filter(
+                BackgroundJob.id == context.job_id,
+                BackgroundJob.status == JobStatus.PENDING.value,
+                BackgroundJob.attempts < BackgroundJob.max_attempts
+            ).update({
+                BackgroundJob.status: JobStatus.RUNNING.value,
+                BackgroundJob.attempts: BackgroundJob.attempts + 1,
+                BackgroundJob.owner: self.worker_id,
+                BackgroundJob.heartbeat_at: now,
+                BackgroundJob.started_at: job.started_at or now,
+                BackgroundJob.next_run_at: None,
+                BackgroundJob.updated_at: now
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+        context.payload = payload
+        context.attempt = attempts
+        context.progress = progress
+        return max_attempts
+
+    def _execute(self, context: JobContext):
+        retry_delay = None
+        claimed = False
+        run_started = time.perf_counter()
+        try:
+            max_attempts = self._claim(context)
+            if max_attempts is None:
+                return
+            claimed = True
+            handler = get_job_handler(context.job_type)
+            if handler is None:
+                self._finish(context, JobStatus.FAILED, error=f"未注册的任务类型: {context.job_type}")
+                return
+
+            try:
+                result = handler.func(context)
+            except JobCancelled:
+                self._finish(context, JobStatus.CANCELLED)
+                return
+            except Exception as e:
+                retryable = isinstance(e, handler.retry_on) and not context.cancelled
+                if retryable and context.attempt < max_attempts:
+                    retry_delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** (context.attempt - 1)))
+                    self._schedule_retry(context, str(e), retry_delay)
+                    logger.warning(f"Job {context.job_id} attempt {context.attempt} failed, "
+                                   f"retrying in {retry_delay}s: {str(e)}")
+                else:
+                    self._finish(context, JobStatus.CANCELLED if context.cancelled else JobStatus.FAILED, error=str(e))
+                    logger.error(f"Job {context.job_id} ({context.job_type}) failed: {str(e)}")
+                return
+
+            if context.cancelled:
+                self._finish(context, JobStatus.CANCELLED)
+            else:
+                self._finish(context, JobStatus.COMPLETED, result=result)
+        except Exception as e:
+            # 任务表读写失败，任务保持原状态，重启后恢复
+            logger.error(f"Job {context.job_id} could not be executed: {str(e)}", exc_info=True)
+        finally:
+            if claimed:
+                self._count(context.job_type, "runs")
+                self._count(context.job_type, "total_wait_ms", context._waited * 1000)
+                self._count(context.job_type, "total_run_ms", (time.perf_counter() - run_started) * 1000)
+            with self._lock:
+                self._running.pop(context.job_id, None)
+                key = context.concurrency_key
+                if key is not None:
+                    remaining = self._running_per_key.get(key, 1) - 1
+                    if remaining > 0:
+                        self._running_per_key[key] = remaining
+                    else:
+                        self._running_per_key.pop(key, None)
+            if retry_delay is not None:
+                self._enqueue(context.job_id, context.job_type, context.concurrency_key, retry_delay)
+            else:
+                self._dispatch()
+
+    def _finish(self, context: JobContext, status: JobStatus, result: Any = None, error: Optional[str] = None):
+        with self._session() as db:
+            job = db.get(BackgroundJob, context.job_id)
+            if job is None:
+                return
+            job.status = status.value
+            job.ended_at = datetime.now()
+            if status == JobStatus.COMPLETED:
+                job.progress = 100
+                job.result = result
+                job.error = None
+            else:
+                job.progress = context.progress
+                job.error = error
+            if context.message is not None:
+                job.message = context.message[:500]
+            db.commit()
+        self._count(context.job_type, status.value)
+
+    def _schedule_retry(self, context: JobContext, error: str, delay: float):
+        with self._session() as db:
+            job = db.get(BackgroundJob, context.job_id)
+            if job is None:
+                return
+            job.status = JobStatus.PENDING.value
+            job.owner = None
+            job.error = error
+            job.progress = context.progress
+            job.next_run_at = datetime.now() + timedelta(seconds=delay)
+            db.commit()
+        self._count(context.job_type, "retried")
+
+    def _flush_progress(self, context: JobContext):
+        """节流写入进度，同时读取取消请求"""
+        now = time.monotonic()
+        if context.progress < 100 and now - context._last_flush < self.progress_interval:
+            return
+        context._last_flush = now
+        try:
+            with self._session() as db:
+                job = db.get(BackgroundJob, context.job_id)
+                if job is None:
+                    return
+                job.progress = context.progress
+                job.heartbeat_at = datetime.now()
+                if context.message is not None:
+                    job.message = context.message[:500]
+                if job.cancel_requested:
+                    context._cancel_event.set()
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to persist progress of job {context.job_id}: {str(e)}")
+
+    def _heartbeat_loop(self):
+        while not self._heartbeat_stop.wait(self.heartbeat_interval):
+            self._beat()
+
+    def _beat(self):
+        """为本实例执行中的任务写入心跳"""
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        try:
+            with self._session() as db:
+                db.query(BackgroundJob).filter(
+                    BackgroundJob.id.in_(job_ids),
+                    BackgroundJob.owner == self.worker_id,
+                    BackgroundJob.status == JobStatus.RUNNING.value
+                ).update({BackgroundJob.heartbeat_at: datetime.now()}, synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to write job heartbeat: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # 指标与关闭
+    # ------------------------------------------------------------------
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """任务执行指标"""
+        with self._lock:
+            job_types = {}
+            for job_type, metrics in self._metrics.items():
+                stats = dict(metrics)
+                runs = stats["runs"] or 1
+                stats["avg_run_ms"] = round(stats.pop("total_run_ms") / runs, 2)
+                stats["avg_wait_ms"] = round(stats.pop("total_wait_ms") / runs, 2)
+                job_types[job_type] = stats
+            return {
+                "max_workers": self.max_workers,
+                "per_key_limit": self.per_key_limit,
+                "running": len(self._running),
+                "queued": len(self._queue),
+                "running_per_key": dict(self._running_per_key),
+                "job_types": job_types
+            }
+
+    def shutdown(self, wait: bool = False):
+        """
+        关闭执行器
+
+        排队中的任务保留在任务表中，下次启动时恢复；wait为False时不等待执行中的任务
+        """
+        self._heartbeat_stop.set()
+        with self._lock:
+            self._shutdown = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._queue.clear()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Job runner shut down")
+
+
+# 全局实例（首次使用时构造，服务预热时恢复未完成的任务）
+job_runner = lazy_service("job_runner", JobRunner)
+
+
+def get_job_runner() -> JobRunner:
+    """获取后台任务执行器实例"""
+    return get_service_registry().get("job_runner")
+
+
+get_service_registry().add_warm_up_task("job_runner", lambda: job_runner.recover())
@@ -0,0 +1,177 @@
+"""
+键集（Keyset/Seek）分页
+
+使用唯一排序键（通常为主键）定位下一页的起点：
+WHERE (k1, k2) > (上一页最后一行的键值) ORDER BY k1, k2 LIMIT n
+与OFFSET分页不同，翻到任意深度的代价都只取决于页大小，且排序确定。
+游标为不透明的token，记录上一页最后一行的键值和查询指纹。
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from src.services.sql_limit_rewriter import SQLLimitRewriter, quote_identifier
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无效（格式错误或与当前查询不匹配）"""
+    pass
+
+
+@dataclass
+class KeysetCursor:
+    """键集分页游标"""
+    values: List[Any]       # 上一页最后一行的键值
+    page: int               # 上一页的页码
+    fingerprint: str        # 查询指纹，防止游标用于其他查询
+
+
+class KeysetPaginator:
+    """键集分页SQL构造与游标编解码"""
+
+    PAGE_ALIAS = "_page"
+
+    def __init__(self, limit_rewriter: SQLLimitRewriter = None):
+        self.limit_rewriter = limit_rewriter or SQLLimitRewriter()
+
+    @staticmethod
+    def fingerprint(sql: str, key_columns: List[str]) -> str:
+        """计算查询指纹（规范化SQL + 排序键）"""
+        normalized = ' '.join(sql.strip().rstrip(';').split()).lower()
+        raw = normalized + '|' + ','.join(c.lower() for c in key_columns)
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()[:16]
+
+    def build_page_sql(
+        self,
+        sql: str,
+        key_columns: List[str],
+        after_values: Optional[List[Any]],
+        limit: int,
+        db_type: Any
+    ) -> str:
+        """
+        构造键集分页SQL
+
+        Args:
+            sql: 原始查询
+            key_columns: 唯一排序键
+            after_values: 上一页最后一行的键值，首页为None
+            limit: 本次读取的行数
+            db_type: 数据库类型（DatabaseType或其值）
+
+        Returns:
+            str: 分页SQL
+        """
+        dialect = getattr(db_type, 'value', db_type)
+        inner = self.limit_rewriter.strip_order_by(sql)
+        quoted = [quote_identifier(c, dialect) for c in key_columns]
+
+        where = ""
+        if after_values is not None:
+            if len(after_values) != len(key_columns):
+                raise InvalidCursorError("游标键值数量与排序键不一致")
+            literals = [self._to_literal(v, dialect) for v in after_values]
+            where = " WHERE " + self._seek_predicate(quoted, literals)
+
+        order_by = " ORDER BY " + ", ".join(quoted)
+        if dialect == 'sqlserver':
+            return f"SELECT TOP {int(limit)} * FROM ({inner}) AS {self.PAGE_ALIAS}{where}{order_by}"
+        return f"SELECT * FROM ({inner}) AS {self.PAGE_ALIAS}{where}{order_by} LIMIT {int(limit)}"
+
+    def encode_cursor(self, values: List[Any], page: int, fingerprint: str) -> str:
+        """将键值编码为不透明的游标token"""
+        payload = {
+            'v': [self._to_json_value(v) for v in values],
+            'p': page,
+            'f': fingerprint
+        }
+        raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token: str, fingerprint: str) -> KeysetCursor:
+        """
+        解码游标token
+
+        Raises:
+            InvalidCursorError: 游标格式错误或不属于当前查询
+        """
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            cursor = KeysetCursor(values=list(payload['v']), page=int(payload['p']), fingerprint=str(payload['f']))
+        except Exception as e:
+            raise InvalidCursorError(f"分页游标格式错误: {str(e)}")
+
+        if cursor.fingerprint != fingerprint:
+            raise InvalidCursorError("分页游标与当前查询不匹配")
+        for value in cursor.values:
+            if value is None or isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise InvalidCursorError("分页游标包含不支持的键值")
+        return cursor
+
+    @staticmethod
+    def _seek_predicate(columns: List[str], literals: List[str]) -> str:
+        """
+        构造“大于上一行”的谓词：
+        k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+
+        展开形式在SQL Server上同样可用（不支持行值比较）。
+        """
+        if len(columns) == 1:
+            return f"{columns[0]} > {literals[0]}"
+
+        branches = []
+        for i in range(len(columns)):
+            terms = [f"{columns[j]} = {literals[j]}" for j in range(i)]
+            terms.append(f"{columns[i]} > {literals[i]}")
+            branches.append("(" + " AND ".join(terms) + ")")
+        return "(" + " OR ".join(branches) + ")"
+
+    @staticmethod
+    def _to_json_value(value: Any) -> Any:
+        """将数据库返回的键值转换为可写入游标的JSON值"""
+        if value is None:
+            raise ValueError("排序键值为空，无法使用键集分页")
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (int, str)):
+            return value
+        if isinstance(value, float):
+            if math.isnan(value) or math.isinf(value):
+                raise ValueError("排序键值不是有限数值，无法使用键集分页")
+            return value
+        if isinstance(value, Decimal):
+            return int(value) if value == value.to_integral_value() else str(value)
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ')
+        if isinstance(value, (date, time)):
+            return value.isoformat()
+        raise ValueError(f"不支持的排序键类型: {type(value).__name__}")
+
+    @staticmethod
+    def _to_literal(value: Any, dialect: str) -> str:
+        """将游标中的键值渲染为SQL字面量"""
+        if isinstance(value, bool):
+            raise InvalidCursorError("分页游标包含不支持的键值")
+        if isinstance(value, int):
+            return str(value)
+        if isinstance(value, float):
+            if math.isnan(value) or math.isinf(value):
+                raise InvalidCursorError("分页游标包含不支持的键值")
+            return repr(value)
+        if isinstance(value, str):
+            escaped = value.replace("'", "''")
+            if dialect == 'mysql':
+                escaped = escaped.replace('\\', '\\\\')
+            prefix = 'N' if dialect == 'sqlserver' else ''
+            return f"{prefix}'{escaped}'"
+        raise InvalidCursorError("分页游标包含不支持的键值")
@@ -17,9 +17,13 @@ from sqlalchemy import and_, or_
 from src.models.knowledge_base_model import KnowledgeBase
 from src.models.knowledge_item_model import KnowledgeItem
 from src.utils import get_db_session
+from src.services.embedding_index import EmbeddingIndex, get_embedding_index, KIND_KNOWLEDGE
 
 logger = logging.getLogger(__name__)
 
+# 向量检索相似度折算为相关性得分的权重（与名称匹配的权重同一量级）
+DENSE_RELEVANCE_WEIGHT = 3.0
+
 
 class KnowledgeType(str, Enum):
     """知识类型枚举"""
@@ -90,8 +94,11 @@ class SemanticInjectionResult:
 class KnowledgeSemanticInjectionService:
     """知识库语义注入服务"""
     
-    def __init__(self, db_session: Optional[Session] = None):
+    def __init__(self, db_session: Optional[Session] = None, embedding_index: Optional[EmbeddingIndex] = None):
         self.db = db_session or next(get_db_session())
+        self.embedding_index = embedding_index or get_embedding_index()
+        self.dense_top_k = 30  # 向量检索返回的知识条目数
+        self.dense_min_score = 0.3  # 向量检索的最低相似度
         self.term_cache: Dict[str, List[TermKnowledge]] = {}
         self.logic_cache: Dict[str, List[LogicKnowledge]] = {}
         self.event_cache: Dict[str, List[EventKnowledge]] = {}
@@ -126,16 +133,19 @@ class KnowledgeSemanticInjectionService:
             keywords = self._extract_keywords(user_question)
             logger.debug(f"提取的关键词: {keywords}")
             
+            # 向量检索语义相近的知识条目，补充没有字面重合的同义表达
+            dense_scores = self._dense_knowledge_scores(user_question)
+            
             # 2. 匹配业务术语
-            terms = self._match_terms(keywords, table_ids, include_global, max_terms)
+            terms = self._match_terms(keywords, table_ids, include_global, max_terms, dense_scores)
             logger.debug(f"匹配到 {len(terms)} 个业务术语")
             
             # 3. 匹配业务逻辑
-            logics = self._match_logics(keywords, table_ids, include_global, max_logics)
+            logics = self._match_logics(keywords, table_ids, include_global, max_logics, dense_scores)
             logger.debug(f"匹配到 {len(logics)} 个业务逻辑")
             
             # 4. 匹配事件知识
-            events = self._match_events(keywords, table_ids, include_global, max_events)
+            events = self._match_events(keywords, table_ids, include_global, max_events, dense_scores)
             logger.debug(f"匹配到 {len(events)} 个事件知识")
             
             # 5. 构建知识库语义信息
@@ -174,6 +184,31 @@ class KnowledgeSemanticInjectionService:
                 injection_summary={"error": str(e)}
             )
     
+    def _dense_knowledge_scores(self, user_question: str) -> Dict[str, float]:
+        """从元数据向量索引检索与问题相似的知识条目"""
+        try:
+            self.embedding_index.refresh_if_stale()
+            if not self.embedding_index.ready:
+                # 索引在后台建立期间只使用关键词匹配
+                return {}
+            hits = self.embedding_index.search(
+                user_question,
+                top_k=self.dense_top_k,
+                kinds=(KIND_KNOWLEDGE,),
+                min_score=self.dense_min_score
+            )
+            return {hit.item_id: hit.score for hit in hits}
+        except Exception as e:
+            logger.error(f"向量检索知识条目失败: {str(e)}")
+            return {}
+    
+    @staticmethod
+    def _dense_relevance(item: KnowledgeItem, dense_scores: Optional[Dict[str, float]]) -> float:
+        """向量检索相似度折算的相关性得分"""
+        if not dense_scores:
+            return 0.0
+        return dense_scores.get(str(item.id), 0.0) * DENSE_RELEVANCE_WEIGHT
+    
     def _extract_keywords(self, text: str) -> Set[str]:
         """提取文本关键词"""
         # 简单的关键词提取，实际可以使用更复杂的NLP技术
@@ -215,7 +250,8 @@ class KnowledgeSemanticInjectionService:
         keywords: Set[str],
         table_ids: Optional[List[str]],
         include_global: bool,
-        max_terms: int
+        max_terms: int,
+        dense_scores: Optional[Dict[str, float]] = None
     ) -> List[TermKnowledge]:
         """匹配业务术语"""
         try:
@@ -245,7 +281,10 @@ class KnowledgeSemanticInjectionService:
             # 计算相关性并转换为TermKnowledge
             terms = []
             for item in knowledge_items:
-                relevance_score = self._calculate_term_relevance(item, keywords)
+                relevance_score = (
+                    self._calculate_term_relevance(item, keywords) +
+                    self._dense_relevance(item, dense_scores)
+                )
                 if relevance_score > 0:
                     term = TermKnowledge(
                         id=item.id,
@@ -271,7 +310,8 @@ class KnowledgeSemanticInjectionService:
         keywords: Set[str],
         table_ids: Optional[List[str]],
         include_global: bool,
-        max_logics: int
+        max_logics: int,
+        dense_scores: Optional[Dict[str, float]] = None
     ) -> List[LogicKnowledge]:
         """匹配业务逻辑"""
         try:
@@ -301,7 +341,10 @@ class KnowledgeSemanticInjectionService:
             # 计算相关性并转换为LogicKnowledge
             logics = []
             for item in knowledge_items:
-                relevance_score = self._calculate_logic_relevance(item, keywords)
+                relevance_score = (
+                    self._calculate_logic_relevance(item, keywords) +
+                    self._dense_relevance(item, dense_scores)
+                )
                 if relevance_score > 0:
                     logic = LogicKnowledge(
                         id=item.id,
@@ -326,7 +369,8 @@ class KnowledgeSemanticInjectionService:
         keywords: Set[str],
         table_ids: Optional[List[str]],
         include_global: bool,
-        max_events: int
+        max_events: int,
+        dense_scores: Optional[Dict[str, float]] = None
     ) -> List[EventKnowledge]:
         """匹配事件知识"""
         try:
@@ -358,7 +402,10 @@ class KnowledgeSemanticInjectionService:
             current_time = datetime.now()
             
             for item in knowledge_items:
-                relevance_score = self._calculate_event_relevance(item, keywords)
+                relevance_score = (
+                    self._calculate_event_relevance(item, keywords) +
+                    self._dense_relevance(item, dense_scores)
+                )
                 if relevance_score > 0:
                     # 判断事件是否在当前时间范围内活跃
                     is_active = self._is_event_active(item, current_time)
@@ -0,0 +1,370 @@
+"""
+本地嵌入式分析存储
+
+将上传的Excel/CSV文件一次性导入进程内的嵌入式数据库，后续查询直接在本地执行，
+不再逐行写入主数据库，也不必每次查询都重新解析文件。
+
+- 安装了duckdb时使用DuckDB（列式存储、向量化执行，适合大表聚合），
+  CSV文件由DuckDB直接读取，不经过pandas
+- 否则退化为标准库sqlite3
+
+每个数据源对应一个数据库文件，文件中的每个Sheet（或CSV文件）对应一张表。
+查询连接只能访问本数据源的存储：DuckDB关闭外部文件和网络访问，
+sqlite禁止ATTACH/DETACH和修改设置的PRAGMA。
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 可选的嵌入式列式引擎
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+    logger.info("duckdb not installed, local OLAP store falls back to sqlite")
+
+ENGINE_DUCKDB = "duckdb"
+ENGINE_SQLITE = "sqlite"
+
+_FILE_EXTENSIONS = {ENGINE_DUCKDB: ".duckdb", ENGINE_SQLITE: ".sqlite"}
+_CSV_EXTENSIONS = {".csv", ".txt"}
+_EXCEL_EXTENSIONS = {".xlsx", ".xls"}
+
+# 记录导入的表、顺序（Sheet顺序）以及规范化前的原始名称
+CATALOG_TABLE = "_olap_catalog"
+
+# 带参数时仍然只读的sqlite PRAGMA
+_SQLITE_READ_PRAGMAS = {"table_info", "table_xinfo", "index_list", "index_info", "index_xinfo", "foreign_key_list"}
+
+
+class LocalOLAPStoreError(Exception):
+    """本地分析存储异常"""
+    pass
+
+
+class LocalOLAPStore:
+    """本地嵌入式分析存储"""
+
+    def __init__(self, storage_dir: Optional[str] = None, engine: Optional[str] = None):
+        """
+        初始化本地分析存储
+
+        Args:
+            storage_dir: 数据库文件目录，默认读取环境变量OLAP_STORE_DIR
+            engine: 存储引擎（duckdb/sqlite），默认优先使用duckdb
+        """
+        self.storage_dir = storage_dir or os.getenv('OLAP_STORE_DIR', './data/olap')
+        if engine is None:
+            engine = ENGINE_DUCKDB if DUCKDB_AVAILABLE else ENGINE_SQLITE
+        if engine == ENGINE_DUCKDB and not DUCKDB_AVAILABLE:
+            raise LocalOLAPStoreError("duckdb not installed")
+        if engine not in _FILE_EXTENSIONS:
+            raise LocalOLAPStoreError(f"不支持的存储引擎: {engine}")
+        self.engine = engine
+
+        # 同一数据源的导入串行执行
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+        logger.info(f"本地分析存储初始化完成，引擎: {self.engine}，目录: {self.storage_dir}")
+
+    def store_path(self, data_source_id: str) -> str:
+        """获取数据源对应的数据库文件路径"""
+        safe_id = re.sub(r'[^0-9A-Za-z_\-]', '_', str(data_source_id))
+        return os.path.join(self.storage_dir, f"{safe_id}{_FILE_EXTENSIONS[self.engine]}")
+
+    def has_store(self, data_source_id: str) -> bool:
+        """数据源是否已导入本地存储"""
+        return os.path.exists(self.store_path(data_source_id))
+
+    def ingest_file(
+        self,
+        data_source_id: str,
+        file_path: str,
+        sheet_name: Optional[str] = None,
+        table_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        将Excel/CSV文件导入本地存储（同名表会被替换）
+
+        Args:
+            data_source_id: 数据源ID
+            file_path: 文件路径
+            sheet_name: 只导入指定Sheet，默认导入全部Sheet
+            table_name: 表名，仅导入单个Sheet或CSV时生效
+
+        Returns:
+            Dict[str, Any]: 导入结果，包含各表行数
+        """
+        if not os.path.exists(file_path):
+            raise LocalOLAPStoreError(f"文件不存在: {file_path}")
+
+        extension = os.path.splitext(file_path)[1].lower()
+        # (原始名称, Sheet)，原始名称规范化后作为表名
+        if extension in _CSV_EXTENSIONS:
+            default_name = os.path.splitext(os.path.basename(file_path))[0]
+            sources = [(table_name or default_name, None)]
+        elif extension in _EXCEL_EXTENSIONS:
+            sheet_names = [sheet_name] if sheet_name else pd.ExcelFile(file_path).sheet_names
+            if table_name and len(sheet_names) == 1:
+                sources = [(table_name, sheet_names[0])]
+            else:
+                sources = [(name, name) for name in sheet_names]
+        else:
+            raise LocalOLAPStoreError(f"不支持的文件格式: {extension}")
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        tables = {}
+        source_names = {}
+        with self._get_lock(data_source_id):
+            for source_name, sheet in sources:
+                name = self.normalize_table_name(source_name)
+                source_names[name] = str(source_name)
+                if sheet is None and self.engine == ENGINE_DUCKDB:
+                    tables[name] = self._ingest_csv_duckdb(data_source_id, file_path, name)
+                    continue
+                if sheet is None:
+                    df = pd.read_csv(file_path)
+                else:
+                    df = pd.read_excel(file_path, sheet_name=sheet)
+                tables[name] = self.ingest_dataframe(data_source_id, name, df, _locked=True)
+            self._register_tables(data_source_id, tables, file_path, source_names)
+
+        logger.info(f"文件已导入本地分析存储: {file_path} -> {self.store_path(data_source_id)}，表: {tables}")
+        return {
+            'engine': self.engine,
+            'path': self.store_path(data_source_id),
+            'tables': tables
+        }
+
+    def ingest_dataframe(self, data_source_id: str, table_name: str, df: pd.DataFrame, _locked: bool = False) -> int:
+        """
+        将DataFrame写入本地存储（同名表会被替换）
+
+        Returns:
+            int: 写入行数
+        """
+        df = self._prepare_dataframe(df)
+        os.makedirs(self.storage_dir, exist_ok=True)
+        if _locked:
+            return self._write_dataframe(data_source_id, table_name, df)
+        with self._get_lock(data_source_id):
+            row_count = self._write_dataframe(data_source_id, table_name, df)
+            self._register_tables(data_source_id, {table_name: row_count}, None)
+            return row_count
+
+    def execute(
+        self,
+        data_source_id: str,
+        sql: str,
+        max_rows: Optional[int] = None,
+        params: Optional[List[Any]] = None
+    ) -> Tuple[List[str], List[List[Any]], bool]:
+        """
+        在本地存储上执行只读查询
+
+        Args:
+            data_source_id: 数据源ID
+            sql: SQL查询语句
+            max_rows: 最大返回行数
+            params: 查询参数（?占位符）
+
+        Returns:
+            Tuple[List[str], List[List[Any]], bool]: 列名、数据行、是否被截断
+        """
+        if not self.has_store(data_source_id):
+            raise LocalOLAPStoreError(f"数据源 {data_source_id} 尚未导入本地分析存储")
+
+        connection = self._connect(data_source_id, read_only=True)
+        try:
+            cursor = connection.execute(sql, params or [])
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            if max_rows is None:
+                fetched = cursor.fetchall()
+                return columns, [list(row) for row in fetched], False
+
+            fetched = cursor.fetchmany(max_rows + 1)
+            is_truncated = len(fetched) > max_rows
+            return columns, [list(row) for row in fetched[:max_rows]], is_truncated
+        finally:
+            connection.close()
+
+    def list_tables(self, data_source_id: str) -> List[str]:
+        """列出数据源在本地存储中的表（按导入顺序）"""
+        if not self.has_store(data_source_id):
+            return []
+        _, rows, _ = self.execute(data_source_id, f"SELECT table_name FROM {CATALOG_TABLE} ORDER BY position")
+        return [row[0] for row in rows]
+
+    def resolve_table_name(self, data_source_id: str, name: str) -> Optional[str]:
+        """
+        将元数据中的表名（Sheet名、文件名或导入时指定的名称）映射为本地存储中的表名
+
+        依次按存储表名、导入时的原始名称、规范化后的名称匹配，找不到时返回None
+        """
+        if not self.has_store(data_source_id):
+            return None
+        columns, rows, _ = self.execute(data_source_id, f"SELECT * FROM {CATALOG_TABLE}")
+        catalog = [dict(zip(columns, row)) for row in rows]
+        stored = {entry['table_name'] for entry in catalog}
+        if name in stored:
+            return name
+        for entry in catalog:
+            if entry.get('source_name') == name:
+                return entry['table_name']
+        normalized = self.normalize_table_name(name)
+        return normalized if normalized in stored else None
+
+    def drop_store(self, data_source_id: str) -> bool:
+        """删除数据源的本地存储"""
+        path = self.store_path(data_source_id)
+        with self._get_lock(data_source_id):
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+            # DuckDB的WAL文件
+            if os.path.exists(path + '.wal'):
+                os.remove(path + '.wal')
+        logger.info(f"已删除本地分析存储: {path}")
+        return True
+
+    @staticmethod
+    def normalize_table_name(name: str) -> str:
+        """将Sheet名/文件名转换为表名（保留中文，去掉引号等特殊字符）"""
+        normalized = re.sub(r'[^\w]+', '_', str(name).strip(), flags=re.UNICODE).strip('_')
+        if not normalized:
+            normalized = 'sheet'
+        if normalized[0].isdigit():
+            normalized = f"t_{normalized}"
+        return normalized
+
+    def _prepare_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """规范化列名（去空白、补全空列名、去重）"""
+        columns = []
+        seen: Dict[str, int] = {}
+        for i, column in enumerate(df.columns):
+            name = str(column).strip()
+            if not name or name.lower().startswith('unnamed:'):
+                name = f"column_{i + 1}"
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}_{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        df = df.copy()
+        df.columns = columns
+        return df
+
+    def _write_dataframe(self, data_source_id: str, table_name: str, df: pd.DataFrame) -> int:
+        """写入DataFrame"""
+        connection = self._connect(data_source_id, read_only=False)
+        try:
+            if self.engine == ENGINE_DUCKDB:
+                connection.register('_ingest_df', df)
+                connection.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM _ingest_df')
+                connection.unregister('_ingest_df')
+            else:
+                df.to_sql(table_name, connection, if_exists='replace', index=False, chunksize=10000)
+                connection.commit()
+            return len(df)
+        finally:
+            connection.close()
+
+    def _register_tables(
+        self,
+        data_source_id: str,
+        tables: Dict[str, int],
+        source_file: Optional[str],
+        source_names: Optional[Dict[str, str]] = None
+    ):
+        """在目录表中登记导入的表及其原始名称（已存在的表重新排到末尾）"""
+        connection = self._connect(data_source_id, read_only=False)
+        try:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} "
+                "(table_name VARCHAR PRIMARY KEY, position INTEGER, source_file VARCHAR, row_count INTEGER, "
+                "source_name VARCHAR)"
+            )
+            catalog_columns = [d[0] for d in connection.execute(f"SELECT * FROM {CATALOG_TABLE} LIMIT 0").description]
+            if 'source_name' not in catalog_columns:
+                # 早期创建的目录表没有原始名称列
+                connection.execute(f"ALTER TABLE {CATALOG_TABLE} ADD COLUMN source_name VARCHAR")
+            position = connection.execute(f"SELECT COALESCE(MAX(position), 0) FROM {CATALOG_TABLE}").fetchone()[0]
+            for name, row_count in tables.items():
+                position += 1
+                connection.execute(f"DELETE FROM {CATALOG_TABLE} WHERE table_name = ?", [name])
+                connection.execute(
+                    f"INSERT INTO {CATALOG_TABLE} (table_name, position, source_file, row_count, source_name) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [name, position, source_file, row_count, (source_names or {}).get(name, name)]
+                )
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _ingest_csv_duckdb(self, data_source_id: str, file_path: str, table_name: str) -> int:
+        """由DuckDB直接读取CSV（并行解析，不经过pandas）"""
+        connection = self._connect(data_source_id, read_only=False)
+        try:
+            connection.execute(
+                f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM read_csv_auto(?)',
+                [file_path]
+            )
+            return connection.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+        finally:
+            connection.close()
+
+    def _connect(self, data_source_id: str, read_only: bool):
+        """建立到数据源本地存储的连接（只读连接用于执行生成的SQL，不能访问其他文件）"""
+        path = self.store_path(data_source_id)
+        if self.engine == ENGINE_DUCKDB:
+            if read_only:
+                # 禁止read_csv_auto等表函数读取本地文件和HTTP，且查询中不能用SET重新打开
+                return duckdb.connect(path, read_only=True, config={
+                    "enable_external_access": False,
+                    "lock_configuration": True
+                })
+            return duckdb.connect(path, read_only=False)
+        if read_only:
+            connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(path, check_same_thread=False)
+        connection.set_authorizer(_sqlite_authorizer)
+        return connection
+
+    def _get_lock(self, data_source_id: str) -> threading.Lock:
+        with self._locks_guard:
+            if data_source_id not in self._locks:
+                self._locks[data_source_id] = threading.Lock()
+            return self._locks[data_source_id]
+
+
+def _sqlite_authorizer(action: int, arg1: Optional[str], arg2: Optional[str], db_name, trigger) -> int:
+    """禁止ATTACH/DETACH其他数据库文件以及修改设置的PRAGMA"""
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_PRAGMA and arg2 is not None and (arg1 or "").lower() not in _SQLITE_READ_PRAGMAS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+# 全局实例
+_local_olap_store: Optional[LocalOLAPStore] = None
+
+
+def get_local_olap_store() -> LocalOLAPStore:
+    """获取本地分析存储实例"""
+    global _local_olap_store
+    if _local_olap_store is None:
+        _local_olap_store = LocalOLAPStore()
+    return _local_olap_store
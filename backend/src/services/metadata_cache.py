@@ -0,0 +1,454 @@
+"""
+元数据多级缓存
+
+为多源数据整合引擎提供带版本向量的元数据缓存：
+
+- L1：进程内LRU，条目数有上限，并带TTL兜底
+- L2：可选的Redis共享缓存（METADATA_CACHE_REDIS_ENABLED=true 时启用），
+  启用后版本向量也保存在Redis中，多个进程看到同一份版本
+- 版本向量：按数据源、表、表关联、数据字典、知识库维护计数器，
+  缓存条目记录写入时所依赖的各项版本，读取时逐项比对，任何一项变化即视为过期
+
+版本号由ORM会话钩子在事务提交后自动递增：数据源、表、字段、表关联、字典、
+字典项、知识库、知识条目等模型的增删改都会触发，不需要各个CRUD服务手动失效。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.data_preparation_model import (
+    DataTable,
+    TableField,
+    TableRelation,
+    FieldMapping,
+    Dictionary,
+    DictionaryItem,
+    DynamicDictionaryConfig
+)
+from src.models.data_source_model import DataSource
+from src.models.knowledge_base_model import KnowledgeBase
+from src.models.knowledge_item_model import KnowledgeItem
+
+try:
+    from redis import Redis
+    from redis.exceptions import RedisError
+    REDIS_AVAILABLE = True
+except ImportError:
+    Redis = None
+    RedisError = Exception
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 版本向量的维度
+SCOPE_DATA_SOURCE = "data_source"
+SCOPE_TABLE = "table"
+SCOPE_RELATION = "relation"
+SCOPE_DICTIONARY = "dictionary"
+SCOPE_KNOWLEDGE = "knowledge"
+SCOPES = (SCOPE_DATA_SOURCE, SCOPE_TABLE, SCOPE_RELATION, SCOPE_DICTIONARY, SCOPE_KNOWLEDGE)
+
+# 模型 -> (维度, 取受影响ID的函数)
+_MODEL_SCOPES: Dict[type, Tuple[str, Callable[[Any], List[Optional[str]]]]] = {
+    DataSource: (SCOPE_DATA_SOURCE, lambda obj: [obj.id]),
+    DataTable: (SCOPE_TABLE, lambda obj: [obj.id]),
+    TableField: (SCOPE_TABLE, lambda obj: [obj.table_id]),
+    FieldMapping: (SCOPE_TABLE, lambda obj: [obj.table_id]),
+    TableRelation: (SCOPE_RELATION, lambda obj: [obj.primary_table_id, obj.foreign_table_id]),
+    Dictionary: (SCOPE_DICTIONARY, lambda obj: [obj.id]),
+    DictionaryItem: (SCOPE_DICTIONARY, lambda obj: [obj.dictionary_id]),
+    DynamicDictionaryConfig: (SCOPE_DICTIONARY, lambda obj: [obj.dictionary_id]),
+    KnowledgeBase: (SCOPE_KNOWLEDGE, lambda obj: [obj.id]),
+    KnowledgeItem: (SCOPE_KNOWLEDGE, lambda obj: [obj.knowledge_base_id]),
+}
+
+_PENDING_KEY = "metadata_version_changes"
+
+
+def version_key(scope: str, item_id: Optional[str] = None) -> str:
+    """
+    版本向量中的键
+
+    - "<scope>:<id>"：单个对象的版本
+    - "<scope>:*"：该维度内任意对象变化都会递增，用于依赖整个维度的条目（如全量表选择）
+    - "<scope>:#"：批量语句（query.update/delete）无法确定具体对象时递增，
+      依赖该维度任意对象的条目都会同时记录它
+    """
+    return f"{scope}:{item_id if item_id is not None else '*'}"
+
+
+def _bulk_key(scope: str) -> str:
+    return f"{scope}:#"
+
+
+def _create_redis_client():
+    """按环境变量创建Redis连接，未启用或不可用时返回None"""
+    if not REDIS_AVAILABLE or os.getenv('METADATA_CACHE_REDIS_ENABLED', 'false').lower() != 'true':
+        return None
+    try:
+        client = Redis(
+            host=os.getenv('REDIS_HOST', '127.0.0.1'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            db=int(os.getenv('REDIS_DB', '0')),
+            password=os.getenv('REDIS_PASSWORD', None) or None,
+            socket_connect_timeout=5,
+            socket_timeout=5
+        )
+        client.ping()
+        logger.info("元数据缓存L2（Redis）已启用")
+        return client
+    except Exception as e:
+        logger.error(f"连接Redis失败，元数据缓存仅使用L1: {str(e)}")
+        return None
+
+
+class MetadataVersionRegistry:
+    """元数据版本向量"""
+
+    def __init__(self, redis_client=None, namespace: str = "metadata:versions"):
+        """
+        初始化版本向量
+
+        Args:
+            redis_client: 可选的Redis连接，提供时版本保存在Redis哈希中供多进程共享
+            namespace: Redis哈希键
+        """
+        self.redis = redis_client
+        self.namespace = namespace
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, scope: str, ids: Optional[Iterable[Optional[str]]] = None, bulk: bool = False):
+        """
+        递增版本
+
+        Args:
+            scope: 维度
+            ids: 变化的对象ID，为空时只递增维度级版本
+            bulk: 是否为无法确定具体对象的批量变更
+        """
+        keys = {version_key(scope)}
+        keys.update(version_key(scope, item_id) for item_id in (ids or []) if item_id is not None)
+        if bulk:
+            keys.add(_bulk_key(scope))
+
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=True)
+                for key in keys:
+                    pipe.hincrby(self.namespace, key, 1)
+                pipe.execute()
+            except RedisError as e:
+                logger.error(f"递增共享元数据版本失败: {str(e)}")
+
+    def current(self, keys: Iterable[str]) -> Dict[str, int]:
+        """读取指定键的当前版本，从未变更过的键为0"""
+        keys = list(keys)
+        if self.redis is not None:
+            values = self.redis.hmget(self.namespace, keys)
+            return {key: int(value) if value is not None else 0 for key, value in zip(keys, values)}
+        with self._lock:
+            return {key: self._versions.get(key, 0) for key in keys}
+
+    def token(self) -> Tuple[int, ...]:
+        """各维度的维度级版本，用于检测计算期间是否有元数据变化"""
+        keys = [version_key(scope) for scope in SCOPES]
+        versions = self.current(keys)
+        return tuple(versions[key] for key in keys)
+
+    def clear(self):
+        """重置本地版本（仅用于测试）"""
+        with self._lock:
+            self._versions.clear()
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    versions: Dict[str, int]
+    created_at: float = field(default_factory=time.time)
+
+
+class MetadataCache:
+    """带版本向量校验的两级元数据缓存"""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 600.0,
+        registry: Optional[MetadataVersionRegistry] = None,
+        redis_client=None,
+        codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None,
+        namespace: str = "metadata:cache"
+    ):
+        """
+        初始化元数据缓存
+
+        Args:
+            max_entries: L1最大条目数
+            ttl_seconds: 条目最长存活时间，版本校验之外的兜底
+            registry: 版本向量，默认使用全局实例
+            redis_client: 可选的L2 Redis连接
+            codec: (编码, 解码) 函数，把缓存值转换为可JSON序列化的结构；未提供时不写L2
+            namespace: L2键前缀
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.registry = registry if registry is not None else get_version_registry()
+        self.redis = redis_client
+        self.codec = codec
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "stale": 0, "evictions": 0, "skipped_writes": 0}
+
+    def begin(self) -> Tuple[int, ...]:
+        """在计算缓存值之前调用，返回的令牌交给 set 用于检测计算期间的变更"""
+        try:
+            return self.registry.token()
+        except Exception as e:
+            logger.error(f"读取元数据版本失败: {str(e)}")
+            return ()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期或任一依赖版本已变化时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            if self._is_fresh(entry):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self._stats["l1_hits"] += 1
+                return entry.value
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._stats["stale"] += 1
+
+        entry = self._get_l2(key)
+        if entry is not None and self._is_fresh(entry):
+            self._put_l1(key, entry)
+            with self._lock:
+                self._stats["l2_hits"] += 1
+            return entry.value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any, dependencies: Iterable[str], token: Tuple[int, ...]) -> bool:
+        """
+        写入缓存
+
+        先读取依赖的版本，再确认自 begin 以来没有任何元数据变化；
+        计算期间发生过变更时放弃写入，避免把可能过期的结果标记为最新版本。
+
+        Returns:
+            是否写入
+        """
+        keys = set(dependencies)
+        for dependency in list(keys):
+            scope = dependency.split(":", 1)[0]
+            keys.add(_bulk_key(scope))
+
+        try:
+            versions = self.registry.current(keys)
+            unchanged = token != () and self.registry.token() == token
+        except Exception as e:
+            logger.error(f"读取元数据版本失败，跳过缓存写入: {str(e)}")
+            unchanged = False
+
+        if not unchanged:
+            with self._lock:
+                self._stats["skipped_writes"] += 1
+            return False
+
+        entry = _CacheEntry(value=value, versions=versions)
+        self._put_l1(key, entry)
+        self._set_l2(key, entry)
+        return True
+
+    def clear(self):
+        """清空L1；L2条目随版本变化自然失效"""
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self) -> List[str]:
+        """L1中的缓存键"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and self._is_fresh(entry)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "l2_enabled": self.redis is not None and self.codec is not None,
+                "created_at": {
+                    key: entry.created_at for key, entry in self._entries.items()
+                }
+            })
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["l1_hits"] + stats["l2_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _is_fresh(self, entry: _CacheEntry) -> bool:
+        if time.time() - entry.created_at > self.ttl_seconds:
+            return False
+        try:
+            return self.registry.current(entry.versions.keys()) == entry.versions
+        except Exception as e:
+            logger.error(f"校验元数据版本失败: {str(e)}")
+            return False
+
+    def _put_l1(self, key: str, entry: _CacheEntry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _get_l2(self, key: str) -> Optional[_CacheEntry]:
+        if self.redis is None or self.codec is None:
+            return None
+        try:
+            raw = self.redis.get(f"{self.namespace}:{key}")
+            if not raw:
+                return None
+            data = json.loads(raw)
+            return _CacheEntry(
+                value=self.codec[1](data["value"]),
+                versions=data["versions"],
+                created_at=data["created_at"]
+            )
+        except Exception as e:
+            logger.error(f"读取L2元数据缓存失败: {str(e)}")
+            return None
+
+    def _set_l2(self, key: str, entry: _CacheEntry):
+        if self.redis is None or self.codec is None:
+            return
+        try:
+            payload = json.dumps({
+                "value": self.codec[0](entry.value),
+                "versions": entry.versions,
+                "created_at": entry.created_at
+            }, ensure_ascii=False, default=str)
+            self.redis.setex(f"{self.namespace}:{key}", int(self.ttl_seconds), payload)
+        except Exception as e:
+            logger.error(f"写入L2元数据缓存失败: {str(e)}")
+
+
+# ----------------------------------------------------------------------
+# ORM会话钩子：事务提交后自动递增版本
+# ----------------------------------------------------------------------
+
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        mapping = _MODEL_SCOPES.get(type(obj))
+        if mapping is None:
+            continue
+        scope, get_ids = mapping
+        try:
+            ids = get_ids(obj)
+        except Exception:
+            ids = []
+        pending.setdefault(scope, set()).update(item_id for item_id in ids if item_id is not None)
+
+
+def _collect_bulk_changes(context):
+    mapper = getattr(context, "mapper", None)
+    mapping = _MODEL_SCOPES.get(getattr(mapper, "class_", None))
+    if mapping is None:
+        return
+    pending = context.session.info.setdefault(_PENDING_KEY, {})
+    pending.setdefault(mapping[0], set()).add(None)
+
+
+def _publish_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    registry = get_version_registry()
+    for scope, ids in pending.items():
+        registry.bump(scope, [item_id for item_id in ids if item_id is not None], bulk=None in ids)
+
+
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def install_session_hooks():
+    """注册ORM会话钩子（重复调用无副作用）"""
+    if event.contains(Session, "after_flush", _collect_changes):
+        return
+    event.listen(Session, "after_flush", _collect_changes)
+    event.listen(Session, "after_bulk_update", _collect_bulk_changes)
+    event.listen(Session, "after_bulk_delete", _collect_bulk_changes)
+    event.listen(Session, "after_commit", _publish_changes)
+    event.listen(Session, "after_rollback", _discard_changes)
+
+
+# 全局实例
+_version_registry: Optional[MetadataVersionRegistry] = None
+_metadata_cache: Optional[MetadataCache] = None
+_init_lock = threading.RLock()
+
+
+def get_version_registry() -> MetadataVersionRegistry:
+    """获取元数据版本向量实例"""
+    global _version_registry
+    if _version_registry is None:
+        with _init_lock:
+            if _version_registry is None:
+                _version_registry = MetadataVersionRegistry(_create_redis_client())
+    return _version_registry
+
+
+def get_metadata_cache(codec: Optional[Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = None) -> MetadataCache:
+    """获取元数据缓存实例"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        with _init_lock:
+            if _metadata_cache is None:
+                registry = get_version_registry()
+                _metadata_cache = MetadataCache(
+                    max_entries=int(os.getenv('METADATA_CACHE_MAX_ENTRIES', '256')),
+                    ttl_seconds=float(os.getenv('METADATA_CACHE_TTL', '600')),
+                    registry=registry,
+                    redis_client=registry.redis,
+                    codec=codec
+                )
+    return _metadata_cache
+
+
+install_session_hooks()
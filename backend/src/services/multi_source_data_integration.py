@@ -10,7 +10,7 @@
 
 import logging
 from typing import Dict, Any, List, Optional, Set
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
 import asyncio
 
@@ -25,6 +25,16 @@ from src.services.data_source_service import DataSourceService
 from src.services.data_table_service import DataTableService
 from src.services.semantic_injection_service import SemanticInjectionService
 from src.services.knowledge_semantic_injection import KnowledgeSemanticInjectionService
+from src.services.metadata_cache import (
+    MetadataCache,
+    get_metadata_cache,
+    version_key,
+    SCOPE_DATA_SOURCE,
+    SCOPE_TABLE,
+    SCOPE_RELATION,
+    SCOPE_DICTIONARY,
+    SCOPE_KNOWLEDGE
+)
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +75,7 @@ class MultiSourceDataIntegrationEngine:
     4. 支持跨数据源的表关联分析和推荐
     """
     
-    def __init__(self, db_session=None):
+    def __init__(self, db_session=None, metadata_cache: Optional[MetadataCache] = None):
         self.db = db_session
         
         # 核心聚合引擎（已实现所有功能）
@@ -77,9 +87,10 @@ class MultiSourceDataIntegrationEngine:
         self.dictionary_service = SemanticInjectionService()
         self.knowledge_service = KnowledgeSemanticInjectionService(db_session)
         
-        # 缓存
-        self.metadata_cache: Dict[str, IntegratedMetadata] = {}
-        self.last_update_time: Dict[str, datetime] = {}
+        # 缓存（默认使用进程级共享缓存，按版本向量校验新鲜度）
+        if metadata_cache is None:
+            metadata_cache = get_metadata_cache(codec=(asdict, lambda data: IntegratedMetadata(**data)))
+        self.metadata_cache = metadata_cache
         
         logger.info("多源数据整合引擎初始化完成")
     
@@ -103,13 +114,15 @@ class MultiSourceDataIntegrationEngine:
             
             # 1. 检查缓存
             cache_key = self._generate_cache_key(query)
-            if cache_key in self.metadata_cache:
-                cached_result = self.metadata_cache[cache_key]
+            cached_result = self.metadata_cache.get(cache_key)
+            if cached_result is not None:
                 logger.info("使用缓存的元数据结果")
                 return cached_result
+            cache_token = self.metadata_cache.begin()
             
             # 2. 智能表选择（如果没有指定表）
-            if not query.table_ids:
+            tables_selected = not query.table_ids
+            if tables_selected:
                 query.table_ids = await self._intelligent_table_selection(query)
             
             # 3. 使用语义聚合引擎获取增强上下文
@@ -130,9 +143,13 @@ class MultiSourceDataIntegrationEngine:
                 query, aggregation_result
             )
             
-            # 5. 缓存结果
-            self.metadata_cache[cache_key] = integrated_data
-            self.last_update_time[cache_key] = datetime.now()
+            # 5. 缓存结果（计算期间元数据发生变化时不写入）
+            self.metadata_cache.set(
+                cache_key,
+                integrated_data,
+                self._cache_dependencies(query, tables_selected),
+                cache_token
+            )
             
             logger.info(f"元数据整合完成，涉及 {len(integrated_data.tables)} 个表")
             return integrated_data
@@ -507,6 +524,33 @@ class MultiSourceDataIntegrationEngine:
             logger.error(f"获取知识库项目失败: {str(e)}")
             return []
     
+    def _cache_dependencies(self, query: MetadataQuery, tables_selected: bool) -> List[str]:
+        """
+        整合结果所依赖的元数据版本
+
+        未指定数据源时依赖全部数据源；表由智能选择得出时依赖全部表（任何表变化都可能改变选择结果）。
+        字典映射和知识库匹配面向全局，依赖对应维度的整体版本。
+        """
+        table_ids = query.table_ids or []
+        dependencies = []
+        
+        if query.data_source_ids:
+            dependencies.extend(version_key(SCOPE_DATA_SOURCE, ds_id) for ds_id in query.data_source_ids)
+        else:
+            dependencies.append(version_key(SCOPE_DATA_SOURCE))
+        
+        if tables_selected:
+            dependencies.append(version_key(SCOPE_TABLE))
+        dependencies.extend(version_key(SCOPE_TABLE, table_id) for table_id in table_ids)
+        
+        if query.include_relations:
+            dependencies.extend(version_key(SCOPE_RELATION, table_id) for table_id in table_ids)
+        if query.include_dictionary:
+            dependencies.append(version_key(SCOPE_DICTIONARY))
+        if query.include_knowledge:
+            dependencies.append(version_key(SCOPE_KNOWLEDGE))
+        return dependencies
+    
     def _generate_cache_key(self, query: MetadataQuery) -> str:
         """生成缓存键"""
         import hashlib
@@ -621,7 +665,6 @@ class MultiSourceDataIntegrationEngine:
     def clear_cache(self):
         """清空缓存"""
         self.metadata_cache.clear()
-        self.last_update_time.clear()
         self.semantic_aggregator.clear_cache()
         logger.info("多源数据整合引擎缓存已清空")
     
@@ -629,40 +672,27 @@ class MultiSourceDataIntegrationEngine:
         """
         增量更新元数据缓存
         
-        这是任务 5.2.1 要求的增量更新机制。
+        这是任务 5.2.1 要求的增量更新机制。元数据的增删改在事务提交后会自动递增版本，
+        这里用于外部变更（如直接修改数据库）后手动递增这些表的版本，涉及它们的缓存项随之失效。
         """
         try:
             logger.info(f"增量更新元数据缓存，涉及 {len(table_ids)} 个表")
-            
-            # 找到受影响的缓存项
-            affected_cache_keys = []
-            for cache_key in self.metadata_cache.keys():
-                # 检查缓存项是否涉及这些表
-                cached_data = self.metadata_cache[cache_key]
-                cached_table_ids = {table['id'] for table in cached_data.tables}
-                
-                if any(table_id in cached_table_ids for table_id in table_ids):
-                    affected_cache_keys.append(cache_key)
-            
-            # 清除受影响的缓存项
-            for cache_key in affected_cache_keys:
-                del self.metadata_cache[cache_key]
-                if cache_key in self.last_update_time:
-                    del self.last_update_time[cache_key]
-            
-            logger.info(f"清除了 {len(affected_cache_keys)} 个受影响的缓存项")
-            
+            self.metadata_cache.registry.bump(SCOPE_TABLE, table_ids)
+            self.metadata_cache.registry.bump(SCOPE_RELATION, table_ids)
         except Exception as e:
             logger.error(f"增量更新缓存失败: {str(e)}")
     
     def get_cache_statistics(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
+        cache_stats = self.metadata_cache.get_statistics()
+        created_at = cache_stats.pop('created_at')
         return {
             'total_cached_items': len(self.metadata_cache),
             'cache_keys': list(self.metadata_cache.keys()),
             'last_update_times': {
-                key: time.isoformat() 
-                for key, time in self.last_update_time.items()
+                key: datetime.fromtimestamp(timestamp).isoformat()
+                for key, timestamp in created_at.items()
             },
+            'metadata_cache': cache_stats,
             'semantic_aggregator_cache_size': len(self.semantic_aggregator.context_cache)
         }
\ No newline at end of file
@@ -1,5 +1,11 @@
 import logging
-from typing import List, Dict, Optional, Any
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, List, Dict, Optional, Any
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -10,60 +16,183 @@ from src.utils import get_db_session as get_db
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 并发写入同一会话导致turn冲突时的最大尝试次数
+_TURN_ALLOCATION_ATTEMPTS = 3
+
+
+@dataclass
+class SessionMessageIndex:
+    """
+    会话消息索引
+
+    recent 保存最近的若干条消息（按turn升序），覆盖从 recent[0] 到最新一条的连续区间；
+    children 只为窗口内的消息维护子消息列表（按字符串化的消息ID索引，兼容API传入的字符串ID），
+    因为父消息在窗口内时它的所有子消息也必然在窗口内。
+    """
+    max_turn: int = 0
+    recent: Deque[Dict] = field(default_factory=deque)
+    children: Dict[Any, List[Dict]] = field(default_factory=dict)
+    complete: bool = True  # 窗口是否包含会话的全部历史
+
+
 class MultiTurnHandler:
     """
     多轮对话处理服务，负责消息的保存、检索和对话历史管理
     """
     
-    def __init__(self, test_mode: bool = False):
+    def __init__(self, test_mode: bool = False, window_size: int = 200, max_sessions: int = 1000):
         """
         初始化多轮对话处理器
         
         Args:
             test_mode (bool): 是否在测试模式下运行。在测试模式下，不会访问数据库，而是使用内存存储
+            window_size: 每个会话在内存中保留的最近消息数
+            max_sessions: 内存中保留索引的最大会话数（LRU淘汰）
         """
         self.test_mode = test_mode
         # 在测试模式下，使用内存存储消息
         self.test_messages = {}
+
+        self.window_size = window_size
+        self.max_sessions = max_sessions
+        self._indexes: "OrderedDict[str, SessionMessageIndex]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @contextmanager
+    def _db_session(self):
+        """获取数据库会话，用完后关闭"""
+        db_gen = get_db()
+        db: Session = next(db_gen)
+        try:
+            yield db
+        finally:
+            close = getattr(db_gen, "close", None)
+            if close:
+                close()
+
+    @staticmethod
+    def _to_message_dict(msg: ConversationMessage) -> Dict:
+        return {
+            "id": msg.id,
+            "turn": msg.turn,
+            "role": msg.role.value if hasattr(msg.role, "value") else msg.role,
+            "content": msg.content,
+            "parent_message_id": msg.parent_message_id,
+            "created_at": msg.created_at.isoformat() if msg.created_at else None
+        }
+
+    def _get_index(self, session_id: str) -> SessionMessageIndex:
+        """获取会话消息索引，冷会话只按turn倒序加载最近一个窗口的消息"""
+        with self._lock:
+            index = self._indexes.get(session_id)
+            if index is not None:
+                self._indexes.move_to_end(session_id)
+                self._stats["hits"] += 1
+                return index
+            self._stats["misses"] += 1
+
+        with self._db_session() as db:
+            rows = db.query(ConversationMessage).filter(
+                ConversationMessage.session_id == session_id
+            ).order_by(ConversationMessage.turn.desc()).limit(self.window_size).all()
+            messages = [self._to_message_dict(msg) for msg in reversed(rows)]
+
+        index = SessionMessageIndex(
+            max_turn=messages[-1]["turn"] if messages else 0,
+            complete=len(messages) < self.window_size
+        )
+        for message in messages:
+            self._append_to_index(index, message)
+
+        with self._lock:
+            # 并发加载时以先放入的索引为准
+            existing = self._indexes.get(session_id)
+            if existing is not None:
+                return existing
+            self._indexes[session_id] = index
+            if len(self._indexes) > self.max_sessions:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _append_to_index(self, index: SessionMessageIndex, message: Dict):
+        """将消息追加到索引，窗口满时淘汰最早的消息及其子消息列表"""
+        if len(index.recent) >= self.window_size:
+            evicted = index.recent.popleft()
+            index.children.pop(str(evicted["id"]), None)
+            index.complete = False
+        index.recent.append(message)
+        index.max_turn = max(index.max_turn, message["turn"])
+        index.children[str(message["id"])] = []
+        parent_children = index.children.get(str(message["parent_message_id"]))
+        if parent_children is not None:
+            parent_children.append(message)
+
+    @staticmethod
+    def insert_message(db: Session, session_id: str, **fields) -> ConversationMessage:
+        """
+        写入一条消息并提交，turn由数据库分配（会话当前最大turn+1）
+
+        (session_id, turn) 有唯一约束，多个进程同时写入同一会话时冲突的一方回滚，
+        重新读取最大turn后再写入。turn不再来自进程内计数器。
+
+        Args:
+            db: 数据库会话
+            session_id: 会话ID
+            **fields: ConversationMessage的其他字段
+
+        Returns:
+            已提交的消息记录
+        """
+        for attempt in range(1, _TURN_ALLOCATION_ATTEMPTS + 1):
+            max_turn = db.query(func.max(ConversationMessage.turn)).filter(
+                ConversationMessage.session_id == session_id
+            ).scalar()
+            message = ConversationMessage(session_id=session_id, turn=(max_turn or 0) + 1, **fields)
+            db.add(message)
+            try:
+                db.commit()
+                return message
+            except IntegrityError:
+                db.rollback()
+                if attempt == _TURN_ALLOCATION_ATTEMPTS:
+                    raise
+                logger.info(f"Turn {message.turn} of session {session_id} taken concurrently, retrying")
+            except Exception:
+                db.rollback()
+                raise
+
+    def invalidate_session(self, session_id: str):
+        """使会话消息索引失效（会话消息被其他途径修改或删除后调用）"""
+        with self._lock:
+            if self._indexes.pop(session_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取会话索引缓存统计"""
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                "cached_sessions": len(self._indexes),
+                "window_size": self.window_size,
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "invalidations": self._stats["invalidations"],
+                "hit_rate": self._stats["hits"] / total if total else 0.0
+            }
         
     def _get_session_messages(self, session_id: str) -> List[Dict]:
-        """获取会话消息，支持测试模式"""
-        if self.test_mode:
-            if session_id not in self.test_messages:
-                self.test_messages[session_id] = []
-            return self.test_messages[session_id]
-        else:
-            # 在生产模式下，从数据库获取
-            db: Session = next(get_db())
-            messages = db.query(ConversationMessage).filter(
-                ConversationMessage.session_id == session_id
-            ).order_by(ConversationMessage.turn.asc()).all()
-            
-            return [
-                {
-                    "id": msg.id,
-                    "turn": msg.turn,
-                    "role": msg.role.value,
-                    "content": msg.content,
-                    "parent_message_id": msg.parent_message_id,
-                    "created_at": msg.created_at.isoformat() if msg.created_at else None
-                }
-                for msg in messages
-            ]
+        """获取测试模式下的会话消息"""
+        if session_id not in self.test_messages:
+            self.test_messages[session_id] = []
+        return self.test_messages[session_id]
     
     def _get_max_turn(self, session_id: str) -> int:
         """获取最大turn值，支持测试模式"""
         if self.test_mode:
             messages = self._get_session_messages(session_id)
             return max([msg["turn"] for msg in messages]) if messages else 0
-        else:
-            # 在生产模式下，从数据库获取
-            db: Session = next(get_db())
-            max_turn = db.query(ConversationMessage.turn).filter(
-                ConversationMessage.session_id == session_id
-            ).order_by(ConversationMessage.turn.desc()).first()
-            
-            return max_turn[0] if max_turn else 0
+        return self._get_index(session_id).max_turn
     
     def _add_message_to_memory(self, session_id: str, message: Dict) -> Dict:
         """在测试模式下添加消息到内存"""
@@ -142,7 +271,20 @@ class MultiTurnHandler:
             消息列表，每个消息包含role、content、turn、parent_message_id等信息
         """
         try:
-            messages = self._get_session_messages(session_id)
+            if self.test_mode:
+                messages = self._get_session_messages(session_id)
+            else:
+                index = self._get_index(session_id)
+                with self._lock:
+                    complete = index.complete
+                    messages = list(index.recent)
+                if not complete:
+                    # 窗口之外还有更早的消息，按turn范围查询前'limit'条
+                    with self._db_session() as db:
+                        rows = db.query(ConversationMessage).filter(
+                            ConversationMessage.session_id == session_id
+                        ).order_by(ConversationMessage.turn.asc()).limit(limit).all()
+                        return [self._to_message_dict(msg) for msg in rows]
             
             # 应用limit限制，返回前'limit'条消息以保持时间顺序（最早的消息在前）
             if limit < len(messages):
@@ -164,45 +306,40 @@ class MultiTurnHandler:
         Returns:
             包含新消息ID的字典
         """
+        if self.test_mode:
+            return self._add_message_to_memory(session_id, message)
+
         try:
-            if self.test_mode:
-                return self._add_message_to_memory(session_id, message)
-            else:
-                db: Session = next(get_db())
-                
-                # 获取当前会话的最大turn值
-                max_turn = db.query(ConversationMessage.turn).filter(
-                    ConversationMessage.session_id == session_id
-                ).order_by(ConversationMessage.turn.desc()).first()
-                
-                turn = (max_turn[0] + 1) if max_turn else 1
-                
-                # 创建新消息记录
-                new_message = ConversationMessage(
-                    session_id=session_id,
-                    turn=turn,
+            # 先取索引，写入后据此判断是否有其他进程写入过该会话
+            index = self._get_index(session_id)
+            with self._db_session() as db:
+                new_message = self.insert_message(
+                    db,
+                    session_id,
                     role=message["role"],
                     content=message["content"],
                     parent_message_id=message.get("parent_message_id"),
                     created_at=datetime.now()
                 )
-                
-                db.add(new_message)
-                db.commit()
-                
-                return {
+                result = {
                     "id": new_message.id,
-                    "turn": turn,
+                    "turn": new_message.turn,
                     "role": message["role"],
                     "content": message["content"],
                     "parent_message_id": message.get("parent_message_id"),
                     "created_at": new_message.created_at.isoformat()
                 }
+
+            with self._lock:
+                if result["turn"] == index.max_turn + 1:
+                    self._append_to_index(index, result)
+                else:
+                    # 中间的turn由其他进程或线程写入，索引已不连续，下次从数据库重新加载
+                    self.invalidate_session(session_id)
+            return result
                 
         except Exception as e:
             logger.error(f"Error adding message to session {session_id}: {str(e)}")
-            if not self.test_mode:
-                db.rollback()
             raise
     
     def get_last_message(self, session_id: str) -> Optional[Dict]:
@@ -216,7 +353,10 @@ class MultiTurnHandler:
             最后一条消息的字典，如果不存在则返回None
         """
         try:
-            messages = self._get_session_messages(session_id)
+            if self.test_mode:
+                messages = self._get_session_messages(session_id)
+            else:
+                messages = self._get_index(session_id).recent
             
             if not messages:
                 return None
@@ -239,12 +379,26 @@ class MultiTurnHandler:
             子消息列表
         """
         try:
-            messages = self._get_session_messages(session_id)
-            
-            return [
-                msg for msg in messages 
-                if msg["parent_message_id"] == parent_message_id
-            ]
+            if self.test_mode:
+                messages = self._get_session_messages(session_id)
+                return [
+                    msg for msg in messages 
+                    if msg["parent_message_id"] == parent_message_id
+                ]
+
+            index = self._get_index(session_id)
+            with self._lock:
+                children = index.children.get(str(parent_message_id))
+                if children is not None:
+                    return list(children)
+
+            # 父消息不在窗口内，按parent_message_id索引查询
+            with self._db_session() as db:
+                rows = db.query(ConversationMessage).filter(
+                    ConversationMessage.session_id == session_id,
+                    ConversationMessage.parent_message_id == parent_message_id
+                ).order_by(ConversationMessage.turn.asc()).all()
+                return [self._to_message_dict(msg) for msg in rows]
             
         except Exception as e:
             logger.error(f"Error getting messages by parent {parent_message_id} for session {session_id}: {str(e)}")
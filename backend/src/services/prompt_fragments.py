@@ -0,0 +1,254 @@
+"""
+Prompt 预编译模板与片段缓存
+
+- compile_template：把 ``{{变量}}`` 模板预先拆分为文本段和变量名，渲染时按顺序拼接，
+  不再对整段模板逐个变量做字符串替换；编译结果按模板内容缓存
+- format_prompt_value：复杂变量（表结构字典等）的格式化结果按调用方提供的键
+  （如数据源ID和元数据版本）缓存，同一数据源的表结构在不同问题之间只格式化一次
+- PromptFragmentCache：按 (片段类型, 键, 内容版本) 缓存渲染好的可复用片段
+  （方言规则段等），Prompt 由缓存片段拼接而成
+
+拼接时稳定的片段在前、用户问题在后，同一数据源不同问题的 Prompt 前缀逐字节一致，
+可以命中模型服务端的前缀缓存。
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+VARIABLE_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+
+def format_dict(d: Dict[str, Any], indent: int = 0) -> str:
+    """格式化字典"""
+    lines = []
+    prefix = "  " * indent
+
+    for key, value in d.items():
+        if isinstance(value, dict):
+            lines.append(f"{prefix}{key}:")
+            lines.append(format_dict(value, indent + 1))
+        elif isinstance(value, list):
+            lines.append(f"{prefix}{key}:")
+            for item in value:
+                if isinstance(item, dict):
+                    lines.append(format_dict(item, indent + 1))
+                else:
+                    lines.append(f"{prefix}  - {item}")
+        else:
+            lines.append(f"{prefix}{key}: {value}")
+
+    return "\n".join(lines)
+
+
+def format_complex_variable(value: Union[List, Dict]) -> str:
+    """格式化复杂变量（列表、字典）"""
+    if isinstance(value, list):
+        if not value:
+            return "无"
+
+        # 如果是字符串列表，直接连接
+        if all(isinstance(item, str) for item in value):
+            return "\n".join(f"- {item}" for item in value)
+
+        # 如果是字典列表，格式化每个字典
+        if all(isinstance(item, dict) for item in value):
+            return "\n".join(format_dict(item) for item in value)
+
+    elif isinstance(value, dict):
+        return format_dict(value)
+
+    return str(value)
+
+
+class _LRU:
+    """带命中统计的线程安全LRU"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+_formatted_values = _LRU(max_size=256)
+
+
+def format_prompt_value(value: Any, key: Hashable = None) -> str:
+    """
+    格式化模板变量值
+
+    Args:
+        value: 变量值
+        key: 调用方提供的缓存键（如 (数据源ID, 元数据版本)），内容变化时键必须随之变化；
+            为空时直接格式化，不为计算缓存键再遍历一遍内容
+    """
+    if not isinstance(value, (list, dict)):
+        return str(value)
+    if key is None or not value:
+        return format_complex_variable(value)
+
+    formatted = _formatted_values.get(key)
+    if formatted is None:
+        formatted = format_complex_variable(value)
+        _formatted_values.put(key, formatted)
+    return formatted
+
+
+class CompiledTemplate:
+    """预编译的 ``{{变量}}`` 模板"""
+
+    __slots__ = ("source", "segments", "variables")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = VARIABLE_PATTERN.split(source)
+        # 偶数位置为文本段，奇数位置为变量名
+        self.segments: Tuple[Tuple[bool, str], ...] = tuple(
+            (index % 2 == 1, part) for index, part in enumerate(parts) if part or index % 2 == 1
+        )
+        self.variables: Tuple[str, ...] = tuple(dict.fromkeys(parts[1::2]))
+
+    def render(
+        self,
+        variables: Dict[str, Any],
+        formatter: Callable[[Any, Hashable], str] = format_prompt_value,
+        value_keys: Optional[Dict[str, Hashable]] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        渲染模板
+
+        变量值中出现的 ``{{...}}`` 原样保留，不会被再次替换
+
+        Args:
+            variables: 变量值
+            formatter: 变量格式化函数，接收 (变量值, 缓存键)
+            value_keys: 变量名到缓存键的映射，只有提供了键的复杂变量才缓存格式化结果
+
+        Returns:
+            (渲染结果, 未提供值的变量名列表)，未提供值的占位符原样保留
+        """
+        output = []
+        unresolved = []
+        for is_variable, text in self.segments:
+            if not is_variable:
+                output.append(text)
+            elif text in variables:
+                output.append(formatter(variables[text], value_keys.get(text) if value_keys else None))
+            else:
+                output.append(f"{{{{{text}}}}}")
+                unresolved.append(text)
+        return "".join(output), unresolved
+
+
+_compiled_templates = _LRU(max_size=128)
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """编译模板，相同内容的模板只编译一次"""
+    compiled = _compiled_templates.get(source)
+    if compiled is None:
+        compiled = CompiledTemplate(source)
+        _compiled_templates.put(source, compiled)
+    return compiled
+
+
+def assemble_prompt(*segments: Optional[str]) -> str:
+    """按顺序拼接Prompt片段（跳过空片段），稳定的片段应放在前面"""
+    return "\n\n".join(segment for segment in segments if segment)
+
+
+class PromptFragmentCache:
+    """可复用Prompt片段缓存"""
+
+    def __init__(self, max_size: int = 512):
+        self._cache = _LRU(max_size=max_size)
+
+    def get_or_build(
+        self,
+        kind: str,
+        key: Hashable,
+        builder: Callable[[], str],
+        version: Hashable = None
+    ) -> str:
+        """
+        获取片段，不存在时构建并缓存
+
+        Args:
+            kind: 片段类型（如 sql_rules）
+            key: 片段键（如方言、Prompt类型）
+            builder: 构建片段的函数
+            version: 内容版本，内容变化后旧版本的片段不再命中
+        """
+        cache_key = (kind, key, version)
+        fragment = self._cache.get(cache_key)
+        if fragment is None:
+            fragment = builder()
+            self._cache.put(cache_key, fragment)
+        return fragment
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """失效指定类型（默认全部）的片段"""
+        removed = self._cache.discard(lambda cache_key: kind is None or cache_key[0] == kind)
+        logger.info(f"Invalidated {removed} prompt fragments (kind={kind or 'all'})")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """片段、编译模板和格式化变量的缓存统计"""
+        return {
+            "fragments": self._cache.get_stats(),
+            "compiled_templates": _compiled_templates.get_stats(),
+            "formatted_values": _formatted_values.get_stats()
+        }
+
+
+# 全局实例
+prompt_fragment_cache = PromptFragmentCache()
+
+
+def get_prompt_fragment_cache() -> PromptFragmentCache:
+    """获取Prompt片段缓存实例"""
+    return prompt_fragment_cache
@@ -7,13 +7,15 @@ Prompt模板管理和渲染引擎
 import os
 import yaml
 import json
-import re
-from typing import Dict, List, Optional, Any, Union
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Any, Union
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
 
 from src.utils import logger
+from src.services.service_registry import lazy_service
+from src.services.prompt_fragments import compile_template
 
 
 class PromptType(Enum):
@@ -48,83 +50,36 @@ class PromptTemplate:
 
 
 class PromptRenderer:
-    """Prompt渲染引擎"""
+    """Prompt渲染引擎（模板预编译，复杂变量的格式化结果按调用方提供的键缓存）"""
     
-    def __init__(self):
-        self.variable_pattern = re.compile(r'\{\{(\w+)\}\}')
+    def render(
+        self,
+        template: PromptTemplate,
+        variables: Dict[str, Any],
+        value_keys: Optional[Dict[str, Hashable]] = None
+    ) -> str:
+        """
+        渲染Prompt模板
         
-    def render(self, template: PromptTemplate, variables: Dict[str, Any]) -> str:
-        """渲染Prompt模板"""
+        Args:
+            template: 模板
+            variables: 变量值
+            value_keys: 复杂变量的缓存键（如表结构对应的数据源ID和元数据版本），未提供时每次重新格式化
+        """
         
         # 验证变量完整性
         missing_vars = template.validate_variables(variables)
         if missing_vars:
             raise ValueError(f"Missing required variables: {missing_vars}")
         
-        # 渲染模板
-        rendered = template.content
-        
-        # 替换变量
-        for var_name, var_value in variables.items():
-            placeholder = f"{{{{{var_name}}}}}"
-            
-            # 处理不同类型的变量值
-            if isinstance(var_value, (list, dict)):
-                var_str = self._format_complex_variable(var_value)
-            else:
-                var_str = str(var_value)
-            
-            rendered = rendered.replace(placeholder, var_str)
+        # 按预编译的文本段和变量拼接
+        rendered, unresolved = compile_template(template.content).render(variables, value_keys=value_keys)
         
         # 检查是否还有未替换的变量
-        remaining_vars = self.variable_pattern.findall(rendered)
-        if remaining_vars:
-            logger.warning(f"Unresolved variables in template {template.name}: {remaining_vars}")
+        if unresolved:
+            logger.warning(f"Unresolved variables in template {template.name}: {unresolved}")
         
         return rendered
-    
-    def _format_complex_variable(self, value: Union[List, Dict]) -> str:
-        """格式化复杂变量（列表、字典）"""
-        if isinstance(value, list):
-            if not value:
-                return "无"
-            
-            # 如果是字符串列表，直接连接
-            if all(isinstance(item, str) for item in value):
-                return "\n".join(f"- {item}" for item in value)
-            
-            # 如果是字典列表，格式化每个字典
-            if all(isinstance(item, dict) for item in value):
-                formatted_items = []
-                for item in value:
-                    formatted_items.append(self._format_dict(item))
-                return "\n".join(formatted_items)
-        
-        elif isinstance(value, dict):
-            return self._format_dict(value)
-        
-        return str(value)
-    
-    def _format_dict(self, d: Dict[str, Any], indent: int = 0) -> str:
-        """格式化字典"""
-        lines = []
-        prefix = "  " * indent
-        
-        for key, value in d.items():
-            if isinstance(value, dict):
-                lines.append(f"{prefix}{key}:")
-                lines.append(self._format_dict(value, indent + 1))
-            elif isinstance(value, list):
-                lines.append(f"{prefix}{key}:")
-                for item in value:
-                    if isinstance(item, dict):
-                        lines.append(self._format_dict(item, indent + 1))
-                    else:
-                        lines.append(f"{prefix}  - {item}")
-            else:
-                lines.append(f"{prefix}{key}: {value}")
-        
-        return "\n".join(lines)
 
 
 class PromptManager:
@@ -207,13 +162,18 @@ class PromptManager:
         """获取指定类型的模板"""
         return self.templates.get(prompt_type)
     
-    def render_prompt(self, prompt_type: PromptType, variables: Dict[str, Any]) -> str:
-        """渲染指定类型的Prompt"""
+    def render_prompt(
+        self,
+        prompt_type: PromptType,
+        variables: Dict[str, Any],
+        value_keys: Optional[Dict[str, Hashable]] = None
+    ) -> str:
+        """渲染指定类型的Prompt（value_keys 见 PromptRenderer.render）"""
         template = self.get_template(prompt_type)
         if not template:
             raise ValueError(f"Template not found for type: {prompt_type.value}")
         
-        return self.renderer.render(template, variables)
+        return self.renderer.render(template, variables, value_keys)
     
     def list_templates(self) -> List[Dict[str, Any]]:
         """列出所有模板信息"""
@@ -537,9 +497,9 @@ class FewShotManager:
             logger.error(f"Error saving few-shot samples: {str(e)}")
 
 
-# 全局实例
-prompt_manager = PromptManager()
-few_shot_manager = FewShotManager()
+# 全局实例（首次使用时才加载模板和样本文件）
+prompt_manager = lazy_service("prompt_manager", PromptManager)
+few_shot_manager = lazy_service("few_shot_manager", FewShotManager)
 
 
 # 导出主要类和函数
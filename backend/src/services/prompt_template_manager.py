@@ -7,7 +7,6 @@
 import os
 import yaml
 import json
-import re
 import hashlib
 from typing import Dict, List, Optional, Any, Union, Tuple
 from dataclasses import dataclass, field
@@ -18,6 +17,8 @@ import statistics
 from collections import defaultdict
 
 from src.utils import logger
+from src.services.service_registry import lazy_service
+from src.services.prompt_fragments import compile_template
 
 
 class TemplateVersion(Enum):
@@ -517,8 +518,8 @@ class EnhancedPromptManager:
     """增强版Prompt管理器"""
     
     def __init__(self, config_path: Optional[str] = None):
-        # 初始化基础组件
-        from .prompt_manager import PromptManager, PromptRenderer
+        # 初始化基础组件（版本化模板使用本模块的渲染器）
+        from .prompt_manager import PromptManager
         
         self.base_manager = PromptManager(config_path)
         self.renderer = PromptRenderer()
@@ -594,10 +595,7 @@ class EnhancedPromptManager:
 
 # 扩展PromptRenderer以支持版本化模板
 class PromptRenderer:
-    """增强版Prompt渲染器"""
-    
-    def __init__(self):
-        self.variable_pattern = re.compile(r'\{\{(\w+)\}\}')
+    """增强版Prompt渲染器（模板预编译，复杂变量的格式化结果按内容缓存）"""
     
     def render_template_version(self, template_version: PromptTemplateVersion, 
                                variables: Dict[str, Any]) -> str:
@@ -611,74 +609,18 @@ class PromptRenderer:
         if missing_vars:
             raise ValueError(f"Missing required variables: {missing_vars}")
         
-        # 渲染模板
-        rendered = template_version.content
-        
-        # 替换变量
-        for var_name, var_value in variables.items():
-            placeholder = f"{{{{{var_name}}}}}"
-            
-            # 处理不同类型的变量值
-            if isinstance(var_value, (list, dict)):
-                var_str = self._format_complex_variable(var_value)
-            else:
-                var_str = str(var_value)
-            
-            rendered = rendered.replace(placeholder, var_str)
+        # 按预编译的文本段和变量拼接
+        rendered, unresolved = compile_template(template_version.content).render(variables)
         
         # 检查是否还有未替换的变量
-        remaining_vars = self.variable_pattern.findall(rendered)
-        if remaining_vars:
-            logger.warning(f"Unresolved variables in template {template_version.version_id}: {remaining_vars}")
+        if unresolved:
+            logger.warning(f"Unresolved variables in template {template_version.version_id}: {unresolved}")
         
         return rendered
-    
-    def _format_complex_variable(self, value: Union[List, Dict]) -> str:
-        """格式化复杂变量（列表、字典）"""
-        if isinstance(value, list):
-            if not value:
-                return "无"
-            
-            # 如果是字符串列表，直接连接
-            if all(isinstance(item, str) for item in value):
-                return "\n".join(f"- {item}" for item in value)
-            
-            # 如果是字典列表，格式化每个字典
-            if all(isinstance(item, dict) for item in value):
-                formatted_items = []
-                for item in value:
-                    formatted_items.append(self._format_dict(item))
-                return "\n".join(formatted_items)
-        
-        elif isinstance(value, dict):
-            return self._format_dict(value)
-        
-        return str(value)
-    
-    def _format_dict(self, d: Dict[str, Any], indent: int = 0) -> str:
-        """格式化字典"""
-        lines = []
-        prefix = "  " * indent
-        
-        for key, value in d.items():
-            if isinstance(value, dict):
-                lines.append(f"{prefix}{key}:")
-                lines.append(self._format_dict(value, indent + 1))
-            elif isinstance(value, list):
-                lines.append(f"{prefix}{key}:")
-                for item in value:
-                    if isinstance(item, dict):
-                        lines.append(self._format_dict(item, indent + 1))
-                    else:
-                        lines.append(f"{prefix}  - {item}")
-            else:
-                lines.append(f"{prefix}{key}: {value}")
-        
-        return "\n".join(lines)
 
 
-# 全局实例
-enhanced_prompt_manager = EnhancedPromptManager()
+# 全局实例（首次使用时才加载模板文件）
+enhanced_prompt_manager = lazy_service("enhanced_prompt_manager", EnhancedPromptManager)
 
 # 导出主要类和函数
 __all__ = [
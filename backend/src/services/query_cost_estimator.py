@@ -0,0 +1,462 @@
+"""
+查询成本预估服务
+
+在执行SQL之前运行数据库方言对应的EXPLAIN，获取优化器的行数和代价估算，
+识别大表全表扫描和笛卡尔积连接，并给出执行建议（直接执行、自动加限制或请求澄清）。
+执行计划按规范化SQL缓存，避免同一条SQL反复EXPLAIN。
+"""
+
+import asyncio
+import json
+import logging
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Any, Optional, List, Tuple
+
+from src.services.sql_security_validator import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+# 可选的数据库驱动
+try:
+    import pymysql
+    PYMYSQL_AVAILABLE = True
+except ImportError:
+    PYMYSQL_AVAILABLE = False
+
+try:
+    import pymssql
+    PYMSSQL_AVAILABLE = True
+except ImportError:
+    PYMSSQL_AVAILABLE = False
+
+try:
+    import psycopg2
+    PSYCOPG2_AVAILABLE = True
+except ImportError:
+    PSYCOPG2_AVAILABLE = False
+
+
+SHOWPLAN_NAMESPACE = {'sp': 'http://schemas.microsoft.com/sqlserver/2004/07/showplan'}
+
+# SQL Server中表示全量扫描的物理算子
+SQLSERVER_SCAN_OPERATORS = {'Table Scan', 'Clustered Index Scan', 'Index Scan'}
+
+
+class ExplainStatementError(Exception):
+    """数据库拒绝了被EXPLAIN的语句（语法错误、表或字段不存在等），区别于连接失败"""
+
+
+class CostAction(Enum):
+    """成本评估后的执行建议"""
+    EXECUTE = "execute"        # 直接执行
+    ADD_LIMIT = "add_limit"    # 自动添加行数限制后执行
+    CLARIFY = "clarify"        # 请求用户澄清（缩小范围）
+
+
+@dataclass
+class CostEstimatorConfig:
+    """成本预估配置"""
+    max_scan_rows: int = 5000000         # 单表全表扫描行数阈值，超过则请求澄清
+    max_result_rows: int = 100000        # 预估结果行数阈值，超过则自动加限制
+    auto_limit_rows: int = 1000          # 自动添加的行数限制
+    block_cartesian_join: bool = True    # 笛卡尔积连接是否请求澄清
+    explain_timeout_seconds: int = 5
+    plan_cache_size: int = 512
+    plan_cache_ttl: int = 600            # 执行计划缓存时间（秒）
+
+
+@dataclass
+class PlanScan:
+    """执行计划中的表访问节点"""
+    table_name: Optional[str]
+    access_type: str
+    estimated_rows: float
+    is_full_scan: bool
+
+
+@dataclass
+class CostEstimate:
+    """查询成本预估结果"""
+    database_type: str
+    available: bool
+    estimated_rows: float = 0.0
+    estimated_cost: Optional[float] = None
+    scans: List[PlanScan] = field(default_factory=list)
+    has_cartesian_join: bool = False
+    warnings: List[str] = field(default_factory=list)
+    action: CostAction = CostAction.EXECUTE
+    suggested_limit: Optional[int] = None
+    from_cache: bool = False
+    statement_error: Optional[str] = None
+
+    @property
+    def max_scan_rows(self) -> float:
+        """全表扫描节点中的最大行数"""
+        return max((s.estimated_rows for s in self.scans if s.is_full_scan), default=0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'database_type': self.database_type,
+            'available': self.available,
+            'estimated_rows': self.estimated_rows,
+            'estimated_cost': self.estimated_cost,
+            'scans': [
+                {
+                    'table_name': s.table_name,
+                    'access_type': s.access_type,
+                    'estimated_rows': s.estimated_rows,
+                    'is_full_scan': s.is_full_scan
+                }
+                for s in self.scans
+            ],
+            'has_cartesian_join': self.has_cartesian_join,
+            'warnings': self.warnings,
+            'action': self.action.value,
+            'suggested_limit': self.suggested_limit,
+            'from_cache': self.from_cache,
+            'statement_error': self.statement_error
+        }
+
+
+class QueryCostEstimator:
+    """查询成本预估器"""
+
+    def __init__(self, config: CostEstimatorConfig = None):
+        self.config = config or CostEstimatorConfig()
+
+        # 执行计划缓存（LRU） {key: (时间戳, CostEstimate)}
+        self._plan_cache: "OrderedDict[Tuple, Tuple[float, CostEstimate]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    async def estimate(self, sql: str, data_source_config: Dict[str, Any]) -> CostEstimate:
+        """
+        预估SQL查询成本
+
+        Args:
+            sql: SQL查询语句
+            data_source_config: 数据源配置
+
+        Returns:
+            CostEstimate: 成本预估结果，EXPLAIN不可用时available为False，
+                数据库拒绝该语句时statement_error记录错误信息
+        """
+        db_type = data_source_config.get('type', 'mysql')
+        cache_key = self._generate_cache_key(sql, data_source_config)
+
+        cached = self._get_from_cache(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        try:
+            loop = asyncio.get_event_loop()
+            estimate = await asyncio.wait_for(
+                loop.run_in_executor(None, self._explain_sync, sql, data_source_config),
+                timeout=self.config.explain_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"EXPLAIN超时（{self.config.explain_timeout_seconds}秒），跳过成本预估")
+            return CostEstimate(database_type=db_type, available=False, warnings=["执行计划获取超时"])
+        except ExplainStatementError as e:
+            logger.info(f"数据库拒绝了EXPLAIN的语句: {str(e)}")
+            return CostEstimate(
+                database_type=db_type,
+                available=False,
+                warnings=[f"执行计划获取失败: {str(e)}"],
+                statement_error=str(e)
+            )
+        except Exception as e:
+            logger.warning(f"EXPLAIN失败，跳过成本预估: {str(e)}")
+            return CostEstimate(database_type=db_type, available=False, warnings=[f"执行计划获取失败: {str(e)}"])
+
+        self._evaluate(estimate)
+        self._put_to_cache(cache_key, estimate)
+        return estimate
+
+    def _explain_sync(self, sql: str, config: Dict[str, Any]) -> CostEstimate:
+        """同步获取执行计划"""
+        db_type = config.get('type', 'mysql')
+        sql = sql.strip().rstrip(';')
+
+        if db_type == 'mysql':
+            return self.analyze_mysql_plan(self._explain_mysql(sql, config))
+        elif db_type == 'postgresql':
+            return self.analyze_postgresql_plan(self._explain_postgresql(sql, config))
+        elif db_type == 'sqlserver':
+            return self.analyze_sqlserver_plan(self._explain_sqlserver(sql, config))
+        raise ValueError(f"不支持的数据库类型: {db_type}")
+
+    def _explain_mysql(self, sql: str, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """执行MySQL EXPLAIN"""
+        if not PYMYSQL_AVAILABLE:
+            raise RuntimeError("pymysql not installed")
+
+        connection = pymysql.connect(
+            host=config.get('host', 'localhost'),
+            port=config.get('port', 3306),
+            user=config.get('username', 'root'),
+            password=config.get('password', ''),
+            database=config.get('database', ''),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            connect_timeout=self.config.explain_timeout_seconds
+        )
+        try:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute(f"EXPLAIN {sql}")
+                except pymysql.Error as e:
+                    raise ExplainStatementError(str(e)) from e
+                return list(cursor.fetchall())
+        finally:
+            connection.close()
+
+    def _explain_postgresql(self, sql: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """执行PostgreSQL EXPLAIN (FORMAT JSON)"""
+        if not PSYCOPG2_AVAILABLE:
+            raise RuntimeError("psycopg2 not installed")
+
+        connection = psycopg2.connect(
+            host=config.get('host', 'localhost'),
+            port=config.get('port', 5432),
+            user=config.get('username', 'postgres'),
+            password=config.get('password', ''),
+            dbname=config.get('database', ''),
+            connect_timeout=self.config.explain_timeout_seconds
+        )
+        try:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                except psycopg2.Error as e:
+                    raise ExplainStatementError(str(e)) from e
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return plan[0]
+        finally:
+            connection.close()
+
+    def _explain_sqlserver(self, sql: str, config: Dict[str, Any]) -> str:
+        """获取SQL Server预估执行计划（SHOWPLAN_XML）"""
+        if not PYMSSQL_AVAILABLE:
+            raise RuntimeError("pymssql not installed")
+
+        connection = pymssql.connect(
+            server=config.get('host', 'localhost'),
+            port=config.get('port', 1433),
+            user=config.get('username', 'sa'),
+            password=config.get('password', ''),
+            database=config.get('database', ''),
+            timeout=self.config.explain_timeout_seconds
+        )
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SET SHOWPLAN_XML ON")
+            try:
+                try:
+                    cursor.execute(sql)
+                except pymssql.Error as e:
+                    raise ExplainStatementError(str(e)) from e
+                return cursor.fetchone()[0]
+            finally:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def analyze_mysql_plan(plan_rows: List[Dict[str, Any]]) -> CostEstimate:
+        """
+        解析MySQL传统格式的EXPLAIN结果
+
+        同一SELECT内按嵌套循环估算结果行数（rows * filtered%连乘），
+        type为ALL的节点视为全表扫描；无索引、无过滤条件且使用join buffer的连接视为笛卡尔积。
+        """
+        estimate = CostEstimate(database_type='mysql', available=True)
+        per_select: Dict[Any, float] = {}
+
+        for row in plan_rows:
+            access_type = (row.get('type') or '').upper()
+            rows = float(row.get('rows') or 0)
+            filtered = float(row.get('filtered') or 100.0)
+            extra = row.get('Extra') or ''
+            is_full_scan = access_type == 'ALL'
+
+            estimate.scans.append(PlanScan(
+                table_name=row.get('table'),
+                access_type=access_type or 'UNKNOWN',
+                estimated_rows=rows,
+                is_full_scan=is_full_scan
+            ))
+
+            select_id = row.get('id')
+            if select_id in per_select:
+                if is_full_scan and 'join buffer' in extra and 'Using where' not in extra and not row.get('key'):
+                    estimate.has_cartesian_join = True
+                per_select[select_id] *= max(rows * filtered / 100.0, 1.0)
+            else:
+                per_select[select_id] = rows * filtered / 100.0
+
+        if per_select:
+            first_id = plan_rows[0].get('id')
+            estimate.estimated_rows = per_select.get(first_id, 0.0)
+        return estimate
+
+    @staticmethod
+    def analyze_postgresql_plan(plan: Dict[str, Any]) -> CostEstimate:
+        """
+        解析PostgreSQL EXPLAIN (FORMAT JSON)结果
+
+        Seq Scan节点视为全表扫描；没有连接条件的Nested Loop视为笛卡尔积。
+        """
+        root = plan.get('Plan', plan)
+        estimate = CostEstimate(
+            database_type='postgresql',
+            available=True,
+            estimated_rows=float(root.get('Plan Rows', 0)),
+            estimated_cost=float(root.get('Total Cost', 0))
+        )
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node_type = node.get('Node Type', '')
+            children = node.get('Plans', [])
+
+            if 'Scan' in node_type and node.get('Relation Name'):
+                estimate.scans.append(PlanScan(
+                    table_name=node.get('Relation Name'),
+                    access_type=node_type,
+                    estimated_rows=float(node.get('Plan Rows', 0)),
+                    is_full_scan=node_type == 'Seq Scan'
+                ))
+
+            if node_type == 'Nested Loop' and not node.get('Join Filter'):
+                inner_conditions = any(
+                    child.get('Index Cond') or child.get('Filter') or child.get('Recheck Cond')
+                    for child in children[1:]
+                )
+                if not inner_conditions:
+                    estimate.has_cartesian_join = True
+
+            stack.extend(children)
+
+        return estimate
+
+    @staticmethod
+    def analyze_sqlserver_plan(plan_xml: str) -> CostEstimate:
+        """
+        解析SQL Server SHOWPLAN_XML结果
+
+        表扫描/聚集索引扫描视为全表扫描；计划中的NoJoinPredicate警告视为笛卡尔积。
+        """
+        estimate = CostEstimate(database_type='sqlserver', available=True)
+        root = ET.fromstring(plan_xml)
+
+        statement = root.find('.//sp:StmtSimple', SHOWPLAN_NAMESPACE)
+        if statement is not None:
+            estimate.estimated_rows = float(statement.get('StatementEstRows', 0))
+            if statement.get('StatementSubTreeCost'):
+                estimate.estimated_cost = float(statement.get('StatementSubTreeCost'))
+
+        for rel_op in root.iterfind('.//sp:RelOp', SHOWPLAN_NAMESPACE):
+            physical_op = rel_op.get('PhysicalOp', '')
+            if 'Scan' not in physical_op and 'Seek' not in physical_op:
+                continue
+            table = rel_op.find('.//sp:Object', SHOWPLAN_NAMESPACE)
+            rows = rel_op.get('EstimatedRowsRead') or rel_op.get('TableCardinality') or rel_op.get('EstimateRows', 0)
+            estimate.scans.append(PlanScan(
+                table_name=table.get('Table', '').strip('[]') if table is not None else None,
+                access_type=physical_op,
+                estimated_rows=float(rows),
+                is_full_scan=physical_op in SQLSERVER_SCAN_OPERATORS
+            ))
+
+        if root.find('.//sp:NoJoinPredicate', SHOWPLAN_NAMESPACE) is not None:
+            estimate.has_cartesian_join = True
+
+        return estimate
+
+    def _evaluate(self, estimate: CostEstimate):
+        """根据阈值给出执行建议"""
+        for scan in estimate.scans:
+            if scan.is_full_scan and scan.estimated_rows > self.config.max_scan_rows:
+                estimate.warnings.append(
+                    f"表 {scan.table_name} 预计全表扫描 {int(scan.estimated_rows)} 行，"
+                    f"超过阈值 {self.config.max_scan_rows}"
+                )
+
+        if estimate.has_cartesian_join:
+            estimate.warnings.append("查询包含没有连接条件的表连接（笛卡尔积）")
+
+        if estimate.has_cartesian_join and self.config.block_cartesian_join:
+            estimate.action = CostAction.CLARIFY
+        elif estimate.estimated_rows > self.config.max_result_rows:
+            # 结果集很大时加限制可以让数据库提前结束扫描
+            estimate.warnings.append(
+                f"预计返回 {int(estimate.estimated_rows)} 行，超过阈值 {self.config.max_result_rows}"
+            )
+            estimate.action = CostAction.ADD_LIMIT
+            estimate.suggested_limit = self.config.auto_limit_rows
+        elif estimate.max_scan_rows > self.config.max_scan_rows:
+            # 结果集不大但扫描量大（通常是聚合），加限制无效，需要缩小查询范围
+            estimate.action = CostAction.CLARIFY
+
+    def build_clarification_question(self, estimate: CostEstimate) -> str:
+        """根据成本预估结果生成澄清问题"""
+        reasons = '；'.join(estimate.warnings) if estimate.warnings else "查询代价过高"
+        return f"该查询预计开销较大（{reasons}）。请补充时间范围、筛选条件或需要关注的维度，以缩小查询范围。"
+
+    def _generate_cache_key(self, sql: str, config: Dict[str, Any]) -> Tuple:
+        """生成执行计划缓存键"""
+        return (
+            normalize_sql(sql),
+            config.get('type', 'mysql'),
+            config.get('host'),
+            config.get('port'),
+            config.get('database')
+        )
+
+    def _get_from_cache(self, cache_key: Tuple) -> Optional[CostEstimate]:
+        """从缓存获取执行计划"""
+        entry = self._plan_cache.get(cache_key)
+        if entry is None:
+            return None
+
+        timestamp, estimate = entry
+        if time.time() - timestamp > self.config.plan_cache_ttl:
+            del self._plan_cache[cache_key]
+            return None
+
+        self._plan_cache.move_to_end(cache_key)
+        return CostEstimate(**{**estimate.__dict__, 'from_cache': True})
+
+    def _put_to_cache(self, cache_key: Tuple, estimate: CostEstimate):
+        """将执行计划放入缓存"""
+        self._plan_cache[cache_key] = (time.time(), estimate)
+        self._plan_cache.move_to_end(cache_key)
+        if len(self._plan_cache) > self.config.plan_cache_size:
+            self._plan_cache.popitem(last=False)
+
+    def clear_cache(self):
+        """清空执行计划缓存"""
+        self._plan_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取成本预估统计"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            'plan_cache_size': len(self._plan_cache),
+            'plan_cache_hits': self.cache_hits,
+            'plan_cache_misses': self.cache_misses,
+            'plan_cache_hit_rate': self.cache_hits / total if total else 0.0
+        }
@@ -1,10 +1,11 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import pandas as pd
 import mysql.connector
 from src.sql_generator import SQLGenerator
 from src.sql_generator_qwen import SQLGeneratorQwen
 from src.cache_service import CacheService
+from src.services.local_olap_store import get_local_olap_store
 import os
 from dotenv import load_dotenv
 
@@ -137,6 +138,18 @@ class QueryService:
         """
         logger.info(f"Starting Excel query execution: metric='{metric}', dimension='{dimension}'")
         
+        # 已导入本地分析存储时直接在本地聚合，不再解析整个文件
+        local_result = self._aggregate_from_local_store(metric, dimension, time_range)
+        if local_result is not None:
+            sql = generator.generate_sql(nlu_result={
+                'entities': {'metric': metric, 'dimension': dimension},
+                'time_range': time_range,
+                'original_text': ""
+            }, table_name="excel_data")
+            local_result['sql'] = sql
+            logger.info(f"Excel query completed from local OLAP store, returning {len(local_result['data'])} rows")
+            return local_result
+        
         # 读取Excel文件
         file_path = self.active_data_source['file_path']
         logger.info(f"Reading Excel file: {file_path}")
@@ -185,6 +198,58 @@ class QueryService:
             'raw': df.to_dict('records')
         }
 
+    def _aggregate_from_local_store(self, metric: str, dimension: str, time_range: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        在本地分析存储上按维度聚合指标
+        
+        数据源未导入本地存储，或第一张表缺少所需列时返回None，由调用方回退到pandas
+        """
+        store = get_local_olap_store()
+        data_source_id = str(self.active_data_source['id'])
+        if not store.has_store(data_source_id):
+            return None
+        
+        tables = store.list_tables(data_source_id)
+        if not tables:
+            return None
+        table = tables[0]
+        
+        def quote(name: str) -> str:
+            return '"' + name.replace('"', '""') + '"'
+        
+        columns, _, _ = store.execute(data_source_id, f'SELECT * FROM {quote(table)} LIMIT 0')
+        if dimension not in columns or metric not in columns:
+            return None
+        
+        where = ""
+        params = []
+        if time_range['start'] and time_range['end']:
+            if 'date' not in columns:
+                return None
+            where = ' WHERE "date" BETWEEN ? AND ?'
+            params = [pd.to_datetime(time_range['start']).to_pydatetime(), pd.to_datetime(time_range['end']).to_pydatetime()]
+        
+        sql = (
+            f'SELECT {quote(dimension)}, SUM({quote(metric)}) AS total FROM {quote(table)}{where} '
+            f'GROUP BY {quote(dimension)} ORDER BY total DESC'
+        )
+        _, rows, _ = store.execute(data_source_id, sql, params=params)
+        
+        chart_data = [
+            {'label': label, 'value': float(value or 0)}
+            for label, value in rows
+        ]
+        max_value = max(item['value'] for item in chart_data) if chart_data else 100
+        
+        return {
+            'chartType': 'bar',
+            'data': chart_data[:10],
+            'headers': [dimension, metric],
+            'rows': [[item['label'], item['value']] for item in chart_data[:10]],
+            'maxValue': max_value,
+            'raw': [{dimension: item['label'], metric: item['value']} for item in chart_data]
+        }
+    
     def _execute_mysql_query(self, metric: str, dimension: str, time_range: Dict[str, Any], generator: any) -> Dict[str, Any]:
         """
         执行MySQL查询
@@ -5,9 +5,12 @@
 按需加载的条件性模块注入、Token使用量的精确控制和预算管理。
 """
 
-import json
+import copy
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Set, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
@@ -15,14 +18,40 @@ from datetime import datetime
 import asyncio
 from collections import defaultdict
 
+from sqlalchemy.orm import Session
+
 from src.services.data_source_semantic_injection import DataSourceSemanticInjectionService
 from src.services.table_structure_semantic_injection import TableStructureSemanticInjectionService
 from src.services.table_relation_semantic_injection import TableRelationSemanticInjectionService
 from src.services.semantic_injection_service import SemanticInjectionService
 from src.services.knowledge_semantic_injection import KnowledgeSemanticInjectionService
+from src.services.context_packer import get_context_packer
+from src.models.data_preparation_model import DataTable
 
 logger = logging.getLogger(__name__)
 
+# 模块加载状态
+MODULE_STATUS_LOADED = "loaded"
+MODULE_STATUS_TIMEOUT = "timeout"
+MODULE_STATUS_FAILED = "failed"
+
+# 同步数据库操作使用的共享线程池（所有聚合器实例共用，限制并发的数据库工作量）
+_LOADER_MAX_WORKERS = 8
+_loader_executor: Optional[ThreadPoolExecutor] = None
+_loader_executor_lock = threading.Lock()
+
+
+def _get_loader_executor() -> ThreadPoolExecutor:
+    """获取模块加载线程池"""
+    global _loader_executor
+    with _loader_executor_lock:
+        if _loader_executor is None:
+            _loader_executor = ThreadPoolExecutor(
+                max_workers=_LOADER_MAX_WORKERS,
+                thread_name_prefix="semantic-loader"
+            )
+        return _loader_executor
+
 
 class ModuleType(str, Enum):
     """模块类型枚举"""
@@ -74,6 +103,10 @@ class AggregationContext:
     modules: List[SemanticModule] = field(default_factory=list)
     aggregated_content: Dict[str, Any] = field(default_factory=dict)
     total_tokens_used: int = 0
+    module_timings: Dict[str, float] = field(default_factory=dict)   # 各模块加载耗时（毫秒）
+    module_status: Dict[str, str] = field(default_factory=dict)      # 各模块加载状态
+    load_wall_time_ms: float = 0.0                                    # 模块并发加载总耗时（毫秒）
+    packing_summary: Dict[str, Any] = field(default_factory=dict)     # 条目级打包统计
 
 
 @dataclass
@@ -90,9 +123,17 @@ class AggregationResult:
 class SemanticContextAggregator:
     """语义上下文聚合引擎"""
     
-    def __init__(self, db_session=None):
+    def __init__(self, db_session=None, module_timeout_seconds: float = 5.0, enable_item_packing: bool = True):
         self.db = db_session
         
+        # 单个模块加载超时（秒），超时的模块被跳过，不影响其他模块
+        self.module_timeout_seconds = module_timeout_seconds
+        
+        # 条目级打包：加载后按真实Token数在预算内挑选表、字段、字典项等条目，
+        # 关闭时退回按估算Token整块选择模块
+        self.enable_item_packing = enable_item_packing
+        self.context_packer = get_context_packer()
+        
         # 初始化五个语义模块服务
         self.data_source_service = DataSourceSemanticInjectionService(db_session)
         self.table_structure_service = TableStructureSemanticInjectionService(db_session)
@@ -157,10 +198,14 @@ class SemanticContextAggregator:
             # 4. 按需加载选中的模块
             await self._load_selected_modules(context)
             
-            # 5. 生成最终的聚合上下文
+            # 5. 条目级打包，按真实Token数在预算内选择内容
+            if self.enable_item_packing:
+                await self._pack_context_items(context)
+            
+            # 6. 生成最终的聚合上下文
             enhanced_context = await self._generate_aggregated_context(context)
             
-            # 6. 生成优化摘要
+            # 7. 生成优化摘要
             optimization_summary = self._generate_optimization_summary(context)
             
             result = AggregationResult(
@@ -346,6 +391,13 @@ class SemanticContextAggregator:
                 reverse=True
             )
             
+            # 条目级打包在加载后按真实Token数裁剪，这里只排除无关模块
+            if self.enable_item_packing:
+                for module in context.modules:
+                    module.is_loaded = module.relevance_score > 0
+                logger.info(f"优化完成，待打包模块 {len([m for m in context.modules if m.is_loaded])} 个")
+                return
+            
             # 贪心算法选择模块，在Token预算内最大化价值
             selected_modules = []
             remaining_budget = context.token_budget.available_for_context
@@ -397,40 +449,96 @@ class SemanticContextAggregator:
         return weights.get(priority, 1)
     
     async def _load_selected_modules(self, context: AggregationContext):
-        """按需加载选中的模块"""
+        """按需并发加载选中的模块，单个模块超时或失败时降级跳过"""
         try:
-            for module in context.modules:
-                if not module.is_loaded:
-                    continue
-                
-                logger.debug(f"加载模块: {module.module_type.value}")
+            selected = [module for module in context.modules if module.is_loaded]
+            
+            start_time = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._load_module_with_timeout(module, context) for module in selected)
+            )
+            context.load_wall_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+            
+            # 按模块顺序合并结果，保证Token统计稳定
+            for module, (content, status, elapsed_ms) in zip(selected, results):
+                module_name = module.module_type.value
+                context.module_timings[module_name] = elapsed_ms
+                context.module_status[module_name] = status
                 
-                # 根据模块类型调用相应的服务
-                if module.module_type == ModuleType.DATA_SOURCE:
-                    content = await self._load_data_source_content(context)
-                elif module.module_type == ModuleType.TABLE_STRUCTURE:
-                    content = await self._load_table_structure_content(context)
-                elif module.module_type == ModuleType.TABLE_RELATION:
-                    content = await self._load_table_relation_content(context)
-                elif module.module_type == ModuleType.DICTIONARY:
-                    content = await self._load_dictionary_content(context)
-                elif module.module_type == ModuleType.KNOWLEDGE:
-                    content = await self._load_knowledge_content(context)
-                else:
-                    content = {}
+                if status != MODULE_STATUS_LOADED:
+                    module.is_loaded = False
+                    continue
                 
                 module.content = content
-                context.aggregated_content[module.module_type.value] = content
+                context.aggregated_content[module_name] = content
                 
                 # 更新实际Token使用量
                 actual_tokens = self._calculate_actual_tokens(content)
                 context.total_tokens_used += actual_tokens
                 
-                logger.debug(f"模块 {module.module_type.value} 加载完成，实际Token: {actual_tokens}")
+                logger.debug(f"模块 {module_name} 加载完成，耗时: {elapsed_ms}ms，实际Token: {actual_tokens}")
                 
         except Exception as e:
             logger.error(f"模块加载失败: {str(e)}", exc_info=True)
     
+    async def _load_module_with_timeout(
+        self,
+        module: SemanticModule,
+        context: AggregationContext
+    ) -> Tuple[Dict[str, Any], str, float]:
+        """加载单个模块，返回内容、状态和耗时（毫秒）"""
+        loaders = {
+            ModuleType.DATA_SOURCE: self._load_data_source_content,
+            ModuleType.TABLE_STRUCTURE: self._load_table_structure_content,
+            ModuleType.TABLE_RELATION: self._load_table_relation_content,
+            ModuleType.DICTIONARY: self._load_dictionary_content,
+            ModuleType.KNOWLEDGE: self._load_knowledge_content,
+        }
+        loader = loaders.get(module.module_type)
+        
+        logger.debug(f"加载模块: {module.module_type.value}")
+        start_time = time.perf_counter()
+        try:
+            if loader is None:
+                content, status = {}, MODULE_STATUS_LOADED
+            else:
+                content = await asyncio.wait_for(loader(context), timeout=self.module_timeout_seconds)
+                status = MODULE_STATUS_LOADED
+        except asyncio.TimeoutError:
+            logger.warning(f"模块 {module.module_type.value} 加载超时（{self.module_timeout_seconds}秒），已跳过")
+            content, status = {}, MODULE_STATUS_TIMEOUT
+        except Exception as e:
+            logger.error(f"模块 {module.module_type.value} 加载失败: {str(e)}")
+            content, status = {}, MODULE_STATUS_FAILED
+        
+        elapsed_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        return content, status, elapsed_ms
+    
+    async def _run_sync_db_call(self, func, *args, **kwargs):
+        """
+        在线程池中执行同步数据库调用，避免阻塞事件循环
+        
+        Session不是线程安全的，每次调用在注入会话所连接的数据库上新建会话（作为第一个参数传给func），
+        调用结束后关闭。各模块互不等待；超时被跳过的调用在后台结束时只关闭自己的会话，
+        不会继续使用请求的会话。
+        """
+        def call():
+            db = self._new_loader_session()
+            try:
+                return func(db, *args, **kwargs)
+            finally:
+                db.close()
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(_get_loader_executor(), call)
+    
+    def _new_loader_session(self) -> Session:
+        """为加载器新建会话：绑定注入会话的数据库连接，未注入会话时使用默认数据库"""
+        if self.db is None:
+            from src.database import SessionLocal
+            return SessionLocal()
+        return Session(bind=self.db.get_bind())
+    
     async def _load_data_source_content(self, context: AggregationContext) -> Dict[str, Any]:
         """加载数据源语义内容"""
         try:
@@ -481,59 +589,132 @@ class SemanticContextAggregator:
             return {}
     
     async def _load_dictionary_content(self, context: AggregationContext) -> Dict[str, Any]:
-        """加载数据字典语义内容"""
-        try:
-            # 调用数据字典语义注入服务，传递数据库会话
-            result = self.dictionary_service.inject_semantic_values(
-                db=self.db,  # 传递数据库会话
-                table_ids=context.table_ids or [],
-                field_names=[],
-                include_mappings=True
-            )
-            
-            return {
-                "module_type": "dictionary",
-                "content": "数据字典语义信息",
-                "field_mappings": result.get("field_mappings", []),
-                "semantic_values": result.get("semantic_values", {})
-            }
-        except Exception as e:
-            logger.error(f"加载数据字典内容失败: {str(e)}")
+        """加载数据字典语义内容（加载失败时抛出异常，由调用方记录为failed）"""
+        if not context.table_ids:
             return {}
+        
+        field_mappings, semantic_values = await self._run_sync_db_call(
+            self._load_dictionary_mappings, context.table_ids
+        )
+        return {
+            "module_type": "dictionary",
+            "content": "数据字典语义信息",
+            "field_mappings": field_mappings,
+            "semantic_values": semantic_values
+        }
+    
+    def _load_dictionary_mappings(self, db, table_ids: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """按表加载字段的字典映射，返回字段映射列表和 "表名.字段名" -> 字典取值说明"""
+        table_names = [
+            table_name for (table_name,) in
+            db.query(DataTable.table_name).filter(DataTable.id.in_(table_ids)).all()
+        ]
+        
+        field_mappings = []
+        semantic_values = {}
+        for table_name in table_names:
+            for field_name, mapping in self.dictionary_service.load_table_mappings(db, table_name).items():
+                field_mappings.append({
+                    "table_name": table_name,
+                    "field_name": field_name,
+                    "dictionary_name": mapping.get("dictionary_name"),
+                    "dictionary_code": mapping.get("dictionary_code")
+                })
+                values = ", ".join(
+                    f"{code}={value.get('label')}" for code, value in mapping.get("value_mappings", {}).items()
+                )
+                semantic_values[f"{table_name}.{field_name}"] = f"{mapping.get('dictionary_name')}: {values}"
+        return field_mappings, semantic_values
     
     async def _load_knowledge_content(self, context: AggregationContext) -> Dict[str, Any]:
-        """加载知识库语义内容"""
+        """加载知识库语义内容（加载失败时抛出异常，由调用方记录为failed）"""
+        result = await self._run_sync_db_call(
+            self._inject_knowledge_in_session,
+            user_question=context.user_question,
+            table_ids=context.table_ids,
+            include_global=context.include_global,
+            max_terms=5,
+            max_logics=3,
+            max_events=2
+        )
+        
+        return {
+            "module_type": "knowledge",
+            "content": result.enhanced_context,
+            "knowledge_info": {
+                "terms_count": len(result.knowledge_info.terms),
+                "logics_count": len(result.knowledge_info.logics),
+                "events_count": len(result.knowledge_info.events)
+            },
+            "total_relevance_score": result.knowledge_info.total_relevance_score
+        }
+    
+    def _inject_knowledge_in_session(self, db, **kwargs):
+        """在独立会话上执行知识库语义注入（复制服务实例并绑定会话，保留其检索配置）"""
+        service = copy.copy(self.knowledge_service)
+        service.db = db
+        return service.inject_knowledge_semantics(**kwargs)
+    
+    async def _pack_context_items(self, context: AggregationContext):
+        """将已加载模块拆分为细粒度条目，按相关性和真实Token数在预算内打包"""
         try:
-            # 调用知识库语义注入服务
-            result = self.knowledge_service.inject_knowledge_semantics(
-                user_question=context.user_question,
-                table_ids=context.table_ids,
-                include_global=context.include_global,
-                max_terms=5,
-                max_logics=3,
-                max_events=2
+            loaded = [m for m in context.modules if m.is_loaded and m.content]
+            
+            module_items = {}
+            all_items = []
+            for module in loaded:
+                items = self.context_packer.split_module(module.module_type.value, module.content)
+                self.context_packer.score_items(items, context.user_question, module.relevance_score)
+                
+                priority_weight = self._get_priority_weight(module.priority)
+                for item in items:
+                    item.relevance *= priority_weight
+                    # 关键模块的概要必须保留
+                    if module.priority == ContextPriority.CRITICAL and item.field_name == "content":
+                        item.required = True
+                
+                module_items[module.module_type] = items
+                all_items.extend(items)
+            
+            result = self.context_packer.pack(all_items, context.token_budget.available_for_context)
+            
+            selected_by_module = defaultdict(list)
+            for item in result.selected:
+                selected_by_module[item.module_type].append(item)
+            
+            per_module = {}
+            for module in loaded:
+                module_name = module.module_type.value
+                selected = selected_by_module.get(module_name, [])
+                per_module[module_name] = {
+                    "items_total": len(module_items[module.module_type]),
+                    "items_selected": len(selected),
+                    "tokens": sum(item.tokens for item in selected)
+                }
+                
+                if not selected:
+                    module.is_loaded = False
+                    context.aggregated_content.pop(module_name, None)
+                    continue
+                
+                module.content = self.context_packer.rebuild_content(module.content, selected)
+                context.aggregated_content[module_name] = module.content
+            
+            context.total_tokens_used = result.tokens_used
+            context.packing_summary = {**result.to_summary(), "modules": per_module}
+            
+            logger.info(
+                f"条目打包完成，选中 {len(result.selected)}/{len(all_items)} 个条目，"
+                f"Token: {result.tokens_used}/{result.budget}"
             )
             
-            return {
-                "module_type": "knowledge",
-                "content": result.enhanced_context,
-                "knowledge_info": {
-                    "terms_count": len(result.knowledge_info.terms),
-                    "logics_count": len(result.knowledge_info.logics),
-                    "events_count": len(result.knowledge_info.events)
-                },
-                "total_relevance_score": result.knowledge_info.total_relevance_score
-            }
         except Exception as e:
-            logger.error(f"加载知识库内容失败: {str(e)}")
-            return {}
+            logger.error(f"条目打包失败: {str(e)}", exc_info=True)
     
     def _calculate_actual_tokens(self, content: Dict[str, Any]) -> int:
         """计算实际Token使用量"""
         try:
-            # 简单的Token估算：每4个字符约等于1个Token
-            content_str = json.dumps(content, ensure_ascii=False)
-            return len(content_str) // 4
+            return self.context_packer.count_content_tokens(content)
         except Exception:
             return 0
     
@@ -570,7 +751,11 @@ class SemanticContextAggregator:
                 priority.value: len([m for m in context.modules if m.priority == priority and m.is_loaded])
                 for priority in ContextPriority
             },
-            "average_relevance_score": sum(m.relevance_score for m in context.modules if m.is_loaded) / max(1, len([m for m in context.modules if m.is_loaded]))
+            "average_relevance_score": sum(m.relevance_score for m in context.modules if m.is_loaded) / max(1, len([m for m in context.modules if m.is_loaded])),
+            "module_load_timings_ms": dict(context.module_timings),
+            "module_load_status": dict(context.module_status),
+            "module_load_wall_time_ms": context.load_wall_time_ms,
+            "context_packing": dict(context.packing_summary)
         }
     
     def _extract_keywords(self, text: str) -> Set[str]:
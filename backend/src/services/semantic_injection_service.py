@@ -1,33 +1,47 @@
 from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, func
+from collections import OrderedDict
+from dataclasses import dataclass
 import json
 import logging
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
 
 from ..models.data_preparation_model import Dictionary, DictionaryItem, FieldMapping, DataTable, TableField
 from ..database import get_db
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class DictionaryValueMap:
+    """字典的编码→标签映射（按版本失效）"""
+    dictionary_id: str
+    version: Tuple
+    value_mappings: Dict[str, Dict[str, Any]]
+
+
 class SemanticInjectionService:
     """数据字典语义注入服务
     
     负责将数据字典的语义信息注入到查询结果中，
     提供字段值的语义增强和解释。
+    
+    每个表的字段映射、字典及字典版本通过一次联表查询批量加载，
+    字典项只在字典版本（字典更新时间、字典项数量和最近更新时间）变化时重新加载，
+    值翻译按整列进行，同一列中重复的值只翻译一次。
     """
     
-    def __init__(self):
+    def __init__(self, max_dictionaries: int = 1000):
+        # 字段语义映射缓存: "表名.字段名" -> (字典版本, 语义映射)
         self._cache = {}
-        self._cache_ttl = timedelta(minutes=30)
+        # 字典值映射缓存（LRU）: 字典ID -> DictionaryValueMap
+        self._dictionary_maps: "OrderedDict[str, DictionaryValueMap]" = OrderedDict()
+        self._max_dictionaries = max_dictionaries
+        self._lock = threading.Lock()
         self._last_cache_clear = datetime.now()
-    
-    def _clear_expired_cache(self):
-        """清理过期缓存"""
-        now = datetime.now()
-        if now - self._last_cache_clear > self._cache_ttl:
-            self._cache.clear()
-            self._last_cache_clear = now
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
     
     def _get_cache_key(self, table_name: str, field_name: str) -> str:
         """生成缓存键"""
@@ -45,71 +59,151 @@ class SemanticInjectionService:
             字段的语义映射信息，包括字典信息和映射规则
         """
         try:
-            self._clear_expired_cache()
-            cache_key = self._get_cache_key(table_name, field_name)
-            
-            # 检查缓存
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-            
-            # 查询字段映射 - 通过表名和字段名查找
-            field_mapping = db.query(FieldMapping).join(
-                FieldMapping.table
-            ).join(
-                FieldMapping.field
-            ).filter(
-                FieldMapping.table.has(table_name=table_name),
-                FieldMapping.field.has(field_name=field_name)
-            ).first()
-            
-            if not field_mapping or not field_mapping.dictionary_id:
-                return None
-            
-            # 查询关联的字典
-            dictionary = db.query(Dictionary).filter(
-                Dictionary.id == field_mapping.dictionary_id
-            ).first()
-            
-            if not dictionary:
-                return None
+            return self.load_table_mappings(db, table_name).get(field_name)
+        except Exception as e:
+            logger.error(f"获取字段语义映射失败: {str(e)}")
+            return None
+    
+    def load_table_mappings(self, db: Session, table_name: str) -> Dict[str, Dict[str, Any]]:
+        """批量加载表中所有映射了字典的字段的语义映射
+        
+        第一次查询联表取出字段映射、字典信息和字典版本，
+        第二次查询一次性加载所有版本已变化（或未缓存）字典的字典项。
+        
+        Args:
+            db: 数据库会话
+            table_name: 表名
             
-            # 查询字典项
-            dictionary_items = db.query(DictionaryItem).filter(
-                DictionaryItem.dictionary_id == dictionary.id
-            ).all()
+        Returns:
+            字段名到语义映射的字典
+        """
+        item_stats = db.query(
+            DictionaryItem.dictionary_id.label('dictionary_id'),
+            func.count(DictionaryItem.id).label('item_count'),
+            func.max(DictionaryItem.updated_at).label('items_updated_at')
+        ).group_by(DictionaryItem.dictionary_id).subquery()
+        
+        rows = db.query(
+            TableField.field_name,
+            FieldMapping.id,
+            Dictionary.id,
+            Dictionary.name,
+            Dictionary.code,
+            Dictionary.description,
+            Dictionary.created_at,
+            Dictionary.updated_at,
+            item_stats.c.item_count,
+            item_stats.c.items_updated_at
+        ).select_from(FieldMapping).join(
+            DataTable, FieldMapping.table_id == DataTable.id
+        ).join(
+            TableField, FieldMapping.field_id == TableField.id
+        ).join(
+            Dictionary, FieldMapping.dictionary_id == Dictionary.id
+        ).outerjoin(
+            item_stats, item_stats.c.dictionary_id == Dictionary.id
+        ).filter(
+            DataTable.table_name == table_name
+        ).all()
+        
+        if not rows:
+            return {}
+        
+        versions = {}
+        for row in rows:
+            versions[row[2]] = (
+                self._format_datetime(row[7]),
+                row[8] or 0,
+                self._format_datetime(row[9])
+            )
+        value_maps = self._get_dictionary_maps(db, versions)
+        
+        mappings = {}
+        for (field_name, field_mapping_id, dictionary_id, name, code, description,
+             created_at, updated_at, _, _) in rows:
+            cache_key = self._get_cache_key(table_name, field_name)
+            value_map = value_maps[dictionary_id]
+            cached = self._cache.get(cache_key)
+            # 字典版本未变化且映射关系未变化时复用已构建的语义映射
+            if cached and cached[0] == value_map.version and \
+                    cached[1]['field_mapping_id'] == field_mapping_id and \
+                    cached[1]['dictionary_id'] == dictionary_id:
+                mappings[field_name] = cached[1]
+                continue
             
-            # 构建语义映射
             semantic_mapping = {
-                'dictionary_id': dictionary.id,
-                'dictionary_name': dictionary.name,
-                'dictionary_code': dictionary.code,
-                'field_mapping_id': field_mapping.id,
+                'dictionary_id': dictionary_id,
+                'dictionary_name': name,
+                'dictionary_code': code,
+                'field_mapping_id': field_mapping_id,
                 'mapping_type': 'direct',  # 默认映射类型
-                'value_mappings': {},
+                'value_mappings': value_map.value_mappings,
                 'metadata': {
-                    'description': dictionary.description,
-                    'created_at': dictionary.created_at.isoformat() if dictionary.created_at else None,
-                    'updated_at': dictionary.updated_at.isoformat() if dictionary.updated_at else None
+                    'description': description,
+                    'created_at': self._format_datetime(created_at),
+                    'updated_at': self._format_datetime(updated_at)
                 }
             }
-            
-            # 构建值映射
-            for item in dictionary_items:
-                semantic_mapping['value_mappings'][item.code] = {
-                    'label': item.name,
-                    'description': item.description,
-                    'sort_order': item.sort_order,
-                    'is_active': item.is_active
-                }
-            
-            # 缓存结果
-            self._cache[cache_key] = semantic_mapping
-            
-            return semantic_mapping
-            
-        except Exception as e:
-            logger.error(f"获取字段语义映射失败: {str(e)}")
+            self._cache[cache_key] = (value_map.version, semantic_mapping)
+            mappings[field_name] = semantic_mapping
+        
+        return mappings
+    
+    def _get_dictionary_maps(self, db: Session, versions: Dict[str, Tuple]) -> Dict[str, DictionaryValueMap]:
+        """获取字典值映射，只为版本变化或未缓存的字典加载字典项"""
+        result = {}
+        stale_ids = []
+        with self._lock:
+            for dictionary_id, version in versions.items():
+                value_map = self._dictionary_maps.get(dictionary_id)
+                if value_map is not None and value_map.version == version:
+                    self._dictionary_maps.move_to_end(dictionary_id)
+                    self._stats['hits'] += 1
+                    result[dictionary_id] = value_map
+                else:
+                    if value_map is not None:
+                        self._stats['invalidations'] += 1
+                    self._stats['misses'] += 1
+                    stale_ids.append(dictionary_id)
+        
+        if not stale_ids:
+            return result
+        
+        loaded = {dictionary_id: {} for dictionary_id in stale_ids}
+        items = db.query(DictionaryItem).filter(
+            DictionaryItem.dictionary_id.in_(stale_ids)
+        ).order_by(DictionaryItem.dictionary_id, DictionaryItem.sort_order).all()
+        for item in items:
+            loaded[item.dictionary_id][str(item.item_key)] = {
+                'label': item.item_value,
+                'description': item.description,
+                'sort_order': item.sort_order,
+                'is_active': item.status if item.status is not None else True
+            }
+        
+        with self._lock:
+            for dictionary_id, value_mappings in loaded.items():
+                value_map = DictionaryValueMap(dictionary_id, versions[dictionary_id], value_mappings)
+                self._dictionary_maps[dictionary_id] = value_map
+                self._dictionary_maps.move_to_end(dictionary_id)
+                result[dictionary_id] = value_map
+            while len(self._dictionary_maps) > self._max_dictionaries:
+                self._dictionary_maps.popitem(last=False)
+        
+        return result
+    
+    def invalidate_dictionary(self, dictionary_id: str):
+        """字典变更后主动失效其值映射"""
+        with self._lock:
+            self._dictionary_maps.pop(dictionary_id, None)
+        for cache_key in [k for k, v in self._cache.items() if v[1]['dictionary_id'] == dictionary_id]:
+            self._cache.pop(cache_key, None)
+    
+    @staticmethod
+    def _format_datetime(value: Any) -> Optional[str]:
+        if value is None:
             return None
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
     
     def inject_semantic_values(self, db: Session, table_name: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """为查询结果注入语义值
@@ -126,47 +220,33 @@ class SemanticInjectionService:
             return data
         
         try:
-            # 获取表的所有字段映射 - 通过表名查找
-            field_mappings = db.query(FieldMapping).join(
-                FieldMapping.table
-            ).join(
-                FieldMapping.field
-            ).filter(
-                FieldMapping.table.has(table_name=table_name)
-            ).all()
-            
-            if not field_mappings:
+            semantic_mappings = self.load_table_mappings(db, table_name)
+            if not semantic_mappings:
                 return data
             
-            # 为每个字段获取语义映射
-            semantic_mappings = {}
-            for mapping in field_mappings:
-                field_name = mapping.field.field_name if mapping.field else None
-                if field_name:
-                    semantic_info = self.get_field_semantic_mapping(
-                        db, table_name, field_name
+            # 按列翻译
+            semantic_columns = {}
+            for field_name, semantic_info in semantic_mappings.items():
+                if any(field_name in row for row in data):
+                    semantic_columns[f"{field_name}_semantic"] = (
+                        field_name,
+                        self.translate_column([row.get(field_name) for row in data], semantic_info)
                     )
-                    if semantic_info:
-                        semantic_mappings[field_name] = semantic_info
             
-            # 注入语义值
+            if not semantic_columns:
+                return [dict(row) for row in data]
+            
+            # 组装行数据
             enhanced_data = []
-            for row in data:
-                enhanced_row = row.copy()
-                semantic_row = {}
-                
-                for field_name, semantic_info in semantic_mappings.items():
-                    if field_name in row:
-                        original_value = row[field_name]
-                        semantic_value = self._get_semantic_value(
-                            original_value, semantic_info
-                        )
-                        semantic_row[f"{field_name}_semantic"] = semantic_value
-                
-                # 添加语义信息到行数据
+            for i, row in enumerate(data):
+                enhanced_row = dict(row)
+                semantic_row = {
+                    key: values[i]
+                    for key, (field_name, values) in semantic_columns.items()
+                    if field_name in row
+                }
                 if semantic_row:
                     enhanced_row['_semantic'] = semantic_row
-                
                 enhanced_data.append(enhanced_row)
             
             return enhanced_data
@@ -175,6 +255,66 @@ class SemanticInjectionService:
             logger.error(f"注入语义值失败: {str(e)}")
             return data
     
+    def translate_column(self, values: List[Any], semantic_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """翻译整列值
+        
+        列中相同的值只计算一次，返回的语义信息对象在相同值之间共享。
+        
+        Args:
+            values: 列值
+            semantic_info: 语义映射信息
+            
+        Returns:
+            与输入等长的语义值列表
+        """
+        translated = {}
+        result = []
+        for value in values:
+            # 区分1和True、1和'1'等相等但类型不同的值
+            key = (type(value), value)
+            try:
+                hash(key)
+            except TypeError:
+                key = (type(value), str(value))
+            semantic_value = translated.get(key)
+            if semantic_value is None:
+                semantic_value = self._get_semantic_value(value, semantic_info)
+                translated[key] = semantic_value
+            result.append(semantic_value)
+        return result
+    
+    def translate_result_columns(
+        self,
+        db: Session,
+        table_name: str,
+        columns: List[str],
+        rows: List[List[Any]]
+    ) -> Dict[str, List[Optional[str]]]:
+        """将列式查询结果中映射了字典的列翻译为标签列
+        
+        Args:
+            db: 数据库会话
+            table_name: 表名
+            columns: 列名
+            rows: 数据行
+            
+        Returns:
+            列名到标签列表的字典（未映射的值为None）
+        """
+        semantic_mappings = self.load_table_mappings(db, table_name)
+        labels = {}
+        for index, column in enumerate(columns):
+            semantic_info = semantic_mappings.get(column)
+            if not semantic_info:
+                continue
+            value_mappings = semantic_info.get('value_mappings', {})
+            code_to_label = {code: mapping.get('label') for code, mapping in value_mappings.items()}
+            labels[column] = [
+                code_to_label.get(str(row[index])) if row[index] is not None else None
+                for row in rows
+            ]
+        return labels
+    
     def _get_semantic_value(self, original_value: Any, semantic_info: Dict[str, Any]) -> Dict[str, Any]:
         """获取单个值的语义信息
         
@@ -226,37 +366,30 @@ class SemanticInjectionService:
             表的语义模式信息
         """
         try:
-            # 获取表的所有字段映射 - 通过表名查找
-            field_mappings = db.query(FieldMapping).join(
-                FieldMapping.table
-            ).join(
-                FieldMapping.field
+            # 统计表的所有字段映射（包括未关联字典的映射）
+            total_mapped_fields = db.query(func.count(FieldMapping.id)).join(
+                DataTable, FieldMapping.table_id == DataTable.id
             ).filter(
-                FieldMapping.table.has(table_name=table_name)
-            ).all()
+                DataTable.table_name == table_name
+            ).scalar() or 0
             
             schema = {
                 'table_name': table_name,
                 'semantic_fields': {},
                 'metadata': {
-                    'total_mapped_fields': len(field_mappings),
+                    'total_mapped_fields': total_mapped_fields,
                     'generated_at': datetime.now().isoformat()
                 }
             }
             
-            for mapping in field_mappings:
-                field_name = mapping.field.field_name if mapping.field else None
-                if field_name:
-                    semantic_info = self.get_field_semantic_mapping(
-                        db, table_name, field_name
-                    )
-                    if semantic_info:
-                        schema['semantic_fields'][field_name] = {
-                            'dictionary_name': semantic_info.get('dictionary_name'),
-                            'dictionary_code': semantic_info.get('dictionary_code'),
-                            'mapping_type': semantic_info.get('mapping_type'),
-                            'available_values': list(semantic_info.get('value_mappings', {}).keys())
-                        }
+            if total_mapped_fields:
+                for field_name, semantic_info in self.load_table_mappings(db, table_name).items():
+                    schema['semantic_fields'][field_name] = {
+                        'dictionary_name': semantic_info.get('dictionary_name'),
+                        'dictionary_code': semantic_info.get('dictionary_code'),
+                        'mapping_type': semantic_info.get('mapping_type'),
+                        'available_values': list(semantic_info.get('value_mappings', {}).keys())
+                    }
             
             return schema
             
@@ -293,14 +426,25 @@ class SemanticInjectionService:
     def clear_cache(self):
         """清空缓存"""
         self._cache.clear()
+        with self._lock:
+            self._dictionary_maps.clear()
         self._last_cache_clear = datetime.now()
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
+        with self._lock:
+            dictionary_count = len(self._dictionary_maps)
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
         return {
             'cache_size': len(self._cache),
-            'last_clear': self._last_cache_clear.isoformat(),
-            'ttl_minutes': self._cache_ttl.total_seconds() / 60
+            'dictionary_cache_size': dictionary_count,
+            'max_dictionaries': self._max_dictionaries,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'invalidations': stats['invalidations'],
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            'last_clear': self._last_cache_clear.isoformat()
         }
 
 # 全局服务实例
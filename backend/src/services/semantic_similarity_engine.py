@@ -18,7 +18,6 @@ from typing import Dict, List, Set, Tuple, Optional, Any
 from dataclasses import dataclass
 from collections import defaultdict, Counter
 import jieba
-import jieba.posseg as pseg
 
 logger = logging.getLogger(__name__)
 
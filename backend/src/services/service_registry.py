@@ -0,0 +1,252 @@
+"""
+服务注册表
+
+集中管理全局服务实例，首次使用时才构造，避免导入路由模块时就加载分词词典、
+连接Redis、读取模板文件等。提供：
+
+- lazy_service：在模块级别声明服务，返回首次访问属性时才构造实例的代理对象，
+  原有的 ``from xxx import service`` 用法和测试中对模块属性的patch保持不变
+- ServiceRegistry.dependency：FastAPI依赖，接口通过 ``Depends`` 获取服务实例
+- ServiceRegistry.warm_up：服务开始接收请求后在后台线程中预热服务，并执行登记的预热任务
+  （如预加载缓存）
+- ServiceRegistry.get_report：启动各阶段和各服务的构造耗时
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ServiceRecord:
+    """已注册服务的状态"""
+    name: str
+    factory: Callable[[], Any]
+    warm_up: bool = True
+    instance: Any = None
+    state: str = "pending"  # pending / ready / failed
+    init_ms: Optional[float] = None
+    error: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class LazyService:
+    """服务代理，首次访问属性时通过注册表构造实例"""
+
+    def __init__(self, registry: "ServiceRegistry", name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_service_name", name)
+
+    def _resolve(self) -> Any:
+        return self._registry.get(self._service_name)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._resolve(), item)
+
+    def __setattr__(self, key: str, value: Any):
+        setattr(self._resolve(), key, value)
+
+    def __delattr__(self, item: str):
+        delattr(self._resolve(), item)
+
+    def __repr__(self) -> str:
+        state = self._registry.get_state(self._service_name)
+        return f"<LazyService {self._service_name} ({state})>"
+
+
+class ServiceRegistry:
+    """延迟构造的服务注册表"""
+
+    def __init__(self):
+        self._records: Dict[str, ServiceRecord] = {}
+        self._providers: Dict[str, Callable[[], Any]] = {}
+        self._phases: Dict[str, float] = {}
+        self._warm_up_tasks: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, factory: Callable[[], Any], warm_up: bool = True) -> LazyService:
+        """
+        注册服务
+
+        Args:
+            name: 服务名称
+            factory: 无参构造函数
+            warm_up: 是否参与后台预热
+
+        Returns:
+            服务代理对象
+        """
+        with self._lock:
+            self._records[name] = ServiceRecord(name=name, factory=factory, warm_up=warm_up)
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        """获取服务实例，未构造时构造；构造失败时抛出异常，下次访问会重试"""
+        record = self._get_record(name)
+        if record.state == "ready":
+            return record.instance
+
+        with record.lock:
+            if record.state == "ready":
+                return record.instance
+            start = time.perf_counter()
+            try:
+                instance = record.factory()
+            except Exception as e:
+                record.state = "failed"
+                record.error = str(e)
+                logger.error(f"Failed to initialize service {name}: {str(e)}")
+                raise
+            record.init_ms = round((time.perf_counter() - start) * 1000, 2)
+            record.instance = instance
+            record.error = None
+            record.state = "ready"
+            logger.info(f"Service initialized: {name} ({record.init_ms}ms)")
+            return instance
+
+    def _get_record(self, name: str) -> ServiceRecord:
+        record = self._records.get(name)
+        if record is None:
+            raise KeyError(f"Service not registered: {name}")
+        return record
+
+    def get_state(self, name: str) -> str:
+        record = self._records.get(name)
+        return record.state if record else "unregistered"
+
+    def is_initialized(self, name: str) -> bool:
+        return self.get_state(name) == "ready"
+
+    def dependency(self, name: str) -> Callable[[], Any]:
+        """
+        返回FastAPI依赖函数
+
+        同一服务总是返回同一个函数，便于测试中通过 ``app.dependency_overrides`` 替换
+        """
+        self._get_record(name)
+        provider = self._providers.get(name)
+        if provider is None:
+            def provider() -> Any:
+                return self.get(name)
+            provider.__name__ = f"get_{name.replace('.', '_')}"
+            self._providers[name] = provider
+        return provider
+
+    def add_warm_up_task(self, name: str, task: Callable[[], Any]):
+        """登记预热任务，在服务预热完成后依次执行"""
+        self._warm_up_tasks[name] = task
+
+    def reset(self, name: Optional[str] = None):
+        """丢弃已构造的实例（测试用），下次访问时重新构造"""
+        names = [name] if name else list(self._records)
+        for service_name in names:
+            record = self._get_record(service_name)
+            with record.lock:
+                record.instance = None
+                record.state = "pending"
+                record.init_ms = None
+                record.error = None
+
+    async def warm_up(self, names: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        在后台线程中依次构造服务，不阻塞事件循环
+
+        Args:
+            names: 要预热的服务，默认为所有参与预热的服务，并执行登记的预热任务
+
+        Returns:
+            服务名称到状态的映射
+        """
+        run_tasks = names is None
+        if names is None:
+            names = [name for name, record in self._records.items() if record.warm_up]
+
+        start = time.perf_counter()
+        results = {}
+        for name in names:
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                logger.warning(f"Service warm-up failed: {name}: {str(e)}")
+            results[name] = self.get_state(name)
+
+        if run_tasks:
+            for name, task in list(self._warm_up_tasks.items()):
+                task_start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(task)
+                except Exception as e:
+                    logger.warning(f"Warm-up task failed: {name}: {str(e)}")
+                self.record_phase(f"warm_up.{name}", time.perf_counter() - task_start)
+        self.record_phase("warm_up", time.perf_counter() - start)
+        ready = sum(1 for state in results.values() if state == "ready")
+        logger.info(f"Service warm-up completed: {ready}/{len(results)} ready")
+        return results
+
+    def schedule_warm_up(self, delay: float = 1.0) -> asyncio.Task:
+        """启动完成后延迟预热，让服务先开始接收请求"""
+        async def _run():
+            await asyncio.sleep(delay)
+            await self.warm_up()
+
+        self._warm_up_task = asyncio.create_task(_run())
+        return self._warm_up_task
+
+    async def cancel_warm_up(self):
+        if self._warm_up_task and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+            try:
+                await self._warm_up_task
+            except asyncio.CancelledError:
+                pass
+        self._warm_up_task = None
+
+    def record_phase(self, name: str, seconds: float):
+        """记录启动阶段耗时"""
+        self._phases[name] = round(seconds * 1000, 2)
+
+    @contextmanager
+    def phase(self, name: str):
+        """统计代码块耗时并记录为启动阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def get_report(self) -> Dict[str, Any]:
+        """启动耗时报告"""
+        services = {
+            name: {"state": record.state, "init_ms": record.init_ms, "error": record.error}
+            for name, record in self._records.items()
+        }
+        states = [record.state for record in self._records.values()]
+        return {
+            "phases_ms": dict(self._phases),
+            "services": services,
+            "total_services": len(states),
+            "initialized": states.count("ready"),
+            "pending": states.count("pending"),
+            "failed": states.count("failed")
+        }
+
+
+# 全局实例
+service_registry = ServiceRegistry()
+
+
+def get_service_registry() -> ServiceRegistry:
+    """获取服务注册表实例"""
+    return service_registry
+
+
+def lazy_service(name: str, factory: Callable[[], Any], warm_up: bool = True) -> LazyService:
+    """在全局注册表中注册服务，返回延迟构造的代理对象"""
+    return service_registry.register(name, factory, warm_up)
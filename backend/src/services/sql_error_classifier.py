@@ -14,6 +14,12 @@ from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import asyncio
 
+from src.services.sql_error_matcher import (
+    ClassificationCache,
+    CompiledPatternMatcher,
+    normalize_error_message
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -98,14 +104,37 @@ class ErrorFeedback:
             self.timestamp = datetime.now()
 
 
+# 关键词兜底分类，按顺序检查：(错误类型, 关键词, 错误描述, 重试策略, 置信度)
+ERROR_KEYWORD_RULES = (
+    (SQLErrorType.SYNTAX_ERROR, ('syntax', 'parse', 'unexpected', 'invalid syntax'),
+     "SQL语法错误", RetryStrategy.REGENERATE_SQL, 0.7),
+    (SQLErrorType.FIELD_NOT_EXISTS, ('column', 'field', 'unknown column', 'invalid column'),
+     "字段不存在", RetryStrategy.REGENERATE_SQL, 0.6),
+    (SQLErrorType.TABLE_NOT_EXISTS, ('table', 'relation', "doesn't exist", 'not found'),
+     "表不存在", RetryStrategy.CLARIFY_INTENT, 0.6),
+    (SQLErrorType.PERMISSION_ERROR, ('access denied', 'permission', 'privilege', 'unauthorized'),
+     "权限不足", RetryStrategy.NO_RETRY, 0.8),
+    (SQLErrorType.CONNECTION_ERROR, ('connection', 'connect', 'timeout', 'network'),
+     "连接错误", RetryStrategy.BACKOFF_RETRY, 0.7),
+)
+
+# 分类缓存中“未匹配任何规则”的标记
+_UNKNOWN = ("unknown",)
+
+
 class SQLErrorClassifier:
     """SQL错误分类器"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
         self.error_patterns = self._initialize_error_patterns()
         self.error_history: List[SQLError] = []
         self.pattern_learning_enabled = True
         
+        # 错误模式预编译为一个匹配器；分类结果按规范化错误消息缓存
+        self._matcher: Optional[CompiledPatternMatcher] = None
+        self._matcher_source: Optional[List[ErrorPattern]] = None
+        self._classification_cache = ClassificationCache(max_size=cache_size)
+        
     def _initialize_error_patterns(self) -> List[ErrorPattern]:
         """初始化错误模式"""
         return [
@@ -216,18 +245,18 @@ class SQLErrorClassifier:
             SQLError: 分类后的错误信息
         """
         try:
-            # 尝试匹配已知错误模式
-            for pattern in self.error_patterns:
-                match = re.search(pattern.pattern, error_message, re.IGNORECASE)
-                if match:
-                    sql_error = self._create_sql_error_from_pattern(
-                        pattern, error_message, sql_statement, match
-                    )
-                    self._add_to_history(sql_error)
-                    return sql_error
+            decision = self._classify_message(error_message)
             
-            # 如果没有匹配到已知模式，尝试基于关键词分类
-            sql_error = self._classify_by_keywords(error_message, sql_statement)
+            if decision[0] == "pattern":
+                _, index, match = decision
+                sql_error = self._create_sql_error_from_pattern(
+                    self.error_patterns[index], error_message, sql_statement, match
+                )
+            else:
+                # 没有匹配到已知模式，基于关键词分类
+                sql_error = self._build_keyword_error(
+                    decision[1] if decision[0] == "keyword" else None, error_message, sql_statement
+                )
             self._add_to_history(sql_error)
             return sql_error
             
@@ -241,6 +270,46 @@ class SQLErrorClassifier:
                 confidence=0.0
             )
     
+    def _get_matcher(self) -> CompiledPatternMatcher:
+        """获取预编译的匹配器，错误模式列表被替换或增删后重新编译并清空分类缓存"""
+        if (self._matcher is None or self._matcher_source is not self.error_patterns
+                or len(self._matcher) != len(self.error_patterns)):
+            self._matcher = CompiledPatternMatcher([pattern.pattern for pattern in self.error_patterns])
+            self._matcher_source = self.error_patterns
+            self._classification_cache.clear()
+        return self._matcher
+    
+    def _classify_message(self, error_message: str) -> tuple:
+        """
+        确定错误消息命中的规则
+        
+        Returns:
+            ("pattern", 模式下标, 匹配对象) / ("keyword", 关键词规则下标) / ("unknown",)
+        """
+        matcher = self._get_matcher()
+        normalized = normalize_error_message(error_message)
+        decision = self._classification_cache.get(normalized)
+        if decision is not None:
+            return decision
+        
+        matched = matcher.match(normalized)
+        if matched is not None:
+            decision = ("pattern", matched[0], matched[1])
+        else:
+            keyword_index = self._match_keywords(normalized)
+            decision = ("keyword", keyword_index) if keyword_index is not None else _UNKNOWN
+        
+        self._classification_cache.put(normalized, decision)
+        return decision
+    
+    def _match_keywords(self, error_message: str) -> Optional[int]:
+        """返回第一个命中的关键词规则下标"""
+        error_message_lower = error_message.lower()
+        for index, (_, keywords, _, _, _) in enumerate(ERROR_KEYWORD_RULES):
+            if any(keyword in error_message_lower for keyword in keywords):
+                return index
+        return None
+    
     def _create_sql_error_from_pattern(
         self, 
         pattern: ErrorPattern, 
@@ -275,76 +344,33 @@ class SQLErrorClassifier:
     
     def _classify_by_keywords(self, error_message: str, sql_statement: str) -> SQLError:
         """基于关键词分类错误"""
-        error_message_lower = error_message.lower()
-        
-        # 语法错误关键词
-        syntax_keywords = ['syntax', 'parse', 'unexpected', 'invalid syntax']
-        if any(keyword in error_message_lower for keyword in syntax_keywords):
-            return SQLError(
-                error_type=SQLErrorType.SYNTAX_ERROR,
-                original_error=error_message,
-                error_message="SQL语法错误",
-                sql_statement=sql_statement,
-                retry_strategy=RetryStrategy.REGENERATE_SQL,
-                confidence=0.7
-            )
-        
-        # 字段不存在关键词
-        field_keywords = ['column', 'field', 'unknown column', 'invalid column']
-        if any(keyword in error_message_lower for keyword in field_keywords):
-            return SQLError(
-                error_type=SQLErrorType.FIELD_NOT_EXISTS,
-                original_error=error_message,
-                error_message="字段不存在",
-                sql_statement=sql_statement,
-                retry_strategy=RetryStrategy.REGENERATE_SQL,
-                confidence=0.6
-            )
-        
-        # 表不存在关键词
-        table_keywords = ['table', 'relation', "doesn't exist", 'not found']
-        if any(keyword in error_message_lower for keyword in table_keywords):
-            return SQLError(
-                error_type=SQLErrorType.TABLE_NOT_EXISTS,
-                original_error=error_message,
-                error_message="表不存在",
-                sql_statement=sql_statement,
-                retry_strategy=RetryStrategy.CLARIFY_INTENT,
-                confidence=0.6
-            )
-        
-        # 权限错误关键词
-        permission_keywords = ['access denied', 'permission', 'privilege', 'unauthorized']
-        if any(keyword in error_message_lower for keyword in permission_keywords):
+        return self._build_keyword_error(self._match_keywords(error_message), error_message, sql_statement)
+    
+    def _build_keyword_error(
+        self,
+        rule_index: Optional[int],
+        error_message: str,
+        sql_statement: str
+    ) -> SQLError:
+        """按命中的关键词规则创建SQL错误对象，未命中时为未知错误"""
+        if rule_index is None:
             return SQLError(
-                error_type=SQLErrorType.PERMISSION_ERROR,
+                error_type=SQLErrorType.UNKNOWN_ERROR,
                 original_error=error_message,
-                error_message="权限不足",
+                error_message="未知错误",
                 sql_statement=sql_statement,
                 retry_strategy=RetryStrategy.NO_RETRY,
-                confidence=0.8
-            )
-        
-        # 连接错误关键词
-        connection_keywords = ['connection', 'connect', 'timeout', 'network']
-        if any(keyword in error_message_lower for keyword in connection_keywords):
-            return SQLError(
-                error_type=SQLErrorType.CONNECTION_ERROR,
-                original_error=error_message,
-                error_message="连接错误",
-                sql_statement=sql_statement,
-                retry_strategy=RetryStrategy.BACKOFF_RETRY,
-                confidence=0.7
+                confidence=0.0
             )
         
-        # 默认未知错误
+        error_type, _, description, retry_strategy, confidence = ERROR_KEYWORD_RULES[rule_index]
         return SQLError(
-            error_type=SQLErrorType.UNKNOWN_ERROR,
+            error_type=error_type,
             original_error=error_message,
-            error_message="未知错误",
+            error_message=description,
             sql_statement=sql_statement,
-            retry_strategy=RetryStrategy.NO_RETRY,
-            confidence=0.0
+            retry_strategy=retry_strategy,
+            confidence=confidence
         )
     
     def _determine_retry_strategy(self, error_type: SQLErrorType) -> RetryStrategy:
@@ -389,7 +415,8 @@ class SQLErrorClassifier:
             "total_errors": len(self.error_history),
             "error_counts": error_counts,
             "recent_errors_24h": len(recent_errors),
-            "most_common_error": max(error_counts.items(), key=lambda x: x[1])[0] if error_counts else None
+            "most_common_error": max(error_counts.items(), key=lambda x: x[1])[0] if error_counts else None,
+            "classification_cache": self._classification_cache.get_stats()
         }
     
     def learn_from_error_pattern(self, error_message: str, correct_classification: SQLErrorType):
@@ -400,12 +427,12 @@ class SQLErrorClassifier:
         # 简单的学习机制：如果分类错误，降低对应模式的置信度
         classified_error = self.classify_error(error_message, "")
         if classified_error.error_type != correct_classification:
-            # 找到匹配的模式并降低置信度
-            for pattern in self.error_patterns:
-                if re.search(pattern.pattern, error_message, re.IGNORECASE):
-                    pattern.confidence = max(0.1, pattern.confidence - 0.1)
-                    logger.info(f"Reduced confidence for pattern: {pattern.pattern}")
-                    break
+            # 找到匹配的模式并降低置信度（置信度在创建错误对象时读取，无需清空分类缓存）
+            matched = self._get_matcher().match(normalize_error_message(error_message))
+            if matched is not None:
+                pattern = self.error_patterns[matched[0]]
+                pattern.confidence = max(0.1, pattern.confidence - 0.1)
+                logger.info(f"Reduced confidence for pattern: {pattern.pattern}")
 
 
 class SQLErrorRetryHandler:
@@ -8,6 +8,7 @@ SQL错误反馈学习循环服务
 4. 错误知识库的构建和维护
 """
 
+import hashlib
 import json
 import logging
 from typing import Dict, List, Optional, Any, Tuple
@@ -27,6 +28,18 @@ from .sql_error_classifier import (
 
 logger = logging.getLogger(__name__)
 
+# 泛化错误消息：引号中的标识符和数字替换为占位符
+_QUOTED_IDENTIFIER = re.compile(r"'[^']*'")
+_BACKTICK_IDENTIFIER = re.compile(r"`[^`]*`")
+_NUMBER = re.compile(r'\b\d+\b')
+_WORD = re.compile(r'\b\w+\b')
+
+
+def pattern_feature_key(error_type: SQLErrorType, message_pattern: str) -> str:
+    """错误模式的特征哈希（错误类型 + 泛化后的错误消息）"""
+    digest = hashlib.sha1(f"{error_type.value}\x00{message_pattern}".encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
 
 class LearningType(Enum):
     """学习类型枚举"""
@@ -91,6 +104,9 @@ class ErrorPatternLearner:
     
     def __init__(self):
         self.error_patterns: Dict[str, ErrorPattern] = {}
+        # 特征哈希 -> 模式ID，查找现有模式时不再遍历全部模式
+        self._pattern_index: Dict[str, str] = {}
+        self._indexed_count = 0
         self.pattern_counter = 0
         self.min_frequency_threshold = 3  # 最小频率阈值
         self.confidence_threshold = 0.7   # 置信度阈值
@@ -133,6 +149,7 @@ class ErrorPatternLearner:
                 new_pattern = self._create_new_pattern(error_features, sql_error)
                 if new_pattern:
                     self.error_patterns[new_pattern.pattern_id] = new_pattern
+                    self._index_pattern(new_pattern)
                     logger.info(f"Created new error pattern: {new_pattern.pattern_id}")
                     return new_pattern
             
@@ -160,11 +177,11 @@ class ErrorPatternLearner:
         generalized = error_message
         
         # 替换引号中的内容为占位符
-        generalized = re.sub(r"'[^']*'", "'<IDENTIFIER>'", generalized)
-        generalized = re.sub(r"`[^`]*`", "`<IDENTIFIER>`", generalized)
+        generalized = _QUOTED_IDENTIFIER.sub("'<IDENTIFIER>'", generalized)
+        generalized = _BACKTICK_IDENTIFIER.sub("`<IDENTIFIER>`", generalized)
         
         # 替换数字为占位符
-        generalized = re.sub(r'\b\d+\b', '<NUMBER>', generalized)
+        generalized = _NUMBER.sub('<NUMBER>', generalized)
         
         return generalized
     
@@ -191,7 +208,7 @@ class ErrorPatternLearner:
         original_question = context.get("original_question", "")
         if original_question:
             # 简单的关键词提取（实际应用中可以使用更复杂的NLP技术）
-            words = re.findall(r'\b\w+\b', original_question.lower())
+            words = _WORD.findall(original_question.lower())
             keywords.extend([word for word in words if len(word) > 3])
         
         # 从表名和字段名中提取
@@ -201,13 +218,38 @@ class ErrorPatternLearner:
         return list(set(keywords))
     
     def _find_matching_pattern(self, error_features: Dict[str, Any]) -> Optional[ErrorPattern]:
-        """查找匹配的现有模式"""
-        for pattern in self.error_patterns.values():
-            if (pattern.error_type == error_features["error_type"] and
+        """按特征哈希查找匹配的现有模式"""
+        key = pattern_feature_key(error_features["error_type"], error_features["error_message_pattern"])
+        
+        # 模式字典被直接增删或修改（如导入学习数据）后重建索引
+        pattern = self._lookup_pattern(key)
+        if pattern is None and self._indexed_count != len(self.error_patterns):
+            self._rebuild_index()
+            pattern = self._lookup_pattern(key)
+        
+        if (pattern is not None and
+                pattern.error_type == error_features["error_type"] and
                 pattern.pattern_regex == error_features["error_message_pattern"]):
-                return pattern
+            return pattern
         return None
     
+    def _lookup_pattern(self, key: str) -> Optional[ErrorPattern]:
+        pattern_id = self._pattern_index.get(key)
+        return self.error_patterns.get(pattern_id) if pattern_id is not None else None
+    
+    def _index_pattern(self, pattern: ErrorPattern):
+        self._pattern_index.setdefault(pattern_feature_key(pattern.error_type, pattern.pattern_regex), pattern.pattern_id)
+        self._indexed_count = len(self.error_patterns)
+    
+    def _rebuild_index(self):
+        """按模式字典重建特征哈希索引（相同特征保留先创建的模式，与原先的线性查找一致）"""
+        self._pattern_index = {}
+        for pattern in self.error_patterns.values():
+            self._pattern_index.setdefault(
+                pattern_feature_key(pattern.error_type, pattern.pattern_regex), pattern.pattern_id
+            )
+        self._indexed_count = len(self.error_patterns)
+    
     def _create_new_pattern(self, error_features: Dict[str, Any], sql_error: SQLError) -> Optional[ErrorPattern]:
         """创建新的错误模式"""
         self.pattern_counter += 1
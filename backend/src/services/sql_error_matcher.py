@@ -0,0 +1,161 @@
+"""
+SQL错误消息匹配
+
+SQL错误分类（sql_error_classifier、sql_recovery_service）共用的匹配组件：
+
+- CompiledPatternMatcher：有序的错误模式在构造时一次性编译，并为每个模式提取必须出现的字面量前缀
+  （不区分大小写）。匹配时先对小写消息做一次子串检查，只有字面量出现的模式才执行正则，
+  仍按列表顺序返回第一个命中的模式，结果与逐个 re.search 完全一致
+- ClassificationCache：按规范化后的错误消息缓存分类结果。数据源宕机等错误风暴中，
+  同一条错误消息会在短时间内重复出现成百上千次，命中缓存后不再执行任何正则
+
+把全部模式拼成一个 ``(p1)|(p2)|...`` 组合正则只能返回消息中最靠左的匹配，
+要保持“列表靠前的模式优先”需要给每个分支加 ``[\\s\\S]*?`` 前缀，实测比逐个匹配还慢，因此采用字面量预筛选。
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+_METACHARACTERS = set('.^$*+?{}[]|()\\')
+
+# 超过该长度的错误消息（通常带有完整SQL或堆栈）不进入缓存
+MAX_CACHED_MESSAGE_LENGTH = 2048
+
+
+def normalize_error_message(error_message: str) -> str:
+    """规范化错误消息：去掉首尾空白，连续空白（含换行）合并为一个空格"""
+    return ' '.join((error_message or '').split())
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    提取正则模式必须出现的字面量前缀（小写）
+
+    模式含分支（|）、以分组或字符类开头、或前缀中含非ASCII字符时返回空字符串，表示不做预筛选
+    """
+    if _has_top_level_alternation(pattern):
+        return ''
+
+    chars: List[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            escaped = pattern[index + 1:index + 2]
+            if not escaped or escaped.isalnum():
+                break
+            chars.append(escaped)
+            index += 2
+            continue
+        if char in _METACHARACTERS:
+            break
+        chars.append(char)
+        index += 1
+
+    # 紧跟 ? * { 的最后一个字符不是必须出现的
+    if chars and index < len(pattern) and pattern[index] in '?*{':
+        chars.pop()
+
+    prefix = ''.join(chars).lower()
+    return prefix if prefix.isascii() else ''
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    escaped = False
+    in_class = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '|':
+            return True
+    return False
+
+
+class CompiledPatternMatcher:
+    """预编译的有序错误模式匹配器（不区分大小写）"""
+
+    def __init__(self, patterns: Sequence[str]):
+        """
+        编译错误模式
+
+        Args:
+            patterns: 按优先级排列的正则模式
+        """
+        self.patterns = tuple(patterns)
+        self._compiled = tuple(re.compile(pattern, re.IGNORECASE) for pattern in self.patterns)
+        self._literals = tuple(literal_prefix(pattern) for pattern in self.patterns)
+
+    def match(self, error_message: str) -> Optional[Tuple[int, re.Match]]:
+        """
+        按顺序匹配错误消息
+
+        Returns:
+            (模式下标, 匹配对象)，没有模式命中时返回None
+        """
+        lowered = error_message.lower()
+        for index, literal in enumerate(self._literals):
+            if literal and literal not in lowered:
+                continue
+            match = self._compiled[index].search(error_message)
+            if match:
+                return index, match
+        return None
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+
+class ClassificationCache:
+    """按规范化错误消息缓存分类结果的线程安全LRU"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if isinstance(key, str) and len(key) > MAX_CACHED_MESSAGE_LENGTH:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
@@ -7,6 +7,7 @@ import uuid
 from src.models.database_models import ConversationMessage, Role, ModelUsed
 from src.qwen_integration import QwenIntegration
 from src.utils import get_db_session
+from src.services.multi_turn_handler import multi_turn_handler
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -22,15 +23,26 @@ class SQLErrorRecoveryService:
         self.max_retries = 3
         logger.info("SQLErrorRecoveryService initialized with max_retries=3")
     
-    def execute_with_retry(self, session_id: str, user_question: str, sql: str, data_source_id: str) -> Dict[str, Any]:
+    def execute_with_retry(
+        self,
+        session_id: str,
+        user_question: str,
+        sql: str,
+        data_source_id: str,
+        candidate_sqls: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         执行SQL并处理错误，支持自动重试（最多3次）
         
+        提供了多候选生成的备选SQL时，执行失败后先改用下一个未尝试的候选，
+        候选用完后才调用模型修复SQL
+        
         Args:
             session_id: 会话ID
             user_question: 用户原始问题
             sql: 要执行的SQL语句
             data_source_id: 数据源ID
+            candidate_sqls: 按评分排序的其他已验证候选SQL
             
         Returns:
             Dict[str, Any]: 包含执行结果的字典
@@ -77,6 +89,8 @@ class SQLErrorRecoveryService:
         # 记录第一次尝试
         self.record_retry_result(session_id, 1, sql, False, "Initial attempt")
         
+        remaining_candidates = [candidate for candidate in (candidate_sqls or []) if candidate and candidate != sql]
+        
         for attempt in range(1, self.max_retries + 1):
             try:
                 logger.info(f"Attempt {attempt} to execute SQL: {sql[:100]}...")
@@ -113,6 +127,12 @@ class SQLErrorRecoveryService:
                         'sql': sql
                     }
                 
+                # 还有未尝试的候选时直接改用下一个，不调用模型
+                if remaining_candidates:
+                    sql = remaining_candidates.pop(0)
+                    logger.info(f"Switching to next SQL candidate for attempt {attempt + 1}: {sql[:100]}...")
+                    continue
+                
                 # 尝试使用模型修复SQL
                 logger.info(f"Attempting to fix SQL with model for attempt {attempt + 1}")
                 fixed_sql = self.retry_with_model(session_id, user_question, sql, error_msg, data_source_id)
@@ -272,23 +292,22 @@ class SQLErrorRecoveryService:
             error_message: 错误信息
         """
         try:
-            # 创建对话消息记录
-            conversation_message = ConversationMessage(
-                session_id=session_id,
-                turn=attempt_number,
+            # 使用 SQLAlchemy 会话保存到数据库，与 context_manager.py 保持一致；
+            # turn由会话统一分配，尝试次数保存在query_id中（重试记录没有查询ID）
+            db = next(get_db_session())
+            multi_turn_handler.insert_message(
+                db,
+                session_id,
                 role=Role.assistant,
                 content=sql,
                 token_count=0,
                 model_used=ModelUsed.none,
                 intent="error_recovery",
-                query_id="",
-                analysis_id=""
+                query_id=str(attempt_number),
+                analysis_id="",
+                error_message=None if success else error_message
             )
-            
-            # 使用 SQLAlchemy 会话保存到数据库，与 context_manager.py 保持一致
-            db = next(get_db_session())
-            db.add(conversation_message)
-            db.commit()
+            multi_turn_handler.invalidate_session(session_id)
             
             logger.info(f"Recorded retry result for session {session_id}, attempt {attempt_number}, success: {success}")
             
@@ -320,9 +339,9 @@ class SQLErrorRecoveryService:
                     "generated_sql": msg.content,  # 在ConversationMessage中，content就是SQL语句
                     "chart_type": "error_recovery",
                     "result_data": {
-                        "attempt_number": msg.turn,
-                        "success": True,  # 由于我们只记录了SQL，无法知道是否成功，这里默认为True
-                        "error_message": "",
+                        "attempt_number": int(msg.query_id) if (msg.query_id or "").isdigit() else msg.turn,
+                        "success": not msg.error_message,
+                        "error_message": msg.error_message or "",
                         "timestamp": msg.created_at.isoformat() if msg.created_at else None
                     },
                     "created_at": msg.created_at.isoformat() if msg.created_at else None
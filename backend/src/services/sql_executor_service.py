@@ -15,6 +15,19 @@ from enum import Enum
 from datetime import datetime
 from contextlib import asynccontextmanager
 
+from src.services.query_cost_estimator import QueryCostEstimator, CostEstimatorConfig, CostEstimate, CostAction
+from src.services.sql_limit_rewriter import SQLLimitRewriter
+from src.services.keyset_pagination import KeysetPaginator, InvalidCursorError
+from src.services.local_olap_store import get_local_olap_store
+from src.services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    CircuitState,
+    data_source_breaker_key,
+    get_circuit_breaker_registry
+)
+
 logger = logging.getLogger(__name__)
 
 # 可选的数据库驱动
@@ -38,6 +51,7 @@ class DatabaseType(Enum):
     MYSQL = "mysql"
     SQLSERVER = "sqlserver"
     POSTGRESQL = "postgresql"
+    EMBEDDED = "embedded"  # 上传文件的本地嵌入式分析存储
 
 
 @dataclass
@@ -49,6 +63,8 @@ class ExecutionConfig:
     enable_streaming: bool = True
     page_size: int = 1000
     max_concurrent_queries: int = 10
+    enable_cost_check: bool = False  # 执行前通过EXPLAIN预估成本
+    enforce_row_limit: bool = True   # 在SQL中注入行数限制，由数据库提前结束计算
 
 
 @dataclass
@@ -74,6 +90,9 @@ class ExecutionStatistics:
     average_execution_time: float = 0.0
     total_rows_returned: int = 0
     cache_hits: int = 0
+    limited_queries: int = 0
+    truncated_queries: int = 0
+    circuit_rejected_queries: int = 0
 
 
 class SQLExecutionError(Exception):
@@ -84,13 +103,72 @@ class SQLExecutionError(Exception):
         self.original_error = original_error
 
 
+# 元数据库中的数据库类型名称到执行器类型的映射
+DB_TYPE_MAPPING = {
+    'MYSQL': DatabaseType.MYSQL,
+    'SQLSERVER': DatabaseType.SQLSERVER,
+    'SQL SERVER': DatabaseType.SQLSERVER,
+    'POSTGRESQL': DatabaseType.POSTGRESQL,
+}
+
+
+def build_data_source_config(data_source) -> Dict[str, Any]:
+    """
+    将DataSource模型转换为执行器使用的数据源配置
+    
+    Args:
+        data_source: DataSource对象
+        
+    Returns:
+        Dict[str, Any]: 数据源配置
+    """
+    from src.utils.encryption import decrypt_password
+    
+    # 文件数据源在本地嵌入式存储中查询
+    if getattr(data_source, 'source_type', None) == 'FILE':
+        return {
+            'type': DatabaseType.EMBEDDED.value,
+            'database': str(data_source.id)
+        }
+    
+    db_type = DB_TYPE_MAPPING.get((data_source.db_type or '').upper())
+    if db_type is None:
+        raise SQLExecutionError(f"不支持的数据库类型: {data_source.db_type}", error_code="UNSUPPORTED_DATABASE")
+    
+    return {
+        'type': db_type.value,
+        'host': data_source.host,
+        'port': data_source.port,
+        'username': data_source.username,
+        'password': decrypt_password(data_source.password) if data_source.password else '',
+        'database': data_source.database_name
+    }
+
+
 class SQLExecutorService:
     """SQL执行服务"""
     
-    def __init__(self, config: ExecutionConfig = None):
+    def __init__(
+        self,
+        config: ExecutionConfig = None,
+        cost_config: CostEstimatorConfig = None,
+        circuit_breakers: CircuitBreakerRegistry = None
+    ):
         """初始化SQL执行服务"""
         self.config = config or ExecutionConfig()
         
+        # 按数据源熔断，数据源不可用时直接失败，不占用并发名额和线程
+        self.circuit_breakers = circuit_breakers or get_circuit_breaker_registry()
+        
+        # 执行前成本预估
+        self.cost_estimator = QueryCostEstimator(cost_config)
+        
+        # 行数限制改写
+        self.limit_rewriter = SQLLimitRewriter()
+        
+        # 键集分页
+        self.keyset_paginator = KeysetPaginator(self.limit_rewriter)
+        
         # 并发控制
         self._semaphore = asyncio.Semaphore(self.config.max_concurrent_queries)
         self._active_queries = 0
@@ -135,54 +213,206 @@ class SQLExecutorService:
                 self.stats.cache_hits += 1
                 return cached_result
         
-        # 并发控制
-        async with self._semaphore:
-            self._active_queries += 1
-            self.stats.total_queries += 1
-            
+        # 数据源熔断中时直接失败，不等待连接超时
+        breaker = self._get_circuit_breaker(data_source_config)
+        if breaker is not None:
             try:
-                logger.info(f"开始执行SQL查询: {sql[:100]}...")
+                breaker.acquire()
+            except CircuitOpenError as e:
+                self.stats.circuit_rejected_queries += 1
+                logger.warning(f"数据源熔断中，拒绝执行: {breaker.name}")
+                raise SQLExecutionError(
+                    f"数据源暂时不可用，请{max(e.retry_after, 1):.0f}秒后重试",
+                    error_code="CIRCUIT_OPEN",
+                    original_error=e
+                )
+        outcome_recorded = False
+        
+        try:
+            # 并发控制
+            async with self._semaphore:
+                self._active_queries += 1
+                self.stats.total_queries += 1
+            
+                try:
+                    logger.info(f"开始执行SQL查询: {sql[:100]}...")
                 
-                # 根据数据库类型选择执行方法
-                db_type = DatabaseType(data_source_config.get('type', 'mysql'))
+                    # 根据数据库类型选择执行方法
+                    db_type = DatabaseType(data_source_config.get('type', 'mysql'))
                 
-                if stream and self.config.enable_streaming:
-                    # 流式执行（暂不实现，返回普通结果）
-                    result = await self._execute_with_timeout(sql, data_source_config, db_type)
-                else:
-                    # 普通执行
-                    result = await self._execute_with_timeout(sql, data_source_config, db_type)
+                    # 执行前成本预估
+                    cost_estimate = None
+                    row_limit = self.config.max_rows
+                    if self.config.enable_cost_check:
+                        cost_estimate = await self._apply_cost_check(sql, data_source_config)
+                        if cost_estimate.action == CostAction.ADD_LIMIT:
+                            row_limit = min(row_limit, cost_estimate.suggested_limit)
                 
-                # 更新统计信息
-                self.stats.successful_queries += 1
-                self.stats.total_rows_returned += result.row_count
-                self._update_avg_execution_time(result.execution_time)
+                    # 多取一行用于判断结果是否被截断
+                    limit_info = None
+                    if self.config.enforce_row_limit:
+                        limit_info = self.limit_rewriter.apply_limit(sql, row_limit + 1, db_type)
+                        sql = limit_info.sql
                 
-                # 缓存结果
-                if use_cache:
-                    self._put_to_cache(cache_key, result)
+                    if stream and self.config.enable_streaming:
+                        # 流式执行（暂不实现，返回普通结果）
+                        result = await self._execute_with_timeout(sql, data_source_config, db_type)
+                    else:
+                        # 普通执行
+                        result = await self._execute_with_timeout(sql, data_source_config, db_type)
                 
-                logger.info(f"SQL查询完成，返回 {result.row_count} 行，耗时: {result.execution_time:.2f}s")
-                return result
+                    if breaker is not None:
+                        breaker.record_success()
+                        outcome_recorded = True
                 
-            except asyncio.TimeoutError:
-                self.stats.timeout_queries += 1
-                self.stats.failed_queries += 1
-                logger.error(f"SQL查询超时: {self.config.timeout_seconds}秒")
-                raise SQLExecutionError(
-                    f"查询超时（{self.config.timeout_seconds}秒）",
-                    error_code="TIMEOUT"
-                )
-            except Exception as e:
-                self.stats.failed_queries += 1
-                logger.error(f"SQL查询失败: {str(e)}", exc_info=True)
-                raise SQLExecutionError(
-                    f"查询执行失败: {str(e)}",
-                    error_code="EXECUTION_ERROR",
-                    original_error=e
-                )
-            finally:
-                self._active_queries -= 1
+                    if limit_info is not None:
+                        self._record_row_limit(result, limit_info, row_limit)
+                    if cost_estimate is not None:
+                        result.metadata = {**(result.metadata or {}), 'cost_estimate': cost_estimate.to_dict()}
+                
+                    # 更新统计信息
+                    self.stats.successful_queries += 1
+                    self.stats.total_rows_returned += result.row_count
+                    self._update_avg_execution_time(result.execution_time)
+                
+                    # 缓存结果
+                    if use_cache:
+                        self._put_to_cache(cache_key, result)
+                
+                    logger.info(f"SQL查询完成，返回 {result.row_count} 行，耗时: {result.execution_time:.2f}s")
+                    return result
+                
+                except asyncio.TimeoutError:
+                    # 查询超时通常是慢查询，不计入熔断（未记录结果，finally中归还探测名额）；
+                    # 连接超时由驱动包装为CONNECTION_ERROR，在下面计入
+                    self.stats.timeout_queries += 1
+                    self.stats.failed_queries += 1
+                    logger.error(f"SQL查询超时: {self.config.timeout_seconds}秒")
+                    raise SQLExecutionError(
+                        f"查询超时（{self.config.timeout_seconds}秒）",
+                        error_code="TIMEOUT"
+                    )
+                except Exception as e:
+                    self.stats.failed_queries += 1
+                    if breaker is not None and not outcome_recorded:
+                        # 只有连接失败计入熔断，SQL错误说明数据库本身可用
+                        if self._is_connection_failure(e):
+                            breaker.record_failure(e)
+                        else:
+                            breaker.record_success()
+                        outcome_recorded = True
+                    if isinstance(e, SQLExecutionError) and e.error_code == "QUERY_TOO_EXPENSIVE":
+                        logger.warning(f"查询预估成本过高，已拒绝执行: {str(e)}")
+                        raise
+                    logger.error(f"SQL查询失败: {str(e)}", exc_info=True)
+                    raise SQLExecutionError(
+                        f"查询执行失败: {str(e)}",
+                        error_code="EXECUTION_ERROR",
+                        original_error=e
+                    )
+                finally:
+                    self._active_queries -= 1
+        finally:
+            # 等待并发名额时被取消（客户端断开、外层超时）也要归还半开探测名额，
+            # 否则熔断器一直拒绝请求且没有探测请求能关闭它
+            if breaker is not None and not outcome_recorded:
+                breaker.release()
+    
+    def _get_circuit_breaker(self, data_source_config: Dict[str, Any]) -> Optional[CircuitBreaker]:
+        """获取数据源的熔断器，本地嵌入式存储不熔断"""
+        if data_source_config.get('type') == DatabaseType.EMBEDDED.value:
+            return None
+        return self.circuit_breakers.get(data_source_breaker_key(
+            data_source_config.get('host'),
+            data_source_config.get('port'),
+            data_source_config.get('database')
+        ))
+    
+    @staticmethod
+    def _is_connection_failure(error: BaseException) -> bool:
+        """
+        判断异常是否为无法连接数据源（沿original_error链查找CONNECTION_ERROR或网络连接异常）
+        
+        查询执行中的超时不算连接失败；建立连接时的超时由驱动包装为CONNECTION_ERROR
+        """
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, SQLExecutionError):
+                if error.error_code == "CONNECTION_ERROR":
+                    return True
+                error = error.original_error
+            else:
+                return isinstance(error, ConnectionError)
+        return False
+    
+    async def estimate_query_cost(
+        self,
+        sql: str,
+        data_source_config: Dict[str, Any]
+    ) -> CostEstimate:
+        """
+        通过EXPLAIN预估查询成本（不执行查询）
+        
+        Args:
+            sql: SQL查询语句
+            data_source_config: 数据源配置
+            
+        Returns:
+            CostEstimate: 成本预估结果
+        """
+        return await self.cost_estimator.estimate(sql, data_source_config)
+    
+    async def _apply_cost_check(
+        self,
+        sql: str,
+        data_source_config: Dict[str, Any]
+    ) -> CostEstimate:
+        """执行前检查成本，代价过高时拒绝执行"""
+        estimate = await self.estimate_query_cost(sql, data_source_config)
+        
+        if estimate.action == CostAction.CLARIFY:
+            raise SQLExecutionError(
+                self.cost_estimator.build_clarification_question(estimate),
+                error_code="QUERY_TOO_EXPENSIVE"
+            )
+        if estimate.action == CostAction.ADD_LIMIT:
+            logger.info(f"预估结果行数过大，将限制返回行数: {estimate.suggested_limit}")
+        
+        return estimate
+    
+    def add_row_limit(self, sql: str, limit: int, db_type: DatabaseType) -> str:
+        """
+        为SQL注入行数限制（已有更小的限制时保持不变）
+        
+        Args:
+            sql: SQL查询语句
+            limit: 最大行数
+            db_type: 数据库类型
+            
+        Returns:
+            str: 添加限制后的SQL
+        """
+        return self.limit_rewriter.apply_limit(sql, limit, db_type).sql
+    
+    def _record_row_limit(self, result: QueryResult, limit_info, row_limit: int):
+        """根据注入的行数限制裁剪多取的一行，并记录截断信息"""
+        if limit_info.rewritten:
+            self.stats.limited_queries += 1
+        
+        if len(result.rows) > row_limit:
+            result.rows = result.rows[:row_limit]
+            result.row_count = len(result.rows)
+            result.is_truncated = True
+            result.has_more = True
+        
+        if result.is_truncated:
+            self.stats.truncated_queries += 1
+        
+        result.metadata = {
+            **(result.metadata or {}),
+            'row_limit': {**limit_info.to_dict(), 'max_rows': row_limit, 'truncated': result.is_truncated}
+        }
     
     async def _execute_with_timeout(
         self,
@@ -217,6 +447,8 @@ class SQLExecutorService:
             result = await self._execute_sqlserver(sql, data_source_config)
         elif db_type == DatabaseType.POSTGRESQL:
             result = await self._execute_postgresql(sql, data_source_config)
+        elif db_type == DatabaseType.EMBEDDED:
+            result = await self._execute_embedded(sql, data_source_config)
         else:
             raise SQLExecutionError(f"不支持的数据库类型: {db_type}")
         
@@ -265,16 +497,19 @@ class SQLExecutorService:
         connection = None
         try:
             # 建立连接
-            connection = pymysql.connect(
-                host=config.get('host', 'localhost'),
-                port=config.get('port', 3306),
-                user=config.get('username', 'root'),
-                password=config.get('password', ''),
-                database=config.get('database', ''),
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor,
-                connect_timeout=10
-            )
+            try:
+                connection = pymysql.connect(
+                    host=config.get('host', 'localhost'),
+                    port=config.get('port', 3306),
+                    user=config.get('username', 'root'),
+                    password=config.get('password', ''),
+                    database=config.get('database', ''),
+                    charset='utf8mb4',
+                    cursorclass=pymysql.cursors.DictCursor,
+                    connect_timeout=10
+                )
+            except pymysql.err.OperationalError as e:
+                raise SQLExecutionError(f"无法连接MySQL: {str(e)}", error_code="CONNECTION_ERROR", original_error=e)
             
             with connection.cursor() as cursor:
                 # 执行查询
@@ -353,14 +588,17 @@ class SQLExecutorService:
         connection = None
         try:
             # 建立连接
-            connection = pymssql.connect(
-                server=config.get('host', 'localhost'),
-                port=config.get('port', 1433),
-                user=config.get('username', 'sa'),
-                password=config.get('password', ''),
-                database=config.get('database', ''),
-                timeout=10
-            )
+            try:
+                connection = pymssql.connect(
+                    server=config.get('host', 'localhost'),
+                    port=config.get('port', 1433),
+                    user=config.get('username', 'sa'),
+                    password=config.get('password', ''),
+                    database=config.get('database', ''),
+                    timeout=10
+                )
+            except (pymssql.OperationalError, pymssql.InterfaceError) as e:
+                raise SQLExecutionError(f"无法连接SQL Server: {str(e)}", error_code="CONNECTION_ERROR", original_error=e)
             
             cursor = connection.cursor(as_dict=True)
             
@@ -416,21 +654,68 @@ class SQLExecutorService:
             error_code="NOT_IMPLEMENTED"
         )
     
+    async def _execute_embedded(
+        self,
+        sql: str,
+        config: Dict[str, Any]
+    ) -> QueryResult:
+        """在本地嵌入式分析存储上执行查询"""
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                None,
+                self._execute_embedded_sync,
+                sql,
+                config
+            )
+        except Exception as e:
+            logger.error(f"本地分析存储查询失败: {str(e)}")
+            raise SQLExecutionError(
+                f"本地分析存储查询失败: {str(e)}",
+                error_code="EMBEDDED_ERROR",
+                original_error=e
+            )
+    
+    def _execute_embedded_sync(
+        self,
+        sql: str,
+        config: Dict[str, Any]
+    ) -> QueryResult:
+        """同步执行本地分析存储查询"""
+        store = get_local_olap_store()
+        columns, rows, is_truncated = store.execute(config['database'], sql, max_rows=self.config.max_rows)
+        
+        return QueryResult(
+            columns=columns,
+            rows=rows,
+            row_count=len(rows),
+            execution_time=0.0,  # 将在外部设置
+            is_truncated=is_truncated,
+            has_more=is_truncated,
+            metadata={
+                'database_type': 'embedded',
+                'engine': store.engine,
+                'max_rows_limit': self.config.max_rows
+            }
+        )
+    
     async def execute_query_paginated(
         self,
         sql: str,
         data_source_config: Dict[str, Any],
         page: int = 1,
-        page_size: int = None
+        page_size: int = None,
+        order_columns: Optional[List[str]] = None
     ) -> QueryResult:
         """
-        分页执行查询
+        分页执行查询（OFFSET分页）
         
         Args:
             sql: SQL查询语句
             data_source_config: 数据源配置
             page: 页码（从1开始）
             page_size: 每页大小
+            order_columns: 唯一排序键，查询没有ORDER BY时用于保证分页结果确定
             
         Returns:
             QueryResult: 查询结果（包含分页信息）
@@ -440,7 +725,7 @@ class SQLExecutorService:
         
         # 修改SQL添加分页
         db_type = DatabaseType(data_source_config.get('type', 'mysql'))
-        paginated_sql = self._add_pagination_to_sql(sql, offset, page_size, db_type)
+        paginated_sql = self._add_pagination_to_sql(sql, offset, page_size, db_type, order_columns)
         
         # 执行查询
         result = await self.execute_query(paginated_sql, data_source_config, use_cache=False)
@@ -460,40 +745,146 @@ class SQLExecutorService:
         sql: str,
         offset: int,
         limit: int,
-        db_type: DatabaseType
+        db_type: DatabaseType,
+        order_columns: Optional[List[str]] = None
     ) -> str:
-        """为SQL添加分页"""
-        sql = sql.rstrip(';').strip()
-        
-        if db_type == DatabaseType.MYSQL or db_type == DatabaseType.POSTGRESQL:
-            return f"{sql} LIMIT {limit} OFFSET {offset};"
-        elif db_type == DatabaseType.SQLSERVER:
-            # SQL Server使用OFFSET FETCH
-            if 'ORDER BY' not in sql.upper():
-                # 如果没有ORDER BY，添加一个默认的
-                sql += " ORDER BY (SELECT NULL)"
-            return f"{sql} OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY;"
-        else:
+        """为SQL添加分页（已有LIMIT/TOP时包装为子查询）"""
+        if db_type not in (DatabaseType.MYSQL, DatabaseType.POSTGRESQL, DatabaseType.SQLSERVER, DatabaseType.EMBEDDED):
             return sql
+        return self.limit_rewriter.apply_pagination(sql, offset, limit, db_type, order_columns)
+    
+    async def execute_query_keyset(
+        self,
+        sql: str,
+        data_source_config: Dict[str, Any],
+        key_columns: List[str],
+        cursor: Optional[str] = None,
+        page_size: int = None
+    ) -> QueryResult:
+        """
+        键集分页执行查询
+        
+        按唯一排序键定位下一页起点，翻页代价与页深度无关。
+        查询结果必须包含全部排序键列。
+        
+        Args:
+            sql: SQL查询语句
+            data_source_config: 数据源配置
+            key_columns: 唯一排序键（如主键列）
+            cursor: 上一页返回的next_cursor，首页为None
+            page_size: 每页大小
+            
+        Returns:
+            QueryResult: 查询结果（page_info中包含next_cursor）
+        """
+        if not key_columns:
+            raise SQLExecutionError("键集分页需要唯一排序键", error_code="KEYSET_KEY_MISSING")
+        
+        page_size = min(page_size or self.config.page_size, self.config.max_rows)
+        db_type = DatabaseType(data_source_config.get('type', 'mysql'))
+        fingerprint = self.keyset_paginator.fingerprint(sql, key_columns)
+        
+        try:
+            state = self.keyset_paginator.decode_cursor(cursor, fingerprint) if cursor else None
+            # 多取一行用于判断是否还有下一页
+            page_sql = self.keyset_paginator.build_page_sql(
+                sql, key_columns, state.values if state else None, page_size + 1, db_type
+            )
+        except InvalidCursorError as e:
+            raise SQLExecutionError(str(e), error_code="INVALID_CURSOR")
+        
+        result = await self.execute_query(page_sql, data_source_config, use_cache=False)
+        
+        # 驱动按max_rows截断时同样说明还有下一页
+        has_next = len(result.rows) > page_size or result.is_truncated
+        if has_next:
+            result.rows = result.rows[:page_size]
+            result.row_count = len(result.rows)
+        result.is_truncated = False
+        result.has_more = has_next
+        
+        page = state.page + 1 if state else 1
+        next_cursor = None
+        if has_next and result.rows:
+            next_cursor = self._build_next_cursor(result, key_columns, page, fingerprint)
+        
+        result.page_info = {
+            'page': page,
+            'page_size': page_size,
+            'offset': None,
+            'has_next': has_next,
+            'mode': 'keyset',
+            'next_cursor': next_cursor
+        }
+        return result
+    
+    def _build_next_cursor(
+        self,
+        result: QueryResult,
+        key_columns: List[str],
+        page: int,
+        fingerprint: str
+    ) -> str:
+        """根据本页最后一行的排序键值生成下一页游标"""
+        column_index = {name.lower(): i for i, name in enumerate(result.columns)}
+        missing = [c for c in key_columns if c.lower() not in column_index]
+        if missing:
+            raise SQLExecutionError(
+                f"查询结果缺少排序键列: {', '.join(missing)}",
+                error_code="KEYSET_KEY_MISSING"
+            )
+        
+        last_row = result.rows[-1]
+        try:
+            values = [last_row[column_index[c.lower()]] for c in key_columns]
+            return self.keyset_paginator.encode_cursor(values, page, fingerprint)
+        except ValueError as e:
+            raise SQLExecutionError(str(e), error_code="KEYSET_UNSUPPORTED_KEY")
     
     async def execute_query_stream(
         self,
         sql: str,
         data_source_config: Dict[str, Any],
-        chunk_size: int = 100
+        chunk_size: int = 100,
+        key_columns: Optional[List[str]] = None
     ) -> AsyncIterator[List[List[Any]]]:
         """
         流式执行查询
         
+        提供唯一排序键时使用键集分页，深度翻页不再逐页变慢；
+        否则退化为OFFSET分页。
+        
         Args:
             sql: SQL查询语句
             data_source_config: 数据源配置
             chunk_size: 每次返回的行数
+            key_columns: 唯一排序键（如主键列）
             
         Yields:
             List[List[Any]]: 数据块
         """
-        # 简化实现：分页获取并流式返回
+        if key_columns:
+            cursor = None
+            while True:
+                result = await self.execute_query_keyset(
+                    sql,
+                    data_source_config,
+                    key_columns,
+                    cursor=cursor,
+                    page_size=chunk_size
+                )
+                
+                if result.row_count == 0:
+                    break
+                
+                yield result.rows
+                
+                cursor = result.page_info.get('next_cursor')
+                if not cursor:
+                    break
+            return
+        
+        # 分页获取并流式返回
         page = 1
         while True:
             result = await self.execute_query_paginated(
@@ -653,11 +1044,15 @@ class SQLExecutorService:
             'average_execution_time': self.stats.average_execution_time,
             'total_rows_returned': self.stats.total_rows_returned,
             'cache_hits': self.stats.cache_hits,
+            'limited_queries': self.stats.limited_queries,
+            'truncated_queries': self.stats.truncated_queries,
+            'circuit_rejected_queries': self.stats.circuit_rejected_queries,
             'cache_hit_rate': (
                 self.stats.cache_hits / max(self.stats.total_queries, 1)
             ),
             'active_queries': self._active_queries,
-            'cache_size': len(self._result_cache)
+            'cache_size': len(self._result_cache),
+            'cost_estimation': self.cost_estimator.get_statistics()
         }
     
     def clear_cache(self):
@@ -667,11 +1062,19 @@ class SQLExecutorService:
         logger.info("查询结果缓存已清空")
     
     def get_health_status(self) -> Dict[str, Any]:
-        """获取健康状态"""
+        """获取健康状态（任一数据源熔断中时为degraded）"""
+        circuit_breakers = self.circuit_breakers.get_all_status(prefix="data_source:")
+        open_circuits = [
+            name for name, status in circuit_breakers.items()
+            if status['state'] != CircuitState.CLOSED.value
+        ]
+        healthy = self.stats.failed_queries < self.stats.successful_queries and not open_circuits
         return {
-            'status': 'healthy' if self.stats.failed_queries < self.stats.successful_queries else 'degraded',
+            'status': 'healthy' if healthy else 'degraded',
             'active_queries': self._active_queries,
             'max_concurrent_queries': self.config.max_concurrent_queries,
             'cache_size': len(self._result_cache),
+            'open_circuits': open_circuits,
+            'circuit_breakers': circuit_breakers,
             'statistics': self.get_statistics()
         }
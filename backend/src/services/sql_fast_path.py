@@ -0,0 +1,911 @@
+"""
+SQL生成快速通道
+
+常见的聚合、趋势和Top-N问题不调用云端模型，直接在本地做槽位填充并套用SQL模板，毫秒级返回：
+
+- 词表：字段名、显示名称、字段映射中的业务名称，以及 src.sql_generator.SQLGenerator
+  的指标/维度关键词映射（如“销售额”对应名称中含 sales/amount 的字段），全部落到真实的表字段上；
+  字段关联的字典项把显示值（如“华东”）映射为存储键，作为过滤条件
+- 槽位：指标（字段 + 聚合函数）、分组维度、时间字段与时间范围、趋势粒度、Top-N、字典过滤
+- 置信度：问题中被识别的字符占比，字段歧义时打折；低于阈值返回None，由调用方转给云端模型
+
+生成的SQL按对应表的字段做安全和存在性校验，校验不通过同样转给云端模型。
+快速通道的命中率和耗时单独统计，不计入模型生成的统计。
+"""
+
+import calendar
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from src.sql_generator import SQLGenerator
+from src.services.metadata_cache import (
+    MetadataCache,
+    SCOPE_DATA_SOURCE,
+    SCOPE_DICTIONARY,
+    SCOPE_TABLE,
+    get_version_registry,
+    version_key
+)
+from src.services.sql_security_validator import SQLSecurityValidator
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DIALECTS = ('mysql', 'postgresql', 'sqlserver')
+
+# SQL模板（与 SQLGenerator.sql_templates 相同的占位符写法，{top}/{limit} 按方言生成TOP或LIMIT）
+FAST_PATH_TEMPLATES = {
+    'total': "SELECT {aggregation} AS {alias} FROM {table}{where}",
+    'aggregate': "SELECT {top}{dimension}, {aggregation} AS {alias} FROM {table}{where} "
+                 "GROUP BY {dimension} ORDER BY {alias} {order}{limit}",
+    'top_n': "SELECT {top}{dimension}, {aggregation} AS {alias} FROM {table}{where} "
+             "GROUP BY {dimension} ORDER BY {alias} {order}{limit}",
+    'top_rows': "SELECT {top}* FROM {table}{where} ORDER BY {metric} {order}{limit}",
+    'trend': "SELECT {period} AS period, {aggregation} AS {alias} FROM {table}{where} "
+             "GROUP BY {period} ORDER BY period ASC"
+}
+
+# 趋势粒度对应的时间分桶表达式
+PERIOD_EXPRESSIONS = {
+    'mysql': {
+        'day': "DATE({column})",
+        'week': "DATE_SUB(DATE({column}), INTERVAL WEEKDAY({column}) DAY)",
+        'month': "DATE_FORMAT({column}, '%Y-%m-01')",
+        'quarter': "MAKEDATE(YEAR({column}), 1) + INTERVAL QUARTER({column}) - 1 QUARTER",
+        'year': "YEAR({column})"
+    },
+    'postgresql': {
+        'day': "DATE_TRUNC('day', {column})",
+        'week': "DATE_TRUNC('week', {column})",
+        'month': "DATE_TRUNC('month', {column})",
+        'quarter': "DATE_TRUNC('quarter', {column})",
+        'year': "DATE_TRUNC('year', {column})"
+    },
+    'sqlserver': {
+        'day': "CAST({column} AS DATE)",
+        'week': "DATEADD(WEEK, DATEDIFF(WEEK, 0, {column}), 0)",
+        'month': "DATEFROMPARTS(YEAR({column}), MONTH({column}), 1)",
+        'quarter': "DATEFROMPARTS(YEAR({column}), (DATEPART(QUARTER, {column}) - 1) * 3 + 1, 1)",
+        'year': "YEAR({column})"
+    }
+}
+
+_NUMERIC_TYPE_PATTERN = re.compile(r'int|decimal|numeric|float|double|real|money|number')
+_TEMPORAL_TYPE_PATTERN = re.compile(r'date|timestamp')
+_SIMPLE_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$')
+_SIGNIFICANT_CHAR = re.compile(r'[一-鿿0-9a-z]')
+
+_CN_DIGITS = {'零': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_NUMBER = r'(\d+|[一二两三四五六七八九十]+)'
+
+_TOP_N_PATTERN = re.compile(rf'(?:前|top\s*|排名前)\s*{_NUMBER}\s*(?:个|名|位|家|条|笔|项|款|种)?')
+_RECENT_PATTERN = re.compile(rf'(?:最近|近|过去)\s*{_NUMBER}\s*(天|日|周|个?星期|个?月|年)')
+
+# 聚合、排序、趋势粒度关键词（匹配后计入已识别字符）
+_AGGREGATION_PATTERNS = [
+    ('AVG', re.compile(r'平均值|平均|均值|人均|avg|average')),
+    ('SUM', re.compile(r'总和|合计|总计|总额|累计|sum')),
+    ('MAX', re.compile(r'最大值|max')),
+    ('MIN', re.compile(r'最小值|min')),
+    ('COUNT', re.compile(r'多少(?:个|笔|条|次|单|家|位)|数量|个数|笔数|次数|条数|记录数|订单数|单数|count'))
+]
+_ORDER_PATTERNS = [
+    ('DESC', re.compile(r'最高|最多|最大|最好|降序|top')),
+    ('ASC', re.compile(r'最低|最少|最小|最差|倒数|升序'))
+]
+_GRANULARITY_PATTERNS = [
+    ('day', re.compile(r'(?:每|按|逐|各)(?:天|日)|每一天|日度')),
+    ('week', re.compile(r'(?:每|按|逐|各)(?:周|星期)|每个星期')),
+    ('month', re.compile(r'(?:每|按|逐|各)(?:个)?月|月度')),
+    ('quarter', re.compile(r'(?:每|按|逐|各)(?:个)?季度|季度别')),
+    ('year', re.compile(r'(?:每|按|逐|各)年|年度'))
+]
+_TREND_PATTERN = re.compile(r'变化趋势|趋势|走势|变化|波动')
+
+# 补充 SQLGenerator.time_patterns 中没有的常用说法
+_EXTRA_TIME_PATTERNS = {
+    '本年': r'今年',
+    '本月': r'这个月|当月',
+    '上月': r'上个月',
+    '本周': r'这周|这个星期',
+    '上周': r'上个星期',
+    '本季度': r'这个季度',
+    '上季度': r'上个季度'
+}
+
+# 不影响语义的功能词（计入已识别字符）
+_FUNCTION_WORDS = re.compile(
+    r'请问|请|帮我|给我|我想|想知道|知道|查询|查一下|查看|看看|看一下|统计|显示|列出|展示|一下|'
+    r'分别是|分别|是多少|多少|是|的|了|吗|呢|在|按照|按|根据|各个|各|每个|所有|全部|'
+    r'情况|数据|排名|排行|排序|哪些|哪个|哪|什么|里|中|内|期间|以来|的话|怎么样|如何|有|共|总|'
+    r'show|me|the|by|of|in|per|what|is'
+)
+
+# 出现这些说法说明问题超出模板能力（比较、占比、否定或数值条件），直接转给云端模型
+_UNSUPPORTED_PATTERN = re.compile(
+    r'同比|环比|占比|比例|百分比|增长率|增速|转化率|对比|相比|比较|除了|除去|排除|以外|之外|'
+    r'非|不|没|未|无|'
+    r'大于|小于|超过|低于|高于|不少于|不超过|至少|至多|之间|并且|而且|或者|以及|同时|且|或|'
+    r'>|<|=|join|union'
+)
+
+_UNIT_DAYS = {'天': 1, '日': 1}
+
+
+def _parse_number(text: str) -> Optional[int]:
+    """解析阿拉伯数字或不超过九十九的中文数字"""
+    if text.isdigit():
+        return int(text)
+    if '十' in text:
+        tens, _, ones = text.partition('十')
+        tens_value = _CN_DIGITS.get(tens, 1) if tens else 1
+        ones_value = _CN_DIGITS.get(ones, 0) if ones else 0
+        if (tens and tens not in _CN_DIGITS) or (ones and ones not in _CN_DIGITS):
+            return None
+        return tens_value * 10 + ones_value
+    if len(text) == 1 and text in _CN_DIGITS:
+        return _CN_DIGITS[text]
+    return None
+
+
+def _add_months(day: date, months: int) -> date:
+    """按月平移到当月第一天"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def resolve_time_range(expression: str, today: date, amount: int = 0, unit: str = '') -> Tuple[date, date]:
+    """
+    把时间表达式换算为左闭右开的日期区间
+
+    Args:
+        expression: SQLGenerator.time_patterns 中的时间表达式，或 "recent" 表示“最近N天/周/月/年”
+        today: 当前日期
+        amount: 最近N个单位中的N
+        unit: 最近N个单位中的单位
+    """
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    quarter_start = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+    year_start = date(today.year, 1, 1)
+    tomorrow = today + timedelta(days=1)
+
+    ranges = {
+        '今天': (today, tomorrow),
+        '昨天': (today - timedelta(days=1), today),
+        '前天': (today - timedelta(days=2), today - timedelta(days=1)),
+        '本周': (week_start, week_start + timedelta(days=7)),
+        '上周': (week_start - timedelta(days=7), week_start),
+        '本月': (month_start, _add_months(month_start, 1)),
+        '上月': (_add_months(month_start, -1), month_start),
+        '本季度': (quarter_start, _add_months(quarter_start, 3)),
+        '上季度': (_add_months(quarter_start, -3), quarter_start),
+        '本年': (year_start, date(today.year + 1, 1, 1)),
+        '去年': (date(today.year - 1, 1, 1), year_start)
+    }
+    if expression != 'recent':
+        return ranges[expression]
+
+    unit = unit.lstrip('个')
+    if unit in _UNIT_DAYS:
+        return today - timedelta(days=amount - 1), tomorrow
+    if unit in ('周', '星期'):
+        return week_start - timedelta(days=7 * (amount - 1)), tomorrow
+    if unit == '月':
+        return _add_months(month_start, -(amount - 1)), tomorrow
+    return date(today.year - amount + 1, 1, 1), tomorrow
+
+
+@dataclass
+class FieldInfo:
+    """快速通道使用的字段元数据"""
+    field_name: str
+    data_type: str
+    display_name: Optional[str] = None
+    aliases: List[str] = field(default_factory=list)              # 字段映射中的业务名称
+    is_aggregatable: bool = True
+    dictionary_values: Dict[str, str] = field(default_factory=dict)  # 字典显示值 -> 存储键
+
+    @property
+    def is_numeric(self) -> bool:
+        return bool(_NUMERIC_TYPE_PATTERN.search((self.data_type or '').lower()))
+
+    @property
+    def is_temporal(self) -> bool:
+        return bool(_TEMPORAL_TYPE_PATTERN.search((self.data_type or '').lower()))
+
+
+@dataclass
+class TableSchema:
+    """快速通道使用的表元数据"""
+    table_name: str
+    fields: List[FieldInfo]
+    _lexicon: Optional['TableLexicon'] = field(default=None, repr=False, compare=False)
+
+
+@dataclass
+class FastPathSQL:
+    """快速通道生成结果"""
+    sql: str
+    template: str
+    confidence: float
+    table_name: str
+    slots: Dict[str, Any]
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'sql': self.sql,
+            'template': self.template,
+            'confidence': self.confidence,
+            'table_name': self.table_name,
+            'slots': self.slots,
+            'elapsed_ms': self.elapsed_ms
+        }
+
+
+@dataclass
+class _Match:
+    start: int
+    end: int
+    kind: str          # field / value / time / recent / top / aggregation / order / granularity / trend / word
+    payload: Any = None
+    priority: int = 1  # 等长匹配时优先级小的胜出
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+class TableLexicon:
+    """单表词表：词 -> 字段、字典显示值 -> (字段, 存储键)"""
+
+    # 聚合含义的关键词不作为字段的同义词
+    _AGGREGATION_KEYWORDS = {'平均值', '总和', '最大值', '最小值'}
+
+    def __init__(self, table: TableSchema, generator: SQLGenerator):
+        self.table = table
+        # 词 -> [(字段, 是否仅由关键词映射得到)]
+        self.terms: Dict[str, List[Tuple[FieldInfo, bool]]] = defaultdict(list)
+        self.values: Dict[str, List[Tuple[FieldInfo, str]]] = defaultdict(list)
+
+        keyword_maps = {**generator.metric_keywords, **generator.dimension_keywords}
+        for info in table.fields:
+            exact = {info.field_name.lower()}
+            if info.display_name:
+                exact.add(info.display_name.lower())
+            exact.update(alias.lower() for alias in info.aliases if alias)
+            for term in exact:
+                self.terms[term].append((info, False))
+
+            tokens = set(re.split(r'[_\s]+', info.field_name.lower()))
+            for keyword, words in keyword_maps.items():
+                if keyword in self._AGGREGATION_KEYWORDS or keyword in exact:
+                    continue
+                if tokens & set(words):
+                    self.terms[keyword].append((info, True))
+
+            for label, key in info.dictionary_values.items():
+                if label:
+                    self.values[label.lower()].append((info, key))
+
+
+class SQLFastPath:
+    """模板SQL快速通道"""
+
+    def __init__(
+        self,
+        confidence_threshold: float = 0.85,
+        schema_loader: Optional[Callable[..., List[TableSchema]]] = None,
+        enabled: bool = True
+    ):
+        """
+        初始化快速通道
+
+        Args:
+            confidence_threshold: 直接返回模板SQL所需的最低置信度
+            schema_loader: 表元数据加载函数，默认从元数据库加载（带版本校验的缓存）
+            enabled: 是否启用
+        """
+        self.confidence_threshold = confidence_threshold
+        self.schema_loader = schema_loader or load_table_schemas
+        self.enabled = enabled
+        self.generator = SQLGenerator()
+        self.validator = SQLSecurityValidator()
+
+        time_patterns = dict(self.generator.time_patterns)
+        for expression, extra in _EXTRA_TIME_PATTERNS.items():
+            time_patterns[expression] = f"{time_patterns[expression]}|{extra}"
+        self._time_patterns = [(expression, re.compile(pattern)) for expression, pattern in time_patterns.items()]
+
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'attempts': 0,
+            'hits': 0,
+            'fallthroughs': 0,
+            'errors': 0,
+            'hit_time_ms': 0.0,
+            'fallthrough_time_ms': 0.0,
+            'max_hit_time_ms': 0.0,
+            'templates': defaultdict(int)
+        }
+
+    def generate(
+        self,
+        question: str,
+        data_source_id: Optional[str] = None,
+        table_ids: Optional[Sequence[str]] = None,
+        table_names: Optional[Sequence[str]] = None,
+        dialect: str = 'mysql',
+        max_rows: Optional[int] = None
+    ) -> Optional[FastPathSQL]:
+        """
+        加载相关表的元数据并尝试用模板生成SQL
+
+        Returns:
+            FastPathSQL: 置信度达到阈值且通过校验时返回，否则返回None（转给云端模型）
+        """
+        if not self.enabled:
+            return None
+
+        started = time.perf_counter()
+        result = None
+        failed = False
+        try:
+            if dialect in SUPPORTED_DIALECTS and (table_ids or table_names or data_source_id):
+                tables = self.schema_loader(
+                    data_source_id=data_source_id, table_ids=table_ids, table_names=table_names
+                )
+                result = self.match(question, tables, dialect=dialect, max_rows=max_rows)
+        except Exception as e:
+            failed = True
+            logger.warning(f"SQL快速通道失败，转给云端模型: {str(e)}")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._record(result, elapsed_ms, failed)
+        if result is not None:
+            result.elapsed_ms = elapsed_ms
+            logger.info(
+                f"SQL快速通道命中: 模板={result.template}, 置信度={result.confidence:.2f}, 耗时={elapsed_ms:.2f}ms"
+            )
+        return result
+
+    def match(
+        self,
+        question: str,
+        tables: Sequence[TableSchema],
+        dialect: str = 'mysql',
+        max_rows: Optional[int] = None,
+        today: Optional[date] = None
+    ) -> Optional[FastPathSQL]:
+        """在给定表中做槽位填充，多张表都能高置信度匹配时视为有歧义，返回None"""
+        text = unicodedata.normalize('NFKC', question or '').lower().strip()
+        if not text or not tables or _UNSUPPORTED_PATTERN.search(text):
+            return None
+
+        today = today or date.today()
+        shared = self._match_shared(text)
+        candidates = []
+        for table in tables:
+            candidate = self._match_table(text, shared, table, dialect, max_rows, today)
+            if candidate is not None:
+                candidates.append(candidate)
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda candidate: candidate.confidence, reverse=True)
+        best = candidates[0]
+        if best.confidence < self.confidence_threshold:
+            return None
+        if len(candidates) > 1 and candidates[1].confidence >= self.confidence_threshold:
+            logger.debug(f"SQL快速通道：多张表均可匹配，转给云端模型 ({best.table_name}, {candidates[1].table_name})")
+            return None
+        return best
+
+    def _match_shared(self, text: str) -> List[_Match]:
+        """与表无关的匹配：时间、Top-N、聚合、排序、趋势和功能词"""
+        matches = []
+        for expression, pattern in self._time_patterns:
+            matches.extend(_Match(m.start(), m.end(), 'time', expression, 0) for m in pattern.finditer(text))
+        for m in _RECENT_PATTERN.finditer(text):
+            amount = _parse_number(m.group(1))
+            if amount:
+                matches.append(_Match(m.start(), m.end(), 'recent', (amount, m.group(2)), 0))
+        for m in _TOP_N_PATTERN.finditer(text):
+            amount = _parse_number(m.group(1))
+            if amount:
+                matches.append(_Match(m.start(), m.end(), 'top', amount))
+        for kind, patterns in (('aggregation', _AGGREGATION_PATTERNS), ('order', _ORDER_PATTERNS),
+                               ('granularity', _GRANULARITY_PATTERNS)):
+            for value, pattern in patterns:
+                matches.extend(_Match(m.start(), m.end(), kind, value) for m in pattern.finditer(text))
+        matches.extend(_Match(m.start(), m.end(), 'trend') for m in _TREND_PATTERN.finditer(text))
+        matches.extend(_Match(m.start(), m.end(), 'word', priority=2) for m in _FUNCTION_WORDS.finditer(text))
+        return matches
+
+    def _match_table(
+        self,
+        text: str,
+        shared: List[_Match],
+        table: TableSchema,
+        dialect: str,
+        max_rows: Optional[int],
+        today: date
+    ) -> Optional[FastPathSQL]:
+        """在单张表上填充槽位并生成SQL"""
+        if table._lexicon is None:
+            table._lexicon = TableLexicon(table, self.generator)
+        lexicon = table._lexicon
+
+        matches = list(shared)
+        for term, fields in lexicon.terms.items():
+            matches.extend(_Match(start, start + len(term), 'field', fields, 0) for start in _find_all(text, term))
+        for label, targets in lexicon.values.items():
+            matches.extend(_Match(start, start + len(label), 'value', targets, 0) for start in _find_all(text, label))
+
+        selected = _select_matches(matches)
+        covered = _covered_positions(selected)
+
+        slots = self._fill_slots(text, selected, covered)
+        if slots is None:
+            return None
+
+        significant = [i for i, char in enumerate(text) if _SIGNIFICANT_CHAR.match(char)]
+        if not significant:
+            return None
+        coverage = sum(1 for i in significant if i in covered) / len(significant)
+        confidence = round(coverage * slots.pop('ambiguity'), 4)
+        if confidence < self.confidence_threshold:
+            return None
+
+        built = self._build_sql(table, slots, dialect, max_rows, today)
+        if built is None:
+            return None
+        template, sql = built
+
+        validation = self.validator.validate_sql(sql, {
+            table.table_name.lower(): [info.field_name for info in table.fields]
+        })
+        if not validation.is_valid:
+            logger.debug(f"SQL快速通道生成的SQL未通过校验: {sql}")
+            return None
+
+        return FastPathSQL(
+            sql=sql,
+            template=template,
+            confidence=confidence,
+            table_name=table.table_name,
+            slots=_describe_slots(slots, today)
+        )
+
+    def _fill_slots(self, text: str, selected: List[_Match], covered: Set[int]) -> Optional[Dict[str, Any]]:
+        """把选中的匹配归入槽位，超出模板能力（多指标、多维度等）时返回None"""
+        slots: Dict[str, Any] = {
+            'metric': None, 'aggregation': None, 'dimension': None, 'time_field': None,
+            'time': None, 'granularity': None, 'trend': False, 'top': None, 'order': None,
+            'filters': [], 'ambiguity': 1.0
+        }
+        metrics: List[FieldInfo] = []
+        dimensions: List[FieldInfo] = []
+
+        for match in selected:
+            if match.kind == 'field':
+                info, ambiguity = _pick_field(match.payload)
+                slots['ambiguity'] = min(slots['ambiguity'], ambiguity)
+                if info.is_temporal:
+                    slots['time_field'] = slots['time_field'] or info
+                elif info.is_numeric and info.is_aggregatable:
+                    metrics.append(info)
+                elif text[match.end:match.end + 1] == '数' and match.end not in covered:
+                    # “客户数”：按维度字段去重计数
+                    covered.add(match.end)
+                    metrics.append(info)
+                    slots['aggregation'] = 'COUNT_DISTINCT'
+                else:
+                    dimensions.append(info)
+            elif match.kind == 'value':
+                if len({id(info) for info, _ in match.payload}) > 1:
+                    slots['ambiguity'] = min(slots['ambiguity'], 0.7)
+                info, key = match.payload[0]
+                slots['filters'].append((info, key))
+            elif match.kind in ('time', 'recent'):
+                if slots['time'] is not None:
+                    return None
+                slots['time'] = (match.kind, match.payload)
+            elif match.kind == 'top':
+                slots['top'] = match.payload
+            elif match.kind == 'aggregation':
+                if slots['aggregation'] not in (None, match.payload):
+                    return None
+                slots['aggregation'] = match.payload
+            elif match.kind == 'order':
+                slots['order'] = match.payload
+            elif match.kind == 'granularity':
+                slots['granularity'] = match.payload
+            elif match.kind == 'trend':
+                slots['trend'] = True
+
+        # 作为过滤条件出现的字段（“华东地区”）不再作为分组维度
+        filter_fields = {id(info) for info, _ in slots['filters']}
+        dimensions = [info for info in dimensions if id(info) not in filter_fields]
+        dimensions = list({id(info): info for info in dimensions}.values())
+        metrics = list({id(info): info for info in metrics}.values())
+
+        if len(metrics) > 1 or len(dimensions) > 1:
+            return None
+        if not metrics and slots['aggregation'] != 'COUNT':
+            return None
+        if slots['aggregation'] == 'COUNT_DISTINCT' and not metrics:
+            return None
+
+        slots['metric'] = metrics[0] if metrics else None
+        slots['dimension'] = dimensions[0] if dimensions else None
+        return slots
+
+    def _build_sql(
+        self,
+        table: TableSchema,
+        slots: Dict[str, Any],
+        dialect: str,
+        max_rows: Optional[int],
+        today: date
+    ) -> Optional[Tuple[str, str]]:
+        """选择模板并生成SQL，返回 (模板名, SQL)"""
+        metric: Optional[FieldInfo] = slots['metric']
+        dimension: Optional[FieldInfo] = slots['dimension']
+        aggregation_kind = slots['aggregation'] or ('SUM' if metric else 'COUNT')
+        # 没有分组维度和Top-N时，“最大/最高/最低”表示取最值而不是排序，不能当作合计
+        if slots['order'] is not None and dimension is None and slots['top'] is None:
+            if metric is None or slots['aggregation'] is not None:
+                return None
+            aggregation_kind = 'MAX' if slots['order'] == 'DESC' else 'MIN'
+        is_trend = slots['trend'] or slots['granularity'] is not None
+
+        time_field = slots['time_field']
+        if time_field is None and (slots['time'] is not None or is_trend):
+            temporal = [info for info in table.fields if info.is_temporal]
+            if len(temporal) != 1:
+                return None
+            time_field = temporal[0]
+
+        conditions = []
+        if slots['time'] is not None:
+            kind, payload = slots['time']
+            if kind == 'recent':
+                start, end = resolve_time_range('recent', today, amount=payload[0], unit=payload[1])
+            else:
+                start, end = resolve_time_range(payload, today)
+            column = _quote(time_field.field_name, dialect)
+            conditions.append(f"{column} >= '{start.isoformat()}' AND {column} < '{end.isoformat()}'")
+        for info, key in slots['filters']:
+            conditions.append(f"{_quote(info.field_name, dialect)} = '{str(key).replace(chr(39), chr(39) * 2)}'")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if aggregation_kind == 'COUNT':
+            aggregation, alias = "COUNT(*)", "record_count"
+        elif aggregation_kind == 'COUNT_DISTINCT':
+            aggregation = f"COUNT(DISTINCT {_quote(metric.field_name, dialect)})"
+            alias = f"distinct_{_alias_name(metric.field_name)}"
+        else:
+            aggregation = f"{aggregation_kind}({_quote(metric.field_name, dialect)})"
+            alias = f"{aggregation_kind.lower()}_{_alias_name(metric.field_name)}"
+
+        values = {
+            'table': _quote(table.table_name, dialect),
+            'where': where,
+            'aggregation': aggregation,
+            'alias': alias,
+            'order': slots['order'] or 'DESC',
+            'top': '',
+            'limit': ''
+        }
+
+        if is_trend:
+            if dimension is not None or slots['top'] is not None:
+                return None
+            granularity = slots['granularity'] or self._default_granularity(slots, today)
+            values['period'] = PERIOD_EXPRESSIONS[dialect][granularity].format(
+                column=_quote(time_field.field_name, dialect)
+            )
+            slots['granularity'] = granularity
+            template = 'trend'
+        elif dimension is not None:
+            template = 'top_n' if slots['top'] is not None else 'aggregate'
+            values['dimension'] = _quote(dimension.field_name, dialect)
+            values.update(_row_limit(slots['top'] or max_rows, dialect))
+        elif slots['top'] is not None:
+            # “金额最高的10笔订单”：明细Top-N，不做聚合
+            if metric is None or slots['aggregation'] is not None:
+                return None
+            template = 'top_rows'
+            values['metric'] = _quote(metric.field_name, dialect)
+            values.update(_row_limit(slots['top'], dialect))
+        else:
+            template = 'total'
+
+        slots['aggregation'] = aggregation_kind
+        slots['time_field'] = time_field
+        return template, FAST_PATH_TEMPLATES[template].format(**values)
+
+    def _default_granularity(self, slots: Dict[str, Any], today: date) -> str:
+        """未指定趋势粒度时按时间范围长度选择：一个月以内按天，两年以内按月，否则按年"""
+        if slots['time'] is None:
+            return 'month'
+        kind, payload = slots['time']
+        if kind == 'recent':
+            start, end = resolve_time_range('recent', today, amount=payload[0], unit=payload[1])
+        else:
+            start, end = resolve_time_range(payload, today)
+        days = (end - start).days
+        if days <= 31:
+            return 'day'
+        return 'month' if days <= 731 else 'year'
+
+    def _record(self, result: Optional[FastPathSQL], elapsed_ms: float, failed: bool):
+        with self._lock:
+            self._stats['attempts'] += 1
+            if result is not None:
+                self._stats['hits'] += 1
+                self._stats['hit_time_ms'] += elapsed_ms
+                self._stats['max_hit_time_ms'] = max(self._stats['max_hit_time_ms'], elapsed_ms)
+                self._stats['templates'][result.template] += 1
+            else:
+                self._stats['fallthroughs'] += 1
+                self._stats['fallthrough_time_ms'] += elapsed_ms
+                if failed:
+                    self._stats['errors'] += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """快速通道命中率与耗时（与模型生成分开统计）"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['templates'] = dict(self._stats['templates'])
+        attempts, hits, fallthroughs = stats['attempts'], stats['hits'], stats['fallthroughs']
+        return {
+            'enabled': self.enabled,
+            'confidence_threshold': self.confidence_threshold,
+            'attempts': attempts,
+            'hits': hits,
+            'fallthroughs': fallthroughs,
+            'errors': stats['errors'],
+            'hit_rate': round(hits / attempts, 4) if attempts else 0.0,
+            'average_hit_time_ms': round(stats['hit_time_ms'] / hits, 3) if hits else 0.0,
+            'max_hit_time_ms': round(stats['max_hit_time_ms'], 3),
+            'average_fallthrough_time_ms': round(stats['fallthrough_time_ms'] / fallthroughs, 3) if fallthroughs else 0.0,
+            'templates': stats['templates']
+        }
+
+    def reset_statistics(self):
+        with self._lock:
+            self._stats = self._empty_stats()
+
+
+def _find_all(text: str, term: str) -> List[int]:
+    positions = []
+    start = text.find(term)
+    while start != -1:
+        positions.append(start)
+        start = text.find(term, start + 1)
+    return positions
+
+
+def _select_matches(matches: List[_Match]) -> List[_Match]:
+    """最长优先选取互不重叠的匹配，等长时按优先级，结果按出现位置排序"""
+    selected = []
+    occupied: Set[int] = set()
+    for match in sorted(matches, key=lambda m: (-m.length, m.priority, m.start)):
+        span = range(match.start, match.end)
+        if match.length and not any(i in occupied for i in span):
+            selected.append(match)
+            occupied.update(span)
+    return sorted(selected, key=lambda m: m.start)
+
+
+def _covered_positions(selected: List[_Match]) -> Set[int]:
+    covered = set()
+    for match in selected:
+        covered.update(range(match.start, match.end))
+    return covered
+
+
+def _pick_field(candidates: List[Tuple[FieldInfo, bool]]) -> Tuple[FieldInfo, float]:
+    """
+    从同一个词对应的多个字段中选择
+
+    精确命中（字段名、显示名称、业务名称）优先于关键词映射；仍有多个字段时取第一个并降低置信度
+
+    Returns:
+        (字段, 置信度系数)
+    """
+    exact = [info for info, synonym_only in candidates if not synonym_only]
+    pool = exact or [info for info, _ in candidates]
+    unique = list({id(info): info for info in pool}.values())
+    if len(unique) > 1:
+        return unique[0], 0.7
+    return unique[0], 1.0 if exact else 0.95
+
+
+def _quote(identifier: str, dialect: str) -> str:
+    """非常规标识符按方言加引号"""
+    if _SIMPLE_IDENTIFIER.match(identifier):
+        return identifier
+    if dialect == 'mysql':
+        return f"`{identifier.replace('`', '``')}`"
+    if dialect == 'sqlserver':
+        return f"[{identifier.replace(']', ']]')}]"
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _alias_name(field_name: str) -> str:
+    alias = re.sub(r'\W', '_', field_name.lower()).strip('_')
+    return alias if _SIMPLE_IDENTIFIER.match(alias or '') else 'value'
+
+
+def _row_limit(limit: Optional[int], dialect: str) -> Dict[str, str]:
+    if not limit:
+        return {}
+    if dialect == 'sqlserver':
+        return {'top': f"TOP {int(limit)} "}
+    return {'limit': f" LIMIT {int(limit)}"}
+
+
+def _describe_slots(slots: Dict[str, Any], today: date) -> Dict[str, Any]:
+    """槽位的可序列化描述"""
+    described = {
+        'metric': slots['metric'].field_name if slots['metric'] else None,
+        'aggregation': slots['aggregation'],
+        'dimension': slots['dimension'].field_name if slots['dimension'] else None,
+        'time_field': slots['time_field'].field_name if slots['time_field'] else None,
+        'granularity': slots['granularity'],
+        'top': slots['top'],
+        'order': slots['order'],
+        'filters': {info.field_name: key for info, key in slots['filters']}
+    }
+    if slots['time'] is not None:
+        kind, payload = slots['time']
+        if kind == 'recent':
+            start, end = resolve_time_range('recent', today, amount=payload[0], unit=payload[1])
+        else:
+            start, end = resolve_time_range(payload, today)
+        described['time_range'] = {'start': start.isoformat(), 'end': end.isoformat()}
+    return described
+
+
+# 表元数据缓存：依赖表、字典和数据源的版本，元数据变化后自动重新加载
+_schema_cache: Optional[MetadataCache] = None
+_schema_cache_lock = threading.Lock()
+
+
+def _get_schema_cache() -> MetadataCache:
+    global _schema_cache
+    if _schema_cache is None:
+        with _schema_cache_lock:
+            if _schema_cache is None:
+                _schema_cache = MetadataCache(max_entries=128, registry=get_version_registry())
+    return _schema_cache
+
+
+def load_table_schemas(
+    data_source_id: Optional[str] = None,
+    table_ids: Optional[Sequence[str]] = None,
+    table_names: Optional[Sequence[str]] = None
+) -> List[TableSchema]:
+    """
+    从元数据库加载快速通道所需的表、字段、业务名称和字典映射
+
+    指定table_ids时按ID加载；否则加载数据源下的启用表（可再按表名过滤）
+    """
+    cache = _get_schema_cache()
+    cache_key = (
+        f"sql_fast_path:{data_source_id or ''}:"
+        f"{','.join(sorted(map(str, table_ids or [])))}:{','.join(sorted(map(str, table_names or [])))}"
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    token = cache.begin()
+    tables = _query_table_schemas(data_source_id, table_ids, table_names)
+    dependencies = [version_key(SCOPE_TABLE), version_key(SCOPE_DICTIONARY)]
+    if data_source_id:
+        dependencies.append(version_key(SCOPE_DATA_SOURCE, str(data_source_id)))
+    cache.set(cache_key, tables, dependencies, token)
+    return tables
+
+
+def _query_table_schemas(
+    data_source_id: Optional[str],
+    table_ids: Optional[Sequence[str]],
+    table_names: Optional[Sequence[str]]
+) -> List[TableSchema]:
+    from src.database import SessionLocal
+    from src.models.data_preparation_model import DataTable, DictionaryItem, FieldMapping, TableField
+
+    db = SessionLocal()
+    try:
+        query = db.query(DataTable).filter(DataTable.status == True)
+        if table_ids:
+            query = query.filter(DataTable.id.in_(list(table_ids)))
+        elif data_source_id:
+            query = query.filter(DataTable.data_source_id == str(data_source_id))
+            if table_names:
+                query = query.filter(DataTable.table_name.in_(list(table_names)))
+        else:
+            return []
+        tables = query.all()
+        if not tables:
+            return []
+
+        table_id_list = [table.id for table in tables]
+        fields = db.query(TableField).filter(
+            TableField.table_id.in_(table_id_list),
+            TableField.is_queryable == True
+        ).order_by(TableField.table_id, TableField.sort_order).all()
+        mappings = db.query(FieldMapping).filter(FieldMapping.table_id.in_(table_id_list)).all()
+
+        aliases: Dict[str, List[str]] = defaultdict(list)
+        field_dictionaries: Dict[str, str] = {}
+        for mapping in mappings:
+            aliases[mapping.field_id].append(mapping.business_name)
+            if mapping.dictionary_id:
+                field_dictionaries.setdefault(mapping.field_id, mapping.dictionary_id)
+        for table_field in fields:
+            if table_field.dictionary_id:
+                field_dictionaries[table_field.id] = table_field.dictionary_id
+
+        dictionary_values: Dict[str, Dict[str, str]] = defaultdict(dict)
+        if field_dictionaries:
+            items = db.query(DictionaryItem).filter(
+                DictionaryItem.dictionary_id.in_(set(field_dictionaries.values())),
+                DictionaryItem.status == True
+            ).all()
+            for item in items:
+                dictionary_values[item.dictionary_id][item.item_value] = item.item_key
+
+        fields_by_table: Dict[str, List[FieldInfo]] = defaultdict(list)
+        for table_field in fields:
+            fields_by_table[table_field.table_id].append(FieldInfo(
+                field_name=table_field.field_name,
+                data_type=table_field.data_type,
+                display_name=table_field.display_name,
+                aliases=aliases.get(table_field.id, []),
+                is_aggregatable=table_field.is_aggregatable is not False,
+                dictionary_values=dict(dictionary_values.get(field_dictionaries.get(table_field.id), {}))
+            ))
+
+        return [
+            TableSchema(table_name=table.table_name, fields=fields_by_table.get(table.id, []))
+            for table in tables
+        ]
+    finally:
+        db.close()
+
+
+# 全局实例
+_sql_fast_path: Optional[SQLFastPath] = None
+_sql_fast_path_lock = threading.Lock()
+
+
+def get_sql_fast_path() -> SQLFastPath:
+    """获取SQL快速通道实例（SQL_FAST_PATH_ENABLED / SQL_FAST_PATH_THRESHOLD 环境变量配置）"""
+    global _sql_fast_path
+    if _sql_fast_path is None:
+        with _sql_fast_path_lock:
+            if _sql_fast_path is None:
+                _sql_fast_path = SQLFastPath(
+                    confidence_threshold=float(os.getenv('SQL_FAST_PATH_THRESHOLD', '0.85')),
+                    enabled=os.getenv('SQL_FAST_PATH_ENABLED', 'true').lower() == 'true'
+                )
+    return _sql_fast_path
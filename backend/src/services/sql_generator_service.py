@@ -3,22 +3,48 @@ SQL生成服务
 
 任务 5.4.1 的核心实现
 基于云端Qwen模型实现SQL生成，注入完整的五模块语义上下文
+
+多候选模式下一次并行生成多条候选SQL，在本地按表结构校验并通过EXPLAIN试运行，
+选出评分最高的候选；执行失败时改用下一个候选，不再回到模型重新生成
 """
 
+import asyncio
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from datetime import datetime
 
 from src.services.ai_model_service import AIModelService, ModelType
 from src.services.semantic_context_aggregator import SemanticContextAggregator
-from src.services.prompt_template_manager import enhanced_prompt_manager
-from src.services.sql_security_validator import SQLSecurityValidator
+from src.services.prompt_fragments import assemble_prompt, get_prompt_fragment_cache
+from src.services.query_cost_estimator import CostAction, QueryCostEstimator
+from src.services.sql_fast_path import get_sql_fast_path
+from src.services.sql_executor_service import (
+    QueryResult,
+    SQLExecutionError,
+    SQLExecutorService,
+    build_data_source_config
+)
+from src.services.sql_security_validator import (
+    SecurityLevel,
+    SQLSecurityService,
+    SQLSecurityValidator,
+    ValidationResult,
+    normalize_sql
+)
 
 logger = logging.getLogger(__name__)
 
+# 多候选生成时各候选使用的采样温度（第一个候选与单候选模式相同）
+CANDIDATE_TEMPERATURES = (0.1, 0.4, 0.7, 0.9)
+
+# 候选评分：违规按级别扣分，成本评估建议加限制或澄清时扣分，通过EXPLAIN试运行的候选加分
+VIOLATION_PENALTIES = {SecurityLevel.WARNING: 10.0, SecurityLevel.DANGEROUS: 30.0}
+COST_ACTION_PENALTIES = {CostAction.ADD_LIMIT: 10.0, CostAction.CLARIFY: 30.0}
+EXPLAIN_VERIFIED_BONUS = 10.0
+
 
 class SQLDialect(Enum):
     """SQL方言类型"""
@@ -36,6 +62,7 @@ class SQLGenerationRequest:
     sql_dialect: SQLDialect = SQLDialect.MYSQL
     include_explanation: bool = True
     max_rows: Optional[int] = 1000
+    candidate_count: int = 1  # 大于1时启用多候选生成
 
 
 @dataclass
@@ -49,6 +76,35 @@ class SQLGenerationResult:
     generation_time: float
     semantic_context_used: Dict[str, Any]
     validation_result: Optional[Dict[str, Any]] = None
+    candidates: Optional[List[Dict[str, Any]]] = None  # 多候选模式下按评分排序的候选
+
+
+@dataclass
+class SQLCandidate:
+    """多候选生成中的单条候选SQL"""
+    sql: str
+    response: str
+    temperature: float
+    validation_result: Dict[str, Any]
+    cost_estimate: Optional[Dict[str, Any]] = None
+    score: float = 0.0
+    rejected_reason: Optional[str] = None
+    
+    @property
+    def is_valid(self) -> bool:
+        return self.rejected_reason is None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            "sql": self.sql,
+            "temperature": self.temperature,
+            "score": self.score,
+            "is_valid": self.is_valid,
+            "rejected_reason": self.rejected_reason,
+            "validation_result": self.validation_result,
+            "cost_estimate": self.cost_estimate
+        }
 
 
 class SQLGeneratorService:
@@ -76,6 +132,13 @@ class SQLGeneratorService:
         self.semantic_aggregator = SemanticContextAggregator()
         self.sql_validator = SQLSecurityValidator()
         
+        # 多候选模式：按数据源表结构校验候选，并通过EXPLAIN试运行
+        self.sql_security = SQLSecurityService()
+        self.cost_estimator = QueryCostEstimator()
+        
+        # 模板SQL快速通道：常见聚合/趋势/Top-N问题不调用云端模型
+        self.fast_path = get_sql_fast_path()
+        
         # 统计信息
         self.generation_stats = {
             "total_generations": 0,
@@ -105,23 +168,36 @@ class SQLGeneratorService:
         try:
             logger.info(f"开始SQL生成，用户问题: {request.user_question[:100]}...")
             
+            # 0. 模板快速通道，置信度不足时继续走云端模型（快速通道单独统计，不计入模型生成统计）
+            fast_result = await self._try_fast_path(request, start_time)
+            if fast_result is not None:
+                return fast_result
+            
             # 1. 获取完整的五模块语义上下文
             semantic_context = await self._get_semantic_context(request)
             
             # 2. 构建SQL生成Prompt
             prompt = await self._build_sql_generation_prompt(request, semantic_context)
             
-            # 3. 调用Qwen模型生成SQL
-            sql_response = await self._generate_sql_with_qwen(prompt, request)
-            
-            # 4. 提取和验证SQL
-            sql = self._extract_sql_from_response(sql_response)
-            validation_result = await self._validate_sql(sql, request)
+            # 3. 调用Qwen模型生成SQL（多候选模式下并行生成并在本地验证择优）
+            candidates = None
+            if request.candidate_count > 1:
+                candidates = await self._generate_ranked_candidates(prompt, request)
+                best = candidates[0]
+                sql_response, sql, validation_result = best.response, best.sql, best.validation_result
+            else:
+                sql_response = await self._generate_sql_with_qwen(prompt, request)
+                
+                # 4. 提取和验证SQL
+                sql = self._extract_sql_from_response(sql_response)
+                validation_result = await self._validate_sql(sql, request)
             
             # 5. 解析生成结果
             result = self._parse_generation_result(
                 sql, sql_response, semantic_context, validation_result, start_time
             )
+            if candidates is not None:
+                result.candidates = [candidate.to_dict() for candidate in candidates]
             
             # 6. 更新统计信息
             self._update_generation_stats(result, True)
@@ -145,6 +221,38 @@ class SQLGeneratorService:
                 validation_result={"is_valid": False, "error": str(e)}
             )
     
+    async def _try_fast_path(
+        self,
+        request: SQLGenerationRequest,
+        start_time: float
+    ) -> Optional[SQLGenerationResult]:
+        """尝试用模板快速通道生成SQL，未命中时返回None"""
+        fast_sql = await asyncio.to_thread(
+            self.fast_path.generate,
+            request.user_question,
+            data_source_id=request.data_source_id,
+            table_ids=request.table_ids,
+            dialect=request.sql_dialect.value,
+            max_rows=request.max_rows
+        )
+        if fast_sql is None:
+            return None
+        
+        validation_result = await self._validate_sql(fast_sql.sql, request)
+        if not validation_result.get("is_valid"):
+            return None
+        
+        return SQLGenerationResult(
+            sql=fast_sql.sql,
+            explanation=f"根据查询模板（{fast_sql.template}）生成",
+            estimated_rows=request.max_rows or 0,
+            execution_plan="",
+            confidence=fast_sql.confidence,
+            generation_time=time.time() - start_time,
+            semantic_context_used={"source": "fast_path", **fast_sql.to_dict()},
+            validation_result=validation_result
+        )
+    
     async def _get_semantic_context(
         self,
         request: SQLGenerationRequest
@@ -179,56 +287,47 @@ class SQLGeneratorService:
         request: SQLGenerationRequest,
         semantic_context: Dict[str, Any]
     ) -> str:
-        """构建SQL生成Prompt"""
-        try:
-            # 使用Prompt模板管理器
-            prompt_variables = {
-                "user_question": request.user_question,
-                "semantic_context": semantic_context["enhanced_context"],
-                "sql_dialect": request.sql_dialect.value,
-                "max_rows": request.max_rows or 1000,
-                "include_explanation": request.include_explanation
-            }
-            
-            # 尝试使用模板管理器
-            try:
-                prompt = enhanced_prompt_manager.getPrompt("sql_generation", prompt_variables)
-            except Exception:
-                # 降级到基础Prompt
-                prompt = self._build_basic_sql_prompt(request, semantic_context)
-            
-            return prompt
-            
-        except Exception as e:
-            logger.error(f"构建SQL生成Prompt失败: {str(e)}")
-            return self._build_basic_sql_prompt(request, semantic_context)
+        """构建SQL生成Prompt（由缓存片段拼接）"""
+        return self._build_basic_sql_prompt(request, semantic_context)
     
     def _build_basic_sql_prompt(
         self,
         request: SQLGenerationRequest,
         semantic_context: Dict[str, Any]
     ) -> str:
-        """构建基础SQL生成Prompt"""
-        dialect_syntax = self._get_dialect_syntax(request.sql_dialect)
+        """
+        构建基础SQL生成Prompt
         
-        prompt = f"""
-你是一个专业的SQL查询生成专家。请根据用户问题和提供的语义上下文生成准确的SQL查询。
-
-用户问题：{request.user_question}
-
-语义上下文：
-{semantic_context["enhanced_context"]}
+        由片段拼接：方言规则和输出格式（按方言和行数上限缓存）在前，语义上下文居中，用户问题在最后，
+        同一数据源不同问题的Prompt前缀逐字节一致
+        """
+        rules = get_prompt_fragment_cache().get_or_build(
+            "sql_rules",
+            (request.sql_dialect.value, request.max_rows),
+            lambda: self._build_sql_rules(request.sql_dialect, request.max_rows)
+        )
+        return assemble_prompt(
+            rules,
+            f"语义上下文：\n{semantic_context['enhanced_context']}",
+            f"用户问题：{request.user_question}\n"
+        )
+    
+    def _build_sql_rules(self, dialect: SQLDialect, max_rows: Optional[int]) -> str:
+        """构建与问题无关的角色、方言规则和输出格式片段"""
+        dialect_syntax = self._get_dialect_syntax(dialect)
+        
+        return f"""你是一个专业的SQL查询生成专家。请根据用户问题和提供的语义上下文生成准确的SQL查询。
 
-数据库类型：{request.sql_dialect.value}
+数据库类型：{dialect.value}
 SQL语法要求：
 {dialect_syntax}
 
 请生成符合以下要求的SQL查询：
-1. 语法正确，符合{request.sql_dialect.value}数据库规范
+1. 语法正确，符合{dialect.value}数据库规范
 2. 字段名和表名准确，避免字段幻觉
 3. 查询逻辑符合用户需求
 4. 包含必要的WHERE条件和GROUP BY子句
-5. 结果集大小合理（建议添加LIMIT {request.max_rows}）
+5. 结果集大小合理（建议添加LIMIT {max_rows}）
 6. 使用正确的SQL方言语法
 
 请以JSON格式返回结果：
@@ -238,9 +337,7 @@ SQL语法要求：
     "estimated_rows": "预估结果行数",
     "execution_plan": "执行计划说明",
     "confidence": 0.95
-}}
-"""
-        return prompt
+}}"""
     
     def _get_dialect_syntax(self, dialect: SQLDialect) -> str:
         """获取SQL方言语法说明"""
@@ -269,9 +366,10 @@ SQL语法要求：
     async def _generate_sql_with_qwen(
         self,
         prompt: str,
-        request: SQLGenerationRequest
+        request: SQLGenerationRequest,
+        temperature: float = 0.1
     ) -> str:
-        """使用Qwen模型生成SQL"""
+        """使用Qwen模型生成SQL（默认使用较低温度确保结果稳定）"""
         try:
             if self.ai_service is None:
                 raise Exception("AI服务未初始化")
@@ -279,7 +377,7 @@ SQL语法要求：
             # 调用Qwen模型
             response = await self.ai_service.generate_sql(
                 prompt=prompt,
-                temperature=0.1,  # 使用较低温度确保结果稳定
+                temperature=temperature,
                 max_tokens=2000
             )
             
@@ -331,22 +429,7 @@ SQL语法要求：
             # 使用SQL安全验证器
             validation_result = self.sql_validator.validate_sql(sql)
             
-            return {
-                "is_valid": validation_result.is_valid,
-                "security_level": validation_result.security_level.value,
-                "violations": [
-                    {
-                        "level": v.level.value,
-                        "type": v.type,
-                        "message": v.message
-                    }
-                    for v in validation_result.violations
-                ],
-                "complexity": {
-                    "score": validation_result.complexity.complexity_score,
-                    "estimated_cost": validation_result.complexity.estimated_cost
-                }
-            }
+            return self._validation_to_dict(validation_result)
             
         except Exception as e:
             logger.error(f"SQL验证失败: {str(e)}")
@@ -355,6 +438,217 @@ SQL语法要求：
                 "error": str(e)
             }
     
+    def _validation_to_dict(self, validation_result: ValidationResult) -> Dict[str, Any]:
+        """将验证结果转换为字典格式"""
+        return {
+            "is_valid": validation_result.is_valid,
+            "security_level": validation_result.security_level.value,
+            "violations": [
+                {
+                    "level": v.level.value,
+                    "type": v.type,
+                    "message": v.message
+                }
+                for v in validation_result.violations
+            ],
+            "complexity": {
+                "score": validation_result.complexity.complexity_score,
+                "estimated_cost": validation_result.complexity.estimated_cost
+            }
+        }
+    
+    async def _generate_ranked_candidates(
+        self,
+        prompt: str,
+        request: SQLGenerationRequest
+    ) -> List[SQLCandidate]:
+        """
+        多候选生成：以不同采样温度并行生成候选SQL，在本地并行验证后按评分排序
+        
+        Returns:
+            List[SQLCandidate]: 有效候选在前、按评分从高到低排序，同分时低温度候选在前
+        """
+        count = max(1, min(request.candidate_count, len(CANDIDATE_TEMPERATURES)))
+        temperatures = CANDIDATE_TEMPERATURES[:count]
+        responses = await asyncio.gather(
+            *(self._generate_sql_with_qwen(prompt, request, temperature=t) for t in temperatures),
+            return_exceptions=True
+        )
+        
+        # 提取SQL并按规范化形式去重，相同的候选只验证一次
+        drafts = []
+        seen = set()
+        for temperature, response in zip(temperatures, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"候选SQL生成失败 (temperature={temperature}): {str(response)}")
+                continue
+            try:
+                sql = self._extract_sql_from_response(response)
+            except Exception as e:
+                logger.warning(f"候选SQL提取失败 (temperature={temperature}): {str(e)}")
+                continue
+            normalized = normalize_sql(sql)
+            if normalized not in seen:
+                seen.add(normalized)
+                drafts.append((sql, response, temperature))
+        
+        if not drafts:
+            raise Exception("所有候选SQL均生成失败")
+        
+        available_tables, data_source_config = await self._load_candidate_validation_context(
+            request.data_source_id
+        )
+        candidates = await asyncio.gather(*(
+            self._evaluate_candidate(sql, response, temperature, available_tables, data_source_config)
+            for sql, response, temperature in drafts
+        ))
+        
+        ranked = sorted(candidates, key=lambda candidate: (not candidate.is_valid, -candidate.score))
+        logger.info(
+            f"多候选生成完成: 生成 {len(temperatures)} 条，去重后 {len(drafts)} 条，"
+            f"有效 {sum(1 for c in ranked if c.is_valid)} 条"
+        )
+        return ranked
+    
+    async def _load_candidate_validation_context(
+        self,
+        data_source_id: Optional[str]
+    ) -> Tuple[Optional[Dict[str, List[str]]], Optional[Dict[str, Any]]]:
+        """加载候选校验所需的数据源表结构和连接配置，没有数据源时只做安全校验"""
+        if not data_source_id:
+            return None, None
+        
+        available_tables = await self.sql_security.get_available_tables(data_source_id)
+        # 同步数据库查询放到线程池执行，避免阻塞事件循环
+        data_source_config = await asyncio.to_thread(self._get_data_source_config, data_source_id)
+        return available_tables or None, data_source_config
+    
+    def _get_data_source_config(self, data_source_id: str) -> Optional[Dict[str, Any]]:
+        """获取数据库类型数据源的连接配置（用于EXPLAIN试运行）"""
+        from src.database import SessionLocal
+        from src.models.data_source_model import DataSource
+        
+        db = SessionLocal()
+        try:
+            data_source = db.get(DataSource, str(data_source_id))
+            if not data_source or data_source.source_type != 'DATABASE':
+                return None
+            return build_data_source_config(data_source)
+        except Exception as e:
+            logger.warning(f"获取数据源 {data_source_id} 的连接配置失败: {str(e)}")
+            return None
+        finally:
+            db.close()
+    
+    async def _evaluate_candidate(
+        self,
+        sql: str,
+        response: str,
+        temperature: float,
+        available_tables: Optional[Dict[str, List[str]]],
+        data_source_config: Optional[Dict[str, Any]]
+    ) -> SQLCandidate:
+        """验证单条候选：按表结构做安全和存在性校验，通过后EXPLAIN试运行并评分"""
+        validation_result = self.sql_validator.validate_sql(sql, available_tables)
+        candidate = SQLCandidate(
+            sql=sql,
+            response=response,
+            temperature=temperature,
+            validation_result=self._validation_to_dict(validation_result)
+        )
+        
+        if not validation_result.is_valid:
+            candidate.rejected_reason = "; ".join(
+                v.message for v in validation_result.violations if v.level == SecurityLevel.BLOCKED
+            ) or "SQL验证未通过"
+            return candidate
+        
+        score = 100.0 - sum(VIOLATION_PENALTIES.get(v.level, 0.0) for v in validation_result.violations)
+        score -= validation_result.complexity.complexity_score * 0.1
+        
+        if data_source_config:
+            estimate = await self.cost_estimator.estimate(sql, data_source_config)
+            candidate.cost_estimate = estimate.to_dict()
+            if estimate.statement_error:
+                candidate.rejected_reason = f"EXPLAIN试运行失败: {estimate.statement_error}"
+                candidate.validation_result.update(is_valid=False, error=candidate.rejected_reason)
+                return candidate
+            if estimate.available:
+                score += EXPLAIN_VERIFIED_BONUS - COST_ACTION_PENALTIES.get(estimate.action, 0.0)
+        
+        candidate.score = round(score, 2)
+        return candidate
+    
+    async def generate_and_execute(
+        self,
+        request: SQLGenerationRequest,
+        executor: SQLExecutorService
+    ) -> Tuple[SQLGenerationResult, QueryResult]:
+        """
+        生成SQL并执行评分最高的有效候选
+        
+        候选执行失败时直接改用下一个已验证的候选，不再调用模型重新生成
+        
+        Returns:
+            Tuple[SQLGenerationResult, QueryResult]: 生成结果（sql为实际执行的候选）和查询结果
+        
+        Raises:
+            SQLExecutionError: 数据源不可执行、没有有效候选或全部候选执行失败
+        """
+        if not request.data_source_id:
+            raise SQLExecutionError("执行SQL需要指定数据源", error_code="NO_DATA_SOURCE")
+        data_source_config = await asyncio.to_thread(self._get_data_source_config, request.data_source_id)
+        if not data_source_config:
+            raise SQLExecutionError(
+                f"数据源 {request.data_source_id} 不存在或不是数据库类型", error_code="NO_DATA_SOURCE"
+            )
+        
+        result = await self.generate_sql(request)
+        query_result = await self.execute_best_candidate(result, executor, data_source_config)
+        return result, query_result
+    
+    async def execute_best_candidate(
+        self,
+        result: SQLGenerationResult,
+        executor: SQLExecutorService,
+        data_source_config: Dict[str, Any]
+    ) -> QueryResult:
+        """
+        执行生成结果中评分最高的SQL，执行失败时依次改用后续有效候选
+        
+        成本过高被拒绝时直接抛出（需要请求用户澄清，换用其他候选没有意义）。
+        执行器本身不做安全校验，未通过校验的SQL一律不执行
+        
+        Returns:
+            QueryResult: 查询结果，metadata中的candidate_index为实际执行的候选序号
+        """
+        if result.candidates is not None:
+            sqls = [candidate["sql"] for candidate in result.candidates if candidate["is_valid"]]
+        elif result.sql and (result.validation_result or {}).get("is_valid"):
+            sqls = [result.sql]
+        else:
+            sqls = []
+        if not sqls:
+            raise SQLExecutionError("没有可执行的SQL", error_code="NO_VALID_SQL")
+        
+        last_error = None
+        for index, sql in enumerate(sqls):
+            try:
+                query_result = await executor.execute_query(sql, data_source_config)
+            except SQLExecutionError as e:
+                # 成本过高或数据源熔断时，换一个候选也不会成功
+                if e.error_code in ("QUERY_TOO_EXPENSIVE", "CIRCUIT_OPEN"):
+                    raise
+                logger.warning(f"候选SQL {index + 1}/{len(sqls)} 执行失败: {str(e)}")
+                last_error = e
+                continue
+            
+            result.sql = sql
+            query_result.metadata = {**(query_result.metadata or {}), "candidate_index": index}
+            return query_result
+        
+        raise last_error
+    
     def _parse_generation_result(
         self,
         sql: str,
@@ -452,5 +746,6 @@ SQL语法要求：
             "average_generation_time": self.generation_stats["average_generation_time"],
             "average_confidence": self.generation_stats["average_confidence"],
             "syntax_correctness_rate": self.generation_stats["syntax_correctness_rate"],
-            "semantic_accuracy_rate": self.generation_stats["semantic_accuracy_rate"]
+            "semantic_accuracy_rate": self.generation_stats["semantic_accuracy_rate"],
+            "fast_path": self.fast_path.get_statistics()
         }
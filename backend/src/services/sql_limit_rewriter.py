@@ -0,0 +1,455 @@
+"""
+SQL行数限制改写器
+
+基于sqlparse的token流分析查询的顶层结构，按数据库方言注入或收紧行数限制
+（MySQL/PostgreSQL使用LIMIT，SQL Server使用TOP或OFFSET FETCH），
+让数据库只计算和传输需要的行，而不是在结果返回后再截断。
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Any
+
+import sqlparse
+from sqlparse.tokens import Keyword, Name, Punctuation, Number, DML, Comment
+
+logger = logging.getLogger(__name__)
+
+# 聚合函数（无GROUP BY时只返回一行）
+AGGREGATE_FUNCTIONS = {'COUNT', 'SUM', 'AVG', 'MIN', 'MAX'}
+
+# 集合运算
+SET_OPERATORS = {'UNION', 'UNION ALL', 'INTERSECT', 'EXCEPT', 'MINUS'}
+
+# 改写策略
+STRATEGY_NONE = "none"                  # 无需改写
+STRATEGY_APPEND = "append"              # 追加LIMIT/OFFSET FETCH
+STRATEGY_TIGHTEN = "tighten"            # 收紧已有限制
+STRATEGY_TOP = "top"                    # 插入TOP
+STRATEGY_WRAP = "wrap"                  # 包装为子查询
+STRATEGY_SINGLE_ROW = "single_row"      # 无分组聚合，结果只有一行
+STRATEGY_UNSUPPORTED = "unsupported"    # 非查询语句或无法安全改写
+
+
+def quote_identifier(name: str, db_type: Any) -> str:
+    """
+    按数据库方言为标识符加引号，支持schema.table形式
+
+    Args:
+        name: 标识符
+        db_type: 数据库类型（DatabaseType或其值）
+
+    Returns:
+        str: 加引号后的标识符
+    """
+    dialect = getattr(db_type, 'value', db_type)
+    parts = name.split('.')
+    if dialect == 'sqlserver':
+        return '.'.join('[' + part.replace(']', ']]') + ']' for part in parts)
+    if dialect in ('postgresql', 'embedded'):
+        return '.'.join('"' + part.replace('"', '""') + '"' for part in parts)
+    return '.'.join('`' + part.replace('`', '``') + '`' for part in parts)
+
+
+@dataclass
+class LimitRewriteResult:
+    """行数限制改写结果"""
+    sql: str
+    limit: Optional[int]
+    original_limit: Optional[int] = None
+    rewritten: bool = False
+    strategy: str = STRATEGY_NONE
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            'limit': self.limit,
+            'original_limit': self.original_limit,
+            'rewritten': self.rewritten,
+            'strategy': self.strategy
+        }
+
+
+@dataclass
+class _TopLevelStructure:
+    """查询顶层（括号外）结构"""
+    tokens: List[Any]
+    is_query: bool = False
+    select_index: Optional[int] = None      # 主SELECT关键字位置
+    top_insert_index: Optional[int] = None  # TOP插入位置（SELECT/DISTINCT之后）
+    limit_count_index: Optional[int] = None
+    limit_all_index: Optional[int] = None   # PostgreSQL LIMIT ALL（不限行数）中ALL的位置
+    offset_index: Optional[int] = None
+    top_count_index: Optional[int] = None
+    top_percent: bool = False
+    fetch_count_index: Optional[int] = None
+    has_fetch: bool = False                 # FETCH FIRST/NEXT（省略行数时为1行）
+    parameterized_limit: bool = False       # LIMIT/FETCH/TOP的行数为占位符（LIMIT ? / LIMIT %s）
+    has_set_operator: bool = False
+    has_order_by: bool = False
+    order_by_index: Optional[int] = None
+    has_group_by: bool = False
+    has_aggregate: bool = False
+    has_window: bool = False
+    has_distinct: bool = False
+    has_trailing_clause: bool = False       # FOR UPDATE / LOCK IN SHARE MODE / INTO 等无法安全改写的子句
+
+    def count_at(self, index: Optional[int]) -> Optional[int]:
+        if index is None:
+            return None
+        return int(self.tokens[index].value)
+
+    @property
+    def has_row_limit(self) -> bool:
+        return (self.limit_count_index is not None
+                or self.limit_all_index is not None
+                or self.top_count_index is not None
+                or self.has_fetch
+                or self.offset_index is not None
+                or self.parameterized_limit)
+
+
+class SQLLimitRewriter:
+    """SQL行数限制改写器"""
+
+    WRAP_ALIAS = "_limited"
+
+    def apply_limit(self, sql: str, limit: int, db_type: Any) -> LimitRewriteResult:
+        """
+        为查询注入或收紧行数限制
+
+        Args:
+            sql: SQL查询语句
+            limit: 最大行数
+            db_type: 数据库类型（DatabaseType或其值）
+
+        Returns:
+            LimitRewriteResult: 改写结果
+        """
+        dialect = getattr(db_type, 'value', db_type)
+        sql = self._strip_trailing(sql)
+
+        try:
+            structure = self._scan(sql)
+        except Exception as e:
+            logger.warning(f"SQL结构分析失败，跳过行数限制: {str(e)}")
+            return LimitRewriteResult(sql=sql, limit=None, strategy=STRATEGY_UNSUPPORTED)
+
+        if not structure.is_query:
+            return LimitRewriteResult(sql=sql, limit=None, strategy=STRATEGY_UNSUPPORTED)
+
+        if (structure.has_aggregate and not structure.has_group_by and not structure.has_window
+                and not structure.has_set_operator and not structure.has_distinct):
+            return LimitRewriteResult(sql=sql, limit=1, strategy=STRATEGY_SINGLE_ROW)
+
+        if dialect == 'sqlserver':
+            return self._apply_sqlserver_limit(sql, structure, limit)
+        return self._apply_standard_limit(sql, structure, limit)
+
+    def apply_pagination(
+        self,
+        sql: str,
+        offset: int,
+        limit: int,
+        db_type: Any,
+        order_columns: Optional[List[str]] = None
+    ) -> str:
+        """
+        为查询添加分页，已有行数限制时包装为子查询，避免生成重复的LIMIT
+
+        Args:
+            sql: SQL查询语句
+            offset: 偏移量
+            limit: 每页行数
+            db_type: 数据库类型（DatabaseType或其值）
+            order_columns: 唯一排序键，查询没有ORDER BY时用于保证分页结果确定
+
+        Returns:
+            str: 分页后的SQL
+        """
+        dialect = getattr(db_type, 'value', db_type)
+        sql = self._strip_trailing(sql)
+        structure = self._scan(sql)
+
+        if structure.has_row_limit:
+            sql = f"SELECT * FROM ({sql}) AS {self.WRAP_ALIAS}"
+            structure.has_order_by = False
+
+        if not structure.has_order_by:
+            if order_columns:
+                sql += " ORDER BY " + ", ".join(quote_identifier(c, dialect) for c in order_columns)
+            elif dialect == 'sqlserver':
+                sql += " ORDER BY (SELECT NULL)"
+
+        if dialect == 'sqlserver':
+            return f"{sql} OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY;"
+        return f"{sql} LIMIT {limit} OFFSET {offset};"
+
+    def strip_order_by(self, sql: str) -> str:
+        """
+        去掉查询末尾的顶层ORDER BY（用于包装为子查询后重新排序）
+
+        带LIMIT/TOP/OFFSET等行数限制时ORDER BY决定了结果集本身，保持不变。
+        """
+        sql = self._strip_trailing(sql)
+        structure = self._scan(sql)
+        if (structure.order_by_index is None
+                or structure.has_row_limit
+                or structure.has_trailing_clause):
+            return sql
+        return ''.join(t.value for t in structure.tokens[:structure.order_by_index]).strip()
+
+    def _apply_standard_limit(self, sql: str, structure: _TopLevelStructure, limit: int) -> LimitRewriteResult:
+        """MySQL/PostgreSQL: LIMIT（PostgreSQL的FETCH FIRST同样视为已有限制）"""
+        for count_index in (structure.limit_count_index, structure.fetch_count_index):
+            existing = structure.count_at(count_index)
+            if existing is None:
+                continue
+            if existing <= limit:
+                return LimitRewriteResult(sql=sql, limit=existing, original_limit=existing)
+            return LimitRewriteResult(
+                sql=self._replace_token(structure, count_index, limit),
+                limit=limit,
+                original_limit=existing,
+                rewritten=True,
+                strategy=STRATEGY_TIGHTEN
+            )
+        if structure.limit_all_index is not None:
+            # LIMIT ALL等价于没有限制，在原处替换为行数，避免追加出第二个LIMIT
+            return LimitRewriteResult(
+                sql=self._replace_token(structure, structure.limit_all_index, limit),
+                limit=limit,
+                rewritten=True,
+                strategy=STRATEGY_TIGHTEN
+            )
+        if structure.has_fetch and not structure.parameterized_limit:
+            # FETCH FIRST ROW ONLY
+            return LimitRewriteResult(sql=sql, limit=1, original_limit=1)
+
+        if structure.has_trailing_clause:
+            return LimitRewriteResult(sql=sql, limit=None, strategy=STRATEGY_UNSUPPORTED)
+
+        if structure.offset_index is not None or structure.parameterized_limit:
+            # 行数为占位符时无法在原处收紧，包装为子查询限制最终结果
+            return LimitRewriteResult(
+                sql=f"SELECT * FROM ({sql}) AS {self.WRAP_ALIAS} LIMIT {limit}",
+                limit=limit,
+                rewritten=True,
+                strategy=STRATEGY_WRAP
+            )
+
+        # 集合运算末尾的LIMIT作用于整个结果
+        return LimitRewriteResult(sql=f"{sql} LIMIT {limit}", limit=limit, rewritten=True, strategy=STRATEGY_APPEND)
+
+    def _apply_sqlserver_limit(self, sql: str, structure: _TopLevelStructure, limit: int) -> LimitRewriteResult:
+        """SQL Server: TOP / OFFSET FETCH"""
+        if structure.top_percent or structure.has_trailing_clause:
+            return LimitRewriteResult(sql=sql, limit=None, strategy=STRATEGY_UNSUPPORTED)
+
+        if structure.parameterized_limit:
+            return LimitRewriteResult(
+                sql=f"SELECT TOP {limit} * FROM ({sql}) AS {self.WRAP_ALIAS}",
+                limit=limit,
+                rewritten=True,
+                strategy=STRATEGY_WRAP
+            )
+
+        for count_index in (structure.fetch_count_index, structure.top_count_index):
+            existing = structure.count_at(count_index)
+            if existing is None:
+                continue
+            if existing <= limit:
+                return LimitRewriteResult(sql=sql, limit=existing, original_limit=existing)
+            return LimitRewriteResult(
+                sql=self._replace_token(structure, count_index, limit),
+                limit=limit,
+                original_limit=existing,
+                rewritten=True,
+                strategy=STRATEGY_TIGHTEN
+            )
+
+        if structure.offset_index is not None:
+            # 有OFFSET但没有FETCH
+            return LimitRewriteResult(
+                sql=f"{sql} FETCH NEXT {limit} ROWS ONLY",
+                limit=limit,
+                rewritten=True,
+                strategy=STRATEGY_APPEND
+            )
+
+        if structure.has_set_operator:
+            if structure.has_order_by:
+                return LimitRewriteResult(
+                    sql=f"{sql} OFFSET 0 ROWS FETCH NEXT {limit} ROWS ONLY",
+                    limit=limit,
+                    rewritten=True,
+                    strategy=STRATEGY_APPEND
+                )
+            return LimitRewriteResult(
+                sql=f"SELECT TOP {limit} * FROM ({sql}) AS {self.WRAP_ALIAS}",
+                limit=limit,
+                rewritten=True,
+                strategy=STRATEGY_WRAP
+            )
+
+        if structure.top_insert_index is None:
+            return LimitRewriteResult(sql=sql, limit=None, strategy=STRATEGY_UNSUPPORTED)
+
+        tokens = [t.value for t in structure.tokens]
+        tokens.insert(structure.top_insert_index, f" TOP {limit}")
+        return LimitRewriteResult(sql=''.join(tokens), limit=limit, rewritten=True, strategy=STRATEGY_TOP)
+
+    def _replace_token(self, structure: _TopLevelStructure, index: int, value: int) -> str:
+        """替换指定位置的token并重建SQL"""
+        return ''.join(
+            str(value) if i == index else token.value
+            for i, token in enumerate(structure.tokens)
+        )
+
+    def _strip_trailing(self, sql: str) -> str:
+        """去掉末尾的分号和注释（SQL以 -- 注释结尾时，追加的LIMIT会落入注释而不生效）"""
+        sql = sql.strip().rstrip(';').strip()
+        if '--' not in sql and '/*' not in sql and '#' not in sql:
+            return sql
+        tokens = [token for statement in sqlparse.parse(sql) for token in statement.flatten()]
+        end = len(tokens)
+        while end and (tokens[end - 1].is_whitespace or tokens[end - 1].ttype in Comment
+                       or tokens[end - 1].value == ';'):
+            end -= 1
+        if end == len(tokens):
+            return sql
+        return ''.join(token.value for token in tokens[:end]).strip()
+
+    def _next_significant(self, tokens: List[Any], index: int) -> Optional[int]:
+        """返回index之后第一个非空白、非注释token的位置"""
+        for i in range(index + 1, len(tokens)):
+            if not tokens[i].is_whitespace and tokens[i].ttype not in Comment:
+                return i
+        return None
+
+    def _scan(self, sql: str) -> _TopLevelStructure:
+        """单次遍历token流，收集顶层结构信息"""
+        statement = sqlparse.parse(sql)[0]
+        tokens = list(statement.flatten())
+        structure = _TopLevelStructure(tokens=tokens)
+
+        depth = 0
+        in_select_list = False
+        select_list_head = False  # 尚未遇到SELECT列表中的第一个有效token
+        expect_limit_count = False
+        expect_fetch_count = False
+
+        for i, token in enumerate(tokens):
+            if token.is_whitespace or token.ttype in Comment:
+                continue
+            ttype = token.ttype
+            value = ' '.join(token.value.upper().split())
+
+            if ttype is Punctuation and value == '(':
+                depth += 1
+                continue
+            if ttype is Punctuation and value == ')':
+                depth -= 1
+                continue
+
+            if depth > 0:
+                continue
+
+            if ttype in DML:
+                if value == 'SELECT':
+                    structure.is_query = True
+                    if structure.select_index is None:
+                        structure.select_index = i
+                        structure.top_insert_index = i + 1
+                        in_select_list = True
+                        select_list_head = True
+                elif structure.select_index is None:
+                    # INSERT/UPDATE/DELETE等非查询语句
+                    structure.is_query = False
+                    return structure
+                elif value == 'UPDATE':
+                    structure.has_trailing_clause = True
+                continue
+
+            if in_select_list:
+                at_head, select_list_head = select_list_head, False
+                if at_head and ttype in Keyword and value in ('DISTINCT', 'ALL'):
+                    structure.has_distinct = value == 'DISTINCT'
+                    structure.top_insert_index = i + 1
+                    continue
+                if ttype in Name and value == 'TOP':
+                    structure.top_insert_index = None
+                    j = self._next_significant(tokens, i)
+                    parenthesized = j is not None and tokens[j].value == '('
+                    if parenthesized:
+                        j = self._next_significant(tokens, j)
+                    if j is not None and tokens[j].ttype not in Number.Integer:
+                        # TOP (@n) / TOP ?
+                        if parenthesized or tokens[j].ttype in Name.Placeholder:
+                            structure.parameterized_limit = True
+                    elif j is not None:
+                        structure.top_count_index = j
+                        k = self._next_significant(tokens, j)
+                        if k is not None and tokens[k].value == ')':
+                            k = self._next_significant(tokens, k)
+                        if k is not None and tokens[k].value.upper() == 'PERCENT':
+                            structure.top_percent = True
+                    continue
+                if value in AGGREGATE_FUNCTIONS and (ttype in Name or ttype in Keyword):
+                    j = self._next_significant(tokens, i)
+                    if j is not None and tokens[j].value == '(':
+                        structure.has_aggregate = True
+                    continue
+                if ttype in Keyword and value == 'OVER':
+                    structure.has_window = True
+                    continue
+                if ttype in Keyword and value == 'FROM':
+                    in_select_list = False
+                    continue
+                if ttype in Keyword and value == 'INTO':
+                    structure.has_trailing_clause = True
+                    continue
+
+            if ttype not in Keyword:
+                if expect_limit_count and (ttype in Number.Integer or ttype in Name.Placeholder):
+                    # LIMIT offset, count 中以最后一个值为行数
+                    structure.parameterized_limit = ttype in Name.Placeholder
+                    structure.limit_count_index = None if structure.parameterized_limit else i
+                    j = self._next_significant(tokens, i)
+                    if j is None or tokens[j].value != ',':
+                        expect_limit_count = False
+                    continue
+                if expect_fetch_count and ttype in Number.Integer:
+                    structure.fetch_count_index = i
+                    expect_fetch_count = False
+                elif expect_fetch_count and ttype in Name.Placeholder:
+                    structure.parameterized_limit = True
+                    expect_fetch_count = False
+                continue
+
+            if expect_limit_count and value == 'ALL':
+                structure.limit_all_index = i
+                expect_limit_count = False
+                continue
+
+            if value in SET_OPERATORS:
+                structure.has_set_operator = True
+                # 集合运算后的SELECT列表不参与TOP/聚合判断
+                in_select_list = False
+            elif value == 'ORDER BY':
+                structure.has_order_by = True
+                structure.order_by_index = i
+            elif value == 'GROUP BY':
+                structure.has_group_by = True
+            elif value == 'LIMIT':
+                expect_limit_count = True
+            elif value == 'OFFSET':
+                expect_limit_count = False
+                structure.offset_index = i
+            elif value == 'FETCH':
+                structure.has_fetch = True
+                expect_fetch_count = True
+            elif value in ('FOR', 'LOCK', 'INTO', 'PROCEDURE'):
+                structure.has_trailing_clause = True
+
+        return structure
@@ -17,6 +17,11 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from src.services.ai_model_service import AIModelService, ModelRequest, TaskType
 from src.services.prompt_manager import PromptManager, PromptType
+from src.services.sql_error_matcher import (
+    ClassificationCache,
+    CompiledPatternMatcher,
+    normalize_error_message
+)
 from src.utils import logger
 
 
@@ -63,10 +68,24 @@ class RecoveryResult:
     recovery_time: Optional[float] = None
 
 
+# 从错误信息中提取表名、字段名和行号的模式
+TABLE_NAME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"table\s+['\"]?(\w+)['\"]?",
+    r"from\s+['\"]?(\w+)['\"]?",
+    r"['\"]?(\w+)['\"]?\s+doesn't exist"
+))
+FIELD_NAME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"column\s+['\"]?(\w+)['\"]?",
+    r"field\s+['\"]?(\w+)['\"]?",
+    r"['\"]?(\w+)['\"]?\s+doesn't exist"
+))
+LINE_NUMBER_PATTERN = re.compile(r"line\s+(\d+)", re.IGNORECASE)
+
+
 class SQLErrorClassifier:
     """SQL错误分类器"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
         # 错误模式匹配规则
         self.error_patterns = {
             SQLErrorType.SYNTAX_ERROR: [
@@ -118,19 +137,61 @@ class SQLErrorClassifier:
                 r"connection refused"
             ]
         }
+        
+        # 按错误类型顺序展开并预编译；分类结果（错误类型和提取的表名、字段名、行号）按规范化错误消息缓存
+        self._matcher: Optional[CompiledPatternMatcher] = None
+        self._matcher_signature: Optional[tuple] = None
+        self._pattern_types: List[SQLErrorType] = []
+        self._classification_cache = ClassificationCache(max_size=cache_size)
+    
+    def _get_matcher(self) -> CompiledPatternMatcher:
+        """获取预编译的匹配器，错误模式被替换或增删后重新编译并清空分类缓存"""
+        signature = (id(self.error_patterns), tuple(
+            (error_type, len(patterns)) for error_type, patterns in self.error_patterns.items()
+        ))
+        if self._matcher is None or signature != self._matcher_signature:
+            flattened = [
+                (error_type, pattern)
+                for error_type, patterns in self.error_patterns.items()
+                for pattern in patterns
+            ]
+            self._matcher = CompiledPatternMatcher([pattern for _, pattern in flattened])
+            self._matcher_signature = signature
+            self._pattern_types = [error_type for error_type, _ in flattened]
+            self._classification_cache.clear()
+        return self._matcher
     
     def classify_error(self, error_message: str, sql: str) -> SQLError:
         """分类SQL错误"""
-        error_message_lower = error_message.lower()
-        
-        # 尝试匹配错误类型
-        for error_type, patterns in self.error_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, error_message_lower):
-                    return self._create_sql_error(error_type, sql, error_message)
+        matcher = self._get_matcher()
+        normalized = normalize_error_message(error_message)
+        details = self._classification_cache.get(normalized)
+        
+        if details is None:
+            # 尝试匹配错误类型，没有匹配到时为未知错误
+            matched = matcher.match(normalized)
+            error_type = self._pattern_types[matched[0]] if matched else SQLErrorType.UNKNOWN_ERROR
+            details = (
+                error_type,
+                self._extract_table_name(error_message),
+                self._extract_field_name(error_message),
+                self._extract_line_number(error_message)
+            )
+            self._classification_cache.put(normalized, details)
         
-        # 如果没有匹配到，返回未知错误
-        return self._create_sql_error(SQLErrorType.UNKNOWN_ERROR, sql, error_message)
+        error_type, table_name, field_name, line_number = details
+        return SQLError(
+            error_type=error_type,
+            original_sql=sql,
+            error_message=error_message,
+            table_name=table_name,
+            field_name=field_name,
+            line_number=line_number
+        )
+    
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        """获取分类缓存统计"""
+        return self._classification_cache.get_stats()
     
     def _create_sql_error(self, error_type: SQLErrorType, sql: str, error_message: str) -> SQLError:
         """创建SQL错误对象"""
@@ -150,14 +211,8 @@ class SQLErrorClassifier:
     
     def _extract_table_name(self, error_message: str) -> Optional[str]:
         """从错误信息中提取表名"""
-        patterns = [
-            r"table\s+['\"]?(\w+)['\"]?",
-            r"from\s+['\"]?(\w+)['\"]?",
-            r"['\"]?(\w+)['\"]?\s+doesn't exist"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, error_message, re.IGNORECASE)
+        for pattern in TABLE_NAME_PATTERNS:
+            match = pattern.search(error_message)
             if match:
                 return match.group(1)
         
@@ -165,14 +220,8 @@ class SQLErrorClassifier:
     
     def _extract_field_name(self, error_message: str) -> Optional[str]:
         """从错误信息中提取字段名"""
-        patterns = [
-            r"column\s+['\"]?(\w+)['\"]?",
-            r"field\s+['\"]?(\w+)['\"]?",
-            r"['\"]?(\w+)['\"]?\s+doesn't exist"
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, error_message, re.IGNORECASE)
+        for pattern in FIELD_NAME_PATTERNS:
+            match = pattern.search(error_message)
             if match:
                 return match.group(1)
         
@@ -180,8 +229,7 @@ class SQLErrorClassifier:
     
     def _extract_line_number(self, error_message: str) -> Optional[int]:
         """从错误信息中提取行号"""
-        pattern = r"line\s+(\d+)"
-        match = re.search(pattern, error_message, re.IGNORECASE)
+        match = LINE_NUMBER_PATTERN.search(error_message)
         if match:
             return int(match.group(1))
         return None
@@ -6,16 +6,58 @@ SQL安全校验和字段验证服务
 """
 
 import re
+import copy
+import asyncio
 import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from typing import Dict, List, Set, Tuple, Optional, Any
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from sqlparse import parse, sql
-from sqlparse.tokens import Keyword, Name, Punctuation
+from sqlparse.tokens import Keyword, Name, Punctuation, Wildcard, Comment, String, DML, DDL
 import sqlparse
 
 logger = logging.getLogger(__name__)
 
+# 匹配字符串字面量或空白，用于在不改变字面量内容的前提下规范化SQL
+_NORMALIZE_PATTERN = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|\s+")
+
+# 进入表引用上下文的关键字
+_TABLE_CONTEXT_KEYWORDS = {'FROM', 'INTO', 'UPDATE'}
+
+# 切换子句上下文的关键字
+_CLAUSE_KEYWORDS = {
+    'WHERE', 'GROUP BY', 'ORDER BY', 'HAVING', 'LIMIT', 'OFFSET', 'ON', 'USING',
+    'UNION', 'UNION ALL', 'INTERSECT', 'EXCEPT', 'SET', 'VALUES', 'FETCH'
+}
+
+# 被sqlparse识别为关键字的聚合函数名
+_KEYWORD_FUNCTIONS = {'COUNT', 'SUM', 'AVG', 'MAX', 'MIN'}
+
+# SELECT列表中不是字段的名称
+_SELECT_MODIFIERS = {'TOP', 'DISTINCT', 'ALL'}
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    规范化SQL文本，用作缓存键
+
+    折叠字符串字面量以外的连续空白并去掉末尾分号，字面量内容保持不变。
+
+    Args:
+        sql_query: SQL查询语句
+
+    Returns:
+        str: 规范化后的SQL
+    """
+    def _replace(match: re.Match) -> str:
+        text = match.group(0)
+        return ' ' if text.isspace() else text
+
+    normalized = _NORMALIZE_PATTERN.sub(_replace, sql_query.strip())
+    return normalized.rstrip('; ').strip()
+
 
 class SecurityLevel(Enum):
     """安全级别枚举"""
@@ -89,10 +131,206 @@ class ValidationResult:
     sanitized_sql: Optional[str] = None
 
 
+@dataclass
+class StatementAnalysis:
+    """单次遍历语法树得到的分析结果"""
+    operation: SQLOperation = SQLOperation.UNKNOWN
+    table_references: List[TableReference] = field(default_factory=list)
+    field_references: List[FieldReference] = field(default_factory=list)
+    keywords: Set[str] = field(default_factory=set)
+    table_count: int = 0
+    join_count: int = 0
+    subquery_count: int = 0
+    function_count: int = 0
+    condition_count: int = 0
+
+
+class SQLStatementVisitor:
+    """
+    SQL语句访问器
+
+    对sqlparse的扁平token流做一次遍历，同时提取操作类型、表引用、
+    SELECT列表中的字段引用、危险关键词以及复杂度指标。
+    """
+
+    def __init__(self, dangerous_keywords: Set[str]):
+        self.dangerous_keywords = dangerous_keywords
+
+    @staticmethod
+    def _strip_quotes(name: str) -> str:
+        return name.strip('`"[]')
+
+    @staticmethod
+    def _is_name(token) -> bool:
+        return token.ttype in Name or token.ttype is String.Symbol
+
+    def visit(self, parsed: sql.Statement) -> StatementAnalysis:
+        """
+        遍历语句并返回分析结果
+
+        Args:
+            parsed: sqlparse解析后的语句
+
+        Returns:
+            StatementAnalysis: 分析结果
+        """
+        analysis = StatementAnalysis()
+        tokens = [
+            t for t in parsed.flatten()
+            if not t.is_whitespace and t.ttype not in Comment
+        ]
+
+        clauses = ['']            # 每层括号当前所处的子句
+        subquery_depths = set()   # 属于子查询的括号层级
+        cte_names = set()
+        expect_table = False
+        depth = 0
+        seen_tables = set()
+        i = 0
+        count = len(tokens)
+
+        while i < count:
+            token = tokens[i]
+            ttype = token.ttype
+            value = token.value.upper()
+            prev = tokens[i - 1] if i > 0 else None
+            nxt = tokens[i + 1] if i + 1 < count else None
+
+            if ttype in Keyword or ttype in Name:
+                keyword = ' '.join(value.split())
+                if keyword in self.dangerous_keywords:
+                    analysis.keywords.add(keyword)
+                elif ttype in Name and keyword.startswith(('SP_', 'XP_')):
+                    analysis.keywords.add(keyword[:3])
+
+            if ttype is Punctuation and value == '(':
+                if nxt is not None and nxt.ttype in DML and nxt.value.upper() == 'SELECT':
+                    analysis.subquery_count += 1
+                    subquery_depths.add(depth + 1)
+                depth += 1
+                clauses.append(clauses[-1] if depth not in subquery_depths else '')
+                expect_table = False
+                i += 1
+                continue
+
+            if ttype is Punctuation and value == ')':
+                subquery_depths.discard(depth)
+                depth = max(depth - 1, 0)
+                if len(clauses) > 1:
+                    clauses.pop()
+                i += 1
+                continue
+
+            if ttype is Punctuation and value == ',':
+                if clauses[-1] == 'FROM':
+                    expect_table = True
+                i += 1
+                continue
+
+            if ttype in Keyword:
+                keyword = ' '.join(value.split())
+
+                if analysis.operation == SQLOperation.UNKNOWN and (ttype in DML or ttype in DDL):
+                    try:
+                        analysis.operation = SQLOperation(keyword)
+                    except ValueError:
+                        pass
+
+                if keyword.endswith('JOIN'):
+                    analysis.join_count += 1
+                    analysis.table_count += 1
+                    clauses[-1] = 'FROM'
+                    expect_table = True
+                elif keyword in _TABLE_CONTEXT_KEYWORDS:
+                    if keyword == 'FROM':
+                        analysis.table_count += 1
+                    clauses[-1] = 'FROM'
+                    expect_table = True
+                elif keyword == 'SELECT':
+                    clauses[-1] = 'SELECT'
+                    expect_table = False
+                elif keyword in ('WHERE', 'HAVING'):
+                    analysis.condition_count += 1
+                    clauses[-1] = keyword
+                    expect_table = False
+                elif keyword in ('AND', 'OR'):
+                    analysis.condition_count += 1
+                elif keyword in _CLAUSE_KEYWORDS:
+                    clauses[-1] = keyword
+                    expect_table = False
+                elif keyword in _KEYWORD_FUNCTIONS and nxt is not None and nxt.value == '(':
+                    analysis.function_count += 1
+                i += 1
+                continue
+
+            if self._is_name(token):
+                # 函数调用
+                if nxt is not None and nxt.ttype is Punctuation and nxt.value == '(':
+                    analysis.function_count += 1
+                    i += 1
+                    continue
+
+                # CTE名称: name AS (
+                if (depth == 0 and nxt is not None and nxt.value.upper() == 'AS'
+                        and i + 2 < count and tokens[i + 2].value == '('):
+                    cte_names.add(self._strip_quotes(token.value).lower())
+                    i += 1
+                    continue
+
+                # 限定名 a.b[.c]
+                parts = [self._strip_quotes(token.value)]
+                j = i + 1
+                while (j + 1 < count and tokens[j].ttype is Punctuation and tokens[j].value == '.'
+                       and (self._is_name(tokens[j + 1]) or tokens[j + 1].ttype is Wildcard)):
+                    parts.append(self._strip_quotes(tokens[j + 1].value))
+                    j += 2
+
+                if clauses[-1] == 'FROM':
+                    if expect_table:
+                        table_name = parts[-1].lower()
+                        schema = parts[-2] if len(parts) > 1 else None
+                        alias = None
+                        k = j
+                        if k < count and tokens[k].ttype in Keyword and tokens[k].value.upper() == 'AS':
+                            k += 1
+                        if k < count and self._is_name(tokens[k]):
+                            alias = self._strip_quotes(tokens[k].value)
+                            j = k + 1
+                        if table_name not in cte_names and (table_name, alias) not in seen_tables:
+                            seen_tables.add((table_name, alias))
+                            analysis.table_references.append(
+                                TableReference(table_name=table_name, alias=alias, schema=schema)
+                            )
+                        expect_table = False
+                elif clauses[-1] == 'SELECT' and not subquery_depths.intersection(range(1, depth + 1)):
+                    is_alias = prev is not None and (
+                        prev.value.upper() == 'AS'
+                        or self._is_name(prev)
+                        or (prev.ttype is Punctuation and prev.value == ')')
+                    )
+                    if not is_alias and parts[0].upper() not in _SELECT_MODIFIERS:
+                        if len(parts) > 1:
+                            analysis.field_references.append(
+                                FieldReference(field_name=parts[-1], table_name=parts[-2])
+                            )
+                        else:
+                            analysis.field_references.append(FieldReference(field_name=parts[0]))
+                i = j
+                continue
+
+            if ttype is Wildcard and clauses[-1] == 'SELECT' and not subquery_depths.intersection(range(1, depth + 1)):
+                if not any(f.field_name == '*' for f in analysis.field_references):
+                    analysis.field_references.append(FieldReference(field_name='*'))
+
+            i += 1
+
+        return analysis
+
+
 class SQLSecurityValidator:
     """SQL安全校验器"""
     
-    def __init__(self):
+    def __init__(self, cache_max_size: int = 1024):
         self.dangerous_keywords = {
             'DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE', 'INSERT', 'UPDATE',
             'EXEC', 'EXECUTE', 'SP_', 'XP_', 'OPENROWSET', 'OPENDATASOURCE',
@@ -110,11 +348,22 @@ class SQLSecurityValidator:
             r"(\bSUBSTRING\s*\()",            # SUBSTRING函数注入
         ]
         
+        self._compiled_injection_patterns = [
+            re.compile(pattern, re.IGNORECASE) for pattern in self.injection_patterns
+        ]
+        self.visitor = SQLStatementVisitor(self.dangerous_keywords)
+        
         self.max_complexity_score = 100.0
         self.max_table_count = 10
         self.max_join_count = 8
         self.max_subquery_count = 5
         
+        # 验证结果缓存（LRU），键为规范化SQL和可用表结构指纹
+        self.cache_max_size = cache_max_size
+        self._result_cache: "OrderedDict[Tuple[str, int], ValidationResult]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
     def validate_sql(self, sql_query: str, available_tables: Dict[str, List[str]] = None) -> ValidationResult:
         """
         验证SQL查询的安全性和有效性
@@ -126,21 +375,45 @@ class SQLSecurityValidator:
         Returns:
             ValidationResult: 验证结果
         """
+        cache_key = (normalize_sql(sql_query), self._schema_fingerprint(available_tables))
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            self._result_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            # 返回副本，调用方修改结果不影响缓存
+            return copy.deepcopy(cached)
+        self.cache_misses += 1
+        
+        result = self._validate_uncached(sql_query, available_tables)
+        
+        # 解析失败的结果不缓存，避免掩盖临时性错误
+        if result.operation != SQLOperation.UNKNOWN or result.is_valid:
+            self._result_cache[cache_key] = copy.deepcopy(result)
+            if len(self._result_cache) > self.cache_max_size:
+                self._result_cache.popitem(last=False)
+        
+        return result
+    
+    def _validate_uncached(self, sql_query: str, available_tables: Optional[Dict[str, List[str]]]) -> ValidationResult:
+        """执行一次完整的SQL验证（不经过缓存）"""
         try:
             # 解析SQL
             parsed = parse(sql_query)[0]
             
+            # 单次遍历提取操作、引用、关键词和复杂度指标
+            analysis = self.visitor.visit(parsed)
+            
             # 基础验证
             violations = []
-            operation = self._detect_operation(parsed)
+            operation = analysis.operation
             
             # 安全检查
-            violations.extend(self._check_dangerous_operations(parsed, operation))
+            violations.extend(self._check_dangerous_operations(parsed, operation, analysis))
             violations.extend(self._check_sql_injection(sql_query))
             
-            # 解析表和字段引用
-            table_references = self._extract_table_references(parsed)
-            field_references = self._extract_field_references(parsed)
+            # 表和字段引用
+            table_references = analysis.table_references
+            field_references = analysis.field_references
             
             # 存在性验证
             if available_tables:
@@ -148,7 +421,7 @@ class SQLSecurityValidator:
                 violations.extend(self._validate_field_existence(field_references, table_references, available_tables))
             
             # 复杂度分析
-            complexity = self._analyze_complexity(parsed)
+            complexity = self._analyze_complexity(parsed, analysis)
             violations.extend(self._check_complexity_limits(complexity))
             
             # 确定安全级别
@@ -184,13 +457,37 @@ class SQLSecurityValidator:
                 complexity=QueryComplexity(0, 0, 0, 0, 0, 0.0, "UNKNOWN")
             )
     
-    def _detect_operation(self, parsed: sql.Statement) -> SQLOperation:
+    def _schema_fingerprint(self, available_tables: Optional[Dict[str, List[str]]]) -> int:
+        """计算可用表结构的指纹，表结构变化时缓存自动失效"""
+        if not available_tables:
+            return 0
+        return hash(tuple(sorted(
+            (table_name, tuple(fields)) for table_name, fields in available_tables.items()
+        )))
+    
+    def clear_cache(self):
+        """清空验证结果缓存"""
+        self._result_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取验证结果缓存统计"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total * 100, 2) if total > 0 else 0,
+            "size": len(self._result_cache),
+            "max_size": self.cache_max_size
+        }
+    
+    def _detect_operation(self, parsed: sql.Statement, analysis: Optional[StatementAnalysis] = None) -> SQLOperation:
         """检测SQL操作类型"""
         try:
-            # 获取第一个有意义的关键字token
-            for token in parsed.flatten():
-                if token.ttype is Keyword and token.value.upper().strip() in [op.value for op in SQLOperation]:
-                    return SQLOperation(token.value.upper().strip())
+            analysis = analysis or self.visitor.visit(parsed)
+            if analysis.operation != SQLOperation.UNKNOWN:
+                return analysis.operation
             
             # 如果没有找到，尝试从字符串中提取
             sql_text = str(parsed).strip().upper()
@@ -203,7 +500,8 @@ class SQLSecurityValidator:
             logger.debug(f"操作检测失败: {e}")
             return SQLOperation.UNKNOWN
     
-    def _check_dangerous_operations(self, parsed: sql.Statement, operation: SQLOperation) -> List[SecurityViolation]:
+    def _check_dangerous_operations(self, parsed: sql.Statement, operation: SQLOperation,
+                                    analysis: Optional[StatementAnalysis] = None) -> List[SecurityViolation]:
         """检查危险操作"""
         violations = []
         
@@ -224,10 +522,9 @@ class SQLSecurityValidator:
                 suggestion="确认是否有执行写操作的权限"
             ))
         
-        # 检查危险关键词
-        sql_text = str(parsed).upper()
-        for keyword in self.dangerous_keywords:
-            if keyword in sql_text:
+        # 检查危险关键词（基于token，字符串字面量和标识符片段不会误报）
+        analysis = analysis or self.visitor.visit(parsed)
+        for keyword in sorted(analysis.keywords):
                 violations.append(SecurityViolation(
                     level=SecurityLevel.WARNING,
                     type="DANGEROUS_KEYWORD",
@@ -241,9 +538,8 @@ class SQLSecurityValidator:
         """检查SQL注入"""
         violations = []
         
-        for pattern in self.injection_patterns:
-            matches = re.finditer(pattern, sql_query, re.IGNORECASE)
-            for match in matches:
+        for pattern in self._compiled_injection_patterns:
+            for match in pattern.finditer(sql_query):
                 violations.append(SecurityViolation(
                     level=SecurityLevel.BLOCKED,
                     type="SQL_INJECTION",
@@ -256,63 +552,19 @@ class SQLSecurityValidator:
     
     def _extract_table_references(self, parsed: sql.Statement) -> List[TableReference]:
         """提取表引用"""
-        tables = []
-        
-        # 简化的表名提取逻辑 - 从SQL文本中提取
-        sql_text = str(parsed).upper()
-        
-        # 查找FROM子句
-        from_match = re.search(r'\bFROM\s+(\w+)', sql_text)
-        if from_match:
-            table_name = from_match.group(1).lower()
-            tables.append(TableReference(table_name=table_name))
-        
-        # 查找JOIN子句
-        join_matches = re.findall(r'\bJOIN\s+(\w+)', sql_text)
-        for match in join_matches:
-            table_name = match.lower()
-            tables.append(TableReference(table_name=table_name))
-        
-        return tables
+        return self.visitor.visit(parsed).table_references
     
     def _extract_field_references(self, parsed: sql.Statement) -> List[FieldReference]:
         """提取字段引用"""
-        fields = []
-        sql_text = str(parsed)
-        
-        # 简化的字段提取逻辑 - 从SELECT子句中提取
-        select_match = re.search(r'SELECT\s+(.*?)\s+FROM', sql_text, re.IGNORECASE | re.DOTALL)
-        if select_match:
-            select_part = select_match.group(1)
-            
-            # 处理SELECT *
-            if '*' in select_part:
-                fields.append(FieldReference(field_name='*'))
-            else:
-                # 分割字段名
-                field_parts = [f.strip() for f in select_part.split(',')]
-                for field_part in field_parts:
-                    # 移除别名 (AS xxx)
-                    field_part = re.sub(r'\s+AS\s+\w+', '', field_part, flags=re.IGNORECASE)
-                    
-                    # 检查是否有表前缀
-                    if '.' in field_part:
-                        table_part, field_name = field_part.rsplit('.', 1)
-                        fields.append(FieldReference(
-                            field_name=field_name.strip(),
-                            table_name=table_part.strip()
-                        ))
-                    else:
-                        fields.append(FieldReference(field_name=field_part.strip()))
-        
-        return fields
+        return self.visitor.visit(parsed).field_references
     
     def _validate_table_existence(self, table_refs: List[TableReference], available_tables: Dict[str, List[str]]) -> List[SecurityViolation]:
         """验证表存在性"""
         violations = []
+        known_tables = {table_name.lower() for table_name in available_tables}
         
         for table_ref in table_refs:
-            if table_ref.table_name not in available_tables:
+            if table_ref.table_name.lower() not in known_tables:
                 violations.append(SecurityViolation(
                     level=SecurityLevel.BLOCKED,
                     type="TABLE_NOT_FOUND",
@@ -323,42 +575,44 @@ class SQLSecurityValidator:
         return violations
     
     def _validate_field_existence(self, field_refs: List[FieldReference], table_refs: List[TableReference], available_tables: Dict[str, List[str]]) -> List[SecurityViolation]:
-        """验证字段存在性"""
+        """验证字段存在性（表名、别名和字段名均不区分大小写）"""
         violations = []
         
+        # 小写表名 -> (原表名, 小写字段集合)
+        schema = {
+            table_name.lower(): (table_name, {field_name.lower() for field_name in fields})
+            for table_name, fields in available_tables.items()
+        }
+        
         # 创建表名映射（包括别名）
         table_mapping = {}
         for table_ref in table_refs:
-            table_mapping[table_ref.table_name] = table_ref.table_name
+            table_mapping[table_ref.table_name.lower()] = table_ref.table_name.lower()
             if table_ref.alias:
-                table_mapping[table_ref.alias] = table_ref.table_name
+                table_mapping[table_ref.alias.lower()] = table_ref.table_name.lower()
         
         for field_ref in field_refs:
             if field_ref.field_name == '*':  # 跳过通配符
                 continue
+            field_name = field_ref.field_name.lower()
                 
             # 确定字段所属的表
             target_table = None
             if field_ref.table_name:
-                target_table = table_mapping.get(field_ref.table_name)
+                target_table = table_mapping.get(field_ref.table_name.lower())
             
-            if target_table and target_table in available_tables:
-                if field_ref.field_name not in available_tables[target_table]:
+            if target_table and target_table in schema:
+                table_name, fields = schema[target_table]
+                if field_name not in fields:
                     violations.append(SecurityViolation(
                         level=SecurityLevel.BLOCKED,
                         type="FIELD_NOT_FOUND",
-                        message=f"字段不存在: {target_table}.{field_ref.field_name}",
-                        suggestion=f"表 {target_table} 可用字段: {', '.join(available_tables[target_table])}"
+                        message=f"字段不存在: {table_name}.{field_ref.field_name}",
+                        suggestion=f"表 {table_name} 可用字段: {', '.join(available_tables[table_name])}"
                     ))
             elif not field_ref.table_name:
                 # 字段没有指定表，检查所有表
-                found = False
-                for table_name, fields in available_tables.items():
-                    if field_ref.field_name in fields:
-                        found = True
-                        break
-                
-                if not found:
+                if not any(field_name in fields for _, fields in schema.values()):
                     violations.append(SecurityViolation(
                         level=SecurityLevel.BLOCKED,
                         type="FIELD_NOT_FOUND",
@@ -368,38 +622,15 @@ class SQLSecurityValidator:
         
         return violations
     
-    def _analyze_complexity(self, parsed: sql.Statement) -> QueryComplexity:
+    def _analyze_complexity(self, parsed: sql.Statement, analysis: Optional[StatementAnalysis] = None) -> QueryComplexity:
         """分析查询复杂度"""
-        table_count = 0
-        join_count = 0
-        subquery_count = 0
-        function_count = 0
-        condition_count = 0
-        
-        sql_text = str(parsed).upper()
-        
-        # 统计表数量（简化）
-        table_count = sql_text.count('FROM') + sql_text.count('JOIN')
-        
-        # 统计JOIN数量
-        join_count = (sql_text.count('JOIN') + 
-                     sql_text.count('LEFT JOIN') + 
-                     sql_text.count('RIGHT JOIN') + 
-                     sql_text.count('INNER JOIN') + 
-                     sql_text.count('OUTER JOIN'))
-        
-        # 统计子查询数量
-        subquery_count = sql_text.count('(SELECT')
-        
-        # 统计函数数量
-        function_count = (sql_text.count('COUNT(') + 
-                         sql_text.count('SUM(') + 
-                         sql_text.count('AVG(') + 
-                         sql_text.count('MAX(') + 
-                         sql_text.count('MIN('))
+        analysis = analysis or self.visitor.visit(parsed)
         
-        # 统计条件数量
-        condition_count = sql_text.count('WHERE') + sql_text.count('AND') + sql_text.count('OR')
+        table_count = analysis.table_count
+        join_count = analysis.join_count
+        subquery_count = analysis.subquery_count
+        function_count = analysis.function_count
+        condition_count = analysis.condition_count
         
         # 计算复杂度分数
         complexity_score = (
@@ -494,9 +725,15 @@ class SQLSecurityValidator:
 class SQLSecurityService:
     """SQL安全服务"""
     
-    def __init__(self):
-        self.validator = SQLSecurityValidator()
-        self.validation_cache = {}  # 简单的内存缓存
+    def __init__(self, db_session=None, schema_cache_ttl: int = 600, cache_max_size: int = 1024):
+        self.db = db_session
+        self.validator = SQLSecurityValidator(cache_max_size=cache_max_size)
+        self.cache_max_size = cache_max_size
+        self.validation_cache: "OrderedDict[str, ValidationResult]" = OrderedDict()  # LRU内存缓存
+        
+        # 数据源表结构缓存 {data_source_id: (加载时间, 元数据版本, {table_name: [field_names]})}
+        self._schema_cache: Dict[str, Tuple[datetime, Dict[str, int], Dict[str, List[str]]]] = {}
+        self._schema_cache_ttl = timedelta(seconds=schema_cache_ttl)
     
     async def validate_and_secure_sql(self, sql_query: str, data_source_id: int = None) -> ValidationResult:
         """
@@ -510,20 +747,24 @@ class SQLSecurityService:
             ValidationResult: 验证结果
         """
         try:
+            # 先取表结构（元数据变化时会重新加载），再按表结构指纹查缓存，避免返回旧表结构下的结果
+            available_tables = await self._get_available_tables(data_source_id) if data_source_id else None
+            
             # 检查缓存
-            cache_key = f"{hash(sql_query)}_{data_source_id}"
+            fingerprint = self.validator._schema_fingerprint(available_tables)
+            cache_key = f"{hash(normalize_sql(sql_query))}_{fingerprint}_{data_source_id}"
             if cache_key in self.validation_cache:
                 logger.info("使用缓存的SQL验证结果")
-                return self.validation_cache[cache_key]
-            
-            # 获取可用表和字段（这里需要集成数据表服务）
-            available_tables = await self._get_available_tables(data_source_id) if data_source_id else None
+                self.validation_cache.move_to_end(cache_key)
+                return copy.deepcopy(self.validation_cache[cache_key])
             
             # 执行验证
             result = self.validator.validate_sql(sql_query, available_tables)
             
-            # 缓存结果
-            self.validation_cache[cache_key] = result
+            # 缓存结果（缓存副本，调用方修改结果不影响缓存）
+            self.validation_cache[cache_key] = copy.deepcopy(result)
+            if len(self.validation_cache) > self.cache_max_size:
+                self.validation_cache.popitem(last=False)
             
             # 记录验证日志
             logger.info(f"SQL验证完成: 安全级别={result.security_level.value}, 违规数量={len(result.violations)}")
@@ -546,23 +787,105 @@ class SQLSecurityService:
                 complexity=QueryComplexity(0, 0, 0, 0, 0, 0.0, "UNKNOWN")
             )
     
+    async def get_available_tables(self, data_source_id: int) -> Dict[str, List[str]]:
+        """获取数据源的可用表和字段（按数据源缓存），用于在验证服务之外按表结构校验SQL"""
+        return await self._get_available_tables(data_source_id)
+    
     async def _get_available_tables(self, data_source_id: int) -> Dict[str, List[str]]:
         """
         获取数据源的可用表和字段
         
+        基于DataTable/TableField元数据构建，按数据源缓存。缓存记录加载时的元数据版本，
+        数据源、表或字段提交变更后（由元数据ORM会话钩子递增版本）立即失效，TTL只作兜底。
+        
         Args:
             data_source_id: 数据源ID
             
         Returns:
             Dict[str, List[str]]: 表名到字段列表的映射
         """
-        # TODO: 集成数据表服务获取真实的表和字段信息
-        # 这里返回模拟数据
-        return {
-            "users": ["id", "name", "email", "created_at"],
-            "orders": ["id", "user_id", "amount", "status", "created_at"],
-            "products": ["id", "name", "price", "category_id"]
-        }
+        cache_key = str(data_source_id)
+        versions = self._schema_versions(cache_key)
+        cached = self._schema_cache.get(cache_key)
+        if cached:
+            if versions is not None and cached[1] == versions and datetime.now() - cached[0] < self._schema_cache_ttl:
+                return cached[2]
+            if versions is None or cached[1] != versions:
+                # 元数据已变更，丢弃该数据源的表结构和验证结果
+                self.invalidate_schema_cache(data_source_id)
+        
+        # 同步ORM查询放到线程池执行，避免阻塞事件循环
+        schema_map = await asyncio.to_thread(self._load_schema_map, cache_key)
+        if schema_map is None:
+            return {}
+        
+        if versions is not None:
+            self._schema_cache[cache_key] = (datetime.now(), versions, schema_map)
+        return schema_map
+    
+    def _schema_versions(self, data_source_id: str) -> Optional[Dict[str, int]]:
+        """读取表结构缓存依赖的元数据版本（表/字段变更只能确定表ID，因此依赖表维度整体版本）"""
+        from src.services.metadata_cache import (
+            SCOPE_DATA_SOURCE, SCOPE_TABLE, get_version_registry, version_key
+        )
+        
+        try:
+            return get_version_registry().current([
+                version_key(SCOPE_DATA_SOURCE, data_source_id),
+                version_key(SCOPE_TABLE)
+            ])
+        except Exception as e:
+            logger.error(f"读取元数据版本失败，不缓存表结构: {e}")
+            return None
+    
+    def _load_schema_map(self, data_source_id: str) -> Optional[Dict[str, List[str]]]:
+        """从元数据库一次性加载数据源下所有启用表的字段"""
+        from src.models.data_preparation_model import DataTable, TableField
+        
+        db = self.db
+        db_gen = None
+        if db is None:
+            from src.database import get_db
+            db_gen = get_db()
+            db = next(db_gen)
+        
+        try:
+            rows = db.query(DataTable.table_name, TableField.field_name).outerjoin(
+                TableField, TableField.table_id == DataTable.id
+            ).filter(
+                DataTable.data_source_id == data_source_id,
+                DataTable.status == True
+            ).order_by(DataTable.table_name, TableField.sort_order).all()
+            
+            schema_map: Dict[str, List[str]] = {}
+            for table_name, field_name in rows:
+                fields = schema_map.setdefault(table_name.lower(), [])
+                if field_name:
+                    fields.append(field_name)
+            return schema_map
+        except Exception as e:
+            logger.error(f"加载数据源 {data_source_id} 的表结构失败: {e}")
+            return None
+        finally:
+            if db_gen is not None:
+                db_gen.close()
+    
+    def invalidate_schema_cache(self, data_source_id: Optional[int] = None):
+        """
+        使表结构缓存失效
+        
+        Args:
+            data_source_id: 数据源ID，为空时清空全部
+        """
+        if data_source_id is None:
+            self._schema_cache.clear()
+            self.validation_cache.clear()
+            return
+        
+        self._schema_cache.pop(str(data_source_id), None)
+        suffix = f"_{data_source_id}"
+        for key in [k for k in self.validation_cache if k.endswith(suffix)]:
+            del self.validation_cache[key]
     
     def get_security_report(self, result: ValidationResult) -> Dict[str, Any]:
         """
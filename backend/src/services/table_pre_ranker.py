@@ -0,0 +1,450 @@
+"""
+候选表预排序服务
+
+两阶段表选择的第一阶段：为候选表建立倒排索引（表名、表注释、字段名、字段注释的词项），
+用BM25对用户问题打分，按Token预算截取Top-K短名单，只把短名单交给大模型精选。
+
+- 打分只遍历问题词项的倒排列表，与候选表总数无关
+- 可选地与元数据向量索引的检索结果做倒数排名融合，召回没有字面重合的同义表达
+- 同一批表结构的索引按指纹缓存复用，表很多时按分片在多个进程中并行构建
+- 短名单大小由每张表在Prompt中的真实Token成本和预算决定
+- 抽样对比全量相似度打分，统计短名单的recall@k
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.services.context_packer import get_context_packer
+
+logger = logging.getLogger(__name__)
+
+# 各部分词项的权重：表名最能说明表的用途，字段最弱
+_NAME_WEIGHT = 3.0
+_COMMENT_WEIGHT = 2.0
+_FIELD_WEIGHT = 1.0
+# 同义词扩展出的查询词项权重
+_EXPANSION_WEIGHT = 0.5
+
+# BM25参数
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+# 倒数排名融合（RRF）常数，用于融合BM25排名和向量检索排名
+_RRF_K = 60
+
+_CAMEL_PATTERN = re.compile(r'([a-z0-9])([A-Z])')
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+_CJK_SEGMENT_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+# 索引构建进程池（所有预排序器共用）
+_index_executor: Optional[ProcessPoolExecutor] = None
+_index_executor_lock = threading.Lock()
+
+
+def _get_index_executor() -> ProcessPoolExecutor:
+    """获取索引构建进程池"""
+    global _index_executor
+    with _index_executor_lock:
+        if _index_executor is None:
+            _index_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _index_executor
+
+
+def tokenize(text: Any) -> List[str]:
+    """
+    切分词项：英文按下划线和驼峰拆成单词，中文切成二元组
+
+    表名 order_items、OrderItems 都得到 ["order", "items"]，"销售金额" 得到 ["销售", "售金", "金额"]。
+    """
+    if not text:
+        return []
+    text = _CAMEL_PATTERN.sub(r'\1 \2', str(text)).lower()
+    terms = [word for word in _WORD_PATTERN.findall(text) if len(word) > 1]
+    for segment in _CJK_SEGMENT_PATTERN.findall(text):
+        if len(segment) == 1:
+            terms.append(segment)
+        else:
+            terms.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return terms
+
+
+def build_document(table: Dict[str, Any]) -> Dict[str, float]:
+    """将一张候选表转换为加权词频"""
+    counts: Counter = Counter()
+    for term in tokenize(table.get("table_name", "")):
+        counts[term] += _NAME_WEIGHT
+    for term in tokenize(table.get("table_comment", "")):
+        counts[term] += _COMMENT_WEIGHT
+    for table_field in table.get("fields", []) or []:
+        if not isinstance(table_field, dict):
+            table_field = {"field_name": table_field}
+        for term in tokenize(table_field.get("field_name", "")):
+            counts[term] += _FIELD_WEIGHT
+        for term in tokenize(table_field.get("field_comment", "") or table_field.get("comment", "")):
+            counts[term] += _FIELD_WEIGHT
+    return dict(counts)
+
+
+def _build_documents(tables: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+    """构建一个分片的文档（在子进程中执行）"""
+    return [build_document(table) for table in tables]
+
+
+@dataclass
+class TableIndex:
+    """候选表倒排索引"""
+    postings: Dict[str, List[Tuple[int, float]]]
+    doc_lengths: List[float]
+    avg_doc_length: float
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_lengths)
+
+
+@dataclass
+class PreRankingResult:
+    """预排序结果"""
+    shortlist: List[Dict[str, Any]] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)       # 与shortlist一一对应
+    candidate_count: int = 0
+    tokens_used: int = 0
+    token_budget: int = 0
+    pruned: bool = False                                    # 是否有候选表被裁掉
+    elapsed_ms: float = 0.0
+
+    @property
+    def k(self) -> int:
+        return len(self.shortlist)
+
+
+class TablePreRanker:
+    """候选表预排序器"""
+
+    def __init__(
+        self,
+        max_shortlist_size: int = 60,
+        index_cache_size: int = 32,
+        parallel_threshold: int = 1000
+    ):
+        """
+        初始化预排序器
+
+        Args:
+            max_shortlist_size: 短名单最多保留的表数
+            index_cache_size: 缓存的索引数量（按表结构指纹）
+            parallel_threshold: 候选表数量达到该值时多进程并行构建索引
+        """
+        self.max_shortlist_size = max_shortlist_size
+        self.index_cache_size = index_cache_size
+        self.parallel_threshold = parallel_threshold
+
+        self._index_cache: "OrderedDict[str, TableIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "rankings": 0,
+            "candidates_total": 0,
+            "shortlisted_total": 0,
+            "pruned_rankings": 0,
+            "ranking_time_ms": 0.0,
+            "index_hits": 0,
+            "index_misses": 0,
+            "recall_samples": 0,
+            "recall_sum": 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def fingerprint(tables: List[Dict[str, Any]]) -> str:
+        """计算候选表结构的指纹（表、注释或字段变化时失效）"""
+        digest = hashlib.md5()
+        for table in tables:
+            fields = table.get("fields", []) or []
+            digest.update(json.dumps([
+                table.get("id", ""),
+                table.get("table_name", ""),
+                table.get("table_comment", ""),
+                [f.get("field_name", "") if isinstance(f, dict) else f for f in fields]
+            ], ensure_ascii=False, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_index(self, tables: List[Dict[str, Any]]) -> TableIndex:
+        """获取候选表的倒排索引（带LRU缓存）"""
+        key = self.fingerprint(tables)
+        with self._lock:
+            index = self._index_cache.get(key)
+            if index is not None:
+                self._index_cache.move_to_end(key)
+                self._stats["index_hits"] += 1
+                return index
+            self._stats["index_misses"] += 1
+
+        index = self.build_index(tables)
+
+        with self._lock:
+            self._index_cache[key] = index
+            if len(self._index_cache) > self.index_cache_size:
+                self._index_cache.popitem(last=False)
+        return index
+
+    def build_index(self, tables: List[Dict[str, Any]]) -> TableIndex:
+        """构建倒排索引"""
+        documents = self._build_documents(tables)
+
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        doc_lengths = []
+        for position, document in enumerate(documents):
+            doc_lengths.append(sum(document.values()))
+            for term, weight in document.items():
+                postings.setdefault(term, []).append((position, weight))
+
+        avg_doc_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        return TableIndex(postings=postings, doc_lengths=doc_lengths, avg_doc_length=avg_doc_length)
+
+    def _build_documents(self, tables: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """构建所有表的文档，表很多时按分片并行"""
+        if len(tables) < self.parallel_threshold:
+            return _build_documents(tables)
+
+        workers = os.cpu_count() or 1
+        chunk_size = math.ceil(len(tables) / workers)
+        chunks = [tables[i:i + chunk_size] for i in range(0, len(tables), chunk_size)]
+        try:
+            documents = []
+            for chunk_documents in _get_index_executor().map(_build_documents, chunks):
+                documents.extend(chunk_documents)
+            return documents
+        except Exception as e:
+            logger.warning(f"并行构建表索引失败，改为串行构建: {str(e)}")
+            return _build_documents(tables)
+
+    # ------------------------------------------------------------------
+    # 打分与截取
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def build_query(
+        question: str,
+        term_mappings: Optional[Dict[str, Iterable[str]]] = None
+    ) -> Dict[str, float]:
+        """
+        构建加权查询词项
+
+        term_mappings 为业务术语映射（如 "订单" -> ["order", "purchase"]），
+        问题中出现术语或其映射词时，用另一侧的词项扩展查询，弥补中文问题与英文表名之间的差异。
+        """
+        query: Dict[str, float] = {term: 1.0 for term in tokenize(question)}
+        if not term_mappings:
+            return query
+
+        question_lower = str(question).lower()
+        question_terms = set(query)
+        for term, synonyms in term_mappings.items():
+            synonyms = list(synonyms or [])
+            if term.lower() in question_lower:
+                expansion = [t for synonym in synonyms for t in tokenize(synonym)]
+            elif any(t in question_terms for synonym in synonyms for t in tokenize(synonym)):
+                expansion = tokenize(term)
+            else:
+                continue
+            for expanded in expansion:
+                query.setdefault(expanded, _EXPANSION_WEIGHT)
+        return query
+
+    def score(self, index: TableIndex, query: Dict[str, float]) -> Dict[int, float]:
+        """BM25打分，只返回命中至少一个词项的表"""
+        scores: Dict[int, float] = {}
+        total = index.size
+        avg_length = index.avg_doc_length or 1.0
+        for term, query_weight in query.items():
+            term_postings = index.postings.get(term)
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for position, tf in term_postings:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * index.doc_lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + query_weight * idf * tf * (_BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def rank(
+        self,
+        question: str,
+        tables: List[Dict[str, Any]],
+        term_mappings: Optional[Dict[str, Iterable[str]]] = None,
+        dense_scores: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        对候选表排序，返回（下标，得分），命中的表在前，未命中的表保持原顺序
+
+        提供了向量检索得分（表ID -> 相似度）时，用倒数排名融合合并两路排名，
+        两路得分尺度不同，只使用各自的名次。
+        """
+        index = self.get_index(tables)
+        scores = self.score(index, self.build_query(question, term_mappings))
+        if dense_scores:
+            scores = self._fuse(tables, scores, dense_scores)
+        matched = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        unmatched = [(position, 0.0) for position in range(len(tables)) if position not in scores]
+        return matched + unmatched
+
+    @staticmethod
+    def _fuse(
+        tables: List[Dict[str, Any]],
+        lexical_scores: Dict[int, float],
+        dense_scores: Dict[str, float]
+    ) -> Dict[int, float]:
+        """倒数排名融合"""
+        positions = {str(table.get("id", "")): position for position, table in enumerate(tables)}
+        dense = {
+            positions[table_id]: score for table_id, score in dense_scores.items()
+            if table_id in positions and score > 0
+        }
+
+        fused: Dict[int, float] = {}
+        for ranking in (lexical_scores, dense):
+            ordered = sorted(ranking.items(), key=lambda item: (-item[1], item[0]))
+            for rank, (position, _) in enumerate(ordered, start=1):
+                fused[position] = fused.get(position, 0.0) + 1.0 / (_RRF_K + rank)
+        return fused
+
+    def shortlist(
+        self,
+        question: str,
+        tables: List[Dict[str, Any]],
+        token_budget: int,
+        render: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        term_mappings: Optional[Dict[str, Iterable[str]]] = None,
+        dense_scores: Optional[Dict[str, float]] = None
+    ) -> PreRankingResult:
+        """
+        按Token预算截取候选表短名单
+
+        全部候选表都放得下时不裁剪（只按得分重排）；否则按得分依次放入命中的表直到预算用完。
+        没有任何表命中时无从排序，按原顺序放入直到预算用完。
+
+        Args:
+            question: 用户问题
+            tables: 候选表
+            token_budget: 候选表部分的Token预算
+            render: 将表转换为Prompt中的内容，用于计算Token成本
+            term_mappings: 业务术语映射
+            dense_scores: 向量检索得到的表相似度（表ID -> 相似度）
+        """
+        start = time.perf_counter()
+        result = PreRankingResult(candidate_count=len(tables), token_budget=token_budget)
+        if not tables:
+            return result
+
+        packer = get_context_packer()
+        render = render or (lambda table: table)
+
+        def cost(table: Dict[str, Any]) -> int:
+            return packer.count_tokens(json.dumps(render(table), ensure_ascii=False, default=str))
+
+        ranked = self.rank(question, tables, term_mappings, dense_scores)
+        has_matches = bool(ranked) and ranked[0][1] > 0
+        costs = {position: cost(tables[position]) for position, _ in ranked[:self.max_shortlist_size + 1]}
+
+        if len(ranked) <= self.max_shortlist_size and sum(costs.values()) <= token_budget:
+            selected = ranked
+        else:
+            selected = []
+            used = 0
+            for position, table_score in ranked:
+                if len(selected) >= self.max_shortlist_size:
+                    break
+                if table_score <= 0 and has_matches:
+                    break
+                table_cost = costs.get(position)
+                if table_cost is None:
+                    table_cost = costs[position] = cost(tables[position])
+                # 预算连一张表都放不下时至少保留得分最高的表
+                if used + table_cost > token_budget and selected:
+                    continue
+                used += table_cost
+                selected.append((position, table_score))
+
+        result.shortlist = [tables[position] for position, _ in selected]
+        result.scores = [table_score for _, table_score in selected]
+        result.tokens_used = sum(costs[position] for position, _ in selected)
+        result.pruned = len(selected) < len(tables)
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["rankings"] += 1
+            self._stats["candidates_total"] += result.candidate_count
+            self._stats["shortlisted_total"] += result.k
+            self._stats["ranking_time_ms"] += result.elapsed_ms
+            if result.pruned:
+                self._stats["pruned_rankings"] += 1
+
+        logger.info(
+            f"候选表预排序完成: {result.candidate_count} -> {result.k}，"
+            f"Token {result.tokens_used}/{token_budget}，耗时 {result.elapsed_ms:.1f}ms"
+        )
+        return result
+
+    # ------------------------------------------------------------------
+    # 召回率统计
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def recall_at_k(shortlist_ids: Iterable[Any], relevant_ids: Iterable[Any]) -> Optional[float]:
+        """计算短名单对相关表的召回率，没有相关表时返回None"""
+        relevant = {str(table_id) for table_id in relevant_ids}
+        if not relevant:
+            return None
+        shortlisted = {str(table_id) for table_id in shortlist_ids}
+        return len(relevant & shortlisted) / len(relevant)
+
+    def record_recall(self, shortlist_ids: Iterable[Any], relevant_ids: Iterable[Any]) -> Optional[float]:
+        """记录一次召回率样本"""
+        recall = self.recall_at_k(shortlist_ids, relevant_ids)
+        if recall is not None:
+            with self._lock:
+                self._stats["recall_samples"] += 1
+                self._stats["recall_sum"] += recall
+        return recall
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取预排序统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            cached_indexes = len(self._index_cache)
+        rankings = max(stats["rankings"], 1)
+        index_lookups = stats["index_hits"] + stats["index_misses"]
+        return {
+            "rankings": stats["rankings"],
+            "pruned_rankings": stats["pruned_rankings"],
+            "average_candidates": stats["candidates_total"] / rankings,
+            "average_shortlist_size": stats["shortlisted_total"] / rankings,
+            "average_ranking_time_ms": stats["ranking_time_ms"] / rankings,
+            "recall_at_k": (
+                stats["recall_sum"] / stats["recall_samples"] if stats["recall_samples"] else None
+            ),
+            "recall_samples": stats["recall_samples"],
+            "index_cache": {
+                "cached_indexes": cached_indexes,
+                "hits": stats["index_hits"],
+                "misses": stats["index_misses"],
+                "hit_rate": stats["index_hits"] / index_lookups if index_lookups else 0.0
+            },
+            "configuration": {
+                "max_shortlist_size": self.max_shortlist_size,
+                "parallel_threshold": self.parallel_threshold
+            }
+        }
@@ -10,6 +10,8 @@ from datetime import datetime
 from enum import Enum
 import logging
 
+from src.services.service_registry import lazy_service
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -241,6 +243,5 @@ class TokenManager:
         total_output = self.token_usage_stats[session_id][model_type]["output"]
         logger.debug(f"会话 {session_id} 模型 {model_type} 总 Token 使用: 输入={total_input}, 输出={total_output}")
 
-# 创建全局实例
-# 在实际应用中，这应该通过依赖注入或单例模式管理
-token_manager = TokenManager()
\ No newline at end of file
+# 全局实例（首次使用时才加载编码器）
+token_manager = lazy_service("token_manager", TokenManager)
\ No newline at end of file
@@ -0,0 +1,453 @@
+"""
+工作簿单遍扫描引擎
+
+以只读流式模式打开Excel文件一次，每个Sheet只遍历一遍，同时得到：
+
+- 行数、列数、表头（与pandas.read_excel的表头规则一致：首行作表头，空表头命名为“Unnamed: i”，
+  重复表头追加“.1”后缀，丢弃末尾的空行和空列）
+- 每列的空值数、去重数（小基数精确计数，超过阈值后改用HyperLogLog近似计数）、示例值
+- 基于蓄水池抽样的字段类型推断（推断规则沿用ExcelService）
+- 前若干行预览数据
+
+扫描结果按文件内容哈希缓存，上传后的结构、预览、校验、生成表结构等后续请求直接复用，
+不再重复解析文件。内存占用与行数无关，只取决于抽样大小、精确去重阈值和预览行数。
+"""
+
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .excel_service import ExcelService
+
+logger = logging.getLogger(__name__)
+
+# pandas.read_excel默认识别为缺失值的字符串
+NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+})
+
+# xlsx/xlsm为zip容器，可以用openpyxl只读流式打开；其他格式（如旧版xls）交给pandas
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def _is_null(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and value in NA_STRINGS
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计（2^precision个寄存器，标准误差约1.04/sqrt(2^precision)）"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.register_count = 1 << precision
+        self._registers = bytearray(self.register_count)
+        self._value_bits = 64 - precision
+
+    @staticmethod
+    def _hash(value: Any) -> int:
+        # 整数值的浮点数与整数视为同一个值，与pandas.nunique一致
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        digest = hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def add(self, value: Any):
+        hashed = self._hash(value)
+        index = hashed >> self._value_bits
+        remainder = hashed & ((1 << self._value_bits) - 1)
+        rank = self._value_bits - remainder.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def count(self) -> int:
+        m = self.register_count
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnProfile:
+    """单列的流式统计"""
+
+    def __init__(self, sample_size: int, exact_distinct_limit: int, sample_value_count: int, seed: int):
+        self.sample_size = sample_size
+        self.exact_distinct_limit = exact_distinct_limit
+        self.sample_value_count = sample_value_count
+        self.non_null_count = 0
+        self.sample: List[Any] = []
+        self.sample_values: List[Any] = []
+        self._distinct: Optional[set] = set()
+        self._sketch: Optional[HyperLogLog] = None
+        self._random = random.Random(seed)
+
+    def add(self, value: Any):
+        """加入一个非空值"""
+        self.non_null_count += 1
+
+        # 蓄水池抽样（Algorithm R）
+        if len(self.sample) < self.sample_size:
+            self.sample.append(value)
+        else:
+            slot = self._random.randrange(self.non_null_count)
+            if slot < self.sample_size:
+                self.sample[slot] = value
+
+        if self._sketch is not None:
+            self._sketch.add(value)
+            return
+        if value not in self._distinct:
+            if len(self.sample_values) < self.sample_value_count:
+                self.sample_values.append(value)
+            self._distinct.add(value)
+            if len(self._distinct) > self.exact_distinct_limit:
+                self._sketch = HyperLogLog()
+                for distinct_value in self._distinct:
+                    self._sketch.add(distinct_value)
+                self._distinct = None
+
+    @property
+    def distinct_is_approximate(self) -> bool:
+        return self._sketch is not None
+
+    @property
+    def distinct_count(self) -> int:
+        return self._sketch.count() if self._sketch is not None else len(self._distinct)
+
+
+@dataclass
+class SheetScan:
+    """单个Sheet的扫描结果"""
+    name: str
+    row_count: int
+    columns: List[Any]
+    field_types: List[Dict[str, Any]]
+    empty_row_count: int
+    preview_rows: List[Tuple[Any, ...]] = field(default_factory=list)
+
+    @property
+    def column_count(self) -> int:
+        return len(self.columns)
+
+    def preview_frame(self, limit: Optional[int] = None) -> pd.DataFrame:
+        rows = self.preview_rows if limit is None else self.preview_rows[:limit]
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def to_structure(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "row_count": self.row_count,
+            "column_count": self.column_count,
+            "columns": list(self.columns),
+            "field_types": self.field_types
+        }
+
+
+@dataclass
+class WorkbookScan:
+    """工作簿扫描结果"""
+    file_path: str
+    file_hash: str
+    sheets: List[SheetScan]
+    preview_limit: int
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [sheet.name for sheet in self.sheets]
+
+    def get_sheet(self, sheet_name: str) -> SheetScan:
+        for sheet in self.sheets:
+            if sheet.name == sheet_name:
+                return sheet
+        raise Exception(f"Worksheet named '{sheet_name}' not found")
+
+    def to_structure(self) -> Dict[str, Any]:
+        return {
+            "file_path": self.file_path,
+            "sheet_count": len(self.sheets),
+            "sheets": [sheet.to_structure() for sheet in self.sheets]
+        }
+
+
+class _SheetAccumulator:
+    """按行累积一个Sheet的统计"""
+
+    def __init__(self, scanner: "WorkbookScanner"):
+        self.scanner = scanner
+        self.header: Optional[Tuple[Any, ...]] = None
+        self.width = 0
+        self.profiles: List[ColumnProfile] = []
+        self.row_count = 0
+        self.empty_row_count = 0
+        self.pending_empty_rows = 0
+        self.preview_rows: List[Tuple[Any, ...]] = []
+
+    def _ensure_width(self, width: int):
+        while len(self.profiles) < width:
+            self.profiles.append(ColumnProfile(
+                self.scanner.sample_size,
+                self.scanner.exact_distinct_limit,
+                self.scanner.sample_value_count,
+                seed=len(self.profiles)
+            ))
+        self.width = max(self.width, width)
+
+    def add_row(self, raw: Iterable[Any]):
+        values = tuple(None if _is_null(value) else value for value in raw)
+        last = max((i for i, value in enumerate(values) if value is not None), default=-1)
+
+        if self.header is None:
+            self.header = values
+            self._ensure_width(last + 1)
+            return
+
+        if last < 0:
+            # 末尾的空行不计入（与pandas一致），等遇到后续非空行时再补记
+            self.pending_empty_rows += 1
+            return
+
+        self._flush_pending_empty_rows()
+        self._ensure_width(last + 1)
+        self.row_count += 1
+        for index in range(last + 1):
+            value = values[index]
+            if value is not None:
+                self.profiles[index].add(value)
+        if len(self.preview_rows) < self.scanner.preview_limit:
+            self.preview_rows.append(values[:last + 1])
+
+    def _flush_pending_empty_rows(self):
+        if not self.pending_empty_rows:
+            return
+        self.row_count += self.pending_empty_rows
+        self.empty_row_count += self.pending_empty_rows
+        room = self.scanner.preview_limit - len(self.preview_rows)
+        self.preview_rows.extend([()] * min(room, self.pending_empty_rows))
+        self.pending_empty_rows = 0
+
+    def _column_names(self) -> List[Any]:
+        header = self.header or ()
+        names, seen = [], {}
+        for index in range(self.width):
+            name = header[index] if index < len(header) else None
+            if name is None:
+                name = f"Unnamed: {index}"
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
+
+    def finish(self, sheet_name: str) -> SheetScan:
+        columns = self._column_names()
+        field_types = []
+        for name, profile in zip(columns, self.profiles):
+            null_count = self.row_count - profile.non_null_count
+            field_types.append({
+                "field_name": name,
+                "display_name": name,
+                "data_type": self.scanner.infer_type(profile.sample),
+                "is_nullable": null_count > 0,
+                "sample_values": list(profile.sample_values),
+                "unique_count": profile.distinct_count,
+                "unique_count_approximate": profile.distinct_is_approximate,
+                "null_count": null_count
+            })
+        preview_rows = [row + (None,) * (self.width - len(row)) for row in self.preview_rows]
+        return SheetScan(
+            name=sheet_name,
+            row_count=self.row_count,
+            columns=columns,
+            field_types=field_types,
+            empty_row_count=self.empty_row_count,
+            preview_rows=preview_rows
+        )
+
+
+class WorkbookScanner:
+    """工作簿扫描器（带按文件哈希的结果缓存）"""
+
+    def __init__(
+        self,
+        preview_limit: int = 1000,
+        sample_size: int = 10000,
+        exact_distinct_limit: int = 10000,
+        sample_value_count: int = 5,
+        cache_size: int = 16
+    ):
+        """
+        初始化扫描器
+
+        Args:
+            preview_limit: 每个Sheet保留的预览行数
+            sample_size: 每列用于类型推断的蓄水池抽样大小
+            exact_distinct_limit: 精确去重计数的上限，超过后改用HyperLogLog
+            sample_value_count: 每列保留的示例值个数
+            cache_size: 缓存的扫描结果个数
+        """
+        self.preview_limit = preview_limit
+        self.sample_size = sample_size
+        self.exact_distinct_limit = exact_distinct_limit
+        self.sample_value_count = sample_value_count
+        self.cache_size = cache_size
+        self._type_inferrer = ExcelService()
+        self._scans: "OrderedDict[str, WorkbookScan]" = OrderedDict()
+        self._file_hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def scan(self, file_path: str) -> WorkbookScan:
+        """扫描工作簿，内容相同的文件直接返回缓存结果"""
+        if not os.path.exists(file_path):
+            raise Exception(f"File not found: {file_path}")
+
+        file_hash = self.file_hash(file_path)
+        with self._lock:
+            cached = self._scans.get(file_hash)
+            if cached is not None:
+                self._scans.move_to_end(file_hash)
+                self.stats["hits"] += 1
+                return cached if cached.file_path == file_path else WorkbookScan(
+                    file_path, file_hash, cached.sheets, cached.preview_limit
+                )
+            self.stats["misses"] += 1
+
+        scan = WorkbookScan(file_path, file_hash, self._scan_sheets(file_path), self.preview_limit)
+        with self._lock:
+            self._scans[file_hash] = scan
+            self._scans.move_to_end(file_hash)
+            while len(self._scans) > self.cache_size:
+                self._scans.popitem(last=False)
+                self.stats["evictions"] += 1
+        logger.info(f"Workbook scanned: {file_path}, {len(scan.sheets)} sheets")
+        return scan
+
+    def file_hash(self, file_path: str) -> str:
+        """文件内容的SHA-256；路径、大小和修改时间都未变化时复用上次的结果"""
+        stat = os.stat(file_path)
+        key = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._file_hashes.get(key)
+        if cached is not None:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+
+        with self._lock:
+            self._file_hashes[key] = file_hash
+            while len(self._file_hashes) > self.cache_size * 4:
+                self._file_hashes.popitem(last=False)
+        return file_hash
+
+    def infer_type(self, sample: List[Any]) -> str:
+        """按ExcelService的规则对抽样推断类型"""
+        return self._type_inferrer._infer_column_type(pd.Series(sample, dtype=object))
+
+    def get_sheet_data(self, file_path: str, sheet_name: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        读取Sheet数据，返回格式与ExcelService.get_sheet_data一致
+
+        请求的行数在预览范围内时直接使用扫描结果，否则回退到完整读取
+        """
+        sheet = self.scan(file_path).get_sheet(sheet_name)
+        wanted = sheet.row_count if not limit or limit <= 0 else min(limit, sheet.row_count)
+        if wanted > len(sheet.preview_rows):
+            return self._type_inferrer.get_sheet_data(file_path, sheet_name, limit)
+
+        df = self._type_inferrer._clean_dataframe(sheet.preview_frame(wanted))
+        data = df.to_dict('records')
+        return {
+            "sheet_name": sheet_name,
+            "row_count": len(data),
+            "column_count": sheet.column_count,
+            "columns": list(sheet.columns),
+            "data": data
+        }
+
+    def _scan_sheets(self, file_path: str) -> List[SheetScan]:
+        with open(file_path, 'rb') as f:
+            is_zip = f.read(4) == _ZIP_MAGIC
+        if is_zip:
+            return self._scan_with_openpyxl(file_path)
+        return self._scan_with_pandas(file_path)
+
+    def _scan_with_openpyxl(self, file_path: str) -> List[SheetScan]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for worksheet in workbook.worksheets:
+                accumulator = _SheetAccumulator(self)
+                for row in worksheet.iter_rows(values_only=True):
+                    accumulator.add_row(row)
+                sheets.append(accumulator.finish(worksheet.title))
+            return sheets
+        finally:
+            workbook.close()
+
+    def _scan_with_pandas(self, file_path: str) -> List[SheetScan]:
+        """非zip格式（如xls）没有流式读取接口，每个Sheet整体读取一次"""
+        sheets = []
+        with pd.ExcelFile(file_path) as excel_file:
+            for sheet_name in excel_file.sheet_names:
+                df = excel_file.parse(sheet_name, header=None)
+                accumulator = _SheetAccumulator(self)
+                for row in df.itertuples(index=False, name=None):
+                    accumulator.add_row(row)
+                sheets.append(accumulator.finish(sheet_name))
+        return sheets
+
+    def clear_cache(self):
+        with self._lock:
+            self._scans.clear()
+            self._file_hashes.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "cached_scans": len(self._scans),
+                "hit_rate": self.stats["hits"] / total if total else 0.0
+            }
+
+
+# 全局实例
+_workbook_scanner: Optional[WorkbookScanner] = None
+_scanner_lock = threading.Lock()
+
+
+def get_workbook_scanner() -> WorkbookScanner:
+    """获取工作簿扫描器实例"""
+    global _workbook_scanner
+    if _workbook_scanner is None:
+        with _scanner_lock:
+            if _workbook_scanner is None:
+                _workbook_scanner = WorkbookScanner(
+                    preview_limit=int(os.getenv('EXCEL_SCAN_PREVIEW_ROWS', '1000')),
+                    sample_size=int(os.getenv('EXCEL_SCAN_SAMPLE_SIZE', '10000')),
+                    cache_size=int(os.getenv('EXCEL_SCAN_CACHE_SIZE', '16'))
+                )
+    return _workbook_scanner
@@ -0,0 +1,86 @@
+"""
+对话链路基准测试工具的冒烟测试
+
+以极小规模运行基准测试，验证桩模型、数据集、阶段统计和基线比较可用
+"""
+
+import copy
+
+import pytest
+
+from benchmarks.harness import (
+    BenchmarkConfig,
+    RegressionThresholds,
+    compare_with_baseline,
+    run_benchmark,
+    summarize_latencies
+)
+from benchmarks.stub_llm import StubModelAdapter
+
+
+@pytest.fixture(scope="module")
+def report():
+    """小规模基准报告"""
+    config = BenchmarkConfig(
+        tables=40, relations=20, dictionaries=5, knowledge_items=30, olap_rows=500,
+        questions=10, requests=6, concurrency=3, warmup=1,
+        llm_latency_ms=0, llm_jitter_ms=0,
+        scenarios=["intent", "sql_execute", "pipeline"]
+    )
+    return run_benchmark(config)
+
+
+def test_summarize_latencies():
+    """测试延迟分位数"""
+    stats = summarize_latencies([float(i) for i in range(1, 101)])
+
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(50.5)
+    assert stats["p99"] == pytest.approx(99.01)
+    assert summarize_latencies([])["count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stub_adapter_is_deterministic():
+    """测试桩模型按Prompt类型返回确定性响应"""
+    adapter = StubModelAdapter({"latency_ms": 0})
+
+    intent = await adapter.generate('请以JSON格式返回 "intent"\n用户问题：生成订单月度经营分析报告')
+    sql = await adapter.generate("基于表 order_fact_0001 和 user_dim_0002 生成SQL")
+
+    assert '"report"' in intent.content
+    assert "FROM order_fact_0001" in sql.content
+    assert adapter.get_statistics()["calls_by_kind"] == {"intent": 1, "sql": 1}
+
+
+def test_report_covers_scenarios_and_stages(report):
+    """测试报告包含各场景的分位数、吞吐、阶段统计和峰值RSS"""
+    assert report["dataset"]["tables"] == 40
+    assert report["peak_rss_mb"] > 0
+    for name in ("intent", "sql_execute", "pipeline"):
+        result = report["scenarios"][name]
+        assert result["requests"] == 6
+        assert result["error_rate"] == 0.0, result["error_samples"]
+        assert result["rps"] > 0
+        assert {"p50", "p95", "p99"} <= set(result["latency_ms"])
+    assert "sql.execute" in report["scenarios"]["sql_execute"]["stages"]
+    assert "pipeline.semantic_context" in report["scenarios"]["pipeline"]["stages"]
+
+
+def test_compare_with_baseline(report):
+    """测试相同报告无退化，延迟和错误率变差时报告退化"""
+    regressions, notes = compare_with_baseline(report, report)
+    assert regressions == []
+    assert notes == []
+
+    slower = copy.deepcopy(report)
+    slower["scenarios"]["intent"]["latency_ms"]["p95"] += 100.0
+    slower["scenarios"]["sql_execute"]["error_rate"] = 0.5
+    slower["config"]["requests"] = 999
+    regressions, notes = compare_with_baseline(slower, report, RegressionThresholds())
+
+    assert {(r.scenario, r.metric) for r in regressions} == {
+        ("intent", "latency_ms.p95"),
+        ("sql_execute", "error_rate")
+    }
+    assert "requests" in notes[0]
@@ -0,0 +1,29 @@
+"""
+SQL错误分类吞吐基准的冒烟测试
+
+以极小规模运行基准，验证各实现的分类结果一致、缓存在错误风暴负载下生效
+"""
+
+from benchmarks.error_classifier import generate_messages, run_error_classifier_benchmark
+
+
+def test_generate_messages():
+    """测试错误风暴负载只包含指定数量的不同消息"""
+    storm = generate_messages(200, 5, seed=1)
+    assert len(storm) == 200
+    assert len(set(storm)) <= 5
+    assert len(set(generate_messages(50, 0, seed=1))) == 50
+
+
+def test_error_classifier_benchmark_report():
+    """测试报告包含各实现的吞吐，预编译匹配器与原始实现的分类结果一致"""
+    report = run_error_classifier_benchmark(messages=300, distinct=5, learner_patterns=50, learner_lookups=100)
+
+    for workload in ("storm", "diverse"):
+        section = report[workload]
+        assert section["classification_mismatches"] == 0
+        assert set(section["results"]) == {"sequential", "compiled", "compiled_cached"}
+        assert all(result["messages_per_second"] > 0 for result in section["results"].values())
+
+    assert report["storm"]["cache"]["hits"] >= 300 - 5
+    assert set(report["learner"]["results"]) == {"linear", "indexed"}
@@ -4,7 +4,8 @@ import pathlib
 from datetime import datetime
 from unittest.mock import patch, MagicMock
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
 # Add src directory to Python path to ensure modules can be imported
@@ -340,4 +341,119 @@ class TestMultiTurnHandler:
             
             # 尝试处理用户输入
             with pytest.raises(Exception):
-                self.multi_turn_handler.handle_user_input(TEST_SESSION_ID, "测试消息")
\ No newline at end of file
+                self.multi_turn_handler.handle_user_input(TEST_SESSION_ID, "测试消息")
+
+class TestSessionMessageIndex:
+    """会话消息索引测试"""
+
+    def setup_method(self):
+        self.test_db = next(get_test_db())
+        self.statements = []
+        event.listen(test_engine, "before_cursor_execute", self._record)
+
+    def teardown_method(self):
+        event.remove(test_engine, "before_cursor_execute", self._record)
+        self.test_db.query(ConversationMessage).delete()
+        self.test_db.commit()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _selects(self):
+        return [s for s in self.statements if s.lstrip().upper().startswith("SELECT")]
+
+    def _seed(self, count):
+        for turn in range(1, count + 1):
+            self.test_db.add(ConversationMessage(
+                session_id=TEST_SESSION_ID, turn=turn, role="user", content=f"消息 {turn}"
+            ))
+        self.test_db.commit()
+
+    @patch('services.multi_turn_handler.get_db')
+    def test_add_message_does_not_rescan_history(self, mock_get_db):
+        """测试索引加载后添加消息不再查询历史"""
+        mock_get_db.side_effect = lambda: iter([self.test_db])
+        handler = MultiTurnHandler()
+
+        first = handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "问题"})
+        self.statements.clear()
+        second = handler.add_message(TEST_SESSION_ID, {
+            "role": "assistant", "content": "回答", "parent_message_id": first["id"]
+        })
+        history = handler.get_conversation_history(TEST_SESSION_ID)
+        children = handler.get_messages_by_parent(TEST_SESSION_ID, str(first["id"]))
+
+        assert second["turn"] == 2
+        assert [msg["turn"] for msg in history] == [1, 2]
+        assert [msg["id"] for msg in children] == [second["id"]]
+        # 按会话的查询只有分配turn的max(turn)，没有按会话扫描历史
+        session_selects = [s for s in self._selects() if "session_id" in s.split("WHERE")[-1]]
+        assert session_selects and all("max(" in s.lower() for s in session_selects)
+        assert handler.get_cache_stats()["misses"] == 1
+
+    @patch('services.multi_turn_handler.get_db')
+    def test_cold_session_loads_recent_window(self, mock_get_db):
+        """测试冷会话只加载最近窗口，更早的历史按范围查询"""
+        mock_get_db.side_effect = lambda: iter([self.test_db])
+        self._seed(5)
+        handler = MultiTurnHandler(window_size=3)
+
+        message = handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "新消息"})
+        last = handler.get_last_message(TEST_SESSION_ID)
+        history = handler.get_conversation_history(TEST_SESSION_ID, limit=2)
+
+        assert message["turn"] == 6
+        assert last["content"] == "新消息"
+        assert [msg["turn"] for msg in history] == [1, 2]
+
+    @patch('services.multi_turn_handler.get_db')
+    def test_children_of_evicted_parent_queried(self, mock_get_db):
+        """测试父消息移出窗口后按父消息ID查询子消息"""
+        mock_get_db.side_effect = lambda: iter([self.test_db])
+        handler = MultiTurnHandler(window_size=2)
+
+        parent = handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "父消息"})
+        child = handler.add_message(TEST_SESSION_ID, {
+            "role": "assistant", "content": "子消息", "parent_message_id": parent["id"]
+        })
+        handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "追问"})
+
+        children = handler.get_messages_by_parent(TEST_SESSION_ID, parent["id"])
+        assert [msg["id"] for msg in children] == [child["id"]]
+
+    @patch('services.multi_turn_handler.get_db')
+    def test_turn_allocated_by_database(self, mock_get_db):
+        """测试turn由数据库分配：其他进程写入过的会话不会产生重复turn，索引随之失效"""
+        mock_get_db.side_effect = lambda: iter([self.test_db])
+        handler = MultiTurnHandler()
+        other_process = MultiTurnHandler()
+
+        first = handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "问题"})
+        other = other_process.add_message(TEST_SESSION_ID, {"role": "assistant", "content": "其他进程的回答"})
+        third = handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "追问"})
+
+        assert [first["turn"], other["turn"], third["turn"]] == [1, 2, 3]
+        assert handler.get_cache_stats()["invalidations"] == 1
+        assert [msg["content"] for msg in handler.get_conversation_history(TEST_SESSION_ID)] == [
+            "问题", "其他进程的回答", "追问"
+        ]
+
+        # 唯一约束拒绝重复的turn
+        self.test_db.add(ConversationMessage(session_id=TEST_SESSION_ID, turn=3, role="user", content="重复"))
+        with pytest.raises(IntegrityError):
+            self.test_db.commit()
+        self.test_db.rollback()
+
+    @patch('services.multi_turn_handler.get_db')
+    def test_invalidate_session(self, mock_get_db):
+        """测试索引失效后重新从数据库加载"""
+        mock_get_db.side_effect = lambda: iter([self.test_db])
+        handler = MultiTurnHandler()
+
+        handler.add_message(TEST_SESSION_ID, {"role": "user", "content": "问题"})
+        self.test_db.query(ConversationMessage).delete()
+        self.test_db.commit()
+        handler.invalidate_session(TEST_SESSION_ID)
+
+        assert handler.get_last_message(TEST_SESSION_ID) is None
+        assert handler.get_cache_stats()["invalidations"] == 1
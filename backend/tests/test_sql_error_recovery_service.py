@@ -234,6 +234,34 @@ def test_execute_with_retry_max_retries(sql_error_recovery_service):
     assert "Database connection failed" in result["error"]
 
 
+
+def test_execute_with_retry_uses_candidates_before_model(sql_error_recovery_service):
+    """测试执行失败后先改用其他候选SQL，不调用模型修复"""
+    executed = []
+    
+    def mock_execute_sql(sql, data_source_id):
+        executed.append(sql)
+        if sql == "SELECT COUNT(*) FROM user":
+            raise Exception("Syntax error: unknown table 'user'")
+        return {"success": True, "result": {"data": []}}
+    
+    sql_error_recovery_service._execute_sql = mock_execute_sql
+    sql_error_recovery_service.retry_with_model = MagicMock()
+    
+    result = sql_error_recovery_service.execute_with_retry(
+        session_id="test-session-candidates",
+        user_question="查询用户总数",
+        sql="SELECT COUNT(*) FROM user",
+        data_source_id="ds-1",
+        candidate_sqls=["SELECT COUNT(*) FROM user", "SELECT COUNT(*) FROM users"]
+    )
+    
+    assert result["success"] is True
+    assert result["attempt"] == 2
+    assert result["sql"] == "SELECT COUNT(*) FROM users"
+    assert executed == ["SELECT COUNT(*) FROM user", "SELECT COUNT(*) FROM users"]
+    sql_error_recovery_service.retry_with_model.assert_not_called()
+
 def test_retry_with_model_fixed_sql(sql_error_recovery_service):
     """测试模型成功修复SQL"""
     # 模拟一个有错误的SQL和错误信息
@@ -327,6 +327,42 @@ class TestChatOrchestrator:
         # 验证澄清请求
         mock_clarify.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_check_query_cost(self, chat_orchestrator, mock_context):
+        """测试执行前成本预估自动加限制和请求澄清"""
+        from src.services.query_cost_estimator import CostEstimate, CostAction
+        
+        mysql_config = {'type': 'mysql', 'host': 'localhost', 'port': 3306, 'database': 'test_db'}
+        add_limit = CostEstimate(database_type='mysql', available=True, estimated_rows=500000,
+                                 action=CostAction.ADD_LIMIT, suggested_limit=1000)
+        clarify = CostEstimate(database_type='mysql', available=True, has_cartesian_join=True,
+                               action=CostAction.CLARIFY, warnings=["笛卡尔积"])
+        
+        import threading
+        lookup_threads = []
+        
+        def get_config(data_source_id):
+            lookup_threads.append(threading.current_thread())
+            return mysql_config
+        
+        with patch.object(chat_orchestrator, '_get_data_source_config', side_effect=get_config), \
+             patch.object(chat_orchestrator.sql_executor, 'estimate_query_cost',
+                          AsyncMock(side_effect=[add_limit, clarify])):
+            result = await chat_orchestrator._check_query_cost(mock_context, 1)
+            assert result.get("needs_clarification", False) is False
+            assert mock_context.generated_sql == "SELECT * FROM products LIMIT 1000"
+            
+            result = await chat_orchestrator._check_query_cost(mock_context, 1)
+            assert result["needs_clarification"] is True
+            assert "笛卡尔积" in result["clarification_question"]
+        
+        # 数据源配置的同步数据库查询不在事件循环线程上执行
+        assert lookup_threads and threading.current_thread() not in lookup_threads
+        
+        # 没有数据源时跳过预估
+        result = await chat_orchestrator._check_query_cost(mock_context, None)
+        assert result == {"success": True}
+    
     def test_fallback_intent_recognition(self, chat_orchestrator):
         """测试意图识别降级策略"""
         # 测试查询意图
@@ -0,0 +1,268 @@
+"""
+熔断器测试
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.services.ai_model_service import (
+    AIModelError,
+    AIModelService,
+    ModelCircuitOpenError,
+    ModelResponse,
+    ModelType,
+    OpenAILocalAdapter,
+    QwenCloudAdapter
+)
+from src.services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerConfig,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    CircuitState,
+    data_source_breaker_key
+)
+from src.services.sql_executor_service import (
+    ExecutionConfig,
+    QueryResult,
+    SQLExecutionError,
+    SQLExecutorService
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(clock):
+    return CircuitBreakerRegistry(CircuitBreakerConfig(failure_threshold=2, recovery_timeout=30), clock)
+
+
+@pytest.fixture
+def mysql_config():
+    return {'type': 'mysql', 'host': 'db.internal', 'port': 3306, 'database': 'sales'}
+
+
+def query_result():
+    return QueryResult(columns=['n'], rows=[[1]], row_count=1, execution_time=0.0, is_truncated=False, has_more=False)
+
+
+def connection_error():
+    return SQLExecutionError("无法连接MySQL: (2003, 'timed out')", error_code="CONNECTION_ERROR")
+
+
+def test_breaker_opens_and_probes(clock):
+    """测试连续失败后熔断，恢复时间后只放行一个探测请求，探测结果决定关闭或重新熔断"""
+    breaker = CircuitBreaker("data_source:a", CircuitBreakerConfig(failure_threshold=2, recovery_timeout=30), clock)
+
+    breaker.acquire()
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.acquire()
+    assert exc_info.value.retry_after == pytest.approx(30)
+
+    clock.now += 30
+    assert breaker.acquire() == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    # 探测失败重新熔断
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == CircuitState.OPEN
+
+    clock.now += 30
+    breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+
+    status = breaker.get_status()
+    assert status["open_count"] == 2
+    assert status["rejected_calls"] == 2
+    assert status["last_error"] == "still down"
+
+
+def test_released_probe_slot_can_be_reused(clock):
+    """测试被取消的探测请求归还名额"""
+    breaker = CircuitBreaker("model:x", CircuitBreakerConfig(failure_threshold=1, recovery_timeout=5), clock)
+    breaker.record_failure()
+    clock.now += 5
+
+    breaker.acquire()
+    breaker.release()
+    assert breaker.acquire() == CircuitState.HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_executor_fails_fast_when_data_source_down(registry, clock, mysql_config):
+    """测试数据源连接失败达到阈值后直接拒绝，不再占用并发名额"""
+    executor = SQLExecutorService(ExecutionConfig(), circuit_breakers=registry)
+
+    with patch.object(executor, '_execute_mysql', side_effect=connection_error()) as mock_mysql:
+        for _ in range(2):
+            with pytest.raises(SQLExecutionError) as exc_info:
+                await executor.execute_query("SELECT 1", mysql_config, use_cache=False)
+            assert exc_info.value.error_code == "EXECUTION_ERROR"
+
+        with pytest.raises(SQLExecutionError) as exc_info:
+            await executor.execute_query("SELECT 1", mysql_config, use_cache=False)
+        assert exc_info.value.error_code == "CIRCUIT_OPEN"
+        assert mock_mysql.call_count == 2
+
+    assert executor.stats.circuit_rejected_queries == 1
+    assert executor.stats.total_queries == 2
+
+    health = executor.get_health_status()
+    key = data_source_breaker_key('db.internal', 3306, 'sales')
+    assert health['status'] == 'degraded'
+    assert health['open_circuits'] == [key]
+    assert health['circuit_breakers'][key]['state'] == 'OPEN'
+
+    # 半开探测成功后恢复
+    clock.now += 30
+    with patch.object(executor, '_execute_mysql', return_value=query_result()):
+        result = await executor.execute_query("SELECT 1", mysql_config, use_cache=False)
+    assert result.row_count == 1
+    assert registry.get(key).state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_executor_sql_errors_do_not_trip_breaker(registry, mysql_config):
+    """测试SQL语法等非连接错误不计入熔断，本地嵌入式存储不熔断"""
+    executor = SQLExecutorService(ExecutionConfig(), circuit_breakers=registry)
+
+    with patch.object(executor, '_execute_mysql', side_effect=Exception("Unknown column 'x'")):
+        for _ in range(3):
+            with pytest.raises(SQLExecutionError):
+                await executor.execute_query("SELECT x FROM t", mysql_config, use_cache=False)
+
+    assert registry.get(data_source_breaker_key('db.internal', 3306, 'sales')).state == CircuitState.CLOSED
+    assert executor._get_circuit_breaker({'type': 'embedded', 'database': '1'}) is None
+
+
+@pytest.mark.asyncio
+async def test_executor_query_timeouts_do_not_trip_breaker(registry, clock, mysql_config):
+    """测试查询超时不计入熔断，半开探测超时后归还探测名额；连接超时仍计入"""
+    executor = SQLExecutorService(ExecutionConfig(), circuit_breakers=registry)
+    key = data_source_breaker_key('db.internal', 3306, 'sales')
+
+    with patch.object(executor, '_execute_with_timeout', side_effect=asyncio.TimeoutError()):
+        for _ in range(3):
+            with pytest.raises(SQLExecutionError) as exc_info:
+                await executor.execute_query("SELECT SLEEP(60)", mysql_config, use_cache=False)
+            assert exc_info.value.error_code == "TIMEOUT"
+    assert registry.get(key).state == CircuitState.CLOSED
+    assert registry.get(key).total_failures == 0
+
+    assert SQLExecutorService._is_connection_failure(connection_error())
+    assert not SQLExecutorService._is_connection_failure(SQLExecutionError("timeout", original_error=TimeoutError()))
+
+    # 半开探测请求查询超时：既不关闭也不重新熔断，名额归还给下一个探测
+    registry.get(key).record_failure()
+    registry.get(key).record_failure()
+    clock.now += 30
+    with patch.object(executor, '_execute_with_timeout', side_effect=asyncio.TimeoutError()):
+        with pytest.raises(SQLExecutionError):
+            await executor.execute_query("SELECT SLEEP(60)", mysql_config, use_cache=False)
+    assert registry.get(key).state == CircuitState.HALF_OPEN
+    assert registry.get(key).acquire() == CircuitState.HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_waiting_for_semaphore_releases_slot(registry, clock, mysql_config):
+    """测试半开探测请求在等待并发名额时被取消，探测名额归还，熔断器不会卡在半开状态"""
+    executor = SQLExecutorService(ExecutionConfig(max_concurrent_queries=1), circuit_breakers=registry)
+    key = data_source_breaker_key('db.internal', 3306, 'sales')
+    registry.get(key).record_failure()
+    registry.get(key).record_failure()
+    clock.now += 30
+
+    await executor._semaphore.acquire()
+    try:
+        probe = asyncio.create_task(executor.execute_query("SELECT 1", mysql_config, use_cache=False))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+    finally:
+        executor._semaphore.release()
+
+    assert registry.get(key).state == CircuitState.HALF_OPEN
+    with patch.object(executor, '_execute_mysql', return_value=query_result()):
+        result = await executor.execute_query("SELECT 1", mysql_config, use_cache=False)
+    assert result.row_count == 1
+    assert registry.get(key).state == CircuitState.CLOSED
+
+
+@pytest.fixture
+def cloud_adapter(registry):
+    adapter = QwenCloudAdapter({
+        'api_key': 'test', 'base_url': 'https://qwen.test', 'retry_count': 3, 'retry_delay': 0.01
+    })
+    adapter.circuit_breakers = registry
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_model_adapter_fails_fast_without_retries(cloud_adapter, clock):
+    """测试模型端点熔断后不再退避重试，半开探测只请求一次"""
+    with patch.object(cloud_adapter.client, 'post', side_effect=asyncio.TimeoutError("timeout")) as mock_post:
+        for _ in range(2):
+            with pytest.raises(AIModelError):
+                await cloud_adapter.generate("SELECT prompt")
+        assert mock_post.call_count == 8
+
+        with pytest.raises(ModelCircuitOpenError):
+            await cloud_adapter.generate("SELECT prompt")
+        assert mock_post.call_count == 8
+
+        clock.now += 30
+        with pytest.raises(AIModelError):
+            await cloud_adapter.generate("SELECT prompt")
+        assert mock_post.call_count == 9
+
+    assert cloud_adapter.get_circuit_breaker().state == CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_generate_sql_falls_back_to_local_model(cloud_adapter, registry):
+    """测试云端模型熔断时降级到本地模型生成SQL"""
+    service = AIModelService({})
+    service.adapters[ModelType.QWEN_CLOUD] = cloud_adapter
+    local = OpenAILocalAdapter({'api_key': 'test', 'base_url': 'https://local.test'})
+    local.circuit_breakers = registry
+    local.generate = AsyncMock(return_value=ModelResponse(
+        content="```sql\nSELECT 1\n```", model_type=ModelType.OPENAI_LOCAL, tokens_used=5, response_time=0.1
+    ))
+
+    breaker = cloud_adapter.get_circuit_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    with pytest.raises(ModelCircuitOpenError):
+        await service.generate_sql("prompt")
+
+    service.adapters[ModelType.OPENAI_LOCAL] = local
+    response = await service.generate_sql("prompt")
+
+    local.generate.assert_awaited_once_with("prompt")
+    assert response.metadata['fallback_from'] == 'qwen_cloud'
+    assert response.metadata['extracted_sql'] == 'SELECT 1;'
+    status = service.get_circuit_breaker_status()
+    assert status['qwen_cloud']['state'] == 'OPEN'
+    assert status['openai_local']['state'] == 'CLOSED'
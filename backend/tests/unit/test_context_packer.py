@@ -0,0 +1,114 @@
+"""
+上下文打包服务单元测试
+
+测试条目拆分、相关性评分、背包选择和内容重建
+"""
+
+import pytest
+
+from src.services.context_packer import ContextPacker, ContextItem
+
+
+@pytest.fixture
+def packer():
+    """创建上下文打包器实例（使用近似Token计数，结果稳定）"""
+    packer = ContextPacker()
+    packer._encoder_loaded = True
+    return packer
+
+
+def make_item(key, tokens, relevance, required=False):
+    return ContextItem(
+        module_type="test", key=key, field_name=key, value=key, text=key,
+        tokens=tokens, relevance=relevance, required=required
+    )
+
+
+class TestTokenCounting:
+    """Token计数测试"""
+
+    def test_approximate_tokens(self, packer):
+        """测试近似估算：中文按字计数，其他字符每4个计1个"""
+        assert packer.count_tokens("") == 0
+        assert packer.count_tokens("用户表") == 3
+        assert packer.count_tokens("users") == 2
+
+    def test_token_cache(self, packer):
+        """测试重复文本命中缓存"""
+        packer.count_tokens("orders 订单表")
+        packer.count_tokens("orders 订单表")
+        assert packer.cache_stats == {"hits": 1, "misses": 1}
+
+
+class TestSplitAndScore:
+    """条目拆分与评分测试"""
+
+    def test_split_module(self, packer):
+        """测试列表、字典、多行文本按条目拆分"""
+        content = {
+            "module_type": "knowledge",
+            "content": "术语：GMV\n规则：退款不计入",
+            "tables": ["users", "orders"],
+            "semantic_values": {"status": {"1": "已支付"}}
+        }
+
+        items = packer.split_module("knowledge", content)
+        assert [item.key for item in items] == [
+            "content#0", "content#1", "tables[0]", "tables[1]", "semantic_values.status"
+        ]
+        assert all(item.tokens > 0 for item in items)
+
+    def test_score_prefers_matching_items(self, packer):
+        """测试与问题重合的条目得分更高"""
+        items = packer.split_module("table_structure", {"tables": ["orders 订单", "logs 日志"]})
+        packer.score_items(items, "统计每月订单金额", 0.8)
+
+        assert items[0].relevance > items[1].relevance
+        assert items[1].relevance == pytest.approx(0.8)
+
+
+class TestPack:
+    """背包选择测试"""
+
+    def test_knapsack_beats_greedy(self, packer):
+        """测试背包求解优于按价值密度贪心"""
+        items = [make_item("a", 6, 7.0), make_item("b", 5, 5.0), make_item("c", 5, 5.0)]
+
+        result = packer.pack(items, 10)
+        assert [item.key for item in result.selected] == ["b", "c"]
+        assert result.tokens_used == 10
+        assert result.total_value == pytest.approx(10.0)
+
+    def test_required_items_first(self, packer):
+        """测试必需条目优先占用预算"""
+        items = [make_item("opt", 8, 10.0), make_item("req", 5, 0.1, required=True)]
+
+        result = packer.pack(items, 10)
+        assert [item.key for item in result.selected] == ["req"]
+        assert [item.key for item in result.dropped] == ["opt"]
+
+    def test_scaled_knapsack_respects_budget(self, packer):
+        """测试条目很多时放大粒度求解仍不超预算"""
+        items = [make_item(f"i{i}", 7 + i % 13, float(i % 5 + 1)) for i in range(400)]
+
+        result = packer.pack(items, 1500)
+        assert result.tokens_used <= 1500
+        assert result.tokens_used > 1300
+
+    def test_rebuild_content(self, packer):
+        """测试用选中条目重建模块内容"""
+        content = {
+            "module_type": "dictionary",
+            "content": "数据字典语义信息",
+            "field_mappings": ["a", "b", "c"],
+            "semantic_values": {"x": 1, "y": 2}
+        }
+        items = packer.split_module("dictionary", content)
+        selected = [item for item in items if item.key in ("content", "field_mappings[2]", "semantic_values.y")]
+
+        assert packer.rebuild_content(content, selected) == {
+            "module_type": "dictionary",
+            "content": "数据字典语义信息",
+            "field_mappings": ["c"],
+            "semantic_values": {"y": 2}
+        }
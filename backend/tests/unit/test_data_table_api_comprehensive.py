@@ -536,18 +536,16 @@ class TestDataTableAPI:
         with patch('src.api.data_table_api.task_manager') as mock_task_manager:
             mock_task_manager.create_task.return_value = "task-123"
             
-            # 模拟异步任务函数以避免实际执行
-            with patch('src.api.data_table_api.async_table_sync_task'):
-                response = client.post("/api/data-tables/test-table-1/sync")
-                
-                # 验证响应
-                assert response.status_code == 200
-                data = response.json()
-                assert data["task_id"] == "task-123"
-                assert data["message"] == "表结构同步任务已启动，将在后台执行"
-                
-                # 验证服务层调用
-                mock_task_manager.create_task.assert_called_once_with("test-table-1")
+            response = client.post("/api/data-tables/test-table-1/sync")
+            
+            # 验证响应
+            assert response.status_code == 200
+            data = response.json()
+            assert data["task_id"] == "task-123"
+            assert data["message"] == "表结构同步任务已启动，将在后台执行"
+            
+            # 验证服务层调用
+            mock_task_manager.create_task.assert_called_once_with("test-table-1")
     
     def test_sync_table_structure_table_not_found(self, override_get_db):
         """测试表结构同步（表不存在）"""
@@ -417,6 +417,20 @@ class TestDataTableService:
         mock_query.filter.assert_called_once()
         mock_query.all.assert_called_once()
     
+    def test_get_key_columns(self):
+        """测试获取主键字段作为唯一排序键"""
+        mock_query = Mock()
+        mock_query.filter.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.all.return_value = [Mock(field_name="order_id"), Mock(field_name="line_no")]
+        
+        self.mock_db.query.return_value = mock_query
+        
+        result = self.service.get_key_columns(self.mock_db, "table-1")
+        
+        assert result == ["order_id", "line_no"]
+        mock_query.order_by.assert_called_once()
+    
     def test_create_table_columns_success(self):
         """测试创建数据表字段（成功场景）"""
         # 创建测试数据
@@ -278,6 +278,9 @@ class TestPersistSessionContext:
         # 准备
         mock_session = Mock(spec=DialogueSession)
         mock_session.session_id = "test-session"
+        mock_session.context_data = {}
+        mock_session.persisted_message_seq = 0
+        mock_session.persistence_watermark = None
         
         mock_query = Mock()
         mock_query.filter.return_value.first.return_value = mock_session
@@ -481,3 +484,101 @@ class TestMigrateSession:
         # 验证
         assert result["success"] is False
         assert "会话不存在" in result["error"]
+
+
+class TestIncrementalPersistence:
+    """测试增量持久化"""
+    
+    @pytest.fixture
+    def db(self):
+        """内存数据库"""
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.orm import sessionmaker
+        from src.models.dialogue_session_model import DialogueSessionMessage
+        
+        engine = create_engine("sqlite:///:memory:")
+        DialogueSession.__table__.create(bind=engine)
+        DialogueSessionMessage.__table__.create(bind=engine)
+        session = sessionmaker(bind=engine)()
+        
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        session.statements = statements
+        yield session
+        session.close()
+    
+    @pytest.fixture
+    def manager(self, db):
+        """使用真实上下文管理器的增量持久化对话管理器"""
+        return DialogueManager(db, ContextManager(), persistence_mode="incremental", restore_page_size=3)
+    
+    def test_persist_appends_only_new_messages(self, manager, db):
+        """测试每次持久化只追加水位线之后的消息"""
+        from src.models.dialogue_session_model import DialogueSessionMessage
+        
+        session_id = manager.create_session(user_id="u1")["session_id"]
+        context_manager = manager.context_manager
+        context_manager.add_user_message(session_id, "查询上月销售额")
+        context_manager.add_sql_response(session_id, "SELECT SUM(amount) FROM orders", {"rows": [[100]]})
+        
+        first = manager.persist_session_context(session_id)
+        assert first["appended_count"] == 4
+        
+        context_manager.add_user_message(session_id, "按地区拆分")
+        db.statements.clear()
+        second = manager.persist_session_context(session_id)
+        
+        assert second["appended_count"] == 2
+        inserts = [sql for sql in db.statements if sql.startswith("INSERT INTO dialogue_session_messages")]
+        assert len(inserts) == 2
+        assert not any(sql.startswith("UPDATE") and "cloud_messages" in sql for sql in db.statements)
+        
+        rows = db.query(DialogueSessionMessage).order_by(DialogueSessionMessage.seq).all()
+        assert [row.seq for row in rows] == [1, 2, 3, 4, 5, 6]
+        db_session = db.query(DialogueSession).filter_by(session_id=session_id).one()
+        assert db_session.message_count == 3
+        assert db_session.persisted_message_seq == 6
+        
+        assert manager.persist_session_context(session_id)["appended_count"] == 0
+    
+    def test_trimmed_history_does_not_duplicate(self, manager):
+        """测试内存历史被裁剪后不会重复追加"""
+        session_id = manager.create_session()["session_id"]
+        context_manager = manager.context_manager
+        for i in range(3):
+            context_manager.add_user_message(session_id, f"问题{i}")
+        manager.persist_session_context(session_id)
+        
+        context = context_manager.get_session(session_id)
+        context.cloud_messages = context.cloud_messages[-1:]
+        context_manager.add_user_message(session_id, "新问题")
+        
+        assert manager.persist_session_context(session_id)["appended_count"] == 2
+    
+    def test_restore_pages_recent_messages(self, manager, db):
+        """测试恢复会话只加载最近消息，更早的消息分页读取"""
+        from src.services.context_manager import CloudHistoryMessage, HistoryLevel
+        
+        session_id = manager.create_session()["session_id"]
+        context_manager = manager.context_manager
+        for i in range(5):
+            context_manager.add_user_message(session_id, f"问题{i}")
+        context_manager.get_session(session_id).compressed_context = "压缩上下文"
+        manager.persist_session_context(session_id)
+        manager.pause_session(session_id)
+        del context_manager.sessions[session_id]
+        
+        assert manager.resume_session(session_id)["success"] is True
+        
+        context = context_manager.get_session(session_id)
+        assert [m.content for m in context.cloud_messages] == ["问题2", "问题3", "问题4"]
+        assert isinstance(context.cloud_messages[0], CloudHistoryMessage)
+        assert context.compressed_context == "压缩上下文"
+        
+        page = manager.get_message_page(session_id, HistoryLevel.CLOUD, limit=3)
+        older = manager.get_message_page(session_id, HistoryLevel.CLOUD, before_seq=page["next_before_seq"], limit=3)
+        assert [m["content"] for m in older["messages"]] == ["问题0", "问题1"]
+        assert older["next_before_seq"] is None
+        
+        # 恢复后再次持久化不会重复追加
+        assert manager.persist_session_context(session_id)["appended_count"] == 0
@@ -377,9 +377,7 @@ class TestDictionaryAPI:
         with patch('src.api.dictionary.DictionaryService') as mock_service_class:
             mock_service = Mock()
             mock_service_class.return_value = mock_service
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = False
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": False, "has_dynamic_configs": False}
             mock_service.delete_dictionary.return_value = True
 
             # 发送请求
@@ -387,9 +385,7 @@ class TestDictionaryAPI:
 
             # 验证响应
             assert response.status_code == 204
-            mock_service.has_children.assert_called_once()
-            mock_service.has_field_references.assert_called_once()
-            mock_service.has_dynamic_configs.assert_called_once()
+            mock_service.check_delete_dependencies.assert_called_once()
             mock_service.delete_dictionary.assert_called_once()
 
     def test_delete_dictionary_has_children(self, mock_db_session):
@@ -398,9 +394,7 @@ class TestDictionaryAPI:
         with patch('src.api.dictionary.DictionaryService') as mock_service_class:
             mock_service = Mock()
             mock_service_class.return_value = mock_service
-            mock_service.has_children.return_value = True
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = False
+            mock_service.check_delete_dependencies.return_value = {"has_children": True, "has_field_references": False, "has_dynamic_configs": False}
 
             # 发送请求
             response = client.delete("/api/dictionaries/dict-123")
@@ -415,9 +409,7 @@ class TestDictionaryAPI:
         with patch('src.api.dictionary.DictionaryService') as mock_service_class:
             mock_service = Mock()
             mock_service_class.return_value = mock_service
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = True
-            mock_service.has_dynamic_configs.return_value = False
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": True, "has_dynamic_configs": False}
 
             # 发送请求
             response = client.delete("/api/dictionaries/dict-123")
@@ -432,9 +424,7 @@ class TestDictionaryAPI:
         with patch('src.api.dictionary.DictionaryService') as mock_service_class:
             mock_service = Mock()
             mock_service_class.return_value = mock_service
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = True
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": False, "has_dynamic_configs": True}
 
             # 发送请求
             response = client.delete("/api/dictionaries/dict-123")
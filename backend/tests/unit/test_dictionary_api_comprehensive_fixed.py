@@ -177,9 +177,7 @@ class TestDictionaryAPIComprehensiveFixed:
         """测试删除字典 - 成功"""
         with patch('src.api.dictionary.dictionary_service') as mock_service:
             mock_service.get_dictionary_by_id.return_value = Mock()
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = False
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": False, "has_dynamic_configs": False}
             mock_service.delete_dictionary.return_value = True
 
             response = client.delete("/api/dictionaries/dict-123")
@@ -548,7 +546,7 @@ class TestDictionaryAPIComprehensiveFixed:
         """测试删除字典 - 有子字典"""
         with patch('src.api.dictionary.dictionary_service') as mock_service:
             mock_service.get_dictionary_by_id.return_value = Mock()
-            mock_service.has_children.return_value = True
+            mock_service.check_delete_dependencies.return_value = {"has_children": True, "has_field_references": False, "has_dynamic_configs": False}
 
             response = client.delete("/api/dictionaries/dict-123")
 
@@ -559,8 +557,7 @@ class TestDictionaryAPIComprehensiveFixed:
         """测试删除字典 - 有字段引用"""
         with patch('src.api.dictionary.dictionary_service') as mock_service:
             mock_service.get_dictionary_by_id.return_value = Mock()
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = True
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": True, "has_dynamic_configs": False}
 
             response = client.delete("/api/dictionaries/dict-123")
 
@@ -571,9 +568,7 @@ class TestDictionaryAPIComprehensiveFixed:
         """测试删除字典 - 有动态配置"""
         with patch('src.api.dictionary.dictionary_service') as mock_service:
             mock_service.get_dictionary_by_id.return_value = Mock()
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = True
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": False, "has_dynamic_configs": True}
 
             response = client.delete("/api/dictionaries/dict-123")
 
@@ -184,9 +184,7 @@ class TestDictionaryAPIFixed:
         """测试删除字典 - 成功"""
         with patch('src.api.dictionary.dictionary_service') as mock_service:
             mock_service.get_dictionary_by_id.return_value = Mock()
-            mock_service.has_children.return_value = False
-            mock_service.has_field_references.return_value = False
-            mock_service.has_dynamic_configs.return_value = False
+            mock_service.check_delete_dependencies.return_value = {"has_children": False, "has_field_references": False, "has_dynamic_configs": False}
             mock_service.delete_dictionary.return_value = True
 
             response = client.delete("/api/dictionaries/dict-123")
@@ -0,0 +1,384 @@
+"""
+字典两级缓存测试
+
+使用内存中的Redis替身，多个缓存实例共享同一个服务端以模拟多个进程
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.data_preparation_model import Dictionary, DictionaryItem
+from src.services.data_preparation_service import DictionaryService
+from src.services.dictionary_cache import DictionaryCache, TAG_TREE, dictionary_tag
+
+
+class FakeRedisServer:
+    """共享的内存Redis服务端"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.zsets = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue_command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue_command
+
+    def execute(self):
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.messages = queue.Queue()
+        self.channels = []
+
+    def subscribe(self, channel):
+        with self.server.lock:
+            self.server.subscribers.setdefault(channel, []).append(self.messages)
+        self.channels.append(channel)
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.get(timeout=min(timeout, 0.05))
+        except queue.Empty:
+            return None
+
+    def close(self):
+        with self.server.lock:
+            for channel in self.channels:
+                self.server.subscribers[channel].remove(self.messages)
+        self.channels = []
+
+
+class FakeRedis:
+    """Redis客户端替身，只实现字典缓存用到的命令，并记录调用次数"""
+
+    def __init__(self, server):
+        self.server = server
+        self.calls = Counter()
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+    def get(self, key):
+        self.calls["get"] += 1
+        return self.server.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        self.calls["set"] += 1
+        if nx and key in self.server.values:
+            return None
+        self.server.values[key] = self._encode(value)
+        return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value)
+
+    def incr(self, key):
+        value = int(self.server.values.get(key, b"0")) + 1
+        self.server.values[key] = self._encode(value)
+        return value
+
+    def expire(self, key, ttl):
+        return True
+
+    def delete(self, *keys):
+        self.calls["delete"] += 1
+        removed = 0
+        for key in keys:
+            removed += int(self.server.values.pop(key, None) is not None or self.server.sets.pop(key, None) is not None)
+        return removed
+
+    def sadd(self, key, *members):
+        self.server.sets.setdefault(key, set()).update(self._encode(m) for m in members)
+
+    def smembers(self, key):
+        return set(self.server.sets.get(key, set()))
+
+    def zincrby(self, key, amount, member):
+        zset = self.server.zsets.setdefault(key, Counter())
+        zset[member] += amount
+        return zset[member]
+
+    def zrevrange(self, key, start, end):
+        ranked = [member for member, _ in self.server.zsets.get(key, Counter()).most_common()]
+        return [self._encode(member) for member in ranked[start:end + 1]]
+
+    def publish(self, channel, message):
+        with self.server.lock:
+            subscribers = list(self.server.subscribers.get(channel, []))
+        for messages in subscribers:
+            messages.put({"type": "message", "channel": channel, "data": self._encode(message)})
+        return len(subscribers)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self.server)
+
+    def info(self):
+        return {"keyspace_hits": 0, "keyspace_misses": 0}
+
+    def dbsize(self):
+        return len(self.server.values)
+
+    def ping(self):
+        return True
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def server():
+    return FakeRedisServer()
+
+
+@pytest.fixture
+def make_cache(server):
+    caches = []
+
+    def factory(**kwargs):
+        cache = DictionaryCache(redis_client=FakeRedis(server), **kwargs)
+        caches.append(cache)
+        if kwargs.get("subscribe", True):
+            assert cache.wait_until_subscribed()
+        return cache
+
+    yield factory
+    for cache in caches:
+        cache.close()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_near_cache_and_local_version_avoid_redis_round_trips(make_cache):
+    """测试近端缓存命中和缓存版本号都不访问Redis"""
+    cache = make_cache()
+    cache.set_dictionary_items("d1", {"items": [{"item_key": "a"}], "total": 1})
+    cache.set_dictionaries_tree([{"id": "d1"}])
+    gets_before = cache.redis_client.calls["get"]
+
+    for _ in range(5):
+        assert cache.get_dictionary_items("d1")["total"] == 1
+        assert cache.get_dictionaries_tree() == [{"id": "d1"}]
+
+    assert cache.redis_client.calls["get"] == gets_before
+    assert cache.stats["near_hits"] == 10
+
+
+def test_redis_hit_populates_near_cache_with_tags(make_cache, server):
+    """测试其他进程写入的条目从Redis读取后进入近端缓存，并保留标签"""
+    writer = make_cache(subscribe=False)
+    reader = make_cache(subscribe=False, version_refresh_interval=60)
+    writer.set_dictionary_items("d1", {"items": [], "total": 0}, status=True)
+
+    assert reader.get_dictionary_items("d1", status=True) == {"items": [], "total": 0}
+    assert reader.get_dictionary_items("d1", status=False) is None
+    assert reader.get_dictionary_items("d1", status=True) == {"items": [], "total": 0}
+    assert reader.stats["redis_hits"] == 1
+    assert reader.stats["near_hits"] == 1
+
+    reader._drop_local_tags({dictionary_tag("d1")})
+    assert reader.get_cache_stats()["near_cache"]["size"] == 0
+
+
+def test_cache_keys_include_query_parameters(make_cache):
+    """测试字典列表和字典树按查询参数分别缓存"""
+    cache = make_cache(subscribe=False)
+    cache.set_dictionaries({"items": [1], "total": 11}, page=1)
+    cache.set_dictionaries_tree([{"id": "enabled"}], status=True)
+
+    assert cache.get_dictionaries(page=2) is None
+    assert cache.get_dictionaries(page=1) == {"items": [1], "total": 11}
+    assert cache.get_dictionaries_tree() is None
+    assert cache.get_dictionaries_tree(status=True) == [{"id": "enabled"}]
+
+
+def test_tag_invalidation_deletes_only_tagged_keys(make_cache, server):
+    """测试按标签失效只删除相关键（替身不支持SCAN/KEYS，扫描键空间会直接报错）"""
+    cache = make_cache(subscribe=False)
+    cache.set_dictionary_items("d1", {"items": [], "total": 0})
+    cache.set_dictionary_items("d1", {"items": [], "total": 0}, page=2)
+    cache.set_dictionary_items("d2", {"items": [], "total": 0})
+    cache.set_dictionary_item("i1", {"id": "i1", "dictionary_id": "d1"})
+    cache.set_dictionaries_tree([])
+
+    cache.invalidate_dictionaries(["d1"])
+
+    remaining = [key for key in server.values if key.startswith("dictionary:items") or key.startswith("dictionary:item:")]
+    assert remaining == [cache._get_cache_key("items", "d2_p1_ps10_snone_stnone")]
+    assert cache.get_dictionaries_tree() is None
+    assert cache.get_dictionary_items("d2") is not None
+    assert f"{cache.tag_prefix}{TAG_TREE}" not in server.sets
+    assert cache.stats["invalidations"] == 1
+
+
+def test_invalidation_is_pushed_to_other_workers(make_cache):
+    """测试失效消息通过发布/订阅推送到其他进程的近端缓存"""
+    worker_a = make_cache()
+    worker_b = make_cache()
+    worker_b.set_dictionary_items("d1", {"items": [], "total": 0})
+    worker_b.set_dictionary_items("d2", {"items": [], "total": 0})
+    assert worker_b.get_dictionary_items("d1") is not None
+
+    worker_a.invalidate_dictionaries(["d1"])
+    assert wait_for(lambda: worker_b.stats["messages_received"] == 1)
+
+    assert worker_b.get_dictionary_items("d1") is None
+    assert worker_b.get_dictionary_items("d2") is not None
+    assert worker_a.stats["messages_received"] == 0
+
+    worker_a.clear_all_cache()
+    version = worker_a.get_cache_version()
+    assert wait_for(lambda: worker_b.get_cache_version() == version)
+    assert worker_b.get_dictionary_items("d2") is None
+
+
+def test_version_refresh_without_listener(make_cache):
+    """测试未订阅时按刷新间隔从Redis同步缓存版本号"""
+    writer = make_cache(subscribe=False)
+    reader = make_cache(subscribe=False, version_refresh_interval=0)
+    assert reader.get_cache_version() == writer.get_cache_version() == "1"
+
+    writer.increment_cache_version()
+    assert reader.get_cache_version() == "2"
+
+
+def test_orm_commit_invalidates_changed_dictionaries(make_cache, db):
+    """测试字典项提交后自动失效所属字典的缓存，回滚时不失效，字典树不受字典项影响"""
+    cache = make_cache(subscribe=False)
+    dictionary = Dictionary(code="gender", name="性别", created_by="test")
+    db.add(dictionary)
+    db.commit()
+
+    with patch("src.services.dictionary_cache.dictionary_cache", cache):
+        cache.set_dictionary_items(dictionary.id, {"items": [], "total": 0})
+        cache.set_dictionary_items("other", {"items": [], "total": 0})
+        cache.set_dictionaries_tree([])
+
+        db.add(DictionaryItem(dictionary_id=dictionary.id, item_key="M", item_value="男", created_by="test"))
+        db.flush()
+        db.rollback()
+        assert cache.get_dictionary_items(dictionary.id) is not None
+
+        db.add(DictionaryItem(dictionary_id=dictionary.id, item_key="M", item_value="男", created_by="test"))
+        db.commit()
+
+    assert cache.get_dictionary_items(dictionary.id) is None
+    assert cache.get_dictionaries_tree() == []
+    assert cache.get_dictionary_items("other") is not None
+
+
+def test_dictionary_change_patches_cached_tree(make_cache, db):
+    """测试字典变化后增量更新已缓存的字典树，并通知其他进程丢弃近端缓存中的旧树"""
+    worker_a = make_cache()
+    worker_b = make_cache()
+    root = Dictionary(code="root", name="根", created_by="test")
+    db.add(root)
+    db.commit()
+
+    with patch("src.services.dictionary_cache.dictionary_cache", worker_a), \
+            patch("src.services.data_preparation_service.dictionary_cache", worker_a):
+        service = DictionaryService()
+        service.get_dictionaries_tree(db)
+        service.get_dictionaries_tree(db, status=True)
+        service.get_all_dictionaries(db)
+        assert worker_b.get_dictionaries_tree()[0]["name"] == "根"
+
+        child = Dictionary(code="child", name="子", parent_id=root.id, created_by="test")
+        db.add(child)
+        root.name = "新根"
+        db.commit()
+
+        with patch.object(db, "query", side_effect=AssertionError("should be served from cache")):
+            tree = service.get_dictionaries_tree(db)
+        assert tree[0]["name"] == "新根"
+        assert [node["code"] for node in tree[0]["children"]] == ["child"]
+        assert worker_a.get_dictionaries_tree(status=True)[0]["children"][0]["code"] == "child"
+        assert worker_a.get_dictionaries() is None
+
+    assert wait_for(lambda: worker_b.get_dictionaries_tree()[0]["name"] == "新根")
+    assert worker_a.tree_lock_key not in worker_a.redis_client.server.values
+
+
+def test_warm_up_preloads_tree_and_hot_dictionaries(make_cache, db):
+    """测试预热通过DictionaryService加载字典树、字典列表和热点字典的字典项"""
+    cache = make_cache(subscribe=False)
+    hot = Dictionary(code="hot", name="热点", created_by="test")
+    cold = Dictionary(code="cold", name="冷门", created_by="test")
+    db.add_all([hot, cold])
+    db.flush()
+    db.add(DictionaryItem(dictionary_id=hot.id, item_key="k", item_value="v", created_by="test"))
+    db.commit()
+
+    with patch("src.services.dictionary_cache.dictionary_cache", cache), \
+            patch("src.services.data_preparation_service.dictionary_cache", cache):
+        service = DictionaryService()
+        for _ in range(3):
+            cache.get_dictionary_items(hot.id)
+        cache.get_dictionary_items(cold.id)
+        assert cache.get_hot_dictionaries(1) == [hot.id]
+
+        result = cache.warm_up_cache(db=db, dictionary_service=service, limit=1)
+        assert result["tree"] == 1
+        assert result["lists"] == 1
+        assert result["dictionaries"] == 1
+
+        with patch.object(db, "query", side_effect=AssertionError("should be served from cache")):
+            assert len(service.get_dictionaries_tree(db)) == 2
+            assert service.get_all_dictionaries(db)["total"] == 2
+            assert service.get_dictionary_items(db, hot.id)["total"] == 1
+
+        db.add(DictionaryItem(dictionary_id=hot.id, item_key="k2", item_value="v2", created_by="test"))
+        db.commit()
+        assert service.get_dictionary_items(db, hot.id)["total"] == 2
+
+
+def test_disabled_cache_is_a_no_op():
+    """测试未启用缓存时不连接Redis，所有操作直接返回"""
+    with patch.dict("os.environ", {"DICTIONARY_CACHE_ENABLED": "false"}):
+        cache = DictionaryCache()
+
+    cache.set_dictionaries_tree([])
+    assert cache.get_dictionaries_tree() is None
+    assert cache.get_cache_version() == "0"
+    assert cache.warm_up_cache() == {"enabled": False}
+    assert cache.get_cache_stats()["enabled"] is False
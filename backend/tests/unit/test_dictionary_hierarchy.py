@@ -0,0 +1,211 @@
+"""
+字典层级索引测试
+"""
+
+import copy
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.data_preparation_model import Dictionary, DynamicDictionaryConfig
+from src.services.data_preparation_service import DictionaryService
+from src.services.dictionary_hierarchy import (
+    DictionaryHierarchy,
+    DictionaryHierarchyError,
+    build_tree,
+    patch_tree
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def add(db, code, parent=None, sort_order=0, status=True):
+    dictionary = Dictionary(code=code, name=code, parent_id=parent.id if parent else None,
+                            sort_order=sort_order, status=status, created_by="test")
+    db.add(dictionary)
+    db.commit()
+    return dictionary
+
+
+@pytest.fixture
+def hierarchy(db):
+    """root -> a -> a1 -> a11, root -> b"""
+    root = add(db, "root")
+    a = add(db, "a", root, sort_order=1)
+    b = add(db, "b", root, sort_order=2)
+    a1 = add(db, "a1", a)
+    a11 = add(db, "a11", a1)
+    return {"root": root, "a": a, "b": b, "a1": a1, "a11": a11}
+
+
+def test_paths_maintained_on_create(db, hierarchy):
+    """测试创建时根据父字典生成路径和深度，包括同一次flush中新建的父字典"""
+    root, a, a11 = hierarchy["root"], hierarchy["a"], hierarchy["a11"]
+    assert root.path == f"/{root.id}/"
+    assert a11.path == f"/{root.id}/{a.id}/{hierarchy['a1'].id}/{a11.id}/"
+    assert a11.depth == 3
+
+    child = Dictionary(code="c", name="c", parent_id="new-parent", created_by="test")
+    parent = Dictionary(id="new-parent", code="p", name="p", parent_id=root.id, created_by="test")
+    db.add_all([child, parent])
+    db.commit()
+    assert child.path == f"/{root.id}/new-parent/{child.id}/"
+    assert child.depth == 2
+
+
+def test_move_updates_descendant_paths(db, hierarchy):
+    """测试移动字典时所有后代的路径随之更新"""
+    a, b, a1, a11 = hierarchy["a"], hierarchy["b"], hierarchy["a1"], hierarchy["a11"]
+    a1.parent_id = b.id
+    db.commit()
+    db.expire_all()
+
+    assert a1.path == f"{b.path}{a1.id}/"
+    assert a11.path == f"{a1.path}{a11.id}/"
+    assert a11.depth == 3
+    assert not DictionaryHierarchy.is_ancestor(db, a.id, a11.id)
+    assert DictionaryHierarchy.is_ancestor(db, b.id, a11.id)
+
+    a1.parent_id = None
+    db.commit()
+    assert a11.path == f"/{a1.id}/{a11.id}/"
+    assert a11.depth == 1
+
+
+def test_cycle_is_rejected(db, hierarchy):
+    """测试把字典移动到自身后代下时拒绝提交"""
+    service = DictionaryService()
+    a, a11 = hierarchy["a"], hierarchy["a11"]
+
+    a.parent_id = a11.id
+    with pytest.raises(DictionaryHierarchyError):
+        service._commit(db)
+
+    db.expire_all()
+    assert a.parent_id == hierarchy["root"].id
+
+
+def test_ancestor_check_is_a_single_query(engine, db, hierarchy):
+    """测试祖先判断只需一次查询"""
+    service = DictionaryService()
+    root_id, a11_id, b_id = hierarchy["root"].id, hierarchy["a11"].id, hierarchy["b"].id
+    db.expunge_all()
+
+    with count_queries(engine) as statements:
+        assert service.is_ancestor(db, root_id, a11_id)
+    assert len(statements) == 1
+    assert not service.is_ancestor(db, b_id, a11_id)
+    assert service.is_ancestor(db, b_id, b_id)
+    assert not service.is_ancestor(db, root_id, "missing")
+
+
+def test_subtree_is_a_single_query(engine, db, hierarchy):
+    """测试子树查询只需一次查询，结果与完整树中的对应子树一致"""
+    service = DictionaryService()
+    a_id = hierarchy["a"].id
+    db.expunge_all()
+
+    with count_queries(engine) as statements:
+        subtree = service.get_dictionary_subtree(db, a_id)
+    assert len(statements) == 1
+
+    full_tree = service.get_dictionaries_tree(db)
+    assert subtree == [full_tree[0]["children"][0]]
+    assert [node["code"] for node in full_tree[0]["children"]] == ["a", "b"]
+    assert service.get_dictionary_subtree(db, "missing") is None
+
+
+def test_delete_dependencies_in_one_query(engine, db, hierarchy):
+    """测试删除前的依赖检查合并为一次查询"""
+    service = DictionaryService()
+    b = hierarchy["b"]
+    db.add(DynamicDictionaryConfig(dictionary_id=b.id, data_source_id="ds", sql_query="select 1",
+                                   key_field="k", value_field="v"))
+    db.commit()
+    a_id = hierarchy["a"].id
+
+    with count_queries(engine) as statements:
+        dependencies = service.check_delete_dependencies(db, a_id)
+    assert len(statements) == 1
+    assert dependencies == {"has_children": True, "has_field_references": False, "has_dynamic_configs": False}
+    assert service.check_delete_dependencies(db, b.id)["has_dynamic_configs"] is True
+    assert service.has_children(db, hierarchy["a11"].id) is False
+
+
+def test_patch_tree_matches_full_rebuild(db, hierarchy):
+    """测试增量更新后的字典树与完整重建结果一致（移动、状态变化、新建、删除）"""
+    def full_tree(status=None):
+        query = db.query(Dictionary).order_by(Dictionary.sort_order, Dictionary.created_at)
+        if status is not None:
+            query = query.filter(Dictionary.status == status)
+        return build_tree(d.to_dict() for d in query)
+
+    cached = {status: full_tree(status) for status in (None, True, False)}
+
+    def apply(changed_ids):
+        for status in cached:
+            cached[status] = patch_tree(
+                copy.deepcopy(cached[status]), changed_ids,
+                lambda dict_id: DictionaryHierarchy.get_subtree(db, dict_id, status)
+            )
+            assert cached[status] == full_tree(status)
+
+    hierarchy["a1"].parent_id = hierarchy["b"].id
+    db.commit()
+    apply([hierarchy["a1"].id])
+
+    hierarchy["a1"].status = False
+    db.commit()
+    apply([hierarchy["a1"].id])
+
+    created = add(db, "new", hierarchy["root"], sort_order=0)
+    apply([created.id])
+
+    created_id = created.id
+    db.delete(created)
+    db.commit()
+    apply([created_id])
+
+
+def test_rebuild_paths_repairs_missing_paths(db, hierarchy):
+    """测试重建路径修复缺失或错误的路径"""
+    a11 = hierarchy["a11"]
+    db.query(Dictionary).update({Dictionary.path: None}, synchronize_session=False)
+    db.commit()
+    db.expire_all()
+
+    assert DictionaryHierarchy.is_ancestor(db, hierarchy["root"].id, a11.id)
+    db.rollback()
+
+    assert DictionaryHierarchy.rebuild_paths(db) == 5
+    db.commit()
+    assert a11.path == f"/{hierarchy['root'].id}/{hierarchy['a'].id}/{hierarchy['a1'].id}/{a11.id}/"
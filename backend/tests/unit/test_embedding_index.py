@@ -0,0 +1,247 @@
+"""
+元数据向量索引单元测试
+
+测试哈希n-gram向量、增删检索、内存映射持久化、IVF检索和数据库增量同步
+"""
+
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.data_preparation_model import DataTable, TableField, Dictionary, DictionaryItem
+from src.models.knowledge_base_model import KnowledgeBase
+from src.models.knowledge_item_model import KnowledgeItem
+from src.services.embedding_index import (
+    Embedder,
+    EmbeddingIndex,
+    HashedNgramEmbedder,
+    IndexItem,
+    KIND_TABLE,
+    KIND_FIELD,
+    KIND_KNOWLEDGE
+)
+
+
+@pytest.fixture
+def index(tmp_path):
+    """创建向量索引实例"""
+    return EmbeddingIndex(storage_dir=str(tmp_path), embedder=HashedNgramEmbedder(dim=256))
+
+
+def sample_items():
+    return [
+        IndexItem("t_orders", KIND_TABLE, "sales_orders 销售订单表", {"table_id": "t_orders"}),
+        IndexItem("t_customers", KIND_TABLE, "customers 客户信息表", {"table_id": "t_customers"}),
+        IndexItem("f_amount", KIND_FIELD, "order_amount 订单金额", {"table_id": "t_orders"}),
+        IndexItem("k_gmv", KIND_KNOWLEDGE, "GMV 商品交易总额，含退款订单", {"type": "TERM"}),
+    ]
+
+
+class TestEmbedder:
+    """哈希n-gram向量测试"""
+
+    def test_vectors_normalized_and_stable(self):
+        """测试向量归一化，且同一文本结果稳定"""
+        embedder = HashedNgramEmbedder(dim=64)
+        first = embedder.embed(["销售订单", ""])
+        second = embedder.embed(["销售订单"])
+
+        assert np.linalg.norm(first[0]) == pytest.approx(1.0, rel=1e-5)
+        assert not first[1].any()
+        assert np.array_equal(first[0], second[0])
+
+    def test_morphological_variants_similar(self):
+        """测试词形变化和驼峰命名得到相近向量"""
+        vectors = HashedNgramEmbedder().embed(["orders", "order", "OrderItems", "warehouse"])
+
+        assert vectors[0] @ vectors[1] > 0.3
+        assert vectors[2] @ vectors[1] > vectors[3] @ vectors[1]
+
+
+class TestIndex:
+    """索引增删检索测试"""
+
+    def test_search_ranks_similar_items(self, index):
+        """测试检索返回最相似的条目"""
+        index.upsert(sample_items())
+
+        hits = index.search("每个客户的订单金额", top_k=2)
+
+        assert {hit.item_id for hit in hits} <= {"t_orders", "t_customers", "f_amount"}
+        assert hits[0].score >= hits[1].score
+
+    def test_search_filters_kinds(self, index):
+        """测试按类型过滤"""
+        index.upsert(sample_items())
+
+        hits = index.search("交易总额", top_k=5, kinds=(KIND_KNOWLEDGE,))
+
+        assert [hit.item_id for hit in hits] == ["k_gmv"]
+        assert hits[0].metadata == {"type": "TERM"}
+
+    def test_upsert_skips_unchanged_text(self, index):
+        """测试文本未变化的条目不重新计算向量"""
+        assert index.upsert(sample_items()) == 4
+        assert index.upsert(sample_items()) == 0
+        assert index.upsert([IndexItem("t_orders", KIND_TABLE, "orders 订单")]) == 1
+        assert index.size == 4
+
+    def test_search_not_blocked_while_upsert_embeds(self, tmp_path):
+        """测试upsert计算向量期间检索不被阻塞，向量写入后新条目可检索"""
+        embedding_started = threading.Event()
+        release = threading.Event()
+
+        class SlowBatchEmbedder(HashedNgramEmbedder):
+            def embed(self, texts):
+                if len(texts) > 1:
+                    embedding_started.set()
+                    release.wait(5)
+                return super().embed(texts)
+
+        index = EmbeddingIndex(storage_dir=str(tmp_path), embedder=SlowBatchEmbedder(dim=256))
+        index.upsert([IndexItem("t_customers", KIND_TABLE, "customers 客户信息表")])
+
+        writer = threading.Thread(target=index.upsert, args=(sample_items(),))
+        writer.start()
+        try:
+            assert embedding_started.wait(5)
+            searcher = threading.Thread(target=index.search, args=("客户",))
+            searcher.start()
+            searcher.join(2)
+            assert not searcher.is_alive()
+        finally:
+            release.set()
+            writer.join(5)
+
+        assert index.size == 4
+        assert index.search("订单金额", top_k=1)[0].item_id == "f_amount"
+
+    def test_concurrent_update_not_overwritten_by_stale_embedding(self, index):
+        """测试计算向量期间条目被更新时，旧文本的向量不覆盖新状态"""
+        index.upsert([IndexItem("t_orders", KIND_TABLE, "orders 订单")])
+        embed = index.embedder.embed
+
+        def embed_with_concurrent_update(texts):
+            vectors = embed(texts)
+            index.embedder.embed = embed
+            index.upsert([IndexItem("t_orders", KIND_TABLE, "sales_orders 销售订单表")])
+            return vectors
+
+        index.embedder.embed = embed_with_concurrent_update
+        assert index.upsert([IndexItem("t_orders", KIND_TABLE, "stale 旧文本")]) == 0
+        assert index._entries[index._rows["t_orders"]]["hash"] == index._text_hash("sales_orders 销售订单表")
+
+    def test_embedder_is_abstract(self):
+        """测试未实现embed的向量模型不能实例化"""
+        class IncompleteEmbedder(Embedder):
+            pass
+
+        with pytest.raises(TypeError):
+            IncompleteEmbedder()
+
+    def test_remove_reuses_rows(self, index):
+        """测试删除后的行被复用"""
+        index.upsert(sample_items())
+        assert index.remove(["t_customers", "missing"]) == 1
+        assert all(hit.item_id != "t_customers" for hit in index.search("客户", top_k=5))
+
+        index.upsert([IndexItem("t_users", KIND_TABLE, "users 用户表")])
+        assert index.get_statistics()["capacity"] == 1024
+
+    def test_persisted_in_memory_mapped_file(self, index, tmp_path):
+        """测试保存后重新加载映射文件，不重新计算向量"""
+        index.upsert(sample_items())
+        index.save()
+
+        reloaded = EmbeddingIndex(storage_dir=str(tmp_path), embedder=HashedNgramEmbedder(dim=256))
+        assert reloaded.size == 4
+        assert reloaded.search("交易总额", top_k=1)[0].item_id == "k_gmv"
+        assert reloaded.upsert(sample_items()) == 0
+
+    def test_ivf_search(self, tmp_path):
+        """测试条目数超过阈值后使用IVF检索"""
+        index = EmbeddingIndex(storage_dir=str(tmp_path), embedder=HashedNgramEmbedder(dim=64), ivf_threshold=100)
+        index.upsert(IndexItem(f"t{i}", KIND_TABLE, f"archive_table_{i} 归档表{i}") for i in range(300))
+        index.upsert([IndexItem("t_orders", KIND_TABLE, "sales_orders 销售订单表")])
+
+        hits = index.search("sales_orders 销售订单表", top_k=1)
+
+        assert hits[0].item_id == "t_orders"
+        stats = index.get_statistics()
+        assert stats["ivf_enabled"] is True
+        assert stats["ivf_searches"] == 1
+
+
+class TestDatabaseRefresh:
+    """数据库增量同步测试"""
+
+    @pytest.fixture
+    def db(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(DataTable(id="t1", data_source_id="ds1", table_name="orders", description="订单表",
+                              data_mode="IMPORT", created_by="test"))
+        session.add(TableField(id="f1", table_id="t1", field_name="amount", display_name="金额", data_type="DECIMAL"))
+        session.add(Dictionary(id="d1", code="STATUS", name="状态", created_by="test"))
+        session.add(DictionaryItem(id="di1", dictionary_id="d1", item_key="1", item_value="已支付", created_by="test"))
+        session.add(KnowledgeBase(id="kb1", name="术语", type="TERM", scope="GLOBAL"))
+        session.add(KnowledgeItem(id="k1", knowledge_base_id="kb1", type="TERM", name="GMV", explanation="交易总额"))
+        session.commit()
+        yield session
+        session.close()
+
+    def test_incremental_refresh(self, index, db):
+        """测试首次全量同步，之后只同步变化的行并移除停用的表"""
+        summary = index.refresh_from_database(db, force=True)
+        assert summary == {"table": 1, "field": 1, "dictionary": 1, "knowledge": 1}
+
+        table = db.get(DataTable, "t1")
+        table.description = "销售订单表"
+        table.updated_at = datetime.now() + timedelta(seconds=1)
+        db.add(DataTable(id="t2", data_source_id="ds1", table_name="logs", data_mode="IMPORT",
+                         created_by="test", status=False))
+        db.commit()
+
+        summary = index.refresh_from_database(db, force=True)
+        assert summary == {"table": 1, "field": 0, "dictionary": 0, "knowledge": 0}
+        assert index.item_ids(KIND_TABLE) == {"t1"}
+
+        db.get(DataTable, "t1").status = False
+        db.commit()
+        index.refresh_from_database(db, force=True)
+        assert index.item_ids(KIND_TABLE) == set()
+
+    def test_refresh_respects_interval(self, index, db):
+        """测试同步间隔内不重复同步"""
+        index.refresh_from_database(db)
+        assert index.refresh_from_database(db) == {}
+
+    def test_refresh_if_stale_builds_in_background(self, index):
+        """测试检索触发的同步在后台线程执行，完成首次同步前索引未就绪"""
+        release = threading.Event()
+
+        def slow_refresh(db, force=False):
+            release.wait(5)
+            index._ready = True
+
+        def db_session():
+            yield Mock()
+
+        with patch.object(index, 'refresh_from_database', side_effect=slow_refresh) as mock_refresh, \
+             patch('src.utils.get_db_session', side_effect=db_session):
+            assert index.refresh_if_stale() is True
+            assert index.ready is False
+            # 同步进行中不重复启动
+            assert index.refresh_if_stale() is False
+
+            release.set()
+            index._refresh_thread.join(5)
+            assert index.ready is True
+            assert mock_refresh.call_count == 1
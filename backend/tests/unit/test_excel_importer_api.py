@@ -15,29 +15,21 @@ client = TestClient(app)
 class TestExcelImporterAPI:
     """Excel 导入 API 测试类（完全重写版本）"""
     
+    @patch('src.api.excel_importer_api.job_runner')
     @patch('src.api.excel_importer_api.ExcelImporter')
-    def test_import_excel_api_success(self, mock_importer):
-        """测试 Excel 导入 API 成功（匹配新的 UploadFile API 格式）"""
+    def test_import_excel_api_success(self, mock_importer, mock_job_runner):
+        """测试 Excel 导入 API 成功：上传文件后提交一个后台导入任务"""
         
         # 准备测试数据
         test_file_content = b'fake excel content'
         test_filename = "test.xlsx"
         
-        # 模拟 ExcelImporter 实例和其方法
+        # 模拟 ExcelImporter 实例
         mock_excel_importer_instance = Mock()
         mock_importer.return_value = mock_excel_importer_instance
+        mock_job_runner.submit.return_value = "job-123"
         
-        # 模拟 import_excel_data 方法的返回值
-        # 注意：实际实现中，文件会被保存到临时路径，而不是使用原始文件名
-        mock_excel_importer_instance.import_excel_data.return_value = {
-            "job_id": "import_1700000000_123456",
-            "status": "pending",
-            "progress": 0.0,
-            "created_at": "2026-01-27T10:00:00Z"
-        }
-        
-        # 执行请求 - 使用正确的 multipart/form-data 格式
-        # 这是关键修复：使用 files 参数传递文件，使用 data 参数传递表单字段
+        # 执行请求 - 使用 files 参数传递文件，使用 data 参数传递表单字段
         response = client.post(
             "/api/data-tables/import-excel",
             files={"file": (test_filename, test_file_content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
@@ -54,34 +46,21 @@ class TestExcelImporterAPI:
         # 验证结果
         assert response.status_code == 200
         data = response.json()
-        # 验证 job_id 格式：以 'import_' 开头，后跟时间戳和哈希值
-        assert data["job_id"].startswith("import_")
-        assert len(data["job_id"]) > len("import_")
+        assert data["job_id"] == "job-123"
         assert data["status"] == "pending"
         assert data["progress"] == 0.0
         assert "created_at" in data
         
-        # 验证 Mock 调用参数 - 关键修复：实际传递的是临时文件路径，不是原始文件名
-        # 由于直接调用和后台任务都调用了 import_excel_data，Mock 应该被调用2次
-        assert mock_excel_importer_instance.import_excel_data.call_count == 2
-        
-        # 检查第一次调用的参数（直接调用）
-        first_call_args = mock_excel_importer_instance.import_excel_data.call_args_list[0][1]
-        assert first_call_args["table_name"] == "imported_table"
-        assert first_call_args["sheet_name"] == "Sheet1"
-        assert first_call_args["job_id"].startswith("import_")
-        assert len(first_call_args["job_id"]) > len("import_")
-        assert isinstance(first_call_args["file_path"], str)
-        assert first_call_args["file_path"].endswith(".xlsx") or first_call_args["file_path"].endswith(".xls")
-        
-        # 检查第二次调用的参数（后台任务调用）
-        second_call_args = mock_excel_importer_instance.import_excel_data.call_args_list[1][1]
-        assert second_call_args["table_name"] == "imported_table"
-        assert second_call_args["sheet_name"] == "Sheet1"
-        assert second_call_args["job_id"].startswith("import_")
-        assert len(second_call_args["job_id"]) > len("import_")
-        assert isinstance(second_call_args["file_path"], str)
-        assert second_call_args["file_path"].endswith(".xlsx") or second_call_args["file_path"].endswith(".xls")
+        # 导入只在后台任务中执行一次，请求处理过程中不直接导入
+        mock_excel_importer_instance.import_excel_data.assert_not_called()
+        mock_job_runner.submit.assert_called_once()
+        job_type, payload = mock_job_runner.submit.call_args[0]
+        assert job_type == "excel_import"
+        assert payload["table_name"] == "imported_table"
+        assert payload["sheet_name"] == "Sheet1"
+        # 实际传递的是临时文件路径，不是原始文件名
+        assert payload["file_path"].endswith(".xlsx")
+        os.unlink(payload["file_path"])
         
     @patch('src.api.excel_importer_api.ExcelImporter')
     def test_import_excel_api_invalid_file_type(self, mock_importer):
@@ -13,26 +13,22 @@ class TestExcelParser:
         """测试前准备"""
         self.parser = ExcelParser()
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_parse_file_structure_success(self, mock_excel_service_class):
+    @staticmethod
+    def _mock_sheet(field_types, row_count=100, empty_row_count=0):
+        """构造扫描结果中的 Sheet"""
+        sheet = Mock()
+        sheet.field_types = field_types
+        sheet.row_count = row_count
+        sheet.column_count = len(field_types)
+        sheet.empty_row_count = empty_row_count
+        return sheet
+    
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_parse_file_structure_success(self, mock_get_scanner):
         """测试解析文件结构成功"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
-        
-        # 准备测试数据
-        mock_structure = {
-            "file_path": "/test/file.xlsx",
-            "sheet_count": 1,
-            "sheets": [
-                {
-                    "name": "Sheet1",
-                    "row_count": 100,
-                    "column_count": 3,
-                    "columns": ["Name", "Age", "City"]
-                }
-            ]
-        }
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         mock_field_types = [
             {
@@ -53,8 +49,21 @@ class TestExcelParser:
             }
         ]
         
-        mock_excel_service.get_excel_structure.return_value = mock_structure
-        mock_excel_service.infer_field_types.return_value = mock_field_types
+        # 准备测试数据
+        mock_structure = {
+            "file_path": "/test/file.xlsx",
+            "sheet_count": 1,
+            "sheets": [
+                {
+                    "name": "Sheet1",
+                    "row_count": 100,
+                    "column_count": 2,
+                    "columns": ["Name", "Age"],
+                    "field_types": mock_field_types
+                }
+            ]
+        }
+        mock_scanner.scan.return_value.to_structure.return_value = mock_structure
         
         # 重新创建解析器以使用 Mock
         parser = ExcelParser()
@@ -68,19 +77,18 @@ class TestExcelParser:
         assert len(result["sheets"]) == 1
         assert result["sheets"][0]["field_types"] == mock_field_types
         
-        # 验证调用
-        mock_excel_service.get_excel_structure.assert_called_once_with("/test/file.xlsx")
-        mock_excel_service.infer_field_types.assert_called_once_with("/test/file.xlsx", "Sheet1")
+        # 验证只扫描一次
+        mock_scanner.scan.assert_called_once_with("/test/file.xlsx")
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_parse_file_structure_failure(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_parse_file_structure_failure(self, mock_get_scanner):
         """测试解析文件结构失败"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 模拟异常
-        mock_excel_service.get_excel_structure.side_effect = Exception("文件不存在")
+        mock_scanner.scan.side_effect = Exception("文件不存在")
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -91,12 +99,12 @@ class TestExcelParser:
         
         assert "Failed to parse Excel structure" in str(exc_info.value)
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_get_sheet_preview_success(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_get_sheet_preview_success(self, mock_get_scanner):
         """测试获取 Sheet 预览成功"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 准备测试数据
         mock_sheet_data = {
@@ -115,8 +123,8 @@ class TestExcelParser:
             {"field_name": "Age", "data_type": "INTEGER"}
         ]
         
-        mock_excel_service.get_sheet_data.return_value = mock_sheet_data
-        mock_excel_service.infer_field_types.return_value = mock_field_types
+        mock_scanner.get_sheet_data.return_value = mock_sheet_data
+        mock_scanner.scan.return_value.get_sheet.return_value = self._mock_sheet(mock_field_types)
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -132,18 +140,18 @@ class TestExcelParser:
         assert result["data"] == mock_sheet_data["data"]
         
         # 验证调用
-        mock_excel_service.get_sheet_data.assert_called_once_with("/test/file.xlsx", "Sheet1", 100)
-        mock_excel_service.infer_field_types.assert_called_once_with("/test/file.xlsx", "Sheet1")
+        mock_scanner.get_sheet_data.assert_called_once_with("/test/file.xlsx", "Sheet1", 100)
+        mock_scanner.scan.return_value.get_sheet.assert_called_once_with("Sheet1")
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_get_sheet_preview_failure(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_get_sheet_preview_failure(self, mock_get_scanner):
         """测试获取 Sheet 预览失败"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 模拟异常
-        mock_excel_service.get_sheet_data.side_effect = Exception("Sheet 不存在")
+        mock_scanner.get_sheet_data.side_effect = Exception("Sheet 不存在")
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -154,12 +162,12 @@ class TestExcelParser:
         
         assert "Failed to get sheet preview" in str(exc_info.value)
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_validate_sheet_data_success(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_validate_sheet_data_success(self, mock_get_scanner):
         """测试验证 Sheet 数据成功"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 准备测试数据
         mock_field_types = [
@@ -172,13 +180,9 @@ class TestExcelParser:
             }
         ]
         
-        mock_sheet_data = {
-            "row_count": 100,
-            "column_count": 1
-        }
-        
-        mock_excel_service.infer_field_types.return_value = mock_field_types
-        mock_excel_service.get_sheet_data.return_value = mock_sheet_data
+        mock_scanner.scan.return_value.get_sheet.return_value = self._mock_sheet(
+            mock_field_types, row_count=100, empty_row_count=2
+        )
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -201,17 +205,18 @@ class TestExcelParser:
         # 验证数据质量指标
         assert "data_quality" in result
         assert result["data_quality"]["has_duplicate_headers"] is False
+        assert result["data_quality"]["has_empty_rows"] is True
         
         # 验证调用
-        mock_excel_service.infer_field_types.assert_called_once_with("/test/file.xlsx", "Sheet1")
-        mock_excel_service.get_sheet_data.assert_called_once_with("/test/file.xlsx", "Sheet1", limit=1000)
+        mock_scanner.scan.assert_called_once_with("/test/file.xlsx")
+        mock_scanner.scan.return_value.get_sheet.assert_called_once_with("Sheet1")
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_validate_sheet_data_with_duplicate_headers(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_validate_sheet_data_with_duplicate_headers(self, mock_get_scanner):
         """测试验证包含重复列名的 Sheet 数据"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 准备测试数据（包含重复列名）
         mock_field_types = [
@@ -219,10 +224,7 @@ class TestExcelParser:
             {"field_name": "Name", "data_type": "TEXT", "unique_count": 30, "null_count": 5, "sample_values": []}  # 重复列名
         ]
         
-        mock_sheet_data = {"row_count": 100, "column_count": 2}
-        
-        mock_excel_service.infer_field_types.return_value = mock_field_types
-        mock_excel_service.get_sheet_data.return_value = mock_sheet_data
+        mock_scanner.scan.return_value.get_sheet.return_value = self._mock_sheet(mock_field_types)
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -233,12 +235,12 @@ class TestExcelParser:
         # 验证结果
         assert result["data_quality"]["has_duplicate_headers"] is True
     
-    @patch('src.services.excel_parser.ExcelService')
-    def test_generate_table_schema_success(self, mock_excel_service_class):
+    @patch('src.services.excel_parser.get_workbook_scanner')
+    def test_generate_table_schema_success(self, mock_get_scanner):
         """测试生成表结构成功"""
         # 准备 Mock 对象
-        mock_excel_service = Mock()
-        mock_excel_service_class.return_value = mock_excel_service
+        mock_scanner = Mock()
+        mock_get_scanner.return_value = mock_scanner
         
         # 准备测试数据
         mock_field_types = [
@@ -259,7 +261,7 @@ class TestExcelParser:
             }
         ]
         
-        mock_excel_service.infer_field_types.return_value = mock_field_types
+        mock_scanner.scan.return_value.get_sheet.return_value = self._mock_sheet(mock_field_types)
         
         # 重新创建解析器
         parser = ExcelParser()
@@ -293,7 +295,7 @@ class TestExcelParser:
         assert fields[2]["data_type"] == "DECIMAL(10,2)"
         
         # 验证调用
-        mock_excel_service.infer_field_types.assert_called_once_with("/test/file.xlsx", "Sheet1")
+        mock_scanner.scan.assert_called_once_with("/test/file.xlsx")
     
     def test_sanitize_field_name(self):
         """测试字段名清理功能"""
@@ -27,14 +27,17 @@ class TestIntelligentTableSelector:
              patch('src.services.intelligent_table_selector.SemanticContextAggregator') as mock_aggregator, \
              patch('src.services.intelligent_table_selector.SemanticSimilarityEngine') as mock_similarity, \
              patch('src.services.intelligent_table_selector.MultiSourceDataIntegrationEngine') as mock_integration, \
-             patch('src.services.intelligent_table_selector.TableRelationSemanticInjectionService') as mock_relation:
+             patch('src.services.intelligent_table_selector.TableRelationSemanticInjectionService') as mock_relation, \
+             patch('src.services.intelligent_table_selector.get_embedding_index') as mock_embedding_index:
             
+            mock_embedding_index.return_value.search.return_value = []
             yield {
                 'ai_service': mock_ai.return_value,
                 'semantic_aggregator': mock_aggregator.return_value,
                 'similarity_engine': mock_similarity.return_value,
                 'data_integration': mock_integration.return_value,
-                'relation_module': mock_relation.return_value
+                'relation_module': mock_relation.return_value,
+                'embedding_index': mock_embedding_index.return_value
             }
     
     @pytest.fixture
@@ -593,4 +596,62 @@ class TestIntelligentTableSelector:
         assert isinstance(result, TableSelectionResult)
         assert result.selection_strategy == "similarity_fallback"
         assert len(result.primary_tables) == 0  # 没有符合阈值的主表
-        assert len(result.related_tables) == 0  # 没有符合阈值的关联表
\ No newline at end of file
+        assert len(result.related_tables) == 0  # 没有符合阈值的关联表
+    @pytest.mark.asyncio
+    async def test_select_tables_prunes_large_candidate_set(self, table_selector, mock_dependencies, sample_semantic_context, sample_candidate_tables, sample_ai_response):
+        """测试候选表很多时只把预排序短名单交给AI模型"""
+        noise_tables = [
+            {"id": f"tbl_log_{i}", "table_name": f"log_archive_{i}", "table_comment": "系统日志归档", "fields": []}
+            for i in range(600)
+        ]
+        mock_dependencies['semantic_aggregator'].aggregate_semantic_context = AsyncMock(return_value=sample_semantic_context)
+        mock_dependencies['data_integration'].get_integrated_metadata = AsyncMock(
+            return_value={"tables": noise_tables + sample_candidate_tables}
+        )
+        mock_dependencies['ai_service'].generate_response = AsyncMock(return_value=sample_ai_response)
+        mock_dependencies['relation_module'].inject_table_relation_semantics = Mock(return_value=[])
+        table_selector.recall_sample_rate = 0.0
+        
+        result = await table_selector.select_tables(user_question="查询销售额最高的产品")
+        
+        prompt = mock_dependencies['ai_service'].generate_response.call_args.kwargs["prompt"]
+        assert "products" in prompt
+        assert "log_archive_0" not in prompt
+        assert result.primary_tables[0].table_name == "products"
+        
+        pre_ranking = table_selector.get_selection_statistics()["pre_ranking"]
+        assert pre_ranking["pruned_rankings"] == 1
+        assert pre_ranking["average_shortlist_size"] < 20
+    
+    def test_evaluate_shortlist_recall(self, table_selector, mock_dependencies, sample_candidate_tables):
+        """测试以全量相似度打分为参照统计recall@k"""
+        scores = {"tbl_001": 0.9, "tbl_002": 0.6}
+        mock_dependencies['similarity_engine'].analyze_user_question = Mock(return_value=Mock())
+        mock_dependencies['similarity_engine'].calculate_table_similarity = Mock(
+            side_effect=lambda analysis, table: Mock(similarity_score=scores.get(table["id"], 0.0))
+        )
+        
+        recall = table_selector._evaluate_shortlist_recall(
+            "查询销售额最高的产品", sample_candidate_tables, sample_candidate_tables[:1]
+        )
+        
+        assert recall == 0.5
+        assert table_selector.get_selection_statistics()["pre_ranking"]["recall_at_k"] == 0.5
+    
+    def test_dense_table_scores_aggregated_by_table(self, table_selector, mock_dependencies):
+        """测试向量检索的表和字段命中按表聚合最高相似度"""
+        from src.services.embedding_index import SearchHit
+        mock_dependencies['embedding_index'].search.return_value = [
+            SearchHit("f_amount", "field", 0.7, {"table_id": "tbl_002"}),
+            SearchHit("tbl_002", "table", 0.4, {"table_id": "tbl_002"}),
+            SearchHit("tbl_001", "table", 0.3, {"table_id": "tbl_001"})
+        ]
+        
+        scores = table_selector._dense_table_scores("每位顾客的消费总额")
+        
+        assert scores == {"tbl_002": 0.7, "tbl_001": 0.3}
+        mock_dependencies['embedding_index'].refresh_if_stale.assert_called_once()
+        
+        # 索引后台建立期间只使用关键词匹配
+        mock_dependencies['embedding_index'].ready = False
+        assert table_selector._dense_table_scores("每位顾客的消费总额") == {}
@@ -0,0 +1,120 @@
+"""
+意图识别快速通道单元测试
+
+测试问题规范化、本地分类器、缓存淘汰和样本日志
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from src.services.intent_fast_path import (
+    IntentFastPath,
+    LocalIntentClassifier,
+    normalize_question
+)
+
+
+def train_samples():
+    samples = [(f"查询{item}的数量", "query") for item in ["订单", "用户", "商品", "门店", "退款", "库存", "会员", "供应商", "仓库", "渠道"]]
+    samples += [(f"生成{item}分析报告", "report") for item in ["月度", "季度", "年度", "销售", "运营", "财务", "用户", "渠道", "库存", "区域"]]
+    return samples
+
+
+class TestNormalize:
+    """问题规范化测试"""
+
+    def test_normalize_question(self):
+        """测试全角、大小写、数字和标点被归一"""
+        assert normalize_question("查询ＧＭＶ最近3个月？") == normalize_question(" 查询gmv最近12个月 ")
+        assert normalize_question("查询订单") != normalize_question("生成报告")
+
+
+class TestLocalIntentClassifier:
+    """本地分类器测试"""
+
+    def test_not_ready_without_enough_samples(self):
+        """测试样本不足或只有一个意图时不作判定"""
+        classifier = LocalIntentClassifier(min_samples_per_class=10)
+        for question, intent in train_samples():
+            if intent == "query":
+                classifier.learn(question, intent)
+
+        assert classifier.predict("查询订单的数量") is None
+
+    def test_predict_after_training(self):
+        """测试训练后判定正确且在毫秒以内"""
+        classifier = LocalIntentClassifier()
+        for question, intent in train_samples():
+            classifier.learn(question, intent)
+
+        started = time.perf_counter()
+        intent, probability = classifier.predict("生成本月的客户分析报告")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        assert intent == "report"
+        assert probability > 0.95
+        assert elapsed_ms < 5.0  # 通常远低于1ms，留出慢速CI的余量
+
+
+class TestIntentFastPath:
+    """快速通道测试"""
+
+    def test_cache_bounded_and_context_aware(self):
+        """测试缓存按上下文区分且有容量上限"""
+        fast_path = IntentFastPath(cache_size=2)
+        fast_path.record("查询订单", "query", 0.9, "r")
+        fast_path.record("查询订单", "report", 0.9, "r", context_signature="对话历史：最近2轮对话")
+        fast_path.record("生成报告", "report", 0.9, "r")
+
+        assert fast_path.lookup("查询订单") is None
+        assert fast_path.lookup("查询订单", "对话历史：最近2轮对话").intent == "report"
+        assert fast_path.lookup("生成报告").source == "cache"
+
+    def test_sample_log_retrains_on_restart(self, tmp_path):
+        """测试云端结果写入样本日志，重启后重新训练分类器"""
+        log_path = str(tmp_path / "intent" / "samples.jsonl")
+        fast_path = IntentFastPath(sample_log_path=log_path)
+        for question, intent in train_samples():
+            fast_path.record(question, intent, 0.9, "r")
+        fast_path.flush(timeout=5)
+
+        restarted = IntentFastPath(sample_log_path=log_path)
+        decision = restarted.lookup("查询客户的数量")
+
+        assert restarted.classifier.sample_count == len(train_samples())
+        assert decision is not None
+        assert decision.source == "classifier"
+        assert decision.intent == "query"
+
+    def test_sample_log_capped_to_newest_samples(self, tmp_path):
+        """测试样本日志超过上限后压缩为最新的样本"""
+        log_path = tmp_path / "samples.jsonl"
+        fast_path = IntentFastPath(sample_log_path=str(log_path), max_log_samples=10)
+        for i in range(25):
+            fast_path.record(f"查询第{i}个门店的订单", "query", 0.9, "r")
+        fast_path.flush(timeout=5)
+
+        lines = log_path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) <= 11
+        assert json.loads(lines[-1])["question"] == "查询第24个门店的订单"
+        assert [sample["question"] for sample in fast_path.load_samples()][-1] == "查询第24个门店的订单"
+
+    def test_record_does_not_wait_for_log_write(self, tmp_path):
+        """测试样本日志写入在后台线程进行，record不等待磁盘I/O"""
+        fast_path = IntentFastPath(sample_log_path=str(tmp_path / "samples.jsonl"))
+        release = threading.Event()
+        original_write = fast_path._write_sample
+        fast_path._write_sample = lambda record: (release.wait(5), original_write(record))
+
+        started = time.perf_counter()
+        fast_path.record("查询订单", "query", 0.9, "r")
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1.0
+        assert fast_path.lookup("查询订单").source == "cache"
+        release.set()
+        fast_path.flush(timeout=5)
+        assert (tmp_path / "samples.jsonl").exists()
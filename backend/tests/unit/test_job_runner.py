@@ -0,0 +1,310 @@
+"""
+后台任务执行器测试
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.base import Base
+from src.models.background_job_model import BackgroundJob, JobStatus
+from src.services.job_runner import JobCancelled, JobRunner, register_job_handler
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[BackgroundJob.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def make_runner(session_factory):
+    runners = []
+
+    def factory(**kwargs):
+        kwargs.setdefault("max_workers", 2)
+        kwargs.setdefault("retry_base_delay", 0.01)
+        kwargs.setdefault("progress_interval", 0)
+        runner = JobRunner(session_factory=session_factory, **kwargs)
+        runners.append(runner)
+        return runner
+
+    yield factory
+    for runner in runners:
+        runner.shutdown(wait=True)
+
+
+def wait_for(runner, job_id, statuses=("completed", "failed", "cancelled"), timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get_job(job_id)
+        if job and job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {statuses}: {runner.get_job(job_id)}")
+
+
+def test_job_completes_and_persists_result(make_runner):
+    """测试任务执行完成后结果和进度写入任务表"""
+    def handler(context):
+        context.report_progress(50, "half")
+        return {"echo": context.payload["value"], "attempt": context.attempt}
+
+    register_job_handler("test_echo", handler)
+    runner = make_runner()
+
+    job_id = runner.submit("test_echo", {"value": 42}, concurrency_key="ds-1")
+    job = wait_for(runner, job_id)
+
+    assert job["status"] == JobStatus.COMPLETED.value
+    assert job["result"] == {"echo": 42, "attempt": 1}
+    assert job["progress"] == 100
+    assert job["message"] == "half"
+    assert job["attempts"] == 1
+    metrics = runner.get_metrics()["job_types"]["test_echo"]
+    assert metrics["submitted"] == 1
+    assert metrics["completed"] == 1
+    assert metrics["runs"] == 1
+
+
+def test_unregistered_job_type_is_rejected(make_runner):
+    """测试提交未注册的任务类型时报错"""
+    runner = make_runner()
+    with pytest.raises(ValueError):
+        runner.submit("test_missing_handler")
+
+
+def test_concurrency_limits(make_runner):
+    """测试工作线程数和每个并发分组的并发上限"""
+    lock = threading.Lock()
+    active = {"total": 0, "ds-1": 0, "ds-2": 0}
+    peak = {"total": 0, "ds-1": 0, "ds-2": 0}
+
+    def handler(context):
+        key = context.concurrency_key
+        with lock:
+            active["total"] += 1
+            active[key] += 1
+            peak["total"] = max(peak["total"], active["total"])
+            peak[key] = max(peak[key], active[key])
+        time.sleep(0.05)
+        with lock:
+            active["total"] -= 1
+            active[key] -= 1
+        return None
+
+    register_job_handler("test_limited", handler)
+    runner = make_runner(max_workers=3, per_key_limit=1)
+
+    job_ids = [runner.submit("test_limited", concurrency_key="ds-1") for _ in range(4)]
+    job_ids += [runner.submit("test_limited", concurrency_key="ds-2") for _ in range(2)]
+    for job_id in job_ids:
+        assert wait_for(runner, job_id)["status"] == JobStatus.COMPLETED.value
+
+    assert peak["ds-1"] == 1
+    assert peak["ds-2"] == 1
+    assert peak["total"] == 2
+    metrics = runner.get_metrics()
+    assert metrics["running"] == 0 and metrics["queued"] == 0
+    assert metrics["running_per_key"] == {}
+
+
+def test_retry_with_backoff(make_runner):
+    """测试失败后按退避重试，重试次数用尽或遇到不重试的异常时失败"""
+    calls = []
+
+    def flaky(context):
+        calls.append(context.attempt)
+        if context.attempt < 3:
+            raise ConnectionError("temporary")
+        return {"attempt": context.attempt}
+
+    def broken(context):
+        raise ConnectionError("down")
+
+    def invalid(context):
+        raise ValueError("bad payload")
+
+    register_job_handler("test_flaky", flaky)
+    register_job_handler("test_broken", broken, max_attempts=2)
+    register_job_handler("test_invalid", invalid, retry_on=(ConnectionError,))
+    runner = make_runner()
+
+    job = wait_for(runner, runner.submit("test_flaky"))
+    assert job["status"] == JobStatus.COMPLETED.value
+    assert job["attempts"] == 3
+    assert calls == [1, 2, 3]
+
+    job = wait_for(runner, runner.submit("test_broken"))
+    assert job["status"] == JobStatus.FAILED.value
+    assert job["attempts"] == 2
+    assert job["error"] == "down"
+
+    job = wait_for(runner, runner.submit("test_invalid"))
+    assert job["status"] == JobStatus.FAILED.value
+    assert job["attempts"] == 1
+
+    metrics = runner.get_metrics()["job_types"]
+    assert metrics["test_flaky"]["retried"] == 2
+    assert metrics["test_broken"]["retried"] == 1
+    assert metrics["test_invalid"]["retried"] == 0
+
+
+def test_cancel_queued_and_running_jobs(make_runner):
+    """测试取消排队中和执行中的任务"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(context):
+        started.set()
+        while not release.wait(0.01):
+            context.check_cancelled()
+        return None
+
+    register_job_handler("test_blocking", blocking)
+    runner = make_runner(max_workers=1)
+
+    running_id = runner.submit("test_blocking")
+    assert started.wait(2)
+    queued_id = runner.submit("test_blocking")
+
+    assert runner.cancel(queued_id) is True
+    assert runner.get_job(queued_id)["status"] == JobStatus.CANCELLED.value
+
+    assert runner.cancel(running_id) is True
+    job = wait_for(runner, running_id)
+    assert job["status"] == JobStatus.CANCELLED.value
+    assert job["cancel_requested"] is True
+
+    assert runner.cancel(running_id) is False
+    assert runner.cancel("missing") is False
+    assert runner.delete_job(running_id) is True
+    assert runner.get_job(running_id) is None
+    assert runner.get_metrics()["job_types"]["test_blocking"]["cancelled"] == 2
+
+
+def test_recover_unfinished_jobs_after_restart(make_runner, session_factory):
+    """测试重启后恢复排队中和被中断的任务，已取消或已完成的任务不再执行"""
+    executed = []
+
+    def handler(context):
+        executed.append((context.payload["name"], context.attempt))
+        return None
+
+    register_job_handler("test_recover", handler)
+
+    db = session_factory()
+    db.add_all([
+        BackgroundJob(id="pending", job_type="test_recover", status="pending", payload={"name": "pending"}),
+        BackgroundJob(id="running", job_type="test_recover", status="running", attempts=1,
+                      payload={"name": "running"}),
+        BackgroundJob(id="done", job_type="test_recover", status="completed", payload={"name": "done"}),
+        BackgroundJob(id="cancelled", job_type="test_recover", status="cancelled", payload={"name": "cancelled"})
+    ])
+    db.commit()
+    db.close()
+
+    runner = make_runner()
+    assert runner.recover() == 2
+    assert wait_for(runner, "pending")["status"] == JobStatus.COMPLETED.value
+    assert wait_for(runner, "running")["attempts"] == 2
+    assert sorted(executed) == [("pending", 1), ("running", 2)]
+    assert runner.recover() == 0
+    assert [job["id"] for job in runner.list_jobs(job_type="test_recover", status="completed")].count("done") == 1
+
+
+def test_recover_respects_attempts_and_live_owners(make_runner, session_factory):
+    """测试恢复时执行次数已用尽的中断任务标记为失败，心跳未超时的任务留给所属进程"""
+    executed = []
+
+    def handler(context):
+        executed.append(context.job_id)
+        return None
+
+    register_job_handler("test_recover_once", handler, max_attempts=1)
+    now = datetime.now()
+
+    db = session_factory()
+    db.add_all([
+        BackgroundJob(id="exhausted", job_type="test_recover_once", status="running", attempts=1, max_attempts=1,
+                      owner="dead-worker", heartbeat_at=now - timedelta(hours=1)),
+        BackgroundJob(id="live", job_type="test_recover_once", status="running", attempts=1, max_attempts=3,
+                      owner="live-worker", heartbeat_at=now),
+        BackgroundJob(id="stale", job_type="test_recover_once", status="running", attempts=1, max_attempts=3,
+                      owner="dead-worker", heartbeat_at=now - timedelta(hours=1)),
+        BackgroundJob(id="pending_exhausted", job_type="test_recover_once", status="pending", attempts=1,
+                      max_attempts=1)
+    ])
+    db.commit()
+    db.close()
+
+    runner = make_runner(heartbeat_interval=60)
+    assert runner.recover() == 2
+
+    stale = wait_for(runner, "stale")
+    assert stale["status"] == JobStatus.COMPLETED.value
+    assert stale["attempts"] == 2
+    assert stale["owner"] == runner.worker_id
+    assert wait_for(runner, "pending_exhausted")["status"] == JobStatus.FAILED.value
+
+    exhausted = runner.get_job("exhausted")
+    assert exhausted["status"] == JobStatus.FAILED.value
+    assert exhausted["attempts"] == 1
+    assert runner.get_job("live")["status"] == JobStatus.RUNNING.value
+    assert executed == ["stale"]
+
+
+def test_heartbeat_updates_running_jobs(make_runner):
+    """测试执行中的任务定期写入心跳"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking(context):
+        started.set()
+        release.wait(2)
+        return None
+
+    register_job_handler("test_heartbeat", blocking)
+    runner = make_runner(heartbeat_interval=0.05)
+    job_id = runner.submit("test_heartbeat")
+    assert started.wait(2)
+
+    first = runner.get_job(job_id)["heartbeat_at"]
+    time.sleep(0.2)
+    assert runner.get_job(job_id)["heartbeat_at"] > first
+    release.set()
+    assert wait_for(runner, job_id)["status"] == JobStatus.COMPLETED.value
+
+
+def test_cancel_request_from_another_process(make_runner, session_factory):
+    """测试其他进程通过任务表发出的取消请求在写入进度时生效"""
+    started = threading.Event()
+
+    def looping(context):
+        started.set()
+        for step in range(500):
+            context.report_progress(step // 5)
+            if context.cancelled:
+                raise JobCancelled()
+            time.sleep(0.01)
+        return None
+
+    register_job_handler("test_looping", looping)
+    runner = make_runner()
+    job_id = runner.submit("test_looping")
+    assert started.wait(2)
+
+    db = session_factory()
+    db.get(BackgroundJob, job_id).cancel_requested = True
+    db.commit()
+    db.close()
+
+    job = wait_for(runner, job_id)
+    assert job["status"] == JobStatus.CANCELLED.value
+    assert job["progress"] < 100
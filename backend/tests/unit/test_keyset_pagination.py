@@ -0,0 +1,81 @@
+"""
+键集分页单元测试
+
+测试分页SQL构造、游标编解码和游标校验
+"""
+
+import pytest
+from datetime import datetime
+from decimal import Decimal
+
+from src.services.keyset_pagination import KeysetPaginator, InvalidCursorError
+
+
+@pytest.fixture
+def paginator():
+    """创建键集分页器实例"""
+    return KeysetPaginator()
+
+
+class TestBuildPageSQL:
+    """分页SQL构造测试"""
+
+    def test_first_page(self, paginator):
+        """测试首页只排序不加条件"""
+        sql = paginator.build_page_sql("SELECT * FROM orders", ['id'], None, 51, 'mysql')
+        assert sql == "SELECT * FROM (SELECT * FROM orders) AS _page ORDER BY `id` LIMIT 51"
+
+    def test_seek_single_key(self, paginator):
+        """测试单列键定位"""
+        sql = paginator.build_page_sql("SELECT * FROM orders;", ['id'], [100], 51, 'postgresql')
+        assert sql == 'SELECT * FROM (SELECT * FROM orders) AS _page WHERE "id" > 100 ORDER BY "id" LIMIT 51'
+
+    def test_seek_composite_key(self, paginator):
+        """测试复合键展开为OR条件"""
+        sql = paginator.build_page_sql("SELECT * FROM items", ['order_id', 'line_no'], [7, 3], 11, 'mysql')
+        assert "WHERE ((`order_id` > 7) OR (`order_id` = 7 AND `line_no` > 3))" in sql
+        assert sql.endswith("ORDER BY `order_id`, `line_no` LIMIT 11")
+
+    def test_sqlserver_uses_top_and_strips_inner_order_by(self, paginator):
+        """测试SQL Server使用TOP并去掉子查询中的ORDER BY"""
+        sql = paginator.build_page_sql("SELECT * FROM orders ORDER BY amount", ['id'], ["A'1"], 21, 'sqlserver')
+        assert sql == "SELECT TOP 21 * FROM (SELECT * FROM orders) AS _page WHERE [id] > N'A''1' ORDER BY [id]"
+
+    def test_mysql_string_escaping(self, paginator):
+        """测试MySQL字符串字面量转义反斜杠和引号"""
+        sql = paginator.build_page_sql("SELECT * FROM t", ['code'], ["a\\' OR 1=1 --"], 10, 'mysql')
+        assert "`code` > 'a\\\\'' OR 1=1 --'" in sql
+
+
+class TestCursor:
+    """游标编解码测试"""
+
+    def test_round_trip(self, paginator):
+        """测试游标编码后可解码"""
+        fingerprint = paginator.fingerprint("SELECT * FROM orders", ['id', 'created_at'])
+        token = paginator.encode_cursor([Decimal('42'), datetime(2024, 1, 2, 3, 4, 5)], 3, fingerprint)
+
+        cursor = paginator.decode_cursor(token, fingerprint)
+        assert cursor.values == [42, '2024-01-02 03:04:05']
+        assert cursor.page == 3
+
+    def test_fingerprint_ignores_formatting(self, paginator):
+        """测试查询指纹忽略空白和分号"""
+        assert paginator.fingerprint("SELECT *\n  FROM orders;", ['id']) == \
+            paginator.fingerprint("select * from orders", ['ID'])
+
+    def test_cursor_for_other_query_rejected(self, paginator):
+        """测试游标不能用于其他查询"""
+        token = paginator.encode_cursor([1], 1, paginator.fingerprint("SELECT * FROM a", ['id']))
+        with pytest.raises(InvalidCursorError):
+            paginator.decode_cursor(token, paginator.fingerprint("SELECT * FROM b", ['id']))
+
+    def test_malformed_cursor_rejected(self, paginator):
+        """测试格式错误的游标"""
+        with pytest.raises(InvalidCursorError):
+            paginator.decode_cursor("not-a-cursor", "abc")
+
+    def test_null_key_value_rejected(self, paginator):
+        """测试排序键为空时无法生成游标"""
+        with pytest.raises(ValueError):
+            paginator.encode_cursor([None], 1, "abc")
@@ -33,9 +33,16 @@ class TestKnowledgeSemanticInjectionService:
         return Mock(spec=Session)
     
     @pytest.fixture
-    def service(self, mock_db_session):
+    def mock_embedding_index(self):
+        """模拟元数据向量索引（默认无命中）"""
+        index = Mock()
+        index.search.return_value = []
+        return index
+    
+    @pytest.fixture
+    def service(self, mock_db_session, mock_embedding_index):
         """创建服务实例"""
-        return KnowledgeSemanticInjectionService(mock_db_session)
+        return KnowledgeSemanticInjectionService(mock_db_session, embedding_index=mock_embedding_index)
     
     @pytest.fixture
     def sample_knowledge_base(self):
@@ -251,6 +258,28 @@ class TestKnowledgeSemanticInjectionService:
         assert terms[0].name == "客户"
         assert terms[0].relevance_score > 0
     
+    def test_match_terms_with_dense_scores(self, service, sample_term_item):
+        """测试没有关键词重合时由向量检索相似度召回术语"""
+        mock_query = Mock()
+        mock_query.join.return_value = mock_query
+        mock_query.filter.return_value = mock_query
+        mock_query.all.return_value = [sample_term_item]
+        service.db.query.return_value = mock_query
+        
+        assert service._match_terms({"顾", "主"}, None, True, 10) == []
+        
+        terms = service._match_terms({"顾", "主"}, None, True, 10, dense_scores={"item_001": 0.6})
+        assert len(terms) == 1
+        assert terms[0].relevance_score == pytest.approx(1.8)
+    
+    def test_dense_knowledge_scores(self, service, mock_embedding_index):
+        """测试向量检索知识条目"""
+        from src.services.embedding_index import SearchHit
+        mock_embedding_index.search.return_value = [SearchHit("item_001", "knowledge", 0.6)]
+        
+        assert service._dense_knowledge_scores("顾主有多少") == {"item_001": 0.6}
+        mock_embedding_index.refresh_if_stale.assert_called_once()
+    
     def test_match_logics_success(self, service, sample_logic_item):
         """测试业务逻辑匹配成功"""
         keywords = {"vip", "客户", "规则"}
@@ -0,0 +1,204 @@
+"""
+本地嵌入式分析存储单元测试
+
+测试Excel/CSV导入、只读查询、表管理，以及SQL执行服务对嵌入式存储的支持
+"""
+
+import pytest
+import pandas as pd
+from unittest.mock import patch
+
+from src.services.local_olap_store import (
+    LocalOLAPStore,
+    LocalOLAPStoreError,
+    DUCKDB_AVAILABLE,
+    ENGINE_DUCKDB,
+    ENGINE_SQLITE
+)
+from src.services.sql_executor_service import SQLExecutorService, DatabaseType, build_data_source_config
+
+ENGINES = [ENGINE_SQLITE] + ([ENGINE_DUCKDB] if DUCKDB_AVAILABLE else [])
+
+
+@pytest.fixture(params=ENGINES)
+def store(request, tmp_path):
+    """创建本地分析存储实例"""
+    return LocalOLAPStore(storage_dir=str(tmp_path / "olap"), engine=request.param)
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    """创建销售数据CSV文件"""
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({
+        'region': ['华东', '华北', '华东', '华南'],
+        'amount': [100, 200, 300, 50]
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def sales_excel(tmp_path):
+    """创建包含两个Sheet的Excel文件"""
+    path = tmp_path / "sales.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'region': ['华东', '华北'], 'amount': [1, 2]}).to_excel(writer, sheet_name='订单', index=False)
+        pd.DataFrame({'name': ['a'], ' ': [1]}).to_excel(writer, sheet_name='2024 客户', index=False)
+    return str(path)
+
+
+class TestIngest:
+    """文件导入测试"""
+
+    def test_ingest_csv_and_aggregate(self, store, sales_csv):
+        """测试导入CSV后本地聚合"""
+        result = store.ingest_file("ds-1", sales_csv)
+
+        assert result['tables'] == {'sales': 4}
+        columns, rows, truncated = store.execute(
+            "ds-1", 'SELECT region, SUM(amount) AS total FROM sales GROUP BY region ORDER BY total DESC'
+        )
+        assert columns == ['region', 'total']
+        assert rows[0] == ['华东', 400]
+        assert truncated is False
+
+    def test_ingest_excel_all_sheets(self, store, sales_excel):
+        """测试导入Excel全部Sheet并规范化表名和列名"""
+        result = store.ingest_file("ds-1", sales_excel)
+
+        assert result['tables'] == {'订单': 2, 't_2024_客户': 1}
+        assert store.list_tables("ds-1") == ['订单', 't_2024_客户']
+        columns, _, _ = store.execute("ds-1", 'SELECT * FROM "t_2024_客户"')
+        assert columns == ['name', 'column_2']
+
+    def test_resolve_table_name(self, store, sales_excel, sales_csv):
+        """测试元数据中的原始表名映射为存储中规范化后的表名"""
+        store.ingest_file("ds-1", sales_excel)
+        store.ingest_file("ds-2", sales_csv, table_name="2024 销售")
+
+        assert store.resolve_table_name("ds-1", "2024 客户") == 't_2024_客户'
+        assert store.resolve_table_name("ds-1", "t_2024_客户") == 't_2024_客户'
+        assert store.resolve_table_name("ds-1", "订单") == '订单'
+        assert store.resolve_table_name("ds-2", "2024 销售") == 't_2024_销售'
+        assert store.resolve_table_name("ds-1", "不存在") is None
+        assert store.resolve_table_name("missing", "订单") is None
+
+    def test_reingest_replaces_table(self, store, sales_csv):
+        """测试重复导入替换已有表"""
+        store.ingest_file("ds-1", sales_csv)
+        store.ingest_file("ds-1", sales_csv)
+
+        _, rows, _ = store.execute("ds-1", "SELECT COUNT(*) FROM sales")
+        assert rows == [[4]]
+
+    def test_unsupported_file_rejected(self, store, tmp_path):
+        """测试不支持的文件格式"""
+        path = tmp_path / "data.json"
+        path.write_text("{}")
+        with pytest.raises(LocalOLAPStoreError):
+            store.ingest_file("ds-1", str(path))
+
+
+class TestQuery:
+    """查询测试"""
+
+    def test_execute_truncates_rows(self, store, sales_csv):
+        """测试按最大行数截断"""
+        store.ingest_file("ds-1", sales_csv)
+
+        _, rows, truncated = store.execute("ds-1", "SELECT * FROM sales", max_rows=3)
+        assert len(rows) == 3
+        assert truncated is True
+
+    def test_store_is_read_only(self, store, sales_csv):
+        """测试查询连接为只读"""
+        store.ingest_file("ds-1", sales_csv)
+
+        with pytest.raises(Exception):
+            store.execute("ds-1", "DELETE FROM sales")
+
+    def test_external_file_access_rejected(self, store, sales_csv, tmp_path):
+        """测试查询不能读取外部文件，也不能挂载其他数据源的存储"""
+        store.ingest_file("ds-1", sales_csv)
+        store.ingest_file("ds-2", sales_csv)
+        other_store = store.store_path("ds-2")
+
+        if store.engine == ENGINE_DUCKDB:
+            with pytest.raises(Exception, match="disabled"):
+                store.execute("ds-1", "SELECT * FROM read_csv_auto(?)", params=[sales_csv])
+            with pytest.raises(Exception):
+                store.execute("ds-1", "SET enable_external_access = true")
+        with pytest.raises(Exception):
+            store.execute("ds-1", f"ATTACH '{other_store}' AS other")
+        with pytest.raises(Exception):
+            store.execute("ds-1", "PRAGMA query_only = 0")
+
+        # 只读的表结构PRAGMA和普通查询不受影响
+        if store.engine == ENGINE_SQLITE:
+            _, rows, _ = store.execute("ds-1", "PRAGMA table_info(sales)")
+            assert [row[1] for row in rows] == ["region", "amount"]
+        _, rows, _ = store.execute("ds-1", "SELECT COUNT(*) FROM sales")
+        assert rows == [[4]]
+
+    def test_missing_store(self, store):
+        """测试未导入的数据源"""
+        with pytest.raises(LocalOLAPStoreError):
+            store.execute("missing", "SELECT 1")
+
+    def test_drop_store(self, store, sales_csv):
+        """测试删除本地存储"""
+        store.ingest_file("ds-1", sales_csv)
+
+        assert store.drop_store("ds-1") is True
+        assert store.has_store("ds-1") is False
+        assert store.drop_store("ds-1") is False
+
+
+class TestExecutorIntegration:
+    """SQL执行服务集成测试"""
+
+    def test_file_data_source_config(self):
+        """测试文件数据源映射为嵌入式存储"""
+        class FileSource:
+            id = "ds-1"
+            source_type = "FILE"
+            db_type = None
+
+        assert build_data_source_config(FileSource()) == {'type': 'embedded', 'database': 'ds-1'}
+
+    @pytest.mark.asyncio
+    async def test_execute_query_on_embedded_store(self, tmp_path, sales_csv):
+        """测试SQL执行服务在嵌入式存储上执行查询并注入行数限制"""
+        store = LocalOLAPStore(storage_dir=str(tmp_path / "olap"), engine=ENGINE_SQLITE)
+        store.ingest_file("ds-1", sales_csv)
+        executor = SQLExecutorService()
+        executor.config.max_rows = 2
+
+        with patch('src.services.sql_executor_service.get_local_olap_store', return_value=store):
+            result = await executor.execute_query(
+                "SELECT region, amount FROM sales ORDER BY amount DESC",
+                {'type': DatabaseType.EMBEDDED.value, 'database': 'ds-1'},
+                use_cache=False
+            )
+
+        assert result.rows == [['华东', 300], ['华北', 200]]
+        assert result.is_truncated is True
+        assert result.metadata['database_type'] == 'embedded'
+        assert result.metadata['row_limit']['strategy'] == 'append'
+
+    def test_query_service_aggregates_from_local_store(self, tmp_path, sales_csv):
+        """测试Excel查询优先在本地存储上聚合"""
+        from src.services.query_service import QueryService
+
+        store = LocalOLAPStore(storage_dir=str(tmp_path / "olap"), engine=ENGINE_SQLITE)
+        store.ingest_file("ds-1", sales_csv)
+        service = QueryService.__new__(QueryService)
+        service.active_data_source = {'id': 'ds-1', 'type': 'excel'}
+
+        with patch('src.services.query_service.get_local_olap_store', return_value=store):
+            result = service._aggregate_from_local_store('amount', 'region', {'start': None, 'end': None})
+            missing = service._aggregate_from_local_store('profit', 'region', {'start': None, 'end': None})
+
+        assert result['rows'] == [['华东', 400.0], ['华北', 200.0], ['华南', 50.0]]
+        assert result['maxValue'] == 400.0
+        assert missing is None
@@ -0,0 +1,133 @@
+"""
+元数据多级缓存单元测试
+
+测试版本向量校验、LRU上限、计算期间变更检测和ORM会话钩子
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import Base
+from src.models.data_preparation_model import DataTable, TableField
+from src.services.metadata_cache import (
+    MetadataCache,
+    MetadataVersionRegistry,
+    get_version_registry,
+    version_key,
+    SCOPE_TABLE,
+    SCOPE_DICTIONARY
+)
+
+
+@pytest.fixture
+def registry():
+    """创建独立的版本向量"""
+    return MetadataVersionRegistry()
+
+
+@pytest.fixture
+def cache(registry):
+    """创建元数据缓存实例"""
+    return MetadataCache(max_entries=2, registry=registry)
+
+
+class TestVersionedCache:
+    """版本校验测试"""
+
+    def test_dependency_bump_invalidates(self, cache, registry):
+        """测试只有依赖的版本变化才使条目失效"""
+        assert cache.set("q1", "orders", [version_key(SCOPE_TABLE, "t1")], cache.begin())
+
+        registry.bump(SCOPE_TABLE, ["t2"])
+        assert cache.get("q1") == "orders"
+
+        registry.bump(SCOPE_TABLE, ["t1"])
+        assert cache.get("q1") is None
+        assert "q1" not in cache
+        stats = cache.get_statistics()
+        assert stats["l1_hits"] == 1
+        assert stats["stale"] == 1
+
+    def test_scope_dependency(self, cache, registry):
+        """测试依赖整个维度的条目在维度内任意对象变化时失效"""
+        cache.set("q1", "context", [version_key(SCOPE_DICTIONARY)], cache.begin())
+
+        registry.bump(SCOPE_DICTIONARY, ["d9"])
+        assert cache.get("q1") is None
+
+    def test_bulk_change_invalidates_specific_dependencies(self, cache, registry):
+        """测试无法确定对象的批量变更使该维度的所有条目失效"""
+        cache.set("q1", "orders", [version_key(SCOPE_TABLE, "t1")], cache.begin())
+
+        registry.bump(SCOPE_TABLE, bulk=True)
+        assert cache.get("q1") is None
+
+    def test_change_during_compute_skips_write(self, cache, registry):
+        """测试计算期间发生元数据变更时不写入缓存"""
+        token = cache.begin()
+        registry.bump(SCOPE_TABLE, ["t1"])
+
+        assert not cache.set("q1", "orders", [version_key(SCOPE_TABLE, "t1")], token)
+        assert cache.get("q1") is None
+        assert cache.get_statistics()["skipped_writes"] == 1
+
+    def test_lru_bounded(self, cache):
+        """测试条目数不超过上限，淘汰最久未使用的条目"""
+        for key in ("q1", "q2"):
+            cache.set(key, key, [], cache.begin())
+        cache.get("q1")
+        cache.set("q3", "q3", [], cache.begin())
+
+        assert cache.keys() == ["q1", "q3"]
+        assert cache.get_statistics()["evictions"] == 1
+
+    def test_ttl_expiry(self, registry):
+        """测试超过TTL的条目失效"""
+        cache = MetadataCache(ttl_seconds=60, registry=registry)
+        cache.set("q1", "orders", [], cache.begin())
+        cache._entries["q1"].created_at -= 61
+
+        assert cache.get("q1") is None
+
+
+class TestSessionHooks:
+    """ORM会话钩子测试"""
+
+    @pytest.fixture
+    def db(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+
+    def test_commit_bumps_versions(self, db):
+        """测试提交后递增表版本，回滚不递增"""
+        registry = get_version_registry()
+        table_key = version_key(SCOPE_TABLE, "hook_t1")
+        before = registry.current([table_key])[table_key]
+
+        db.add(DataTable(id="hook_t1", data_source_id="ds1", table_name="orders",
+                         data_mode="IMPORT", created_by="test"))
+        db.flush()
+        assert registry.current([table_key])[table_key] == before
+
+        db.commit()
+        assert registry.current([table_key])[table_key] == before + 1
+
+        db.add(TableField(id="hook_f1", table_id="hook_t1", field_name="amount", data_type="DECIMAL"))
+        db.flush()
+        db.rollback()
+        assert registry.current([table_key])[table_key] == before + 1
+
+    def test_bulk_delete_bumps_scope(self, db):
+        """测试批量删除递增维度的批量版本"""
+        registry = get_version_registry()
+        cache = MetadataCache(registry=registry)
+        cache.set("q1", "orders", [version_key(SCOPE_TABLE, "hook_t2")], cache.begin())
+
+        db.query(TableField).filter(TableField.table_id == "hook_t2").delete()
+        db.commit()
+
+        assert cache.get("q1") is None
@@ -18,6 +18,7 @@ from src.services.multi_source_data_integration import (
     MetadataQuery,
     IntegratedMetadata
 )
+from src.services.metadata_cache import MetadataCache, MetadataVersionRegistry
 
 
 class TestMultiSourceDataIntegrationEngine:
@@ -30,8 +31,9 @@ class TestMultiSourceDataIntegrationEngine:
     
     @pytest.fixture
     def integration_engine(self, mock_db_session):
-        """创建整合引擎实例"""
-        return MultiSourceDataIntegrationEngine(mock_db_session)
+        """创建整合引擎实例（使用独立的元数据缓存）"""
+        cache = MetadataCache(registry=MetadataVersionRegistry())
+        return MultiSourceDataIntegrationEngine(mock_db_session, metadata_cache=cache)
     
     @pytest.fixture
     def sample_metadata_query(self):
@@ -236,7 +238,7 @@ class TestMultiSourceDataIntegrationEngine:
         )
         
         with patch.object(integration_engine.semantic_aggregator, 'aggregate_semantic_context'):
-            with patch.object(integration_engine, '_fetch_detailed_metadata', return_value=mock_result):
+            with patch.object(integration_engine, '_fetch_detailed_metadata', return_value=mock_result) as mock_fetch:
                 
                 # 第一次查询
                 result1 = await integration_engine.query_integrated_metadata(sample_metadata_query)
@@ -247,6 +249,12 @@ class TestMultiSourceDataIntegrationEngine:
                 # 验证缓存工作
                 assert result1.enhanced_context == result2.enhanced_context
                 assert len(integration_engine.metadata_cache) > 0
+                assert mock_fetch.call_count == 1
+                
+                # 字典变更后不再返回旧结果
+                integration_engine.metadata_cache.registry.bump("dictionary", ["dict_1"])
+                await integration_engine.query_integrated_metadata(sample_metadata_query)
+                assert mock_fetch.call_count == 2
     
     @pytest.mark.asyncio
     async def test_incremental_cache_update(self, integration_engine):
@@ -264,36 +272,36 @@ class TestMultiSourceDataIntegrationEngine:
             total_tokens_used=0
         )
         
-        integration_engine.metadata_cache[cache_key] = mock_cached_data
-        integration_engine.last_update_time[cache_key] = datetime.now()
+        cache = integration_engine.metadata_cache
+        cache.set(cache_key, mock_cached_data, ["table:users"], cache.begin())
+        cache.set("other_key", mock_cached_data, ["table:orders"], cache.begin())
         
         # 执行增量更新
         await integration_engine.update_metadata_cache(["users"])
         
-        # 验证受影响的缓存项被清除
-        assert cache_key not in integration_engine.metadata_cache
-        assert cache_key not in integration_engine.last_update_time
+        # 验证受影响的缓存项被清除，其他缓存项保留
+        assert cache_key not in cache
+        assert cache.get(cache_key) is None
+        assert "other_key" in cache
     
     def test_clear_cache(self, integration_engine):
         """测试缓存清空"""
         # 添加缓存数据
-        integration_engine.metadata_cache["test"] = Mock()
-        integration_engine.last_update_time["test"] = datetime.now()
+        cache = integration_engine.metadata_cache
+        cache.set("test", Mock(), ["table:users"], cache.begin())
         
         # 清空缓存
         integration_engine.clear_cache()
         
         # 验证缓存已清空
         assert len(integration_engine.metadata_cache) == 0
-        assert len(integration_engine.last_update_time) == 0
     
     def test_get_cache_statistics(self, integration_engine):
         """测试缓存统计信息"""
         # 添加一些缓存数据
-        integration_engine.metadata_cache["test1"] = Mock()
-        integration_engine.metadata_cache["test2"] = Mock()
-        integration_engine.last_update_time["test1"] = datetime.now()
-        integration_engine.last_update_time["test2"] = datetime.now()
+        cache = integration_engine.metadata_cache
+        cache.set("test1", Mock(), ["table:users"], cache.begin())
+        cache.set("test2", Mock(), ["table:orders"], cache.begin())
         
         stats = integration_engine.get_cache_statistics()
         
@@ -302,6 +310,7 @@ class TestMultiSourceDataIntegrationEngine:
         assert stats["total_cached_items"] == 2
         assert len(stats["cache_keys"]) == 2
         assert len(stats["last_update_times"]) == 2
+        assert stats["metadata_cache"]["max_entries"] == cache.max_entries
         assert "semantic_aggregator_cache_size" in stats
     
     def test_extract_keywords(self, integration_engine):
@@ -0,0 +1,131 @@
+"""
+Prompt 预编译模板与片段缓存测试
+"""
+
+import pytest
+
+from src.services import prompt_fragments
+from src.services.prompt_fragments import (
+    PromptFragmentCache,
+    assemble_prompt,
+    compile_template,
+    format_complex_variable,
+    format_prompt_value
+)
+from src.services.prompt_manager import PromptRenderer, PromptTemplate, PromptType
+from src.services.sql_generator_service import SQLDialect, SQLGenerationRequest, SQLGeneratorService
+
+
+def legacy_render(content, variables):
+    """逐个变量替换的原始渲染方式"""
+    rendered = content
+    for name, value in variables.items():
+        text = format_complex_variable(value) if isinstance(value, (list, dict)) else str(value)
+        rendered = rendered.replace(f"{{{{{name}}}}}", text)
+    return rendered
+
+
+SCHEMA = {
+    "orders": {"columns": ["id", "amount", {"name": "created_at", "type": "datetime"}], "rows": 1200},
+    "customers": {"columns": ["id", "name"]}
+}
+
+
+def test_compiled_template_matches_legacy_rendering():
+    """测试预编译模板与逐个替换的渲染结果一致，未提供的变量原样保留"""
+    content = "问题：{{question}}\n表结构：\n{{schema}}\n样本：\n{{samples}}\n{{question}}\n{{missing}}"
+    variables = {"question": "上月销售额", "schema": SCHEMA, "samples": ["a", "b"]}
+
+    compiled = compile_template(content)
+    rendered, unresolved = compiled.render(variables)
+
+    assert rendered == legacy_render(content, variables)
+    assert unresolved == ["missing"]
+    assert compiled.variables == ("question", "schema", "samples", "missing")
+    assert compile_template(content) is compiled
+
+
+def test_variable_values_are_not_substituted_again():
+    """测试变量值中的占位符不会被再次替换"""
+    compiled = compile_template("{{a}}-{{b}}")
+    assert compiled.render({"a": "{{b}}", "b": "x"})[0] == "{{b}}-x"
+
+
+def test_complex_values_are_formatted_once_per_key():
+    """测试复杂变量按调用方提供的键缓存格式化结果，未提供键时不经过缓存"""
+    before = prompt_fragments._formatted_values.get_stats()
+    first = format_prompt_value({"schema": dict(SCHEMA)}, key=("schema", "ds-1", 1))
+    second = format_prompt_value({"schema": dict(SCHEMA)}, key=("schema", "ds-1", 1))
+    after = prompt_fragments._formatted_values.get_stats()
+
+    assert first == second == format_complex_variable({"schema": SCHEMA})
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    # 版本变化后重新格式化；不提供键时直接格式化
+    assert format_prompt_value({"x": 1}, key=("schema", "ds-1", 2)) == "x: 1"
+    format_prompt_value({"schema": dict(SCHEMA)})
+    assert prompt_fragments._formatted_values.get_stats()["hits"] == after["hits"]
+    assert format_prompt_value({"k": (1, 2)}) == "k: (1, 2)"
+    assert format_prompt_value({"k": [1, 2]}) == "k:\n  - 1\n  - 2"
+    assert format_prompt_value([]) == "无"
+    assert format_prompt_value(3) == "3"
+
+
+def test_fragment_cache_keyed_by_version():
+    """测试片段按类型、键和内容版本缓存，内容版本变化或失效后重新构建"""
+    cache = PromptFragmentCache(max_size=2)
+    builds = []
+
+    def builder(text):
+        def build():
+            builds.append(text)
+            return text
+        return build
+
+    assert cache.get_or_build("schema", "ds-1", builder("v1"), version=1) == "v1"
+    assert cache.get_or_build("schema", "ds-1", builder("v1"), version=1) == "v1"
+    assert builds == ["v1"]
+
+    assert cache.get_or_build("schema", "ds-1", builder("v2"), version=2) == "v2"
+    assert cache.get_or_build("rules", "mysql", builder("r"), version=None) == "r"
+    assert cache.get_stats()["fragments"]["evictions"] == 1
+
+    assert cache.invalidate("rules") == 1
+    cache.get_or_build("rules", "mysql", builder("r"))
+    assert builds == ["v1", "v2", "r", "r"]
+    assert assemble_prompt("a", "", None, "b") == "a\n\nb"
+
+
+def test_prompt_manager_renderer_uses_compiled_template():
+    """测试基础渲染器的输出与原有渲染方式一致"""
+    template = PromptTemplate(
+        name="t", type=PromptType.TABLE_SELECTION, version="1.0", description="",
+        content="问题：{{user_question}}\n上下文：\n{{semantic_context}}", variables=["user_question"]
+    )
+    variables = {"user_question": "Q", "semantic_context": SCHEMA}
+    assert PromptRenderer().render(template, variables) == legacy_render(template.content, variables)
+
+    keyed = PromptRenderer().render(template, variables, value_keys={"semantic_context": ("ctx", "ds-1", 1)})
+    assert keyed == legacy_render(template.content, variables)
+
+    with pytest.raises(ValueError):
+        PromptRenderer().render(template, {})
+
+
+@pytest.mark.asyncio
+async def test_sql_prompt_prefix_is_stable_across_questions():
+    """测试同一数据源不同问题的SQL生成Prompt前缀逐字节一致，用户问题位于末尾"""
+    service = SQLGeneratorService()
+    context = {"enhanced_context": "表 orders(id, amount)"}
+
+    prompts = []
+    for question in ("上月销售额", "每个客户的订单数"):
+        request = SQLGenerationRequest(user_question=question, sql_dialect=SQLDialect.POSTGRESQL, max_rows=50)
+        prompts.append(await service._build_sql_generation_prompt(request, context))
+
+    prefix = prompts[0][:prompts[0].index("用户问题：")]
+    assert prompts[1].startswith(prefix)
+    assert prefix.rstrip().endswith("表 orders(id, amount)")
+    assert "LIMIT 50" in prefix and "postgresql" in prefix
+    assert prompts[0].rstrip().endswith("上月销售额")
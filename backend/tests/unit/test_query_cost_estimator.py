@@ -0,0 +1,197 @@
+"""
+查询成本预估服务单元测试
+
+测试各数据库方言执行计划解析、执行建议和执行计划缓存
+"""
+
+import pytest
+from unittest.mock import patch
+
+from src.services.query_cost_estimator import (
+    QueryCostEstimator,
+    CostEstimatorConfig,
+    CostEstimate,
+    CostAction,
+    ExplainStatementError,
+    PlanScan
+)
+
+
+@pytest.fixture
+def estimator():
+    """创建成本预估器实例"""
+    return QueryCostEstimator(CostEstimatorConfig(
+        max_scan_rows=1000000,
+        max_result_rows=10000,
+        auto_limit_rows=500
+    ))
+
+
+@pytest.fixture
+def mysql_config():
+    """MySQL数据源配置"""
+    return {
+        'type': 'mysql',
+        'host': 'localhost',
+        'port': 3306,
+        'username': 'root',
+        'password': 'password',
+        'database': 'test_db'
+    }
+
+
+class TestPlanAnalysis:
+    """执行计划解析测试"""
+
+    def test_analyze_mysql_full_scan(self):
+        """测试MySQL全表扫描识别"""
+        plan = [
+            {'id': 1, 'table': 'orders', 'type': 'ALL', 'key': None, 'rows': 2000000, 'filtered': 10.0, 'Extra': 'Using where'},
+            {'id': 1, 'table': 'users', 'type': 'eq_ref', 'key': 'PRIMARY', 'rows': 1, 'filtered': 100.0, 'Extra': None},
+        ]
+
+        estimate = QueryCostEstimator.analyze_mysql_plan(plan)
+
+        assert estimate.available is True
+        assert estimate.estimated_rows == 200000
+        assert estimate.scans[0].is_full_scan is True
+        assert estimate.scans[1].is_full_scan is False
+        assert estimate.has_cartesian_join is False
+
+    def test_analyze_mysql_cartesian_join(self):
+        """测试MySQL笛卡尔积识别"""
+        plan = [
+            {'id': 1, 'table': 'a', 'type': 'ALL', 'key': None, 'rows': 1000, 'filtered': 100.0, 'Extra': None},
+            {'id': 1, 'table': 'b', 'type': 'ALL', 'key': None, 'rows': 1000, 'filtered': 100.0,
+             'Extra': 'Using join buffer (Block Nested Loop)'},
+        ]
+
+        estimate = QueryCostEstimator.analyze_mysql_plan(plan)
+
+        assert estimate.has_cartesian_join is True
+        assert estimate.estimated_rows == 1000000
+
+    def test_analyze_postgresql_plan(self):
+        """测试PostgreSQL JSON执行计划解析"""
+        plan = {
+            'Plan': {
+                'Node Type': 'Nested Loop',
+                'Plan Rows': 500000,
+                'Total Cost': 12345.6,
+                'Plans': [
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'orders', 'Plan Rows': 5000},
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'products', 'Plan Rows': 100},
+                ]
+            }
+        }
+
+        estimate = QueryCostEstimator.analyze_postgresql_plan(plan)
+
+        assert estimate.estimated_rows == 500000
+        assert estimate.estimated_cost == 12345.6
+        assert {s.table_name for s in estimate.scans} == {'orders', 'products'}
+        assert all(s.is_full_scan for s in estimate.scans)
+        assert estimate.has_cartesian_join is True
+
+    def test_analyze_sqlserver_plan(self):
+        """测试SQL Server SHOWPLAN_XML解析"""
+        plan_xml = """<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan">
+          <BatchSequence><Batch><Statements>
+            <StmtSimple StatementEstRows="150" StatementSubTreeCost="3.5">
+              <QueryPlan>
+                <RelOp PhysicalOp="Clustered Index Scan" EstimateRows="150" EstimatedRowsRead="3000000">
+                  <IndexScan><Object Table="[orders]" /></IndexScan>
+                </RelOp>
+              </QueryPlan>
+            </StmtSimple>
+          </Statements></Batch></BatchSequence>
+        </ShowPlanXML>"""
+
+        estimate = QueryCostEstimator.analyze_sqlserver_plan(plan_xml)
+
+        assert estimate.estimated_rows == 150
+        assert estimate.estimated_cost == 3.5
+        assert estimate.scans[0].table_name == 'orders'
+        assert estimate.scans[0].estimated_rows == 3000000
+        assert estimate.scans[0].is_full_scan is True
+        assert estimate.has_cartesian_join is False
+
+
+class TestCostEvaluation:
+    """执行建议测试"""
+
+    def test_small_query_executes(self, estimator):
+        """测试小查询直接执行"""
+        estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=100,
+                                scans=[PlanScan('users', 'ALL', 100, True)])
+        estimator._evaluate(estimate)
+        assert estimate.action == CostAction.EXECUTE
+        assert estimate.warnings == []
+
+    def test_large_result_adds_limit(self, estimator):
+        """测试大结果集自动加限制"""
+        estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=50000)
+        estimator._evaluate(estimate)
+        assert estimate.action == CostAction.ADD_LIMIT
+        assert estimate.suggested_limit == 500
+
+    def test_large_scan_with_small_result_clarifies(self, estimator):
+        """测试大表全扫描但结果很小（聚合）时请求澄清"""
+        estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=10,
+                                scans=[PlanScan('orders', 'ALL', 5000000, True)])
+        estimator._evaluate(estimate)
+        assert estimate.action == CostAction.CLARIFY
+        assert any('orders' in w for w in estimate.warnings)
+        assert '缩小查询范围' in estimator.build_clarification_question(estimate)
+
+    def test_cartesian_join_clarifies(self, estimator):
+        """测试笛卡尔积请求澄清"""
+        estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=10,
+                                has_cartesian_join=True)
+        estimator._evaluate(estimate)
+        assert estimate.action == CostAction.CLARIFY
+
+
+class TestPlanCache:
+    """执行计划缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_plan_cached_by_normalized_sql(self, estimator, mysql_config):
+        """测试按规范化SQL缓存执行计划"""
+        plan_estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=10)
+
+        with patch.object(estimator, '_explain_sync', return_value=plan_estimate) as mock_explain:
+            first = await estimator.estimate("SELECT * FROM users", mysql_config)
+            second = await estimator.estimate("SELECT *   FROM users;", mysql_config)
+
+            assert mock_explain.call_count == 1
+            assert first.from_cache is False
+            assert second.from_cache is True
+            assert second.estimated_rows == 10
+
+        stats = estimator.get_statistics()
+        assert stats['plan_cache_hits'] == 1
+        assert stats['plan_cache_misses'] == 1
+
+    @pytest.mark.asyncio
+    async def test_explain_failure_fails_open(self, estimator, mysql_config):
+        """测试EXPLAIN失败时不阻塞执行且不缓存"""
+        with patch.object(estimator, '_explain_sync', side_effect=RuntimeError("connection refused")):
+            estimate = await estimator.estimate("SELECT * FROM users", mysql_config)
+
+        assert estimate.available is False
+        assert estimate.action == CostAction.EXECUTE
+        assert estimator.get_statistics()['plan_cache_size'] == 0
+        assert estimate.statement_error is None
+
+    @pytest.mark.asyncio
+    async def test_rejected_statement_reported(self, estimator, mysql_config):
+        """测试数据库拒绝语句时记录错误，与连接失败区分开"""
+        error = ExplainStatementError("Unknown column 'amount' in 'field list'")
+        with patch.object(estimator, '_explain_sync', side_effect=error):
+            estimate = await estimator.estimate("SELECT amount FROM users", mysql_config)
+
+        assert estimate.available is False
+        assert estimate.statement_error == "Unknown column 'amount' in 'field list'"
+        assert estimate.to_dict()['statement_error'] == estimate.statement_error
+        assert estimator.get_statistics()['plan_cache_size'] == 0
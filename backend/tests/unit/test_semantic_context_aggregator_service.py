@@ -33,6 +33,11 @@ class TestSemanticContextAggregator:
         """创建聚合引擎实例"""
         return SemanticContextAggregator(mock_db_session)
     
+    @pytest.fixture
+    def estimate_aggregator(self, mock_db_session):
+        """创建按估算Token整块选择模块的聚合引擎实例"""
+        return SemanticContextAggregator(mock_db_session, enable_item_packing=False)
+    
     @pytest.fixture
     def sample_token_budget(self):
         """示例Token预算"""
@@ -160,7 +165,7 @@ class TestSemanticContextAggregator:
         assert table_structure_module.relevance_score > 0.5
     
     @pytest.mark.asyncio
-    async def test_optimize_context_selection(self, aggregator):
+    async def test_optimize_context_selection(self, estimate_aggregator):
         """测试动态上下文裁剪和优化"""
         context = AggregationContext(
             user_question="测试问题",
@@ -168,11 +173,11 @@ class TestSemanticContextAggregator:
         )
         
         # 初始化和计算相关性
-        await aggregator._initialize_semantic_modules(context)
-        await aggregator._calculate_module_relevance(context)
+        await estimate_aggregator._initialize_semantic_modules(context)
+        await estimate_aggregator._calculate_module_relevance(context)
         
         # 执行优化
-        await aggregator._optimize_context_selection(context)
+        await estimate_aggregator._optimize_context_selection(context)
         
         # 验证优化结果
         selected_modules = [m for m in context.modules if m.is_loaded]
@@ -368,20 +373,27 @@ class TestSemanticContextAggregator:
             table_ids=["test_table"]
         )
         
+        knowledge_result = Mock(enhanced_context="知识", knowledge_info=Mock(
+            terms=[], logics=[], events=[], total_relevance_score=0.0
+        ))
+        
         # 测试每种模块类型的加载
-        for module_type in ModuleType:
-            module = SemanticModule(
-                module_type=module_type,
-                service=Mock(),
-                priority=ContextPriority.MEDIUM
-            )
-            module.is_loaded = True
-            context.modules = [module]
-            
-            await aggregator._load_selected_modules(context)
-            
-            assert module.content is not None
-            assert isinstance(module.content, dict)
+        with patch.object(aggregator, '_load_dictionary_mappings', return_value=([], {})), \
+             patch.object(aggregator, '_inject_knowledge_in_session', return_value=knowledge_result):
+            for module_type in ModuleType:
+                module = SemanticModule(
+                    module_type=module_type,
+                    service=Mock(),
+                    priority=ContextPriority.MEDIUM
+                )
+                module.is_loaded = True
+                context.modules = [module]
+                
+                await aggregator._load_selected_modules(context)
+                
+                assert module.content is not None
+                assert isinstance(module.content, dict)
+                assert context.module_status[module_type.value] == "loaded"
     
     @pytest.mark.asyncio
     async def test_relevance_calculation_with_keywords(self, aggregator):
@@ -408,7 +420,7 @@ class TestSemanticContextAggregator:
         assert table_structure_module.relevance_score >= dictionary_module.relevance_score
     
     @pytest.mark.asyncio
-    async def test_token_budget_constraints(self, aggregator):
+    async def test_token_budget_constraints(self, estimate_aggregator):
         """测试Token预算约束"""
         # 设置很小的Token预算
         small_budget = TokenBudget(total_budget=500, reserved_for_response=200)
@@ -419,9 +431,9 @@ class TestSemanticContextAggregator:
             token_budget=small_budget
         )
         
-        await aggregator._initialize_semantic_modules(context)
-        await aggregator._calculate_module_relevance(context)
-        await aggregator._optimize_context_selection(context)
+        await estimate_aggregator._initialize_semantic_modules(context)
+        await estimate_aggregator._calculate_module_relevance(context)
+        await estimate_aggregator._optimize_context_selection(context)
         
         # 验证选中的模块不会超出预算
         selected_modules = [m for m in context.modules if m.is_loaded]
@@ -433,9 +445,199 @@ class TestSemanticContextAggregator:
         # 但如果有模块被选中，应该优先选择高优先级的模块
         if selected_modules:
             # 验证选中的模块按优先级排序
-            priorities = [aggregator._get_priority_weight(m.priority) for m in selected_modules]
+            priorities = [estimate_aggregator._get_priority_weight(m.priority) for m in selected_modules]
             assert priorities == sorted(priorities, reverse=True)
         
         # 验证系统能够处理极端预算约束而不崩溃
         assert isinstance(selected_modules, list)
-        assert total_estimated_tokens >= 0
\ No newline at end of file
+        assert total_estimated_tokens >= 0    
+    @pytest.mark.asyncio
+    async def test_modules_load_concurrently_off_event_loop(self, aggregator):
+        """测试模块并发加载，同步数据库调用不阻塞事件循环"""
+        import threading
+        import time
+        
+        loop_thread = threading.get_ident()
+        call_threads = []
+        
+        def slow_inject(db, table_ids):
+            call_threads.append(threading.get_ident())
+            time.sleep(0.2)
+            return [], {}
+        
+        async def slow_table_structure(context):
+            await asyncio.sleep(0.2)
+            return {"content": "表结构"}
+        
+        context = AggregationContext(user_question="测试问题", table_ids=["t1"])
+        await aggregator._initialize_semantic_modules(context)
+        for module in context.modules:
+            module.is_loaded = module.module_type in (ModuleType.DICTIONARY, ModuleType.TABLE_STRUCTURE)
+        
+        with patch.object(aggregator, '_load_dictionary_mappings', side_effect=slow_inject), \
+             patch.object(aggregator, '_load_table_structure_content', side_effect=slow_table_structure):
+            await aggregator._load_selected_modules(context)
+        
+        assert call_threads and call_threads[0] != loop_thread
+        assert context.load_wall_time_ms < 350
+        assert context.module_status == {"table_structure": "loaded", "dictionary": "loaded"}
+        assert context.module_timings["dictionary"] >= 150
+    
+    @pytest.mark.asyncio
+    async def test_db_loaders_use_own_sessions_in_parallel(self, aggregator, mock_db_session):
+        """测试数据库加载器在注入会话的数据库上各自新建会话并行执行，不共用请求的会话"""
+        import time
+        
+        sessions = []
+        used = {}
+        
+        def new_session(bind=None):
+            session = Mock()
+            session.bind = bind
+            sessions.append(session)
+            return session
+        
+        def slow_dictionary(db, table_ids):
+            used["dictionary"] = db
+            time.sleep(0.2)
+            return [], {}
+        
+        def slow_knowledge(**kwargs):
+            time.sleep(0.2)
+            return Mock(enhanced_context="知识", knowledge_info=Mock(
+                terms=[], logics=[], events=[], total_relevance_score=0.0
+            ))
+        
+        original_inject = aggregator._inject_knowledge_in_session
+        
+        def knowledge_in_session(db, **kwargs):
+            used["knowledge"] = db
+            return original_inject(db, **kwargs)
+        
+        context = AggregationContext(user_question="测试问题", table_ids=["t1"])
+        await aggregator._initialize_semantic_modules(context)
+        for module in context.modules:
+            module.is_loaded = module.module_type in (ModuleType.DICTIONARY, ModuleType.KNOWLEDGE)
+        
+        with patch('src.services.semantic_context_aggregator.Session', side_effect=new_session), \
+             patch.object(aggregator, '_load_dictionary_mappings', side_effect=slow_dictionary), \
+             patch.object(aggregator.knowledge_service, 'inject_knowledge_semantics', side_effect=slow_knowledge), \
+             patch.object(aggregator, '_inject_knowledge_in_session', side_effect=knowledge_in_session):
+            await aggregator._load_selected_modules(context)
+        
+        assert context.module_status == {"dictionary": "loaded", "knowledge": "loaded"}
+        assert context.load_wall_time_ms < 350
+        assert len(sessions) == 2
+        assert used["dictionary"] is not used["knowledge"]
+        assert mock_db_session not in used.values()
+        assert all(session.bind is mock_db_session.get_bind.return_value for session in sessions)
+        assert all(session.close.called for session in sessions)
+        # 请求级服务实例仍绑定原会话
+        assert aggregator.knowledge_service.db is mock_db_session
+    
+    @pytest.mark.asyncio
+    async def test_dictionary_content_loaded_from_field_mappings(self, tmp_path):
+        """测试数据字典模块按表加载字段的字典映射"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from src.database import Base
+        from src.models.data_preparation_model import (
+            DataTable, TableField, Dictionary, DictionaryItem, FieldMapping
+        )
+        
+        engine = create_engine(f"sqlite:///{tmp_path / 'dictionary.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(DataTable(id="t1", data_source_id="ds1", table_name="orders", data_mode="IMPORT", created_by="test"))
+        db.add(TableField(id="f1", table_id="t1", field_name="status", data_type="VARCHAR"))
+        db.add(Dictionary(id="d1", code="ORDER_STATUS", name="订单状态", created_by="test"))
+        db.add(DictionaryItem(id="di1", dictionary_id="d1", item_key="1", item_value="已支付", created_by="test"))
+        db.add(FieldMapping(id="m1", table_id="t1", field_id="f1", dictionary_id="d1", business_name="订单状态"))
+        db.commit()
+        
+        try:
+            aggregator = SemanticContextAggregator(db)
+            content = await aggregator._load_dictionary_content(
+                AggregationContext(user_question="已支付订单数", table_ids=["t1"])
+            )
+        finally:
+            db.close()
+        
+        assert content["field_mappings"] == [{
+            "table_name": "orders", "field_name": "status",
+            "dictionary_name": "订单状态", "dictionary_code": "ORDER_STATUS"
+        }]
+        assert content["semantic_values"] == {"orders.status": "订单状态: 1=已支付"}
+    
+    @pytest.mark.asyncio
+    async def test_loader_errors_reported_as_failed(self, aggregator):
+        """测试数据库加载器出错时模块状态为failed，不当作已加载的空内容"""
+        context = AggregationContext(user_question="测试问题", table_ids=["t1"])
+        await aggregator._initialize_semantic_modules(context)
+        for module in context.modules:
+            module.is_loaded = module.module_type in (ModuleType.DICTIONARY, ModuleType.KNOWLEDGE)
+        
+        with patch.object(aggregator, '_load_dictionary_mappings', side_effect=RuntimeError("db down")), \
+             patch.object(aggregator, '_inject_knowledge_in_session', side_effect=RuntimeError("db down")):
+            await aggregator._load_selected_modules(context)
+        
+        assert context.module_status == {"dictionary": "failed", "knowledge": "failed"}
+        assert not any(module.is_loaded for module in context.modules)
+    
+    @pytest.mark.asyncio
+    async def test_module_timeout_degrades_gracefully(self, mock_db_session):
+        """测试单个模块超时被跳过，其他模块正常加载"""
+        aggregator = SemanticContextAggregator(mock_db_session, module_timeout_seconds=0.05)
+        
+        async def hanging_loader(context):
+            await asyncio.sleep(1)
+            return {"content": "不会返回"}
+        
+        context = AggregationContext(user_question="测试问题", table_ids=["t1"])
+        await aggregator._initialize_semantic_modules(context)
+        for module in context.modules:
+            module.is_loaded = module.module_type in (ModuleType.DATA_SOURCE, ModuleType.KNOWLEDGE)
+        
+        with patch.object(aggregator, '_load_knowledge_content', side_effect=hanging_loader):
+            await aggregator._load_selected_modules(context)
+        
+        loaded = [m.module_type for m in context.modules if m.is_loaded]
+        assert loaded == [ModuleType.DATA_SOURCE]
+        assert context.module_status["knowledge"] == "timeout"
+        
+        summary = aggregator._generate_optimization_summary(context)
+        assert summary["module_load_status"]["knowledge"] == "timeout"
+        assert set(summary["module_load_timings_ms"]) == {"data_source", "knowledge"}
+        assert "module_load_wall_time_ms" in summary
+    
+    @pytest.mark.asyncio
+    async def test_item_packing_keeps_relevant_items_within_budget(self, aggregator):
+        """测试条目级打包按相关性在预算内保留表和字典项"""
+        aggregator.context_packer._encoder_loaded = True
+        
+        context = AggregationContext(
+            user_question="统计订单金额",
+            table_ids=["orders"],
+            token_budget=TokenBudget(total_budget=1020, reserved_for_response=1000)
+        )
+        await aggregator._initialize_semantic_modules(context)
+        for module in context.modules:
+            module.relevance_score = 0.8
+            module.is_loaded = module.module_type in (ModuleType.TABLE_STRUCTURE, ModuleType.DICTIONARY)
+        context.modules[1].content = {"content": "表结构信息", "tables": ["orders 订单表", "audit_logs 审计日志"]}
+        context.modules[3].content = {
+            "content": "数据字典语义信息",
+            "semantic_values": {"amount": "订单金额（元）", "remark": "备注说明文字" * 10}
+        }
+        
+        await aggregator._pack_context_items(context)
+        
+        table_module, dictionary_module = context.modules[1], context.modules[3]
+        assert table_module.content["tables"] == ["orders 订单表"]
+        assert dictionary_module.content["semantic_values"] == {"amount": "订单金额（元）"}
+        assert "content" not in dictionary_module.content
+        assert context.total_tokens_used <= 20
+        
+        summary = aggregator._generate_optimization_summary(context)
+        assert summary["context_packing"]["items_dropped"] == 3
+        assert summary["context_packing"]["modules"]["table_structure"]["items_selected"] == 2
@@ -1,9 +1,11 @@
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.services.semantic_injection_service import SemanticInjectionService
+from src.database import Base
 from src.models.data_preparation_model import Dictionary, DictionaryItem, FieldMapping, DataTable, TableField
 
 class TestSemanticInjectionService:
@@ -18,7 +20,7 @@ class TestSemanticInjectionService:
         """测试服务初始化"""
         service = SemanticInjectionService()
         assert service._cache == {}
-        assert isinstance(service._cache_ttl, timedelta)
+        assert len(service._dictionary_maps) == 0
         assert isinstance(service._last_cache_clear, datetime)
     
     def test_get_cache_key(self):
@@ -26,125 +28,6 @@ class TestSemanticInjectionService:
         key = self.service._get_cache_key("users", "status")
         assert key == "users.status"
     
-    def test_clear_expired_cache(self):
-        """测试清理过期缓存"""
-        # 设置缓存
-        self.service._cache["test"] = "value"
-        
-        # 模拟过期时间
-        self.service._last_cache_clear = datetime.now() - timedelta(hours=1)
-        
-        self.service._clear_expired_cache()
-        
-        assert self.service._cache == {}
-    
-    def test_get_field_semantic_mapping_not_found(self):
-        """测试获取不存在的字段语义映射"""
-        # Mock查询返回None
-        self.mock_db.query.return_value.filter.return_value.first.return_value = None
-        
-        result = self.service.get_field_semantic_mapping(
-            self.mock_db, "users", "status"
-        )
-        
-        assert result is None
-    
-    def test_get_field_semantic_mapping_success(self):
-        """测试成功获取字段语义映射"""
-        # Mock数据
-        mock_table = Mock(spec=DataTable)
-        mock_table.table_name = "users"
-        
-        mock_field = Mock(spec=TableField)
-        mock_field.field_name = "status"
-        
-        mock_field_mapping = Mock(spec=FieldMapping)
-        mock_field_mapping.id = "mapping_1"
-        mock_field_mapping.dictionary_id = "dict_1"
-        mock_field_mapping.table = mock_table
-        mock_field_mapping.field = mock_field
-        
-        mock_dictionary = Mock(spec=Dictionary)
-        mock_dictionary.id = "dict_1"
-        mock_dictionary.name = "用户状态字典"
-        mock_dictionary.code = "USER_STATUS"
-        mock_dictionary.description = "用户状态枚举"
-        mock_dictionary.created_at = datetime.now()
-        mock_dictionary.updated_at = datetime.now()
-        
-        mock_dict_item1 = Mock(spec=DictionaryItem)
-        mock_dict_item1.code = "1"
-        mock_dict_item1.name = "激活"
-        mock_dict_item1.description = "用户已激活"
-        mock_dict_item1.sort_order = 1
-        mock_dict_item1.is_active = True
-        
-        mock_dict_item2 = Mock(spec=DictionaryItem)
-        mock_dict_item2.code = "0"
-        mock_dict_item2.name = "禁用"
-        mock_dict_item2.description = "用户已禁用"
-        mock_dict_item2.sort_order = 2
-        mock_dict_item2.is_active = True
-        
-        # Mock查询链 - 模拟复杂的join查询
-        query_mock = Mock()
-        join_mock1 = Mock()
-        join_mock2 = Mock()
-        filter_mock = Mock()
-        
-        # 第一次查询：字段映射（带join）
-        query_mock.join.return_value = join_mock1
-        join_mock1.join.return_value = join_mock2
-        join_mock2.filter.return_value = filter_mock
-        filter_mock.first.return_value = mock_field_mapping
-        
-        # 第二次查询：字典
-        query_mock2 = Mock()
-        filter_mock2 = Mock()
-        query_mock2.filter.return_value = filter_mock2
-        filter_mock2.first.return_value = mock_dictionary
-        
-        # 第三次查询：字典项
-        query_mock3 = Mock()
-        filter_mock3 = Mock()
-        query_mock3.filter.return_value = filter_mock3
-        filter_mock3.all.return_value = [mock_dict_item1, mock_dict_item2]
-        
-        self.mock_db.query.side_effect = [query_mock, query_mock2, query_mock3]
-        
-        result = self.service.get_field_semantic_mapping(
-            self.mock_db, "users", "status"
-        )
-        
-        assert result is not None
-        assert result['dictionary_id'] == "dict_1"
-        assert result['dictionary_name'] == "用户状态字典"
-        assert result['dictionary_code'] == "USER_STATUS"
-        assert result['field_mapping_id'] == "mapping_1"
-        assert result['mapping_type'] == "direct"
-        assert "1" in result['value_mappings']
-        assert "0" in result['value_mappings']
-        assert result['value_mappings']['1']['label'] == "激活"
-        assert result['value_mappings']['0']['label'] == "禁用"
-    
-    def test_get_field_semantic_mapping_with_cache(self):
-        """测试从缓存获取字段语义映射"""
-        # 设置缓存
-        cache_key = "users.status"
-        cached_data = {
-            'dictionary_id': 'dict_1',
-            'dictionary_name': '用户状态字典'
-        }
-        self.service._cache[cache_key] = cached_data
-        
-        result = self.service.get_field_semantic_mapping(
-            self.mock_db, "users", "status"
-        )
-        
-        assert result == cached_data
-        # 确保没有调用数据库查询
-        self.mock_db.query.assert_not_called()
-    
     def test_get_semantic_value_with_mapping(self):
         """测试获取有映射的语义值"""
         semantic_info = {
@@ -210,87 +93,56 @@ class TestSemanticInjectionService:
         
         assert result == data
     
-    @patch.object(SemanticInjectionService, 'get_field_semantic_mapping')
-    def test_inject_semantic_values_success(self, mock_get_mapping):
+    @patch.object(SemanticInjectionService, 'load_table_mappings')
+    def test_inject_semantic_values_success(self, mock_load_mappings):
         """测试成功注入语义值"""
-        # Mock字段映射
-        mock_table = Mock(spec=DataTable)
-        mock_table.table_name = "users"
-        
-        mock_field = Mock(spec=TableField)
-        mock_field.field_name = "status"
-        
-        mock_field_mapping = Mock(spec=FieldMapping)
-        mock_field_mapping.table = mock_table
-        mock_field_mapping.field = mock_field
-        
-        # Mock查询链 - 模拟复杂的join查询
-        query_mock = Mock()
-        join_mock1 = Mock()
-        join_mock2 = Mock()
-        filter_mock = Mock()
-        
-        query_mock.join.return_value = join_mock1
-        join_mock1.join.return_value = join_mock2
-        join_mock2.filter.return_value = filter_mock
-        filter_mock.all.return_value = [mock_field_mapping]
-        
-        self.mock_db.query.return_value = query_mock
-        
-        # Mock语义映射
-        mock_get_mapping.return_value = {
-            'dictionary_name': '用户状态字典',
-            'value_mappings': {
-                '1': {
-                    'label': '激活',
-                    'description': '用户已激活',
-                    'is_active': True
+        mock_load_mappings.return_value = {
+            'status': {
+                'dictionary_name': '用户状态字典',
+                'value_mappings': {
+                    '1': {
+                        'label': '激活',
+                        'description': '用户已激活',
+                        'is_active': True
+                    }
                 }
             }
         }
         
-        data = [{'id': 1, 'status': 1, 'name': 'test'}]
+        data = [{'id': 1, 'status': 1, 'name': 'test'}, {'id': 2, 'name': 'no status'}]
         result = self.service.inject_semantic_values(self.mock_db, "users", data)
         
-        assert len(result) == 1
+        assert len(result) == 2
         assert '_semantic' in result[0]
         assert 'status_semantic' in result[0]['_semantic']
         assert result[0]['_semantic']['status_semantic']['original_value'] == 1
         assert result[0]['_semantic']['status_semantic']['semantic_label'] == '激活'
+        assert '_semantic' not in result[1]
+        assert '_semantic' not in data[0]
     
-    def test_get_table_semantic_schema_success(self):
-        """测试成功获取表语义模式"""
-        # Mock字段映射
-        mock_table = Mock(spec=DataTable)
-        mock_table.table_name = "users"
-        
-        mock_field = Mock(spec=TableField)
-        mock_field.field_name = "status"
-        
-        mock_field_mapping = Mock(spec=FieldMapping)
-        mock_field_mapping.table = mock_table
-        mock_field_mapping.field = mock_field
-        
-        # Mock查询链 - 模拟复杂的join查询
-        query_mock = Mock()
-        join_mock1 = Mock()
-        join_mock2 = Mock()
-        filter_mock = Mock()
-        
-        query_mock.join.return_value = join_mock1
-        join_mock1.join.return_value = join_mock2
-        join_mock2.filter.return_value = filter_mock
-        filter_mock.all.return_value = [mock_field_mapping]
+    def test_translate_column_translates_distinct_values_once(self):
+        """测试整列翻译时重复值只翻译一次"""
+        semantic_info = {'dictionary_name': '状态', 'value_mappings': {'1': {'label': '激活'}}}
         
-        self.mock_db.query.return_value = query_mock
+        with patch.object(self.service, '_get_semantic_value', wraps=self.service._get_semantic_value) as spy:
+            result = self.service.translate_column([1, 1, '1', None, 1, True], semantic_info)
         
-        # Mock语义映射
-        with patch.object(self.service, 'get_field_semantic_mapping') as mock_get_mapping:
-            mock_get_mapping.return_value = {
-                'dictionary_name': '用户状态字典',
-                'dictionary_code': 'USER_STATUS',
-                'mapping_type': 'direct',
-                'value_mappings': {'1': {'label': '激活'}, '0': {'label': '禁用'}}
+        assert spy.call_count == 4
+        assert [r['semantic_label'] for r in result] == ['激活', '激活', '激活', None, '激活', None]
+        assert result[0] is result[1]
+    
+    def test_get_table_semantic_schema_success(self):
+        """测试成功获取表语义模式"""
+        self.mock_db.query.return_value.join.return_value.filter.return_value.scalar.return_value = 2
+        
+        with patch.object(self.service, 'load_table_mappings') as mock_load_mappings:
+            mock_load_mappings.return_value = {
+                'status': {
+                    'dictionary_name': '用户状态字典',
+                    'dictionary_code': 'USER_STATUS',
+                    'mapping_type': 'direct',
+                    'value_mappings': {'1': {'label': '激活'}, '0': {'label': '禁用'}}
+                }
             }
             
             result = self.service.get_table_semantic_schema(self.mock_db, "users")
@@ -301,22 +153,11 @@ class TestSemanticInjectionService:
             assert result['semantic_fields']['status']['dictionary_code'] == 'USER_STATUS'
             assert result['semantic_fields']['status']['mapping_type'] == 'direct'
             assert result['semantic_fields']['status']['available_values'] == ['1', '0']
-            assert result['metadata']['total_mapped_fields'] == 1
+            assert result['metadata']['total_mapped_fields'] == 2
     
     def test_get_table_semantic_schema_no_mappings(self):
         """测试获取无映射的表语义模式"""
-        # Mock查询链 - 模拟复杂的join查询返回空列表
-        query_mock = Mock()
-        join_mock1 = Mock()
-        join_mock2 = Mock()
-        filter_mock = Mock()
-        
-        query_mock.join.return_value = join_mock1
-        join_mock1.join.return_value = join_mock2
-        join_mock2.filter.return_value = filter_mock
-        filter_mock.all.return_value = []
-        
-        self.mock_db.query.return_value = query_mock
+        self.mock_db.query.return_value.join.return_value.filter.return_value.scalar.return_value = 0
         
         result = self.service.get_table_semantic_schema(self.mock_db, "users")
         
@@ -388,7 +229,8 @@ class TestSemanticInjectionService:
         
         assert stats['cache_size'] == 2
         assert 'last_clear' in stats
-        assert stats['ttl_minutes'] == 30
+        assert stats['dictionary_cache_size'] == 0
+        assert stats['hit_rate'] == 0.0
     
     def test_get_field_semantic_mapping_exception(self):
         """测试获取字段语义映射时发生异常"""
@@ -422,4 +264,94 @@ class TestSemanticInjectionService:
         assert result['table_name'] == "users"
         assert result['semantic_fields'] == {}
         assert 'error' in result
-        assert result['error'] == "数据库连接失败"
\ No newline at end of file
+        assert result['error'] == "数据库连接失败"
+
+class TestSemanticInjectionBulkLoading:
+    """基于SQLite内存库的批量加载和版本失效测试"""
+    
+    @pytest.fixture
+    def db(self):
+        """创建内存数据库并准备字段映射和字典数据"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        session.statements = statements
+        
+        session.add(DataTable(id="t1", data_source_id="ds1", table_name="users", data_mode="IMPORT", created_by="test"))
+        session.add(Dictionary(id="d1", code="USER_STATUS", name="用户状态字典", created_by="test"))
+        session.add(Dictionary(id="d2", code="GENDER", name="性别字典", created_by="test"))
+        for field_id, field_name, dictionary_id in [("f1", "status", "d1"), ("f2", "gender", "d2"), ("f3", "name", None)]:
+            session.add(TableField(id=field_id, table_id="t1", field_name=field_name, data_type="VARCHAR"))
+            session.add(FieldMapping(
+                table_id="t1", field_id=field_id, dictionary_id=dictionary_id, business_name=field_name
+            ))
+        session.add_all([
+            DictionaryItem(dictionary_id="d1", item_key="1", item_value="激活", sort_order=1, created_by="test"),
+            DictionaryItem(dictionary_id="d1", item_key="0", item_value="禁用", sort_order=2, created_by="test"),
+            DictionaryItem(dictionary_id="d2", item_key="M", item_value="男", created_by="test"),
+        ])
+        session.commit()
+        statements.clear()
+        yield session
+        session.close()
+    
+    def test_get_field_semantic_mapping(self, db):
+        """测试获取字段语义映射"""
+        service = SemanticInjectionService()
+        
+        result = service.get_field_semantic_mapping(db, "users", "status")
+        
+        assert result['dictionary_id'] == "d1"
+        assert result['dictionary_name'] == "用户状态字典"
+        assert result['dictionary_code'] == "USER_STATUS"
+        assert result['mapping_type'] == "direct"
+        assert list(result['value_mappings']) == ["1", "0"]
+        assert result['value_mappings']['1']['label'] == "激活"
+        assert service.get_field_semantic_mapping(db, "users", "name") is None
+        assert service.get_field_semantic_mapping(db, "orders", "status") is None
+    
+    def test_inject_uses_constant_number_of_queries(self, db):
+        """测试注入语义值的查询次数与字段数和行数无关"""
+        service = SemanticInjectionService()
+        data = [{'status': i % 2, 'gender': 'M', 'name': f'u{i}'} for i in range(10000)]
+        
+        result = service.inject_semantic_values(db, "users", data)
+        assert len(db.statements) == 2
+        assert result[0]['_semantic']['status_semantic']['semantic_label'] == "禁用"
+        assert result[1]['_semantic']['status_semantic']['semantic_label'] == "激活"
+        assert result[9999]['_semantic']['gender_semantic']['semantic_label'] == "男"
+        assert 'name_semantic' not in result[0]['_semantic']
+        
+        # 字典未变化时只执行版本查询
+        db.statements.clear()
+        service.inject_semantic_values(db, "users", data)
+        assert len(db.statements) == 1
+        assert service.get_cache_stats()['hits'] == 2
+    
+    def test_dictionary_change_invalidates_value_map(self, db):
+        """测试字典项变化后按版本重新加载"""
+        service = SemanticInjectionService()
+        service.get_field_semantic_mapping(db, "users", "status")
+        
+        db.add(DictionaryItem(dictionary_id="d1", item_key="2", item_value="注销", created_by="test"))
+        db.commit()
+        
+        result = service.get_field_semantic_mapping(db, "users", "status")
+        assert result['value_mappings']['2']['label'] == "注销"
+        assert service.get_cache_stats()['invalidations'] == 1
+        
+        gender = service.get_field_semantic_mapping(db, "users", "gender")
+        assert gender['value_mappings']['M']['label'] == "男"
+    
+    def test_translate_result_columns(self, db):
+        """测试列式结果翻译为标签列"""
+        service = SemanticInjectionService()
+        
+        labels = service.translate_result_columns(
+            db, "users", ["status", "name"], [[1, "a"], ["0", "b"], [None, "c"], [9, "d"]]
+        )
+        
+        assert labels == {"status": ["激活", "禁用", None, None]}
@@ -0,0 +1,150 @@
+"""
+服务注册表测试
+"""
+
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.service_registry import LazyService, ServiceRegistry
+
+
+class CounterService:
+    """记录构造次数的测试服务"""
+    created = 0
+
+    def __init__(self):
+        CounterService.created += 1
+        self.value = 42
+
+    def describe(self):
+        return f"value={self.value}"
+
+
+@pytest.fixture
+def registry():
+    CounterService.created = 0
+    return ServiceRegistry()
+
+
+def test_service_is_constructed_on_first_use(registry):
+    """测试注册时不构造，首次访问属性时构造且只构造一次"""
+    service = registry.register("counter", CounterService)
+
+    assert isinstance(service, LazyService)
+    assert CounterService.created == 0
+    assert registry.get_state("counter") == "pending"
+
+    assert service.describe() == "value=42"
+    assert service.value == 42
+    assert registry.get("counter") is registry.get("counter")
+    assert CounterService.created == 1
+    assert registry.get_report()["services"]["counter"]["state"] == "ready"
+
+
+def test_concurrent_first_use_constructs_once(registry):
+    """测试并发首次访问只构造一次"""
+    registry.register("counter", CounterService)
+    threads = [threading.Thread(target=registry.get, args=("counter",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert CounterService.created == 1
+
+
+def test_failed_construction_is_retried(registry):
+    """测试构造失败会记录错误，下次访问时重试"""
+    factory = Mock(side_effect=[RuntimeError("redis unavailable"), CounterService()])
+    service = registry.register("flaky", factory)
+
+    with pytest.raises(RuntimeError):
+        service.describe()
+    assert registry.get_report()["services"]["flaky"]["error"] == "redis unavailable"
+    assert registry.get_report()["failed"] == 1
+
+    assert service.describe() == "value=42"
+    assert registry.get_state("flaky") == "ready"
+
+
+def test_patching_proxy_attribute_targets_instance(registry):
+    """测试对代理对象属性的patch作用在真实实例上，结束后恢复"""
+    service = registry.register("counter", CounterService)
+
+    with patch.object(service, "describe", return_value="mocked"):
+        assert registry.get("counter").describe() == "mocked"
+    assert service.describe() == "value=42"
+
+
+def test_fastapi_dependency_and_override(registry):
+    """测试通过FastAPI依赖获取服务，并可通过dependency_overrides替换"""
+    registry.register("counter", CounterService)
+    get_counter = registry.dependency("counter")
+    assert registry.dependency("counter") is get_counter
+
+    app = FastAPI()
+
+    @app.get("/value")
+    def read_value(counter: CounterService = Depends(get_counter)):
+        return {"value": counter.value}
+
+    client = TestClient(app)
+    assert CounterService.created == 0
+    assert client.get("/value").json() == {"value": 42}
+    assert CounterService.created == 1
+
+    app.dependency_overrides[get_counter] = lambda: Mock(value=7)
+    assert client.get("/value").json() == {"value": 7}
+
+    with pytest.raises(KeyError):
+        registry.dependency("missing")
+
+
+@pytest.mark.asyncio
+async def test_warm_up_constructs_registered_services(registry):
+    """测试后台预热构造参与预热的服务，失败的服务不影响其他服务"""
+    registry.register("counter", CounterService)
+    registry.register("broken", Mock(side_effect=RuntimeError("boom")))
+    registry.register("on_demand", CounterService, warm_up=False)
+
+    results = await registry.warm_up()
+
+    assert results == {"counter": "ready", "broken": "failed"}
+    assert registry.get_state("on_demand") == "pending"
+    report = registry.get_report()
+    assert report["initialized"] == 1
+    assert report["pending"] == 1
+    assert "warm_up" in report["phases_ms"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_registered_tasks(registry):
+    """测试预热完成服务构造后执行登记的预热任务，任务失败不影响其他任务"""
+    calls = []
+    registry.register("counter", CounterService)
+    registry.add_warm_up_task("broken", Mock(side_effect=RuntimeError("db down")))
+    registry.add_warm_up_task("preload", lambda: calls.append(CounterService.created))
+
+    await registry.warm_up()
+    assert calls == [1]
+    assert "warm_up.preload" in registry.get_report()["phases_ms"]
+
+    await registry.warm_up(["counter"])
+    assert calls == [1]
+
+
+def test_phase_timing_and_reset(registry):
+    """测试启动阶段计时和重置实例"""
+    registry.register("counter", CounterService)
+    with registry.phase("routes"):
+        registry.get("counter")
+
+    assert registry.get_report()["phases_ms"]["routes"] >= 0
+    registry.reset("counter")
+    assert registry.get_state("counter") == "pending"
+    registry.get("counter")
+    assert CounterService.created == 2
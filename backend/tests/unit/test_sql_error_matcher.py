@@ -0,0 +1,131 @@
+"""
+SQL错误消息匹配测试
+"""
+
+import re
+
+import pytest
+
+from src.services.sql_error_classifier import SQLError, SQLErrorClassifier, SQLErrorType, ErrorPattern
+from src.services.sql_error_learning_service import ErrorPatternLearner
+from src.services.sql_error_matcher import (
+    ClassificationCache,
+    CompiledPatternMatcher,
+    literal_prefix,
+    normalize_error_message
+)
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"You have an error in your SQL syntax", "you have an error in your sql syntax"),
+    (r"Unknown column '([^']+)' in '([^']+)'", "unknown column '"),
+    (r"Can't connect to MySQL server", "can't connect to mysql server"),
+    (r"Incorrect.*?value", "incorrect"),
+    (r"columns? missing", "column"),
+    (r"table\.name", "table.name"),
+    (r"timeout|timed out", ""),
+    (r"\d+ rows", ""),
+    (r"(?i)syntax", ""),
+    (r"字段不存在", "")
+])
+def test_literal_prefix(pattern, expected):
+    """测试提取必须出现的字面量前缀，无法确定时不做预筛选"""
+    assert literal_prefix(pattern) == expected
+
+
+def test_matcher_agrees_with_sequential_search():
+    """测试预编译匹配器与逐个 re.search 的结果一致（列表靠前的模式优先）"""
+    patterns = [p.pattern for p in SQLErrorClassifier().error_patterns] + [r"timeout|timed out", r"line \d+"]
+    matcher = CompiledPatternMatcher(patterns)
+    messages = [
+        "Unknown column 'a' in 'field list'",
+        "incorrect SYNTAX NEAR 'x'",
+        "Incorrect integer value: 'x' for column 'y'",
+        "Table 'db.t' doesn't exist; Unknown column 'c' in 'where clause'",
+        "Connection TIMED OUT at line 3",
+        "nothing to see here"
+    ]
+    for message in messages:
+        expected = next(
+            (index for index, pattern in enumerate(patterns) if re.search(pattern, message, re.IGNORECASE)), None
+        )
+        matched = matcher.match(message)
+        assert (matched[0] if matched else None) == expected, message
+
+
+def test_classification_cache_lru():
+    """测试分类缓存的命中统计、淘汰和超长消息跳过"""
+    cache = ClassificationCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    cache.put("x" * 5000, 4)
+
+    assert cache.get("b") is None
+    assert cache.get("x" * 5000) is None
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["size"] == 2
+    assert normalize_error_message("  Unknown   column\n'a' ") == "Unknown column 'a'"
+
+
+def test_classifier_reuses_cached_decision():
+    """测试相同（规范化后）错误消息直接命中缓存，提取的字段和置信度保持正确"""
+    classifier = SQLErrorClassifier()
+    first = classifier.classify_error("Unknown column 'user_nm' in 'field list'", "SELECT user_nm FROM users")
+    second = classifier.classify_error("Unknown column  'user_nm' in 'field list'\n", "SELECT user_nm FROM users")
+
+    assert second.error_type == first.error_type == SQLErrorType.FIELD_NOT_EXISTS
+    assert second.suggested_fields == ["user_nm"]
+    assert second.error_location == "field list"
+    assert classifier.classify_error("socket network failure", "").error_type == SQLErrorType.CONNECTION_ERROR
+
+    stats = classifier.get_error_statistics()["classification_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+    # 降低置信度后，缓存的分类结果读取到新的置信度
+    classifier.learn_from_error_pattern("Unknown column 'user_nm' in 'field list'", SQLErrorType.SYNTAX_ERROR)
+    assert classifier.classify_error("Unknown column 'user_nm' in 'field list'", "").confidence == pytest.approx(0.88)
+
+
+def test_classifier_recompiles_when_patterns_change():
+    """测试新增错误模式后重新编译并清空缓存"""
+    classifier = SQLErrorClassifier()
+    assert classifier.classify_error("ORA-00942: missing view", "").error_type == SQLErrorType.UNKNOWN_ERROR
+
+    classifier.error_patterns.append(ErrorPattern(
+        pattern=r"ORA-00942", error_type=SQLErrorType.TABLE_NOT_EXISTS,
+        confidence=0.9, description="Oracle表或视图不存在", suggested_fix="检查表名"
+    ))
+    assert classifier.classify_error("ORA-00942: missing view", "").error_type == SQLErrorType.TABLE_NOT_EXISTS
+
+
+def test_learner_indexes_patterns_by_feature_hash():
+    """测试学习器按特征哈希查找模式，直接写入模式字典后重建索引"""
+    learner = ErrorPatternLearner()
+
+    def error(column):
+        return SQLError(
+            error_type=SQLErrorType.FIELD_NOT_EXISTS,
+            original_error=f"Unknown column '{column}' in 'field list'",
+            error_message="字段不存在",
+            sql_statement="SELECT 1"
+        )
+
+    first = learner.learn_from_error(error("a"), {})
+    assert learner.learn_from_error(error("b"), {}) is first
+    assert first.frequency == 2
+
+    imported = learner._create_new_pattern({
+        "error_type": SQLErrorType.SYNTAX_ERROR,
+        "error_message_pattern": "syntax error near '<IDENTIFIER>'",
+        "context_keywords": []
+    }, error("c"))
+    learner.error_patterns[imported.pattern_id] = imported
+
+    found = learner._find_matching_pattern({
+        "error_type": SQLErrorType.SYNTAX_ERROR,
+        "error_message_pattern": "syntax error near '<IDENTIFIER>'"
+    })
+    assert found is imported
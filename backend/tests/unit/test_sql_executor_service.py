@@ -237,6 +237,137 @@ class TestSQLExecutorService:
         
         assert "OFFSET 10 ROWS FETCH NEXT 20 ROWS ONLY" in paginated
     
+    def test_add_pagination_to_sql_sqlserver_with_key(self, executor_service):
+        """测试SQL Server分页使用唯一排序键代替不确定的排序"""
+        paginated = executor_service._add_pagination_to_sql(
+            "SELECT * FROM users", offset=10, limit=20, db_type=DatabaseType.SQLSERVER, order_columns=['id']
+        )
+        
+        assert paginated == "SELECT * FROM users ORDER BY [id] OFFSET 10 ROWS FETCH NEXT 20 ROWS ONLY;"
+    
+    @pytest.mark.asyncio
+    async def test_execute_query_keyset(self, executor_service, mysql_config):
+        """测试键集分页返回下一页游标"""
+        first_page = QueryResult(columns=['id', 'name'], rows=[[1, 'a'], [2, 'b'], [3, 'c']],
+                                 row_count=3, execution_time=0.1)
+        second_page = QueryResult(columns=['id', 'name'], rows=[[3, 'c']], row_count=1, execution_time=0.1)
+        
+        with patch.object(executor_service, '_execute_mysql', side_effect=[first_page, second_page]) as mock_execute:
+            result = await executor_service.execute_query_keyset(
+                "SELECT * FROM users", mysql_config, ['id'], page_size=2
+            )
+            
+            assert result.rows == [[1, 'a'], [2, 'b']]
+            assert result.has_more is True
+            assert result.page_info['mode'] == 'keyset'
+            assert result.page_info['next_cursor']
+            assert "ORDER BY `id` LIMIT 3" in mock_execute.call_args[0][0]
+            
+            result = await executor_service.execute_query_keyset(
+                "SELECT * FROM users", mysql_config, ['id'], cursor=result.page_info['next_cursor'], page_size=2
+            )
+            
+            assert "WHERE `id` > 2" in mock_execute.call_args[0][0]
+            assert result.rows == [[3, 'c']]
+            assert result.page_info['page'] == 2
+            assert result.page_info['has_next'] is False
+            assert result.page_info['next_cursor'] is None
+    
+    @pytest.mark.asyncio
+    async def test_execute_query_keyset_invalid_cursor(self, executor_service, mysql_config):
+        """测试无效游标被拒绝"""
+        with pytest.raises(SQLExecutionError) as exc_info:
+            await executor_service.execute_query_keyset(
+                "SELECT * FROM users", mysql_config, ['id'], cursor="bogus", page_size=2
+            )
+        
+        assert exc_info.value.error_code == "INVALID_CURSOR"
+    
+    @pytest.mark.asyncio
+    async def test_execute_query_stream_keyset(self, executor_service, mysql_config):
+        """测试提供排序键时流式查询使用键集分页"""
+        pages = [
+            QueryResult(columns=['id'], rows=[[1], [2]], row_count=2, execution_time=0.1,
+                        page_info={'next_cursor': 'c1'}),
+            QueryResult(columns=['id'], rows=[[3]], row_count=1, execution_time=0.1,
+                        page_info={'next_cursor': None}),
+        ]
+        
+        with patch.object(executor_service, 'execute_query_keyset', side_effect=pages) as mock_keyset:
+            chunks = [chunk async for chunk in executor_service.execute_query_stream(
+                "SELECT * FROM users", mysql_config, chunk_size=2, key_columns=['id']
+            )]
+        
+        assert chunks == [[[1], [2]], [[3]]]
+        assert mock_keyset.call_args_list[1].kwargs['cursor'] == 'c1'
+    
+    def test_add_row_limit(self, executor_service):
+        """测试添加行数限制"""
+        assert executor_service.add_row_limit(
+            "SELECT * FROM users;", 100, DatabaseType.MYSQL
+        ) == "SELECT * FROM users LIMIT 100"
+        assert executor_service.add_row_limit(
+            "SELECT * FROM users LIMIT 5", 100, DatabaseType.MYSQL
+        ) == "SELECT * FROM users LIMIT 5"
+        assert executor_service.add_row_limit(
+            "SELECT DISTINCT name FROM users", 100, DatabaseType.SQLSERVER
+        ) == "SELECT DISTINCT TOP 100 name FROM users"
+    
+    @pytest.mark.asyncio
+    async def test_cost_check_adds_limit(self, executor_service, mysql_config):
+        """测试成本预估后自动添加行数限制"""
+        from src.services.query_cost_estimator import CostEstimate, CostAction
+        
+        executor_service.config.enable_cost_check = True
+        estimate = CostEstimate(database_type='mysql', available=True, estimated_rows=5000000,
+                                action=CostAction.ADD_LIMIT, suggested_limit=1000)
+        mock_result = QueryResult(columns=['id'], rows=[[1]], row_count=1, execution_time=0.1, metadata={})
+        
+        with patch.object(executor_service.cost_estimator, 'estimate', return_value=estimate), \
+             patch.object(executor_service, '_execute_mysql', return_value=mock_result) as mock_execute:
+            result = await executor_service.execute_query("SELECT * FROM orders", mysql_config, use_cache=False)
+        
+        assert mock_execute.call_args[0][0] == "SELECT * FROM orders LIMIT 1001"
+        assert result.metadata['cost_estimate']['action'] == 'add_limit'
+        assert result.metadata['row_limit']['max_rows'] == 1000
+    
+    @pytest.mark.asyncio
+    async def test_row_limit_injected_and_truncated(self, executor_service, mysql_config):
+        """测试在SQL中注入行数限制并裁剪多取的一行"""
+        executor_service.config.max_rows = 2
+        mock_result = QueryResult(columns=['id'], rows=[[1], [2], [3]], row_count=3, execution_time=0.1)
+        
+        with patch.object(executor_service, '_execute_mysql', return_value=mock_result) as mock_execute:
+            result = await executor_service.execute_query("SELECT id FROM orders;", mysql_config, use_cache=False)
+        
+        assert mock_execute.call_args[0][0] == "SELECT id FROM orders LIMIT 3"
+        assert result.rows == [[1], [2]]
+        assert result.row_count == 2
+        assert result.is_truncated is True
+        assert result.has_more is True
+        assert result.metadata['row_limit']['strategy'] == 'append'
+        
+        stats = executor_service.get_statistics()
+        assert stats['limited_queries'] == 1
+        assert stats['truncated_queries'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_cost_check_rejects_expensive_query(self, executor_service, mysql_config):
+        """测试成本过高的查询被拒绝执行"""
+        from src.services.query_cost_estimator import CostEstimate, CostAction
+        
+        executor_service.config.enable_cost_check = True
+        estimate = CostEstimate(database_type='mysql', available=True, has_cartesian_join=True,
+                                action=CostAction.CLARIFY, warnings=["笛卡尔积"])
+        
+        with patch.object(executor_service.cost_estimator, 'estimate', return_value=estimate), \
+             patch.object(executor_service, '_execute_mysql') as mock_execute:
+            with pytest.raises(SQLExecutionError) as exc_info:
+                await executor_service.execute_query("SELECT * FROM a, b", mysql_config, use_cache=False)
+        
+        assert exc_info.value.error_code == "QUERY_TOO_EXPENSIVE"
+        mock_execute.assert_not_called()
+    
     def test_format_result_json(self, executor_service):
         """测试JSON格式化"""
         result = QueryResult(
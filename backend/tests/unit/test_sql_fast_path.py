@@ -0,0 +1,174 @@
+"""
+模板SQL快速通道测试
+"""
+
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.services.sql_fast_path import FieldInfo, SQLFastPath, TableSchema, resolve_time_range
+from src.services.sql_generator_service import SQLDialect, SQLGenerationRequest, SQLGeneratorService
+from src.services.sql_security_validator import SQLSecurityValidator
+
+TODAY = date(2026, 10, 18)
+
+
+def orders_table():
+    return TableSchema("orders", [
+        FieldInfo("order_id", "varchar(32)", "订单号"),
+        FieldInfo("amount", "decimal(12,2)", "金额", aliases=["销售额"]),
+        FieldInfo("region", "varchar(20)", "地区", dictionary_values={"华东": "EAST", "华北": "NORTH"}),
+        FieldInfo("customer_id", "varchar(32)", "客户"),
+        FieldInfo("order_date", "datetime", "下单日期")
+    ])
+
+
+@pytest.fixture
+def fast_path():
+    return SQLFastPath(schema_loader=lambda **kwargs: [orders_table()])
+
+
+def test_aggregate_by_dimension_with_time_range(fast_path):
+    """测试按维度聚合，时间表达式换算为左闭右开区间"""
+    result = fast_path.match("上月各地区的销售额", [orders_table()], dialect="mysql", max_rows=100, today=TODAY)
+
+    assert result.template == "aggregate"
+    assert result.confidence >= fast_path.confidence_threshold
+    assert result.sql == (
+        "SELECT region, SUM(amount) AS sum_amount FROM orders "
+        "WHERE order_date >= '2026-09-01' AND order_date < '2026-10-01' "
+        "GROUP BY region ORDER BY sum_amount DESC LIMIT 100"
+    )
+    assert result.slots["time_range"] == {"start": "2026-09-01", "end": "2026-10-01"}
+
+
+def test_top_n_uses_dialect_row_limit(fast_path):
+    """测试Top-N问题，SQL Server使用TOP，其余方言使用LIMIT"""
+    mysql = fast_path.match("销售额最低的前五个地区", [orders_table()], dialect="mysql", today=TODAY)
+    sqlserver = fast_path.match("销售额最高的前5个地区", [orders_table()], dialect="sqlserver", today=TODAY)
+
+    assert mysql.template == "top_n"
+    assert mysql.sql.endswith("ORDER BY sum_amount ASC LIMIT 5")
+    assert sqlserver.sql.startswith("SELECT TOP 5 region, SUM(amount)")
+    assert "LIMIT" not in sqlserver.sql
+
+
+def test_trend_and_dictionary_filter(fast_path):
+    """测试趋势粒度和字典显示值过滤（过滤字段不再作为分组维度）"""
+    trend = fast_path.match("最近30天每天的销售额趋势", [orders_table()], dialect="postgresql", today=TODAY)
+    assert trend.template == "trend"
+    assert "DATE_TRUNC('day', order_date) AS period" in trend.sql
+    assert "order_date >= '2026-09-19' AND order_date < '2026-10-19'" in trend.sql
+
+    filtered = fast_path.match("华东本月客户数", [orders_table()], dialect="mysql", today=TODAY)
+    assert filtered.template == "total"
+    assert filtered.sql == (
+        "SELECT COUNT(DISTINCT customer_id) AS distinct_customer_id FROM orders "
+        "WHERE order_date >= '2026-10-01' AND order_date < '2026-11-01' AND region = 'EAST'"
+    )
+    assert filtered.slots["filters"] == {"region": "EAST"}
+
+
+@pytest.mark.parametrize("question", [
+    "上月销售额同比增长多少",
+    "帮我分析一下客户流失的原因",
+    "金额大于1000的订单",
+    "各地区各客户的销售额",
+    "非华东地区的销售额",
+    "不是华东地区的销售额是多少",
+    "地区销售额不是华东的",
+    "华东地区没有的销售额"
+])
+def test_unsupported_questions_fall_through(fast_path, question):
+    """测试超出模板能力或覆盖率不足的问题返回None"""
+    assert fast_path.match(question, [orders_table()], dialect="mysql", today=TODAY) is None
+
+
+def test_ambiguous_tables_fall_through(fast_path):
+    """测试多张表都能高置信度匹配时转给云端模型"""
+    copy = orders_table()
+    copy.table_name = "orders_archive"
+    assert fast_path.match("上月销售额", [orders_table(), copy], dialect="mysql", today=TODAY) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("最大订单金额是多少", "SELECT MAX(order_amount) AS max_order_amount FROM orders"),
+    ("最高的订单金额", "SELECT MAX(order_amount) AS max_order_amount FROM orders"),
+    ("价格最低是多少", "SELECT MIN(price) AS min_price FROM orders")
+])
+def test_extreme_words_without_dimension_use_max_min(fast_path, question, expected):
+    """测试没有分组维度和Top-N时，最大/最高/最低表示取最值，不能生成SUM"""
+    table = TableSchema("orders", [
+        FieldInfo("order_id", "varchar(32)", "订单号"),
+        FieldInfo("order_amount", "decimal(12,2)", "订单金额"),
+        FieldInfo("price", "decimal(12,2)", "价格"),
+        FieldInfo("order_date", "datetime", "下单日期")
+    ])
+    result = fast_path.match(question, [table], dialect="mysql", today=TODAY)
+
+    assert result.template == "total"
+    assert result.sql == expected
+
+
+def test_extreme_words_with_explicit_aggregation_fall_through(fast_path):
+    """测试最值说法与其他聚合或计数同时出现时转给云端模型"""
+    assert fast_path.match("平均销售额最高是多少", [orders_table()], dialect="mysql", today=TODAY) is None
+    assert fast_path.match("订单数最多", [orders_table()], dialect="mysql", today=TODAY) is None
+
+
+def test_generated_sql_passes_validator(fast_path):
+    """测试生成的SQL通过安全校验，非常规标识符按方言加引号"""
+    table = TableSchema("销售 明细", [
+        FieldInfo("金额", "decimal", aliases=["销售额"]),
+        FieldInfo("地区", "varchar"),
+        FieldInfo("日期", "date")
+    ])
+    result = fast_path.match("今年各地区销售额", [table], dialect="mysql", today=TODAY)
+
+    assert result.sql.startswith("SELECT `地区`, SUM(`金额`) AS sum_value FROM `销售 明细`")
+    validation = SQLSecurityValidator().validate_sql(result.sql, {"销售 明细": ["金额", "地区", "日期"]})
+    assert validation.is_valid
+
+
+def test_resolve_time_range():
+    """测试时间表达式换算"""
+    assert resolve_time_range("上季度", TODAY) == (date(2026, 7, 1), date(2026, 10, 1))
+    assert resolve_time_range("本周", TODAY) == (date(2026, 10, 12), date(2026, 10, 19))
+    assert resolve_time_range("recent", TODAY, amount=3, unit="个月") == (date(2026, 8, 1), date(2026, 10, 19))
+
+
+def test_statistics_track_hits_and_fallthroughs(fast_path):
+    """测试命中率与耗时单独统计，不支持的方言直接转给云端模型"""
+    assert fast_path.generate("上月销售额", table_ids=["t1"], dialect="mysql") is not None
+    assert fast_path.generate("帮我分析客户流失原因", table_ids=["t1"], dialect="mysql") is None
+    assert fast_path.generate("上月销售额", table_ids=["t1"], dialect="sqlite") is None
+
+    stats = fast_path.get_statistics()
+    assert stats["attempts"] == 3
+    assert stats["hits"] == 1
+    assert stats["fallthroughs"] == 2
+    assert stats["hit_rate"] == round(1 / 3, 4)
+    assert stats["templates"] == {"total": 1}
+
+
+@pytest.mark.asyncio
+async def test_generator_service_skips_model_on_fast_path_hit(fast_path):
+    """测试快速通道命中时不调用云端模型，也不计入模型生成统计"""
+    service = SQLGeneratorService()
+    service.fast_path = fast_path
+    request = SQLGenerationRequest(
+        user_question="本月各地区的销售额", table_ids=["t1"], sql_dialect=SQLDialect.MYSQL, max_rows=50
+    )
+
+    with patch.object(service, "_generate_sql_with_qwen", new_callable=AsyncMock) as mock_qwen:
+        result = await service.generate_sql(request)
+
+    mock_qwen.assert_not_called()
+    assert result.semantic_context_used["source"] == "fast_path"
+    assert result.validation_result["is_valid"]
+    assert result.sql.endswith("LIMIT 50")
+
+    stats = service.get_generation_statistics()
+    assert stats["total_generations"] == 0
+    assert stats["fast_path"]["hits"] == 1
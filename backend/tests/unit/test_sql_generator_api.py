@@ -471,3 +471,38 @@ def test_batch_generate_sql_empty_requests():
     )
     
     assert response.status_code == 422  # Validation error
+
+
+def test_generate_and_execute_sql(mock_sql_generator_service):
+    """测试生成并执行SQL，返回实际执行的候选和查询结果"""
+    from src.api.sql_executor_api import get_executor_service
+    from src.services.sql_executor_service import QueryResult
+    
+    executor = Mock()
+    app.dependency_overrides[get_executor_service] = lambda: executor
+    mock_result = SQLGenerationResult(
+        sql="SELECT c FROM t;", explanation="", estimated_rows=0, execution_plan="", confidence=0.9,
+        generation_time=1.0, semantic_context_used={}, validation_result={"is_valid": True},
+        candidates=[{"sql": "SELECT a FROM t;", "is_valid": True}, {"sql": "SELECT c FROM t;", "is_valid": True}]
+    )
+    query_result = QueryResult(columns=["c"], rows=[[1]], row_count=1, execution_time=0.01,
+                               metadata={"candidate_index": 1})
+    mock_sql_generator_service.generate_and_execute = AsyncMock(return_value=(mock_result, query_result))
+    
+    try:
+        response = client.post(
+            "/api/sql-generator/execute",
+            json={"user_question": "查询c", "data_source_id": "ds_001", "candidate_count": 2}
+        )
+    finally:
+        app.dependency_overrides.pop(get_executor_service, None)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["generation"]["sql"] == "SELECT c FROM t;"
+    assert data["result"]["rows"] == [[1]]
+    assert data["result"]["metadata"]["candidate_index"] == 1
+    request, used_executor = mock_sql_generator_service.generate_and_execute.await_args.args
+    assert request.candidate_count == 2
+    assert used_executor is executor
+
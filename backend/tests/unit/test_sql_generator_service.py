@@ -400,3 +400,161 @@ def test_multiple_sql_extractions(sql_generator_service):
     for response, expected_sql in test_cases:
         sql = sql_generator_service._extract_sql_from_response(response)
         assert "SELECT" in sql
+
+
+def _qwen_responses(responses_by_temperature):
+    """按采样温度返回模型响应（值为异常时抛出）"""
+    async def generate(prompt, request, temperature=0.1):
+        response = responses_by_temperature[temperature]
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return generate
+
+
+@pytest.mark.asyncio
+async def test_speculative_generation_picks_best_valid_candidate(sql_generator_service):
+    """测试多候选模式：并行生成、去重、淘汰无效候选，返回评分最高的候选"""
+    request = SQLGenerationRequest(user_question="查询产品", data_source_id="ds_001", candidate_count=4)
+    responses = {
+        0.1: '{"sql": "SELECT name FROM missing_table;"}',
+        0.4: '{"sql": "SELECT name FROM products;", "confidence": 0.9}',
+        0.7: '{"sql": "SELECT  name FROM products;"}',
+        0.9: Exception("模型超时")
+    }
+    
+    with patch.object(sql_generator_service, '_get_semantic_context', new_callable=AsyncMock) as mock_context, \
+         patch.object(sql_generator_service, '_generate_sql_with_qwen', side_effect=_qwen_responses(responses)), \
+         patch.object(sql_generator_service.sql_security, 'get_available_tables', new_callable=AsyncMock) as mock_tables, \
+         patch.object(sql_generator_service, '_get_data_source_config', return_value=None):
+        mock_context.return_value = {"enhanced_context": "测试", "modules_used": [], "total_tokens_used": 0, "relevance_scores": {}}
+        mock_tables.return_value = {"products": ["name"]}
+        
+        result = await sql_generator_service.generate_sql(request)
+    
+    assert result.sql == "SELECT name FROM products;"
+    assert result.confidence == 0.9
+    assert result.validation_result["is_valid"] is True
+    assert [c["sql"] for c in result.candidates] == ["SELECT name FROM products;", "SELECT name FROM missing_table;"]
+    assert result.candidates[1]["is_valid"] is False
+    assert "missing_table" in result.candidates[1]["rejected_reason"]
+    mock_tables.assert_awaited_once_with("ds_001")
+
+
+@pytest.mark.asyncio
+async def test_speculative_generation_rejects_candidate_failing_explain(sql_generator_service):
+    """测试EXPLAIN试运行被数据库拒绝的候选被淘汰，通过试运行的候选加分"""
+    from src.services.query_cost_estimator import CostEstimate
+    
+    request = SQLGenerationRequest(user_question="查询产品", data_source_id="ds_001", candidate_count=2)
+    responses = {0.1: '{"sql": "SELECT price FROM products;"}', 0.4: '{"sql": "SELECT name FROM products;"}'}
+    
+    async def estimate(sql, config):
+        if "price" in sql:
+            return CostEstimate(database_type="mysql", available=False, statement_error="Unknown column 'price'")
+        return CostEstimate(database_type="mysql", available=True, estimated_rows=10)
+    
+    with patch.object(sql_generator_service, '_get_semantic_context', new_callable=AsyncMock) as mock_context, \
+         patch.object(sql_generator_service, '_generate_sql_with_qwen', side_effect=_qwen_responses(responses)), \
+         patch.object(sql_generator_service.sql_security, 'get_available_tables', new_callable=AsyncMock, return_value={}), \
+         patch.object(sql_generator_service, '_get_data_source_config', return_value={"type": "mysql"}), \
+         patch.object(sql_generator_service.cost_estimator, 'estimate', side_effect=estimate):
+        mock_context.return_value = {"enhanced_context": "测试", "modules_used": [], "total_tokens_used": 0, "relevance_scores": {}}
+        
+        result = await sql_generator_service.generate_sql(request)
+    
+    assert result.sql == "SELECT name FROM products;"
+    assert result.candidates[0]["score"] > 100
+    assert result.candidates[1]["rejected_reason"] == "EXPLAIN试运行失败: Unknown column 'price'"
+    assert result.candidates[1]["validation_result"]["is_valid"] is False
+
+
+@pytest.mark.asyncio
+async def test_execute_best_candidate_falls_back_without_regenerating(sql_generator_service):
+    """测试最佳候选执行失败时改用下一个有效候选"""
+    from src.services.sql_executor_service import QueryResult, SQLExecutionError
+    
+    result = SQLGenerationResult(
+        sql="SELECT a FROM t;", explanation="", estimated_rows=0, execution_plan="", confidence=0.8,
+        generation_time=0.1, semantic_context_used={},
+        candidates=[
+            {"sql": "SELECT a FROM t;", "is_valid": True},
+            {"sql": "SELECT b FROM t;", "is_valid": False},
+            {"sql": "SELECT c FROM t;", "is_valid": True}
+        ]
+    )
+    executor = Mock()
+    executor.execute_query = AsyncMock(side_effect=[
+        SQLExecutionError("查询执行失败", error_code="EXECUTION_ERROR"),
+        QueryResult(columns=["c"], rows=[[1]], row_count=1, execution_time=0.01)
+    ])
+    
+    query_result = await sql_generator_service.execute_best_candidate(result, executor, {"type": "mysql"})
+    
+    assert query_result.metadata["candidate_index"] == 1
+    assert result.sql == "SELECT c FROM t;"
+    assert [call.args[0] for call in executor.execute_query.await_args_list] == ["SELECT a FROM t;", "SELECT c FROM t;"]
+    
+    executor.execute_query = AsyncMock(side_effect=SQLExecutionError("成本过高", error_code="QUERY_TOO_EXPENSIVE"))
+    with pytest.raises(SQLExecutionError):
+        await sql_generator_service.execute_best_candidate(result, executor, {"type": "mysql"})
+    assert executor.execute_query.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_and_execute_falls_back_to_next_candidate(sql_generator_service):
+    """测试生成并执行时，最佳候选执行失败后改用下一个候选，不再调用模型"""
+    from src.services.sql_executor_service import QueryResult, SQLExecutionError
+    
+    request = SQLGenerationRequest(user_question="查询", data_source_id="ds1", candidate_count=2)
+    result = SQLGenerationResult(
+        sql="SELECT a FROM t;", explanation="", estimated_rows=0, execution_plan="", confidence=0.8,
+        generation_time=0.1, semantic_context_used={},
+        candidates=[{"sql": "SELECT a FROM t;", "is_valid": True}, {"sql": "SELECT c FROM t;", "is_valid": True}]
+    )
+    executor = Mock()
+    executor.execute_query = AsyncMock(side_effect=[
+        SQLExecutionError("查询执行失败", error_code="EXECUTION_ERROR"),
+        QueryResult(columns=["c"], rows=[[1]], row_count=1, execution_time=0.01)
+    ])
+    
+    with patch.object(sql_generator_service, '_get_data_source_config', return_value={"type": "mysql"}), \
+         patch.object(sql_generator_service, 'generate_sql', AsyncMock(return_value=result)) as mock_generate:
+        generated, query_result = await sql_generator_service.generate_and_execute(request, executor)
+    
+    mock_generate.assert_awaited_once_with(request)
+    assert generated.sql == "SELECT c FROM t;"
+    assert query_result.metadata["candidate_index"] == 1
+    executor.execute_query.assert_awaited_with("SELECT c FROM t;", {"type": "mysql"})
+    
+    # 数据源不可执行时不调用模型
+    with patch.object(sql_generator_service, '_get_data_source_config', return_value=None), \
+         patch.object(sql_generator_service, 'generate_sql', AsyncMock()) as mock_generate:
+        with pytest.raises(SQLExecutionError) as exc_info:
+            await sql_generator_service.generate_and_execute(request, executor)
+    assert exc_info.value.error_code == "NO_DATA_SOURCE"
+    mock_generate.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_execute_best_candidate_never_runs_rejected_sql(sql_generator_service):
+    """测试候选全部被拒绝或单条SQL未通过校验时不执行"""
+    from src.services.sql_executor_service import SQLExecutionError
+    
+    executor = Mock()
+    executor.execute_query = AsyncMock()
+    rejected = SQLGenerationResult(
+        sql="DROP TABLE users;", explanation="", estimated_rows=0, execution_plan="", confidence=0.0,
+        generation_time=0.1, semantic_context_used={}, validation_result={"is_valid": False},
+        candidates=[{"sql": "DROP TABLE users;", "is_valid": False}]
+    )
+    single = SQLGenerationResult(
+        sql="DROP TABLE users;", explanation="", estimated_rows=0, execution_plan="", confidence=0.0,
+        generation_time=0.1, semantic_context_used={}, validation_result={"is_valid": False}
+    )
+    
+    for result in (rejected, single):
+        with pytest.raises(SQLExecutionError) as exc_info:
+            await sql_generator_service.execute_best_candidate(result, executor, {"type": "mysql"})
+        assert exc_info.value.error_code == "NO_VALID_SQL"
+    executor.execute_query.assert_not_called()
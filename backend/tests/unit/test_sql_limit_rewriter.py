@@ -0,0 +1,215 @@
+"""
+SQL行数限制改写器单元测试
+
+测试各数据库方言下行数限制的注入、收紧、包装以及分页改写
+"""
+
+import pytest
+
+from src.services.sql_limit_rewriter import (
+    SQLLimitRewriter,
+    STRATEGY_NONE,
+    STRATEGY_APPEND,
+    STRATEGY_TIGHTEN,
+    STRATEGY_TOP,
+    STRATEGY_WRAP,
+    STRATEGY_SINGLE_ROW,
+    STRATEGY_UNSUPPORTED
+)
+
+
+@pytest.fixture
+def rewriter():
+    """创建改写器实例"""
+    return SQLLimitRewriter()
+
+
+class TestStandardLimit:
+    """MySQL/PostgreSQL行数限制测试"""
+
+    def test_append_limit(self, rewriter):
+        """测试追加LIMIT"""
+        result = rewriter.apply_limit("SELECT * FROM users;", 100, 'mysql')
+        assert result.sql == "SELECT * FROM users LIMIT 100"
+        assert result.rewritten is True
+        assert result.strategy == STRATEGY_APPEND
+
+    def test_keep_smaller_limit(self, rewriter):
+        """测试已有更小的LIMIT时保持不变"""
+        result = rewriter.apply_limit("SELECT * FROM users LIMIT 5", 100, 'mysql')
+        assert result.sql == "SELECT * FROM users LIMIT 5"
+        assert result.rewritten is False
+        assert result.limit == 5
+        assert result.strategy == STRATEGY_NONE
+
+    def test_tighten_larger_limit(self, rewriter):
+        """测试收紧过大的LIMIT"""
+        result = rewriter.apply_limit("SELECT * FROM users LIMIT 50000 OFFSET 10", 100, 'postgresql')
+        assert result.sql == "SELECT * FROM users LIMIT 100 OFFSET 10"
+        assert result.original_limit == 50000
+        assert result.strategy == STRATEGY_TIGHTEN
+
+    def test_tighten_mysql_offset_count_syntax(self, rewriter):
+        """测试MySQL LIMIT offset, count 语法只收紧行数"""
+        result = rewriter.apply_limit("SELECT * FROM users LIMIT 20, 5000", 100, 'mysql')
+        assert result.sql == "SELECT * FROM users LIMIT 20, 100"
+
+    def test_subquery_limit_ignored(self, rewriter):
+        """测试子查询中的LIMIT不影响外层"""
+        result = rewriter.apply_limit(
+            "SELECT * FROM (SELECT * FROM orders LIMIT 10) t WHERE t.amount > 0", 100, 'mysql'
+        )
+        assert result.sql.endswith("t.amount > 0 LIMIT 100")
+        assert result.strategy == STRATEGY_APPEND
+
+    def test_union_limit_applies_to_whole_result(self, rewriter):
+        """测试集合运算末尾追加LIMIT"""
+        result = rewriter.apply_limit("SELECT id FROM a UNION SELECT id FROM b", 100, 'mysql')
+        assert result.sql == "SELECT id FROM a UNION SELECT id FROM b LIMIT 100"
+
+    def test_for_update_unsupported(self, rewriter):
+        """测试FOR UPDATE等尾部子句不改写"""
+        result = rewriter.apply_limit("SELECT * FROM users FOR UPDATE", 100, 'mysql')
+        assert result.rewritten is False
+        assert result.strategy == STRATEGY_UNSUPPORTED
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM users -- 最近注册的用户",
+        "SELECT * FROM users; -- trailing",
+        "SELECT * FROM users /* note */"
+    ])
+    def test_trailing_comment_removed_before_append(self, rewriter, sql):
+        """测试末尾注释被去掉，追加的LIMIT不会落入注释"""
+        result = rewriter.apply_limit(sql, 100, 'mysql')
+        assert result.sql == "SELECT * FROM users LIMIT 100"
+
+    def test_postgresql_fetch_first_treated_as_limit(self, rewriter):
+        """测试PostgreSQL FETCH FIRST视为已有限制，收紧而不是再追加LIMIT"""
+        result = rewriter.apply_limit("SELECT * FROM users ORDER BY id FETCH FIRST 5000 ROWS ONLY", 100, 'postgresql')
+        assert result.sql == "SELECT * FROM users ORDER BY id FETCH FIRST 100 ROWS ONLY"
+        assert result.strategy == STRATEGY_TIGHTEN
+
+        result = rewriter.apply_limit("SELECT * FROM users FETCH FIRST ROW ONLY", 100, 'postgresql')
+        assert result.sql == "SELECT * FROM users FETCH FIRST ROW ONLY"
+        assert result.limit == 1
+        assert "LIMIT" not in result.sql
+
+    def test_postgresql_limit_all_replaced(self, rewriter):
+        """测试PostgreSQL LIMIT ALL视为已有LIMIT子句，替换为行数而不是再追加LIMIT"""
+        result = rewriter.apply_limit("SELECT * FROM users LIMIT ALL", 100, 'postgresql')
+        assert result.sql == "SELECT * FROM users LIMIT 100"
+        assert result.limit == 100
+        assert result.strategy == STRATEGY_TIGHTEN
+
+        result = rewriter.apply_limit("SELECT * FROM users ORDER BY id LIMIT ALL OFFSET 10", 100, 'postgresql')
+        assert result.sql == "SELECT * FROM users ORDER BY id LIMIT 100 OFFSET 10"
+
+        result = rewriter.apply_limit("SELECT id FROM a UNION ALL SELECT id FROM b", 100, 'postgresql')
+        assert result.sql == "SELECT id FROM a UNION ALL SELECT id FROM b LIMIT 100"
+
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM users LIMIT ?",
+        "SELECT * FROM users LIMIT %s",
+        "SELECT * FROM users LIMIT 10, %(size)s"
+    ])
+    def test_parameterized_limit_wrapped(self, rewriter, sql):
+        """测试占位符LIMIT视为已有限制，包装为子查询限制最终结果"""
+        result = rewriter.apply_limit(sql, 100, 'mysql')
+        assert result.sql == f"SELECT * FROM ({sql}) AS _limited LIMIT 100"
+        assert result.strategy == STRATEGY_WRAP
+
+
+class TestSingleRowDetection:
+    """单行结果识别测试"""
+
+    def test_aggregate_without_group_by(self, rewriter):
+        """测试无分组聚合不加限制"""
+        result = rewriter.apply_limit("SELECT COUNT(*), SUM(amount) FROM orders", 100, 'mysql')
+        assert result.sql == "SELECT COUNT(*), SUM(amount) FROM orders"
+        assert result.limit == 1
+        assert result.strategy == STRATEGY_SINGLE_ROW
+
+    def test_aggregate_with_group_by(self, rewriter):
+        """测试分组聚合需要加限制"""
+        result = rewriter.apply_limit("SELECT region, COUNT(*) FROM orders GROUP BY region", 100, 'mysql')
+        assert result.sql.endswith("GROUP BY region LIMIT 100")
+
+    def test_window_function(self, rewriter):
+        """测试窗口函数按多行处理"""
+        result = rewriter.apply_limit("SELECT id, SUM(amount) OVER (ORDER BY id) FROM orders", 100, 'mysql')
+        assert result.strategy == STRATEGY_APPEND
+
+
+class TestSQLServerLimit:
+    """SQL Server行数限制测试"""
+
+    def test_insert_top(self, rewriter):
+        """测试插入TOP"""
+        result = rewriter.apply_limit("SELECT name FROM users", 100, 'sqlserver')
+        assert result.sql == "SELECT TOP 100 name FROM users"
+        assert result.strategy == STRATEGY_TOP
+
+    def test_insert_top_after_distinct(self, rewriter):
+        """测试TOP插入在DISTINCT之后"""
+        result = rewriter.apply_limit("SELECT DISTINCT name FROM users", 100, 'sqlserver')
+        assert result.sql == "SELECT DISTINCT TOP 100 name FROM users"
+
+    def test_tighten_top(self, rewriter):
+        """测试收紧已有TOP"""
+        result = rewriter.apply_limit("SELECT TOP 5000 name FROM users", 100, 'sqlserver')
+        assert result.sql == "SELECT TOP 100 name FROM users"
+        assert result.strategy == STRATEGY_TIGHTEN
+
+    def test_tighten_fetch(self, rewriter):
+        """测试收紧已有FETCH NEXT"""
+        result = rewriter.apply_limit(
+            "SELECT name FROM users ORDER BY id OFFSET 0 ROWS FETCH NEXT 5000 ROWS ONLY", 100, 'sqlserver'
+        )
+        assert result.sql == "SELECT name FROM users ORDER BY id OFFSET 0 ROWS FETCH NEXT 100 ROWS ONLY"
+
+    def test_union_wrapped(self, rewriter):
+        """测试无ORDER BY的集合运算包装为子查询"""
+        result = rewriter.apply_limit("SELECT id FROM a UNION SELECT id FROM b", 100, 'sqlserver')
+        assert result.sql == "SELECT TOP 100 * FROM (SELECT id FROM a UNION SELECT id FROM b) AS _limited"
+        assert result.strategy == STRATEGY_WRAP
+
+
+class TestNonQuery:
+    """非查询语句测试"""
+
+    def test_insert_unsupported(self, rewriter):
+        """测试INSERT语句不改写"""
+        result = rewriter.apply_limit("INSERT INTO users (name) VALUES ('a')", 100, 'mysql')
+        assert result.sql == "INSERT INTO users (name) VALUES ('a')"
+        assert result.strategy == STRATEGY_UNSUPPORTED
+
+
+class TestPagination:
+    """分页改写测试"""
+
+    def test_pagination_appends_limit_offset(self, rewriter):
+        """测试追加LIMIT/OFFSET"""
+        assert rewriter.apply_pagination("SELECT * FROM users;", 10, 20, 'mysql') == \
+            "SELECT * FROM users LIMIT 20 OFFSET 10;"
+
+    def test_pagination_wraps_existing_limit(self, rewriter):
+        """测试已有LIMIT时包装为子查询"""
+        assert rewriter.apply_pagination("SELECT * FROM users LIMIT 100", 10, 20, 'mysql') == \
+            "SELECT * FROM (SELECT * FROM users LIMIT 100) AS _limited LIMIT 20 OFFSET 10;"
+
+    def test_pagination_wraps_limit_all(self, rewriter):
+        """测试LIMIT ALL分页时包装为子查询，不生成重复的LIMIT"""
+        assert rewriter.apply_pagination("SELECT * FROM users LIMIT ALL", 10, 20, 'postgresql') == \
+            "SELECT * FROM (SELECT * FROM users LIMIT ALL) AS _limited LIMIT 20 OFFSET 10;"
+
+    def test_pagination_with_trailing_comment_and_placeholder(self, rewriter):
+        """测试末尾注释和占位符LIMIT下分页SQL仍然有效"""
+        assert rewriter.apply_pagination("SELECT * FROM users -- all", 0, 20, 'mysql') == \
+            "SELECT * FROM users LIMIT 20 OFFSET 0;"
+        assert rewriter.apply_pagination("SELECT * FROM users LIMIT ?", 0, 20, 'mysql') == \
+            "SELECT * FROM (SELECT * FROM users LIMIT ?) AS _limited LIMIT 20 OFFSET 0;"
+
+    def test_sqlserver_pagination_keeps_order_by(self, rewriter):
+        """测试SQL Server已有ORDER BY时不追加默认排序"""
+        assert rewriter.apply_pagination("SELECT * FROM users ORDER BY id", 10, 20, 'sqlserver') == \
+            "SELECT * FROM users ORDER BY id OFFSET 10 ROWS FETCH NEXT 20 ROWS ONLY;"
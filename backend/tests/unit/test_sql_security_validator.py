@@ -7,7 +7,7 @@ import sqlparse
 from unittest.mock import Mock, patch
 from src.services.sql_security_validator import (
     SQLSecurityValidator, SQLSecurityService, SecurityLevel, SQLOperation,
-    SecurityViolation, TableReference, FieldReference, QueryComplexity
+    SecurityViolation, TableReference, FieldReference, QueryComplexity, normalize_sql
 )
 
 
@@ -139,6 +139,19 @@ class TestSQLSecurityValidator:
         assert len(violations) > 0
         assert violations[0].type == "FIELD_NOT_FOUND"
     
+    def test_field_existence_case_insensitive(self):
+        """测试表名、别名和字段名比较不区分大小写"""
+        available_tables = {"users": ["ID", "Name"]}
+        table_refs = [TableReference(table_name="USERS", alias="U")]
+        field_refs = [
+            FieldReference(field_name="id", table_name="u"),
+            FieldReference(field_name="NAME", table_name="Users"),
+            FieldReference(field_name="name")
+        ]
+        
+        assert self.validator._validate_table_existence(table_refs, available_tables) == []
+        assert self.validator._validate_field_existence(field_refs, table_refs, available_tables) == []
+    
     def test_complexity_limits_check(self):
         """测试复杂度限制检查"""
         # 超过表数量限制
@@ -245,6 +258,60 @@ class TestSQLSecurityValidator:
         assert len(table_violations) > 0
 
 
+    def test_validation_cache_normalized_sql(self):
+        """测试按规范化SQL缓存验证结果"""
+        available_tables = {"users": ["id", "name"]}
+        
+        first = self.validator.validate_sql("SELECT id, name FROM users", available_tables)
+        second = self.validator.validate_sql("  SELECT id,   name\n FROM users; ", available_tables)
+        
+        # 命中缓存时返回副本，调用方修改结果不影响缓存
+        assert second == first and second is not first
+        second.violations.append(None)
+        second.is_valid = False
+        third_hit = self.validator.validate_sql("SELECT id, name FROM users", available_tables)
+        assert third_hit.is_valid is True
+        assert None not in third_hit.violations
+        stats = self.validator.get_cache_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        
+        # 表结构变化时不复用旧结果
+        third = self.validator.validate_sql("SELECT id, name FROM users", {"users": ["id"]})
+        assert third is not first
+        assert any(v.type == "FIELD_NOT_FOUND" for v in third.violations)
+    
+    def test_normalize_sql_keeps_literals(self):
+        """测试规范化不改变字符串字面量"""
+        assert normalize_sql("SELECT  *\nFROM t WHERE a = 'x  y';") == "SELECT * FROM t WHERE a = 'x  y'"
+    
+    def test_single_pass_analysis(self):
+        """测试单次遍历提取引用和复杂度"""
+        sql = """
+        SELECT u.id, u.name AS user_name, COUNT(o.id) AS order_count
+        FROM users u
+        LEFT JOIN orders AS o ON u.id = o.user_id
+        WHERE u.created_at > '2023-01-01' AND o.id IN (SELECT order_id FROM refunds)
+        GROUP BY u.id, u.name
+        ORDER BY order_count DESC
+        """
+        analysis = self.validator.visitor.visit(sqlparse.parse(sql)[0])
+        
+        assert analysis.operation == SQLOperation.SELECT
+        assert [(t.table_name, t.alias) for t in analysis.table_references] == [
+            ("users", "u"), ("orders", "o"), ("refunds", None)
+        ]
+        assert [(f.table_name, f.field_name) for f in analysis.field_references] == [
+            ("u", "id"), ("u", "name"), ("o", "id")
+        ]
+        assert analysis.join_count == 1
+        assert analysis.subquery_count == 1
+        assert analysis.function_count == 1
+        assert analysis.condition_count == 2
+        # created_at不应被当作CREATE关键词
+        assert analysis.keywords == set()
+
+
 class TestSQLSecurityService:
     """SQL安全服务测试"""
     
@@ -290,15 +357,95 @@ class TestSQLSecurityService:
         assert len(injection_violations) > 0
     
     @pytest.mark.asyncio
-    async def test_get_available_tables_mock(self):
-        """测试获取可用表（模拟数据）"""
-        tables = await self.service._get_available_tables(1)
-        
-        assert isinstance(tables, dict)
-        assert "users" in tables
-        assert "orders" in tables
-        assert "products" in tables
-        assert isinstance(tables["users"], list)
+    async def test_get_available_tables_from_metadata(self, db_session):
+        """测试从DataTable/TableField元数据获取可用表"""
+        import uuid
+        from src.models.data_preparation_model import DataTable, TableField
+        
+        data_source_id = str(uuid.uuid4())
+        table = DataTable(
+            id=str(uuid.uuid4()),
+            data_source_id=data_source_id,
+            table_name="Security_Users",
+            data_mode="DIRECT_QUERY",
+            status=True,
+            created_by="test_user"
+        )
+        db_session.add(table)
+        db_session.add_all([
+            TableField(id=str(uuid.uuid4()), table_id=table.id, field_name="id", data_type="INT", sort_order=0),
+            TableField(id=str(uuid.uuid4()), table_id=table.id, field_name="name", data_type="VARCHAR", sort_order=1),
+        ])
+        db_session.commit()
+        
+        service = SQLSecurityService(db_session=db_session)
+        try:
+            tables = await service._get_available_tables(data_source_id)
+            assert tables == {"security_users": ["id", "name"]}
+            
+            # 同步ORM查询不在事件循环线程上执行
+            service.invalidate_schema_cache(data_source_id)
+            import threading
+            load_threads = []
+            original_load = service._load_schema_map
+            
+            def load_schema_map(key):
+                load_threads.append(threading.current_thread())
+                return original_load(key)
+            
+            with patch.object(service, '_load_schema_map', side_effect=load_schema_map):
+                assert await service._get_available_tables(data_source_id) == tables
+            assert load_threads and threading.current_thread() not in load_threads
+            
+            # 第二次读取命中表结构缓存，不再查询数据库
+            with patch.object(service, '_load_schema_map') as mock_load:
+                assert await service._get_available_tables(data_source_id) == tables
+                mock_load.assert_not_called()
+        finally:
+            db_session.delete(table)
+            db_session.commit()
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_schema_cache(self):
+        """测试表结构缓存失效同时清除该数据源的验证结果"""
+        with patch.object(self.service, '_load_schema_map') as mock_load:
+            mock_load.return_value = {"users": ["id", "name"]}
+            await self.service.validate_and_secure_sql("SELECT id FROM users", data_source_id=7)
+            assert len(self.service.validation_cache) == 1
+            
+            self.service.invalidate_schema_cache(7)
+            assert len(self.service.validation_cache) == 0
+            
+            await self.service._get_available_tables(7)
+            assert mock_load.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_schema_change_refreshes_cached_validation(self):
+        """测试元数据变更后重新加载表结构，不再返回旧表结构下的验证结果"""
+        from src.services.metadata_cache import SCOPE_TABLE, get_version_registry
+        
+        sql = "SELECT u.Email FROM Users u"
+        with patch.object(self.service, '_load_schema_map') as mock_load:
+            mock_load.return_value = {"users": ["id", "name"]}
+            result = await self.service.validate_and_secure_sql(sql, data_source_id=8)
+            assert result.is_valid is False
+            assert result.violations[0].type == "FIELD_NOT_FOUND"
+            
+            # 表结构未变化时命中缓存，返回副本，调用方修改结果不影响后续命中
+            result.violations.clear()
+            cached = await self.service.validate_and_secure_sql(sql, data_source_id=8)
+            assert cached is not result
+            assert cached.violations[0].type == "FIELD_NOT_FOUND"
+            assert mock_load.call_count == 1
+            
+            # 字段提交后由ORM会话钩子递增表维度版本
+            mock_load.return_value = {"users": ["id", "name", "email"]}
+            get_version_registry().bump(SCOPE_TABLE, ["users-table"])
+            
+            result = await self.service.validate_and_secure_sql(sql, data_source_id=8)
+            assert result.is_valid is True
+            assert mock_load.call_count == 2
+            assert len(self.service.validation_cache) == 1
     
     def test_get_security_report(self):
         """测试生成安全报告"""
@@ -0,0 +1,179 @@
+"""
+候选表预排序服务单元测试
+
+测试词项切分、BM25打分、按Token预算截取短名单和召回率统计
+"""
+
+import pytest
+
+from src.services.table_pre_ranker import TablePreRanker, tokenize
+
+
+def make_tables(count):
+    """生成大量无关表，外加几张相关表"""
+    tables = [
+        {
+            "id": f"tbl_{i}",
+            "table_name": f"log_archive_{i}",
+            "table_comment": "系统日志归档",
+            "fields": [{"field_name": "log_time"}, {"field_name": "message"}]
+        }
+        for i in range(count)
+    ]
+    tables[137] = {
+        "id": "tbl_orders",
+        "table_name": "sales_orders",
+        "table_comment": "销售订单表",
+        "fields": [{"field_name": "order_amount", "field_comment": "订单金额"}]
+    }
+    tables[402] = {
+        "id": "tbl_products",
+        "table_name": "products",
+        "table_comment": "产品信息表",
+        "fields": [{"field_name": "product_name"}]
+    }
+    return tables
+
+
+@pytest.fixture
+def ranker():
+    return TablePreRanker(max_shortlist_size=20)
+
+
+class TestTokenize:
+    """词项切分测试"""
+
+    def test_split_identifiers_and_chinese(self):
+        """测试下划线、驼峰和中文二元组切分"""
+        assert tokenize("order_items") == ["order", "items"]
+        assert tokenize("OrderItems") == ["order", "items"]
+        assert tokenize("销售金额") == ["销售", "售金", "金额"]
+        assert tokenize(None) == []
+
+
+class TestRanking:
+    """打分排序测试"""
+
+    def test_relevant_tables_ranked_first(self, ranker):
+        """测试相关表排在前面"""
+        tables = make_tables(500)
+
+        ranked = ranker.rank("统计每个产品的销售订单金额", tables)
+
+        top_ids = {tables[position]["id"] for position, _ in ranked[:2]}
+        assert top_ids == {"tbl_orders", "tbl_products"}
+
+    def test_term_mappings_expand_query(self, ranker):
+        """测试业务术语映射弥补中英文差异"""
+        tables = [
+            {"id": "a", "table_name": "customer", "table_comment": ""},
+            {"id": "b", "table_name": "warehouse", "table_comment": ""}
+        ]
+
+        ranked = ranker.rank("有多少用户", tables, term_mappings={"用户": ["user", "customer"]})
+
+        assert ranked[0][0] == 0
+        assert ranked[0][1] > 0
+        assert ranked[1][1] == 0
+
+    def test_dense_scores_fused(self, ranker):
+        """测试向量检索结果与BM25排名融合，召回没有字面重合的表"""
+        tables = [
+            {"id": "a", "table_name": "client_master", "table_comment": ""},
+            {"id": "b", "table_name": "orders", "table_comment": "订单"},
+            {"id": "c", "table_name": "logs", "table_comment": ""}
+        ]
+
+        lexical = ranker.rank("顾客订单", tables)
+        fused = ranker.rank("顾客订单", tables, dense_scores={"a": 0.8, "b": 0.5, "missing": 0.9})
+
+        assert [position for position, score in lexical if score > 0] == [1]
+        assert [position for position, score in fused if score > 0] == [1, 0]
+
+    def test_index_cached_by_fingerprint(self, ranker):
+        """测试相同表结构复用索引，结构变化后重建"""
+        tables = make_tables(500)
+        ranker.rank("订单", tables)
+        ranker.rank("产品", tables)
+        tables[0] = dict(tables[0], table_comment="变更")
+        ranker.rank("订单", tables)
+
+        cache = ranker.get_statistics()["index_cache"]
+        assert cache["hits"] == 1
+        assert cache["misses"] == 2
+
+    def test_parallel_index_matches_serial(self):
+        """测试多进程构建的索引与串行构建一致"""
+        tables = make_tables(500)
+        serial = TablePreRanker(parallel_threshold=10_000).build_index(tables)
+        parallel = TablePreRanker(parallel_threshold=10).build_index(tables)
+
+        assert parallel.postings == serial.postings
+        assert parallel.doc_lengths == serial.doc_lengths
+
+
+class TestShortlist:
+    """短名单截取测试"""
+
+    def test_small_source_not_pruned(self, ranker):
+        """测试候选表全部放得下时不裁剪"""
+        tables = make_tables(500)[400:405]
+
+        result = ranker.shortlist("产品", tables, token_budget=10_000)
+
+        assert result.k == 5
+        assert result.pruned is False
+        assert result.shortlist[0]["id"] == "tbl_products"
+
+    def test_large_source_pruned_to_matches(self, ranker):
+        """测试大量候选表只保留命中的表"""
+        tables = make_tables(500)
+
+        result = ranker.shortlist("销售订单和产品", tables, token_budget=10_000)
+
+        assert result.pruned is True
+        assert {t["id"] for t in result.shortlist} == {"tbl_orders", "tbl_products"}
+
+    def test_no_matches_fills_budget_in_order(self, ranker):
+        """测试没有表命中时按原顺序放入"""
+        tables = make_tables(500)
+
+        result = ranker.shortlist("weather forecast", tables, token_budget=10_000)
+
+        assert result.k == 20
+        assert result.shortlist[0]["id"] == "tbl_0"
+
+    def test_shortlist_adapts_to_budget(self, ranker):
+        """测试短名单大小随Token预算变化"""
+        tables = make_tables(500)
+        render = lambda table: {"name": table["table_name"], "comment": table["table_comment"]}
+        unit_cost = ranker.shortlist("日志", tables[:1], 10_000, render=render).tokens_used
+
+        small = ranker.shortlist("日志归档", tables, token_budget=unit_cost * 4, render=render)
+        large = ranker.shortlist("日志归档", tables, token_budget=unit_cost * 10, render=render)
+
+        assert small.k == 4
+        assert large.k == 10
+        assert large.tokens_used <= unit_cost * 10
+
+    def test_budget_too_small_keeps_best_table(self, ranker):
+        """测试预算不足一张表时仍保留得分最高的表"""
+        tables = make_tables(500)
+
+        result = ranker.shortlist("销售订单", tables, token_budget=1)
+
+        assert [t["id"] for t in result.shortlist] == ["tbl_orders"]
+
+
+class TestRecall:
+    """召回率统计测试"""
+
+    def test_recall_at_k(self, ranker):
+        """测试召回率计算和统计"""
+        assert ranker.record_recall(["a", "b"], ["a", "c"]) == 0.5
+        assert ranker.record_recall(["a"], []) is None
+        assert ranker.record_recall([1, 2], ["1"]) == 1.0
+
+        stats = ranker.get_statistics()
+        assert stats["recall_samples"] == 2
+        assert stats["recall_at_k"] == pytest.approx(0.75)
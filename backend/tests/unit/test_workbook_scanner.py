@@ -0,0 +1,138 @@
+"""
+工作簿单遍扫描引擎测试
+"""
+
+import datetime
+from unittest.mock import patch
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from src.services.excel_service import ExcelService
+from src.services.workbook_scanner import HyperLogLog, WorkbookScanner
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """包含重复表头、空表头、缺失值、中间空行和末尾空行的工作簿"""
+    path = tmp_path / "sales.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Sales"
+    sheet.append(["id", "name", None, "name", "amount", "order_date"])
+    for i in range(50):
+        sheet.append([i, f"n{i % 7}", None, "NA" if i % 5 == 0 else "x", i * 1.5,
+                      datetime.datetime(2024, 1, 1 + i % 28)])
+    sheet.append([])
+    sheet.append([99, "z"])
+    sheet.append([])
+    sheet.append([])
+    workbook.create_sheet("Empty")
+    workbook.save(path)
+    return str(path)
+
+
+def _field_summary(field_types):
+    return [
+        (f["field_name"], f["data_type"], f["is_nullable"], f["null_count"], f["unique_count"], f["sample_values"])
+        for f in field_types
+    ]
+
+
+def test_scan_matches_pandas_structure_and_types(workbook_path):
+    """测试扫描结果与基于pandas的结构和类型推断一致"""
+    scan = WorkbookScanner().scan(workbook_path)
+    service = ExcelService()
+    expected = service.get_excel_structure(workbook_path)
+
+    assert scan.sheet_names == ["Sales", "Empty"]
+    for sheet, expected_sheet in zip(scan.to_structure()["sheets"], expected["sheets"]):
+        assert sheet["row_count"] == expected_sheet["row_count"]
+        assert sheet["columns"] == expected_sheet["columns"]
+        assert _field_summary(sheet["field_types"]) == _field_summary(
+            service.infer_field_types(workbook_path, sheet["name"])
+        )
+
+    sales = scan.get_sheet("Sales")
+    assert sales.row_count == 52
+    assert sales.empty_row_count == 1
+
+
+def test_scan_reads_workbook_once_and_caches_by_hash(workbook_path, tmp_path):
+    """测试工作簿只打开一次，内容相同的文件命中缓存"""
+    scanner = WorkbookScanner()
+    copy_path = tmp_path / "copy.xlsx"
+    copy_path.write_bytes(open(workbook_path, "rb").read())
+
+    with patch("openpyxl.load_workbook", wraps=openpyxl.load_workbook) as load_workbook, \
+            patch("pandas.read_excel") as read_excel:
+        first = scanner.scan(workbook_path)
+        scanner.scan(workbook_path)
+        copied = scanner.scan(str(copy_path))
+        scanner.get_sheet_data(workbook_path, "Sales", 10)
+
+    assert load_workbook.call_count == 1
+    assert load_workbook.call_args.kwargs["read_only"] is True
+    read_excel.assert_not_called()
+    assert copied.file_hash == first.file_hash
+    assert copied.file_path == str(copy_path)
+    assert scanner.get_statistics()["hits"] == 3
+    assert scanner.get_statistics()["misses"] == 1
+
+
+def test_get_sheet_data_uses_preview_and_falls_back(workbook_path):
+    """测试预览范围内的数据直接取自扫描结果，超出范围时回退到完整读取"""
+    scanner = WorkbookScanner(preview_limit=5)
+
+    data = scanner.get_sheet_data(workbook_path, "Sales", 3)
+    assert data["row_count"] == 3
+    assert data["columns"] == ["id", "name", "Unnamed: 2", "name.1", "amount", "order_date"]
+    assert data["data"][1]["name"] == "n1"
+    assert data["data"][0]["name.1"] is None or pd.isna(data["data"][0]["name.1"])
+
+    full = scanner.get_sheet_data(workbook_path, "Sales")
+    assert full["row_count"] == 52
+
+    with pytest.raises(Exception, match="not found"):
+        scanner.get_sheet_data(workbook_path, "Missing", 3)
+
+
+def test_memory_is_bounded_on_high_cardinality_columns(tmp_path):
+    """测试抽样有上限，高基数列切换为近似去重计数"""
+    path = tmp_path / "large.xlsx"
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    sheet.append(["key", "flag"])
+    for i in range(3000):
+        sheet.append([f"k{i}", i % 2 == 0])
+    workbook.save(path)
+
+    scanner = WorkbookScanner(preview_limit=10, sample_size=100, exact_distinct_limit=500)
+    sheet_scan = scanner.scan(str(path)).get_sheet("Data")
+    key, flag = sheet_scan.field_types
+
+    assert sheet_scan.row_count == 3000
+    assert len(sheet_scan.preview_rows) == 10
+    assert key["unique_count_approximate"] is True
+    assert abs(key["unique_count"] - 3000) < 3000 * 0.05
+    assert key["data_type"] == "TEXT"
+    assert flag["unique_count"] == 2
+    assert flag["unique_count_approximate"] is False
+    assert flag["data_type"] == ExcelService()._infer_column_type(pd.Series([True, False]))
+
+
+def test_hyperloglog_estimate():
+    """测试HyperLogLog基数估计误差"""
+    sketch = HyperLogLog()
+    for i in range(20000):
+        sketch.add(i)
+        sketch.add(float(i))
+
+    assert abs(sketch.count() - 20000) < 20000 * 0.05
+
+
+def test_scan_missing_file():
+    """测试文件不存在"""
+    with pytest.raises(Exception, match="File not found"):
+        WorkbookScanner().scan("/nonexistent/file.xlsx")